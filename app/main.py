@@ -54,8 +54,11 @@ def main():
     # Show login window
     auth_service = AuthService(db_service)
     login = LoginWindow(auth_service)
+    accepted = login.exec() == 1
+    # The user-db connect worker is only needed during login
+    auth_service.close()
     
-    if login.exec() == 1:  # Login successful
+    if accepted:  # Login successful
         # Import main window only after successful login
         from app.ui.windows.main_window import MainWindow
         
@@ -78,4 +81,7 @@ def main():
 
 
 if __name__ == "__main__":
+    # Hintergrundprozesse (ML-Training) starten per spawn - nötig für die PyInstaller-Version
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,503 @@
+"""
+Audit-Service - gepufferter, geordneter und manipulationsgeschützter Audit-Trail
+
+log() legt Einträge nur in eine lokale Warteschlange; ein Hintergrund-Thread
+schreibt sie gesammelt (ein INSERT je Block) in audit_logs der Auth-Datenbank.
+Login- und Speicherpfade warten damit nie auf die Datenbank.
+
+Jeder geschriebene Eintrag erhält eine fortlaufende Sequenznummer und eine
+SHA-256-Prüfsumme über den Inhalt und die Prüfsumme des Vorgängers. Ein
+Advisory-Lock serialisiert die Kettenfortschreibung über alle Arbeitsplätze.
+verify() prüft Reihenfolge, Lückenlosigkeit und Prüfsummen in einem Durchlauf.
+
+Ist die Datenbank nicht erreichbar, wandern die Einträge in eine Spill-Datei
+(JSON-Zeilen, nach jedem Block fsync). Sobald die Datenbank wieder antwortet,
+wird die Datei vor neuen Einträgen nachgetragen - die Reihenfolge bleibt
+erhalten, bereits geschriebene Einträge werden anhand ihrer ID übersprungen.
+Nur Verbindungsfehler führen in die Spill-Datei. Lehnt die Datenbank einzelne
+Einträge ab (Fremdschlüssel, Wertebereich), werden sie per Halbierung des
+Blocks eingegrenzt, protokolliert und in eine Quarantäne-Datei verschoben;
+der Rest des Blocks wird normal geschrieben.
+"""
+import atexit
+import enum
+import hashlib
+import ipaddress
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import String, select, insert, text
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from shared.models.telemetry import AuditLog
+
+
+class AuditEventType(enum.Enum):
+    """Audit-Ereignisse: Wert = (action, action_category)"""
+    LOGIN_SUCCESS = ("login", "auth")
+    LOGIN_FAILED = ("login_failed", "auth")
+    LOGOUT = ("logout", "auth")
+    ACCOUNT_LOCKED = ("account_locked", "security")
+    BRUTE_FORCE_ATTEMPT = ("brute_force", "security")
+    PASSWORD_CHANGE = ("password_change", "auth")
+    USER_CREATED = ("user_created", "admin")
+    DATABASE_CREATED = ("database_created", "admin")
+    CREATE = ("create", "data")
+    READ = ("read", "data")
+    UPDATE = ("update", "data")
+    DELETE = ("delete", "data")
+    EXPORT = ("export", "data")
+
+    @property
+    def action(self) -> str:
+        return self.value[0]
+
+    @property
+    def category(self) -> str:
+        return self.value[1]
+
+
+# Felder, die in die Prüfsumme eingehen (Reihenfolge ist Teil des Formats)
+CHAIN_FIELDS = (
+    "sequence", "timestamp", "tenant_id", "user_id", "user_email", "action",
+    "action_category", "action_description", "resource_type", "resource_id",
+    "resource_name", "old_values", "new_values", "changed_fields", "ip_address",
+    "session_id", "is_sensitive",
+)
+
+GENESIS_CHECKSUM = "0" * 64
+
+# Schlüssel des Advisory-Locks für die Kettenfortschreibung
+CHAIN_LOCK_KEY = 0x4155_4449_5400  # "AUDIT"
+
+BATCH_SIZE = 500
+FLUSH_INTERVAL = 2.0      # Sekunden zwischen zwei Schreibvorgängen
+RETRY_INTERVAL = 30.0     # Sekunden bis zum nächsten Versuch nach einem DB-Fehler
+
+DEFAULT_SPILL_PATH = os.environ.get(
+    "HOLZBAU_AUDIT_SPILL",
+    os.path.join(os.path.expanduser("~"), ".holzbau_erp", "audit_spill.jsonl")
+)
+
+# Maximale Länge der String-Spalten von audit_logs
+STRING_LIMITS = {
+    column.name: column.type.length
+    for column in AuditLog.__table__.columns
+    if isinstance(column.type, String) and column.type.length
+}
+
+
+class AuditStoreUnavailable(RuntimeError):
+    """Auth-Datenbank nicht verbunden"""
+
+
+# Nur diese Fehler bedeuten "Datenbank nicht erreichbar" - alles andere betrifft den Eintrag
+UNAVAILABLE_ERRORS = (OperationalError, InterfaceError, AuditStoreUnavailable)
+
+
+def _json_safe(value):
+    """Werte so normalisieren, wie sie aus JSONB zurückkommen"""
+    if value is None:
+        return None
+    return json.loads(json.dumps(value, default=str))
+
+
+def _ip(value) -> Optional[str]:
+    """IP in der Form, die PostgreSQL für INET zurückgibt"""
+    if not value:
+        return None
+    try:
+        return ipaddress.ip_address(str(value).strip()).compressed
+    except ValueError:
+        return None
+
+
+def fit_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Strings auf Spaltenlänge kürzen und IP normalisieren (auch für ältere Spill-Einträge)"""
+    fitted = dict(entry)
+    for name, limit in STRING_LIMITS.items():
+        value = fitted.get(name)
+        if isinstance(value, str) and len(value) > limit:
+            fitted[name] = value[:limit]
+    fitted["ip_address"] = _ip(fitted.get("ip_address"))
+    return fitted
+
+
+def chain_checksum(previous: str, entry: Dict[str, Any]) -> str:
+    """SHA-256 über Vorgänger-Prüfsumme und kanonisches JSON des Eintrags"""
+    payload = {name: entry.get(name) for name in CHAIN_FIELDS}
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{previous}|{canonical}".encode("utf-8")).hexdigest()
+
+
+def _row_entry(row: AuditLog) -> Dict[str, Any]:
+    """Gespeicherte Zeile in die Form bringen, in der sie gehasht wurde"""
+    return {
+        "sequence": row.sequence,
+        "timestamp": row.timestamp.isoformat() if row.timestamp else None,
+        "tenant_id": str(row.tenant_id) if row.tenant_id else None,
+        "user_id": str(row.user_id) if row.user_id else None,
+        "user_email": row.user_email,
+        "action": row.action,
+        "action_category": row.action_category,
+        "action_description": row.action_description,
+        "resource_type": row.resource_type,
+        "resource_id": row.resource_id,
+        "resource_name": row.resource_name,
+        "old_values": row.old_values,
+        "new_values": row.new_values,
+        "changed_fields": list(row.changed_fields or []),
+        "ip_address": _ip(row.ip_address),
+        "session_id": row.session_id,
+        "is_sensitive": bool(row.is_sensitive),
+    }
+
+
+@dataclass
+class AuditVerification:
+    """Ergebnis einer Kettenprüfung"""
+    ok: bool
+    checked: int
+    broken_sequence: Optional[int] = None
+    message: str = ""
+
+
+class AuditService:
+    """Gepufferter Audit-Writer mit SHA-256-Kette und Spill-Datei"""
+
+    def __init__(self, db_service=None, spill_path: str = None, quarantine_path: str = None):
+        self.db_service = db_service
+        self.spill_path = spill_path or DEFAULT_SPILL_PATH
+        self.quarantine_path = quarantine_path or os.path.splitext(self.spill_path)[0] + "_quarantine.jsonl"
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._is_running = False
+        self._retry_at = 0.0
+        self._write_lock = threading.Lock()
+
+    # ============== ERFASSUNG ==============
+
+    def log(
+        self,
+        event_type: AuditEventType,
+        user_id=None,
+        user_email: str = None,
+        tenant_id=None,
+        resource_type: str = None,
+        resource_id=None,
+        resource_name: str = None,
+        description: str = None,
+        old_values: Dict[str, Any] = None,
+        new_values: Dict[str, Any] = None,
+        ip_address: str = None,
+        session_id: str = None,
+        is_sensitive: bool = False,
+        action: str = None,
+    ):
+        """Eintrag vormerken - kehrt sofort zurück"""
+        old_values, new_values = _json_safe(old_values), _json_safe(new_values)
+        changed_fields = []
+        if old_values and new_values:
+            changed_fields = [k for k in new_values if k in old_values and old_values[k] != new_values[k]]
+        entry = {
+            "id": str(uuid.uuid4()),
+            "timestamp": datetime.utcnow().isoformat(),
+            "tenant_id": str(tenant_id) if tenant_id else None,
+            "user_id": str(user_id) if user_id else None,
+            "user_email": user_email,
+            "action": action or event_type.action,
+            "action_category": event_type.category,
+            "action_description": description,
+            "resource_type": resource_type or event_type.category,
+            "resource_id": str(resource_id) if resource_id else None,
+            "resource_name": resource_name,
+            "old_values": old_values,
+            "new_values": new_values,
+            "changed_fields": changed_fields,
+            "ip_address": _ip(ip_address),
+            "session_id": session_id,
+            "is_sensitive": bool(is_sensitive),
+        }
+        entry = fit_entry(entry)
+        with self._lock:
+            self._queue.append(entry)
+            pending = len(self._queue)
+        self._ensure_started()
+        if pending >= BATCH_SIZE:
+            self._wakeup.set()
+
+    def log_login_success(self, user_id, email: str, ip_address: str = None):
+        self.log(AuditEventType.LOGIN_SUCCESS, user_id=user_id, user_email=email,
+                 resource_type="user", resource_id=user_id, ip_address=ip_address)
+
+    def log_login_failed(self, email: str, ip_address: str = None, reason: str = None):
+        self.log(AuditEventType.LOGIN_FAILED, user_email=email, resource_type="user",
+                 description=reason, ip_address=ip_address)
+
+    def log_account_locked(self, user_id, email: str, ip_address: str = None):
+        self.log(AuditEventType.ACCOUNT_LOCKED, user_id=user_id, user_email=email,
+                 resource_type="user", resource_id=user_id, ip_address=ip_address)
+
+    def log_brute_force_attempt(self, email: str, ip_address: str = None, attempts: int = None):
+        self.log(AuditEventType.BRUTE_FORCE_ATTEMPT, user_email=email, resource_type="user",
+                 description=f"{attempts} Fehlversuche" if attempts else None,
+                 new_values={"failed_attempts": attempts}, ip_address=ip_address, is_sensitive=True)
+
+    def log_password_change(self, user_id, email: str):
+        self.log(AuditEventType.PASSWORD_CHANGE, user_id=user_id, user_email=email,
+                 resource_type="user", resource_id=user_id, is_sensitive=True)
+
+    def log_user_created(self, user_id, email: str):
+        self.log(AuditEventType.USER_CREATED, user_id=user_id, user_email=email,
+                 resource_type="user", resource_id=user_id)
+
+    def log_database_created(self, user_id, email: str, db_name: str):
+        self.log(AuditEventType.DATABASE_CREATED, user_id=user_id, user_email=email,
+                 resource_type="database", resource_name=db_name)
+
+    # ============== HINTERGRUND-WRITER ==============
+
+    def _ensure_started(self):
+        if self._is_running:
+            return
+        with self._lock:
+            if self._is_running:
+                return
+            self._is_running = True
+            self._thread = threading.Thread(target=self._worker, name="audit-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0):
+        """Writer beenden; Restbestand in DB oder Spill-Datei schreiben"""
+        if not self._is_running:
+            return
+        self._is_running = False
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _worker(self):
+        while self._is_running:
+            self._wakeup.wait(FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Audit-Writer: {e}")
+
+    def flush(self) -> int:
+        """Warteschlange (und ggf. Spill-Datei) schreiben; liefert Anzahl DB-Einträge"""
+        with self._write_lock:
+            with self._lock:
+                batch = list(self._queue)
+                self._queue.clear()
+
+            # Solange die Datenbank nicht erreichbar ist: nur lokal sichern
+            if time.monotonic() < self._retry_at:
+                self._spill(batch)
+                return 0
+
+            written = done = 0
+            try:
+                written += self._replay_spill()
+                while done < len(batch):
+                    written += self._write_checked(batch[done:done + BATCH_SIZE])
+                    done += BATCH_SIZE
+            except UNAVAILABLE_ERRORS as e:
+                print(f"Audit-Log nicht erreichbar, sichere {len(batch) - done} Einträge lokal: {e}")
+                self._spill(batch[done:])
+                self._retry_at = time.monotonic() + RETRY_INTERVAL
+            except Exception:
+                # Unerwarteter Fehler (z.B. Spill-Datei): Rest zurück in die Warteschlange
+                with self._lock:
+                    self._queue.extendleft(reversed(batch[done:]))
+                raise
+            return written
+
+    def _session(self):
+        db_service = self.db_service
+        if db_service is None:
+            from app.services.database_service import DatabaseService
+            db_service = self.db_service = DatabaseService()
+        session = db_service.get_auth_session()
+        if session is None:
+            raise AuditStoreUnavailable("Auth-Datenbank nicht verbunden")
+        return session
+
+    def _write_checked(self, entries: List[Dict[str, Any]], skip_existing: bool = False) -> int:
+        """Block schreiben; abgelehnte Einträge per Halbierung eingrenzen und in Quarantäne"""
+        try:
+            return self._write(entries, skip_existing)
+        except UNAVAILABLE_ERRORS:
+            raise
+        except Exception as e:
+            if len(entries) == 1:
+                self._quarantine(entries[0], e)
+                return 0
+        middle = len(entries) // 2
+        return (self._write_checked(entries[:middle], skip_existing)
+                + self._write_checked(entries[middle:], skip_existing))
+
+    def _write(self, entries: List[Dict[str, Any]], skip_existing: bool = False) -> int:
+        """Ein Block: Kette unter Advisory-Lock fortschreiben, ein INSERT"""
+        if not entries:
+            return 0
+        session = self._session()
+        try:
+            session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHAIN_LOCK_KEY})
+            if skip_existing:
+                ids = [uuid.UUID(e["id"]) for e in entries]
+                existing = {str(i) for i in session.execute(select(AuditLog.id).where(AuditLog.id.in_(ids))).scalars()}
+                entries = [e for e in entries if e["id"] not in existing]
+                if not entries:
+                    session.commit()
+                    return 0
+
+            last = session.execute(
+                select(AuditLog.sequence, AuditLog.checksum)
+                .where(AuditLog.sequence.isnot(None))
+                .order_by(AuditLog.sequence.desc())
+                .limit(1)
+            ).first()
+            sequence, previous = (last.sequence, last.checksum) if last else (0, GENESIS_CHECKSUM)
+
+            rows = []
+            for entry in entries:
+                sequence += 1
+                chained = {**fit_entry(entry), "sequence": sequence}
+                previous = chain_checksum(previous, chained)
+                rows.append({
+                    **chained,
+                    "id": uuid.UUID(entry["id"]),
+                    "timestamp": datetime.fromisoformat(entry["timestamp"]),
+                    "tenant_id": uuid.UUID(entry["tenant_id"]) if entry["tenant_id"] else None,
+                    "user_id": uuid.UUID(entry["user_id"]) if entry["user_id"] else None,
+                    "checksum": previous,
+                })
+            session.execute(insert(AuditLog), rows)
+            session.commit()
+            return len(rows)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    # ============== SPILL-DATEI ==============
+
+    def _spill(self, entries: Iterable[Dict[str, Any]]):
+        """Einträge anhängen und auf den Datenträger zwingen"""
+        entries = list(entries)
+        if not entries:
+            return
+        os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _replay_spill(self) -> int:
+        """Spill-Datei blockweise nachtragen; Rest bleibt bei Verbindungsfehler erhalten"""
+        if not os.path.exists(self.spill_path):
+            return 0
+        entries = []
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError as e:
+                    self._quarantine({"raw": line.rstrip("\n")}, e)
+        written = 0
+        for start in range(0, len(entries), BATCH_SIZE):
+            try:
+                written += self._write_checked(entries[start:start + BATCH_SIZE], skip_existing=True)
+            except UNAVAILABLE_ERRORS:
+                self._rewrite_spill(entries[start:])
+                raise
+        os.remove(self.spill_path)
+        if written:
+            print(f"Audit-Log: {written} lokal gesicherte Einträge nachgetragen")
+        return written
+
+    def _quarantine(self, entry: Dict[str, Any], error: Exception):
+        """Abgelehnten Eintrag protokollieren und in die Quarantäne-Datei verschieben"""
+        reason = f"{type(error).__name__}: {str(error).splitlines()[0] if str(error) else ''}"[:500]
+        print(f"Audit-Eintrag {entry.get('id', '?')} abgelehnt, in Quarantäne verschoben: {reason}")
+        os.makedirs(os.path.dirname(self.quarantine_path) or ".", exist_ok=True)
+        with open(self.quarantine_path, "a", encoding="utf-8") as f:
+            record = {"entry": entry, "error": reason, "quarantined_at": datetime.utcnow().isoformat()}
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite_spill(self, entries: List[Dict[str, Any]]):
+        """Spill-Datei atomar durch den unverarbeiteten Rest ersetzen"""
+        tmp_path = self.spill_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spill_path)
+
+    # ============== PRÜFUNG ==============
+
+    def verify(self, session=None, chunk_size: int = 5000) -> AuditVerification:
+        """Kette in einem Durchlauf prüfen (Sequenz lückenlos, Prüfsummen stimmen)"""
+        own_session = session is None
+        session = session or self._session()
+        try:
+            stmt = (
+                select(AuditLog)
+                .where(AuditLog.sequence.isnot(None))
+                .order_by(AuditLog.sequence)
+                .execution_options(yield_per=chunk_size)
+            )
+            previous, expected, checked = GENESIS_CHECKSUM, 1, 0
+            for row in session.scalars(stmt):
+                if row.sequence != expected:
+                    return AuditVerification(
+                        False, checked, row.sequence,
+                        f"Lücke in der Kette: Sequenz {expected} fehlt (gefunden {row.sequence})"
+                    )
+                previous = chain_checksum(previous, _row_entry(row))
+                if previous != row.checksum:
+                    return AuditVerification(
+                        False, checked, row.sequence,
+                        f"Prüfsumme von Eintrag {row.sequence} stimmt nicht - Eintrag oder Vorgänger verändert"
+                    )
+                checked += 1
+                expected += 1
+                session.expunge(row)
+            return AuditVerification(True, checked, message=f"{checked} Einträge geprüft, Kette intakt")
+        finally:
+            if own_session:
+                session.close()
+
+
+# Global instance
+_audit_service = None
+
+
+def get_audit_service(db_service=None) -> AuditService:
+    """Get global audit service instance"""
+    global _audit_service
+    if _audit_service is None:
+        _audit_service = AuditService(db_service)
+    elif db_service is not None and _audit_service.db_service is None:
+        _audit_service.db_service = db_service
+    return _audit_service
@@ -1,8 +1,9 @@
 """
 Authentication Service with Security Mechanisms
 """
-from typing import Optional
+from typing import Optional, Callable
 from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, Future
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 import uuid
@@ -16,6 +17,7 @@ from shared.utils.security import (
     MAX_LOGIN_ATTEMPTS
 )
 from app.services.audit_service import get_audit_service, AuditEventType
+from app.services.consent_service import get_consent_service
 
 
 @dataclass
@@ -46,19 +48,33 @@ class AuthService:
         self.db = db_service
         self.current_user: Optional[UserData] = None
         self.audit = get_audit_service()
+        # Connects to the user database in parallel to password verification (created on demand)
+        self._connect_executor: Optional[ThreadPoolExecutor] = None
     
-    def login(self, email: str, password: str, ip_address: str = None) -> tuple[bool, str]:
+    def login(self, email: str, password: str, ip_address: str = None,
+              progress: Callable[[str], None] = None) -> tuple[bool, str]:
         """
         Authenticate user with email and password.
         Includes rate limiting, account lockout, and audit logging.
+        
+        Once the user row is known, the connection to the user's database is
+        established speculatively while the password hash is verified, so the
+        hash cost no longer adds to the connection setup. Migrations run and the
+        engine is activated only after successful verification; otherwise the
+        pending connection is cancelled or disposed. Safe to call from a worker
+        thread; progress messages are passed to the optional progress callback.
         Returns: (success, message)
         """
+        report = progress or (lambda message: None)
+        
         # Sanitize input
         email = sanitize_string(email.lower().strip(), 255) if email else ""
         
+        pending_db: Optional[Future] = None
         session = self.db.get_auth_session()
         try:
             # Find user by email
+            report("Benutzerkonto wird gesucht...")
             result = session.execute(
                 select(User)
                 .options(selectinload(User.roles), selectinload(User.tenant))
@@ -86,8 +102,17 @@ class AuthService:
                 self.audit.log_login_failed(email, ip_address, "Account deleted")
                 return False, "Ungültige Anmeldedaten"
             
+            # Start connecting to the user's database while the hash is verified
+            if user.database_name:
+                report("Datenbankverbindung wird aufgebaut...")
+                pending_db = self._connector().submit(self.db.open_user_engine, user.database_name)
+            
             # Verify password
+            report("Anmeldedaten werden geprüft...")
             if not verify_password(password, user.hashed_password):
+                self._discard_user_database(pending_db)
+                pending_db = None
+                
                 # Increment failed attempts
                 failed_attempts += 1
                 user.failed_login_attempts = str(failed_attempts)
@@ -111,6 +136,7 @@ class AuthService:
             
             # Create user database if not exists
             if not user.database_name:
+                report("Benutzerdatenbank wird eingerichtet...")
                 db_name = self._create_user_database(user)
                 if db_name:
                     user.database_name = db_name
@@ -120,6 +146,12 @@ class AuthService:
             user.last_login = datetime.utcnow()
             session.commit()
             
+            # Tracking-Einwilligungen einmalig laden (danach nur Bit-Tests)
+            try:
+                get_consent_service().load_user(session, user.id)
+            except Exception as e:
+                print(f"Einwilligungen konnten nicht geladen werden: {e}")
+            
             # Create UserData object
             self.current_user = UserData(
                 id=user.id,
@@ -137,9 +169,15 @@ class AuthService:
                 roles=[r.name for r in user.roles]
             )
             
-            # Connect to user's personal database
-            if user.database_name:
+            # Activate the speculatively opened user database
+            if pending_db is not None:
+                report("Datenbankverbindung wird abgeschlossen...")
+                self._activate_user_database(user.database_name, pending_db)
+                pending_db = None
+            elif user.database_name and self.db.current_user_db_name != user.database_name:
                 self.db.connect_user_database(user.database_name)
+            
+            if user.database_name:
                 self._sync_tenant_to_master(user.tenant_id)
             
             # Log successful login
@@ -149,11 +187,50 @@ class AuthService:
             
         except Exception as e:
             session.rollback()
+            self._discard_user_database(pending_db)
             self.audit.log_login_failed(email, ip_address, f"Error: {str(e)}")
             return False, f"Anmeldefehler: {str(e)}"
         finally:
             session.close()
     
+    def _connector(self) -> ThreadPoolExecutor:
+        if self._connect_executor is None:
+            self._connect_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-db-connect")
+        return self._connect_executor
+    
+    def close(self):
+        """Stop the connect worker; a pending speculative connection is cancelled or disposed"""
+        if self._connect_executor is not None:
+            self._connect_executor.shutdown(wait=False, cancel_futures=True)
+            self._connect_executor = None
+    
+    def _activate_user_database(self, db_name: str, pending_db: Future):
+        """Wait for the speculative connection, migrate and make it the active user database"""
+        try:
+            engine = pending_db.result()
+        except Exception as e:
+            print(f"Error connecting to user database {db_name}: {e}")
+            return
+        try:
+            self.db.migrate_user_database(engine)
+        except Exception as e:
+            engine.dispose()
+            print(f"Error migrating user database {db_name}: {e}")
+            return
+        self.db.activate_user_database(db_name, engine)
+    
+    @staticmethod
+    def _discard_user_database(pending_db: Optional[Future]):
+        """Cancel a speculative connection or dispose its engine without waiting for it"""
+        if pending_db is None or pending_db.cancel():
+            return
+        
+        def dispose(future: Future):
+            if not future.cancelled() and future.exception() is None:
+                future.result().dispose()
+        
+        pending_db.add_done_callback(dispose)
+    
     def _create_user_database(self, user) -> Optional[str]:
         """Create a personal database for the user"""
         import re
@@ -270,7 +347,9 @@ class AuthService:
                 user_id=self.current_user.id,
                 user_email=self.current_user.email
             )
+            get_consent_service().forget_user(self.current_user.id)
         self.current_user = None
+        self.close()
     
     def change_password(self, old_password: str, new_password: str) -> tuple[bool, str]:
         """Change password for current user"""
@@ -0,0 +1,102 @@
+"""
+Cache-Service - prozesslokaler Zwischenspeicher mit Ablaufzeit
+
+Hält Abfrageergebnisse (DatabaseService.cached_query) und Dashboard-Kennzahlen
+für eine begrenzte Zeit im Speicher. Einträge laufen nach ihrer TTL ab;
+invalidate() verwirft alle Schlüssel, die ein Muster enthalten, z.B. nach dem
+Speichern eines Kunden alle "customer"-Einträge. Bei mehr als MAX_ENTRIES
+Einträgen werden zuerst abgelaufene, dann die ältesten verdrängt.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+DEFAULT_TTL = 300
+
+MAX_ENTRIES = 2000
+
+_STATS_PREFIX = "stats:"
+
+
+class CacheService:
+    """Thread-sicherer TTL-Cache für den eigenen Prozess"""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Wert oder default, wenn der Schlüssel fehlt oder abgelaufen ist"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = DEFAULT_TTL):
+        """Wert für ttl Sekunden ablegen (ttl None: bis zur Invalidierung)"""
+        expires = time.monotonic() + ttl if ttl is not None else float("inf")
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate(self, pattern: Optional[str] = None) -> int:
+        """Alle Einträge (pattern None) bzw. alle Schlüssel, die pattern enthalten, verwerfen"""
+        with self._lock:
+            if pattern is None:
+                count = len(self._entries)
+                self._entries.clear()
+                return count
+            keys = [key for key in self._entries if pattern in key]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self._entries.items() if expires <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ============== DASHBOARD ==============
+
+    def get_stats(self, key: str) -> Optional[dict]:
+        """Zwischengespeicherte Kennzahlen eines Dashboards"""
+        return self.get(_STATS_PREFIX + key)
+
+    def set_stats(self, key: str, stats: dict, ttl: Optional[float] = 60):
+        self.set(_STATS_PREFIX + key, stats, ttl=ttl)
+
+    def info(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+# Global instance
+_cache_service = None
+
+
+def get_cache_service() -> CacheService:
+    """Get global cache service instance"""
+    global _cache_service
+    if _cache_service is None:
+        _cache_service = CacheService()
+    return _cache_service
@@ -0,0 +1,561 @@
+"""
+Liquiditätsplanung - Prognose für CashFlowForecast/CashFlowForecastItem
+
+load_inputs() liest alle Zahlungsströme eines Mandanten für bis zu ein Jahr
+mit wenigen mengenbasierten Abfragen und hält sie als NumPy-Arrays
+(Fälligkeitstag, Betrag in Cent) je Kategorie:
+- Forderungen: offene Rechnungen (Restbetrag, Gutschriften negativ) und die
+  Abo-Rechnungen der kommenden Zeiträume (Rechnungsdatum + Zahlungsziel).
+  Je Kunde wird der betragsgewichtete Zahlungsverzug der letzten 12 Monate
+  ermittelt; Kunden ohne Historie erhalten den Durchschnitt des Mandanten.
+- Verbindlichkeiten: geplante ausgehende Zahlungen und offene Bestellungen
+  (Liefertermin + Zahlungsziel des Lieferanten)
+- Löhne und Lohnsteuer: aus der letzten abgerechneten Periode (sonst aus den
+  aktiven Gehältern geschätzt), Auszahlung zum Monatsende bzw. zum
+  payment_date der Periode, Lohnsteuer am 10. des Folgemonats
+- Kredite: offene Raten aus LoanPayment, für Kredite ohne Ratenplan der
+  Tilgungsplan ab dem Stichtag mit dem aktuellen Saldo (LoanScheduleService)
+
+compute() verteilt die Arrays mit searchsorted/bincount auf tägliche,
+wöchentliche oder monatliche Perioden und bildet die Endbestände als
+kumulierte Summe. Ohne Datenbankzugriff dauert das auch für 52 Wochen nur
+Millisekunden - Parameter (Intervall, Horizont, Gewichtung des
+Zahlungsverzugs, Anfangsbestand) lassen sich so interaktiv ändern.
+Überfällige gespeicherte Posten fallen in die erste Periode; nur berechnete
+Raten vor dem Stichtag entfallen, sie sind im aktuellen Saldo bereits enthalten.
+
+save() schreibt das Ergebnis als CashFlowForecast mit Bulk-Insert der
+Positionen; eine gespeicherte Planung wird dabei vollständig ersetzt.
+"""
+import calendar
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Date, case, cast, delete, exists, func, insert, or_, select
+
+from shared.models import (
+    BankAccount, CashFlowForecast, CashFlowForecastItem, EmployeeSalary, Invoice, InvoiceStatus,
+    InvoiceType, Loan, LoanPayment, Payment, PaymentDirection, PaymentStatus, Payslip, PayrollPeriod,
+    PurchaseOrder, RecurringInvoice, RecurringInvoiceItem, Supplier
+)
+from app.services.loan_schedule_service import (
+    OPEN_STATUSES as OPEN_LOAN_STATUSES, UNSCHEDULED_LOAN_TYPES, get_loan_schedule_service
+)
+from app.services.payroll_service import MONTH_NAMES
+from app.services.project_cost_service import sql_number
+from app.services.recurring_invoice_service import FREQUENCY_MONTHS, add_months, due_periods
+
+
+INTERVALS = ("daily", "weekly", "monthly")
+
+# Eingaben werden für diesen Zeitraum geladen - längere Prognosen sind nicht vorgesehen
+MAX_HORIZON_DAYS = 400
+
+# Zahlungsverhalten der Kunden: Rückblick und Begrenzung des Verzugs (Tage)
+DELAY_LOOKBACK_DAYS = 365
+MAX_DELAY_DAYS = 120
+
+# Schätzung ohne abgerechnete Periode: AG-Kosten und Lohnsteuer-Anteil bezogen auf das Brutto
+EMPLOYER_COST_FACTOR = 1.21
+WAGE_TAX_SHARE = 0.15
+
+# Lohnsteuer-Anmeldung: Fälligkeit am 10. des Folgemonats
+WAGE_TAX_DAY = 10
+
+# Offene Bestellungen ohne Liefertermin: angenommene Lieferzeit
+DEFAULT_DELIVERY_DAYS = 14
+
+OPEN_INVOICE_EXCLUDED = (InvoiceStatus.DRAFT, InvoiceStatus.PAID, InvoiceStatus.CANCELLED)
+NEGATIVE_TYPES = (InvoiceType.CREDIT_NOTE, InvoiceType.CANCELLATION)
+OPEN_PURCHASE_STATUSES = ("sent", "confirmed", "partial_received")
+
+# Kategorien -> Spalten in CashFlowForecastItem
+INCOME_COLUMNS = ("planned_receivables", "planned_other_income")
+EXPENSE_COLUMNS = ("planned_payables", "planned_payroll", "planned_taxes", "planned_rent",
+                   "planned_insurance", "planned_loans", "planned_other_expenses")
+
+
+def _day(value: date) -> np.datetime64:
+    return np.datetime64(value, "D")
+
+
+def _days(values) -> np.ndarray:
+    return np.array(values, dtype="datetime64[D]")
+
+
+def _cents(values) -> np.ndarray:
+    return np.round(np.array([float(v or 0) for v in values], dtype=np.float64) * 100).astype(np.int64)
+
+
+def _decimal(cents) -> Decimal:
+    return Decimal(int(round(cents))) / 100
+
+
+@dataclass
+class Flows:
+    """Zahlungsstrom einer Kategorie: Fälligkeitstage und Beträge in Cent"""
+    days: np.ndarray = field(default_factory=lambda: _days([]))
+    cents: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def concat(cls, *parts: "Flows") -> "Flows":
+        parts = [part for part in parts if len(part.cents)]
+        if not parts:
+            return cls()
+        return cls(np.concatenate([p.days for p in parts]), np.concatenate([p.cents for p in parts]))
+
+    @classmethod
+    def of(cls, days, cents) -> "Flows":
+        return cls(_days(days), np.asarray(cents, dtype=np.int64))
+
+
+@dataclass
+class ForecastInputs:
+    """Alle Zahlungsströme eines Mandanten ab start (geladen bis end)"""
+    tenant_id: object
+    start: date
+    end: date
+    opening_balance: Decimal
+    # Forderungen: vertragliche Fälligkeit und Zahlungsverzug des Kunden getrennt (Gewichtung in compute)
+    receivables: Flows
+    receivable_delays: np.ndarray
+    expenses: Dict[str, Flows]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class ForecastResult:
+    """Prognose je Periode; Beträge in Cent"""
+    interval: str
+    period_starts: List[date]
+    period_ends: List[date]
+    labels: List[str]
+    opening_balance: int
+    columns: Dict[str, np.ndarray]
+    counts: Dict[str, np.ndarray]
+    income: np.ndarray
+    expenses: np.ndarray
+    net: np.ndarray
+    opening: np.ndarray
+    closing: np.ndarray
+
+    def minimum(self) -> Tuple[Optional[date], int]:
+        """Periode mit dem niedrigsten Endbestand"""
+        if not len(self.closing):
+            return None, self.opening_balance
+        index = int(np.argmin(self.closing))
+        return self.period_starts[index], int(self.closing[index])
+
+
+# ============== PERIODEN ==============
+
+def period_boundaries(start: date, interval: str, periods: int) -> List[date]:
+    """periods + 1 Grenzen; die erste Periode beginnt am Stichtag, die weiteren am Wochen-/Monatsanfang"""
+    if interval not in INTERVALS:
+        raise ValueError(f"Unbekanntes Intervall: {interval}")
+    if interval == "daily":
+        return [start + timedelta(days=k) for k in range(periods + 1)]
+    if interval == "weekly":
+        monday = start - timedelta(days=start.weekday())
+        return [start] + [monday + timedelta(weeks=k) for k in range(1, periods + 1)]
+    first = start.replace(day=1)
+    return [start] + [add_months(first, k) for k in range(1, periods + 1)]
+
+
+def period_label(start: date, interval: str) -> str:
+    if interval == "daily":
+        return start.strftime("%d.%m.%Y")
+    if interval == "weekly":
+        year, week, _ = start.isocalendar()
+        return f"KW {week:02d}/{year}"
+    return f"{MONTH_NAMES[start.month - 1]} {start.year}"
+
+
+def _month_end(day: date) -> date:
+    return day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+
+# ============== SERVICE ==============
+
+class CashFlowService:
+    """Laden, Berechnen und Speichern der Liquiditätsprognose"""
+
+    # ---------- Forderungen ----------
+
+    def _customer_delays(self, session, tenant_id, start: date) -> Tuple[Dict, float]:
+        """Betragsgewichteter Zahlungsverzug je Kunde (Tage) und Mandantendurchschnitt"""
+        amount = sql_number(Invoice.total)
+        delay = cast(Invoice.paid_at, Date) - Invoice.due_date
+        rows = session.execute(
+            select(
+                Invoice.customer_id,
+                func.sum(delay * amount).label("weighted"),
+                func.sum(amount).label("amount"),
+            ).where(
+                Invoice.tenant_id == tenant_id,
+                Invoice.is_deleted.is_(False),
+                Invoice.paid_at.isnot(None),
+                Invoice.due_date.isnot(None),
+                Invoice.paid_at >= start - timedelta(days=DELAY_LOOKBACK_DAYS),
+                amount > 0,
+            ).group_by(Invoice.customer_id)
+        ).all()
+        weighted = np.array([float(row.weighted or 0) for row in rows])
+        amounts = np.array([float(row.amount or 0) for row in rows])
+        if not len(rows) or amounts.sum() <= 0:
+            return {}, 0.0
+        delays = np.clip(weighted / np.where(amounts > 0, amounts, 1), -MAX_DELAY_DAYS, MAX_DELAY_DAYS)
+        default = float(np.clip(weighted.sum() / amounts.sum(), -MAX_DELAY_DAYS, MAX_DELAY_DAYS))
+        return dict(zip((row.customer_id for row in rows), delays.tolist())), default
+
+    def _open_invoices(self, session, tenant_id):
+        outstanding = sql_number(Invoice.remaining_amount)
+        sign = case((Invoice.invoice_type.in_(NEGATIVE_TYPES), -1), else_=1)
+        due = func.coalesce(
+            Invoice.due_date,
+            Invoice.invoice_date + func.coalesce(Invoice.payment_terms_days, 30),
+        )
+        return session.execute(
+            select(Invoice.customer_id, due.label("due"), (sign * outstanding).label("amount"))
+            .where(
+                Invoice.tenant_id == tenant_id,
+                Invoice.is_deleted.is_(False),
+                Invoice.status.notin_(OPEN_INVOICE_EXCLUDED),
+                or_(Invoice.invoice_type.is_(None), Invoice.invoice_type != InvoiceType.PROFORMA),
+                outstanding > 0,
+            )
+        ).all()
+
+    def _recurring(self, session, tenant_id, start: date, end: date):
+        """Zahlungseingänge der Abo-Vorlagen: (Kunde, Fälligkeit, Bruttobetrag) je künftigem Zeitraum"""
+        net = func.round(sql_number(RecurringInvoiceItem.quantity) * sql_number(RecurringInvoiceItem.unit_price), 2)
+        gross = func.sum(net * (1 + sql_number(RecurringInvoiceItem.tax_rate) / 100))
+        totals = (
+            select(RecurringInvoiceItem.recurring_invoice_id, gross.label("gross"))
+            .group_by(RecurringInvoiceItem.recurring_invoice_id)
+            .subquery()
+        )
+        templates = session.execute(
+            select(
+                RecurringInvoice.customer_id, RecurringInvoice.start_date, RecurringInvoice.next_invoice_date,
+                RecurringInvoice.end_date, RecurringInvoice.frequency, RecurringInvoice.payment_terms_days,
+                totals.c.gross,
+            )
+            .join(totals, totals.c.recurring_invoice_id == RecurringInvoice.id)
+            .where(
+                RecurringInvoice.tenant_id == tenant_id,
+                RecurringInvoice.is_deleted.is_(False),
+                RecurringInvoice.is_active.is_(True),
+                or_(RecurringInvoice.end_date.is_(None), RecurringInvoice.end_date >= start),
+            )
+        ).all()
+        rows = []
+        for template in templates:
+            if template.frequency not in FREQUENCY_MONTHS:
+                continue
+            periods, _ = due_periods(
+                template.start_date, template.next_invoice_date, template.end_date, template.frequency,
+                end, limit=MAX_HORIZON_DAYS // 28 + 1,
+            )
+            terms = timedelta(days=template.payment_terms_days or 30)
+            rows.extend((template.customer_id, max(period_start, start) + terms, template.gross)
+                        for period_start, _ in periods)
+        return rows
+
+    # ---------- Ausgaben ----------
+
+    def _payables(self, session, tenant_id, start: date, end: date) -> Flows:
+        payments = session.execute(
+            select(func.coalesce(Payment.due_date, Payment.payment_date).label("due"), Payment.amount)
+            .where(
+                Payment.tenant_id == tenant_id,
+                Payment.is_deleted.is_(False),
+                Payment.direction == PaymentDirection.OUTGOING,
+                Payment.status.in_((PaymentStatus.PENDING, PaymentStatus.SCHEDULED)),
+                func.coalesce(Payment.due_date, Payment.payment_date) <= end,
+            )
+        ).all()
+        delivery = func.coalesce(PurchaseOrder.expected_delivery, PurchaseOrder.order_date + DEFAULT_DELIVERY_DAYS)
+        orders = session.execute(
+            select(delivery.label("delivery"), sql_number(func.coalesce(Supplier.payment_terms, "30")).label("terms"),
+                   sql_number(PurchaseOrder.total).label("amount"))
+            .outerjoin(Supplier, Supplier.id == PurchaseOrder.supplier_id)
+            .where(
+                PurchaseOrder.tenant_id == tenant_id,
+                PurchaseOrder.is_deleted.is_(False),
+                PurchaseOrder.status.in_(OPEN_PURCHASE_STATUSES),
+                delivery.isnot(None),
+            )
+        ).all()
+        order_days = [row.delivery + timedelta(days=int(row.terms or 0)) for row in orders]
+        return Flows.concat(
+            Flows.of([row.due for row in payments], _cents(row.amount for row in payments)),
+            Flows.of(order_days, _cents(row.amount for row in orders)),
+        )
+
+    def _payroll(self, session, tenant_id, start: date, end: date) -> Tuple[Flows, Flows]:
+        """Löhne (Auszahlung + SV) und Lohnsteuer je Monat im Horizont"""
+        last = session.execute(
+            select(
+                func.sum(Payslip.total_employer_costs).label("employer_costs"),
+                func.sum(Payslip.total_taxes).label("taxes"),
+            )
+            .join(PayrollPeriod, PayrollPeriod.id == Payslip.payroll_period_id)
+            .where(Payslip.tenant_id == tenant_id, Payslip.is_deleted.is_(False))
+            .group_by(PayrollPeriod.year, PayrollPeriod.month)
+            .order_by(PayrollPeriod.year.desc(), PayrollPeriod.month.desc())
+            .limit(1)
+        ).first()
+        if last is not None and last.employer_costs:
+            costs, taxes = float(last.employer_costs), float(last.taxes or 0)
+        else:
+            monthly = case(
+                (EmployeeSalary.salary_type == "annual", EmployeeSalary.base_salary / 12),
+                (EmployeeSalary.salary_type == "hourly",
+                 EmployeeSalary.hourly_rate * func.coalesce(EmployeeSalary.monthly_hours,
+                                                            EmployeeSalary.weekly_hours * 4.33, 0)),
+                else_=EmployeeSalary.base_salary,
+            )
+            gross = float(session.execute(
+                select(func.coalesce(func.sum(monthly), 0)).where(
+                    EmployeeSalary.tenant_id == tenant_id,
+                    EmployeeSalary.is_deleted.is_(False),
+                    EmployeeSalary.is_active.is_(True),
+                    EmployeeSalary.valid_from <= end,
+                    or_(EmployeeSalary.valid_until.is_(None), EmployeeSalary.valid_until >= start),
+                )
+            ).scalar() or 0)
+            costs, taxes = gross * EMPLOYER_COST_FACTOR, gross * WAGE_TAX_SHARE
+        if costs <= 0:
+            return Flows(), Flows()
+
+        payment_dates = dict(session.execute(
+            select(PayrollPeriod.year * 100 + PayrollPeriod.month, PayrollPeriod.payment_date).where(
+                PayrollPeriod.tenant_id == tenant_id,
+                PayrollPeriod.payment_date.isnot(None),
+                PayrollPeriod.end_date >= start,
+                PayrollPeriod.start_date <= end,
+            )
+        ).all())
+        months, month = [], start.replace(day=1)
+        while month <= end:
+            months.append(month)
+            month = add_months(month, 1)
+        payout = [payment_dates.get(m.year * 100 + m.month) or _month_end(m) for m in months]
+        # Lohnsteuer des Vormonats am 10. - auch die des Monats vor dem Stichtag
+        tax_days = [add_months(m, 1).replace(day=WAGE_TAX_DAY) for m in [add_months(start.replace(day=1), -1)] + months]
+        tax_days = [day for day in tax_days if day >= start]
+        payroll = Flows.of(payout, np.full(len(payout), round((costs - taxes) * 100), dtype=np.int64))
+        wage_tax = Flows.of(tax_days, np.full(len(tax_days), round(taxes * 100), dtype=np.int64))
+        return payroll, wage_tax
+
+    def _loans(self, session, tenant_id, start: date, end: date) -> Flows:
+        scheduled = session.execute(
+            select(LoanPayment.loan_id, LoanPayment.due_date,
+                   (LoanPayment.payment_amount + func.coalesce(LoanPayment.fee_amount, 0)
+                    - func.coalesce(LoanPayment.paid_amount, 0)).label("amount"))
+            .join(Loan, Loan.id == LoanPayment.loan_id)
+            .where(
+                LoanPayment.tenant_id == tenant_id,
+                LoanPayment.status.in_(OPEN_LOAN_STATUSES),
+                LoanPayment.due_date <= end,
+                Loan.is_deleted.is_(False),
+                Loan.status == "active",
+            )
+        ).all()
+        # Kredite ohne Ratenplan: Tilgungsplan ab dem Stichtag mit aktuellem Saldo nur im Speicher berechnen
+        loans = session.execute(
+            select(Loan).where(
+                Loan.tenant_id == tenant_id,
+                Loan.is_deleted.is_(False),
+                Loan.status == "active",
+                Loan.loan_type.notin_(UNSCHEDULED_LOAN_TYPES),
+                Loan.principal_amount > 0,
+                ~exists().where(LoanPayment.loan_id == Loan.id, LoanPayment.status.in_(OPEN_LOAN_STATUSES)),
+            )
+        ).scalars().all()
+        projected = Flows()
+        if loans:
+            engine = get_loan_schedule_service()
+            schedule = engine.build(engine.loan_parameters(loans, {}, today=start))
+            rows, ks = schedule.cells()
+            days = schedule.due[rows, ks]
+            inside = (days >= _day(start)) & (days <= _day(end))
+            projected = Flows(days[inside], schedule.payment[rows, ks][inside])
+        return Flows.concat(
+            Flows.of([row.due_date for row in scheduled], _cents(row.amount for row in scheduled)),
+            projected,
+        )
+
+    # ---------- Laden / Berechnen ----------
+
+    def opening_balance(self, session, tenant_id) -> Decimal:
+        return Decimal(session.execute(
+            select(func.coalesce(func.sum(BankAccount.current_balance), 0)).where(
+                BankAccount.tenant_id == tenant_id,
+                BankAccount.is_active.is_(True),
+            )
+        ).scalar() or 0)
+
+    def load_inputs(self, session, tenant_id, start: Optional[date] = None,
+                    horizon_days: int = MAX_HORIZON_DAYS) -> ForecastInputs:
+        """Alle Zahlungsströme ab start (Standard: heute) als Arrays"""
+        start = start or date.today()
+        end = start + timedelta(days=min(horizon_days, MAX_HORIZON_DAYS))
+        delays, default_delay = self._customer_delays(session, tenant_id, start)
+
+        invoices = self._open_invoices(session, tenant_id)
+        recurring = self._recurring(session, tenant_id, start, end)
+        receivables = Flows.concat(
+            Flows.of([row.due for row in invoices], _cents(row.amount for row in invoices)),
+            Flows.of([row[1] for row in recurring], _cents(row[2] for row in recurring)),
+        )
+        customers = [row.customer_id for row in invoices] + [row[0] for row in recurring]
+        receivable_delays = np.array([delays.get(customer, default_delay) for customer in customers],
+                                     dtype=np.float64)
+
+        payroll, wage_tax = self._payroll(session, tenant_id, start, end)
+        return ForecastInputs(
+            tenant_id=tenant_id,
+            start=start,
+            end=end,
+            opening_balance=self.opening_balance(session, tenant_id),
+            receivables=receivables,
+            receivable_delays=receivable_delays,
+            expenses={
+                "planned_payables": self._payables(session, tenant_id, start, end),
+                "planned_payroll": payroll,
+                "planned_taxes": wage_tax,
+                "planned_loans": self._loans(session, tenant_id, start, end),
+            },
+        )
+
+    def compute(self, inputs: ForecastInputs, interval: str = "weekly", periods: int = 52,
+                delay_weight: float = 1.0, opening_balance=None) -> ForecastResult:
+        """Prognose je Periode aus den geladenen Arrays (ohne Datenbankzugriff)"""
+        bounds = period_boundaries(inputs.start, interval, periods)
+        edges = _days(bounds)
+        first = _day(inputs.start)
+
+        def bucket(days: np.ndarray, cents: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            # Überfälliges in die erste Periode, nach dem Horizont Liegendes entfällt
+            index = np.searchsorted(edges, np.maximum(days, first), side="right") - 1
+            inside = index < periods
+            sums = np.bincount(index[inside], weights=cents[inside], minlength=periods)
+            counts = np.bincount(index[inside], minlength=periods)
+            return np.round(sums).astype(np.int64), counts
+
+        shift = np.round(inputs.receivable_delays * delay_weight).astype("timedelta64[D]")
+        columns, counts = {}, {}
+        columns["planned_receivables"], counts["planned_receivables"] = bucket(
+            inputs.receivables.days + shift, inputs.receivables.cents
+        )
+        for column in EXPENSE_COLUMNS:
+            flows = inputs.expenses.get(column)
+            if flows is not None and len(flows.cents):
+                columns[column], counts[column] = bucket(flows.days, flows.cents)
+        for column in INCOME_COLUMNS + EXPENSE_COLUMNS:
+            columns.setdefault(column, np.zeros(periods, dtype=np.int64))
+            counts.setdefault(column, np.zeros(periods, dtype=np.int64))
+
+        income = sum(columns[column] for column in INCOME_COLUMNS)
+        expenses = sum(columns[column] for column in EXPENSE_COLUMNS)
+        net = income - expenses
+        opening_cents = int(round(Decimal(str(
+            inputs.opening_balance if opening_balance is None else opening_balance
+        )) * 100))
+        closing = opening_cents + np.cumsum(net)
+        opening = np.concatenate(([opening_cents], closing[:-1]))
+        return ForecastResult(
+            interval=interval,
+            period_starts=bounds[:-1],
+            period_ends=[following - timedelta(days=1) for following in bounds[1:]],
+            labels=[period_label(day, interval) for day in bounds[:-1]],
+            opening_balance=opening_cents,
+            columns=columns,
+            counts=counts,
+            income=income,
+            expenses=expenses,
+            net=net,
+            opening=opening,
+            closing=closing,
+        )
+
+    def forecast(self, session, tenant_id, interval: str = "weekly", periods: int = 52,
+                 delay_weight: float = 1.0, start: Optional[date] = None) -> ForecastResult:
+        """Laden und Berechnen in einem Schritt"""
+        inputs = self.load_inputs(session, tenant_id, start)
+        return self.compute(inputs, interval, periods, delay_weight)
+
+    # ---------- Speichern ----------
+
+    def save(self, session, tenant_id, result: ForecastResult, name: str = None, forecast_id=None,
+             user_id=None, description: str = None) -> CashFlowForecast:
+        """Prognose als CashFlowForecast speichern (bestehende Planung wird ersetzt) und committen"""
+        now = datetime.utcnow()
+        try:
+            forecast = session.get(CashFlowForecast, forecast_id) if forecast_id else None
+            if forecast is None:
+                forecast = CashFlowForecast(id=uuid.uuid4(), tenant_id=tenant_id, created_by=user_id)
+                session.add(forecast)
+            else:
+                session.execute(
+                    delete(CashFlowForecastItem).where(CashFlowForecastItem.forecast_id == forecast.id)
+                    .execution_options(synchronize_session=False)
+                )
+            forecast.name = name or forecast.name or f"Liquiditätsplanung {result.period_starts[0]:%d.%m.%Y}"
+            forecast.description = description if description is not None else forecast.description
+            forecast.start_date = result.period_starts[0]
+            forecast.end_date = result.period_ends[-1]
+            forecast.interval = result.interval
+            forecast.opening_balance = _decimal(result.opening_balance)
+            forecast.updated_by = user_id
+            session.flush()
+
+            rows = []
+            for index, (period_start, label) in enumerate(zip(result.period_starts, result.labels)):
+                row = {
+                    "id": uuid.uuid4(),
+                    "tenant_id": tenant_id,
+                    "forecast_id": forecast.id,
+                    "period_date": period_start,
+                    "period_label": label,
+                    "total_planned_income": _decimal(result.income[index]),
+                    "total_planned_expenses": _decimal(result.expenses[index]),
+                    "planned_net_flow": _decimal(result.net[index]),
+                    "planned_closing_balance": _decimal(result.closing[index]),
+                    "details": {
+                        "opening_balance": float(_decimal(result.opening[index])),
+                        "counts": {column: int(result.counts[column][index])
+                                   for column in result.counts if result.counts[column][index]},
+                    },
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                row.update({column: _decimal(result.columns[column][index])
+                            for column in INCOME_COLUMNS + EXPENSE_COLUMNS})
+                rows.append(row)
+            if rows:
+                session.execute(insert(CashFlowForecastItem), rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return forecast
+
+
+# Global instance
+_cash_flow_service = None
+
+
+def get_cash_flow_service() -> CashFlowService:
+    """Get global cash flow service instance"""
+    global _cash_flow_service
+    if _cash_flow_service is None:
+        _cash_flow_service = CashFlowService()
+    return _cash_flow_service
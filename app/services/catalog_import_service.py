@@ -0,0 +1,550 @@
+"""
+Katalogimport - DATANORM- und BMEcat-Preislisten der Lieferanten
+
+Die Dateien werden gestreamt gelesen (DATANORM zeilenweise, BMEcat per
+iterparse mit Freigabe verarbeiteter Elemente), der Speicherbedarf hängt nur
+von der Batchgröße ab. Je Batch (Standard 5.000 Artikel, eine Transaktion):
+- eine Abfrage lädt die vorhandenen Lieferantenartikel samt Hash
+- unveränderte Artikel (gleicher Beschreibungs- und Preis-Hash) werden
+  übersprungen und nicht geschrieben
+- neue Artikel legen ein Material an (Bulk-Insert) und werden zusammen mit
+  geänderten per INSERT ... ON CONFLICT (supplier_id, supplier_article_number)
+  DO UPDATE geschrieben; das Update greift nur bei abweichendem Hash
+- reine Preisänderungen (DATANORM P-Satz, BMEcat T_UPDATE_PRICES) ändern nur
+  die Preise, Lösch-Sätze setzen valid_until
+- Materialien, deren Hauptlieferant der importierende Lieferant ist, erhalten
+  den neuen Einkaufs- und Listenpreis; bei geändertem Beschreibungs-Hash
+  auch Bezeichnung und Beschreibung (nur wenn diese tatsächlich abweichen)
+
+Unterstützt werden DATANORM 4 (A-, B- und P-Sätze; Text- und Rabattsätze
+werden übergangen) sowie BMEcat 1.2 (ARTICLE) und 2005 (PRODUCT).
+"""
+import hashlib
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from shared.models import Material, MaterialCategory, Supplier, SupplierArticle
+
+
+BATCH_SIZE = 5000
+
+DATANORM_ENCODING = "cp850"
+
+# DATANORM Preiseinheit: Preis gilt für 1/10/100/1000 Mengeneinheiten
+DATANORM_PRICE_UNITS = {"0": 1, "1": 10, "2": 100, "3": 1000}
+
+# Mengeneinheiten aus DATANORM und BMEcat (UN/ECE) auf die Einheiten der Materialverwaltung
+UNIT_MAP = {
+    "ST": "STK", "STK": "STK", "STCK": "STK", "STÜCK": "STK", "C62": "STK", "PCE": "STK", "H87": "STK",
+    "M": "m", "LFM": "m", "MTR": "m",
+    "M2": "m²", "M²": "m²", "QM": "m²", "MTK": "m²",
+    "M3": "m³", "M³": "m³", "CBM": "m³", "MTQ": "m³",
+    "KG": "kg", "KGM": "kg",
+    "L": "l", "LTR": "l",
+    "PAK": "PAK", "PAKET": "PAK", "PK": "PAK", "PA": "PAK",
+    "PAL": "PAL", "RO": "ROL", "ROL": "ROL", "ROLLE": "ROL",
+}
+
+# BMEcat-Preisarten: Netto (Einkauf) bzw. Brutto (Liste)
+NET_PRICE_TYPES = {"net_list", "net_customer", "net_customer_exp"}
+LIST_PRICE_TYPES = {"gros_list", "nrp"}
+
+# Erste passende Gruppe bestimmt die Kategorie neuer Materialien
+CATEGORY_KEYWORDS = [
+    (MaterialCategory.DACH, ("dachlatte", "konterlatte", "traufbohle")),
+    (MaterialCategory.BRETTSCHICHTHOLZ, ("bsh", "brettschicht", "gl24", "gl28", "gl30")),
+    (MaterialCategory.BRETTSPERRHOLZ, ("clt", "brettsperr", "massivholzplatte")),
+    (MaterialCategory.SCHNITTHOLZ, ("kvh", "konstruktionsvollholz", "balken", "kantholz", "bohle", "latte", "schnittholz")),
+    (MaterialCategory.DAEMMUNG, ("dämm", "daemm", "holzfaser", "zellulose", "mineralwolle")),
+    (MaterialCategory.FOLIEN, ("folie", "dampfbrems", "unterspann", "luftdicht")),
+    (MaterialCategory.PLATTEN, ("osb", "sperrholz", "mdf", "spanplatte", "gipsfaser", "platte")),
+    (MaterialCategory.VERBINDUNGSMITTEL, ("schraube", "nagel", "nägel", "dübel", "bolzen", "klammer")),
+    (MaterialCategory.BESCHLAEGE, ("balkenschuh", "winkel", "beschlag", "verbinder", "stützenfuß")),
+    (MaterialCategory.FASSADE, ("fassade", "profilholz", "rhombus", "stulp")),
+    (MaterialCategory.FENSTER_TUEREN, ("fenster", "tür", "tuer")),
+]
+
+_PRICE_STEP = Decimal("0.0001")
+
+
+@dataclass
+class CatalogArticle:
+    """Ein Artikel aus der Preisliste; name is None bei reinen Preissätzen"""
+    number: str
+    action: str = "upsert"  # upsert, price, delete
+    name: Optional[str] = None
+    description: Optional[str] = None
+    ean: Optional[str] = None
+    manufacturer: Optional[str] = None
+    manufacturer_number: Optional[str] = None
+    product_group: Optional[str] = None
+    unit: str = "STK"
+    min_order_quantity: Optional[Decimal] = None
+    list_price: Optional[Decimal] = None  # je Mengeneinheit
+    net_price: Optional[Decimal] = None  # je Mengeneinheit
+
+    def merge_prices(self, other: "CatalogArticle"):
+        if other.list_price is not None:
+            self.list_price = other.list_price
+        if other.net_price is not None:
+            self.net_price = other.net_price
+
+
+def _decimal(value: Optional[str]) -> Optional[Decimal]:
+    if value is None:
+        return None
+    value = value.strip().replace(" ", "")
+    if not value:
+        return None
+    if "," in value:
+        value = value.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        return None
+
+
+def _price_text(value: Optional[Decimal]) -> Optional[str]:
+    if value is None:
+        return None
+    return format(value.quantize(_PRICE_STEP).normalize(), "f")
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    if not unit:
+        return "STK"
+    return UNIT_MAP.get(unit.strip().upper(), unit.strip()[:20])
+
+
+def guess_category(*texts: Optional[str]) -> MaterialCategory:
+    text = " ".join(t for t in texts if t).lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return MaterialCategory.SONSTIGES
+
+
+# ============== DATANORM ==============
+
+def _datanorm_price(raw: str, price_unit: str) -> Optional[Decimal]:
+    """Preis ohne Komma in Cent (DATANORM 4) oder mit Komma; umgerechnet auf eine Mengeneinheit"""
+    raw = (raw or "").strip()
+    if not raw:
+        return None
+    price = _decimal(raw)
+    if price is None:
+        return None
+    if "," not in raw and "." not in raw:
+        price = price / 100
+    return price / DATANORM_PRICE_UNITS.get((price_unit or "0").strip(), 1)
+
+
+def iter_datanorm(path, encoding: str = DATANORM_ENCODING) -> Iterator[CatalogArticle]:
+    """DATANORM 4 zeilenweise lesen
+
+    A-Satz: A;Kz;ArtNr;Textkz;Kurztext1;Kurztext2;Preiskz;Preiseinheit;ME;Preis;Rabattgruppe;Warengruppe;...
+    B-Satz: B;Kz;ArtNr;Matchcode;AltArtNr;Katalogseite;;;EAN;Anbindung;Warengruppe;Kostenart;VPE;HerstellerNr;...
+    P-Satz: P;A;(ArtNr;Preiskz;Preis;Rabattkz;Rabatt1;Rabatt2;Rabatt3) bis zu dreimal
+    """
+    current: Optional[CatalogArticle] = None
+    price_units: Dict[str, str] = {}
+    with open(path, "r", encoding=encoding, errors="replace", newline="") as handle:
+        for line in handle:
+            fields = line.rstrip("\r\n").split(";")
+            kind = fields[0].strip().upper() if fields else ""
+            if kind == "A" and len(fields) > 9:
+                if current is not None:
+                    yield current
+                number = fields[2].strip()
+                if not number:
+                    current = None
+                    continue
+                flag = fields[1].strip().upper()
+                name = fields[4].strip() or number
+                extra = fields[5].strip()
+                price = _datanorm_price(fields[9], fields[7])
+                price_units[number] = fields[7]
+                current = CatalogArticle(
+                    number=number,
+                    action="delete" if flag == "L" else "upsert",
+                    name=name,
+                    description=f"{name} {extra}".strip() if extra else None,
+                    unit=normalize_unit(fields[8]),
+                    product_group=(fields[11].strip() or None) if len(fields) > 11 else None,
+                )
+                # Preiskennzeichen 1 = Listenpreis (brutto), 2 = Nettopreis
+                if fields[6].strip() == "2":
+                    current.net_price = price
+                else:
+                    current.list_price = price
+            elif kind == "B" and current is not None and len(fields) > 2 and fields[2].strip() == current.number:
+                if len(fields) > 8 and fields[8].strip():
+                    current.ean = fields[8].strip()[:20]
+                if len(fields) > 10 and fields[10].strip() and not current.product_group:
+                    current.product_group = fields[10].strip()
+                if len(fields) > 12:
+                    current.min_order_quantity = _decimal(fields[12])
+                if len(fields) > 13 and fields[13].strip():
+                    current.manufacturer_number = fields[13].strip()
+            elif kind == "P":
+                for start in range(2, len(fields) - 2, 7):
+                    number = fields[start].strip()
+                    if not number:
+                        continue
+                    update_article = CatalogArticle(number=number, action="price")
+                    price = _datanorm_price(fields[start + 2], price_units.get(number, "0"))
+                    if fields[start + 1].strip() == "2":
+                        update_article.net_price = price
+                    else:
+                        update_article.list_price = price
+                    if current is not None and current.number == number:
+                        current.merge_prices(update_article)
+                    else:
+                        yield update_article
+    if current is not None:
+        yield current
+
+
+# ============== BMEcat ==============
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(element, *names) -> Optional[str]:
+    for child in element:
+        if _local(child.tag) in names:
+            text = (child.text or "").strip()
+            return text or None
+    return None
+
+
+def _child(element, *names):
+    for child in element:
+        if _local(child.tag) in names:
+            return child
+    return None
+
+
+def _bmecat_article(element, mode: str) -> Optional[CatalogArticle]:
+    number = _child_text(element, "SUPPLIER_AID", "SUPPLIER_PID")
+    if not number:
+        return None
+    action = (element.get("mode") or "").lower()
+    details = _child(element, "ARTICLE_DETAILS", "PRODUCT_DETAILS")
+    order = _child(element, "ARTICLE_ORDER_DETAILS", "PRODUCT_ORDER_DETAILS")
+    prices = _child(element, "ARTICLE_PRICE_DETAILS", "PRODUCT_PRICE_DETAILS")
+
+    if action == "delete":
+        return CatalogArticle(number=number, action="delete")
+    article = CatalogArticle(number=number, action="price" if mode == "T_UPDATE_PRICES" or details is None else "upsert")
+
+    if details is not None:
+        article.name = _child_text(details, "DESCRIPTION_SHORT") or number
+        article.description = _child_text(details, "DESCRIPTION_LONG")
+        ean = _child_text(details, "EAN", "INTERNATIONAL_PID")
+        article.ean = ean[:20] if ean else None
+        article.manufacturer = _child_text(details, "MANUFACTURER_NAME")
+        article.manufacturer_number = _child_text(details, "MANUFACTURER_AID", "MANUFACTURER_PID")
+
+    quantity = Decimal(1)
+    if order is not None:
+        article.unit = normalize_unit(_child_text(order, "ORDER_UNIT"))
+        quantity = _decimal(_child_text(order, "PRICE_QUANTITY")) or Decimal(1)
+        article.min_order_quantity = _decimal(_child_text(order, "QUANTITY_MIN"))
+
+    if prices is not None:
+        for price in prices:
+            if _local(price.tag) not in ("ARTICLE_PRICE", "PRODUCT_PRICE"):
+                continue
+            amount = _decimal(_child_text(price, "PRICE_AMOUNT"))
+            if amount is None:
+                continue
+            price_type = (price.get("price_type") or "").lower()
+            if price_type in NET_PRICE_TYPES and article.net_price is None:
+                article.net_price = amount / quantity
+            elif price_type in LIST_PRICE_TYPES and article.list_price is None:
+                article.list_price = amount / quantity
+    return article
+
+
+def iter_bmecat(path) -> Iterator[CatalogArticle]:
+    """BMEcat per iterparse lesen; verarbeitete Artikel werden sofort freigegeben"""
+    container, mode = None, "T_NEW_CATALOG"
+    for event, element in ET.iterparse(str(path), events=("start", "end")):
+        tag = _local(element.tag)
+        if event == "start":
+            if tag in ("T_NEW_CATALOG", "T_UPDATE_PRODUCTS", "T_UPDATE_PRICES"):
+                container, mode = element, tag
+            continue
+        if tag in ("ARTICLE", "PRODUCT"):
+            article = _bmecat_article(element, mode)
+            if article is not None:
+                yield article
+            if container is not None:
+                container.clear()
+            else:
+                element.clear()
+
+
+def detect_format(path) -> str:
+    """'bmecat' oder 'datanorm' anhand des Dateianfangs"""
+    with open(path, "rb") as handle:
+        head = handle.read(512).lstrip()
+    if head.startswith(b"\xef\xbb\xbf"):
+        head = head[3:]
+    return "bmecat" if head.startswith(b"<") else "datanorm"
+
+
+def iter_catalog(path, fmt: Optional[str] = None, encoding: str = DATANORM_ENCODING) -> Iterator[CatalogArticle]:
+    fmt = fmt or detect_format(path)
+    if fmt == "bmecat":
+        return iter_bmecat(path)
+    if fmt == "datanorm":
+        return iter_datanorm(path, encoding)
+    raise ValueError(f"Unbekanntes Katalogformat: {fmt}")
+
+
+# ============== HASHES ==============
+
+def _digest(*parts) -> str:
+    text = "\x1f".join("" if part is None else str(part) for part in parts)
+    return hashlib.md5(text.encode("utf-8")).hexdigest()[:16]
+
+
+def description_hash(article: CatalogArticle) -> str:
+    return _digest(article.name, article.description, article.ean, article.manufacturer,
+                   article.manufacturer_number, article.product_group, article.unit,
+                   _price_text(article.min_order_quantity))
+
+
+def price_hash(purchase_price: Optional[str], list_price: Optional[str]) -> str:
+    return _digest(purchase_price, list_price)
+
+
+class CatalogImportService:
+    """Importiert Lieferantenkataloge in SupplierArticle und Material"""
+
+    def _prices(self, article: CatalogArticle, discount_percent: Decimal):
+        """(Einkaufspreis, Listenpreis) als Text; ohne Nettopreis gilt Liste abzüglich Rabatt"""
+        purchase = article.net_price
+        if purchase is None and article.list_price is not None:
+            purchase = article.list_price * (100 - discount_percent) / 100
+        return _price_text(purchase), _price_text(article.list_price)
+
+    def _apply_batch(self, session, supplier, batch: Dict[str, CatalogArticle], discount_percent: Decimal,
+                     user_id, stats: dict):
+        """Einen Batch schreiben - Commit durch den Aufrufer"""
+        today, now = date.today(), datetime.utcnow()
+        # Parallele Importe desselben Lieferanten nacheinander
+        session.execute(select(func.pg_advisory_xact_lock(func.hashtext(str(supplier.id)))))
+        existing = {
+            row.supplier_article_number: row
+            for row in session.execute(
+                select(
+                    SupplierArticle.supplier_article_number, SupplierArticle.id, SupplierArticle.material_id,
+                    SupplierArticle.catalog_hash, SupplierArticle.valid_until, Material.primary_supplier_id,
+                )
+                .join(Material, Material.id == SupplierArticle.material_id)
+                .where(
+                    SupplierArticle.supplier_id == supplier.id,
+                    SupplierArticle.supplier_article_number.in_(list(batch)),
+                )
+            )
+        }
+
+        materials, upserts, price_updates, material_prices, material_texts, expired = [], [], [], [], [], []
+        for number, article in batch.items():
+            known = existing.get(number)
+            if article.action == "delete":
+                if known is not None and known.valid_until is None:
+                    expired.append({"id": known.id, "valid_until": today, "updated_at": now})
+                continue
+
+            purchase_price, list_price = self._prices(article, discount_percent)
+            if article.action == "price":
+                if known is None:
+                    stats["unknown"] += 1
+                    continue
+                catalog_hash = (known.catalog_hash or "")[:16].ljust(16, "0") + price_hash(purchase_price, list_price)
+                if catalog_hash == known.catalog_hash and known.valid_until is None:
+                    stats["unchanged"] += 1
+                    continue
+                price_updates.append({
+                    "id": known.id, "purchase_price": purchase_price, "catalog_hash": catalog_hash,
+                    "valid_until": None, "updated_at": now,
+                })
+            else:
+                catalog_hash = description_hash(article) + price_hash(purchase_price, list_price)
+                if known is not None and catalog_hash == known.catalog_hash and known.valid_until is None:
+                    stats["unchanged"] += 1
+                    continue
+                material_id = known.material_id if known is not None else uuid.uuid4()
+                if known is None:
+                    materials.append(self._material_row(
+                        article, material_id, supplier, purchase_price, list_price, user_id, today, now
+                    ))
+                elif (known.primary_supplier_id == supplier.id
+                      and (known.catalog_hash or "")[:16] != catalog_hash[:16]):
+                    material_texts.append({
+                        "material_id": material_id, "new_name": (article.name or number)[:255],
+                        "new_description": article.description, "updated_at": now,
+                    })
+                upserts.append({
+                    "id": uuid.uuid4(),
+                    "supplier_id": supplier.id,
+                    "material_id": material_id,
+                    "supplier_article_number": number,
+                    "supplier_article_name": (article.name or number)[:255],
+                    "purchase_price": purchase_price,
+                    "min_order_quantity": _price_text(article.min_order_quantity),
+                    "price_unit": article.unit,
+                    "is_preferred": known is None,
+                    "valid_from": today,
+                    "valid_until": None,
+                    "catalog_hash": catalog_hash,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+            if known is not None and known.primary_supplier_id == supplier.id:
+                prices = {"id": known.material_id, "purchase_price": purchase_price,
+                          "purchase_price_date": today, "updated_at": now}
+                # Preissätze ohne Listenpreis lassen den bisherigen stehen
+                if list_price is not None or article.action != "price":
+                    prices["list_price"] = list_price
+                material_prices.append(prices)
+
+        if materials:
+            session.execute(insert(Material), materials)
+        if upserts:
+            stmt = pg_insert(SupplierArticle)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[SupplierArticle.supplier_id, SupplierArticle.supplier_article_number],
+                set_={
+                    "supplier_article_name": stmt.excluded.supplier_article_name,
+                    "purchase_price": stmt.excluded.purchase_price,
+                    "min_order_quantity": stmt.excluded.min_order_quantity,
+                    "price_unit": stmt.excluded.price_unit,
+                    "valid_until": stmt.excluded.valid_until,
+                    "catalog_hash": stmt.excluded.catalog_hash,
+                    "updated_at": stmt.excluded.updated_at,
+                },
+                where=(SupplierArticle.catalog_hash.is_distinct_from(stmt.excluded.catalog_hash)
+                       | SupplierArticle.valid_until.isnot(None)),
+            )
+            session.execute(stmt, upserts)
+        if price_updates:
+            session.execute(update(SupplierArticle), price_updates)
+        if material_prices:
+            session.execute(update(Material), material_prices)
+        if material_texts:
+            session.execute(
+                update(Material.__table__)
+                .where(
+                    Material.id == bindparam("material_id"),
+                    or_(Material.name.is_distinct_from(bindparam("new_name")),
+                        Material.description.is_distinct_from(bindparam("new_description"))),
+                )
+                .values(name=bindparam("new_name"), description=bindparam("new_description")),
+                material_texts,
+            )
+        if expired:
+            session.execute(update(SupplierArticle), expired)
+
+        stats["created"] += len(materials)
+        stats["updated"] += len(upserts) - len(materials) + len(price_updates)
+        stats["expired"] += len(expired)
+
+    def _material_row(self, article: CatalogArticle, material_id, supplier, purchase_price, list_price,
+                      user_id, today: date, now: datetime) -> dict:
+        return {
+            "id": material_id,
+            "tenant_id": supplier.tenant_id,
+            "article_number": article.number[:50],
+            "name": (article.name or article.number)[:255],
+            "description": article.description,
+            "category": guess_category(article.name, article.description, article.product_group),
+            "product_group": article.product_group[:100] if article.product_group else None,
+            "ean": article.ean,
+            "manufacturer": article.manufacturer[:255] if article.manufacturer else None,
+            "manufacturer_number": article.manufacturer_number[:100] if article.manufacturer_number else None,
+            "unit": article.unit,
+            "purchase_unit": article.unit,
+            "purchase_price": purchase_price,
+            "purchase_price_date": today,
+            "list_price": list_price,
+            "minimum_order_quantity": _price_text(article.min_order_quantity),
+            "primary_supplier_id": supplier.id,
+            "supplier_article_number": article.number[:100],
+            "is_deleted": False,
+            "is_active": True,
+            "created_by": user_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    def import_file(self, session, supplier_id, path, fmt: Optional[str] = None,
+                    discount_percent=0, batch_size: int = BATCH_SIZE, encoding: str = DATANORM_ENCODING,
+                    user_id=None, progress: Optional[Callable[[int], None]] = None) -> dict:
+        """Katalogdatei importieren; je Batch ein Commit. Gibt die Zählerstände zurück."""
+        started = time.perf_counter()
+        supplier = session.get(Supplier, uuid.UUID(str(supplier_id)))
+        if supplier is None:
+            raise ValueError("Lieferant nicht gefunden")
+        fmt = fmt or detect_format(path)
+        discount = Decimal(str(discount_percent or 0))
+        stats = {"format": fmt, "read": 0, "created": 0, "updated": 0, "unchanged": 0,
+                 "expired": 0, "unknown": 0}
+
+        batch: Dict[str, CatalogArticle] = {}
+
+        def flush():
+            if not batch:
+                return
+            try:
+                self._apply_batch(session, supplier, batch, discount, user_id, stats)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            batch.clear()
+            if progress:
+                progress(stats["read"])
+
+        for article in iter_catalog(path, fmt, encoding):
+            stats["read"] += 1
+            previous = batch.get(article.number)
+            if previous is not None and article.action == "price" and previous.action != "delete":
+                previous.merge_prices(article)
+            else:
+                batch[article.number] = article
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        stats["seconds"] = time.perf_counter() - started
+        stats["file"] = Path(path).name
+        print(f"Katalogimport {stats['file']} ({fmt}): {stats['read']} Artikel, {stats['created']} neu, "
+              f"{stats['updated']} geändert, {stats['unchanged']} unverändert in {stats['seconds']:.1f} s")
+        return stats
+
+
+# Global instance
+_catalog_import_service = None
+
+
+def get_catalog_import_service() -> CatalogImportService:
+    """Get global catalog import service instance"""
+    global _catalog_import_service
+    if _catalog_import_service is None:
+        _catalog_import_service = CatalogImportService()
+    return _catalog_import_service
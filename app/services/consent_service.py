@@ -0,0 +1,175 @@
+"""
+Consent-Service - Tracking-Einwilligungen je Benutzer als Bitmaske
+
+Beim Login werden alle Einwilligungen eines Benutzers mit einer Abfrage
+geladen und zu einer Bitmaske verdichtet. has_consent() und der Telemetrie-
+Check sind danach reine Bit-Tests ohne Datenbankzugriff. Ändert der Benutzer
+seine Einwilligungen in den Einstellungen, schreibt set_consents() die Zeilen,
+aktualisiert die Maske und benachrichtigt alle registrierten Listener.
+"""
+import enum
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from shared.models import UserConsent
+
+
+class ConsentType(enum.IntFlag):
+    """Tracking-Arten; der Wert ist das Bit in der Maske"""
+    ANALYTICS = 1
+    TELEMETRY = 2
+    PERFORMANCE_TRACKING = 4
+    ERROR_TRACKING = 8
+    USAGE_STATISTICS = 16
+
+    @property
+    def key(self) -> str:
+        return self.name.lower()
+
+
+CONSENT_LABELS = {
+    ConsentType.TELEMETRY: "Technische Telemetrie (Systemzustand, Ereignisse)",
+    ConsentType.ERROR_TRACKING: "Fehlerberichte",
+    ConsentType.PERFORMANCE_TRACKING: "Performance-Messungen",
+    ConsentType.ANALYTICS: "Nutzungsanalyse (Aktionen in der Oberfläche)",
+    ConsentType.USAGE_STATISTICS: "Nutzungsstatistiken (Funktionen, Häufigkeit)",
+}
+
+# Ohne gespeicherte Entscheidung: Betriebsdaten ja, Nutzungsauswertung nur nach Opt-in
+DEFAULT_MASK = ConsentType.TELEMETRY | ConsentType.ERROR_TRACKING | ConsentType.PERFORMANCE_TRACKING
+
+POLICY_VERSION = "1.0"
+
+_BY_KEY = {consent.key: consent for consent in ConsentType}
+
+
+def mask_from_rows(rows, default: int = DEFAULT_MASK) -> int:
+    """(consent_type, granted)-Zeilen auf die Standardmaske anwenden"""
+    mask = int(default)
+    for consent_type, granted in rows:
+        bit = _BY_KEY.get(consent_type)
+        if bit is None:
+            continue
+        mask = (mask | bit) if granted else (mask & ~bit)
+    return mask
+
+
+class ConsentService:
+    """Hält die Einwilligungsmasken der angemeldeten Benutzer"""
+
+    def __init__(self):
+        self._masks: Dict[object, int] = {}
+        self._listeners: List[Callable[[object, int], None]] = []
+        self._lock = threading.Lock()
+
+    # ============== LISTENER ==============
+
+    def add_listener(self, callback: Callable[[object, int], None]):
+        """callback(user_id, mask) nach jeder Änderung einer Maske"""
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[object, int], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, user_id, mask: int):
+        for callback in list(self._listeners):
+            try:
+                callback(user_id, mask)
+            except Exception as e:
+                print(f"Consent-Listener fehlgeschlagen: {e}")
+
+    # ============== LADEN / PRÜFEN ==============
+
+    def load_user(self, session, user_id) -> int:
+        """Alle Einwilligungen des Benutzers mit einer Abfrage laden"""
+        rows = session.execute(
+            select(UserConsent.consent_type, UserConsent.granted)
+            .where(UserConsent.user_id == user_id)
+        ).all()
+        mask = mask_from_rows(rows)
+        with self._lock:
+            self._masks[user_id] = mask
+        self._notify(user_id, mask)
+        return mask
+
+    def forget_user(self, user_id):
+        """Maske beim Logout verwerfen"""
+        with self._lock:
+            self._masks.pop(user_id, None)
+
+    def get_mask(self, user_id) -> int:
+        """Maske aus dem Speicher (Standard, falls nicht geladen)"""
+        return self._masks.get(user_id, int(DEFAULT_MASK))
+
+    def has_consent(self, user_id, consent_type: ConsentType) -> bool:
+        return bool(self._masks.get(user_id, DEFAULT_MASK) & consent_type)
+
+    def get_consents(self, user_id) -> Dict[ConsentType, bool]:
+        mask = self.get_mask(user_id)
+        return {consent: bool(mask & consent) for consent in ConsentType}
+
+    # ============== ÄNDERN ==============
+
+    def set_consents(self, session, user_id, changes: Dict[ConsentType, bool]) -> int:
+        """Einwilligungen speichern (ein Upsert), Maske aktualisieren, Listener benachrichtigen"""
+        if not changes:
+            return self.get_mask(user_id)
+        now = datetime.utcnow()
+        rows = [
+            {
+                "user_id": user_id,
+                "consent_type": consent.key,
+                "granted": bool(granted),
+                "granted_at": now if granted else None,
+                "revoked_at": None if granted else now,
+                "policy_version": POLICY_VERSION,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for consent, granted in changes.items()
+        ]
+        stmt = pg_insert(UserConsent).values(rows)
+        session.execute(stmt.on_conflict_do_update(
+            constraint="uq_user_consents_user_type",
+            set_={
+                "granted": stmt.excluded.granted,
+                "granted_at": stmt.excluded.granted_at,
+                "revoked_at": stmt.excluded.revoked_at,
+                "policy_version": stmt.excluded.policy_version,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        ))
+        session.commit()
+
+        old_mask = self.get_mask(user_id)
+        mask = mask_from_rows(((c.key, g) for c, g in changes.items()), default=old_mask)
+        with self._lock:
+            self._masks[user_id] = mask
+        self._notify(user_id, mask)
+
+        if mask != old_mask:
+            from app.services.audit_service import get_audit_service, AuditEventType
+            get_audit_service().log(
+                AuditEventType.UPDATE, user_id=user_id, resource_type="consent", resource_id=user_id,
+                old_values={c.key: bool(old_mask & c) for c in ConsentType},
+                new_values={c.key: bool(mask & c) for c in ConsentType},
+            )
+        return mask
+
+
+# Global instance
+_consent_service = None
+
+
+def get_consent_service() -> ConsentService:
+    """Get global consent service instance"""
+    global _consent_service
+    if _consent_service is None:
+        _consent_service = ConsentService()
+    return _consent_service
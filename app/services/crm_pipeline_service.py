@@ -0,0 +1,285 @@
+"""
+Vertriebs-Pipeline - Stufen, gewichtete Werte und Abschlussquoten je Zeitraum
+
+Die Auswertung eines Zeitraums ist genau eine gruppierte Abfrage über leads
+(Index ix_leads_tenant_created_status). Ergebnisse werden je Mandant und
+Zeitraum im Prozess gehalten; sobald ein Lead seine Stufe oder einen
+wertrelevanten Wert ändert, wird der Mandant beim Commit invalidiert. Damit
+kostet ein Wechsel des Zeitraums oder das erneute Öffnen des Tabs keine
+Abfrage. Änderungen aus anderen Arbeitsplätzen greifen spätestens nach
+CACHE_TTL Sekunden.
+
+Der gewichtete Wert verwendet die Abschlusswahrscheinlichkeit der Stufe; der
+Lead-Score bewertet die Qualität eines Leads und ist keine Wahrscheinlichkeit.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, select, case, cast, func, inspect, Numeric, Float, JSON
+from sqlalchemy.dialects.postgresql import array_agg, aggregate_order_by
+
+from shared.models import Lead
+
+
+# Stufen in Pipeline-Reihenfolge; "lost" steht außerhalb der Reihenfolge
+STAGE_ORDER = ("new", "contacted", "qualified", "proposal", "negotiation", "won")
+CLOSED_STAGES = ("won", "lost")
+
+# Abschlusswahrscheinlichkeit je Stufe in %
+STAGE_PROBABILITY = {
+    "new": 10,
+    "contacted": 20,
+    "qualified": 40,
+    "proposal": 60,
+    "negotiation": 80,
+    "won": 100,
+    "lost": 0,
+}
+
+PERIODS = {
+    "week": "Diese Woche",
+    "month": "Diesen Monat",
+    "quarter": "Dieses Quartal",
+    "year": "Dieses Jahr",
+}
+
+# Sekunden, nach denen ein Ergebnis auch ohne lokale Änderung neu geladen wird
+CACHE_TTL = 300
+
+# Lead-Spalten, deren Änderung die Auswertung verändert
+TRACKED_COLUMNS = ("status", "estimated_budget", "conversion_value",
+                   "is_deleted", "created_at", "converted_at", "tenant_id")
+
+TOP_DEALS = 3
+
+# Erste Zahl im Text: "€ 300.000 - 400.000", "300000.0", "1.250,50"
+_AMOUNT = r'[0-9]+(?:[.,][0-9]+)*'
+_PENDING_KEY = "_crm_pipeline_pending"
+
+
+def period_range(period: str, today: date = None) -> Tuple[datetime, datetime]:
+    """Zeitraum als halboffenes Intervall [Beginn, Ende)"""
+    today = today or date.today()
+    if period == "week":
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(days=7)
+    elif period == "month":
+        start = today.replace(day=1)
+        end = (start + timedelta(days=32)).replace(day=1)
+    elif period == "quarter":
+        start = date(today.year, 3 * ((today.month - 1) // 3) + 1, 1)
+        end = (start + timedelta(days=95)).replace(day=1)
+    elif period == "year":
+        start = date(today.year, 1, 1)
+        end = date(today.year + 1, 1, 1)
+    else:
+        raise ValueError(f"Unbekannter Zeitraum: {period}")
+    return datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.min.time())
+
+
+def sql_amount(col):
+    """Betrag aus Freitext: erste Zahl, deutsches und englisches Format"""
+    token = func.substring(col, _AMOUNT)
+    return case(
+        # 1.250,50 / 300,5 -> Komma ist Dezimaltrenner
+        (token.like('%,%'),
+         cast(func.replace(func.replace(token, '.', ''), ',', '.'), Numeric)),
+        # 300.000 / 1.250.000 -> Punkte sind Tausendertrenner
+        (token.op('~')(r'^[0-9]{1,3}(\.[0-9]{3})+$'),
+         cast(func.replace(token, '.', ''), Numeric)),
+        (token.op('~')(r'^[0-9]+(\.[0-9]+)?$'), cast(token, Numeric)),
+        else_=0
+    )
+
+
+@dataclass
+class StageStats:
+    """Kennzahlen einer Pipeline-Stufe"""
+    status: str
+    count: int = 0
+    value: Decimal = Decimal(0)
+    weighted_value: Decimal = Decimal(0)
+    reached: int = 0                     # Leads, die diese Stufe erreicht oder überschritten haben
+    conversion_rate: Optional[float] = None  # Anteil, der von hier die nächste Stufe erreicht
+    top_deals: List[Tuple[str, Decimal]] = field(default_factory=list)
+
+
+@dataclass
+class PipelineStats:
+    """Pipeline eines Mandanten in einem Zeitraum"""
+    period: str
+    start: datetime
+    end: datetime
+    stages: Dict[str, StageStats]
+    pipeline_value: Decimal = Decimal(0)     # offene Stufen
+    weighted_value: Decimal = Decimal(0)     # offene Stufen, gewichtet
+    won_value: Decimal = Decimal(0)
+    lead_count: int = 0
+    win_rate: Optional[float] = None         # gewonnen / abgeschlossen
+    avg_cycle_days: Optional[float] = None   # Erstellung bis Konvertierung
+    loaded_at: float = 0.0
+
+
+class PipelineService:
+    """Pipeline-Auswertung mit Zwischenspeicher je Mandant und Zeitraum"""
+
+    def __init__(self):
+        self._registered = set()
+        self._lock = threading.Lock()
+        self._cache: Dict[tuple, Tuple[int, PipelineStats]] = {}
+        self._versions: Dict[object, int] = {}
+
+    # ============== EVENT-ANBINDUNG ==============
+
+    def register(self, session_factory):
+        """Session-Events einer sessionmaker-Instanz abonnieren (mehrfach aufrufbar)"""
+        if id(session_factory) in self._registered:
+            return
+        self._registered.add(id(session_factory))
+        event.listen(session_factory, "after_flush", self._after_flush)
+        event.listen(session_factory, "after_commit", self._after_commit)
+        event.listen(session_factory, "after_soft_rollback", self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        tenants = session.info.setdefault(_PENDING_KEY, set())
+        for obj in session.new:
+            if isinstance(obj, Lead):
+                tenants.add(obj.tenant_id)
+        for obj in session.deleted:
+            if isinstance(obj, Lead):
+                tenants.add(obj.tenant_id)
+        for obj in session.dirty:
+            if not isinstance(obj, Lead):
+                continue
+            attrs = inspect(obj).attrs
+            for column in TRACKED_COLUMNS:
+                history = attrs[column].history
+                if history.has_changes():
+                    tenants.add(obj.tenant_id)
+                    tenants.update(value for value in history.deleted if column == "tenant_id")
+                    break
+
+    def _after_commit(self, session):
+        tenants = session.info.pop(_PENDING_KEY, None)
+        if tenants:
+            self.invalidate(*tenants)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(_PENDING_KEY, None)
+
+    def invalidate(self, *tenant_ids):
+        """Zwischengespeicherte Auswertungen der Mandanten verwerfen"""
+        with self._lock:
+            for tenant_id in tenant_ids:
+                self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+
+    # ============== AUSWERTUNG ==============
+
+    def get_stats(self, session, tenant_id, period: str = "quarter", today: date = None) -> PipelineStats:
+        """Pipeline des Zeitraums, aus dem Zwischenspeicher wenn noch gültig"""
+        start, end = period_range(period, today)
+        key = (tenant_id, period, start)
+        with self._lock:
+            version = self._versions.get(tenant_id, 0)
+            cached = self._cache.get(key)
+        if cached and cached[0] == version and time.monotonic() - cached[1].loaded_at < CACHE_TTL:
+            return cached[1]
+
+        stats = self._load(session, tenant_id, period, start, end)
+        with self._lock:
+            # Nur speichern, wenn zwischenzeitlich nicht invalidiert wurde
+            if self._versions.get(tenant_id, 0) == version:
+                self._cache[key] = (version, stats)
+        return stats
+
+    def _load(self, session, tenant_id, period: str, start: datetime, end: datetime) -> PipelineStats:
+        """Eine gruppierte Abfrage über leads für Mandant und Zeitraum"""
+        # Leads ohne Status zählen zur Stufe "new" - schon in der Gruppierung
+        status = func.coalesce(Lead.status, "new")
+        # Gewonnen: Auftragswert, ohne gepflegten Auftragswert das Budget
+        conversion_value = func.nullif(func.trim(Lead.conversion_value), "")
+        value = sql_amount(case(
+            (status == "won", func.coalesce(conversion_value, Lead.estimated_budget)),
+            else_=Lead.estimated_budget
+        ))
+        value = func.coalesce(value, 0)
+        probability = case(STAGE_PROBABILITY, value=status, else_=0)
+        cycle_days = func.extract('epoch', Lead.converted_at - Lead.created_at) / 86400
+        label = func.coalesce(Lead.company_name, func.concat_ws(' ', Lead.first_name, Lead.last_name))
+        deal = func.json_build_array(label, value, type_=JSON)
+
+        stmt = (
+            select(
+                status.label("status"),
+                func.count().label("count"),
+                func.sum(value).label("value"),
+                func.sum(value * probability / 100).label("weighted"),
+                func.avg(cast(cycle_days, Float)).filter(Lead.converted_at.isnot(None)).label("cycle_days"),
+                func.count().filter(Lead.converted_at.isnot(None)).label("converted"),
+                array_agg(aggregate_order_by(deal, value.desc()))[1:TOP_DEALS].label("deals"),
+            )
+            .where(
+                Lead.is_deleted == False,
+                Lead.created_at >= start,
+                Lead.created_at < end,
+            )
+            .group_by(status)
+        )
+        if tenant_id is not None:
+            stmt = stmt.where(Lead.tenant_id == tenant_id)
+
+        stages = {status: StageStats(status) for status in STAGE_ORDER + ("lost",)}
+        cycle_sum, cycle_count = 0.0, 0
+        for row in session.execute(stmt):
+            stage = stages.setdefault(row.status, StageStats(row.status))
+            stage.count += row.count
+            stage.value += Decimal(row.value or 0)
+            stage.weighted_value += Decimal(row.weighted or 0)
+            stage.top_deals = [(name or "–", Decimal(str(amount or 0))) for name, amount in row.deals or ()]
+            # Der Durchschnitt stammt nur aus Leads mit converted_at - mit deren Anzahl gewichten
+            if row.status == "won" and row.cycle_days is not None:
+                cycle_sum += row.cycle_days * row.converted
+                cycle_count += row.converted
+
+        # Kumulierte Erreichung: ein Lead in "proposal" hat auch "qualified" durchlaufen
+        reached = 0
+        for status in reversed(STAGE_ORDER):
+            reached += stages[status].count
+            stages[status].reached = reached
+        for current, following in zip(STAGE_ORDER, STAGE_ORDER[1:]):
+            if stages[current].reached:
+                stages[current].conversion_rate = stages[following].reached / stages[current].reached
+
+        open_stages = [stages[s] for s in STAGE_ORDER if s not in CLOSED_STAGES]
+        won, lost = stages["won"], stages["lost"]
+        closed = won.count + lost.count
+        return PipelineStats(
+            period=period,
+            start=start,
+            end=end,
+            stages=stages,
+            pipeline_value=sum((s.value for s in open_stages), Decimal(0)),
+            weighted_value=sum((s.weighted_value for s in open_stages), Decimal(0)),
+            won_value=won.value,
+            lead_count=sum(s.count for s in stages.values()),
+            win_rate=won.count / closed if closed else None,
+            avg_cycle_days=cycle_sum / cycle_count if cycle_count else None,
+            loaded_at=time.monotonic(),
+        )
+
+
+# Global instance
+_pipeline_service = None
+
+
+def get_pipeline_service() -> PipelineService:
+    """Get global pipeline service instance"""
+    global _pipeline_service
+    if _pipeline_service is None:
+        _pipeline_service = PipelineService()
+    return _pipeline_service
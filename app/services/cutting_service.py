@@ -0,0 +1,701 @@
+"""
+Zuschnittoptimierung - Stablängen für Balken, Sparren und Latten
+
+Je Querschnitt werden die benötigten Stücke (Abbundliste eines Projekts) auf
+die verfügbaren Stablängen verteilt: Handelslängen aus dem Materialstamm
+(beliebig viele) und vorhandener Lagerbestand bzw. Reststücke (begrenzt).
+Ziel ist möglichst wenig verbrauchte Stablänge; Lagerbestand wird mit
+STOCK_COST_FACTOR bewertet und daher bevorzugt.
+
+Verfahren:
+- Heuristik: Best-Fit-Decreasing mit mehreren Start-Längen, danach lokale
+  Verbesserung (schwach gefüllte Stäbe auflösen, Stäbe auf die kürzeste
+  passende Handelslänge verkleinern)
+- exakt (optional): Spaltengenerierung - LP über Schnittmuster mit einem
+  kleinen Simplex in NumPy, neue Muster per beschränktem Rucksackproblem;
+  die abgerundete LP-Lösung wird mit der Heuristik vervollständigt. Der
+  LP-Wert ist eine untere Schranke für den Verbrauch.
+
+Das Sägeblatt (kerf_mm) wird je Schnitt abgezogen: Stücke p1..pk passen in
+einen Stab L, wenn sum(p) + (k-1) * kerf <= L. Unabhängige Querschnitte
+werden mit workers > 1 parallel in einem Prozess-Pool gerechnet.
+"""
+import csv
+import math
+import multiprocessing
+import os
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, or_, select
+
+from shared.models import Material
+from app.services.project_cost_service import parse_number
+
+
+KERF_MM = 4
+
+# Kürzere Reste gelten als Abfall, längere gehen als Reststück zurück ins Lager
+MIN_OFFCUT_MM = 500
+
+# Bewertung vorhandener Stäbe gegenüber Neukauf (Verbrauch in mm * Faktor)
+STOCK_COST_FACTOR = 0.5
+
+MAX_IMPROVE_PASSES = 6
+MAX_DISSOLVE_FAILURES = 25
+REBALANCE_WINDOW = 40
+MAX_SIMPLEX_ITERATIONS = 50000
+REFACTOR_INTERVAL = 50
+
+# Handelslängen KVH, wenn für einen Querschnitt kein Material im Stamm ist
+DEFAULT_STOCK_LENGTHS = (4000, 5000, 6000, 7000, 8000, 9000, 10000, 11000, 12000, 13000)
+
+# Spaltengenerierung bricht danach ab; die Lösung gilt dann ohne LP-Schranke
+EXACT_TIME_LIMIT = 20.0
+_EPS = 1e-9
+
+
+@dataclass
+class CutPiece:
+    """Benötigte Stücke einer Länge (Position der Abbundliste)"""
+    length_mm: int
+    quantity: int = 1
+    label: str = ""
+
+
+@dataclass
+class StockLength:
+    """Verfügbare Stablänge - quantity None = Handelslänge, beliebig verfügbar"""
+    length_mm: int
+    quantity: Optional[int] = None
+    material_id: object = None
+    in_stock: bool = False
+
+    @property
+    def cost_factor(self) -> float:
+        return STOCK_COST_FACTOR if self.in_stock else 1.0
+
+
+@dataclass
+class CuttingJob:
+    """Alle Stücke eines Querschnitts"""
+    section: str
+    pieces: List[CutPiece]
+    stock: List[StockLength]
+    kerf_mm: int = KERF_MM
+
+
+@dataclass
+class CutBar:
+    """Schnittmuster: count gleiche Stäbe mit denselben Schnitten"""
+    stock: StockLength
+    cuts: List[Tuple[int, str]]
+    count: int = 1
+    kerf_mm: int = KERF_MM
+
+    @property
+    def used_mm(self) -> int:
+        return sum(length for length, _ in self.cuts) + self.kerf_mm * max(len(self.cuts) - 1, 0)
+
+    @property
+    def rest_mm(self) -> int:
+        return self.stock.length_mm - self.used_mm
+
+
+@dataclass
+class CuttingPlan:
+    """Ergebnis für einen Querschnitt"""
+    section: str
+    bars: List[CutBar] = field(default_factory=list)
+    unplaced: List[CutPiece] = field(default_factory=list)
+    method: str = "heuristic"
+    lower_bound_mm: Optional[float] = None  # LP-Schranke der Kosten (nur exakt)
+    seconds: float = 0.0
+
+    @property
+    def bar_count(self) -> int:
+        return sum(bar.count for bar in self.bars)
+
+    @property
+    def stock_mm(self) -> int:
+        return sum(bar.stock.length_mm * bar.count for bar in self.bars)
+
+    @property
+    def piece_mm(self) -> int:
+        return sum(length * bar.count for bar in self.bars for length, _ in bar.cuts)
+
+    @property
+    def offcut_mm(self) -> int:
+        """Wiederverwendbare Reststücke (>= MIN_OFFCUT_MM)"""
+        return sum(bar.rest_mm * bar.count for bar in self.bars if bar.rest_mm >= MIN_OFFCUT_MM)
+
+    @property
+    def waste_mm(self) -> int:
+        return self.stock_mm - self.piece_mm - self.offcut_mm
+
+    @property
+    def waste_percent(self) -> float:
+        return self.waste_mm / self.stock_mm * 100 if self.stock_mm else 0.0
+
+    @property
+    def cost(self) -> float:
+        return sum(bar.stock.length_mm * bar.stock.cost_factor * bar.count for bar in self.bars)
+
+    def purchase_list(self) -> Dict[int, int]:
+        """Zu kaufende Handelslängen: Länge -> Anzahl"""
+        result: Dict[int, int] = defaultdict(int)
+        for bar in self.bars:
+            if not bar.stock.in_stock:
+                result[bar.stock.length_mm] += bar.count
+        return dict(sorted(result.items()))
+
+
+# ============== HEURISTIK ==============
+
+class _Bar:
+    __slots__ = ("stock", "free", "items")
+
+    def __init__(self, stock: int, capacity: int):
+        self.stock = stock
+        self.free = capacity
+        self.items: List[Tuple[int, str]] = []
+
+
+def _best_fit_decreasing(items: List[Tuple[int, str]], stock: List[StockLength], capacities: List[int],
+                         available: List[Optional[int]], preferred: int) -> Tuple[List[_Bar], List[Tuple[int, str]]]:
+    """
+    items: (Länge + Schnittfuge, Bezeichnung), absteigend sortiert.
+    Neue Stäbe: zuerst der kürzeste passende begrenzte Stab, sonst die bevorzugte
+    Handelslänge (bzw. die kürzeste passende, wenn sie zu kurz ist).
+    """
+    bars: List[_Bar] = []
+    open_free: List[Tuple[int, int]] = []  # (freie Kapazität, Stab-Index), sortiert
+    available = list(available)
+    unplaced = []
+    by_capacity = sorted(range(len(stock)), key=lambda j: capacities[j])
+    for length, label in items:
+        position = bisect_left(open_free, (length, -1))
+        if position < len(open_free):
+            free, index = open_free.pop(position)
+            bar = bars[index]
+        else:
+            choice = None
+            for j in by_capacity:
+                if available[j] and capacities[j] >= length:
+                    choice = j
+                    break
+            if choice is None:
+                if available[preferred] is None and capacities[preferred] >= length:
+                    choice = preferred
+                else:
+                    choice = next((j for j in by_capacity if available[j] is None and capacities[j] >= length), None)
+            if choice is None:
+                unplaced.append((length, label))
+                continue
+            if available[choice] is not None:
+                available[choice] -= 1
+            index = len(bars)
+            bar = _Bar(choice, capacities[choice])
+            bars.append(bar)
+        bar.items.append((length, label))
+        bar.free -= length
+        insort(open_free, (bar.free, index))
+    return bars, unplaced
+
+
+def _rebalance(bars: List[_Bar]) -> bool:
+    """
+    Stücke aus den leersten Stäben in vollere verschieben bzw. gegen kürzere
+    tauschen. Jeder Schritt erhöht die Summe der quadrierten Füllungen -
+    freier Platz sammelt sich in wenigen Stäben, die dann aufgelöst werden.
+    """
+    changed = False
+    bars.sort(key=lambda bar: bar.free, reverse=True)
+    for source in bars[:REBALANCE_WINDOW]:
+        for target in reversed(bars):
+            if target is source or target.free >= source.free or not source.items:
+                continue
+            # Verschieben: längstes Stück, das noch passt
+            fitting = [item for item in source.items if item[0] <= target.free]
+            if fitting:
+                item = max(fitting)
+                source.items.remove(item)
+                target.items.append(item)
+                source.free += item[0]
+                target.free -= item[0]
+                changed = True
+                continue
+            # Tauschen: target erhält das längere Stück, größter Zugewinn zuerst
+            best = None
+            for a in source.items:
+                for b in target.items:
+                    gain = a[0] - b[0]
+                    if 0 < gain <= target.free and (best is None or gain > best[0]):
+                        best = (gain, a, b)
+            if best:
+                gain, a, b = best
+                source.items.remove(a)
+                target.items.remove(b)
+                source.items.append(b)
+                target.items.append(a)
+                source.free += gain
+                target.free -= gain
+                changed = True
+    bars[:] = [bar for bar in bars if bar.items]
+    return changed
+
+
+def _improve(bars: List[_Bar], stock: List[StockLength], capacities: List[int]) -> List[_Bar]:
+    """Füllungen ausgleichen, schwach gefüllte Stäbe auflösen und Handelslängen verkleinern"""
+    for _ in range(MAX_IMPROVE_PASSES):
+        changed = _rebalance(bars)
+        bars.sort(key=lambda bar: bar.free, reverse=True)
+        index, failures = 0, 0
+        while index < len(bars) and failures < MAX_DISSOLVE_FAILURES:
+            candidate = bars[index]
+            others = bars[:index] + bars[index + 1:]
+            if capacities[candidate.stock] - candidate.free > sum(bar.free for bar in others):
+                break
+            # Probeweise verteilen (Best-Fit, längste Stücke zuerst)
+            frees = sorted((bar.free, k) for k, bar in enumerate(others))
+            moves = []
+            for length, label in sorted(candidate.items, reverse=True):
+                position = bisect_left(frees, (length, -1))
+                if position == len(frees):
+                    moves = None
+                    break
+                free, k = frees.pop(position)
+                insort(frees, (free - length, k))
+                moves.append((k, length, label))
+            if moves:
+                for k, length, label in moves:
+                    others[k].items.append((length, label))
+                    others[k].free -= length
+                bars = others
+                changed = True
+            else:
+                index += 1
+                failures += 1
+        if _downsize(bars, stock, capacities):
+            changed = True
+        if not changed:
+            break
+    return bars
+
+
+def _downsize(bars: List[_Bar], stock: List[StockLength], capacities: List[int]) -> bool:
+    """Stäbe aus Handelslängen auf die kürzeste passende Handelslänge setzen"""
+    purchasable = sorted((capacities[j], j) for j in range(len(stock)) if stock[j].quantity is None)
+    changed = False
+    for bar in bars:
+        if stock[bar.stock].quantity is not None:
+            continue
+        used = capacities[bar.stock] - bar.free
+        position = bisect_left(purchasable, (used, -1))
+        if position < len(purchasable) and purchasable[position][1] != bar.stock \
+                and purchasable[position][0] < capacities[bar.stock]:
+            capacity, j = purchasable[position]
+            bar.free = capacity - used
+            bar.stock = j
+            changed = True
+    return changed
+
+
+def _bars_cost(bars: List[_Bar], stock: List[StockLength]) -> float:
+    return sum(stock[bar.stock].length_mm * stock[bar.stock].cost_factor for bar in bars)
+
+
+def _heuristic(items, stock, capacities, available):
+    """Mehrere Starts (je Handelslänge als bevorzugte Länge), der günstigste gewinnt"""
+    starts = [j for j in range(len(stock)) if stock[j].quantity is None] or [max(range(len(stock)), key=lambda j: capacities[j])]
+    best = None
+    for preferred in starts:
+        bars, unplaced = _best_fit_decreasing(items, stock, capacities, available, preferred)
+        bars = _improve(bars, stock, capacities)
+        key = (len(unplaced), _bars_cost(bars, stock))
+        if best is None or key < best[0]:
+            best = (key, bars, unplaced)
+    return best[1], best[2]
+
+
+# ============== SPALTENGENERIERUNG ==============
+
+def _knapsack(values: np.ndarray, weights: List[int], bounds: List[int], capacity: int):
+    """
+    Beschränkter Rucksack per DP über alle Kapazitäten bis capacity (Binärzerlegung).
+    Liefert (dp, Zerlegung, keep) - dp[c] = bester Wert mit Gewicht <= c.
+    """
+    dp = np.zeros(capacity + 1)
+    chunks, keep = [], []
+    for i, (value, weight, bound) in enumerate(zip(values, weights, bounds)):
+        if value <= _EPS or weight > capacity:
+            continue
+        remaining, size = bound, 1
+        while remaining > 0:
+            take = min(size, remaining)
+            w, v = weight * take, value * take
+            if w <= capacity:
+                candidate = np.full(capacity + 1, -np.inf)
+                candidate[w:] = dp[:capacity + 1 - w] + v
+                better = candidate > dp + _EPS
+                dp = np.where(better, candidate, dp)
+                chunks.append((i, take, w))
+                keep.append(better)
+            remaining -= take
+            size *= 2
+    return dp, chunks, keep
+
+
+def _knapsack_pattern(chunks, keep, count: int, capacity: int) -> np.ndarray:
+    pattern = np.zeros(count)
+    c = capacity
+    for k in range(len(chunks) - 1, -1, -1):
+        if keep[k][c]:
+            i, take, w = chunks[k]
+            pattern[i] += take
+            c -= w
+    return pattern
+
+
+def _column_generation(lengths: List[int], demand: List[int], stock: List[StockLength],
+                       capacities: List[int], seed_patterns: List[Tuple[int, np.ndarray]],
+                       time_limit: float = EXACT_TIME_LIMIT):
+    """
+    LP: min sum c_p x_p  mit  sum a_ip x_p >= d_i,  sum_{p auf Lager j} x_p <= u_j.
+    Gibt (Muster [(Stab, a)], x, LP-Wert) zurück oder None, wenn ein Stück
+    auf keine Handelslänge passt. Nach time_limit Sekunden wird mit der
+    bisherigen (zulässigen) Basis abgebrochen, der LP-Wert ist dann None.
+    """
+    deadline = time.perf_counter() + time_limit
+    m = len(lengths)
+    limited = [j for j in range(len(stock)) if stock[j].quantity is not None]
+    rows = m + len(limited)
+    unit = reduce(math.gcd, lengths + [capacities[j] for j in range(len(stock))]) or 1
+    weights = [length // unit for length in lengths]
+    scaled = [capacities[j] // unit for j in range(len(stock))]
+    costs = [stock[j].length_mm * stock[j].cost_factor for j in range(len(stock))]
+    b = np.array(demand + [stock[j].quantity for j in limited], dtype=float)
+
+    purchasable = [j for j in range(len(stock)) if stock[j].quantity is None]
+    if not purchasable:
+        return None
+
+    # Spalten in einer vorab angelegten Matrix, die bei Bedarf verdoppelt wird
+    matrix = np.zeros((rows, 4 * rows + len(seed_patterns) + 64))
+    column_cost = np.zeros(matrix.shape[1])
+    column_stock: List[int] = []
+    limit_row = {j: m + r for r, j in enumerate(limited)}
+
+    def add_column(j: int, pattern: Optional[np.ndarray] = None, row: int = None, sign: float = 1.0):
+        nonlocal matrix, column_cost
+        k = len(column_stock)
+        if k == matrix.shape[1]:
+            matrix = np.hstack([matrix, np.zeros_like(matrix)])
+            column_cost = np.concatenate([column_cost, np.zeros_like(column_cost)])
+        if pattern is not None:
+            matrix[:m, k] = pattern
+            if j in limit_row:
+                matrix[limit_row[j], k] = 1
+            column_cost[k] = costs[j]
+        else:
+            matrix[row, k] = sign
+        column_stock.append(j)
+        return k
+
+    # Startbasis: je Länge ein triviales Muster auf der längsten Handelslänge, Schlupf für Lagerzeilen
+    longest = max(purchasable, key=lambda j: capacities[j])
+    basis = []
+    for i in range(m):
+        copies = min(demand[i], capacities[longest] // lengths[i])
+        if copies <= 0:
+            return None
+        pattern = np.zeros(m)
+        pattern[i] = copies
+        basis.append(add_column(longest, pattern))
+    for r in range(len(limited)):
+        basis.append(add_column(-1, row=m + r))
+    for r in range(m):  # Überschuss-Variablen der Bedarfszeilen
+        add_column(-1, row=r, sign=-1.0)
+    for j, pattern in seed_patterns:
+        add_column(j, pattern)
+
+    # Basisinverse in Produktform fortschreiben, regelmäßig neu invertieren
+    inverse = np.linalg.inv(matrix[:, basis])
+    x_basis = inverse @ b
+    optimal = False
+    for iteration in range(MAX_SIMPLEX_ITERATIONS):
+        if time.perf_counter() > deadline:
+            break
+        if iteration and iteration % REFACTOR_INTERVAL == 0:
+            inverse = np.linalg.inv(matrix[:, basis])
+            x_basis = inverse @ b
+        count = len(column_stock)
+        duals = column_cost[basis] @ inverse
+        reduced = column_cost[:count] - duals @ matrix[:, :count]
+        reduced[basis] = 0
+        entering = int(np.argmin(reduced))
+        if reduced[entering] >= -1e-7:
+            # Neues Muster suchen: ein Rucksack für alle Stablängen
+            dp, chunks, keep = _knapsack(duals[:m], weights, demand, max(scaled))
+            best = None
+            for j in range(len(stock)):
+                value = dp[scaled[j]]
+                if j in limit_row:
+                    value += duals[limit_row[j]]
+                gain = costs[j] - value
+                if gain < -1e-7 and (best is None or gain / costs[j] < best[0]):
+                    best = (gain / costs[j], j)
+            if best is None:
+                optimal = True
+                break
+            j = best[1]
+            entering = add_column(j, _knapsack_pattern(chunks, keep, m, scaled[j]))
+
+        direction = inverse @ matrix[:, entering]
+        candidates = np.flatnonzero(direction > _EPS)
+        if not len(candidates):
+            break  # unbeschränkt - kann bei positiven Kosten nicht auftreten
+        ratios = x_basis[candidates] / direction[candidates]
+        position = int(candidates[np.argmin(ratios)])
+        step = x_basis[position] / direction[position]
+        x_basis = x_basis - step * direction
+        x_basis[position] = step
+        pivot_row = inverse[position] / direction[position]
+        inverse = inverse - np.outer(direction, pivot_row)
+        inverse[position] = pivot_row
+        basis[position] = entering
+
+    patterns, values = [], []
+    for position, k in enumerate(basis):
+        if column_stock[k] >= 0 and x_basis[position] > _EPS:
+            patterns.append((column_stock[k], matrix[:m, k].round().astype(int)))
+            values.append(x_basis[position])
+    objective = sum(column_cost[k] * x_basis[position] for position, k in enumerate(basis))
+    return patterns, values, objective if optimal else None
+
+
+def _exact(lengths_by_label, stock, capacities, available, heuristic_bars):
+    """Abgerundete LP-Lösung plus Heuristik für den Rest"""
+    lengths = sorted(lengths_by_label, reverse=True)
+    index = {length: i for i, length in enumerate(lengths)}
+    demand = [len(lengths_by_label[length]) for length in lengths]
+    seeds = []
+    for bar in heuristic_bars:
+        pattern = np.zeros(len(lengths))
+        for length, _ in bar.items:
+            pattern[index[length]] += 1
+        seeds.append((bar.stock, pattern))
+    result = _column_generation(lengths, demand, stock, capacities, seeds)
+    if result is None:
+        return None
+    patterns, values, objective = result
+
+    labels = {length: list(reversed(queue)) for length, queue in lengths_by_label.items()}
+    remaining = dict(zip(lengths, demand))
+    available = list(available)
+    bars: List[_Bar] = []
+    for (j, pattern), value in sorted(zip(patterns, values), key=lambda item: -item[1]):
+        for _ in range(int(math.floor(value + 1e-6))):
+            if available[j] is not None:
+                if available[j] <= 0:
+                    break
+                available[j] -= 1
+            bar = _Bar(j, capacities[j])
+            for i, copies in enumerate(pattern):
+                for _ in range(min(int(copies), remaining[lengths[i]])):
+                    remaining[lengths[i]] -= 1
+                    bar.items.append((lengths[i], labels[lengths[i]].pop()))
+                    bar.free -= lengths[i]
+            if bar.items:
+                bars.append(bar)
+    rest = [(length, label) for length in lengths for label in labels[length]]
+    rest.sort(key=lambda item: item[0], reverse=True)
+    if rest:
+        preferred = max((j for j in range(len(stock)) if stock[j].quantity is None),
+                        key=lambda j: capacities[j], default=0)
+        extra, unplaced = _best_fit_decreasing(rest, stock, capacities, available, preferred)
+        if unplaced:
+            return None
+        bars.extend(extra)
+    return _improve(bars, stock, capacities), objective
+
+
+# ============== EINSTIEG ==============
+
+def optimize(job: CuttingJob, exact: bool = False) -> CuttingPlan:
+    """Zuschnitt eines Querschnitts planen"""
+    started = time.perf_counter()
+    kerf = job.kerf_mm
+    stock = [s for s in job.stock if s.length_mm > 0 and (s.quantity is None or s.quantity > 0)]
+    plan = CuttingPlan(section=job.section, method="exact" if exact else "heuristic")
+    if not stock:
+        plan.unplaced = [piece for piece in job.pieces if piece.quantity > 0]
+        return plan
+
+    # Mit Schnittfuge rechnen: Stück + kerf in Stab + kerf
+    capacities = [s.length_mm + kerf for s in stock]
+    available = [s.quantity for s in stock]
+    items: List[Tuple[int, str]] = []
+    lengths_by_label: Dict[int, List[str]] = defaultdict(list)
+    for piece in job.pieces:
+        for _ in range(max(int(piece.quantity), 0)):
+            items.append((piece.length_mm + kerf, piece.label))
+            lengths_by_label[piece.length_mm + kerf].append(piece.label)
+    items.sort(key=lambda item: item[0], reverse=True)
+
+    bars, unplaced = _heuristic(items, stock, capacities, available)
+    if exact and not unplaced and items:
+        result = _exact(lengths_by_label, stock, capacities, available, bars)
+        if result is not None:
+            exact_bars, objective = result
+            plan.lower_bound_mm = objective
+            if _bars_cost(exact_bars, stock) < _bars_cost(bars, stock):
+                bars = exact_bars
+
+    # Gleiche Stäbe zu Mustern zusammenfassen
+    grouped: Dict[Tuple, CutBar] = {}
+    for bar in bars:
+        cuts = tuple(sorted(((length - kerf, label) for length, label in bar.items), reverse=True))
+        key = (bar.stock, cuts)
+        if key in grouped:
+            grouped[key].count += 1
+        else:
+            grouped[key] = CutBar(stock=stock[bar.stock], cuts=list(cuts), kerf_mm=kerf)
+    plan.bars = sorted(grouped.values(), key=lambda b: (b.stock.in_stock is False, -b.stock.length_mm, b.rest_mm))
+    missing: Dict[Tuple[int, str], int] = defaultdict(int)
+    for length, label in unplaced:
+        missing[(length - kerf, label)] += 1
+    plan.unplaced = [CutPiece(length, count, label) for (length, label), count in missing.items()]
+    plan.seconds = time.perf_counter() - started
+    return plan
+
+
+def optimize_many(jobs: Iterable[CuttingJob], exact: bool = False, workers: int = None) -> List[CuttingPlan]:
+    """Mehrere Querschnitte - mit workers > 1 parallel in einem Prozess-Pool"""
+    jobs = list(jobs)
+    workers = workers if workers is not None else max(1, (os.cpu_count() or 2) - 1)
+    workers = min(workers, len(jobs))
+    if workers <= 1:
+        return [optimize(job, exact) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        # Große Querschnitte zuerst einreichen, Ergebnis in Eingabereihenfolge
+        order = sorted(range(len(jobs)), key=lambda k: -sum(p.quantity for p in jobs[k].pieces))
+        futures = {k: pool.submit(optimize, jobs[k], exact) for k in order}
+        return [futures[k].result() for k in range(len(jobs))]
+
+
+# ============== PROJEKTDATEN ==============
+
+def section_name(width_mm: int, height_mm: int, quality: Optional[str] = None) -> str:
+    width, height = sorted((int(width_mm), int(height_mm)))
+    return f"{width}x{height} {quality}".strip() if quality else f"{width}x{height}"
+
+
+def _column(header: List[str], *names) -> Optional[int]:
+    for index, title in enumerate(header):
+        title = title.strip().lower()
+        if any(title.startswith(name) for name in names):
+            return index
+    return None
+
+
+def read_piece_list(path, delimiter: str = ";", encoding: str = "utf-8-sig") -> Dict[Tuple[int, int, str], List[CutPiece]]:
+    """
+    Abbundliste als CSV (Pos;Anzahl;Breite;Höhe;Länge;Bezeichnung;Qualität,
+    Maße in mm) je Querschnitt (Breite, Höhe, Qualität) zusammenfassen.
+    """
+    pieces: Dict[Tuple[int, int, str], List[CutPiece]] = defaultdict(list)
+    with open(path, newline="", encoding=encoding) as handle:
+        reader = csv.reader(handle, delimiter=delimiter)
+        header = next(reader, None)
+        if not header:
+            return {}
+        columns = {
+            "position": _column(header, "pos"),
+            "quantity": _column(header, "anz", "stk", "stück", "menge"),
+            "width": _column(header, "breite", "b "),
+            "height": _column(header, "höhe", "hoehe", "dicke", "h "),
+            "length": _column(header, "länge", "laenge", "l "),
+            "label": _column(header, "bez", "name", "bauteil"),
+            "quality": _column(header, "qual", "festigkeit", "güte"),
+        }
+        if None in (columns["width"], columns["height"], columns["length"]):
+            raise ValueError("Abbundliste benötigt die Spalten Breite, Höhe und Länge")
+
+        def value(row, key):
+            index = columns[key]
+            return row[index].strip() if index is not None and index < len(row) else ""
+
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            width, height = int(parse_number(value(row, "width"))), int(parse_number(value(row, "height")))
+            length = int(math.ceil(parse_number(value(row, "length"))))
+            quantity = int(parse_number(value(row, "quantity")) or 1)
+            if width <= 0 or height <= 0 or length <= 0:
+                continue
+            width, height = sorted((width, height))
+            label = " ".join(part for part in (value(row, "position"), value(row, "label")) if part)
+            pieces[(width, height, value(row, "quality"))].append(CutPiece(length, quantity, label))
+    return dict(pieces)
+
+
+def load_stock(session, tenant_id, width_mm: int, height_mm: int, quality: Optional[str] = None) -> List[StockLength]:
+    """Handelslängen und vorhandene Stäbe (Bestand in Stück) eines Querschnitts aus dem Materialstamm"""
+    width, height = sorted((int(width_mm), int(height_mm)))
+    query = select(
+        Material.id, Material.length_mm, Material.unit, Material.current_stock, Material.is_purchasable
+    ).where(
+        Material.tenant_id == tenant_id,
+        Material.is_deleted == False,
+        Material.is_active == True,
+        Material.length_mm > 0,
+        or_(
+            and_(Material.width_mm == width, Material.height_mm == height),
+            and_(Material.width_mm == height, Material.height_mm == width),
+        ),
+    )
+    if quality:
+        query = query.where(Material.quality_grade == quality)
+    stock, lengths = [], set()
+    for row in session.execute(query.order_by(Material.length_mm)):
+        on_hand = int(parse_number(row.current_stock))
+        if on_hand > 0 and (row.unit or "STK").upper() in ("STK", "ST"):
+            stock.append(StockLength(row.length_mm, on_hand, row.id, in_stock=True))
+        if row.is_purchasable is not False and row.length_mm not in lengths:
+            lengths.add(row.length_mm)
+            stock.append(StockLength(row.length_mm, None, row.id))
+    return stock
+
+
+def jobs_for_piece_list(session, tenant_id, path, default_stock: Iterable[int] = DEFAULT_STOCK_LENGTHS,
+                        kerf_mm: int = KERF_MM) -> List[CuttingJob]:
+    """Zuschnittaufträge aus einer Abbundliste; ohne Material im Stamm gelten default_stock-Längen"""
+    jobs = []
+    for (width, height, quality), pieces in sorted(read_piece_list(path).items()):
+        stock = load_stock(session, tenant_id, width, height, quality or None)
+        if not stock:
+            stock = [StockLength(length) for length in default_stock]
+        jobs.append(CuttingJob(section_name(width, height, quality), pieces, stock, kerf_mm))
+    return jobs
+
+
+def write_cutting_list(plans: List[CuttingPlan], path, delimiter: str = ";"):
+    """Schnittliste als CSV für die Abbundhalle"""
+    with open(path, "w", newline="", encoding="utf-8-sig") as handle:
+        writer = csv.writer(handle, delimiter=delimiter)
+        writer.writerow(["Querschnitt", "Stablänge", "Herkunft", "Anzahl", "Schnitte", "Rest"])
+        for plan in plans:
+            for bar in plan.bars:
+                writer.writerow([
+                    plan.section, bar.stock.length_mm, "Lager" if bar.stock.in_stock else "Einkauf", bar.count,
+                    " | ".join(f"{length} {label}".strip() for length, label in bar.cuts), bar.rest_mm,
+                ])
+            for piece in plan.unplaced:
+                writer.writerow([plan.section, "", "zu lang", piece.quantity, f"{piece.length_mm} {piece.label}".strip(), ""])
@@ -4,6 +4,7 @@ Database Service - Multi-tenant database support for HolzbauERP
 - User DB: Personal database per user (created on first login)
 """
 from sqlalchemy import create_engine, text, inspect
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import QueuePool, NullPool
 from threading import Lock
@@ -13,6 +14,9 @@ import os
 from shared.config import get_settings
 from shared.database import Base
 from app.services.cache_service import get_cache_service
+from app.services.query_registry import get_query_registry, COMPILED_CACHE_SIZE, PREPARE_THRESHOLD
+from app.services.telemetry_rollup_service import PARTITIONED_TABLES, prepare_partitioned_tables
+from app.services.reservation_service import PERIOD_BACKFILL, reservation_migrations
 
 
 class DatabaseService:
@@ -65,9 +69,18 @@ class DatabaseService:
             return {"sslmode": "require", "sslrootcert": ca_path}
         return {"sslmode": "require"}
     
+    def connect_args(self, db_url) -> dict:
+        """Driver connect arguments for an engine on db_url (also used by worker processes)"""
+        connect_args = self._get_ssl_args()
+        
+        # Server-side prepared statements where the driver supports them (psycopg 3)
+        if make_url(db_url).get_driver_name() == "psycopg":
+            connect_args["prepare_threshold"] = PREPARE_THRESHOLD
+        return connect_args
+    
     def _create_engine(self, db_url, name="database"):
         """Create SQLAlchemy engine with SSL support and optimized settings"""
-        ssl_args = self._get_ssl_args()
+        connect_args = self.connect_args(db_url)
         
         # Optimized pool settings for better performance
         engine = create_engine(
@@ -79,13 +92,14 @@ class DatabaseService:
             pool_recycle=1800,         # Recycle connections after 30 min
             pool_timeout=30,           # Reduced from 60 - fail faster
             echo=False,
-            connect_args=ssl_args,
-            # Performance optimizations
-            execution_options={
-                "compiled_cache": {},  # Enable query compilation cache
-            }
+            connect_args=connect_args,
+            # Size-bounded LRU cache for compiled statements
+            query_cache_size=COMPILED_CACHE_SIZE
         )
         
+        # Count compile-cache hits for registered queries
+        get_query_registry().attach(engine)
+        
         # Test connection
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
@@ -169,37 +183,80 @@ class DatabaseService:
     def connect_user_database(self, db_name: str) -> bool:
         """Connect to a user's personal database"""
         try:
-            # Close existing user connection if any
-            if self.user_engine:
-                self.user_engine.dispose()
-            
-            # Build URL for user database
-            user_url = f"postgresql://{self.settings.master_db.user}:{self.settings.master_db.password}@{self.settings.master_db.host}:{self.settings.master_db.port}/{db_name}"
-            
-            self.user_engine = self._create_engine(user_url, f"User DB ({db_name})")
-            self.UserSessionLocal = sessionmaker(
-                bind=self.user_engine,
-                autocommit=False,
-                autoflush=False
-            )
-            
-            self.current_user_db_name = db_name
-            
-            # Set legacy aliases to user database
-            self.engine = self.user_engine
-            self.SessionLocal = self.UserSessionLocal
-            self.master_engine = self.user_engine
-            self.MasterSessionLocal = self.UserSessionLocal
-            
-            # Run migrations to add any missing columns
-            self._run_migrations(self.user_engine)
-            
+            engine = self.open_user_database(db_name)
+            self.activate_user_database(db_name, engine)
             return True
             
         except Exception as e:
             print(f"Error connecting to user database {db_name}: {e}")
             return False
     
+    def open_user_database(self, db_name: str):
+        """Open and migrate the engine for a user's database without activating it"""
+        engine = self.open_user_engine(db_name)
+        try:
+            self.migrate_user_database(engine)
+        except Exception:
+            engine.dispose()
+            raise
+        return engine
+    
+    def open_user_engine(self, db_name: str):
+        """
+        Create and test the engine for a user's database - no DDL.
+        Thread-safe; the login pipeline calls this speculatively while the
+        password hash is still being verified.
+        """
+        # Build URL for user database
+        user_url = f"postgresql://{self.settings.master_db.user}:{self.settings.master_db.password}@{self.settings.master_db.host}:{self.settings.master_db.port}/{db_name}"
+        
+        return self._create_engine(user_url, f"User DB ({db_name})")
+    
+    def migrate_user_database(self, engine):
+        """Bring a user's database up to date (only after successful authentication)"""
+        # Create tables added since the database was set up
+        self._create_missing_tables(engine)
+        
+        # Run migrations to add any missing columns
+        self._run_migrations(engine)
+
+        # Telemetry partitions for today and the next days, before the first insert
+        try:
+            prepare_partitioned_tables(engine)
+        except Exception as e:
+            print(f"Migration warning for telemetry partitions: {e}")
+
+    def activate_user_database(self, db_name: str, engine):
+        """Make a previously opened user engine the active application database"""
+        # Close existing user connection if any
+        if self.user_engine and self.user_engine is not engine:
+            self.user_engine.dispose()
+        
+        self.user_engine = engine
+        self.UserSessionLocal = sessionmaker(
+            bind=self.user_engine,
+            autocommit=False,
+            autoflush=False
+        )
+        
+        # Projekt-Kostenübersicht bei jedem Flush per Delta fortschreiben
+        from app.services.project_cost_service import get_project_costs
+        get_project_costs().register(self.UserSessionLocal)
+        # Pipeline-Auswertung bei Änderungen an Leads verwerfen
+        from app.services.crm_pipeline_service import get_pipeline_service
+        get_pipeline_service().register(self.UserSessionLocal)
+        # Auswahllisten der Dialoge bei Stammdaten-Änderungen neu laden
+        from app.services.lookup_service import get_lookup_service
+        get_lookup_service().register(self.UserSessionLocal)
+        
+        self.current_user_db_name = db_name
+        
+        # Set legacy aliases to user database
+        self.engine = self.user_engine
+        self.SessionLocal = self.UserSessionLocal
+        self.master_engine = self.user_engine
+        self.MasterSessionLocal = self.UserSessionLocal
+    
     def _create_user_tables(self):
         """Create all application tables in user's database"""
         if not self.user_engine:
@@ -223,10 +280,26 @@ class DatabaseService:
         
         # Use create_all for proper FK ordering
         Base.metadata.create_all(bind=self.user_engine, checkfirst=True)
+        prepare_partitioned_tables(self.user_engine)
         
         self._run_migrations(self.user_engine)
         print(f"Tables created in user database: {self.current_user_db_name}")
     
+    def _create_missing_tables(self, engine):
+        """Create tables that don't exist yet (one catalog query instead of one per table)"""
+        existing = set(inspect(engine).get_table_names())
+        missing = [table for table in Base.metadata.sorted_tables if table.name not in existing]
+        if not missing:
+            return
+        
+        Base.metadata.create_all(bind=engine, tables=missing, checkfirst=True)
+        
+        # Partitioned telemetry tables need their first partitions before any insert
+        partitioned = [table.name for table in missing if table.name in PARTITIONED_TABLES]
+        if partitioned:
+            prepare_partitioned_tables(engine, partitioned)
+        print(f"Migration: Created {len(missing)} missing tables")
+    
     def _run_migrations(self, engine):
         """Run database migrations to add missing columns"""
         if not engine:
@@ -255,6 +328,98 @@ class DatabaseService:
             ("bank_accounts", "provider", "VARCHAR(50) DEFAULT 'manual'"),
             ("bank_accounts", "credentials_encrypted", "TEXT"),
             ("bank_accounts", "balance", "NUMERIC(15,2) DEFAULT 0"),
+            # Kostensätze für die Projekt-Kostenübersicht
+            ("time_entries", "cost_rate", "NUMERIC(10,2)"),
+            ("stock_movements", "unit_cost", "NUMERIC(15,4)"),
+            # Belegungszeitraum für den Doppelbuchungs-Schutz
+            ("equipment_reservations", "period", "TSRANGE"),
+            ("audit_logs", "sequence", "BIGINT"),
+            # Abo-Rechnungen: Vorlage und Leistungszeitraum
+            ("invoices", "recurring_invoice_id", "UUID REFERENCES recurring_invoices(id)"),
+            ("invoices", "recurring_period_start", "DATE"),
+            # Katalogimport (DATANORM/BMEcat)
+            ("supplier_articles", "catalog_hash", "VARCHAR(32)"),
+            # Telemetrie-Rollups: Anzahl der Messwerte für den gewichteten Durchschnitt
+            ("telemetry_rollups", "value_count", "INTEGER"),
+        ]
+        
+        # Einmalige Datenübernahme direkt nach dem Anlegen einer Spalte: (table, column) -> SQL
+        column_backfills = {
+            ("equipment_reservations", "period"): PERIOD_BACKFILL,
+            ("telemetry_rollups", "value_count"):
+                "UPDATE telemetry_rollups SET value_count = CASE WHEN sum_value IS NOT NULL THEN count ELSE 0 END",
+        }
+        
+        # Indexes added after the initial schema: (table, index name, DDL)
+        index_migrations = [
+            ("feature_usage", "uq_feature_usage_tenant_feature_date",
+             "CREATE UNIQUE INDEX IF NOT EXISTS uq_feature_usage_tenant_feature_date ON feature_usage "
+             "(COALESCE(tenant_id, '00000000-0000-0000-0000-000000000000'::uuid), feature_name, date)"),
+            ("payslips", "ix_payslips_period_employee",
+             "CREATE INDEX IF NOT EXISTS ix_payslips_period_employee ON payslips (payroll_period_id, employee_id)"),
+            ("payslip_items", "ix_payslip_items_payslip",
+             "CREATE INDEX IF NOT EXISTS ix_payslip_items_payslip ON payslip_items (payslip_id)"),
+            ("time_entries", "ix_time_entries_project",
+             "CREATE INDEX IF NOT EXISTS ix_time_entries_project ON time_entries (project_id)"),
+            ("stock_movements", "ix_stock_movements_reference",
+             "CREATE INDEX IF NOT EXISTS ix_stock_movements_reference ON stock_movements (reference_type, reference_id)"),
+            ("invoices", "ix_invoices_project_id",
+             "CREATE INDEX IF NOT EXISTS ix_invoices_project_id ON invoices (project_id)"),
+            ("leads", "ix_leads_tenant_created_status",
+             "CREATE INDEX IF NOT EXISTS ix_leads_tenant_created_status ON leads (tenant_id, created_at, status)"),
+            ("audit_logs", "uq_audit_logs_sequence",
+             "CREATE UNIQUE INDEX IF NOT EXISTS uq_audit_logs_sequence ON audit_logs (sequence)"),
+            ("invoices", "uq_invoices_recurring_period",
+             "CREATE UNIQUE INDEX IF NOT EXISTS uq_invoices_recurring_period ON invoices "
+             "(recurring_invoice_id, recurring_period_start)"),
+            ("supplier_articles", "uq_supplier_articles_supplier_number",
+             "CREATE UNIQUE INDEX IF NOT EXISTS uq_supplier_articles_supplier_number ON supplier_articles "
+             "(supplier_id, supplier_article_number)"),
+            ("stock_levels", "uq_stock_levels_material_location_batch",
+             "CREATE UNIQUE INDEX IF NOT EXISTS uq_stock_levels_material_location_batch ON stock_levels "
+             "(material_id, location_id, (COALESCE(batch_number, '')))"),
+            # Mahnlauf
+            ("invoices", "ix_invoices_tenant_due_date",
+             "CREATE INDEX IF NOT EXISTS ix_invoices_tenant_due_date ON invoices (tenant_id, due_date)"),
+            ("dunning_runs", "ix_dunning_runs_tenant_reference",
+             "CREATE INDEX IF NOT EXISTS ix_dunning_runs_tenant_reference ON dunning_runs (tenant_id, reference_date)"),
+            ("dunning_notices", "ix_dunning_notices_run",
+             "CREATE INDEX IF NOT EXISTS ix_dunning_notices_run ON dunning_notices (dunning_run_id)"),
+            ("dunning_notice_items", "ix_dunning_notice_items_notice",
+             "CREATE INDEX IF NOT EXISTS ix_dunning_notice_items_notice ON dunning_notice_items (notice_id)"),
+            ("dunning_notice_items", "ix_dunning_notice_items_invoice",
+             "CREATE INDEX IF NOT EXISTS ix_dunning_notice_items_invoice ON dunning_notice_items (invoice_id)"),
+            ("dunning_blocks", "ix_dunning_blocks_customer",
+             "CREATE INDEX IF NOT EXISTS ix_dunning_blocks_customer ON dunning_blocks (customer_id)"),
+            ("dunning_blocks", "ix_dunning_blocks_invoice",
+             "CREATE INDEX IF NOT EXISTS ix_dunning_blocks_invoice ON dunning_blocks (invoice_id)"),
+            # SEPA-Export
+            ("payments", "ix_payments_sepa_batch",
+             "CREATE INDEX IF NOT EXISTS ix_payments_sepa_batch ON payments (sepa_batch_id)"),
+            # Liquiditätsplanung
+            ("cash_flow_forecast_items", "ix_cash_flow_forecast_items_forecast",
+             "CREATE INDEX IF NOT EXISTS ix_cash_flow_forecast_items_forecast ON cash_flow_forecast_items "
+             "(forecast_id, period_date)"),
+            # AfA-Lauf
+            ("depreciation_entries", "ix_depreciation_entries_asset_date",
+             "CREATE INDEX IF NOT EXISTS ix_depreciation_entries_asset_date ON depreciation_entries "
+             "(fixed_asset_id, depreciation_date)"),
+            ("journals", "ix_journals_tenant_source",
+             "CREATE INDEX IF NOT EXISTS ix_journals_tenant_source ON journals (tenant_id, source_type, source_id)"),
+            # Tilgungspläne
+            ("loan_payments", "ix_loan_payments_loan_number",
+             "CREATE INDEX IF NOT EXISTS ix_loan_payments_loan_number ON loan_payments (loan_id, payment_number)"),
+            ("loan_payments", "ix_loan_payments_open_due",
+             "CREATE INDEX IF NOT EXISTS ix_loan_payments_open_due ON loan_payments (tenant_id, due_date) "
+             "INCLUDE (loan_id, payment_amount, principal_amount, interest_amount, fee_amount, paid_amount) "
+             "WHERE status IN ('scheduled', 'overdue')"),
+            # Umsatzsteuer-Voranmeldung
+            ("journals", "ix_journals_tenant_posting_date",
+             "CREATE INDEX IF NOT EXISTS ix_journals_tenant_posting_date ON journals (tenant_id, posting_date)"),
+            ("journal_items", "ix_journal_items_journal_tax",
+             "CREATE INDEX IF NOT EXISTS ix_journal_items_journal_tax ON journal_items (journal_id, tax_type) "
+             "INCLUDE (debit, credit, tax_amount, tax_account_id, account_id) WHERE tax_type IS NOT NULL"),
+            *reservation_migrations(),
         ]
         
         with engine.connect() as conn:
@@ -266,20 +431,38 @@ class DatabaseService:
                     if column_name not in existing_columns:
                         sql = text(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS {column_name} {column_def}")
                         conn.execute(sql)
+                        backfill = column_backfills.get((table_name, column_name))
+                        if backfill:
+                            conn.execute(text(backfill))
                         conn.commit()
                         print(f"Migration: Added column {column_name} to {table_name}")
                 except Exception as e:
+                    conn.rollback()
                     print(f"Migration warning for {table_name}.{column_name}: {e}")
+            
+            for table_name, index_name, index_ddl in index_migrations:
+                try:
+                    if table_name not in inspector.get_table_names():
+                        continue
+                    existing_indexes = [idx['name'] for idx in inspector.get_indexes(table_name)]
+                    if index_name not in existing_indexes:
+                        conn.execute(text(index_ddl))
+                        conn.commit()
+                        print(f"Migration: Added index {index_name} to {table_name}")
+                except Exception as e:
+                    conn.rollback()
+                    print(f"Migration warning for index {index_name}: {e}")
     
     def create_tables(self):
         """Create auth tables in auth database"""
         from shared.models import User, Role, Permission, Tenant, RefreshToken
         
         auth_tables = {'users', 'roles', 'permissions', 'tenants', 'refresh_tokens', 
-                      'user_roles', 'role_permissions'}
+                      'user_roles', 'role_permissions', 'audit_logs',
+                      'user_consents'}
         
         if self.auth_engine:
-            for table in Base.metadata.tables.values():
+            for table in Base.metadata.sorted_tables:
                 if table.name in auth_tables:
                     table.create(self.auth_engine, checkfirst=True)
             self._run_migrations(self.auth_engine)
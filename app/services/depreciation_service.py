@@ -0,0 +1,550 @@
+"""
+AfA-Lauf - Abschreibungen für FixedAsset/DepreciationEntry
+
+Ein Lauf je Mandant und Periode (Monatsende) in einer Transaktion:
+- eine Abfrage lädt alle aktiven Anlagen samt Datum der letzten AfA; die
+  Beträge werden mit NumPy für alle Anlagen gleichzeitig berechnet
+- linear: Restbuchwert (über dem Restwert) verteilt auf die Restnutzungsdauer,
+  monatsgenau ab dem Monat der Inbetriebnahme (pro rata temporis)
+- degressiv: Jahressatz auf den Buchwert zu Beginn des Geschäftsjahres, je
+  Monat ein Zwölftel, mit Wechsel zur linearen AfA (Buchwert zum Jahresbeginn
+  auf die Restnutzungsdauer), sobald diese höher ist; ohne depreciation_rate
+  gilt DECLINING_FACTOR x linearer Satz, höchstens DECLINING_MAX_RATE
+- Altbestand ohne AfA-Zeilen: die bereits abgeschriebenen Monate werden nur bei
+  linearer AfA aus der kumulierten AfA abgeleitet; degressive Anlagen ohne
+  AfA-Historie werden nicht abgeschrieben, sondern im Lauf gemeldet
+- nicht gebuchte Vormonate werden nachgeholt, im letzten Monat der
+  Nutzungsdauer wird bis auf den Restwert abgeschrieben
+- AfA-Zeilen per Bulk-Insert, je Kostenstelle ein zusammengefasster, gebuchter
+  Journal (Soll Aufwandskonto, Haben AfA- bzw. Anlagenkonto); Buchwert und
+  kumulierte AfA werden mit einem UPDATE ... FROM fortgeschrieben
+
+Die Buchungen eines Laufs tragen source_type "depreciation" und eine aus
+Mandant und Periode abgeleitete source_id. Ein erneuter Lauf für dieselbe
+Periode ersetzt den vorigen (Buchwerte zurücksetzen, Buchungen und AfA-Zeilen
+löschen), solange die Buchungsperiode offen ist und für keine spätere Periode
+abgeschrieben wurde.
+"""
+import calendar
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import BigInteger, cast, delete, func, insert, or_, select, update
+
+from shared.models import (
+    BookingStatus, CostCenter, DepreciationEntry, FiscalPeriod, FiscalYear, FiscalYearStatus,
+    FixedAsset, Journal, JournalItem
+)
+from app.services.payroll_service import MONTH_NAMES
+
+
+# Beliebiger, fester Schlüssel für pg_advisory_xact_lock - serialisiert AfA-Läufe und Belegnummern
+DEPRECIATION_LOCK = 0x41464131
+
+SOURCE_TYPE = "depreciation"
+DOCUMENT_PREFIX = "AFA"
+
+# Namensraum für die source_id eines Laufs (uuid5 aus Mandant und Periode)
+RUN_NAMESPACE = uuid.UUID("5f0c2a4e-8d1b-4c7e-9a63-2b7e1d4f0a91")
+
+LINEAR_METHODS = ("linear",)
+DECLINING_METHODS = ("declining", "degressive")
+
+# Degressive AfA ohne eigenen Satz: Vielfaches des linearen Satzes, gedeckelt (§ 7 Abs. 2 EStG)
+DECLINING_FACTOR = 2.0
+DECLINING_MAX_RATE = 0.20
+
+
+class DepreciationRunLocked(ValueError):
+    """Die Periode kann nicht (mehr) abgeschrieben werden"""
+
+
+def period_end_of(day: date) -> date:
+    return date(day.year, day.month, calendar.monthrange(day.year, day.month)[1])
+
+
+def run_key(tenant_id, period_end: date) -> uuid.UUID:
+    """source_id der Buchungen eines Laufs"""
+    return uuid.uuid5(RUN_NAMESPACE, f"{tenant_id}:{period_end.isoformat()}")
+
+
+def _month_index(day: Optional[date]) -> int:
+    return day.year * 12 + day.month - 1 if day else -1
+
+
+def fiscal_year_start(month, start_month: int = 1):
+    """Monatsindex des ersten Monats im Geschäftsjahr (Beginn im Kalendermonat start_month)"""
+    return month - (month - (start_month - 1)) % 12
+
+
+def _sql_fiscal_year_start(day, start_month: int):
+    """Beginn des Geschäftsjahres zu einem Datum in SQL"""
+    shift = func.make_interval(0, start_month - 1)
+    return func.date_trunc('year', day - shift) + shift
+
+
+def _cents(values) -> np.ndarray:
+    return np.round(np.array([float(v or 0) for v in values], dtype=np.float64) * 100)
+
+
+def _decimal(cents) -> Decimal:
+    return Decimal(int(cents)) / 100
+
+
+def _factorize(keys) -> Tuple[np.ndarray, list]:
+    """Schlüssel -> fortlaufende Codes (Reihenfolge des ersten Auftretens)"""
+    codes = {}
+    index = np.array([codes.setdefault(key, len(codes)) for key in keys], dtype=np.int64)
+    return index, list(codes)
+
+
+def depreciation_cents(period_month: int, service_month: np.ndarray, last_month: np.ndarray,
+                       life_months: np.ndarray, book: np.ndarray, residual: np.ndarray,
+                       declining: np.ndarray, rate: np.ndarray, year_taken: np.ndarray = None,
+                       start_month: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """AfA bis einschließlich period_month in Cent und Anzahl der abgeschriebenen Monate je Anlage
+
+    Monate als Index Jahr*12+Monat-1; last_month ist der letzte bereits
+    abgeschriebene Monat (service_month - 1, wenn noch keiner), rate der
+    jährliche degressive Satz als Anteil. year_taken ist die AfA, die im
+    Geschäftsjahr von last_month bereits gebucht wurde (Cent), start_month der
+    Kalendermonat, in dem das Geschäftsjahr beginnt.
+    """
+    elapsed_now = np.maximum(period_month - service_month + 1, 0)
+    elapsed_before = np.clip(last_month - service_month + 1, 0, elapsed_now)
+    months = elapsed_now - elapsed_before
+    remaining = np.maximum(life_months - elapsed_before, 1)
+    base = np.maximum(book - residual, 0)
+
+    amount = base * np.minimum(months, remaining) / remaining
+    if np.any(declining & (months > 0)):
+        amount = np.where(declining, _declining_cents(
+            period_month, service_month, last_month, life_months, book, residual, rate,
+            np.zeros_like(book) if year_taken is None else year_taken, start_month,
+        ), amount)
+    amount = np.where(elapsed_now >= life_months, base, np.minimum(amount, base))
+    amount = np.where(months > 0, np.round(amount), 0).astype(np.int64)
+    return amount, np.where(amount > 0, months, 0)
+
+
+def _declining_cents(period_month: int, service_month: np.ndarray, last_month: np.ndarray,
+                     life_months: np.ndarray, book: np.ndarray, residual: np.ndarray, rate: np.ndarray,
+                     year_taken: np.ndarray, start_month: int) -> np.ndarray:
+    """Degressive AfA je Geschäftsjahr: Jahresbetrag aus dem Buchwert zum Jahresbeginn, monatlich 1/12
+
+    Der Betrag eines Jahres wird kumuliert gerundet (Monate im Jahr x Monatsbetrag
+    abzüglich der im Jahr bereits gebuchten AfA), damit sich Monatsläufe und
+    ein Nachholungslauf nicht um Rundungscent unterscheiden.
+    """
+    cursor = np.maximum(last_month + 1, service_month)
+    same_year = fiscal_year_start(cursor, start_month) == fiscal_year_start(last_month, start_month)
+    taken = np.where(same_year & (last_month >= service_month), year_taken, 0)
+    opening = book + taken
+    current = book.astype(np.float64)
+
+    while True:
+        active = cursor <= period_month
+        if not active.any():
+            break
+        year_start = fiscal_year_start(cursor, start_month)
+        stop = np.minimum(year_start + 11, period_month)
+        counted_from = np.maximum(year_start, service_month)
+        remaining = np.maximum(life_months - (counted_from - service_month), 1)
+        monthly = np.maximum(opening * rate / 12, (opening - residual) / remaining)
+        step = np.round(monthly * (stop - counted_from + 1)) - taken
+        step = np.clip(step, 0, np.maximum(current - residual, 0))
+        current = np.where(active, current - step, current)
+        cursor = np.where(active, stop + 1, cursor)
+        opening = np.where(active, current, opening)
+        taken = np.where(active, 0, taken)
+    return book - current
+
+
+class DepreciationService:
+    """Periodische AfA-Läufe über alle Anlagen eines Mandanten"""
+
+    def _start_month(self, session, tenant_id, period_end: date) -> int:
+        """Kalendermonat, in dem das Geschäftsjahr zum Periodenende beginnt (ohne Geschäftsjahr: Januar)"""
+        start = session.execute(
+            select(FiscalYear.start_date).where(
+                FiscalYear.tenant_id == tenant_id,
+                FiscalYear.start_date <= period_end,
+                FiscalYear.end_date >= period_end,
+            ).limit(1)
+        ).scalar()
+        return start.month if start else 1
+
+    def _assets(self, session, tenant_id, period_end: date, start_month: int = 1):
+        """Aktive Anlagen mit Beginn der AfA, letztem abgeschriebenen Tag und AfA in dessen Geschäftsjahr"""
+        period_start = period_end.replace(day=1)
+        service_date = func.coalesce(FixedAsset.in_service_date, FixedAsset.acquisition_date)
+        last_entry = (
+            select(
+                DepreciationEntry.fixed_asset_id,
+                func.max(DepreciationEntry.depreciation_date).label("last_date"),
+            )
+            .where(DepreciationEntry.tenant_id == tenant_id, DepreciationEntry.status != "reversed")
+            .group_by(DepreciationEntry.fixed_asset_id)
+            .subquery()
+        )
+        year_taken = (
+            select(
+                DepreciationEntry.fixed_asset_id,
+                func.sum(DepreciationEntry.depreciation_amount).label("year_taken"),
+            )
+            .join(last_entry, last_entry.c.fixed_asset_id == DepreciationEntry.fixed_asset_id)
+            .where(
+                DepreciationEntry.tenant_id == tenant_id,
+                DepreciationEntry.status != "reversed",
+                DepreciationEntry.depreciation_date >= _sql_fiscal_year_start(last_entry.c.last_date, start_month),
+            )
+            .group_by(DepreciationEntry.fixed_asset_id)
+            .subquery()
+        )
+        return session.execute(
+            select(
+                FixedAsset.id,
+                FixedAsset.asset_number,
+                FixedAsset.name,
+                FixedAsset.cost_center_id,
+                FixedAsset.expense_account_id,
+                func.coalesce(FixedAsset.depreciation_account_id, FixedAsset.asset_account_id)
+                .label("credit_account_id"),
+                service_date.label("service_date"),
+                FixedAsset.acquisition_cost,
+                FixedAsset.residual_value,
+                FixedAsset.current_book_value,
+                FixedAsset.accumulated_depreciation,
+                FixedAsset.depreciation_method,
+                FixedAsset.useful_life_years,
+                FixedAsset.useful_life_months,
+                FixedAsset.depreciation_rate,
+                last_entry.c.last_date,
+                year_taken.c.year_taken,
+            )
+            .outerjoin(last_entry, last_entry.c.fixed_asset_id == FixedAsset.id)
+            .outerjoin(year_taken, year_taken.c.fixed_asset_id == FixedAsset.id)
+            .where(
+                FixedAsset.tenant_id == tenant_id,
+                FixedAsset.is_deleted.is_(False),
+                FixedAsset.status == "active",
+                service_date <= period_end,
+                or_(FixedAsset.disposal_date.is_(None), FixedAsset.disposal_date >= period_start),
+            )
+            .order_by(FixedAsset.asset_number)
+        ).all()
+
+    def compute(self, rows, period_end: date,
+                start_month: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """AfA in Cent, Monate und Buchwert vorher (Cent) für die Zeilen aus _assets()
+
+        Der vierte Wert markiert degressive Anlagen ohne AfA-Historie, die nicht
+        abgeschrieben werden.
+        """
+        count = len(rows)
+        if not count:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, np.zeros(0, dtype=bool)
+        method = np.array([(row.depreciation_method or "linear").lower() for row in rows])
+        declining = np.isin(method, DECLINING_METHODS)
+        supported = declining | np.isin(method, LINEAR_METHODS)
+
+        life_months = np.array(
+            [(row.useful_life_years or 0) * 12 + (row.useful_life_months or 0) for row in rows], dtype=np.int64
+        )
+        life_months = np.maximum(life_months, 1)
+        cost = _cents(row.acquisition_cost for row in rows)
+        residual = _cents(row.residual_value for row in rows)
+        book = _cents(row.current_book_value for row in rows)
+        accumulated = _cents(row.accumulated_depreciation for row in rows)
+        service_month = np.array([_month_index(row.service_date) for row in rows], dtype=np.int64)
+        last_month = np.array([_month_index(row.last_date) for row in rows], dtype=np.int64)
+
+        year_taken = _cents(getattr(row, "year_taken", None) for row in rows)
+
+        # Altbestand ohne AfA-Zeilen: bei linearer AfA die abgeschriebenen Monate aus der kumulierten
+        # AfA ableiten; degressiv lässt sich der Stand daraus nicht bestimmen
+        base = np.maximum(cost - residual, 1)
+        imported = np.round(accumulated * life_months / base).astype(np.int64)
+        without_history = last_month < 0
+        unknown = declining & without_history & (accumulated > 0)
+        last_month = np.where(
+            without_history,
+            service_month - 1 + np.where(declining, 0, np.maximum(imported, 0)),
+            last_month,
+        )
+        supported &= ~unknown
+
+        given_rate = np.array([float(row.depreciation_rate or 0) / 100 for row in rows], dtype=np.float64)
+        default_rate = np.minimum(DECLINING_FACTOR * 12 / life_months, DECLINING_MAX_RATE)
+        rate = np.where(given_rate > 0, given_rate, default_rate)
+
+        amount, months = depreciation_cents(
+            _month_index(period_end), service_month, last_month, life_months, book, residual, declining, rate,
+            year_taken, start_month,
+        )
+        amount = np.where(supported, amount, 0)
+        return amount, np.where(supported, months, 0), book.astype(np.int64), unknown
+
+    def preview(self, session, tenant_id, period_end: Optional[date] = None) -> List[dict]:
+        """Noch nicht gebuchte AfA je Anlage bis zum Periodenende (ohne Schreiben)"""
+        period_end = period_end_of(period_end or date.today())
+        start_month = self._start_month(session, tenant_id, period_end)
+        rows = self._assets(session, tenant_id, period_end, start_month)
+        amount, months, book, _ = self.compute(rows, period_end, start_month)
+        return [
+            {
+                "fixed_asset_id": row.id,
+                "asset_number": row.asset_number,
+                "name": row.name,
+                "months": int(months[i]),
+                "amount": _decimal(amount[i]),
+                "book_value_before": _decimal(book[i]),
+                "book_value_after": _decimal(book[i] - amount[i]),
+            }
+            for i, row in enumerate(rows) if amount[i] > 0
+        ]
+
+    def _allocate_numbers(self, session, tenant_id, year: int, count: int) -> List[str]:
+        """Belegnummern AFA<Jahr><laufende Nummer> - Advisory-Lock muss bereits gehalten werden"""
+        if count <= 0:
+            return []
+        prefix = f"{DOCUMENT_PREFIX}{year}"
+        last = session.execute(
+            select(func.max(cast(func.substr(Journal.document_number, len(prefix) + 1), BigInteger)))
+            .where(Journal.tenant_id == tenant_id)
+            .where(Journal.document_number.like(f"{prefix}%"))
+            .where(Journal.document_number.op('~')(f"^{prefix}[0-9]+$"))
+        ).scalar() or 0
+        return [f"{prefix}{sequence:05d}" for sequence in range(last + 1, last + count + 1)]
+
+    def _fiscal_period(self, session, tenant_id, period_end: date):
+        """Geschäftsjahr und Buchungsperiode zum Periodenende (falls angelegt)"""
+        fiscal_year = session.execute(
+            select(FiscalYear).where(
+                FiscalYear.tenant_id == tenant_id,
+                FiscalYear.start_date <= period_end,
+                FiscalYear.end_date >= period_end,
+            ).limit(1)
+        ).scalar()
+        fiscal_period = session.execute(
+            select(FiscalPeriod).where(
+                FiscalPeriod.tenant_id == tenant_id,
+                FiscalPeriod.start_date <= period_end,
+                FiscalPeriod.end_date >= period_end,
+            ).order_by(FiscalPeriod.period_number).limit(1)
+        ).scalar()
+        for item, label in ((fiscal_year, "Geschäftsjahr"), (fiscal_period, "Buchungsperiode")):
+            if item is not None and item.status not in (None, FiscalYearStatus.OPEN):
+                raise DepreciationRunLocked(f"{label} {item.name} ist abgeschlossen")
+        return fiscal_year, fiscal_period
+
+    def _replace_previous(self, session, tenant_id, period_end: date, key: uuid.UUID) -> bool:
+        """Vorigen Lauf derselben Periode zurücknehmen; False, wenn es keinen gab"""
+        later = session.execute(
+            select(FixedAsset.asset_number)
+            .join(DepreciationEntry, DepreciationEntry.fixed_asset_id == FixedAsset.id)
+            .where(
+                DepreciationEntry.tenant_id == tenant_id,
+                DepreciationEntry.depreciation_date > period_end,
+                DepreciationEntry.status != "reversed",
+            ).limit(1)
+        ).scalar()
+        if later:
+            raise DepreciationRunLocked(
+                f"Anlage {later} wurde bereits für eine spätere Periode abgeschrieben"
+            )
+
+        journals = select(Journal.id).where(
+            Journal.tenant_id == tenant_id,
+            Journal.source_type == SOURCE_TYPE,
+            Journal.source_id == key,
+        )
+        if session.execute(journals.limit(1)).scalar() is None:
+            return False
+        session.execute(
+            update(FixedAsset)
+            .where(
+                FixedAsset.id == DepreciationEntry.fixed_asset_id,
+                DepreciationEntry.journal_id.in_(journals),
+            )
+            .values(
+                current_book_value=DepreciationEntry.book_value_before,
+                accumulated_depreciation=(
+                    func.coalesce(FixedAsset.accumulated_depreciation, 0) - DepreciationEntry.depreciation_amount
+                ),
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        for table, column in ((DepreciationEntry, DepreciationEntry.journal_id),
+                              (JournalItem, JournalItem.journal_id), (Journal, Journal.id)):
+            session.execute(
+                delete(table).where(column.in_(journals)).execution_options(synchronize_session=False)
+            )
+        return True
+
+    def run(self, session, tenant_id, period_end: Optional[date] = None, user_id=None) -> dict:
+        """AfA-Lauf bis zum Ende des Monats von period_end (Standard: Vormonat) buchen und committen"""
+        if period_end is None:
+            period_end = date.today().replace(day=1) - timedelta(days=1)
+        period_end = period_end_of(period_end)
+        key = run_key(tenant_id, period_end)
+        started = time.perf_counter()
+        now = datetime.utcnow()
+
+        try:
+            session.execute(select(func.pg_advisory_xact_lock(DEPRECIATION_LOCK)))
+            fiscal_year, fiscal_period = self._fiscal_period(session, tenant_id, period_end)
+            replaced = self._replace_previous(session, tenant_id, period_end, key)
+
+            start_month = fiscal_year.start_date.month if fiscal_year and fiscal_year.start_date else 1
+            rows = self._assets(session, tenant_id, period_end, start_month)
+            amount, months, book, unknown = self.compute(rows, period_end, start_month)
+            without_accounts = np.array(
+                [not (row.expense_account_id and row.credit_account_id) for row in rows], dtype=bool
+            )
+            selected = np.flatnonzero((amount > 0) & ~without_accounts)
+            skipped = [rows[i].asset_number for i in np.flatnonzero((amount > 0) & without_accounts)]
+            without_history = [rows[i].asset_number for i in np.flatnonzero(unknown)]
+
+            # Ein Journal je Kostenstelle, darin je Konto eine Soll- bzw. Habenzeile
+            group, cost_centers = _factorize(rows[i].cost_center_id for i in selected)
+            debit, debit_keys = _factorize((group[n], rows[i].expense_account_id) for n, i in enumerate(selected))
+            credit, credit_keys = _factorize((group[n], rows[i].credit_account_id) for n, i in enumerate(selected))
+            cents = amount[selected]
+            group_totals = np.bincount(group, weights=cents, minlength=len(cost_centers)).astype(np.int64)
+            debit_totals = np.bincount(debit, weights=cents, minlength=len(debit_keys)).astype(np.int64)
+            credit_totals = np.bincount(credit, weights=cents, minlength=len(credit_keys)).astype(np.int64)
+
+            labels = {}
+            known = [center for center in cost_centers if center is not None]
+            if known:
+                labels = {
+                    row.id: f"{row.code} {row.name}"
+                    for row in session.execute(
+                        select(CostCenter.id, CostCenter.code, CostCenter.name).where(CostCenter.id.in_(known))
+                    )
+                }
+            numbers = self._allocate_numbers(session, tenant_id, period_end.year, len(cost_centers))
+            month_label = f"{MONTH_NAMES[period_end.month - 1]} {period_end.year}"
+            reference = f"AfA {period_end:%Y-%m}"
+
+            journal_ids = [uuid.uuid4() for _ in cost_centers]
+            journal_rows = [{
+                "id": journal_ids[g],
+                "tenant_id": tenant_id,
+                "fiscal_period_id": fiscal_period.id if fiscal_period else None,
+                "document_number": numbers[g],
+                "document_date": period_end,
+                "posting_date": period_end,
+                "description": f"AfA {month_label} - "
+                               + (f"Kostenstelle {labels.get(center, '')}".strip() if center else "ohne Kostenstelle"),
+                "reference": reference,
+                "source_type": SOURCE_TYPE,
+                "source_id": key,
+                "total_debit": _decimal(group_totals[g]),
+                "total_credit": _decimal(group_totals[g]),
+                "currency": "EUR",
+                "exchange_rate": 1,
+                "status": BookingStatus.POSTED,
+                "posted_at": now,
+                "posted_by": user_id,
+                "is_reversal": False,
+                "is_recurring": False,
+                "is_reviewed": False,
+                "is_deleted": False,
+                "created_by": user_id,
+                "created_at": now,
+                "updated_at": now,
+            } for g, center in enumerate(cost_centers)]
+
+            item_rows, lines = [], [0] * len(cost_centers)
+            for keys, totals, side in ((debit_keys, debit_totals, "debit"), (credit_keys, credit_totals, "credit")):
+                for (g, account_id), total in zip(keys, totals):
+                    lines[g] += 1
+                    item_rows.append({
+                        "id": uuid.uuid4(),
+                        "tenant_id": tenant_id,
+                        "journal_id": journal_ids[g],
+                        "account_id": account_id,
+                        "debit": _decimal(total) if side == "debit" else Decimal(0),
+                        "credit": _decimal(total) if side == "credit" else Decimal(0),
+                        "description": f"Abschreibungen {month_label}",
+                        "cost_center_id": cost_centers[g],
+                        "tax_amount": Decimal(0),
+                        "line_number": lines[g],
+                        "is_reconciled": False,
+                        "created_at": now,
+                        "updated_at": now,
+                    })
+
+            entry_rows = [{
+                "id": uuid.uuid4(),
+                "tenant_id": tenant_id,
+                "fixed_asset_id": rows[i].id,
+                "fiscal_year_id": fiscal_year.id if fiscal_year else None,
+                "fiscal_period_id": fiscal_period.id if fiscal_period else None,
+                "depreciation_date": period_end,
+                "depreciation_amount": _decimal(amount[i]),
+                "book_value_before": _decimal(book[i]),
+                "book_value_after": _decimal(book[i] - amount[i]),
+                "journal_id": journal_ids[group[n]],
+                "status": "posted",
+                "notes": f"inkl. Nachholung, {months[i]} Monate" if months[i] > 1 else None,
+                "created_at": now,
+                "updated_at": now,
+            } for n, i in enumerate(selected)]
+
+            if entry_rows:
+                session.execute(insert(Journal), journal_rows)
+                session.execute(insert(JournalItem), item_rows)
+                session.execute(insert(DepreciationEntry), entry_rows)
+                session.execute(
+                    update(FixedAsset)
+                    .where(
+                        FixedAsset.id == DepreciationEntry.fixed_asset_id,
+                        DepreciationEntry.journal_id.in_(journal_ids),
+                    )
+                    .values(
+                        current_book_value=DepreciationEntry.book_value_after,
+                        accumulated_depreciation=(
+                            func.coalesce(FixedAsset.accumulated_depreciation, 0)
+                            + DepreciationEntry.depreciation_amount
+                        ),
+                        updated_at=now,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return {
+            "period_end": period_end,
+            "replaced": replaced,
+            "assets": len(entry_rows),
+            "journals": len(journal_rows),
+            "amount": _decimal(cents.sum()),
+            "document_numbers": numbers,
+            "skipped": skipped,
+            "without_history": without_history,
+            "seconds": time.perf_counter() - started,
+        }
+
+
+# Global instance
+_depreciation_service = None
+
+
+def get_depreciation_service() -> DepreciationService:
+    """Get global depreciation service instance"""
+    global _depreciation_service
+    if _depreciation_service is None:
+        _depreciation_service = DepreciationService()
+    return _depreciation_service
@@ -0,0 +1,380 @@
+"""
+Mahnlauf - mengenbasiert für DunningRun/DunningNotice
+
+Ein Lauf je Mandant und Stichtag in einer Transaktion:
+- eine Abfrage wählt alle offenen Posten (Restbetrag > 0), deren Fälligkeit
+  mehr als grace_days vor dem Stichtag liegt, die die höchste Mahnstufe
+  noch nicht erreicht haben und seit MIN_INTERVAL_DAYS nicht gemahnt wurden;
+  Mahnsperren (DunningBlock auf Kunde oder Rechnung) werden per Anti-Join
+  ausgeschlossen. Summe und nächste Mahnstufe je Kunde kommen als
+  Fensterfunktion aus derselben Abfrage, min_amount gilt je Kunde.
+- Mahnungen und Mahnpositionen werden per Bulk-Insert angelegt, die
+  Mahnnummern als Block unter einem Advisory-Lock vergeben
+- dunning_level/last_dunning_date der Rechnungen werden mit einem Update
+  fortgeschrieben
+
+Ein erneuter Lauf für denselben Stichtag ersetzt den vorigen: dessen
+Mahnungen werden gelöscht und die Mahnstufen der Rechnungen zurückgesetzt,
+solange noch keine Mahnung versendet wurde und kein späterer Lauf existiert.
+"""
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Optional, Sequence
+
+from sqlalchemy import Date, Integer, cast, delete, exists, func, insert, literal, or_, select, update
+
+from shared.models import (
+    Customer, DunningBlock, DunningLevel, DunningNotice, DunningNoticeItem, DunningRun,
+    Invoice, InvoiceStatus, InvoiceType
+)
+from app.services.project_cost_service import sql_number
+
+
+# Beliebiger, fester Schlüssel für pg_advisory_xact_lock - serialisiert Mahnläufe und Nummernvergabe
+DUNNING_LOCK = 0x4D41484E
+
+RUN_PREFIX = "ML"
+NOTICE_PREFIX = "MA"
+
+# Mindestabstand zwischen zwei Mahnungen derselben Rechnung
+MIN_INTERVAL_DAYS = 14
+
+# Rechnungen in diesen Status bzw. Typen werden nie gemahnt
+CLOSED_STATUSES = (InvoiceStatus.DRAFT, InvoiceStatus.PAID, InvoiceStatus.CANCELLED)
+EXCLUDED_TYPES = (InvoiceType.CREDIT_NOTE, InvoiceType.CANCELLATION, InvoiceType.PROFORMA)
+
+_CENT = Decimal("0.01")
+
+
+@dataclass(frozen=True)
+class DunningStage:
+    """Mahnstufe: Stufe laut Invoice.dunning_level, Gebühr je Mahnung, Zahlungsfrist"""
+    level: int
+    kind: DunningLevel
+    fee: Decimal
+    payment_days: int
+
+
+DEFAULT_STAGES = (
+    DunningStage(1, DunningLevel.FIRST, Decimal("0.00"), 10),
+    DunningStage(2, DunningLevel.SECOND, Decimal("5.00"), 10),
+    DunningStage(3, DunningLevel.THIRD, Decimal("10.00"), 7),
+)
+
+
+class DunningRunLocked(ValueError):
+    """Der Lauf für den Stichtag kann nicht mehr ersetzt werden"""
+
+
+def stage_for(stages: Sequence[DunningStage], level: int) -> DunningStage:
+    """Höchste konfigurierte Stufe <= level (Lücken wie 1, 3 erlaubt); darunter die niedrigste"""
+    ordered = sorted(stages, key=lambda stage: stage.level)
+    eligible = [stage for stage in ordered if stage.level <= level]
+    return eligible[-1] if eligible else ordered[0]
+
+
+def _round(value: Decimal) -> Decimal:
+    return value.quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+def _allocate_numbers(session, column, tenant_id, prefix: str, count: int, width: int) -> List[str]:
+    """count fortlaufende Nummern prefix<nnn> je Mandant - Advisory-Lock muss bereits gehalten werden"""
+    if count <= 0:
+        return []
+    last = session.execute(
+        select(func.max(cast(func.substr(column, len(prefix) + 1), Integer)))
+        .where(column.class_.tenant_id == tenant_id)
+        .where(column.like(f"{prefix}%"))
+        .where(column.op('~')(f"^{prefix}[0-9]+$"))
+    ).scalar() or 0
+    return [f"{prefix}{sequence:0{width}d}" for sequence in range(last + 1, last + count + 1)]
+
+
+class DunningService:
+    """Mahnläufe: Auswahl, Anlage der Mahnungen und Fortschreiben der Mahnstufen"""
+
+    def _candidates(self, tenant_id, reference_date: date, grace_days: int, min_amount: Decimal,
+                    interest_percent: Decimal, stages: Sequence[DunningStage], min_interval_days: int):
+        """Mahnbare Posten samt Kundensumme und Mahnstufe je Kunde (eine Abfrage)"""
+        max_level = max(stage.level for stage in stages)
+        outstanding = sql_number(Invoice.remaining_amount)
+        level = func.coalesce(Invoice.dunning_level, 0)
+        days_overdue = literal(reference_date, Date) - Invoice.due_date
+
+        blocked = or_(DunningBlock.customer_id == Invoice.customer_id, DunningBlock.invoice_id == Invoice.id)
+        block_exists = exists().where(
+            DunningBlock.tenant_id == tenant_id,
+            DunningBlock.is_active.is_(True),
+            DunningBlock.block_from <= reference_date,
+            or_(DunningBlock.block_until.is_(None), DunningBlock.block_until >= reference_date),
+            blocked,
+        )
+
+        items = (
+            select(
+                Invoice.id.label("invoice_id"),
+                Invoice.customer_id,
+                Invoice.invoice_number,
+                Invoice.invoice_date,
+                Invoice.due_date,
+                sql_number(Invoice.total).label("invoice_amount"),
+                outstanding.label("outstanding"),
+                days_overdue.label("days_overdue"),
+                func.round(outstanding * interest_percent * days_overdue / 36500, 2).label("interest"),
+                (level + 1).label("level"),
+                Customer.customer_number,
+                Customer.company_name,
+                Customer.first_name,
+                Customer.last_name,
+                func.coalesce(Customer.email_invoice, Customer.email).label("email"),
+            )
+            .join(Customer, Customer.id == Invoice.customer_id)
+            .where(
+                Invoice.tenant_id == tenant_id,
+                Invoice.is_deleted.is_(False),
+                Invoice.status.notin_(CLOSED_STATUSES),
+                or_(Invoice.invoice_type.is_(None), Invoice.invoice_type.notin_(EXCLUDED_TYPES)),
+                Invoice.due_date < reference_date - timedelta(days=grace_days),
+                level < max_level,
+                or_(
+                    Invoice.last_dunning_date.is_(None),
+                    Invoice.last_dunning_date <= reference_date - timedelta(days=min_interval_days),
+                ),
+                outstanding > 0,
+                Customer.is_deleted.is_(False),
+                ~block_exists,
+            )
+        ).subquery()
+
+        grouped = select(
+            items,
+            func.sum(items.c.outstanding).over(partition_by=items.c.customer_id).label("customer_total"),
+            func.max(items.c.level).over(partition_by=items.c.customer_id).label("notice_level"),
+        ).subquery()
+        return (
+            select(grouped)
+            .where(grouped.c.customer_total >= min_amount)
+            .order_by(grouped.c.customer_number, grouped.c.customer_id, grouped.c.due_date, grouped.c.invoice_number)
+        )
+
+    def preview(self, session, tenant_id, reference_date: Optional[date] = None, grace_days: int = 0,
+                min_amount=0, interest_percent=0, stages: Sequence[DunningStage] = DEFAULT_STAGES,
+                min_interval_days: int = MIN_INTERVAL_DAYS) -> list:
+        """Posten, die ein Lauf mahnen würde (ohne Schreiben)"""
+        return session.execute(self._candidates(
+            tenant_id, reference_date or date.today(), grace_days, Decimal(str(min_amount)),
+            Decimal(str(interest_percent)), stages, min_interval_days
+        )).all()
+
+    def _replace_previous(self, session, run: DunningRun):
+        """Vorigen Lauf desselben Stichtags zurücknehmen: Mahnstufen zurücksetzen, Mahnungen löschen"""
+        sent = session.execute(
+            select(func.count(DunningNotice.id)).where(
+                DunningNotice.dunning_run_id == run.id,
+                or_(DunningNotice.sent_at.isnot(None), DunningNotice.status != "created"),
+            )
+        ).scalar()
+        if sent:
+            raise DunningRunLocked(
+                f"Mahnlauf {run.run_number} enthält bereits {sent} versendete Mahnungen und kann nicht wiederholt werden"
+            )
+        later = session.execute(
+            select(DunningRun.run_number).where(
+                DunningRun.tenant_id == run.tenant_id,
+                DunningRun.reference_date > run.reference_date,
+                DunningRun.status != "cancelled",
+            ).limit(1)
+        ).scalar()
+        if later:
+            raise DunningRunLocked(f"Nach Mahnlauf {run.run_number} wurde bereits Lauf {later} durchgeführt")
+
+        run_notices = select(DunningNotice.id).where(DunningNotice.dunning_run_id == run.id)
+        run_invoices = select(DunningNoticeItem.invoice_id).where(DunningNoticeItem.notice_id.in_(run_notices))
+        # Letzte Mahnung der Rechnung aus anderen Läufen bzw. Einzelmahnungen
+        previous_date = (
+            select(func.max(DunningNotice.notice_date))
+            .join(DunningNoticeItem, DunningNoticeItem.notice_id == DunningNotice.id)
+            .where(
+                DunningNoticeItem.invoice_id == Invoice.id,
+                or_(DunningNotice.dunning_run_id.is_(None), DunningNotice.dunning_run_id != run.id),
+                DunningNotice.is_deleted.is_(False),
+            )
+            .scalar_subquery()
+        )
+        session.execute(
+            update(Invoice)
+            .where(Invoice.id.in_(run_invoices))
+            .values(
+                dunning_level=func.greatest(func.coalesce(Invoice.dunning_level, 0) - 1, 0),
+                last_dunning_date=previous_date,
+                updated_at=datetime.utcnow(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(
+            delete(DunningNoticeItem).where(DunningNoticeItem.notice_id.in_(run_notices))
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(
+            delete(DunningNotice).where(DunningNotice.dunning_run_id == run.id)
+            .execution_options(synchronize_session=False)
+        )
+
+    def run(self, session, tenant_id, reference_date: Optional[date] = None, grace_days: int = 0,
+            min_amount=0, interest_percent=0, stages: Sequence[DunningStage] = DEFAULT_STAGES,
+            min_interval_days: int = MIN_INTERVAL_DAYS, user_id=None) -> dict:
+        """Mahnlauf zum Stichtag durchführen und committen"""
+        reference_date = reference_date or date.today()
+        min_amount, interest_percent = Decimal(str(min_amount)), Decimal(str(interest_percent))
+        started = time.perf_counter()
+        now = datetime.utcnow()
+
+        try:
+            session.execute(select(func.pg_advisory_xact_lock(DUNNING_LOCK)))
+            run = session.execute(
+                select(DunningRun).where(
+                    DunningRun.tenant_id == tenant_id,
+                    DunningRun.reference_date == reference_date,
+                    DunningRun.status != "cancelled",
+                ).order_by(DunningRun.created_at.desc()).limit(1)
+            ).scalar()
+            replaced = run is not None
+            if run is not None:
+                self._replace_previous(session, run)
+            else:
+                run = DunningRun(
+                    id=uuid.uuid4(), tenant_id=tenant_id, created_by=user_id,
+                    run_number=_allocate_numbers(
+                        session, DunningRun.run_number, tenant_id, f"{RUN_PREFIX}{reference_date.year}", 1, 4
+                    )[0],
+                )
+                session.add(run)
+            run.run_date = date.today()
+            run.reference_date = reference_date
+            run.grace_days = grace_days
+            run.min_amount = min_amount
+            run.status = "processing"
+            run.updated_by = user_id
+            session.flush()
+
+            rows = session.execute(self._candidates(
+                tenant_id, reference_date, grace_days, min_amount, interest_percent, stages, min_interval_days
+            )).all()
+
+            customers = []
+            for row in rows:
+                if not customers or customers[-1][0].customer_id != row.customer_id:
+                    customers.append([row])
+                else:
+                    customers[-1].append(row)
+            numbers = _allocate_numbers(
+                session, DunningNotice.notice_number, tenant_id, f"{NOTICE_PREFIX}{reference_date.year}",
+                len(customers), 5
+            )
+
+            notice_rows, item_rows = [], []
+            total_fees, total_interest = Decimal(0), Decimal(0)
+            for customer_rows, number in zip(customers, numbers):
+                first = customer_rows[0]
+                stage = stage_for(stages, first.notice_level)
+                outstanding = _round(first.customer_total)
+                interest = sum((row.interest for row in customer_rows), Decimal(0))
+                notice_id = uuid.uuid4()
+                notice_rows.append({
+                    "id": notice_id,
+                    "tenant_id": tenant_id,
+                    "dunning_run_id": run.id,
+                    "customer_id": first.customer_id,
+                    "notice_number": number,
+                    "notice_date": reference_date,
+                    "dunning_level": stage.kind,
+                    "due_date": reference_date + timedelta(days=stage.payment_days),
+                    "outstanding_amount": outstanding,
+                    "dunning_fee": stage.fee,
+                    "interest_amount": interest,
+                    "total_amount": outstanding + stage.fee + interest,
+                    "interest_rate": interest_percent if interest_percent else None,
+                    "interest_from": min(row.due_date for row in customer_rows) if interest_percent else None,
+                    "interest_to": reference_date if interest_percent else None,
+                    "send_method": "email" if first.email else "mail",
+                    "email_address": first.email,
+                    "status": "created",
+                    "is_deleted": False,
+                    "created_by": user_id,
+                    "created_at": now,
+                    "updated_at": now,
+                })
+                item_rows.extend({
+                    "id": uuid.uuid4(),
+                    "tenant_id": tenant_id,
+                    "notice_id": notice_id,
+                    "invoice_id": row.invoice_id,
+                    "invoice_number": row.invoice_number,
+                    "invoice_date": row.invoice_date or row.due_date,
+                    "original_due_date": row.due_date,
+                    "invoice_amount": _round(row.invoice_amount),
+                    "outstanding_amount": _round(row.outstanding),
+                    "days_overdue": row.days_overdue,
+                    "interest_amount": row.interest,
+                    "created_at": now,
+                    "updated_at": now,
+                } for row in customer_rows)
+                total_fees += stage.fee
+                total_interest += interest
+
+            if notice_rows:
+                session.execute(insert(DunningNotice), notice_rows)
+                session.execute(insert(DunningNoticeItem), item_rows)
+                session.execute(
+                    update(Invoice)
+                    .where(Invoice.id.in_(
+                        select(DunningNoticeItem.invoice_id)
+                        .join(DunningNotice, DunningNotice.id == DunningNoticeItem.notice_id)
+                        .where(DunningNotice.dunning_run_id == run.id)
+                    ))
+                    .values(
+                        dunning_level=func.coalesce(Invoice.dunning_level, 0) + 1,
+                        last_dunning_date=reference_date,
+                        updated_at=now,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+
+            total_amount = sum((row["outstanding_amount"] for row in notice_rows), Decimal(0))
+            run.total_customers = len(notice_rows)
+            run.total_invoices = len(item_rows)
+            run.total_amount = total_amount
+            run.status = "completed"
+            run.completed_at = datetime.utcnow()
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return {
+            "run_id": run.id,
+            "run_number": run.run_number,
+            "replaced": replaced,
+            "notices": len(notice_rows),
+            "invoices": len(item_rows),
+            "amount": total_amount,
+            "fees": total_fees,
+            "interest": total_interest,
+            "notice_numbers": numbers,
+            "seconds": time.perf_counter() - started,
+        }
+
+
+# Global instance
+_dunning_service = None
+
+
+def get_dunning_service() -> DunningService:
+    """Get global dunning service instance"""
+    global _dunning_service
+    if _dunning_service is None:
+        _dunning_service = DunningService()
+    return _dunning_service
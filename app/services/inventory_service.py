@@ -0,0 +1,378 @@
+"""
+Lagerbuchungen - Bestände je Lagerplatz aus Lagerbewegungen
+
+Jede Buchung (einzeln oder als ganzer Wareneingang bzw. Projektentnahme)
+läuft in der Transaktion des Aufrufers:
+- die Bestandsänderungen werden je (Material, Lagerplatz, Charge) summiert
+- fehlende stock_levels-Zeilen werden per INSERT ... ON CONFLICT DO NOTHING
+  angelegt, danach werden alle betroffenen Zeilen mit SELECT ... FOR UPDATE
+  in fester Reihenfolge (Material, Lagerplatz, Charge) gesperrt - parallele
+  Buchungen warten aufeinander statt sich gegenseitig zu blockieren
+- Bestände dürfen nicht negativ werden (InsufficientStock)
+- die Summen in materials (current_stock, available_stock) werden nach den
+  Lagerplätzen - ebenfalls sortiert gesperrt - nachgezogen
+- die Lagerbewegungen werden über die Session angelegt, damit die
+  Projekt-Kostenübersicht ihre Flush-Events erhält
+
+Wirkung der Bewegungsarten: from_location_id wird um die Menge gemindert,
+to_location_id erhöht. Inventur und Korrektur buchen eine vorzeichenbehaftete
+Menge auf den angegebenen Lagerplatz.
+"""
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, cast, func, literal_column, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from shared.models import Material, StockLevel, StockMovement, Warehouse, WarehouseLocation
+from shared.models.inventory import StockMovementType
+from app.services.project_cost_service import parse_number, sql_number
+
+
+# Beliebiger, fester Schlüssel für pg_advisory_xact_lock (Bewegungsnummern)
+MOVEMENT_NUMBER_LOCK = 0x4C414752
+MOVEMENT_PREFIX = "LB"
+
+_QUANTITY_STEP = Decimal("0.001")
+
+# Bewegungsarten mit Pflicht-Lagerplätzen (von, nach)
+REQUIRED_LOCATIONS = {
+    StockMovementType.EINGANG: (False, True),
+    StockMovementType.AUSGANG: (True, False),
+    StockMovementType.VERSCHNITT: (True, False),
+    StockMovementType.RUECKGABE: (False, True),
+    StockMovementType.UMLAGERUNG: (True, True),
+}
+
+# Bewegungsarten mit vorzeichenbehafteter Menge
+SIGNED_TYPES = (StockMovementType.INVENTUR, StockMovementType.KORREKTUR)
+
+StockKey = Tuple[object, object, str]  # (material_id, location_id, Charge oder "")
+
+
+def stock_level_key():
+    """Spalten des Unique-Index uq_stock_levels_material_location_batch"""
+    # '' als Literal: ein gebundener Parameter passt nicht zum Index-Ausdruck (psycopg 3, Server-Parameter)
+    return [StockLevel.material_id, StockLevel.location_id,
+            func.coalesce(StockLevel.batch_number, literal_column("''"))]
+
+
+def _quantity(value) -> Decimal:
+    return parse_number(value).quantize(_QUANTITY_STEP)
+
+
+def _quantity_text(value: Decimal) -> str:
+    text = format(value.quantize(_QUANTITY_STEP).normalize(), "f")
+    return "0" if text in ("-0", "0") else text
+
+
+def _uuid(value):
+    return value if value is None or isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _sort_key(key: StockKey):
+    return str(key[0]), str(key[1]), key[2]
+
+
+class InsufficientStock(ValueError):
+    """Bestand eines Lagerplatzes würde negativ"""
+
+    def __init__(self, shortages: List[Tuple[StockKey, Decimal, Decimal]]):
+        self.shortages = shortages
+        details = ", ".join(
+            f"{_quantity_text(on_hand)} vorhanden, {_quantity_text(-delta)} benötigt"
+            for _key, on_hand, delta in shortages[:5]
+        )
+        super().__init__(f"Bestand reicht nicht aus ({len(shortages)} Positionen): {details}")
+
+
+@dataclass
+class Movement:
+    """Eine zu buchende Lagerbewegung"""
+    material_id: object
+    movement_type: StockMovementType
+    quantity: Decimal
+    unit: str = "STK"
+    from_location_id: object = None
+    to_location_id: object = None
+    batch_number: Optional[str] = None
+    unit_cost: Optional[Decimal] = None
+    reference_type: Optional[str] = None
+    reference_id: object = None
+    notes: Optional[str] = None
+
+    def deltas(self) -> List[Tuple[StockKey, Decimal]]:
+        """Bestandsänderungen je Lagerplatz"""
+        quantity = _quantity(self.quantity)
+        batch = self.batch_number or ""
+        material_id = _uuid(self.material_id)
+        if self.movement_type in SIGNED_TYPES:
+            location = _uuid(self.to_location_id or self.from_location_id)
+            if not location:
+                raise ValueError("Inventur/Korrektur benötigt einen Lagerplatz")
+            return [((material_id, location, batch), quantity)]
+        if quantity <= 0:
+            raise ValueError("Die Menge einer Lagerbewegung muss positiv sein")
+        needs_from, needs_to = REQUIRED_LOCATIONS.get(self.movement_type, (False, False))
+        if (needs_from and not self.from_location_id) or (needs_to and not self.to_location_id):
+            raise ValueError(f"Lagerplatz für {self.movement_type.value} fehlt")
+        result = []
+        if self.from_location_id:
+            result.append(((material_id, _uuid(self.from_location_id), batch), -quantity))
+        if self.to_location_id:
+            result.append(((material_id, _uuid(self.to_location_id), batch), quantity))
+        return result
+
+
+class InventoryService:
+    """Bucht Lagerbewegungen und liefert Bestandsabfragen"""
+
+    # ============== BUCHEN ==============
+
+    def book(self, session, tenant_id, movement: Movement, user_id=None,
+             allow_negative: bool = False) -> StockMovement:
+        """Eine Lagerbewegung buchen"""
+        return self.book_many(session, tenant_id, [movement], user_id, allow_negative)[0]
+
+    def book_many(self, session, tenant_id, movements: Iterable[Movement], user_id=None,
+                  allow_negative: bool = False) -> List[StockMovement]:
+        """
+        Mehrere Bewegungen (z.B. einen Wareneingang oder eine Projektentnahme)
+        gemeinsam buchen. Commit bzw. Rollback durch den Aufrufer; bei
+        InsufficientStock ist nichts geschrieben.
+        """
+        movements = list(movements)
+        if not movements:
+            return []
+        deltas: Dict[StockKey, Decimal] = defaultdict(Decimal)
+        for movement in movements:
+            for key, delta in movement.deltas():
+                deltas[key] += delta
+
+        levels = self._lock_levels(session, deltas.keys())
+        self._apply(session, levels, deltas, allow_negative)
+        return self._add_movements(session, tenant_id, movements, user_id)
+
+    def count_stock(self, session, tenant_id, counts: Iterable[Tuple[object, object, Optional[str], Decimal]],
+                    user_id=None, unit: str = "STK") -> List[StockMovement]:
+        """
+        Inventur: gezählte Mengen (material_id, location_id, charge, menge)
+        übernehmen. Die Differenz zum gesperrten Bestand wird als
+        Inventurbewegung gebucht.
+        """
+        counted = {(_uuid(m), _uuid(loc), batch or ""): _quantity(q) for m, loc, batch, q in counts}
+        if not counted:
+            return []
+        levels = self._lock_levels(session, counted.keys())
+        deltas = {key: value - levels[key][1] for key, value in counted.items()}
+        self._apply(session, levels, deltas, allow_negative=False, counted_by=user_id)
+        units = dict(session.execute(
+            select(Material.id, Material.unit).where(Material.id.in_({key[0] for key in counted}))
+        ).all())
+        movements = [
+            Movement(material_id=key[0], movement_type=StockMovementType.INVENTUR, quantity=delta,
+                     unit=units.get(key[0]) or unit, to_location_id=key[1], batch_number=key[2] or None)
+            for key, delta in sorted(deltas.items(), key=lambda item: _sort_key(item[0])) if delta
+        ]
+        return self._add_movements(session, tenant_id, movements, user_id)
+
+    def _lock_levels(self, session, keys: Iterable[StockKey]) -> Dict[StockKey, Tuple[object, Decimal, Decimal]]:
+        """Fehlende Bestandszeilen anlegen und alle Zeilen sortiert sperren: key -> (id, Menge, reserviert)"""
+        keys = sorted(set(keys), key=_sort_key)
+        now = datetime.utcnow()
+        session.execute(
+            pg_insert(StockLevel)
+            .values([
+                {"material_id": m, "location_id": loc, "batch_number": batch or None,
+                 "quantity": "0", "reserved_quantity": "0", "available_quantity": "0",
+                 "created_at": now, "updated_at": now}
+                for m, loc, batch in keys
+            ])
+            .on_conflict_do_nothing(index_elements=stock_level_key())
+        )
+        rows = session.execute(
+            select(StockLevel.id, *stock_level_key(), StockLevel.quantity, StockLevel.reserved_quantity)
+            .where(tuple_(*stock_level_key()).in_(keys))
+            # Sortierung wie _sort_key (UUIDs byteweise, Charge ohne Locale)
+            .order_by(StockLevel.material_id, StockLevel.location_id,
+                      func.coalesce(StockLevel.batch_number, literal_column("''")).collate("C"))
+            .with_for_update(key_share=True)
+        ).all()
+        return {
+            (row[1], row[2], row[3]): (row[0], _quantity(row[4]), _quantity(row[5]))
+            for row in rows
+        }
+
+    def _apply(self, session, levels, deltas: Dict[StockKey, Decimal], allow_negative: bool, counted_by=None):
+        """Neue Bestände schreiben und die Materialsummen nachziehen"""
+        now = datetime.utcnow()
+        shortages, updates = [], []
+        for key in sorted(deltas, key=_sort_key):
+            level_id, on_hand, reserved = levels[key]
+            quantity = on_hand + deltas[key]
+            if quantity < 0 and deltas[key] < 0 and not allow_negative:
+                shortages.append((key, on_hand, deltas[key]))
+                continue
+            row = {
+                "id": level_id,
+                "quantity": _quantity_text(quantity),
+                "available_quantity": _quantity_text(quantity - reserved),
+                "updated_at": now,
+            }
+            if counted_by is not None:
+                row["last_counted_at"] = now
+                row["last_counted_by"] = counted_by
+            updates.append(row)
+        if shortages:
+            raise InsufficientStock(shortages)
+        if updates:
+            session.execute(update(StockLevel), updates)
+        self._refresh_material_totals(session, {key[0] for key in deltas})
+
+    def _refresh_material_totals(self, session, material_ids):
+        """current_stock/available_stock der Materialien aus ihren Lagerplätzen neu summieren"""
+        material_ids = sorted(material_ids, key=str)
+        reserved = dict(session.execute(
+            select(Material.id, Material.reserved_stock)
+            .where(Material.id.in_(material_ids))
+            .order_by(Material.id)
+            .with_for_update(key_share=True)
+        ).all())
+        totals = dict(session.execute(
+            select(StockLevel.material_id, func.sum(sql_number(StockLevel.quantity)))
+            .where(StockLevel.material_id.in_(material_ids))
+            .group_by(StockLevel.material_id)
+        ).all())
+        now = datetime.utcnow()
+        rows = []
+        for material_id in material_ids:
+            if material_id not in reserved:
+                continue
+            on_hand = Decimal(totals.get(material_id) or 0)
+            rows.append({
+                "id": material_id,
+                "current_stock": _quantity_text(on_hand),
+                "available_stock": _quantity_text(on_hand - _quantity(reserved[material_id])),
+                "updated_at": now,
+            })
+        if rows:
+            session.execute(update(Material), rows)
+
+    def _add_movements(self, session, tenant_id, movements: List[Movement], user_id) -> List[StockMovement]:
+        numbers = self._allocate_numbers(session, len(movements))
+        now = datetime.utcnow()
+        records = [
+            StockMovement(
+                tenant_id=tenant_id, movement_number=number, material_id=m.material_id,
+                movement_type=m.movement_type, quantity=_quantity_text(_quantity(m.quantity)), unit=m.unit,
+                unit_cost=m.unit_cost, from_location_id=m.from_location_id, to_location_id=m.to_location_id,
+                reference_type=m.reference_type, reference_id=m.reference_id,
+                batch_number=m.batch_number, notes=m.notes, performed_by=user_id, performed_at=now,
+            )
+            for number, m in zip(numbers, movements)
+        ]
+        session.add_all(records)
+        session.flush()
+        return records
+
+    def _allocate_numbers(self, session, count: int) -> List[str]:
+        """Bewegungsnummern LB<Jahr><laufende Nummer> blockweise vergeben (wie Rechnungsnummern)"""
+        prefix = f"{MOVEMENT_PREFIX}{datetime.utcnow().year}"
+        session.execute(select(func.pg_advisory_xact_lock(MOVEMENT_NUMBER_LOCK)))
+        last = session.execute(
+            select(func.max(cast(func.substr(StockMovement.movement_number, len(prefix) + 1), BigInteger)))
+            .where(StockMovement.movement_number.like(f"{prefix}%"))
+            .where(StockMovement.movement_number.op('~')(f"^{prefix}[0-9]+$"))
+        ).scalar() or 0
+        return [f"{prefix}{sequence:06d}" for sequence in range(last + 1, last + count + 1)]
+
+    # ============== ABFRAGEN ==============
+
+    def stock_by_warehouse(self, session, material_id) -> List:
+        """Bestand eines Materials je Lager (Index uq_stock_levels_material_location_batch)"""
+        return session.execute(
+            select(
+                Warehouse.id.label("warehouse_id"),
+                Warehouse.code,
+                Warehouse.name,
+                func.sum(sql_number(StockLevel.quantity)).label("quantity"),
+                func.sum(sql_number(StockLevel.reserved_quantity)).label("reserved"),
+                func.sum(sql_number(StockLevel.available_quantity)).label("available"),
+            )
+            .join(WarehouseLocation, WarehouseLocation.id == StockLevel.location_id)
+            .join(Warehouse, Warehouse.id == WarehouseLocation.warehouse_id)
+            .where(StockLevel.material_id == material_id)
+            .group_by(Warehouse.id, Warehouse.code, Warehouse.name)
+            .order_by(Warehouse.code)
+        ).all()
+
+    def stock_by_location(self, session, material_id) -> List:
+        """Bestand eines Materials je Lagerplatz und Charge (ohne leere Plätze)"""
+        return session.execute(
+            select(
+                WarehouseLocation.id.label("location_id"),
+                WarehouseLocation.code.label("location_code"),
+                Warehouse.code.label("warehouse_code"),
+                StockLevel.batch_number,
+                StockLevel.quantity,
+                StockLevel.reserved_quantity,
+                StockLevel.available_quantity,
+            )
+            .join(WarehouseLocation, WarehouseLocation.id == StockLevel.location_id)
+            .join(Warehouse, Warehouse.id == WarehouseLocation.warehouse_id)
+            .where(StockLevel.material_id == material_id, sql_number(StockLevel.quantity) != 0)
+            .order_by(Warehouse.code, WarehouseLocation.code, StockLevel.batch_number)
+        ).all()
+
+    def below_reorder_point(self, session, tenant_id) -> List:
+        """
+        Alle lagerhaltigen Materialien, deren verfügbarer plus bestellter
+        Bestand den Bestellpunkt (ersatzweise den Mindestbestand) erreicht -
+        ein Durchlauf über materials, keine Abfrage je Material.
+        """
+        available = sql_number(Material.current_stock) - sql_number(Material.reserved_stock)
+        projected = available + sql_number(Material.ordered_stock)
+        reorder_point = func.coalesce(
+            func.nullif(sql_number(Material.reorder_point), 0), sql_number(Material.min_stock)
+        )
+        shortfall = reorder_point - projected
+        suggested = func.greatest(sql_number(Material.reorder_quantity), shortfall, sql_number(Material.lot_size))
+        return session.execute(
+            select(
+                Material.id,
+                Material.article_number,
+                Material.name,
+                Material.unit,
+                Material.primary_supplier_id,
+                sql_number(Material.current_stock).label("on_hand"),
+                available.label("available"),
+                sql_number(Material.ordered_stock).label("ordered"),
+                reorder_point.label("reorder_point"),
+                suggested.label("suggested_quantity"),
+            )
+            .where(
+                Material.tenant_id == tenant_id,
+                Material.is_deleted == False,
+                Material.is_active == True,
+                Material.is_stockable != False,
+                reorder_point > 0,
+                projected <= reorder_point,
+            )
+            .order_by(shortfall.desc(), Material.article_number)
+        ).all()
+
+
+# Global instance
+_inventory_service = None
+
+
+def get_inventory_service() -> InventoryService:
+    """Get global inventory service instance"""
+    global _inventory_service
+    if _inventory_service is None:
+        _inventory_service = InventoryService()
+    return _inventory_service
@@ -0,0 +1,46 @@
+"""
+Rechnungsnummern - blockweise Vergabe
+
+Rechnungsnummern haben das Format R<Jahr><laufende Nummer>, z.B. R20260042,
+und sind über alle Mandanten eindeutig (Unique-Index auf invoice_number).
+allocate_invoice_numbers() sperrt die Vergabe mit einem transaktionsgebundenen
+Advisory-Lock, liest die höchste vergebene Nummer des Jahres mit einer Abfrage
+und reserviert einen zusammenhängenden Block. Die Sperre endet mit Commit bzw.
+Rollback der Transaktion, parallele Vergaben warten so lange.
+"""
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import Integer, cast, func, select
+
+from shared.models import Invoice
+
+
+# Beliebiger, fester Schlüssel für pg_advisory_xact_lock
+INVOICE_NUMBER_LOCK = 0x52454E52
+
+INVOICE_PREFIX = "R"
+
+
+def format_invoice_number(year: int, sequence: int) -> str:
+    return f"{INVOICE_PREFIX}{year}{sequence:04d}"
+
+
+def allocate_invoice_numbers(session, count: int, year: Optional[int] = None) -> List[str]:
+    """count aufeinanderfolgende Rechnungsnummern des Jahres reservieren
+
+    Muss in der Transaktion aufgerufen werden, die die Rechnungen auch anlegt.
+    """
+    if count <= 0:
+        return []
+    year = year or date.today().year
+    prefix = f"{INVOICE_PREFIX}{year}"
+
+    session.execute(select(func.pg_advisory_xact_lock(INVOICE_NUMBER_LOCK)))
+    # Gelöschte Rechnungen zählen mit - ihre Nummern bleiben belegt
+    last = session.execute(
+        select(func.max(cast(func.substr(Invoice.invoice_number, len(prefix) + 1), Integer)))
+        .where(Invoice.invoice_number.like(f"{prefix}%"))
+        .where(Invoice.invoice_number.op('~')(f"^{prefix}[0-9]+$"))
+    ).scalar() or 0
+    return [format_invoice_number(year, sequence) for sequence in range(last + 1, last + count + 1)]
@@ -0,0 +1,914 @@
+"""
+Rechnungs-PDF - Rendering mit Vorlagen-Cache und paralleler Stapelverarbeitung
+
+Eine Rechnung wird aus einfachen Datenobjekten (InvoiceDocument, CompanyInfo)
+direkt auf ein ReportLab-Canvas gezeichnet. Alles, was für alle Rechnungen
+eines Mandanten gleich ist - Schriften, Absenderzeile, Fußzeilen-Spalten,
+skaliertes Logo - steckt in einer InvoiceTemplate, die je Prozess einmal
+aufgebaut und wiederverwendet wird.
+
+Die PDFs werden mit invariant=1 erzeugt (keine Zeitstempel/Zufalls-IDs), sind
+also für gleiche Daten bytegleich. Abgelegt werden sie im Dateispeicher unter
+ihrem SHA-256 (invoices/ab/abcdef....pdf); Invoice.pdf_path enthält diesen
+relativen Schlüssel.
+
+Der Stapelmodus lädt Rechnungen mengenbasiert in Blöcken und verteilt sie auf
+einen Prozess-Pool. Die Worker schreiben die Dateien selbst und geben nur die
+Pfade zurück; pdf_path wird je Block mit einem Bulk-Update gesetzt.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, fields
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, update
+
+from app.services.project_cost_service import parse_number
+from shared.models import Invoice, InvoiceItem, Customer, Tenant
+from shared.models.invoice import InvoiceType, InvoiceStatus
+
+
+FILE_STORE_DIR = Path(os.environ.get(
+    "HOLZBAU_FILE_STORE",
+    Path.home() / ".holzbau_erp" / "files"
+))
+
+# Optionale TrueType-Schrift (Verzeichnis mit <Name>.ttf und <Name>-Bold.ttf)
+FONT_DIR = os.environ.get("HOLZBAU_INVOICE_FONT_DIR")
+FONT_NAME = os.environ.get("HOLZBAU_INVOICE_FONT", "DejaVuSans")
+
+# Rechnungen je Worker-Auftrag bzw. je Ladeblock aus der Datenbank
+CHUNK_SIZE = 25
+LOAD_CHUNK = 500
+
+# Unterhalb dieser Anzahl lohnt sich kein Prozess-Pool
+MIN_PARALLEL = 2 * CHUNK_SIZE
+
+# Vorlagen je Prozess (ein Eintrag je Mandant und Firmendaten-Stand)
+TEMPLATE_CACHE_SIZE = 16
+
+DOCUMENT_TITLES = {
+    InvoiceType.INVOICE.value: "Rechnung",
+    InvoiceType.PARTIAL_INVOICE.value: "Abschlagsrechnung",
+    InvoiceType.FINAL_INVOICE.value: "Schlussrechnung",
+    InvoiceType.CREDIT_NOTE.value: "Gutschrift",
+    InvoiceType.CANCELLATION.value: "Stornorechnung",
+    InvoiceType.PROFORMA.value: "Proforma-Rechnung",
+    InvoiceType.ADVANCE.value: "Anzahlungsrechnung",
+}
+
+# Ohne PDF: Entwürfe ändern sich noch, stornierte werden nicht versendet
+SKIPPED_STATUSES = (InvoiceStatus.DRAFT, InvoiceStatus.CANCELLED)
+
+_CENT = Decimal("0.01")
+
+
+# ============== DATEN ==============
+
+@dataclass
+class CompanyInfo:
+    """Absenderdaten eines Mandanten (Firmendaten aus den Einstellungen)"""
+    tenant_id: object = None
+    company_name: str = ""
+    legal_form: str = ""
+    street: str = ""
+    postal_code: str = ""
+    city: str = ""
+    phone: str = ""
+    email: str = ""
+    website: str = ""
+    tax_id: str = ""
+    tax_number: str = ""
+    trade_register: str = ""
+    trade_register_court: str = ""
+    ceo_name: str = ""
+    bank_name: str = ""
+    iban: str = ""
+    bic: str = ""
+    footer_text: str = ""
+    logo_path: str = ""
+    primary_color: str = "#2563eb"
+
+    @classmethod
+    def from_tenant(cls, tenant) -> "CompanyInfo":
+        street = " ".join(filter(None, (tenant.street, tenant.street_number)))
+        logo = tenant.logo_url or ""
+        if logo.startswith("file://"):
+            logo = logo[len("file://"):]
+        return cls(
+            tenant_id=tenant.id,
+            company_name=tenant.company_name or tenant.name or "",
+            legal_form=tenant.legal_form or "",
+            street=street,
+            postal_code=tenant.postal_code or "",
+            city=tenant.city or "",
+            phone=tenant.phone or "",
+            email=tenant.email or "",
+            website=tenant.website or "",
+            tax_id=tenant.tax_id or "",
+            tax_number=tenant.tax_number or "",
+            trade_register=tenant.trade_register or "",
+            trade_register_court=tenant.trade_register_court or "",
+            ceo_name=tenant.ceo_name or "",
+            bank_name=tenant.bank_name or "",
+            iban=tenant.iban or "",
+            bic=tenant.bic or "",
+            footer_text=tenant.invoice_footer_text or "",
+            # Nur lokale Dateien - beim Rendern wird nichts heruntergeladen
+            logo_path=logo if logo and "://" not in logo else "",
+            primary_color=tenant.primary_color or "#2563eb",
+        )
+
+    @property
+    def fingerprint(self) -> str:
+        """Schlüssel der Vorlage: ändert sich mit jedem Feld und dem Logo"""
+        digest = hashlib.sha1()
+        for f in fields(self):
+            digest.update(str(getattr(self, f.name)).encode("utf-8"))
+            digest.update(b"\x00")
+        if self.logo_path and os.path.exists(self.logo_path):
+            digest.update(str(os.path.getmtime(self.logo_path)).encode("ascii"))
+        return digest.hexdigest()
+
+
+@dataclass
+class InvoiceLine:
+    position: int
+    item_type: str
+    title: str
+    description: str
+    quantity: Decimal
+    unit: str
+    unit_price: Decimal
+    discount_percent: Decimal
+    tax_rate: Decimal
+    subtotal: Decimal
+
+
+@dataclass
+class InvoiceDocument:
+    """Alle Werte einer Rechnung, die auf dem PDF erscheinen (picklebar)"""
+    id: object
+    invoice_number: str
+    invoice_type: str
+    invoice_date: Optional[date]
+    due_date: Optional[date]
+    customer_number: str = ""
+    reference: str = ""
+    subject: str = ""
+    billing_lines: List[str] = field(default_factory=list)
+    intro_text: str = ""
+    closing_text: str = ""
+    subtotal: Decimal = Decimal(0)
+    discount_percent: Decimal = Decimal(0)
+    discount_amount: Decimal = Decimal(0)
+    taxes: List[Tuple[Decimal, Decimal, Decimal]] = field(default_factory=list)  # (Satz, Basis, Betrag)
+    total: Decimal = Decimal(0)
+    paid_amount: Decimal = Decimal(0)
+    payment_terms_days: Optional[int] = None
+    early_payment_discount_days: Optional[int] = None
+    early_payment_discount_percent: Decimal = Decimal(0)
+    bank_name: str = ""
+    iban: str = ""
+    bic: str = ""
+    lines: List[InvoiceLine] = field(default_factory=list)
+
+    @property
+    def title(self) -> str:
+        return DOCUMENT_TITLES.get(self.invoice_type, "Rechnung")
+
+
+def _document_from_row(row, customer_number) -> InvoiceDocument:
+    billing_lines = [
+        row.billing_company,
+        row.billing_name,
+        " ".join(filter(None, (row.billing_street, row.billing_street_number))),
+        " ".join(filter(None, (row.billing_postal_code, row.billing_city))),
+        row.billing_country if row.billing_country and row.billing_country != "Deutschland" else None,
+    ]
+    taxes = []
+    for rate, base, amount in ((row.tax_rate_1, row.tax_base_1, row.tax_amount_1),
+                               (row.tax_rate_2, row.tax_base_2, row.tax_amount_2)):
+        if rate is not None and (parse_number(base) or parse_number(amount)):
+            taxes.append((parse_number(rate), parse_number(base), parse_number(amount)))
+    return InvoiceDocument(
+        id=row.id,
+        invoice_number=row.invoice_number,
+        invoice_type=row.invoice_type.value if row.invoice_type else InvoiceType.INVOICE.value,
+        invoice_date=row.invoice_date,
+        due_date=row.due_date,
+        customer_number=customer_number or "",
+        reference=row.reference or "",
+        subject=row.subject or "",
+        billing_lines=[line for line in billing_lines if line],
+        intro_text=row.intro_text or "",
+        closing_text=row.closing_text or "",
+        subtotal=parse_number(row.subtotal),
+        discount_percent=parse_number(row.discount_percent),
+        discount_amount=parse_number(row.discount_amount),
+        taxes=taxes,
+        total=parse_number(row.total),
+        paid_amount=parse_number(row.paid_amount),
+        payment_terms_days=row.payment_terms_days,
+        early_payment_discount_days=row.early_payment_discount_days,
+        early_payment_discount_percent=parse_number(row.early_payment_discount_percent),
+        bank_name=row.bank_name or "",
+        iban=row.iban or "",
+        bic=row.bic or "",
+    )
+
+
+def load_documents(session, invoice_ids: Iterable) -> List[InvoiceDocument]:
+    """Rechnungen samt Positionen mit zwei Abfragen laden (Reihenfolge wie invoice_ids)"""
+    invoice_ids = list(invoice_ids)
+    if not invoice_ids:
+        return []
+    documents = {}
+    rows = session.execute(
+        select(Invoice, Customer.customer_number)
+        .outerjoin(Customer, Customer.id == Invoice.customer_id)
+        .where(Invoice.id.in_(invoice_ids))
+    ).all()
+    for invoice, customer_number in rows:
+        documents[invoice.id] = _document_from_row(invoice, customer_number)
+
+    items = session.execute(
+        select(InvoiceItem)
+        .where(InvoiceItem.invoice_id.in_(invoice_ids))
+        .order_by(InvoiceItem.invoice_id, InvoiceItem.position)
+    ).scalars()
+    for item in items:
+        document = documents.get(item.invoice_id)
+        if document is None:
+            continue
+        document.lines.append(InvoiceLine(
+            position=item.position,
+            item_type=item.item_type or "product",
+            title=item.title or "",
+            description=item.description or "",
+            quantity=parse_number(item.quantity),
+            unit=item.unit or "",
+            unit_price=parse_number(item.unit_price),
+            discount_percent=parse_number(item.discount_percent),
+            tax_rate=parse_number(item.tax_rate),
+            subtotal=parse_number(item.subtotal),
+        ))
+    return [documents[i] for i in invoice_ids if i in documents]
+
+
+# ============== FORMATIERUNG ==============
+
+def format_money(value: Decimal) -> str:
+    """1234.5 -> '1.234,50 €'"""
+    value = Decimal(value).quantize(_CENT, rounding=ROUND_HALF_UP)
+    text = f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"{text} €"
+
+
+def format_number(value: Decimal) -> str:
+    """Menge ohne überflüssige Nachkommastellen: 2 -> '2', 1.5 -> '1,5'"""
+    value = Decimal(value)
+    text = f"{value.normalize():f}" if value == value.to_integral() else f"{value:.3f}".rstrip("0")
+    return text.replace(".", ",")
+
+
+def format_percent(value: Decimal) -> str:
+    return f"{format_number(value)} %"
+
+
+def format_date(value: Optional[date]) -> str:
+    return value.strftime("%d.%m.%Y") if value else ""
+
+
+# ============== VORLAGE (je Prozess gecacht) ==============
+
+_fonts = None
+_logos: Dict[tuple, object] = {}
+_templates: "OrderedDict[str, InvoiceTemplate]" = OrderedDict()
+
+
+def _register_fonts() -> Tuple[str, str]:
+    """Schriftnamen (normal, fett); TrueType nur einmal je Prozess registrieren"""
+    global _fonts
+    if _fonts is None:
+        _fonts = ("Helvetica", "Helvetica-Bold")
+        if FONT_DIR:
+            from reportlab.pdfbase import pdfmetrics
+            from reportlab.pdfbase.ttfonts import TTFont
+            regular = os.path.join(FONT_DIR, f"{FONT_NAME}.ttf")
+            bold = os.path.join(FONT_DIR, f"{FONT_NAME}-Bold.ttf")
+            try:
+                pdfmetrics.registerFont(TTFont(FONT_NAME, regular))
+                pdfmetrics.registerFont(TTFont(f"{FONT_NAME}-Bold", bold if os.path.exists(bold) else regular))
+                _fonts = (FONT_NAME, f"{FONT_NAME}-Bold")
+            except Exception as e:
+                print(f"Rechnungsschrift {regular} nicht ladbar, verwende Helvetica: {e}")
+    return _fonts
+
+
+def _load_logo(path: str):
+    """ImageReader des Logos, je Pfad und Änderungszeit einmal gelesen"""
+    if not path or not os.path.exists(path):
+        return None
+    key = (path, os.path.getmtime(path))
+    if key not in _logos:
+        from reportlab.lib.utils import ImageReader
+        try:
+            _logos[key] = ImageReader(path)
+        except Exception as e:
+            print(f"Logo {path} nicht ladbar: {e}")
+            _logos[key] = None
+    return _logos[key]
+
+
+class InvoiceTemplate:
+    """Vorberechnete, rechnungsunabhängige Teile des Layouts eines Mandanten"""
+
+    # Maße in Punkt (A4: 595 x 842)
+    MARGIN_LEFT = 70.9      # 25 mm
+    MARGIN_RIGHT = 56.7     # 20 mm
+    ADDRESS_TOP = 127.6     # 45 mm von oben (DIN 5008, Form B)
+    CONTENT_TOP = 297.6     # 105 mm
+    FOOTER_HEIGHT = 70.0
+    FONT_SIZE = 9.5
+    LEADING = 12.0
+
+    def __init__(self, company: CompanyInfo):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.colors import HexColor
+        from reportlab.lib.utils import simpleSplit
+
+        self.company = company
+        self.font, self.font_bold = _register_fonts()
+        self.page_width, self.page_height = A4
+        self.content_width = self.page_width - self.MARGIN_LEFT - self.MARGIN_RIGHT
+        try:
+            self.accent = HexColor(company.primary_color or "#2563eb")
+        except ValueError:
+            self.accent = HexColor("#2563eb")
+
+        name = " ".join(filter(None, (company.company_name, company.legal_form)))
+        self.company_name = name
+        self.sender_line = " · ".join(filter(None, (
+            name, company.street, " ".join(filter(None, (company.postal_code, company.city)))
+        )))
+
+        # Spalten: Bezeichnung/Position ist variabel, Rest fest
+        right = self.page_width - self.MARGIN_RIGHT
+        self.col_pos = self.MARGIN_LEFT
+        self.col_title = self.MARGIN_LEFT + 28
+        self.col_quantity = right - 200     # rechtsbündig
+        self.col_unit = right - 195
+        self.col_price = right - 80          # rechtsbündig
+        self.col_total = right               # rechtsbündig
+        self.title_width = self.col_quantity - 40 - self.col_title
+
+        columns = [
+            [name, company.street, " ".join(filter(None, (company.postal_code, company.city)))],
+            [f"Tel. {company.phone}" if company.phone else "", company.email, company.website],
+            [company.bank_name, f"IBAN {company.iban}" if company.iban else "",
+             f"BIC {company.bic}" if company.bic else ""],
+            [f"Geschäftsführer: {company.ceo_name}" if company.ceo_name else "",
+             " ".join(filter(None, (company.trade_register_court, company.trade_register))),
+             f"USt-IdNr. {company.tax_id}" if company.tax_id else
+             (f"St.-Nr. {company.tax_number}" if company.tax_number else "")],
+        ]
+        self.footer_columns = [[line for line in column if line] for column in columns]
+        self.footer_columns = [column for column in self.footer_columns if column]
+        # Spaltenbreite nach der längsten Zeile, damit lange IBANs nicht überlappen
+        from reportlab.pdfbase.pdfmetrics import stringWidth
+        widths = [max(stringWidth(line, self.font, 7) for line in column) + 12 for column in self.footer_columns]
+        scale = min(1.0, self.content_width / sum(widths)) if widths else 1.0
+        self.footer_x = []
+        x = self.MARGIN_LEFT
+        for width in widths:
+            self.footer_x.append(x)
+            x += width * scale
+        self.footer_note = simpleSplit(company.footer_text, self.font, 7, self.content_width) \
+            if company.footer_text else []
+
+        self.logo = _load_logo(company.logo_path)
+        self.logo_size = None
+        if self.logo is not None:
+            width, height = self.logo.getSize()
+            scale = min(150.0 / width, 60.0 / height)
+            self.logo_size = (width * scale, height * scale)
+
+        self._split_cache: Dict[tuple, List[str]] = {}
+
+    # -- Hilfen --
+
+    def split(self, text: str, width: float, bold: bool = False, size: float = None) -> List[str]:
+        """Text umbrechen; Wiederholungen (gleiche Positionstexte) aus dem Cache"""
+        from reportlab.lib.utils import simpleSplit
+        if not text:
+            return []
+        key = (text, width, bold, size)
+        lines = self._split_cache.get(key)
+        if lines is None:
+            lines = []
+            for paragraph in text.splitlines() or [""]:
+                lines.extend(simpleSplit(paragraph, self.font_bold if bold else self.font,
+                                         size or self.FONT_SIZE, width) or [""])
+            if len(self._split_cache) < 4096:
+                self._split_cache[key] = lines
+        return lines
+
+    @property
+    def body_bottom(self) -> float:
+        return self.FOOTER_HEIGHT + 20 + len(self.footer_note) * 8
+
+
+def get_template(company: CompanyInfo) -> InvoiceTemplate:
+    """Vorlage aus dem Prozess-Cache (neu aufgebaut, wenn sich Firmendaten/Logo ändern)"""
+    key = company.fingerprint
+    template = _templates.get(key)
+    if template is None:
+        template = InvoiceTemplate(company)
+        _templates[key] = template
+        while len(_templates) > TEMPLATE_CACHE_SIZE:
+            _templates.popitem(last=False)
+    else:
+        _templates.move_to_end(key)
+    return template
+
+
+# ============== RENDERN ==============
+
+def _line_blocks(template: InvoiceTemplate, document: InvoiceDocument) -> List[Tuple[float, InvoiceLine, list, list]]:
+    """(Höhe, Position, Titelzeilen, Beschreibungszeilen) je Position"""
+    blocks = []
+    for line in document.lines:
+        title = template.split(line.title, template.title_width, bold=line.item_type != "text")
+        description = template.split(line.description, template.title_width, size=8.5)
+        height = len(title) * template.LEADING + len(description) * 10.5 + 6
+        blocks.append((height, line, title, description))
+    return blocks
+
+
+def _paginate(template: InvoiceTemplate, blocks, first_top: float, totals_height: float) -> List[list]:
+    """Positionen auf Seiten verteilen (Folgeseiten beginnen oben, Summen bleiben bei einer Position)"""
+    follow_top = template.page_height - 50 - 22 - 26 - 20  # wie _draw_follow_page_header + Tabellenkopf
+    bottom = template.body_bottom + 20  # Platz für "Übertrag"
+    pages, current = [], []
+    y = first_top
+    for block in blocks:
+        if current and y - block[0] < bottom:
+            pages.append(current)
+            current = []
+            y = follow_top
+        current.append(block)
+        y -= block[0]
+    if y - totals_height < template.body_bottom:
+        # Summenblock passt nicht mehr: letzte Position mit auf die neue Seite nehmen
+        moved = [current.pop()] if len(current) > 1 else []
+        pages.append(current)
+        current = moved
+    pages.append(current)
+    return pages
+
+
+def _totals_rows(document: InvoiceDocument) -> List[Tuple[str, Decimal, bool]]:
+    """(Bezeichnung, Betrag, fett) der Summenzeilen"""
+    rows = [("Summe netto", document.subtotal, False)]
+    if document.discount_amount:
+        rows.append((f"Rabatt {format_percent(document.discount_percent)}", -document.discount_amount, False))
+    for rate, base, amount in document.taxes:
+        rows.append((f"zzgl. {format_percent(rate)} USt. auf {format_money(base)}", amount, False))
+    rows.append(("Gesamtbetrag", document.total, True))
+    if document.paid_amount:
+        rows.append(("bereits bezahlt", -document.paid_amount, False))
+        rows.append(("Offener Betrag", document.total - document.paid_amount, True))
+    return rows
+
+
+def _totals_notes(template: InvoiceTemplate, document: InvoiceDocument) -> List[List[str]]:
+    """Zahlungsbedingungen, Schlusstext und Bankverbindung - je Absatz die umbrochenen Zeilen"""
+    t = template
+    notes = []
+    if document.invoice_type == InvoiceType.CREDIT_NOTE.value:
+        notes.append("Der Betrag wird Ihrem Konto gutgeschrieben.")
+    elif document.due_date:
+        if document.early_payment_discount_days and document.early_payment_discount_percent:
+            discount_date = (document.invoice_date or document.due_date) \
+                + timedelta(days=document.early_payment_discount_days)
+            notes.append(
+                f"Bei Zahlung bis {format_date(discount_date)} gewähren wir "
+                f"{format_percent(document.early_payment_discount_percent)} Skonto."
+            )
+        notes.append(f"Bitte überweisen Sie den Betrag ohne Abzug bis zum {format_date(document.due_date)}.")
+    if document.closing_text:
+        notes.append(document.closing_text)
+    iban = document.iban or t.company.iban
+    if iban:
+        bank = document.bank_name or t.company.bank_name
+        bic = document.bic or t.company.bic
+        notes.append(", ".join(filter(None, (f"Bankverbindung: {bank}" if bank else "Bankverbindung:",
+                                             f"IBAN {iban}", f"BIC {bic}" if bic else None))))
+    return [t.split(note, t.content_width) for note in notes]
+
+
+def _totals_height(template: InvoiceTemplate, rows: list, notes: List[List[str]]) -> float:
+    """Höhe des Summenblocks - genau die Abstände, die _draw_totals verbraucht"""
+    return (4 + len(rows) * (template.LEADING + 4) + 10
+            + sum(len(lines) * template.LEADING + 4 for lines in notes))
+
+
+def render_pdf(document: InvoiceDocument, company: CompanyInfo) -> bytes:
+    """Eine Rechnung als PDF (deterministische Bytes für gleiche Eingaben)"""
+    from reportlab.pdfgen import canvas as rl_canvas
+
+    template = get_template(company)
+    buffer = io.BytesIO()
+    canvas = rl_canvas.Canvas(buffer, pagesize=(template.page_width, template.page_height),
+                              invariant=1, pageCompression=1)
+    canvas.setTitle(f"{document.title} {document.invoice_number}")
+    canvas.setAuthor(template.company_name)
+
+    intro = template.split(document.intro_text, template.content_width)
+    first_top = template.page_height - template.CONTENT_TOP - 34 - len(intro) * template.LEADING - 34
+    rows, notes = _totals_rows(document), _totals_notes(template, document)
+    pages = _paginate(template, _line_blocks(template, document), first_top,
+                      _totals_height(template, rows, notes))
+
+    carried = Decimal(0)
+    for number, blocks in enumerate(pages, start=1):
+        if number == 1:
+            y = _draw_first_page_header(canvas, template, document, intro)
+        else:
+            y = _draw_follow_page_header(canvas, template, document, number, carried)
+        y = _draw_table_header(canvas, template, y)
+        for height, line, title, description in blocks:
+            _draw_line(canvas, template, y, line, title, description)
+            if line.item_type not in ("text", "subtotal"):
+                carried += line.subtotal
+            y -= height
+        if number < len(pages):
+            canvas.setFont(template.font_bold, template.FONT_SIZE)
+            canvas.drawString(template.col_title, y - 6, "Übertrag")
+            canvas.drawRightString(template.col_total, y - 6, format_money(carried))
+        else:
+            _draw_totals(canvas, template, document, y, rows, notes)
+        _draw_footer(canvas, template, number, len(pages))
+        canvas.showPage()
+
+    canvas.save()
+    return buffer.getvalue()
+
+
+def _draw_first_page_header(canvas, template, document, intro) -> float:
+    t = template
+    top = t.page_height
+
+    if t.logo is not None:
+        width, height = t.logo_size
+        canvas.drawImage(t.logo, t.page_width - t.MARGIN_RIGHT - width, top - 40 - height,
+                         width, height, mask="auto")
+    else:
+        canvas.setFont(t.font_bold, 16)
+        canvas.setFillColor(t.accent)
+        canvas.drawRightString(t.page_width - t.MARGIN_RIGHT, top - 60, t.company_name)
+        canvas.setFillColorRGB(0, 0, 0)
+
+    # Absenderzeile und Anschrift im Fensterbereich
+    y = top - t.ADDRESS_TOP
+    canvas.setFont(t.font, 7)
+    canvas.drawString(t.MARGIN_LEFT, y, t.sender_line)
+    canvas.setLineWidth(0.3)
+    canvas.line(t.MARGIN_LEFT, y - 2, t.MARGIN_LEFT + 240, y - 2)
+    canvas.setFont(t.font, 10)
+    y -= 16
+    for line in document.billing_lines:
+        canvas.drawString(t.MARGIN_LEFT, y, line)
+        y -= 12.5
+
+    # Informationsblock rechts
+    info = [
+        ("Gutschrift-Nr." if document.invoice_type == InvoiceType.CREDIT_NOTE.value else "Rechnungs-Nr.",
+         document.invoice_number),
+        ("Datum", format_date(document.invoice_date)),
+        ("Kunden-Nr.", document.customer_number),
+        ("Fällig am", format_date(document.due_date)),
+        ("Referenz", document.reference),
+    ]
+    y = top - t.ADDRESS_TOP
+    label_x = t.page_width - t.MARGIN_RIGHT - 170
+    for label, value in info:
+        if not value:
+            continue
+        canvas.setFont(t.font, 8.5)
+        canvas.drawString(label_x, y, label)
+        canvas.drawRightString(t.page_width - t.MARGIN_RIGHT, y, value)
+        y -= 12
+
+    # Titel, Betreff, Einleitung
+    y = top - t.CONTENT_TOP
+    canvas.setFont(t.font_bold, 14)
+    canvas.drawString(t.MARGIN_LEFT, y, f"{document.title} {document.invoice_number}")
+    y -= 18
+    if document.subject:
+        canvas.setFont(t.font_bold, t.FONT_SIZE)
+        canvas.drawString(t.MARGIN_LEFT, y, document.subject)
+    y -= 16
+    canvas.setFont(t.font, t.FONT_SIZE)
+    for line in intro:
+        canvas.drawString(t.MARGIN_LEFT, y, line)
+        y -= t.LEADING
+    return y - 14
+
+
+def _draw_follow_page_header(canvas, template, document, number, carried) -> float:
+    t = template
+    y = t.page_height - 50
+    canvas.setFont(t.font, 8.5)
+    canvas.drawString(t.MARGIN_LEFT, y, f"{document.title} {document.invoice_number} vom "
+                                        f"{format_date(document.invoice_date)}")
+    canvas.drawRightString(t.page_width - t.MARGIN_RIGHT, y, f"Seite {number}")
+    y -= 22
+    canvas.setFont(t.font_bold, t.FONT_SIZE)
+    canvas.drawString(t.col_title, y, "Übertrag")
+    canvas.drawRightString(t.col_total, y, format_money(carried))
+    return y - 26
+
+
+def _draw_table_header(canvas, template, y) -> float:
+    t = template
+    canvas.setFillColor(t.accent)
+    canvas.rect(t.MARGIN_LEFT, y - 5, t.content_width, 17, stroke=0, fill=1)
+    canvas.setFillColorRGB(1, 1, 1)
+    canvas.setFont(t.font_bold, 8.5)
+    canvas.drawString(t.col_pos + 3, y, "Pos.")
+    canvas.drawString(t.col_title, y, "Bezeichnung")
+    canvas.drawRightString(t.col_quantity, y, "Menge")
+    canvas.drawString(t.col_unit, y, "Einheit")
+    canvas.drawRightString(t.col_price, y, "Einzelpreis")
+    canvas.drawRightString(t.col_total - 3, y, "Gesamt")
+    canvas.setFillColorRGB(0, 0, 0)
+    return y - 20
+
+
+def _draw_line(canvas, template, y, line, title, description):
+    t = template
+    if line.item_type == "subtotal":
+        canvas.setFont(t.font_bold, t.FONT_SIZE)
+        canvas.drawString(t.col_title, y, title[0] if title else "Zwischensumme")
+        canvas.drawRightString(t.col_total, y, format_money(line.subtotal))
+        return
+
+    canvas.setFont(t.font, t.FONT_SIZE)
+    if line.item_type != "text":
+        canvas.drawString(t.col_pos + 3, y, str(line.position))
+        canvas.drawRightString(t.col_quantity, y, format_number(line.quantity))
+        canvas.drawString(t.col_unit, y, line.unit)
+        price = format_money(line.unit_price)
+        if line.discount_percent:
+            price = f"{price} (-{format_percent(line.discount_percent)})"
+        canvas.drawRightString(t.col_price, y, price)
+        canvas.drawRightString(t.col_total, y, format_money(line.subtotal))
+        canvas.setFont(t.font_bold, t.FONT_SIZE)
+    for text in title:
+        canvas.drawString(t.col_title, y, text)
+        y -= t.LEADING
+    if description:
+        canvas.setFont(t.font, 8.5)
+        canvas.setFillColorRGB(0.3, 0.3, 0.3)
+        for text in description:
+            canvas.drawString(t.col_title, y, text)
+            y -= 10.5
+        canvas.setFillColorRGB(0, 0, 0)
+
+
+def _draw_totals(canvas, template, document, y, rows, notes):
+    t = template
+    label_x = t.col_unit - 40
+    y -= 4
+    canvas.setLineWidth(0.5)
+    canvas.line(label_x, y + 8, t.col_total, y + 8)
+
+    for label, amount, bold in rows:
+        y -= 4
+        canvas.setFont(t.font_bold if bold else t.font, t.FONT_SIZE)
+        canvas.drawString(label_x, y, label)
+        canvas.drawRightString(t.col_total, y, format_money(amount))
+        y -= t.LEADING
+
+    # Zahlungsbedingungen, Schlusstext und Bankverbindung
+    y -= 10
+    canvas.setFont(t.font, t.FONT_SIZE)
+    for lines in notes:
+        for line in lines:
+            if y < t.body_bottom:
+                # Nur bei einem Schlusstext länger als eine ganze Seite - _paginate reserviert den Block
+                print(f"Rechnungs-PDF {document.invoice_number}: Summenblock passt nicht auf eine Seite")
+                return
+            canvas.drawString(t.MARGIN_LEFT, y, line)
+            y -= t.LEADING
+        y -= 4
+
+
+def _draw_footer(canvas, template, number, total_pages):
+    t = template
+    y = t.FOOTER_HEIGHT
+    canvas.setStrokeColor(t.accent)
+    canvas.setLineWidth(0.5)
+    canvas.line(t.MARGIN_LEFT, y + 10, t.page_width - t.MARGIN_RIGHT, y + 10)
+    canvas.setStrokeColorRGB(0, 0, 0)
+    canvas.setFont(t.font, 7)
+    canvas.setFillColorRGB(0.35, 0.35, 0.35)
+    for x, column in zip(t.footer_x, t.footer_columns):
+        for offset, line in enumerate(column):
+            canvas.drawString(x, y - offset * 8.5, line)
+    for offset, line in enumerate(t.footer_note):
+        canvas.drawString(t.MARGIN_LEFT, y + 18 + (len(t.footer_note) - 1 - offset) * 8, line)
+    canvas.drawRightString(t.page_width - t.MARGIN_RIGHT, 30, f"Seite {number} von {total_pages}")
+    canvas.setFillColorRGB(0, 0, 0)
+
+
+# ============== DATEISPEICHER ==============
+
+def store_pdf(data: bytes, root: Path = None) -> str:
+    """PDF unter seinem SHA-256 ablegen -> relativer Schlüssel (gleiche Bytes: keine neue Datei)"""
+    digest = hashlib.sha256(data).hexdigest()
+    relative = f"invoices/{digest[:2]}/{digest}.pdf"
+    target = Path(root or FILE_STORE_DIR) / relative
+    if not target.exists():
+        target.parent.mkdir(parents=True, exist_ok=True)
+        staging = target.with_name(f".{digest}.{os.getpid()}.tmp")
+        with open(staging, "wb") as f:
+            f.write(data)
+        os.replace(staging, target)
+    return relative
+
+
+def resolve_path(pdf_path: str, root: Path = None) -> Optional[Path]:
+    """Absoluter Pfad zu Invoice.pdf_path (oder None, wenn die Datei fehlt)"""
+    if not pdf_path:
+        return None
+    path = Path(pdf_path)
+    if not path.is_absolute():
+        path = Path(root or FILE_STORE_DIR) / path
+    return path if path.exists() else None
+
+
+# ============== STAPEL ==============
+
+def _warm_up(company: CompanyInfo):
+    """Initializer der Worker: Schriften, Logo und Vorlage vor dem ersten Auftrag laden"""
+    get_template(company)
+
+
+def _render_chunk(documents: List[InvoiceDocument], company: CompanyInfo, root: str) -> List[Tuple[object, str]]:
+    """Worker-Auftrag: rendern und ablegen; zurück gehen nur die Schlüssel"""
+    return [(document.id, store_pdf(render_pdf(document, company), Path(root))) for document in documents]
+
+
+def render_batch(documents: Iterable[List[InvoiceDocument]], company: CompanyInfo, root: Path = None,
+                 workers: int = None, on_chunk: Callable[[List[Tuple[object, str]]], None] = None
+                 ) -> Dict[object, str]:
+    """Blöcke von Rechnungen rendern - mit workers > 1 über einen Prozess-Pool
+
+    `documents` liefert Listen (z.B. je Ladeblock); sie werden in Aufträge zu
+    CHUNK_SIZE aufgeteilt, sobald sie eintreffen. on_chunk wird im aufrufenden
+    Prozess mit jedem fertigen Auftrag aufgerufen.
+    """
+    root = str(root or FILE_STORE_DIR)
+    workers = workers if workers is not None else max(1, (os.cpu_count() or 2) - 1)
+    results: Dict[object, str] = {}
+
+    def collect(done):
+        results.update(done)
+        if on_chunk:
+            on_chunk(done)
+
+    if workers <= 1:
+        for block in documents:
+            for start in range(0, len(block), CHUNK_SIZE):
+                collect(_render_chunk(block[start:start + CHUNK_SIZE], company, root))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_warm_up, initargs=(company,)) as pool:
+        pending = set()
+        for block in documents:
+            for start in range(0, len(block), CHUNK_SIZE):
+                pending.add(pool.submit(_render_chunk, block[start:start + CHUNK_SIZE], company, root))
+            # Fertige Aufträge schon während des Ladens abholen
+            for future in [f for f in pending if f.done()]:
+                pending.discard(future)
+                collect(future.result())
+        for future in as_completed(pending):
+            collect(future.result())
+    return results
+
+
+# ============== SERVICE ==============
+
+class InvoicePdfService:
+    """Rechnungs-PDFs eines Arbeitsplatzes: Vorschau, Einzelablage, Monatsstapel"""
+
+    def __init__(self, db_service=None, root: Path = None):
+        self.db_service = db_service
+        self.root = Path(root or FILE_STORE_DIR)
+        self._companies: Dict[object, CompanyInfo] = {}
+
+    def company(self, tenant_id) -> CompanyInfo:
+        """Firmendaten des Mandanten (je Mandant zwischengespeichert)"""
+        company = self._companies.get(tenant_id)
+        if company is not None:
+            return company
+        tenant = None
+        session = self.db_service.get_session() if self.db_service and tenant_id else None
+        if session is not None:
+            try:
+                tenant = session.get(Tenant, tenant_id)
+            finally:
+                session.close()
+        company = CompanyInfo.from_tenant(tenant) if tenant else CompanyInfo(tenant_id=tenant_id)
+        self._companies[tenant_id] = company
+        return company
+
+    def forget_company(self, tenant_id=None):
+        """Nach Änderungen an den Firmendaten (Einstellungen) neu laden"""
+        if tenant_id is None:
+            self._companies.clear()
+        else:
+            self._companies.pop(tenant_id, None)
+
+    def render_preview(self, session, invoice_id, tenant_id=None) -> bytes:
+        """PDF einer Rechnung im Speicher (für die Vorschau, ohne Ablage)"""
+        documents = load_documents(session, [invoice_id])
+        if not documents:
+            raise ValueError("Rechnung nicht gefunden")
+        return render_pdf(documents[0], self.company(tenant_id))
+
+    def store_invoice(self, session, invoice_id, tenant_id=None) -> Path:
+        """Eine Rechnung rendern, ablegen und pdf_path setzen (Commit durch den Aufrufer)"""
+        relative = store_pdf(self.render_preview(session, invoice_id, tenant_id), self.root)
+        session.execute(update(Invoice).where(Invoice.id == invoice_id).values(pdf_path=relative))
+        return self.root / relative
+
+    def store_batch(self, session, tenant_id=None, invoice_ids: Iterable = None, workers: int = None,
+                    progress: Callable[[int, int], None] = None) -> dict:
+        """Stapel rendern und ablegen - ohne invoice_ids alle versandfähigen Rechnungen ohne PDF
+
+        Lädt die Rechnungen in Blöcken zu LOAD_CHUNK, verteilt sie auf den
+        Prozess-Pool und setzt pdf_path je fertigem Auftrag per Bulk-Update.
+        """
+        started = time.perf_counter()
+        if invoice_ids is None:
+            stmt = select(Invoice.id).where(
+                Invoice.is_deleted == False,
+                Invoice.status.notin_(SKIPPED_STATUSES),
+                Invoice.pdf_path.is_(None),
+            ).order_by(Invoice.invoice_number)
+            if tenant_id is not None:
+                stmt = stmt.where(Invoice.tenant_id == tenant_id)
+            invoice_ids = session.execute(stmt).scalars().all()
+        invoice_ids = list(invoice_ids)
+        total = len(invoice_ids)
+        company = self.company(tenant_id)
+
+        def blocks():
+            for start in range(0, total, LOAD_CHUNK):
+                yield load_documents(session, invoice_ids[start:start + LOAD_CHUNK])
+
+        done = 0
+
+        def on_chunk(chunk):
+            nonlocal done
+            session.execute(update(Invoice), [{"id": invoice_id, "pdf_path": path} for invoice_id, path in chunk])
+            done += len(chunk)
+            if progress:
+                progress(done, total)
+
+        if total < MIN_PARALLEL:
+            workers = 1
+        results = render_batch(blocks(), company, self.root, workers=workers, on_chunk=on_chunk)
+        session.commit()
+        return {
+            "count": len(results),
+            "files": len(set(results.values())),
+            "seconds": time.perf_counter() - started,
+        }
+
+
+# Global instance
+_invoice_pdf_service = None
+
+
+def get_invoice_pdf_service(db_service=None) -> InvoicePdfService:
+    """Get global invoice PDF service instance"""
+    global _invoice_pdf_service
+    if _invoice_pdf_service is None:
+        _invoice_pdf_service = InvoicePdfService(db_service)
+    elif db_service is not None and _invoice_pdf_service.db_service is None:
+        _invoice_pdf_service.db_service = db_service
+    return _invoice_pdf_service
@@ -0,0 +1,571 @@
+"""
+Tilgungspläne - Ratenpläne für Loan/LoanPayment und EmployeeLoan/EmployeeLoanInstallment
+
+build_schedules() erzeugt Annuitäten-, Raten- (linear) und endfällige
+Tilgungspläne für beliebig viele Darlehen gleichzeitig: eine Schleife über die
+Ratennummer, je Schritt NumPy-Operationen über alle Darlehen. Zinsen werden je
+Rate aus der Restschuld auf den Cent gerundet, die letzte Rate tilgt die
+Restschuld vollständig. Laufende Darlehen beginnen mit der ersten Fälligkeit ab
+heute und dem aktuellen Saldo - vergangene Raten werden nie als offen angelegt.
+
+generate() legt die Pläne aller Darlehen eines Mandanten ohne offenen Plan per
+Bulk-Insert an (mit loan_ids: offene Raten dieser Darlehen werden ersetzt).
+Bezahlte Raten bleiben stehen, der neue Plan setzt an ihrer Restschuld an.
+
+record_payment() bucht eine Zahlung auf eine Rate. Weicht sie von der Rate ab
+(Sondertilgung, Teilzahlung, gekürzter Lohnabzug), werden nur die offenen
+Raten dieses Darlehens aus der tatsächlichen Restschuld über die verbleibende
+Laufzeit neu berechnet. Restschuld und nächste Fälligkeit am Darlehen werden
+fortgeschrieben. Die Lohnabrechnung bucht damit bei der Freigabe die
+einbehaltenen Darlehensraten.
+
+debt_service() und employee_deductions() summieren offene Raten eines
+Zeitraums über die partiellen Indizes auf (tenant_id, due_date) - für die
+Liquiditätsplanung, die Lohnabrechnung und die Kreditübersicht.
+"""
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import case, delete, exists, func, insert, select, update
+
+from shared.models import EmployeeLoan, EmployeeLoanInstallment, Loan, LoanPayment
+from app.services.recurring_invoice_service import add_months
+
+
+LOAN_FREQUENCY_MONTHS = {"monthly": 1, "quarterly": 3, "semi_annual": 6, "annual": 12}
+REPAYMENT_TYPES = ("annuity", "linear", "bullet")
+
+OPEN_STATUSES = ("scheduled", "overdue")
+SETTLED_STATUSES = ("paid", "waived")
+
+# Kreditlinien haben keinen Tilgungsplan
+UNSCHEDULED_LOAN_TYPES = ("credit_line",)
+
+EMPLOYEE_LOAN_STATUSES = ("approved", "active")
+
+
+def _cents(values) -> np.ndarray:
+    return np.round(np.array([float(v or 0) for v in values], dtype=np.float64) * 100).astype(np.int64)
+
+
+def _decimal(cents) -> Decimal:
+    return Decimal(int(cents)) / 100
+
+
+def next_due(first: date, step: int, on_or_after: date, anchor_day: Optional[int] = None) -> Tuple[int, date]:
+    """Erste Fälligkeit einer Ratenreihe ab first am oder nach on_or_after: (übersprungene Raten, Datum)"""
+    if first >= on_or_after:
+        return 0, first
+    elapsed = (on_or_after.year - first.year) * 12 + on_or_after.month - first.month
+    skipped = -(-elapsed // step)
+    due = add_months(first, skipped * step, anchor_day)
+    if due < on_or_after:
+        skipped += 1
+        due = add_months(first, skipped * step, anchor_day)
+    return skipped, due
+
+
+@dataclass
+class Schedule:
+    """Tilgungspläne mehrerer Darlehen als Matrix (Darlehen x Rate); Beträge in Cent"""
+    due: np.ndarray
+    payment: np.ndarray
+    principal: np.ndarray
+    interest: np.ndarray
+    balance: np.ndarray  # Restschuld nach der Rate
+    active: np.ndarray
+
+    def cells(self):
+        """(Darlehen, Rate)-Indizes aller belegten Raten, zeilenweise sortiert"""
+        return np.nonzero(self.active)
+
+
+def build_schedules(balance, rate_percent, periods, step_months, first_due, repayment_type,
+                    fixed_payment=None, anchor_day=None) -> Schedule:
+    """Tilgungspläne für alle Darlehen gleichzeitig
+
+    balance in Cent, rate_percent p.a., periods Anzahl Raten, step_months
+    Ratenabstand, first_due erste Fälligkeit (datetime64[D]), repayment_type
+    annuity/linear/bullet, fixed_payment vereinbarte Annuität in Cent (0 =
+    berechnen), anchor_day Fälligkeitstag im Monat (Standard: Tag von first_due).
+    """
+    balance = np.asarray(balance, dtype=np.int64)
+    count = len(balance)
+    periods = np.maximum(np.asarray(periods, dtype=np.int64), 1)
+    step = np.maximum(np.asarray(step_months, dtype=np.int64), 1)
+    first_due = np.asarray(first_due, dtype="datetime64[D]")
+    kind = np.asarray(repayment_type)
+    fixed = np.zeros(count, dtype=np.int64) if fixed_payment is None else np.asarray(fixed_payment, dtype=np.int64)
+    first_month = first_due.astype("datetime64[M]")
+    if anchor_day is None:
+        anchor_day = (first_due - first_month.astype("datetime64[D]")).astype(np.int64) + 1
+    anchor_day = np.asarray(anchor_day, dtype=np.int64)
+    width = int(periods.max()) if count else 0
+
+    # Zins je Rate und Annuität bzw. Tilgungsanteil
+    rate = np.asarray(rate_percent, dtype=np.float64) / 100 * step / 12
+    growth = (1 + rate) ** periods
+    annuity = np.where(rate > 0, balance * rate * growth / np.where(growth > 1, growth - 1, 1), balance / periods)
+    annuity = np.where(fixed > 0, fixed, np.round(annuity)).astype(np.int64)
+    linear_principal = np.round(balance / periods).astype(np.int64)
+    is_annuity, is_bullet = kind == "annuity", kind == "bullet"
+
+    shape = (count, width)
+    payment, principal, interest, rest = (np.zeros(shape, dtype=np.int64) for _ in range(4))
+    active = np.zeros(shape, dtype=bool)
+    current = balance.copy()
+    for k in range(width):
+        live = (k < periods) & (current > 0)
+        last = k == periods - 1
+        interest_k = np.round(current * rate).astype(np.int64)
+        principal_k = np.where(is_annuity, annuity - interest_k, np.where(is_bullet, 0, linear_principal))
+        principal_k = np.where(last, current, np.clip(principal_k, 0, current))
+        interest_k = np.where(live, interest_k, 0)
+        principal_k = np.where(live, principal_k, 0)
+        current = current - principal_k
+        payment[:, k] = principal_k + interest_k
+        principal[:, k] = principal_k
+        interest[:, k] = interest_k
+        rest[:, k] = current
+        active[:, k] = live
+
+    # Fälligkeiten: erste Fälligkeit + k * Ratenabstand, Tag im Monat begrenzt
+    months = first_month[:, None] + (np.arange(width)[None, :] * step[:, None]).astype("timedelta64[M]")
+    month_start = months.astype("datetime64[D]")
+    month_length = ((months + np.timedelta64(1, "M")).astype("datetime64[D]") - month_start).astype(np.int64)
+    due = month_start + (np.minimum(anchor_day[:, None], month_length) - 1).astype("timedelta64[D]")
+    return Schedule(due, payment, principal, interest, rest, active)
+
+
+class LoanScheduleService:
+    """Tilgungspläne für Firmenkredite und Mitarbeiterdarlehen"""
+
+    # ---------- Parameter ----------
+
+    def _resume_points(self, session, table, loan_column, number_column, loan_ids: Sequence) -> Dict:
+        """Letzte erledigte Rate je Darlehen: (Nummer, Fälligkeit, Restschuld)"""
+        if not loan_ids:
+            return {}
+        rows = session.execute(
+            select(loan_column, number_column, table.due_date, table.balance_after)
+            .where(loan_column.in_(loan_ids), table.status.in_(SETTLED_STATUSES))
+            .distinct(loan_column)
+            .order_by(loan_column, number_column.desc())
+        ).all()
+        return {row[0]: (row[1], row[2], row[3]) for row in rows}
+
+    def loan_parameters(self, loans, resume: Dict, use_contract_payment: bool = True,
+                        today: Optional[date] = None) -> dict:
+        """Eingaben für build_schedules() aus Loan-Zeilen (bzw. deren Restplan ab resume)
+
+        Liegt die nächste Rate vor today, läuft der Kredit bereits: der Plan
+        beginnt dann mit der ersten Fälligkeit ab today (bzw. next_payment_date)
+        und dem aktuellen Saldo über die Restlaufzeit bis end_date.
+        """
+        today = today or date.today()
+        params = {key: [] for key in ("balance", "rate", "periods", "step", "first_due", "kind",
+                                      "fixed", "anchor", "number")}
+        for loan in loans:
+            step = LOAN_FREQUENCY_MONTHS.get(loan.payment_frequency or "monthly", 1)
+            total = max((loan.term_months or 0) // step, 1)
+            first = loan.first_payment_date or add_months(loan.start_date, step, loan.start_date.day)
+            kind = loan.repayment_type if loan.repayment_type in REPAYMENT_TYPES else "annuity"
+            fixed = loan.monthly_payment if use_contract_payment and kind == "annuity" else 0
+            settled = resume.get(loan.id)
+            if settled:
+                number, last_due, balance = settled
+                number, first_due, fixed = number + 1, add_months(last_due, step, first.day), 0
+            else:
+                number, first_due, balance = 1, first, loan.principal_amount
+            periods = total - number + 1
+            if first_due < today:
+                # Laufender Kredit: ab der nächsten Fälligkeit mit aktuellem Saldo bis Laufzeitende
+                skipped, first_due = next_due(first_due, step, max(today, loan.next_payment_date or today), first.day)
+                number += skipped
+                if loan.current_balance is not None:
+                    balance = loan.current_balance
+                periods = total - number + 1
+                if loan.end_date:
+                    months = ((loan.end_date.year - first_due.year) * 12
+                              + loan.end_date.month - first_due.month)
+                    periods = min(periods, months // step + 1)
+            params["balance"].append(balance)
+            params["periods"].append(max(periods, 1))
+            params["first_due"].append(first_due)
+            params["fixed"].append(fixed)
+            params["number"].append(number)
+            params["rate"].append(float(loan.interest_rate or 0))
+            params["step"].append(step)
+            params["kind"].append(kind)
+            params["anchor"].append(first.day)
+        return params
+
+    def employee_loan_parameters(self, loans, resume: Dict, today: Optional[date] = None) -> dict:
+        """Eingaben für build_schedules() aus EmployeeLoan-Zeilen (monatliche Annuität)
+
+        Laufende Darlehen beginnen im aktuellen Abrechnungsmonat mit
+        amount_remaining - der Abzug erfolgt mit der Lohnabrechnung des Monats.
+        """
+        month_start = (today or date.today()).replace(day=1)
+        params = {key: [] for key in ("balance", "rate", "periods", "step", "first_due", "kind",
+                                      "fixed", "anchor", "number")}
+        for loan in loans:
+            anchor = loan.first_payment_date.day
+            settled = resume.get(loan.id)
+            if settled:
+                number, last_due, balance = settled
+                number, first_due, fixed = number + 1, add_months(last_due, 1, anchor), 0
+            else:
+                number, first_due, balance, fixed = 1, loan.first_payment_date, loan.principal_amount, loan.monthly_payment
+            if first_due < month_start:
+                skipped, first_due = next_due(first_due, 1, month_start, anchor)
+                number += skipped
+                if loan.amount_remaining is not None:
+                    balance = loan.amount_remaining
+            params["balance"].append(balance)
+            params["periods"].append(max(loan.term_months - number + 1, 1))
+            params["first_due"].append(first_due)
+            params["fixed"].append(fixed)
+            params["number"].append(number)
+            params["rate"].append(float(loan.interest_rate or 0))
+            params["step"].append(1)
+            params["kind"].append("annuity")
+            params["anchor"].append(anchor)
+        return params
+
+    def build(self, params: dict) -> Schedule:
+        return build_schedules(
+            _cents(params["balance"]), params["rate"], params["periods"], params["step"],
+            np.array(params["first_due"], dtype="datetime64[D]"), np.array(params["kind"]),
+            _cents(params["fixed"]), params["anchor"],
+        )
+
+    # ---------- Zeilen ----------
+
+    def _loan_payment_rows(self, tenant_id, loan_ids: List, params: dict, schedule: Schedule, now) -> List[dict]:
+        loans, ks = schedule.cells()
+        due = schedule.due[loans, ks].astype(date)
+        payment, principal = schedule.payment[loans, ks], schedule.principal[loans, ks]
+        interest, balance = schedule.interest[loans, ks], schedule.balance[loans, ks]
+        numbers = np.asarray(params["number"], dtype=np.int64)[loans] + ks
+        return [{
+            "id": uuid.uuid4(),
+            "tenant_id": tenant_id,
+            "loan_id": loan_ids[i],
+            "payment_number": int(numbers[n]),
+            "due_date": due[n],
+            "payment_amount": _decimal(payment[n]),
+            "principal_amount": _decimal(principal[n]),
+            "interest_amount": _decimal(interest[n]),
+            "fee_amount": Decimal(0),
+            "balance_before": _decimal(balance[n] + principal[n]),
+            "balance_after": _decimal(balance[n]),
+            "paid_amount": Decimal(0),
+            "status": "scheduled",
+            "created_at": now,
+            "updated_at": now,
+        } for n, i in enumerate(loans.tolist())]
+
+    def _installment_rows(self, tenant_id, loans_by_index: List, params: dict, schedule: Schedule,
+                          now) -> List[dict]:
+        loans, ks = schedule.cells()
+        due = schedule.due[loans, ks].astype(date)
+        payment, principal = schedule.payment[loans, ks], schedule.principal[loans, ks]
+        interest, balance = schedule.interest[loans, ks], schedule.balance[loans, ks]
+        numbers = np.asarray(params["number"], dtype=np.int64)[loans] + ks
+        return [{
+            "id": uuid.uuid4(),
+            "tenant_id": tenant_id,
+            "employee_loan_id": loans_by_index[i][0],
+            "employee_id": loans_by_index[i][1],
+            "installment_number": int(numbers[n]),
+            "due_date": due[n],
+            "payment_amount": _decimal(payment[n]),
+            "principal_amount": _decimal(principal[n]),
+            "interest_amount": _decimal(interest[n]),
+            "balance_after": _decimal(balance[n]),
+            "paid_amount": Decimal(0),
+            "status": "scheduled",
+            "created_at": now,
+            "updated_at": now,
+        } for n, i in enumerate(loans.tolist())]
+
+    def _update_next_payment(self, session, loan_ids: Sequence, now):
+        """next_payment_date der Kredite aus der ersten offenen Rate (ein Update)"""
+        next_due = (
+            select(func.min(LoanPayment.due_date))
+            .where(LoanPayment.loan_id == Loan.id, LoanPayment.status.in_(OPEN_STATUSES))
+            .scalar_subquery()
+        )
+        session.execute(
+            update(Loan).where(Loan.id.in_(loan_ids))
+            .values(next_payment_date=next_due, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+
+    # ---------- Erzeugen ----------
+
+    def generate(self, session, tenant_id, loan_ids: Optional[Sequence] = None,
+                 employee_loan_ids: Optional[Sequence] = None) -> dict:
+        """Tilgungspläne anlegen und committen
+
+        Ohne IDs: alle aktiven Darlehen des Mandanten, die noch keine offenen
+        Raten haben. Mit IDs: deren offene Raten werden neu berechnet.
+        """
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        try:
+            loan_query = select(Loan).where(
+                Loan.tenant_id == tenant_id,
+                Loan.is_deleted.is_(False),
+                Loan.status.in_(("pending", "active")),
+                Loan.loan_type.notin_(UNSCHEDULED_LOAN_TYPES),
+                Loan.principal_amount > 0,
+            )
+            employee_query = select(EmployeeLoan).where(
+                EmployeeLoan.tenant_id == tenant_id,
+                EmployeeLoan.is_deleted.is_(False),
+                EmployeeLoan.status.in_(EMPLOYEE_LOAN_STATUSES),
+                EmployeeLoan.principal_amount > 0,
+            )
+            if loan_ids is None and employee_loan_ids is None:
+                loan_query = loan_query.where(~exists().where(
+                    LoanPayment.loan_id == Loan.id, LoanPayment.status.in_(OPEN_STATUSES)
+                ))
+                employee_query = employee_query.where(~exists().where(
+                    EmployeeLoanInstallment.employee_loan_id == EmployeeLoan.id,
+                    EmployeeLoanInstallment.status.in_(OPEN_STATUSES),
+                ))
+            else:
+                loan_query = loan_query.where(Loan.id.in_(loan_ids or []))
+                employee_query = employee_query.where(EmployeeLoan.id.in_(employee_loan_ids or []))
+            loans = session.execute(loan_query.order_by(Loan.loan_number)).scalars().all()
+            employee_loans = session.execute(employee_query.order_by(EmployeeLoan.loan_number)).scalars().all()
+
+            ids = [loan.id for loan in loans]
+            employee_ids = [loan.id for loan in employee_loans]
+            if ids:
+                session.execute(
+                    delete(LoanPayment)
+                    .where(LoanPayment.loan_id.in_(ids), LoanPayment.status.in_(OPEN_STATUSES))
+                    .execution_options(synchronize_session=False)
+                )
+            if employee_ids:
+                session.execute(
+                    delete(EmployeeLoanInstallment)
+                    .where(EmployeeLoanInstallment.employee_loan_id.in_(employee_ids),
+                           EmployeeLoanInstallment.status.in_(OPEN_STATUSES))
+                    .execution_options(synchronize_session=False)
+                )
+
+            payment_rows, installment_rows = [], []
+            if ids:
+                resume = self._resume_points(session, LoanPayment, LoanPayment.loan_id,
+                                             LoanPayment.payment_number, ids)
+                params = self.loan_parameters(loans, resume)
+                payment_rows = self._loan_payment_rows(tenant_id, ids, params, self.build(params), now)
+            if employee_ids:
+                resume = self._resume_points(session, EmployeeLoanInstallment, EmployeeLoanInstallment.employee_loan_id,
+                                             EmployeeLoanInstallment.installment_number, employee_ids)
+                params = self.employee_loan_parameters(employee_loans, resume)
+                installment_rows = self._installment_rows(
+                    tenant_id, [(loan.id, loan.employee_id) for loan in employee_loans],
+                    params, self.build(params), now
+                )
+
+            if payment_rows:
+                session.execute(insert(LoanPayment), payment_rows)
+            if installment_rows:
+                session.execute(insert(EmployeeLoanInstallment), installment_rows)
+            if ids:
+                self._update_next_payment(session, ids, now)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return {
+            "loans": len(ids),
+            "employee_loans": len(employee_ids),
+            "installments": len(payment_rows) + len(installment_rows),
+            "seconds": time.perf_counter() - started,
+        }
+
+    # ---------- Zahlungen ----------
+
+    def record_payment(self, session, installment_id, amount, payment_date: Optional[date] = None,
+                       employee_loan: bool = False, payslip_id=None) -> dict:
+        """Zahlung auf eine Rate buchen; bei Abweichung den offenen Restplan neu berechnen (nur flush)"""
+        table = EmployeeLoanInstallment if employee_loan else LoanPayment
+        loan_column = table.employee_loan_id if employee_loan else table.loan_id
+        number_column = table.installment_number if employee_loan else table.payment_number
+        now = datetime.utcnow()
+        amount = Decimal(str(amount))
+
+        row = session.execute(select(table).where(table.id == installment_id).with_for_update()).scalar_one()
+        if row.status not in OPEN_STATUSES:
+            raise ValueError(f"Rate {getattr(row, number_column.key)} ist bereits erledigt ({row.status})")
+        loan_id = getattr(row, loan_column.key)
+        number = getattr(row, number_column.key)
+        fee = Decimal(0) if employee_loan else (row.fee_amount or Decimal(0))
+        scheduled = row.payment_amount + fee
+        balance_before = row.balance_after + row.principal_amount
+
+        # Zinsen und Gebühr zuerst, der Rest tilgt
+        row.principal_amount = min(amount - row.interest_amount - fee, balance_before)
+        row.payment_amount = amount - fee
+        row.balance_after = max(balance_before - row.principal_amount, Decimal(0))
+        row.paid_amount = amount
+        row.payment_date = payment_date or date.today()
+        row.status = "paid"
+        if employee_loan:
+            row.payslip_id = payslip_id
+        session.flush()
+
+        rescheduled = 0
+        if amount != scheduled:
+            tail = session.execute(
+                select(func.count(), func.min(table.due_date))
+                .where(loan_column == loan_id, number_column > number, table.status.in_(OPEN_STATUSES))
+            ).one()
+            session.execute(
+                delete(table)
+                .where(loan_column == loan_id, number_column > number, table.status.in_(OPEN_STATUSES))
+                .execution_options(synchronize_session=False)
+            )
+            if row.balance_after > 0:
+                # Restplan ab der bezahlten Rate - auch wenn sie überfällig war
+                resume = {loan_id: (number, row.due_date, row.balance_after)}
+                if employee_loan:
+                    loan = session.get(EmployeeLoan, loan_id)
+                    params = self.employee_loan_parameters([loan], resume, today=row.due_date)
+                else:
+                    loan = session.get(Loan, loan_id)
+                    params = self.loan_parameters([loan], resume, today=row.due_date)
+                # Restlaufzeit beibehalten: so viele Raten wie zuvor offen waren
+                params["periods"] = [max(tail[0], 1)]
+                if tail[1] is not None:
+                    params["first_due"] = [tail[1]]
+                schedule = self.build(params)
+                if employee_loan:
+                    rows = self._installment_rows(row.tenant_id, [(loan_id, row.employee_id)], params, schedule, now)
+                else:
+                    rows = self._loan_payment_rows(row.tenant_id, [loan_id], params, schedule, now)
+                if rows:
+                    session.execute(insert(table), rows)
+                rescheduled = len(rows)
+
+        open_rows = exists().where(loan_column == loan_id, table.status.in_(OPEN_STATUSES))
+        if employee_loan:
+            session.execute(
+                update(EmployeeLoan).where(EmployeeLoan.id == loan_id)
+                .values(
+                    amount_repaid=func.coalesce(EmployeeLoan.amount_repaid, 0) + row.principal_amount,
+                    interest_paid=func.coalesce(EmployeeLoan.interest_paid, 0) + row.interest_amount,
+                    amount_remaining=row.balance_after,
+                    status=case((open_rows, "active"), else_="repaid"),
+                    updated_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            session.execute(
+                update(Loan).where(Loan.id == loan_id)
+                .values(
+                    current_balance=row.balance_after,
+                    status=case((open_rows, Loan.status), else_="paid_off"),
+                    updated_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            self._update_next_payment(session, [loan_id], now)
+        session.flush()
+        return {"balance": row.balance_after, "deviation": amount - scheduled, "rescheduled": rescheduled}
+
+    # ---------- Abfragen ----------
+
+    def debt_service(self, session, tenant_id, start: date, end: date, by_loan: bool = False):
+        """Offene Kreditraten mit Fälligkeit in [start, end]: Rate, Tilgung, Zinsen (Index ix_loan_payments_open_due)"""
+        columns = (
+            func.coalesce(func.sum(LoanPayment.payment_amount + func.coalesce(LoanPayment.fee_amount, 0)
+                                   - func.coalesce(LoanPayment.paid_amount, 0)), 0).label("payment"),
+            func.coalesce(func.sum(LoanPayment.principal_amount), 0).label("principal"),
+            func.coalesce(func.sum(LoanPayment.interest_amount), 0).label("interest"),
+            func.count().label("installments"),
+        )
+        query = select(*columns).where(
+            LoanPayment.tenant_id == tenant_id,
+            LoanPayment.due_date.between(start, end),
+            LoanPayment.status.in_(OPEN_STATUSES),
+        )
+        if by_loan:
+            rows = session.execute(
+                query.add_columns(LoanPayment.loan_id).group_by(LoanPayment.loan_id)
+            ).all()
+            return {row.loan_id: row for row in rows}
+        return session.execute(query).one()
+
+    def employee_deductions(self, session, tenant_id, start: date, end: date,
+                            employee_ids: Optional[Sequence] = None) -> List:
+        """Fällige Darlehensraten je Mitarbeiterdarlehen in [start, end] (Index ix_employee_loan_installments_open_due)"""
+        query = (
+            select(
+                EmployeeLoanInstallment.employee_loan_id,
+                EmployeeLoanInstallment.employee_id,
+                func.sum(EmployeeLoanInstallment.payment_amount
+                         - func.coalesce(EmployeeLoanInstallment.paid_amount, 0)).label("amount"),
+            )
+            .where(
+                EmployeeLoanInstallment.tenant_id == tenant_id,
+                EmployeeLoanInstallment.due_date.between(start, end),
+                EmployeeLoanInstallment.status.in_(OPEN_STATUSES),
+            )
+            .group_by(EmployeeLoanInstallment.employee_loan_id, EmployeeLoanInstallment.employee_id)
+        )
+        if employee_ids is not None:
+            query = query.where(EmployeeLoanInstallment.employee_id.in_(employee_ids))
+        return session.execute(query).all()
+
+    def employee_loan_deduction(self, tenant_id, start: date, end: date):
+        """SQL-Ausdruck (Spalte, Subquery) für den Lohnabzug je EmployeeLoan in [start, end]
+
+        Darlehen mit Tilgungsplan: Summe der fälligen Raten; ohne Plan: die
+        vereinbarte Monatsrate, höchstens die Restschuld.
+        """
+        due = (
+            select(
+                EmployeeLoanInstallment.employee_loan_id,
+                func.sum(EmployeeLoanInstallment.payment_amount
+                         - func.coalesce(EmployeeLoanInstallment.paid_amount, 0)).label("amount"),
+            )
+            .where(
+                EmployeeLoanInstallment.tenant_id == tenant_id,
+                EmployeeLoanInstallment.due_date.between(start, end),
+                EmployeeLoanInstallment.status.in_(OPEN_STATUSES),
+            )
+            .group_by(EmployeeLoanInstallment.employee_loan_id)
+            .subquery()
+        )
+        has_schedule = exists().where(EmployeeLoanInstallment.employee_loan_id == EmployeeLoan.id)
+        amount = case(
+            (has_schedule, func.coalesce(due.c.amount, 0)),
+            else_=func.least(EmployeeLoan.monthly_payment, EmployeeLoan.amount_remaining),
+        )
+        return amount, due
+
+
+# Global instance
+_loan_schedule_service = None
+
+
+def get_loan_schedule_service() -> LoanScheduleService:
+    """Get global loan schedule service instance"""
+    global _loan_schedule_service
+    if _loan_schedule_service is None:
+        _loan_schedule_service = LoanScheduleService()
+    return _loan_schedule_service
@@ -0,0 +1,150 @@
+"""
+Lookup-Daten für Auswahlfelder - Kunden, Aufträge, Projekte, Mitarbeiter
+
+Dialoge brauchen für ihre Comboboxen nur (id, Nummer, Anzeigename). Der
+Dienst hält diese Tupel je Mandant im Speicher und lädt sie nur neu, wenn
+sich der Änderungsstempel (Zeilenzahl, letztes updated_at) der Tabelle
+geändert hat. Der Stempel wird höchstens alle STAMP_INTERVAL Sekunden
+geprüft; eigene Änderungen markieren die Daten beim Commit sofort als
+veraltet. Jeder Neuaufbau erhöht die Version, an der die UI ihre
+Combo-Modelle wiederverwendet.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from sqlalchemy import event
+
+from app.services.query_registry import registry
+from shared.models import Customer, Order, Project, Employee
+
+
+# Lookup-Art -> Modell; Abfragen "<art>.lookup" / "<art>.stamp" in der Query-Registry
+LOOKUP_MODELS = {
+    "customers": Customer,
+    "orders": Order,
+    "projects": Project,
+    "employees": Employee,
+}
+
+# Sekunden, in denen ein geladener Stand ohne Stempelprüfung verwendet wird
+STAMP_INTERVAL = 30
+
+_PENDING_KEY = "_lookup_pending"
+
+
+@dataclass(frozen=True)
+class LookupEntry:
+    """Ein Eintrag eines Auswahlfelds"""
+    id: object
+    number: str
+    name: str
+
+    @property
+    def label(self) -> str:
+        if self.number and self.name:
+            return f"{self.number} - {self.name}"
+        return self.number or self.name or ""
+
+
+@dataclass
+class LookupData:
+    """Geladener Stand einer Lookup-Art für einen Mandanten"""
+    kind: str
+    tenant_id: object
+    version: int
+    entries: Tuple[LookupEntry, ...]
+    stamp: tuple
+    checked_at: float
+    stale: bool = False
+
+
+class LookupService:
+    """Versionierter In-Memory-Stand der Auswahllisten je Mandant"""
+
+    def __init__(self):
+        self._registered = set()
+        self._lock = threading.Lock()
+        self._data: Dict[tuple, LookupData] = {}
+
+    # ============== EVENT-ANBINDUNG ==============
+
+    def register(self, session_factory):
+        """Session-Events einer sessionmaker-Instanz abonnieren (mehrfach aufrufbar)"""
+        if id(session_factory) in self._registered:
+            return
+        self._registered.add(id(session_factory))
+        event.listen(session_factory, "after_flush", self._after_flush)
+        event.listen(session_factory, "after_commit", self._after_commit)
+        event.listen(session_factory, "after_soft_rollback", self._after_rollback)
+
+    def _after_flush(self, session, flush_context):
+        pending = session.info.setdefault(_PENDING_KEY, set())
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            for kind, model in LOOKUP_MODELS.items():
+                if isinstance(obj, model):
+                    pending.add(kind)
+
+    def _after_commit(self, session):
+        kinds = session.info.pop(_PENDING_KEY, None)
+        if kinds:
+            self.invalidate(*kinds)
+
+    def _after_rollback(self, session, previous_transaction):
+        if previous_transaction.parent is None:
+            session.info.pop(_PENDING_KEY, None)
+
+    def invalidate(self, *kinds):
+        """Stände der Lookup-Arten (alle Mandanten) beim nächsten Zugriff neu laden"""
+        with self._lock:
+            for data in self._data.values():
+                if not kinds or data.kind in kinds:
+                    data.stale = True
+
+    # ============== ZUGRIFF ==============
+
+    def get(self, session, kind: str, tenant_id=None) -> LookupData:
+        """Aktueller Stand einer Lookup-Art; lädt nur bei geändertem Stempel"""
+        if kind not in LOOKUP_MODELS:
+            raise ValueError(f"Unbekannte Lookup-Art: {kind}")
+        key = (kind, tenant_id)
+        with self._lock:
+            data = self._data.get(key)
+        now = time.monotonic()
+        if data and not data.stale and now - data.checked_at < STAMP_INTERVAL:
+            return data
+
+        # Stempel vor den Daten lesen: eine Änderung dazwischen fällt beim nächsten Vergleich auf
+        stamp = tuple(registry.execute(session, f"{kind}.stamp", tenant_id=tenant_id).one())
+        if data and not data.stale and data.stamp == stamp:
+            data.checked_at = now
+            return data
+
+        entries = tuple(
+            LookupEntry(row[0], row[1] or "", row[2] or "")
+            for row in registry.execute(session, f"{kind}.lookup", tenant_id=tenant_id)
+        )
+        fresh = LookupData(
+            kind=kind,
+            tenant_id=tenant_id,
+            version=(data.version + 1) if data else 1,
+            entries=entries,
+            stamp=stamp,
+            checked_at=now,
+        )
+        with self._lock:
+            self._data[key] = fresh
+        return fresh
+
+
+# Global instance
+_lookup_service = None
+
+
+def get_lookup_service() -> LookupService:
+    """Get global lookup service instance"""
+    global _lookup_service
+    if _lookup_service is None:
+        _lookup_service = LookupService()
+    return _lookup_service
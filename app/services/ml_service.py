@@ -0,0 +1,700 @@
+"""
+ML-Service - Kosten- und Mängelprognosen für Projekte, Kundenwert
+
+Die Merkmale eines Projekts (Flächen, Holzvolumen, Geschosse, Projekttyp,
+Bauweise, ...) werden mit einer Abfrage für alle Projekte gleichzeitig
+berechnet - kategoriale Werte als One-Hot-Spalten direkt in SQL - und als
+Matrix in ein NumPy-Array übernommen.
+
+Modelle:
+- Kosten: Ridge-Regression auf log(Ist-Kosten) abgeschlossener Projekte
+- Mängel: logistische Regression (L2) auf "Projekt hatte einen Mangel"
+
+Trainierte Modelle werden je Mandant versioniert unter MODEL_DIR abgelegt
+(<mandant>/v0001/ ... als .npy + meta.json) und erst beim ersten Zugriff per
+np.load(mmap_mode='r') eingeblendet. Das Training läuft in einem eigenen
+Prozess und blockiert die Oberfläche nicht. Vorhersagen für alle offenen
+Projekte werden als Batch (eine Matrixmultiplikation) berechnet und
+zwischengespeichert; die Insights-Seite liest nur diesen Stand.
+"""
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from datetime import datetime, date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, case, cast, func, exists, Float, DateTime
+
+from app.services.project_cost_service import sql_number, parse_number
+from shared.models import Project, ProjectCostSummary, Defect, Invoice
+from shared.models.project import ProjectType, ProjectStatus, ConstructionType
+from shared.models.invoice import InvoiceType, InvoiceStatus
+
+
+MODEL_DIR = Path(os.environ.get(
+    "HOLZBAU_MODEL_DIR",
+    Path.home() / ".holzbau_erp" / "models"
+))
+
+# Ältere Versionen werden nach einem Training entfernt
+KEEP_VERSIONS = 3
+
+# Ab diesem Alter wird beim Öffnen der Insights-Seite neu trainiert
+MODEL_MAX_AGE_DAYS = 7
+
+# Sekunden, die ein Vorhersage-Stand ohne Neuberechnung gilt
+PREDICTION_TTL = 600
+
+# Mindestanzahl abgeschlossener Projekte für ein Modell
+MIN_TRAINING_SAMPLES = 8
+
+RIDGE_ALPHA = 1.0
+LOGISTIC_ALPHA = 1.0
+LOGISTIC_ITERATIONS = 25
+
+# Z-Wert des 90%-Intervalls der Kostenprognose
+INTERVAL_Z = 1.645
+
+COMPLETED_STATUSES = (ProjectStatus.FERTIG, ProjectStatus.GEWAEHRLEISTUNG)
+CLOSED_STATUSES = COMPLETED_STATUSES + (ProjectStatus.ABGELEHNT, ProjectStatus.STORNIERT)
+
+# Text-Spalten mit Zahlenwerten (log1p-skaliert)
+AREA_FEATURES = (
+    "gross_floor_area", "living_space", "roof_area", "facade_area",
+    "wood_volume_m3", "planned_hours_total",
+)
+# Integer-Spalten
+COUNT_FEATURES = ("floors_above_ground", "floors_below_ground", "module_count")
+
+COMPLEXITY_LEVELS = {"low": 0.0, "medium": 1.0, "high": 2.0}
+
+FEATURE_NAMES = (
+    AREA_FEATURES
+    + COUNT_FEATURES
+    + ("complexity",)
+    + tuple(f"type_{t.value}" for t in ProjectType)
+    + tuple(f"construction_{c.value}" for c in ConstructionType)
+)
+_LOG_COLUMNS = len(AREA_FEATURES)
+
+FEATURE_LABELS = {
+    "gross_floor_area": "Bruttogrundfläche",
+    "living_space": "Wohnfläche",
+    "roof_area": "Dachfläche",
+    "facade_area": "Fassadenfläche",
+    "wood_volume_m3": "Holzvolumen",
+    "planned_hours_total": "Geplante Stunden",
+    "floors_above_ground": "Vollgeschosse",
+    "floors_below_ground": "Kellergeschosse",
+    "module_count": "Anzahl Elemente",
+    "complexity": "Komplexität",
+}
+FEATURE_LABELS.update({f"type_{t.value}": f"Projekttyp {t.name.title()}" for t in ProjectType})
+FEATURE_LABELS.update({f"construction_{c.value}": f"Bauweise {c.name.title()}" for c in ConstructionType})
+
+
+# ============== MERKMALE ==============
+
+def feature_columns() -> list:
+    """SQL-Ausdrücke der Merkmale in der Reihenfolge von FEATURE_NAMES"""
+    columns = [cast(sql_number(getattr(Project, name)), Float) for name in AREA_FEATURES]
+    columns += [cast(func.coalesce(getattr(Project, name), 0), Float) for name in COUNT_FEATURES]
+    columns.append(cast(case(COMPLEXITY_LEVELS, value=func.lower(Project.complexity), else_=1.0), Float))
+    columns += [cast(case((Project.project_type == t, 1.0), else_=0.0), Float) for t in ProjectType]
+    columns += [cast(case((Project.construction_type == c, 1.0), else_=0.0), Float) for c in ConstructionType]
+    return columns
+
+
+def features_from_dict(data: dict) -> np.ndarray:
+    """Merkmalsvektor aus Formulardaten - gleiche Regeln wie feature_columns()"""
+    row = [float(parse_number(data.get(name))) for name in AREA_FEATURES]
+    row += [float(data.get(name) or 0) for name in COUNT_FEATURES]
+    row.append(COMPLEXITY_LEVELS.get(str(data.get("complexity") or "").lower(), 1.0))
+    project_type = _enum_value(data.get("project_type"))
+    construction_type = _enum_value(data.get("construction_type"))
+    row += [1.0 if project_type == t.value else 0.0 for t in ProjectType]
+    row += [1.0 if construction_type == c.value else 0.0 for c in ConstructionType]
+    return _transform(np.array([row], dtype=np.float64))
+
+
+def _enum_value(value) -> Optional[str]:
+    """'NEUBAU', 'neubau' oder ProjectType.NEUBAU -> 'neubau'"""
+    if value is None:
+        return None
+    if hasattr(value, "value"):
+        return value.value
+    return str(value).lower()
+
+
+def _transform(x: np.ndarray) -> np.ndarray:
+    """Flächen/Volumen logarithmisch skalieren (in place)"""
+    x[:, :_LOG_COLUMNS] = np.log1p(np.maximum(x[:, :_LOG_COLUMNS], 0.0))
+    return x
+
+
+def _scope(stmt, tenant_id):
+    stmt = stmt.where(Project.is_deleted == False)
+    if tenant_id is not None:
+        stmt = stmt.where(Project.tenant_id == tenant_id)
+    return stmt
+
+
+def _cost_target():
+    """Ist-Kosten: Übersicht (Lohn + Material) plus Fremdleistungen, sonst die Projekt-Felder"""
+    summary = (
+        func.coalesce(ProjectCostSummary.labor_cost, 0)
+        + func.coalesce(ProjectCostSummary.material_cost, 0)
+        + sql_number(Project.actual_cost_external)
+    )
+    manual = (
+        sql_number(Project.actual_cost_materials)
+        + sql_number(Project.actual_cost_labor)
+        + sql_number(Project.actual_cost_external)
+    )
+    return cast(func.greatest(summary, manual), Float)
+
+
+def _has_defect():
+    return exists().where(Defect.project_id == Project.id, Defect.is_deleted == False)
+
+
+def load_training_data(session, tenant_id=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merkmale, Ist-Kosten und Mängel-Kennzeichen aller abgeschlossenen Projekte"""
+    stmt = _scope(
+        select(_cost_target(), cast(case((_has_defect(), 1.0), else_=0.0), Float), *feature_columns())
+        .select_from(Project)
+        .outerjoin(ProjectCostSummary, ProjectCostSummary.project_id == Project.id)
+        .where(Project.status.in_(COMPLETED_STATUSES)),
+        tenant_id
+    )
+    data = np.array(session.execute(stmt).all(), dtype=np.float64).reshape(-1, 2 + len(FEATURE_NAMES))
+    return _transform(data[:, 2:]), data[:, 0], data[:, 1]
+
+
+def load_open_projects(session, tenant_id=None, project_ids=None) -> Tuple[list, np.ndarray]:
+    """(Kopfdaten, Merkmalsmatrix) der offenen Projekte - eine Abfrage"""
+    budget = (
+        sql_number(Project.budget_materials) + sql_number(Project.budget_labor)
+        + sql_number(Project.budget_external) + sql_number(Project.budget_other)
+    )
+    stmt = _scope(
+        select(Project.id, Project.project_number, Project.name, Project.status,
+               cast(budget, Float), *feature_columns())
+        .order_by(Project.project_number),
+        tenant_id
+    )
+    if project_ids is not None:
+        stmt = stmt.where(Project.id.in_(list(project_ids)))
+    else:
+        stmt = stmt.where(Project.status.notin_(CLOSED_STATUSES))
+    rows = session.execute(stmt).all()
+    heads = [tuple(row[:5]) for row in rows]
+    x = np.array([row[5:] for row in rows], dtype=np.float64).reshape(-1, len(FEATURE_NAMES))
+    return heads, _transform(x)
+
+
+# ============== TRAINING ==============
+
+def _standardize(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    mean = x.mean(axis=0) if len(x) else np.zeros(x.shape[1])
+    scale = x.std(axis=0) if len(x) else np.ones(x.shape[1])
+    scale[scale == 0] = 1.0
+    return mean, scale
+
+
+def _design(x: np.ndarray, mean, scale) -> np.ndarray:
+    """Standardisierte Matrix mit Achsenabschnitt in Spalte 0"""
+    return np.hstack([np.ones((len(x), 1)), (x - mean) / scale])
+
+
+def fit_ridge(z: np.ndarray, y: np.ndarray, alpha: float = RIDGE_ALPHA) -> np.ndarray:
+    penalty = alpha * np.eye(z.shape[1])
+    penalty[0, 0] = 0.0
+    return np.linalg.solve(z.T @ z + penalty, z.T @ y)
+
+
+def fit_logistic(z: np.ndarray, y: np.ndarray, alpha: float = LOGISTIC_ALPHA,
+                 iterations: int = LOGISTIC_ITERATIONS) -> np.ndarray:
+    """L2-regularisierte logistische Regression per Newton-Verfahren (IRLS)"""
+    coef = np.zeros(z.shape[1])
+    # Geglättete Grundrate als Startwert, damit auch einklassige Daten stabil bleiben
+    rate = (y.sum() + 1.0) / (len(y) + 2.0)
+    coef[0] = math.log(rate / (1.0 - rate))
+    if y.min() == y.max():
+        return coef
+    penalty = alpha * np.eye(z.shape[1])
+    penalty[0, 0] = 0.0
+    for _ in range(iterations):
+        p = _sigmoid(z @ coef)
+        gradient = z.T @ (p - y) + penalty @ coef
+        hessian = (z * (p * (1.0 - p))[:, None]).T @ z + penalty + 1e-9 * np.eye(z.shape[1])
+        step = np.linalg.solve(hessian, gradient)
+        coef -= step
+        if np.abs(step).max() < 1e-6:
+            break
+    return coef
+
+
+def _sigmoid(v: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(v, -35.0, 35.0)))
+
+
+def train_models(x: np.ndarray, cost: np.ndarray, defect: np.ndarray) -> Tuple[Dict[str, np.ndarray], dict]:
+    """Beide Modelle auf den Trainingsdaten anpassen -> (Arrays, Metadaten)"""
+    mean, scale = _standardize(x)
+    z = _design(x, mean, scale)
+    arrays = {"mean": mean, "scale": scale}
+    meta = {"feature_names": list(FEATURE_NAMES), "samples": int(len(x))}
+
+    with_cost = cost > 0
+    if with_cost.sum() >= MIN_TRAINING_SAMPLES:
+        y = np.log(cost[with_cost])
+        coef = fit_ridge(z[with_cost], y)
+        residuals = y - z[with_cost] @ coef
+        variance = y.var()
+        arrays["cost_coef"] = coef
+        meta["cost_samples"] = int(with_cost.sum())
+        meta["cost_sigma"] = float(residuals.std())
+        meta["cost_r2"] = float(1.0 - residuals.var() / variance) if variance > 0 else 0.0
+
+    if len(x) >= MIN_TRAINING_SAMPLES:
+        arrays["defect_coef"] = fit_logistic(z, defect)
+        meta["defect_samples"] = int(len(x))
+        meta["defect_rate"] = float(defect.mean())
+    return arrays, meta
+
+
+# ============== PERSISTENZ ==============
+
+def tenant_dir(tenant_id, root: Path = None) -> Path:
+    return Path(root or MODEL_DIR) / (str(tenant_id) if tenant_id is not None else "default")
+
+
+def _versions(directory: Path) -> List[int]:
+    if not directory.is_dir():
+        return []
+    return sorted(
+        int(entry.name[1:]) for entry in directory.iterdir()
+        if entry.is_dir() and entry.name[:1] == "v" and entry.name[1:].isdigit()
+        and (entry / "meta.json").exists()
+    )
+
+
+def save_model(directory: Path, arrays: Dict[str, np.ndarray], meta: dict) -> int:
+    """Neue Version schreiben (erst vollständig, dann per Umbenennen sichtbar)"""
+    directory.mkdir(parents=True, exist_ok=True)
+    versions = _versions(directory)
+    version = (versions[-1] + 1) if versions else 1
+    target = directory / f"v{version:04d}"
+    staging = directory / f".v{version:04d}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    for name, array in arrays.items():
+        np.save(staging / f"{name}.npy", np.ascontiguousarray(array, dtype=np.float64))
+    meta = dict(meta, version=version, trained_at=datetime.now().isoformat(timespec="seconds"))
+    (staging / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    os.replace(staging, target)
+
+    for old in versions[:-(KEEP_VERSIONS - 1) or None]:
+        shutil.rmtree(directory / f"v{old:04d}", ignore_errors=True)
+    return version
+
+
+@dataclass
+class TrainedModel:
+    """Eine geladene Modellversion; Arrays sind speichergemappt"""
+    version: int
+    path: Path
+    meta: dict
+    arrays: Dict[str, np.ndarray]
+
+    @property
+    def trained_at(self) -> Optional[datetime]:
+        value = self.meta.get("trained_at")
+        return datetime.fromisoformat(value) if value else None
+
+    @property
+    def has_cost(self) -> bool:
+        return "cost_coef" in self.arrays
+
+    @property
+    def has_defect(self) -> bool:
+        return "defect_coef" in self.arrays
+
+    def design(self, x: np.ndarray) -> np.ndarray:
+        return _design(x, self.arrays["mean"], self.arrays["scale"])
+
+
+def load_model(directory: Path) -> Optional[TrainedModel]:
+    """Neueste Version laden; passt das Merkmalsschema nicht mehr, gilt sie als fehlend"""
+    versions = _versions(directory)
+    if not versions:
+        return None
+    path = directory / f"v{versions[-1]:04d}"
+    meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+    if meta.get("feature_names") != list(FEATURE_NAMES):
+        return None
+    arrays = {entry.stem: np.load(entry, mmap_mode="r") for entry in path.glob("*.npy")}
+    return TrainedModel(version=versions[-1], path=path, meta=meta, arrays=arrays)
+
+
+def _train_process(db_url: str, tenant_id, root: str, connect_args: dict = None) -> Optional[int]:
+    """Einstiegspunkt des Trainingsprozesses: eigene Verbindung, trainieren, speichern
+
+    connect_args entsprechen denen der Hauptanwendung (SSL). Bei zu wenigen
+    abgeschlossenen Projekten wird keine Version gespeichert (Rückgabe None).
+    """
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from sqlalchemy.pool import NullPool
+
+    engine = create_engine(db_url, poolclass=NullPool, connect_args=connect_args or {})
+    try:
+        with Session(engine) as session:
+            x, cost, defect = load_training_data(session, tenant_id)
+    finally:
+        engine.dispose()
+    if len(x) < MIN_TRAINING_SAMPLES:
+        return None
+    arrays, meta = train_models(x, cost, defect)
+    return save_model(tenant_dir(tenant_id, Path(root)), arrays, meta)
+
+
+# ============== VORHERSAGEN ==============
+
+@dataclass
+class ProjectPrediction:
+    """Prognose für ein offenes Projekt"""
+    project_id: object
+    project_number: str
+    name: str
+    status: object
+    budget: float
+    cost: Optional[float] = None
+    range_min: Optional[float] = None
+    range_max: Optional[float] = None
+    defect_probability: Optional[float] = None
+    factors: List[Tuple[str, float]] = field(default_factory=list)
+
+    @property
+    def cost_deviation(self) -> Optional[float]:
+        """Prognose gegenüber Budget (0.1 = 10 % über Budget)"""
+        if self.cost is None or not self.budget:
+            return None
+        return self.cost / self.budget - 1.0
+
+
+@dataclass
+class PredictionSet:
+    """Vorhersagen aller offenen Projekte eines Mandanten"""
+    model_version: Optional[int]
+    computed_at: datetime
+    projects: List[ProjectPrediction]
+    loaded_at: float = 0.0
+
+
+def _defect_factors(model: TrainedModel, x: np.ndarray, z: np.ndarray, top: int = 3) -> List[List[Tuple[str, float]]]:
+    """Je Zeile die vorhandenen Merkmale mit dem größten Beitrag zum Mängelrisiko"""
+    contributions = z[:, 1:] * np.asarray(model.arrays["defect_coef"][1:])
+    # Nicht gesetzte Merkmale (z.B. ein anderer Projekttyp) sind kein Grund für das Risiko
+    contributions[x == 0] = 0.0
+    order = np.argsort(-contributions, axis=1)[:, :top]
+    return [
+        [(FEATURE_LABELS.get(FEATURE_NAMES[i], FEATURE_NAMES[i]), float(row[i]))
+         for i in idx if row[i] > 0]
+        for row, idx in zip(contributions, order)
+    ]
+
+
+def _confidence(model: TrainedModel) -> float:
+    """Bestimmtheitsmaß, gedämpft bei wenigen Trainingsprojekten"""
+    r2 = max(0.0, min(1.0, model.meta.get("cost_r2", 0.0)))
+    return round(r2 * min(1.0, model.meta.get("cost_samples", 0) / 50.0), 3)
+
+
+def predict_batch(model: Optional[TrainedModel], heads: list, x: np.ndarray) -> List[ProjectPrediction]:
+    """Kosten und Mängelrisiko für alle Zeilen auf einmal"""
+    predictions = [ProjectPrediction(*head[:4], budget=head[4] or 0.0) for head in heads]
+    if model is None or not len(x):
+        return predictions
+    z = model.design(x)
+    if model.has_cost:
+        log_cost = z @ np.asarray(model.arrays["cost_coef"])
+        spread = INTERVAL_Z * model.meta.get("cost_sigma", 0.0)
+        costs, lows, highs = np.exp(log_cost), np.exp(log_cost - spread), np.exp(log_cost + spread)
+        for prediction, cost, low, high in zip(predictions, costs, lows, highs):
+            prediction.cost, prediction.range_min, prediction.range_max = float(cost), float(low), float(high)
+    if model.has_defect:
+        probabilities = _sigmoid(z @ np.asarray(model.arrays["defect_coef"]))
+        for prediction, probability, factors in zip(predictions, probabilities, _defect_factors(model, x, z)):
+            prediction.defect_probability = float(probability)
+            prediction.factors = factors
+    return predictions
+
+
+# ============== SERVICE ==============
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Ein Trainingsprozess für die ganze Anwendung"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _reset_executor():
+    """Abgestürzten Pool verwerfen; das nächste Training startet einen neuen Prozess"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+class MLService:
+    """Prognosen eines Mandanten aus dem zuletzt trainierten Modell"""
+
+    def __init__(self, db_service, tenant_id=None, model_root: Path = None):
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+        self.directory = tenant_dir(tenant_id, model_root)
+        self._lock = threading.Lock()
+        self._model: Optional[TrainedModel] = None
+        self._model_loaded = False
+        self._predictions: Optional[PredictionSet] = None
+        self._training = None
+        self._insufficient_data = False  # letztes Training mangels Daten übersprungen
+        self.last_error: Optional[str] = None
+
+    # ============== MODELL ==============
+
+    @property
+    def model(self) -> Optional[TrainedModel]:
+        """Neueste Modellversion, beim ersten Zugriff geladen"""
+        with self._lock:
+            if not self._model_loaded:
+                try:
+                    self._model = load_model(self.directory)
+                except (OSError, ValueError) as e:
+                    print(f"ML-Modell konnte nicht geladen werden: {e}")
+                    self._model = None
+                self._model_loaded = True
+            return self._model
+
+    def needs_training(self) -> bool:
+        if self._insufficient_data:
+            return False
+        model = self.model
+        if model is None or model.trained_at is None:
+            return True
+        return (datetime.now() - model.trained_at).days >= MODEL_MAX_AGE_DAYS
+
+    @property
+    def is_training(self) -> bool:
+        return self._training is not None and not self._training.done()
+
+    def retrain(self, wait: bool = False):
+        """Training im Hintergrundprozess starten (läuft bereits eins, wird es weiterverwendet)"""
+        with self._lock:
+            if self._training is None or self._training.done():
+                engine = self.db_service.user_engine
+                if engine is None:
+                    return None
+                self.last_error = None
+                db_url = engine.url.render_as_string(hide_password=False)
+                self._training = _get_executor().submit(
+                    _train_process, db_url, self.tenant_id, str(self.directory.parent),
+                    self.db_service.connect_args(db_url)
+                )
+                self._training.add_done_callback(self._on_trained)
+            future = self._training
+        return future.result() if wait else future
+
+    def _on_trained(self, future):
+        try:
+            version = future.result()
+            if version is None:
+                self._insufficient_data = True
+                print(f"ML-Training übersprungen: weniger als {MIN_TRAINING_SAMPLES} abgeschlossene Projekte")
+                return
+            self._insufficient_data = False
+            print(f"ML-Modell v{version} trainiert ({self.directory})")
+        except BrokenProcessPool as e:
+            _reset_executor()
+            self.last_error = str(e)
+            print(f"ML-Trainingsprozess abgebrochen: {e}")
+            return
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"ML-Training fehlgeschlagen: {e}")
+            return
+        with self._lock:
+            self._model_loaded = False
+            self._predictions = None
+
+    # ============== BATCH-VORHERSAGEN ==============
+
+    def get_predictions(self, session=None, refresh: bool = False) -> PredictionSet:
+        """Vorhersagen aller offenen Projekte; aus dem Zwischenspeicher, solange gültig"""
+        cached = self._predictions
+        if (cached and not refresh and time.monotonic() - cached.loaded_at < PREDICTION_TTL):
+            return cached
+
+        own_session = session is None
+        session = session or self.db_service.get_session()
+        if session is None:
+            return cached or PredictionSet(None, datetime.now(), [])
+        try:
+            heads, x = load_open_projects(session, self.tenant_id)
+        finally:
+            if own_session:
+                session.close()
+        model = self.model
+        predictions = PredictionSet(
+            model_version=model.version if model else None,
+            computed_at=datetime.now(),
+            projects=predict_batch(model, heads, x),
+            loaded_at=time.monotonic(),
+        )
+        self._predictions = predictions
+        return predictions
+
+    def cached_predictions(self) -> Optional[PredictionSet]:
+        return self._predictions
+
+    # ============== EINZELABFRAGEN (API) ==============
+
+    def predict_project_cost(self, project_data: dict) -> dict:
+        """Kostenprognose aus Projektdaten -> cost, confidence, range_min, range_max"""
+        model = self.model
+        if model is None or not model.has_cost:
+            return {"cost": None, "confidence": 0.0, "range_min": None, "range_max": None}
+        prediction = predict_batch(model, [(None, None, None, None, 0.0)], features_from_dict(project_data))[0]
+        return {
+            "cost": round(prediction.cost, 2),
+            "confidence": _confidence(model),
+            "range_min": round(prediction.range_min, 2),
+            "range_max": round(prediction.range_max, 2),
+        }
+
+    def predict_defect_probability(self, project_id) -> dict:
+        """Mängelwahrscheinlichkeit eines Projekts -> probability, factors"""
+        cached = self._predictions
+        prediction = next(
+            (p for p in cached.projects if p.project_id == project_id), None
+        ) if cached else None
+
+        if prediction is None:
+            session = self.db_service.get_session()
+            if session is None:
+                return {"probability": None, "factors": []}
+            try:
+                heads, x = load_open_projects(session, self.tenant_id, project_ids=[project_id])
+            finally:
+                session.close()
+            predictions = predict_batch(self.model, heads, x)
+            prediction = predictions[0] if predictions else None
+
+        if prediction is None or prediction.defect_probability is None:
+            return {"probability": None, "factors": []}
+        return {
+            "probability": round(prediction.defect_probability, 4),
+            "factors": [label for label, _ in prediction.factors],
+        }
+
+    def customer_values(self, session, customer_ids=None, limit: int = None) -> List[dict]:
+        """Kundenwert aller (oder der angegebenen) Kunden - eine gruppierte Abfrage"""
+        net = sql_number(Invoice.subtotal)
+        signed = case((Invoice.invoice_type.in_((InvoiceType.CREDIT_NOTE, InvoiceType.CANCELLATION)), -net),
+                      else_=net)
+        late_days = func.greatest(
+            cast(func.extract("epoch", Invoice.paid_at - cast(Invoice.due_date, DateTime)), Float) / 86400,
+            0
+        )
+        ltv = func.sum(case((Invoice.invoice_type != InvoiceType.PROFORMA, signed), else_=0))
+        stmt = (
+            select(
+                Invoice.customer_id,
+                ltv.label("ltv"),
+                func.count().label("invoices"),
+                func.avg(late_days).filter(Invoice.paid_at.isnot(None), Invoice.due_date.isnot(None)).label("late"),
+                func.avg(cast(func.coalesce(Invoice.dunning_level, 0), Float)).label("dunning"),
+                func.min(Invoice.invoice_date).label("first"),
+                func.max(Invoice.invoice_date).label("last"),
+            )
+            .where(
+                Invoice.is_deleted == False,
+                Invoice.status.notin_((InvoiceStatus.DRAFT, InvoiceStatus.CANCELLED)),
+            )
+            .group_by(Invoice.customer_id)
+            .order_by(ltv.desc())
+        )
+        if self.tenant_id is not None:
+            stmt = stmt.where(Invoice.tenant_id == self.tenant_id)
+        if customer_ids is not None:
+            stmt = stmt.where(Invoice.customer_id.in_(list(customer_ids)))
+        if limit:
+            stmt = stmt.limit(limit)
+
+        today = date.today()
+        results = []
+        for row in session.execute(stmt):
+            # Zahlungsmoral 0-100: je Verzugstag 2 Punkte, je Mahnstufe 15 Punkte Abzug
+            payment_score = 100.0 - 2.0 * (row.late or 0.0) - 15.0 * (row.dunning or 0.0)
+            # Abwanderung: Zeit seit der letzten Rechnung gegenüber dem üblichen Abstand
+            since_last = (today - row.last).days if row.last else 0
+            if row.invoices > 1 and row.first and row.last and row.last > row.first:
+                interval = (row.last - row.first).days / (row.invoices - 1)
+                churn = since_last / (2.0 * interval) if interval else 0.0
+            else:
+                churn = since_last / 730.0
+            results.append({
+                "customer_id": row.customer_id,
+                "ltv": round(float(row.ltv or 0), 2),
+                "payment_score": round(max(0.0, min(100.0, payment_score)), 1),
+                "churn_risk": round(max(0.0, min(1.0, churn)), 3),
+                "invoice_count": row.invoices,
+                "last_invoice": row.last,
+            })
+        return results
+
+    def analyze_customer_value(self, customer_id) -> dict:
+        """Kundenwert -> ltv, payment_score, churn_risk"""
+        session = self.db_service.get_session()
+        if session is None:
+            return {"ltv": 0.0, "payment_score": None, "churn_risk": None}
+        try:
+            values = self.customer_values(session, customer_ids=[customer_id])
+        finally:
+            session.close()
+        if not values:
+            return {"ltv": 0.0, "payment_score": None, "churn_risk": None}
+        value = values[0]
+        return {"ltv": value["ltv"], "payment_score": value["payment_score"], "churn_risk": value["churn_risk"]}
+
+
+# Global instances (je Mandant)
+_ml_services: Dict[object, MLService] = {}
+
+
+def get_ml_service(db_service, tenant_id=None) -> MLService:
+    """Get ML service instance for a tenant"""
+    service = _ml_services.get(tenant_id)
+    if service is None or service.db_service is not db_service:
+        service = MLService(db_service, tenant_id)
+        _ml_services[tenant_id] = service
+    return service
@@ -0,0 +1,1357 @@
+"""
+Lohnlauf - Vektorisierte Brutto-Netto-Berechnung für eine Abrechnungsperiode
+
+Alle Eingaben einer Periode (Gehälter, Gehaltsbestandteile, Zeiterfassung,
+Sonderzahlungen, Vorschüsse, Darlehen, Pfändungen) werden mit wenigen
+mengenbasierten Abfragen geladen und in NumPy-Arrays überführt. Lohnsteuer
+(§32a EStG, Steuerklassen I-VI), Solidaritätszuschlag, Kirchensteuer und die
+Sozialversicherung (inkl. BBG, Minijob, Übergangsbereich) werden für alle
+Mitarbeiter gleichzeitig berechnet. Die Ergebnisse werden als Payslip- und
+PayslipItem-Zeilen per Bulk-Insert geschrieben. Die Freigabe einer Periode
+bucht die einbehaltenen Darlehensraten auf die Tilgungspläne.
+
+Die Steuerberechnung ist eine Annäherung an den Programmablaufplan (PAP) des
+BMF: Vorsorgepauschale und Steuerklassen V/VI sind vereinfacht. Ergebnisse
+sind deshalb vor der Freigabe zu prüfen.
+"""
+import calendar
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, delete, insert, func, and_, or_, case, cast, exists, Numeric
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from shared.models import (
+    Employee, TimeEntry, PayrollPeriod, SalaryComponent, EmployeeSalary,
+    EmployeeSalaryComponent, Payslip, PayslipItem, BonusPayment, EmployeeAdvance,
+    EmployeeLoan, EmployeeLoanInstallment, Garnishment, TaxPayrollReport, PayrollStatus
+)
+from shared.models.employee import EmploymentType, EmployeeStatus
+from app.services.loan_schedule_service import OPEN_STATUSES, get_loan_schedule_service
+
+
+MONTH_NAMES = ["Januar", "Februar", "März", "April", "Mai", "Juni",
+               "Juli", "August", "September", "Oktober", "November", "Dezember"]
+
+# Noch nicht freigegebene Abrechnungen - werden bei einem erneuten Lauf ersetzt
+REPLACEABLE_STATUSES = (PayrollStatus.DRAFT, PayrollStatus.CALCULATED)
+
+
+@dataclass(frozen=True)
+class PayrollParameters:
+    """Rechengrößen eines Abrechnungsjahres (Standard: 2025)"""
+    year: int = 2025
+
+    # Einkommensteuertarif §32a EStG
+    basic_allowance: float = 12096.0         # Grundfreibetrag
+    zone2_end: float = 17443.0
+    zone3_end: float = 68480.0
+    zone4_end: float = 277825.0
+    zone2_coeffs: tuple = (932.30, 1400.0)
+    zone3_coeffs: tuple = (176.64, 2397.0, 1015.13)
+    zone4_offset: float = 10911.92
+    zone5_offset: float = 19246.67
+
+    # Steuerklassen V/VI (§39b Abs. 2 Satz 7 EStG)
+    class56_w1: float = 13785.0
+    class56_w2: float = 34240.0
+    class56_w3: float = 222260.0
+
+    # Pauschbeträge
+    employee_allowance: float = 1230.0       # Arbeitnehmer-Pauschbetrag
+    special_expenses_allowance: float = 36.0  # Sonderausgaben-Pauschbetrag
+    single_parent_allowance: float = 4260.0  # Entlastungsbetrag Steuerklasse II
+    child_allowance: float = 9600.0          # Kinderfreibetrag (nur Soli/KiSt)
+    min_provision_allowance: float = 1900.0  # Mindestvorsorgepauschale
+    min_provision_allowance_iii: float = 3000.0
+
+    # Zuschlagsteuern
+    solidarity_rate: float = 0.055
+    solidarity_exemption: float = 19950.0    # Freigrenze (Splitting: doppelt)
+    solidarity_transition_rate: float = 0.119
+    church_tax_rate: float = 0.09
+
+    # Sozialversicherung (Gesamtbeitragssätze)
+    health_rate: float = 0.146
+    health_additional_rate: float = 0.025    # durchschnittlicher Zusatzbeitrag
+    pension_rate: float = 0.186
+    unemployment_rate: float = 0.026
+    nursing_rate: float = 0.036
+    nursing_childless_surcharge: float = 0.006
+    nursing_child_discount: float = 0.0025   # je Kind ab dem 2. bis zum 5.
+    health_ceiling: float = 5512.50          # BBG KV/PV monatlich
+    pension_ceiling: float = 8050.00         # BBG RV/AV monatlich
+
+    # Minijob / Übergangsbereich
+    minijob_limit: float = 556.0
+    midijob_limit: float = 2000.0
+    midijob_factor: float = 0.6683
+    minijob_pension_employee: float = 0.036
+    minijob_health_employer: float = 0.13
+    minijob_pension_employer: float = 0.15
+    minijob_flat_tax: float = 0.02
+
+    # Arbeitgeberumlagen
+    accident_rate: float = 0.045             # BG BAU, Gefahrtarif Zimmerer
+    insolvency_rate: float = 0.0015
+    u1_rate: float = 0.016
+    u2_rate: float = 0.0044
+
+    # Sonstiges
+    overtime_surcharge: float = 0.25
+    pension_conversion_sv_limit: float = 0.04    # bAV: SV-frei bis 4 % BBG RV
+    pension_conversion_tax_limit: float = 0.08   # bAV: steuerfrei bis 8 % BBG RV
+
+    # Pfändungstabelle §850c ZPO (ab 01.07.2025)
+    garnishment_exempt: float = 1555.00
+    garnishment_first_dependent: float = 585.23
+    garnishment_further_dependent: float = 326.04
+    garnishment_full_above: float = 4766.99
+    garnishment_shares: tuple = (0.7, 0.5, 0.4, 0.3, 0.2, 0.1)
+
+
+# Rechengrößen je Abrechnungsjahr - neue Jahre hier ergänzen
+PAYROLL_PARAMETERS: Dict[int, PayrollParameters] = {
+    2025: PayrollParameters(),
+}
+
+
+def parameters_for(year: int) -> PayrollParameters:
+    """Rechengrößen des Abrechnungsjahres; fehlt das Jahr, die des letzten gepflegten Jahres davor"""
+    known = sorted(PAYROLL_PARAMETERS)
+    earlier = [y for y in known if y <= year]
+    return PAYROLL_PARAMETERS[earlier[-1] if earlier else known[0]]
+
+
+@dataclass
+class PayrollInputs:
+    """Eingaben eines Lohnlaufs als spaltenweise Arrays (ein Eintrag je Mitarbeiter)"""
+    period: Any
+    employee_ids: List[uuid.UUID]
+    employee_numbers: List[str]
+    names: List[str]
+    salary_ids: List[Optional[uuid.UUID]]
+    bank: List[tuple]
+    tax_ids: List[Optional[str]]
+    sv_numbers: List[Optional[str]]
+    health_insurers: List[Optional[str]]
+    arrays: Dict[str, np.ndarray]
+    # Zeilenweise Eingaben (Index des Mitarbeiters + Werte)
+    components: Dict[str, np.ndarray]
+    component_meta: List[tuple]
+    bonuses: Dict[str, np.ndarray]
+    bonus_meta: List[tuple]
+    advances: Dict[str, np.ndarray]
+    loans: Dict[str, np.ndarray]
+    garnishments: Dict[str, np.ndarray]
+    allowances: List[tuple] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return len(self.employee_ids)
+
+    def index_of(self, employee_id) -> Optional[int]:
+        try:
+            return self.employee_ids.index(employee_id)
+        except ValueError:
+            return None
+
+
+# =============================================================================
+# TARIF-FUNKTIONEN (vektorisiert)
+# =============================================================================
+
+def income_tax_tariff(zve: np.ndarray, p: PayrollParameters) -> np.ndarray:
+    """Tarifliche Einkommensteuer nach §32a EStG für ein Array zu versteuernder Einkommen"""
+    x = np.floor(np.maximum(zve, 0.0))
+    y = (x - p.basic_allowance) / 10000.0
+    z = (x - p.zone2_end) / 10000.0
+    a2, b2 = p.zone2_coeffs
+    a3, b3, c3 = p.zone3_coeffs
+    tax = np.select(
+        [x <= p.basic_allowance, x <= p.zone2_end, x <= p.zone3_end, x <= p.zone4_end],
+        [0.0, (a2 * y + b2) * y, (a3 * z + b3) * z + c3, 0.42 * x - p.zone4_offset],
+        default=0.45 * x - p.zone5_offset
+    )
+    return np.floor(np.maximum(tax, 0.0))
+
+
+def _class56_tax(zve: np.ndarray, p: PayrollParameters) -> np.ndarray:
+    """Jahreslohnsteuer der Steuerklassen V und VI (vereinfachter PAP)"""
+    def mst(v):
+        return np.maximum(
+            2.0 * (income_tax_tariff(1.25 * v, p) - income_tax_tariff(0.75 * v, p)),
+            np.floor(0.14 * v)
+        )
+
+    x = np.floor(np.maximum(zve, 0.0))
+    upto_w2 = np.minimum(x, p.class56_w2)
+    base = np.where(
+        upto_w2 <= p.class56_w1,
+        mst(upto_w2),
+        np.minimum(mst(upto_w2), mst(np.full_like(x, p.class56_w1)) + 0.42 * (upto_w2 - p.class56_w1))
+    )
+    base += 0.42 * np.clip(x - p.class56_w2, 0.0, p.class56_w3 - p.class56_w2)
+    base += 0.45 * np.maximum(x - p.class56_w3, 0.0)
+    return np.floor(base)
+
+
+def annual_wage_tax(zve: np.ndarray, tax_class: np.ndarray, p: PayrollParameters) -> np.ndarray:
+    """Jahreslohnsteuer je Steuerklasse (III: Splitting, V/VI: Sonderformel)"""
+    return np.select(
+        [tax_class == 3, tax_class >= 5],
+        [2.0 * income_tax_tariff(zve / 2.0, p), _class56_tax(zve, p)],
+        default=income_tax_tariff(zve, p)
+    )
+
+
+def solidarity_surcharge(annual_tax: np.ndarray, tax_class: np.ndarray, p: PayrollParameters) -> np.ndarray:
+    """Solidaritätszuschlag mit Freigrenze und Milderungszone"""
+    exemption = np.where(tax_class == 3, 2.0 * p.solidarity_exemption, p.solidarity_exemption)
+    soli = np.minimum(
+        p.solidarity_rate * annual_tax,
+        p.solidarity_transition_rate * np.maximum(annual_tax - exemption, 0.0)
+    )
+    return np.where(annual_tax > exemption, soli, 0.0)
+
+
+def garnishable_amount(net: np.ndarray, dependents: np.ndarray, p: PayrollParameters) -> np.ndarray:
+    """Pfändbarer Betrag nach §850c ZPO für ein Array von Nettolöhnen"""
+    deps = np.clip(dependents, 0, 5).astype(int)
+    exempt = (p.garnishment_exempt
+              + p.garnishment_first_dependent * (deps >= 1)
+              + p.garnishment_further_dependent * np.clip(deps - 1, 0, 4))
+    # Die Tabelle arbeitet in 10-Euro-Stufen
+    capped = np.floor(np.minimum(net, p.garnishment_full_above) / 10.0) * 10.0
+    shares = np.asarray(p.garnishment_shares)[deps]
+    return np.maximum(capped - exempt, 0.0) * shares + np.maximum(net - p.garnishment_full_above, 0.0)
+
+
+def _cents(values: np.ndarray) -> np.ndarray:
+    return np.round(values + 0.0, 2)
+
+
+def _floor_cents(values: np.ndarray) -> np.ndarray:
+    return np.floor(np.round(values * 100.0, 6)) / 100.0
+
+
+def _grouped_cumsum(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Kumulative Summe innerhalb aufeinanderfolgender Gruppen (groups sortiert)"""
+    if values.size == 0:
+        return values
+    total = np.cumsum(values)
+    starts = np.r_[True, groups[1:] != groups[:-1]]
+    first = np.maximum.accumulate(np.where(starts, np.arange(values.size), 0))
+    return total - (total[first] - values[first])
+
+
+def _to_float(value, default=0.0) -> float:
+    """Wandelt Zahlen aus Text-Spalten (z.B. '3.500,00' oder '40') um"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float, Decimal)):
+        return float(value)
+    text = str(value).strip().replace("€", "").replace(" ", "")
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    try:
+        return float(text)
+    except ValueError:
+        return default
+
+
+def _parse_tax_class(value) -> int:
+    roman = {"I": 1, "II": 2, "III": 3, "IV": 4, "V": 5, "VI": 6}
+    text = str(value or "").strip().upper()
+    if text in roman:
+        return roman[text]
+    return int(text) if text.isdigit() and 1 <= int(text) <= 6 else 1
+
+
+def _decimal(value: float) -> Decimal:
+    return Decimal(f"{value:.2f}")
+
+
+def _business_days(start: date, end: date) -> int:
+    return int(np.busday_count(start, np.datetime64(end) + np.timedelta64(1, 'D')))
+
+
+# =============================================================================
+# SERVICE
+# =============================================================================
+
+class PayrollService:
+    """Vektorisierter Lohnlauf über alle Mitarbeiter einer Periode"""
+
+    # Positionen einer Abrechnung: (Feld, Bezeichnung, Code, Typ, Reihenfolge, steuerpfl., SV-pfl.)
+    ITEM_SPECS = [
+        ("base_salary", "Grundgehalt", "GRUND", "earning", 10, True, True),
+        ("hourly_wages", "Stundenlohn", "STDLOHN", "earning", 11, True, True),
+        ("overtime_pay", "Überstundenvergütung", "UEST", "earning", 12, True, True),
+        ("income_tax", "Lohnsteuer", "LST", "deduction", 50, False, False),
+        ("solidarity_tax", "Solidaritätszuschlag", "SOLI", "deduction", 51, False, False),
+        ("church_tax", "Kirchensteuer", "KIST", "deduction", 52, False, False),
+        ("health_insurance_employee", "Krankenversicherung AN", "KV_AN", "deduction", 60, False, False),
+        ("pension_insurance_employee", "Rentenversicherung AN", "RV_AN", "deduction", 61, False, False),
+        ("unemployment_insurance_employee", "Arbeitslosenversicherung AN", "AV_AN", "deduction", 62, False, False),
+        ("nursing_insurance_employee", "Pflegeversicherung AN", "PV_AN", "deduction", 63, False, False),
+        ("nursing_insurance_surcharge", "PV Kinderlosenzuschlag", "PV_KLZ", "deduction", 64, False, False),
+        ("company_pension_employee", "bAV Entgeltumwandlung", "BAV_AN", "deduction", 70, False, False),
+        ("garnishment", "Pfändung", "PFAEND", "deduction", 80, False, False),
+        ("advance_payment", "Vorschussverrechnung", "VORSCH", "deduction", 81, False, False),
+        ("loan_repayment", "Darlehenstilgung", "DARL", "deduction", 82, False, False),
+        ("health_insurance_employer", "Krankenversicherung AG", "KV_AG", "employer_cost", 90, False, False),
+        ("pension_insurance_employer", "Rentenversicherung AG", "RV_AG", "employer_cost", 91, False, False),
+        ("unemployment_insurance_employer", "Arbeitslosenversicherung AG", "AV_AG", "employer_cost", 92, False, False),
+        ("nursing_insurance_employer", "Pflegeversicherung AG", "PV_AG", "employer_cost", 93, False, False),
+        ("accident_insurance", "Unfallversicherung (BG)", "BG", "employer_cost", 94, False, False),
+        ("insolvency_insurance", "Insolvenzgeldumlage", "U3", "employer_cost", 95, False, False),
+        ("levies", "Umlagen U1/U2", "U1U2", "employer_cost", 96, False, False),
+        ("flat_tax", "Pauschale Lohnsteuer", "PLST", "employer_cost", 97, False, False),
+        ("company_pension_employer", "bAV Arbeitgeberanteil", "BAV_AG", "employer_cost", 98, False, False),
+    ]
+
+    def __init__(self, parameters: PayrollParameters = None):
+        # Feste Rechengrößen für alle Perioden; sonst je Abrechnungsjahr aus PAYROLL_PARAMETERS
+        self.parameters = parameters
+
+    def parameters_for(self, year: int) -> PayrollParameters:
+        return self.parameters or parameters_for(year)
+
+    # ==================== PERIODE ====================
+
+    def get_or_create_period(self, session, tenant_id, year: int, month: int, user_id=None) -> PayrollPeriod:
+        """Holt die Abrechnungsperiode oder legt sie an (race-frei über den Unique-Index)"""
+        start = date(year, month, 1)
+        end = date(year, month, calendar.monthrange(year, month)[1])
+        work_days = _business_days(start, end)
+        last_workday = np.busday_offset(np.datetime64(end), 0, roll='backward').astype(date)
+
+        session.execute(
+            pg_insert(PayrollPeriod).values(
+                id=uuid.uuid4(), tenant_id=tenant_id, year=year, month=month,
+                name=f"{MONTH_NAMES[month - 1]} {year}", code=f"{year}-{month:02d}",
+                start_date=start, end_date=end, work_days=work_days,
+                work_hours=Decimal(work_days * 8), status="open",
+                payment_date=last_workday, created_by=user_id,
+                created_at=datetime.utcnow(), updated_at=datetime.utcnow()
+            ).on_conflict_do_nothing(constraint='uq_payroll_period')
+        )
+        return session.execute(
+            select(PayrollPeriod).where(
+                PayrollPeriod.tenant_id == tenant_id,
+                PayrollPeriod.year == year,
+                PayrollPeriod.month == month
+            )
+        ).scalar_one()
+
+    # ==================== EINGABEN ====================
+
+    def load_inputs(self, session, period: PayrollPeriod, employee_ids: Sequence = None) -> PayrollInputs:
+        """Lädt alle Eingaben der Periode mit mengenbasierten Abfragen"""
+        timings = {}
+        started = time.perf_counter()
+        tenant_id = period.tenant_id
+        start, end = period.start_date, period.end_date
+
+        # 1) Mitarbeiter, die in der Periode beschäftigt sind und noch keine
+        #    freigegebene Abrechnung haben
+        finalized = select(Payslip.employee_id).where(
+            Payslip.payroll_period_id == period.id,
+            Payslip.is_deleted == False,
+            Payslip.status.notin_(REPLACEABLE_STATUSES)
+        )
+        stmt = select(
+            Employee.id, Employee.employee_number, Employee.first_name, Employee.last_name,
+            Employee.employment_type, Employee.date_of_birth, Employee.number_of_children,
+            Employee.tax_class, Employee.tax_factor, Employee.church_tax, Employee.tax_id,
+            Employee.social_security_number, Employee.health_insurance,
+            Employee.health_insurance_type, Employee.unemployment_insurance,
+            Employee.nursing_care_insurance, Employee.payment_type, Employee.monthly_salary,
+            Employee.annual_salary, Employee.hourly_rate, Employee.weekly_hours,
+            Employee.bank_name, Employee.iban, Employee.bic
+        ).where(
+            Employee.tenant_id == tenant_id,
+            Employee.is_deleted == False,
+            Employee.status.in_([EmployeeStatus.ACTIVE, EmployeeStatus.ON_LEAVE]),
+            Employee.employment_type != EmploymentType.FREELANCER,
+            or_(Employee.hire_date == None, Employee.hire_date <= end),
+            or_(Employee.termination_date == None, Employee.termination_date >= start),
+            Employee.id.notin_(finalized)
+        ).order_by(Employee.employee_number)
+        if employee_ids:
+            stmt = stmt.where(Employee.id.in_(list(employee_ids)))
+        employees = session.execute(stmt).all()
+        index = {row.id: i for i, row in enumerate(employees)}
+        n = len(employees)
+        ids = list(index)
+
+        # 2) Gültiges Gehalt je Mitarbeiter (jüngster Stand in der Periode)
+        salaries = session.execute(
+            select(
+                EmployeeSalary.id, EmployeeSalary.employee_id, EmployeeSalary.salary_type,
+                EmployeeSalary.base_salary, EmployeeSalary.hourly_rate,
+                EmployeeSalary.weekly_hours, EmployeeSalary.monthly_hours,
+                EmployeeSalary.fixed_allowances
+            ).where(
+                EmployeeSalary.tenant_id == tenant_id,
+                EmployeeSalary.employee_id.in_(ids),
+                EmployeeSalary.is_deleted == False,
+                EmployeeSalary.is_active == True,
+                EmployeeSalary.valid_from <= end,
+                or_(EmployeeSalary.valid_until == None, EmployeeSalary.valid_until >= start)
+            ).distinct(EmployeeSalary.employee_id).order_by(
+                EmployeeSalary.employee_id, EmployeeSalary.valid_from.desc()
+            )
+        ).all() if n else []
+
+        # 3) Zeiterfassung: Ist-Stunden und Überstunden der Periode
+        def numeric_hours(col):
+            # Stunden sind als Text gespeichert - nur gültige Zahlen summieren
+            return case(
+                (col.op('~')(r'^\s*[0-9]+([.,][0-9]+)?\s*$'),
+                 cast(func.replace(func.trim(col), ',', '.'), Numeric)),
+                else_=0
+            )
+
+        time_rows = session.execute(
+            select(
+                TimeEntry.employee_id,
+                func.sum(numeric_hours(TimeEntry.hours)),
+                func.sum(numeric_hours(TimeEntry.overtime_hours))
+            ).where(
+                TimeEntry.tenant_id == tenant_id,
+                TimeEntry.employee_id.in_(ids),
+                TimeEntry.work_date.between(start, end),
+                TimeEntry.status != "rejected"
+            ).group_by(TimeEntry.employee_id)
+        ).all() if n else []
+
+        # 4) Gehaltsbestandteile der gültigen Gehälter
+        salary_owner = {s.id: index[s.employee_id] for s in salaries}
+        component_rows = session.execute(
+            select(
+                EmployeeSalaryComponent.salary_id, EmployeeSalaryComponent.amount,
+                EmployeeSalaryComponent.percentage, SalaryComponent.id, SalaryComponent.name,
+                SalaryComponent.code, SalaryComponent.component_type, SalaryComponent.sub_type,
+                SalaryComponent.default_amount, SalaryComponent.percentage.label("default_percentage"),
+                SalaryComponent.is_taxable, SalaryComponent.is_sv_liable,
+                SalaryComponent.display_order
+            ).join(
+                SalaryComponent, SalaryComponent.id == EmployeeSalaryComponent.component_id
+            ).where(
+                EmployeeSalaryComponent.salary_id.in_(list(salary_owner)),
+                EmployeeSalaryComponent.is_active == True,
+                SalaryComponent.is_active == True,
+                SalaryComponent.is_deleted == False
+            )
+        ).all() if salary_owner else []
+
+        # 5) Sonderzahlungen der Periode
+        bonus_rows = session.execute(
+            select(
+                BonusPayment.id, BonusPayment.employee_id, BonusPayment.name,
+                BonusPayment.bonus_type, BonusPayment.gross_amount, BonusPayment.taxation_method
+            ).where(
+                BonusPayment.tenant_id == tenant_id,
+                BonusPayment.employee_id.in_(ids),
+                BonusPayment.is_deleted == False,
+                BonusPayment.status == "approved",
+                or_(
+                    BonusPayment.payroll_period_id == period.id,
+                    and_(BonusPayment.payroll_period_id == None,
+                         BonusPayment.planned_payment_date.between(start, end))
+                )
+            )
+        ).all() if n else []
+
+        # 6) Vorschüsse, Darlehen und Pfändungen
+        advance_rows = session.execute(
+            select(
+                EmployeeAdvance.id, EmployeeAdvance.employee_id,
+                func.least(func.coalesce(EmployeeAdvance.repayment_amount, EmployeeAdvance.amount_remaining),
+                           EmployeeAdvance.amount_remaining)
+            ).where(
+                EmployeeAdvance.tenant_id == tenant_id,
+                EmployeeAdvance.employee_id.in_(ids),
+                EmployeeAdvance.is_deleted == False,
+                EmployeeAdvance.status.in_(["approved", "active"]),
+                EmployeeAdvance.repayment_method == "deduction",
+                EmployeeAdvance.amount_remaining > 0,
+                or_(EmployeeAdvance.repayment_start_date == None, EmployeeAdvance.repayment_start_date <= end)
+            )
+        ).all() if n else []
+        # Darlehen mit Tilgungsplan: fällige Raten der Periode, sonst die Monatsrate
+        loan_amount, loan_due = get_loan_schedule_service().employee_loan_deduction(tenant_id, start, end)
+        loan_rows = session.execute(
+            select(
+                EmployeeLoan.id, EmployeeLoan.employee_id, loan_amount
+            ).outerjoin(loan_due, loan_due.c.employee_loan_id == EmployeeLoan.id).where(
+                EmployeeLoan.tenant_id == tenant_id,
+                EmployeeLoan.employee_id.in_(ids),
+                EmployeeLoan.is_deleted == False,
+                EmployeeLoan.status.in_(["approved", "active"]),
+                EmployeeLoan.amount_remaining > 0,
+                EmployeeLoan.first_payment_date <= end
+            )
+        ).all() if n else []
+        garnishment_rows = session.execute(
+            select(
+                Garnishment.id, Garnishment.employee_id, Garnishment.monthly_amount,
+                Garnishment.use_garnishment_table, Garnishment.dependents_count,
+                Garnishment.amount_remaining, Garnishment.priority
+            ).where(
+                Garnishment.tenant_id == tenant_id,
+                Garnishment.employee_id.in_(ids),
+                Garnishment.is_deleted == False,
+                Garnishment.status == "active",
+                Garnishment.effective_date <= end,
+                or_(Garnishment.end_date == None, Garnishment.end_date >= start)
+            ).order_by(Garnishment.employee_id, Garnishment.priority)
+        ).all() if n else []
+        timings["load_ms"] = (time.perf_counter() - started) * 1000
+
+        # --- Spalten je Mitarbeiter ---
+        today = end
+        period_hours = float(period.work_hours or _business_days(start, end) * 8)
+        arrays = {
+            "tax_class": np.array([_parse_tax_class(e.tax_class) for e in employees], dtype=np.int64),
+            "tax_factor": np.array([_to_float(e.tax_factor, 1.0) or 1.0 for e in employees]),
+            "church": np.array([bool(e.church_tax) for e in employees]),
+            "children": np.array([e.number_of_children or 0 for e in employees], dtype=np.int64),
+            "age": np.array([
+                (today.year - e.date_of_birth.year
+                 - ((today.month, today.day) < (e.date_of_birth.month, e.date_of_birth.day)))
+                if e.date_of_birth else 40 for e in employees
+            ], dtype=np.int64),
+            "private_health": np.array([
+                (e.health_insurance_type or "").strip().lower() in ("privat", "private", "pkv")
+                for e in employees
+            ]),
+            "unemployment_insured": np.array([e.unemployment_insurance is not False for e in employees]),
+            "nursing_insured": np.array([e.nursing_care_insurance is not False for e in employees]),
+            "minijob": np.array([e.employment_type == EmploymentType.MINIJOB for e in employees]),
+            "salary_type": np.array([(e.payment_type or "monthly") for e in employees], dtype=object),
+            "base_amount": np.array([
+                _to_float(e.monthly_salary) or _to_float(e.annual_salary) / 12.0 for e in employees
+            ]),
+            "hourly_rate": np.array([_to_float(e.hourly_rate) for e in employees]),
+            "contract_hours": np.array([
+                _to_float(e.weekly_hours, 40.0) * 13.0 / 3.0 for e in employees
+            ]),
+            "worked_hours": np.zeros(n),
+            "overtime_hours": np.zeros(n),
+            "period_hours": np.full(n, period_hours),
+        }
+
+        salary_ids: List[Optional[uuid.UUID]] = [None] * n
+        allowances = []
+        for s in salaries:
+            i = index[s.employee_id]
+            salary_ids[i] = s.id
+            arrays["salary_type"][i] = s.salary_type or "monthly"
+            base = float(s.base_salary or 0)
+            arrays["base_amount"][i] = base / 12.0 if s.salary_type == "annual" else base
+            if s.hourly_rate is not None:
+                arrays["hourly_rate"][i] = float(s.hourly_rate)
+            if s.monthly_hours:
+                arrays["contract_hours"][i] = float(s.monthly_hours)
+            elif s.weekly_hours:
+                arrays["contract_hours"][i] = float(s.weekly_hours) * 13.0 / 3.0
+            for name, amount in (s.fixed_allowances or {}).items():
+                if _to_float(amount):
+                    allowances.append((i, str(name), _to_float(amount)))
+        # Stundenlöhner ohne Satz: aus dem Gehalt ableiten, Monatslöhner: für Überstunden
+        derived = np.divide(arrays["base_amount"], arrays["contract_hours"],
+                            out=np.zeros(n), where=arrays["contract_hours"] > 0)
+        arrays["hourly_rate"] = np.where(arrays["hourly_rate"] > 0, arrays["hourly_rate"], derived)
+
+        for employee_id, hours, overtime in time_rows:
+            i = index[employee_id]
+            arrays["worked_hours"][i] = float(hours or 0)
+            arrays["overtime_hours"][i] = float(overtime or 0)
+
+        # --- Zeilenweise Eingaben ---
+        component_meta = [
+            (r.id, r.name, r.code, r.component_type, r.sub_type, r.display_order) for r in component_rows
+        ]
+        components = {
+            "employee": np.array([salary_owner[r.salary_id] for r in component_rows], dtype=np.int64),
+            "amount": np.array([
+                float(r.amount) if r.amount is not None else
+                (np.nan if (r.percentage is not None or r.default_percentage is not None)
+                 else float(r.default_amount or 0))
+                for r in component_rows
+            ], dtype=float),
+            "percentage": np.array([
+                float(r.percentage if r.percentage is not None else (r.default_percentage or 0))
+                for r in component_rows
+            ], dtype=float),
+            "type": np.array([r.component_type or "earning" for r in component_rows], dtype=object),
+            "pension": np.array([(r.sub_type or "") == "company_pension" for r in component_rows], dtype=bool),
+            "taxable": np.array([r.is_taxable is not False for r in component_rows], dtype=bool),
+            "sv_liable": np.array([r.is_sv_liable is not False for r in component_rows], dtype=bool),
+        }
+        bonus_meta = [(r.id, r.name, r.bonus_type) for r in bonus_rows]
+        bonuses = {
+            "employee": np.array([index[r.employee_id] for r in bonus_rows], dtype=np.int64),
+            "amount": np.array([float(r.gross_amount or 0) for r in bonus_rows], dtype=float),
+            "method": np.array([r.taxation_method or "normal" for r in bonus_rows], dtype=object),
+            "commission": np.array([r.bonus_type == "commission" for r in bonus_rows], dtype=bool),
+        }
+        advances = {
+            "id": [r[0] for r in advance_rows],
+            "employee": np.array([index[r[1]] for r in advance_rows], dtype=np.int64),
+            "amount": np.array([float(r[2] or 0) for r in advance_rows], dtype=float),
+        }
+        loans = {
+            "id": [r[0] for r in loan_rows],
+            "employee": np.array([index[r[1]] for r in loan_rows], dtype=np.int64),
+            "amount": np.array([float(r[2] or 0) for r in loan_rows], dtype=float),
+        }
+        garnishments = {
+            "id": [r.id for r in garnishment_rows],
+            "employee": np.array([index[r.employee_id] for r in garnishment_rows], dtype=np.int64),
+            "monthly": np.array([
+                float(r.monthly_amount) if r.monthly_amount is not None else np.inf for r in garnishment_rows
+            ], dtype=float),
+            "table": np.array([r.use_garnishment_table is not False for r in garnishment_rows], dtype=bool),
+            "dependents": np.array([r.dependents_count or 0 for r in garnishment_rows], dtype=np.int64),
+            "remaining": np.array([
+                float(r.amount_remaining) if r.amount_remaining is not None else np.inf for r in garnishment_rows
+            ], dtype=float),
+        }
+
+        timings["prepare_ms"] = (time.perf_counter() - started) * 1000 - timings["load_ms"]
+        return PayrollInputs(
+            period=period,
+            employee_ids=ids,
+            employee_numbers=[e.employee_number for e in employees],
+            names=[f"{e.first_name or ''} {e.last_name or ''}".strip() for e in employees],
+            salary_ids=salary_ids,
+            bank=[(e.bank_name, e.iban, e.bic) for e in employees],
+            tax_ids=[e.tax_id for e in employees],
+            sv_numbers=[e.social_security_number for e in employees],
+            health_insurers=[e.health_insurance for e in employees],
+            arrays=arrays,
+            components=components,
+            component_meta=component_meta,
+            bonuses=bonuses,
+            bonus_meta=bonus_meta,
+            advances=advances,
+            loans=loans,
+            garnishments=garnishments,
+            allowances=allowances,
+            timings=timings,
+        )
+
+    # ==================== BERECHNUNG ====================
+
+    def calculate(self, inputs: PayrollInputs) -> Dict[str, np.ndarray]:
+        """Brutto-Netto-Berechnung für alle Mitarbeiter in einem Durchgang"""
+        p = self.parameters_for(inputs.period.year)
+        a = inputs.arrays
+        n = inputs.size
+
+        def per_employee(rows, values):
+            return np.bincount(rows, weights=values, minlength=n) if len(rows) else np.zeros(n)
+
+        # --- Bezüge ---
+        hourly = a["salary_type"] == "hourly"
+        hours = np.where(a["worked_hours"] > 0, a["worked_hours"], a["contract_hours"])
+        base_salary = np.where(hourly, 0.0, a["base_amount"])
+        hourly_wages = np.where(hourly, hours * a["hourly_rate"], 0.0)
+        overtime_pay = a["overtime_hours"] * a["hourly_rate"] * (1.0 + p.overtime_surcharge)
+        regular_base = base_salary + hourly_wages
+
+        c = inputs.components
+        c_amount = np.where(
+            np.isnan(c["amount"]),
+            c["percentage"] / 100.0 * regular_base[c["employee"]] if len(c["employee"]) else 0.0,
+            c["amount"]
+        ) if len(c["employee"]) else np.zeros(0)
+        c["computed"] = c_amount
+        earning = c["type"] == "earning"
+        employer = c["type"] == "employer_contribution"
+        deduction = ~earning & ~employer
+
+        allowance_rows = np.array([i for i, _, _ in inputs.allowances], dtype=np.int64)
+        allowance_values = np.array([v for _, _, v in inputs.allowances], dtype=float)
+        allowances_taxable = (per_employee(c["employee"][earning & c["taxable"]], c_amount[earning & c["taxable"]])
+                              + per_employee(allowance_rows, allowance_values))
+        allowances_tax_free = per_employee(c["employee"][earning & ~c["taxable"]], c_amount[earning & ~c["taxable"]])
+        sv_free_earnings = per_employee(c["employee"][earning & ~c["sv_liable"]], c_amount[earning & ~c["sv_liable"]])
+
+        pension_conversion = per_employee(c["employee"][deduction & c["pension"]], c_amount[deduction & c["pension"]])
+        other_deductions = per_employee(c["employee"][deduction & ~c["pension"]], c_amount[deduction & ~c["pension"]])
+        company_pension_employer = per_employee(c["employee"][employer & c["pension"]], c_amount[employer & c["pension"]])
+        other_employer = per_employee(c["employee"][employer & ~c["pension"]], c_amount[employer & ~c["pension"]])
+
+        b = inputs.bonuses
+        tax_free_bonus = b["method"] == "tax_free"
+        fifth_rule = b["method"] == "fifth_rule"
+        bonuses = per_employee(b["employee"][~b["commission"]], b["amount"][~b["commission"]])
+        commissions = per_employee(b["employee"][b["commission"]], b["amount"][b["commission"]])
+        bonus_tax_free = per_employee(b["employee"][tax_free_bonus], b["amount"][tax_free_bonus])
+        bonus_normal = per_employee(b["employee"][~tax_free_bonus & ~fifth_rule], b["amount"][~tax_free_bonus & ~fifth_rule])
+        bonus_fifth = per_employee(b["employee"][fifth_rule], b["amount"][fifth_rule])
+
+        gross = regular_base + overtime_pay + allowances_taxable + allowances_tax_free + bonuses + commissions
+
+        # --- Sozialversicherung ---
+        sv_conversion = np.minimum(pension_conversion, p.pension_conversion_sv_limit * p.pension_ceiling)
+        sv_gross = np.maximum(gross - allowances_tax_free - bonus_tax_free - sv_free_earnings - sv_conversion, 0.0)
+        minijob = a["minijob"]
+        midijob = ~minijob & (sv_gross > p.minijob_limit) & (sv_gross <= p.midijob_limit)
+
+        # Übergangsbereich: reduzierte Bemessungsgrundlagen (§20 Abs. 2a SGB IV)
+        span = p.midijob_limit - p.minijob_limit
+        base_employee = np.where(
+            midijob, p.midijob_limit / span * (sv_gross - p.minijob_limit), sv_gross
+        )
+        base_total = np.where(
+            midijob,
+            p.midijob_factor * p.minijob_limit
+            + (p.midijob_limit / span - p.minijob_limit / span * p.midijob_factor) * (sv_gross - p.minijob_limit),
+            sv_gross
+        )
+
+        statutory = ~minijob & ~a["private_health"]
+        kv_total_rate = p.health_rate + p.health_additional_rate
+        kv_employee = np.where(statutory, np.minimum(base_employee, p.health_ceiling) * kv_total_rate / 2.0, 0.0)
+        kv_total = np.where(statutory, np.minimum(base_total, p.health_ceiling) * kv_total_rate, 0.0)
+
+        rv_employee = np.where(minijob, sv_gross * p.minijob_pension_employee,
+                               np.minimum(base_employee, p.pension_ceiling) * p.pension_rate / 2.0)
+        rv_total = np.where(minijob, sv_gross * (p.minijob_pension_employer + p.minijob_pension_employee),
+                            np.minimum(base_total, p.pension_ceiling) * p.pension_rate)
+
+        av_insured = ~minijob & a["unemployment_insured"]
+        av_employee = np.where(av_insured, np.minimum(base_employee, p.pension_ceiling) * p.unemployment_rate / 2.0, 0.0)
+        av_total = np.where(av_insured, np.minimum(base_total, p.pension_ceiling) * p.unemployment_rate, 0.0)
+
+        pv_insured = statutory & a["nursing_insured"]
+        children = a["children"]
+        childless = (children == 0) & (a["age"] >= 23)
+        pv_employee_rate = p.nursing_rate / 2.0 - p.nursing_child_discount * np.clip(children - 1, 0, 4)
+        pv_base_employee = np.minimum(base_employee, p.health_ceiling)
+        pv_employee = np.where(pv_insured, pv_base_employee * pv_employee_rate, 0.0)
+        pv_surcharge = np.where(pv_insured & childless, pv_base_employee * p.nursing_childless_surcharge, 0.0)
+        pv_employer = np.where(pv_insured, np.minimum(base_total, p.health_ceiling) * p.nursing_rate / 2.0, 0.0)
+
+        kv_employee, rv_employee, av_employee = _cents(kv_employee), _cents(rv_employee), _cents(av_employee)
+        pv_employee, pv_surcharge = _cents(pv_employee), _cents(pv_surcharge)
+        kv_employer = np.where(minijob, _cents(sv_gross * p.minijob_health_employer), _cents(kv_total) - kv_employee)
+        rv_employer = _cents(rv_total) - rv_employee
+        av_employer = _cents(av_total) - av_employee
+        pv_employer = _cents(pv_employer)
+        sv_employee = kv_employee + rv_employee + av_employee + pv_employee + pv_surcharge
+
+        # --- Lohnsteuer ---
+        tax_class = a["tax_class"]
+        tax_conversion = np.minimum(pension_conversion, p.pension_conversion_tax_limit * p.pension_ceiling)
+        regular_taxable = np.maximum(
+            regular_base + overtime_pay + allowances_taxable - tax_conversion, 0.0
+        )
+        annual = regular_taxable * 12.0
+
+        # Vorsorgepauschale (vereinfacht: tatsächliche AN-Beiträge, mindestens Mindestvorsorge)
+        kvpv_annual = 12.0 * np.minimum(regular_taxable, p.health_ceiling) * (
+            kv_total_rate / 2.0 + pv_employee_rate + np.where(childless, p.nursing_childless_surcharge, 0.0)
+        )
+        min_provision = np.minimum(
+            0.12 * annual,
+            np.where(tax_class == 3, p.min_provision_allowance_iii, p.min_provision_allowance)
+        )
+        kvpv_annual = np.where(a["private_health"], min_provision, np.maximum(kvpv_annual, min_provision))
+        rv_annual = 12.0 * np.minimum(regular_taxable, p.pension_ceiling) * p.pension_rate / 2.0
+        provision = np.ceil(rv_annual + kvpv_annual)
+
+        flat_allowances = np.where(tax_class == 6, 0.0, p.employee_allowance + p.special_expenses_allowance)
+        flat_allowances = flat_allowances + np.where(tax_class == 2, p.single_parent_allowance, 0.0)
+        zve = np.maximum(annual - flat_allowances - provision, 0.0)
+
+        factor = np.where(tax_class == 4, a["tax_factor"], 1.0)
+        annual_tax = np.floor(annual_wage_tax(zve, tax_class, p) * factor)
+
+        # Sonstige Bezüge: Jahreslohnsteuer mit und ohne Einmalzahlung
+        with_bonus = annual_wage_tax(zve + bonus_normal, tax_class, p)
+        with_fifth = annual_wage_tax(zve + bonus_fifth / 5.0, tax_class, p)
+        base_tax = annual_wage_tax(zve, tax_class, p)
+        bonus_tax = np.maximum(with_bonus - base_tax, 0.0) + 5.0 * np.maximum(with_fifth - base_tax, 0.0)
+
+        # Soli und Kirchensteuer mit Kinderfreibeträgen
+        child_factor = np.where(tax_class == 4, 0.5, 1.0) * (tax_class <= 4)
+        zve_children = np.maximum(zve - children * p.child_allowance * child_factor, 0.0)
+        surcharge_base = np.floor(annual_wage_tax(zve_children, tax_class, p) * factor)
+        soli_annual = solidarity_surcharge(surcharge_base, tax_class, p)
+        soli_bonus = solidarity_surcharge(surcharge_base + bonus_tax, tax_class, p) - soli_annual
+        church_annual = np.where(a["church"], surcharge_base * p.church_tax_rate, 0.0)
+        church_bonus = np.where(a["church"], bonus_tax * p.church_tax_rate, 0.0)
+
+        income_tax = np.where(minijob, 0.0, _floor_cents(annual_tax / 12.0) + bonus_tax)
+        solidarity_tax = np.where(minijob, 0.0, _floor_cents(soli_annual / 12.0 + soli_bonus))
+        church_tax = np.where(minijob, 0.0, _floor_cents(church_annual / 12.0 + church_bonus))
+        flat_tax = np.where(minijob, _cents(sv_gross * p.minijob_flat_tax), 0.0)
+        total_taxes = income_tax + solidarity_tax + church_tax
+
+        # --- Netto und Verrechnungen ---
+        net_salary = _cents(gross - total_taxes - sv_employee - pension_conversion)
+        available = np.maximum(net_salary - other_deductions, 0.0)
+
+        g = inputs.garnishments
+        garnishment_rows = np.zeros(len(g["employee"]))
+        if len(g["employee"]):
+            net_rows = net_salary[g["employee"]]
+            limit = np.where(g["table"], garnishable_amount(net_rows, g["dependents"], p), net_rows)
+            requested = np.minimum(np.minimum(g["monthly"], limit), g["remaining"])
+            requested = np.where(np.isfinite(requested), requested, 0.0)
+            cap = np.zeros(n)
+            np.maximum.at(cap, g["employee"], limit)
+            before = _grouped_cumsum(requested, g["employee"]) - requested
+            garnishment_rows = _floor_cents(np.clip(cap[g["employee"]] - before, 0.0, requested))
+        garnishment = np.minimum(per_employee(g["employee"], garnishment_rows), available)
+        available = available - garnishment
+        advance_payment = np.minimum(per_employee(inputs.advances["employee"], inputs.advances["amount"]), available)
+        available = available - advance_payment
+        loan_repayment = np.minimum(per_employee(inputs.loans["employee"], inputs.loans["amount"]), available)
+
+        total_deductions = (total_taxes + sv_employee + pension_conversion + other_deductions
+                            + garnishment + advance_payment + loan_repayment)
+        payment_amount = _cents(gross - total_deductions)
+
+        # --- Arbeitgeberkosten ---
+        accident_insurance = _cents(sv_gross * p.accident_rate)
+        insolvency_insurance = _cents(np.where(minijob, sv_gross, np.minimum(sv_gross, p.pension_ceiling)) * p.insolvency_rate)
+        levies = _cents(sv_gross * (p.u1_rate + p.u2_rate))
+        total_employer_costs = (kv_employer + rv_employer + av_employer + pv_employer + accident_insurance
+                                + insolvency_insurance + levies + flat_tax + company_pension_employer
+                                + other_employer)
+
+        return {
+            "work_hours": hours,
+            "overtime_hours": a["overtime_hours"],
+            "base_salary": _cents(base_salary),
+            "hourly_wages": _cents(hourly_wages),
+            "overtime_pay": _cents(overtime_pay),
+            "allowances_taxable": _cents(allowances_taxable),
+            "allowances_tax_free": _cents(allowances_tax_free),
+            "bonuses": _cents(bonuses),
+            "commissions": _cents(commissions),
+            "gross_salary": _cents(gross),
+            "sv_gross": _cents(sv_gross),
+            "taxable_gross": _cents(regular_taxable + bonus_normal + bonus_fifth),
+            "zve_annual": zve,
+            "income_tax": income_tax,
+            "solidarity_tax": solidarity_tax,
+            "church_tax": church_tax,
+            "total_taxes": _cents(total_taxes),
+            "health_insurance_employee": kv_employee,
+            "pension_insurance_employee": rv_employee,
+            "unemployment_insurance_employee": av_employee,
+            "nursing_insurance_employee": pv_employee,
+            "nursing_insurance_surcharge": pv_surcharge,
+            "total_social_security_employee": _cents(sv_employee),
+            "company_pension_employee": _cents(pension_conversion),
+            "other_deductions": _cents(other_deductions),
+            "garnishment": _cents(garnishment),
+            "garnishment_rows": garnishment_rows,
+            "advance_payment": _cents(advance_payment),
+            "loan_repayment": _cents(loan_repayment),
+            "total_deductions": _cents(total_deductions),
+            "net_salary": net_salary,
+            "payment_amount": payment_amount,
+            "health_insurance_employer": _cents(kv_employer),
+            "pension_insurance_employer": _cents(rv_employer),
+            "unemployment_insurance_employer": _cents(av_employer),
+            "nursing_insurance_employer": pv_employer,
+            "accident_insurance": accident_insurance,
+            "insolvency_insurance": insolvency_insurance,
+            "levies": levies,
+            "flat_tax": flat_tax,
+            "company_pension_employer": _cents(company_pension_employer),
+            "total_employer_costs": _cents(total_employer_costs),
+            "total_costs": _cents(gross + total_employer_costs),
+            "minijob": minijob,
+            "midijob": midijob,
+        }
+
+    # ==================== LOHNLAUF ====================
+
+    def run_period(self, session, tenant_id, year: int, month: int, user_id=None,
+                   employee_ids: Sequence = None, overrides: Dict[Any, Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Führt den Lohnlauf für eine Periode aus.
+
+        Noch nicht freigegebene Abrechnungen der Periode werden ersetzt, ein
+        erneuter Lauf ist daher idempotent. Der Aufrufer committet die Session.
+
+        Args:
+            employee_ids: Optional auf einzelne Mitarbeiter beschränken
+            overrides: {employee_id: {"work_hours": .., "overtime_hours": ..}}
+        """
+        started = time.perf_counter()
+        period = self.get_or_create_period(session, tenant_id, year, month, user_id)
+        if period.status in ("closed", "locked"):
+            raise ValueError(f"Periode {period.name} ist abgeschlossen")
+
+        inputs = self.load_inputs(session, period, employee_ids)
+        self._apply_overrides(inputs, overrides)
+
+        calc_started = time.perf_counter()
+        result = self.calculate(inputs)
+        calc_ms = (time.perf_counter() - calc_started) * 1000
+
+        write_started = time.perf_counter()
+        replaced = self._delete_replaceable(session, period, inputs.employee_ids)
+        numbers = self._payslip_numbers(session, period, inputs)
+        payslips, items = self._build_rows(inputs, result, user_id, numbers)
+        if payslips:
+            session.execute(insert(Payslip.__table__), payslips)
+        if items:
+            session.execute(insert(PayslipItem.__table__), items)
+        period.status = "processing"
+        period.updated_by = user_id
+        session.flush()
+        write_ms = (time.perf_counter() - write_started) * 1000
+
+        return {
+            "period_id": period.id,
+            "period_name": period.name,
+            "year": period.year,
+            "employees": inputs.size,
+            "payslips": len(payslips),
+            "items": len(items),
+            "replaced": replaced,
+            "parameters_year": self.parameters_for(period.year).year,
+            "gross_total": float(result["gross_salary"].sum()),
+            "net_total": float(result["net_salary"].sum()),
+            "tax_total": float(result["total_taxes"].sum()),
+            "sv_employee_total": float(result["total_social_security_employee"].sum()),
+            "employer_total": float(result["total_employer_costs"].sum()),
+            "costs_total": float(result["total_costs"].sum()),
+            "timings": {
+                **{k: round(v, 1) for k, v in inputs.timings.items()},
+                "calculate_ms": round(calc_ms, 1),
+                "write_ms": round(write_ms, 1),
+                "total_ms": round((time.perf_counter() - started) * 1000, 1),
+            },
+        }
+
+    def preview(self, session, tenant_id, employee_id, year: int, month: int,
+                work_hours: float = None, overtime_hours: float = None) -> Optional[Dict[str, float]]:
+        """Berechnet eine einzelne Abrechnung ohne zu speichern"""
+        start = date(year, month, 1)
+        end = date(year, month, calendar.monthrange(year, month)[1])
+        period = session.execute(
+            select(PayrollPeriod).where(
+                PayrollPeriod.tenant_id == tenant_id,
+                PayrollPeriod.year == year,
+                PayrollPeriod.month == month
+            )
+        ).scalar_one_or_none()
+        if period is None:
+            days = _business_days(start, end)
+            period = PayrollPeriod(
+                id=uuid.uuid4(), tenant_id=tenant_id, year=year, month=month,
+                start_date=start, end_date=end, work_days=days, work_hours=days * 8
+            )
+
+        inputs = self.load_inputs(session, period, [employee_id])
+        if not inputs.size:
+            return None
+        self._apply_overrides(inputs, {employee_id: {
+            "work_hours": work_hours, "overtime_hours": overtime_hours
+        }})
+        result = self.calculate(inputs)
+        return {key: float(values[0]) for key, values in result.items() if len(values) == 1}
+
+    def _apply_overrides(self, inputs: PayrollInputs, overrides):
+        if not overrides:
+            return
+        for employee_id, values in overrides.items():
+            i = inputs.index_of(employee_id)
+            if i is None:
+                continue
+            if values.get("work_hours") is not None:
+                inputs.arrays["worked_hours"][i] = float(values["work_hours"])
+            if values.get("overtime_hours") is not None:
+                inputs.arrays["overtime_hours"][i] = float(values["overtime_hours"])
+
+    def _delete_replaceable(self, session, period: PayrollPeriod, employee_ids: List) -> int:
+        """Entfernt ersetzbare Abrechnungen (und deren Positionen) der Periode"""
+        if not employee_ids:
+            return 0
+        replaceable = select(Payslip.id).where(
+            Payslip.payroll_period_id == period.id,
+            Payslip.employee_id.in_(employee_ids),
+            Payslip.status.in_(REPLACEABLE_STATUSES)
+        )
+        session.execute(
+            delete(PayslipItem).where(PayslipItem.payslip_id.in_(replaceable)),
+            execution_options={"synchronize_session": False}
+        )
+        result = session.execute(
+            delete(Payslip).where(Payslip.id.in_(replaceable)),
+            execution_options={"synchronize_session": False}
+        )
+        return result.rowcount or 0
+
+    def _payslip_numbers(self, session, period: PayrollPeriod, inputs: PayrollInputs) -> List[str]:
+        """Abrechnungsnummern LA-JJJJMM-<Personalnummer>, eindeutig je Mandant
+
+        Ohne Personalnummer steht die Mitarbeiter-ID in der Nummer. Ist eine
+        Nummer noch belegt (gelöschte oder freigegebene Abrechnung, doppelte
+        Personalnummer), erhält sie ein fortlaufendes Suffix. Ersetzte
+        Abrechnungen müssen vorher entfernt sein.
+        """
+        prefix = f"LA-{period.year}{period.month:02d}-"
+        taken = set(session.execute(
+            select(Payslip.payslip_number).where(
+                Payslip.tenant_id == period.tenant_id,
+                Payslip.payslip_number.like(f"{prefix}%")
+            )
+        ).scalars())
+        numbers = []
+        for employee_number, employee_id in zip(inputs.employee_numbers, inputs.employee_ids):
+            base = prefix + (str(employee_number or "").strip() or str(employee_id))
+            number, suffix = base, 1
+            while number in taken:
+                suffix += 1
+                number = f"{base}-{suffix}"
+            taken.add(number)
+            numbers.append(number)
+        return numbers
+
+    def _build_rows(self, inputs: PayrollInputs, result: Dict[str, np.ndarray], user_id=None,
+                    numbers: List[str] = None):
+        """Erzeugt die Insert-Parameter für Payslip und PayslipItem (numbers aus _payslip_numbers)"""
+        period = inputs.period
+        tenant_id = period.tenant_id
+        now = datetime.utcnow()
+        n = inputs.size
+        payslip_ids = [uuid.uuid4() for _ in range(n)]
+
+        money_fields = [
+            "base_salary", "hourly_wages", "overtime_pay", "allowances_taxable", "allowances_tax_free",
+            "bonuses", "commissions", "gross_salary", "income_tax", "solidarity_tax", "church_tax",
+            "total_taxes", "health_insurance_employee", "pension_insurance_employee",
+            "unemployment_insurance_employee", "nursing_insurance_employee", "nursing_insurance_surcharge",
+            "total_social_security_employee", "other_deductions", "advance_payment", "loan_repayment",
+            "garnishment", "company_pension_employee", "total_deductions", "net_salary", "payment_amount",
+            "health_insurance_employer", "pension_insurance_employer", "unemployment_insurance_employer",
+            "nursing_insurance_employer", "accident_insurance", "insolvency_insurance",
+            "company_pension_employer", "total_employer_costs", "total_costs",
+        ]
+        columns = {name: result[name].tolist() for name in money_fields}
+        tax_class = inputs.arrays["tax_class"].tolist()
+        tax_factor = inputs.arrays["tax_factor"].tolist()
+
+        garnishments_by_employee: Dict[int, list] = {}
+        g = inputs.garnishments
+        for row, (gid, amount) in enumerate(zip(g["id"], result["garnishment_rows"].tolist())):
+            if amount > 0:
+                garnishments_by_employee.setdefault(int(g["employee"][row]), []).append(
+                    {"id": str(gid), "amount": amount}
+                )
+        advances_by_employee: Dict[int, list] = {}
+        for aid, i in zip(inputs.advances["id"], inputs.advances["employee"].tolist()):
+            advances_by_employee.setdefault(i, []).append(str(aid))
+        loans_by_employee: Dict[int, list] = {}
+        for lid, i in zip(inputs.loans["id"], inputs.loans["employee"].tolist()):
+            loans_by_employee.setdefault(i, []).append(str(lid))
+        bonuses_by_employee: Dict[int, list] = {}
+        for (bid, _, _), i in zip(inputs.bonus_meta, inputs.bonuses["employee"].tolist()):
+            bonuses_by_employee.setdefault(i, []).append(str(bid))
+
+        payslips = []
+        for i in range(n):
+            bank_name, iban, bic = inputs.bank[i]
+            row = {
+                "id": payslip_ids[i],
+                "tenant_id": tenant_id,
+                "employee_id": inputs.employee_ids[i],
+                "payroll_period_id": period.id,
+                "payslip_number": numbers[i] if numbers else f"LA-{period.year}{period.month:02d}-{inputs.employee_ids[i]}",
+                "period_start": period.start_date,
+                "period_end": period.end_date,
+                "work_days": Decimal(period.work_days or 0),
+                "work_hours": _decimal(float(result["work_hours"][i])),
+                "overtime_hours": _decimal(float(result["overtime_hours"][i])),
+                "tax_class": str(tax_class[i]),
+                "tax_factor": Decimal(f"{tax_factor[i]:.4f}") if tax_class[i] == 4 else None,
+                "tax_id": inputs.tax_ids[i],
+                "social_security_number": inputs.sv_numbers[i],
+                "health_insurance_name": inputs.health_insurers[i],
+                "status": PayrollStatus.CALCULATED,
+                "calculated_at": now,
+                "calculated_by": user_id,
+                "payment_date": period.payment_date,
+                "bank_name": bank_name,
+                "iban": iban,
+                "bic": bic,
+                "is_deleted": False,
+                "created_by": user_id,
+                "created_at": now,
+                "updated_at": now,
+                "calculation_details": {
+                    "engine": "vectorized",
+                    "parameters_year": self.parameters_for(period.year).year,
+                    "sv_gross": float(result["sv_gross"][i]),
+                    "taxable_gross": float(result["taxable_gross"][i]),
+                    "zve_annual": float(result["zve_annual"][i]),
+                    "minijob": bool(result["minijob"][i]),
+                    "midijob": bool(result["midijob"][i]),
+                    "levies_u1_u2": float(result["levies"][i]),
+                    "flat_tax": float(result["flat_tax"][i]),
+                    "bonus_ids": bonuses_by_employee.get(i, []),
+                    "advance_ids": advances_by_employee.get(i, []),
+                    "loan_ids": loans_by_employee.get(i, []),
+                    "garnishments": garnishments_by_employee.get(i, []),
+                },
+            }
+            for name in money_fields:
+                row[name] = _decimal(columns[name][i])
+            payslips.append(row)
+
+        items = []
+
+        def add_item(i, name, code, item_type, amount, order, taxable=True, sv_liable=True,
+                     component_id=None, quantity=None, rate=None):
+            items.append({
+                "id": uuid.uuid4(), "tenant_id": tenant_id, "payslip_id": payslip_ids[i],
+                "component_id": component_id, "name": name, "code": code, "item_type": item_type,
+                "amount": _decimal(amount), "quantity": quantity, "rate": rate,
+                "is_taxable": taxable, "is_sv_liable": sv_liable, "display_order": order,
+                "show_on_payslip": True, "created_at": now, "updated_at": now,
+            })
+
+        # Feste Positionen: nur Beträge ungleich 0 (maskiert statt je Mitarbeiter geprüft)
+        for field_name, name, code, item_type, order, taxable, sv_liable in self.ITEM_SPECS:
+            values = result[field_name]
+            for i in np.flatnonzero(values).tolist():
+                quantity = rate = None
+                if field_name in ("hourly_wages", "overtime_pay"):
+                    key = "work_hours" if field_name == "hourly_wages" else "overtime_hours"
+                    quantity = _decimal(float(result[key][i]))
+                    rate = Decimal(f"{float(inputs.arrays['hourly_rate'][i]):.4f}")
+                add_item(i, name, code, item_type, float(values[i]), order, taxable, sv_liable,
+                         quantity=quantity, rate=rate)
+
+        c = inputs.components
+        item_types = {"earning": "earning", "employer_contribution": "employer_cost"}
+        for row, (cid, name, code, ctype, _, order) in enumerate(inputs.component_meta):
+            amount = float(c["computed"][row])
+            # bAV-Bestandteile stehen bereits als eigene Positionen auf der Abrechnung
+            if not amount or c["pension"][row]:
+                continue
+            add_item(int(c["employee"][row]), name, code, item_types.get(ctype, "deduction"),
+                     amount, order or 20, bool(c["taxable"][row]), bool(c["sv_liable"][row]),
+                     component_id=cid)
+
+        for i, name, amount in inputs.allowances:
+            add_item(i, name, None, "earning", amount, 25)
+
+        b = inputs.bonuses
+        for row, (bid, name, bonus_type) in enumerate(inputs.bonus_meta):
+            tax_free = b["method"][row] == "tax_free"
+            add_item(int(b["employee"][row]), name, bonus_type, "earning", float(b["amount"][row]), 30,
+                     taxable=not tax_free, sv_liable=not tax_free)
+
+        return payslips, items
+
+    # ==================== FREIGABE ====================
+
+    def approve_period(self, session, tenant_id, year: int, month: int, user_id=None) -> Dict[str, Any]:
+        """
+        Gibt die berechneten Abrechnungen einer Periode frei und bucht die
+        einbehaltenen Darlehensraten auf die Tilgungspläne.
+
+        Nur Abrechnungen im Status "berechnet" werden verarbeitet, eine erneute
+        Freigabe bucht daher nichts doppelt. Der Aufrufer committet die Session.
+        """
+        period = session.execute(
+            select(PayrollPeriod).where(
+                PayrollPeriod.tenant_id == tenant_id,
+                PayrollPeriod.year == year,
+                PayrollPeriod.month == month
+            )
+        ).scalar_one_or_none()
+        if period is None:
+            raise ValueError("Für diese Periode liegen keine Abrechnungen vor")
+        if period.status in ("closed", "locked"):
+            raise ValueError(f"Periode {period.name} ist abgeschlossen")
+
+        payslips = session.execute(
+            select(Payslip).where(
+                Payslip.payroll_period_id == period.id,
+                Payslip.is_deleted == False,
+                Payslip.status == PayrollStatus.CALCULATED
+            ).with_for_update()
+        ).scalars().all()
+        if not payslips:
+            raise ValueError(f"Keine berechneten Abrechnungen für {period.name}")
+
+        loans = self._book_loan_repayments(session, period, [p for p in payslips if (p.loan_repayment or 0) > 0])
+        now = datetime.utcnow()
+        for payslip in payslips:
+            payslip.status = PayrollStatus.APPROVED
+            payslip.approved_at = now
+            payslip.approved_by = user_id
+            payslip.updated_by = user_id
+        session.flush()
+        return {"period_name": period.name, "payslips": len(payslips), **loans}
+
+    def _book_loan_repayments(self, session, period: PayrollPeriod, payslips: List[Payslip]) -> Dict[str, Any]:
+        """Einbehaltene Darlehensraten verteilen: fällige Raten der Periode (älteste zuerst), dann Darlehen ohne Plan"""
+        if not payslips:
+            return {"loan_installments": 0, "loan_amount": Decimal(0)}
+        by_employee = {p.employee_id: p for p in payslips}
+        remaining = {p.employee_id: p.loan_repayment for p in payslips}
+        loan_ids = [uuid.UUID(str(lid)) for p in payslips
+                    for lid in (p.calculation_details or {}).get("loan_ids", [])]
+        schedule_service = get_loan_schedule_service()
+        booked, total = 0, Decimal(0)
+
+        installments = session.execute(
+            select(
+                EmployeeLoanInstallment.id, EmployeeLoanInstallment.employee_id,
+                (EmployeeLoanInstallment.payment_amount
+                 - func.coalesce(EmployeeLoanInstallment.paid_amount, 0)).label("open_amount"),
+            ).where(
+                EmployeeLoanInstallment.tenant_id == period.tenant_id,
+                EmployeeLoanInstallment.employee_loan_id.in_(loan_ids),
+                EmployeeLoanInstallment.due_date.between(period.start_date, period.end_date),
+                EmployeeLoanInstallment.status.in_(OPEN_STATUSES),
+            ).order_by(EmployeeLoanInstallment.employee_id, EmployeeLoanInstallment.due_date,
+                       EmployeeLoanInstallment.installment_number)
+        ).all()
+        for row in installments:
+            amount = min(remaining[row.employee_id], row.open_amount)
+            if amount <= 0:
+                continue
+            # Gekürzter Abzug: record_payment verteilt die Restschuld neu
+            schedule_service.record_payment(
+                session, row.id, amount, payment_date=period.payment_date or period.end_date,
+                employee_loan=True, payslip_id=by_employee[row.employee_id].id
+            )
+            remaining[row.employee_id] -= amount
+            booked += 1
+            total += amount
+
+        unscheduled = session.execute(
+            select(EmployeeLoan).where(
+                EmployeeLoan.id.in_(loan_ids),
+                ~exists().where(EmployeeLoanInstallment.employee_loan_id == EmployeeLoan.id)
+            ).order_by(EmployeeLoan.loan_number).with_for_update()
+        ).scalars().all()
+        for loan in unscheduled:
+            amount = min(remaining[loan.employee_id], loan.monthly_payment, loan.amount_remaining)
+            if amount <= 0:
+                continue
+            loan.amount_repaid = (loan.amount_repaid or 0) + amount
+            loan.amount_remaining -= amount
+            loan.status = "active" if loan.amount_remaining > 0 else "repaid"
+            remaining[loan.employee_id] -= amount
+            booked += 1
+            total += amount
+        return {"loan_installments": booked, "loan_amount": total}
+
+    # ==================== MELDUNGEN ====================
+
+    def period_totals(self, session, tenant_id, year: int, month: int) -> Dict[str, Any]:
+        """Summen aller Abrechnungen einer Periode (eine gruppierte Abfrage)"""
+        row = session.execute(
+            select(
+                func.count(Payslip.id).label("employee_count"),
+                func.coalesce(func.sum(Payslip.gross_salary), 0).label("total_gross"),
+                func.coalesce(func.sum(Payslip.income_tax), 0).label("income_tax"),
+                func.coalesce(func.sum(Payslip.solidarity_tax), 0).label("solidarity_tax"),
+                func.coalesce(func.sum(Payslip.church_tax), 0).label("church_tax"),
+                func.coalesce(func.sum(Payslip.total_social_security_employee), 0).label("sv_employee"),
+                func.coalesce(func.sum(Payslip.total_employer_costs), 0).label("employer_costs"),
+                func.coalesce(func.sum(Payslip.net_salary), 0).label("net"),
+            ).join(
+                PayrollPeriod, PayrollPeriod.id == Payslip.payroll_period_id
+            ).where(
+                Payslip.tenant_id == tenant_id,
+                Payslip.is_deleted == False,
+                PayrollPeriod.year == year,
+                PayrollPeriod.month == month
+            )
+        ).one()
+        return dict(row._mapping)
+
+    def create_tax_report(self, session, tenant_id, year: int, month: int, user_id=None) -> TaxPayrollReport:
+        """Erstellt bzw. aktualisiert die Lohnsteuer-Anmeldung der Periode"""
+        totals = self.period_totals(session, tenant_id, year, month)
+        if not totals["employee_count"]:
+            raise ValueError("Für diese Periode liegen keine Abrechnungen vor")
+        report = session.execute(
+            select(TaxPayrollReport).where(
+                TaxPayrollReport.tenant_id == tenant_id,
+                TaxPayrollReport.year == year,
+                TaxPayrollReport.month == month,
+                TaxPayrollReport.report_type == "monthly"
+            )
+        ).scalar_one_or_none()
+        if report is not None and report.status in ("submitted", "accepted"):
+            raise ValueError("Die Lohnsteuer-Anmeldung wurde bereits übermittelt")
+        if report is None:
+            report = TaxPayrollReport(tenant_id=tenant_id, year=year, month=month,
+                                      report_type="monthly", created_by=user_id)
+            session.add(report)
+
+        report.total_gross = totals["total_gross"]
+        report.income_tax = totals["income_tax"]
+        report.solidarity_tax = totals["solidarity_tax"]
+        report.church_tax = totals["church_tax"]
+        report.total_tax = totals["income_tax"] + totals["solidarity_tax"] + totals["church_tax"]
+        report.employee_count = totals["employee_count"]
+        report.status = "calculated"
+        report.updated_by = user_id
+        # Fällig am 10. des Folgemonats
+        report.due_date = date(year + month // 12, month % 12 + 1, 10)
+        session.flush()
+        return report
+
+    def contribution_summary(self, session, tenant_id, year: int, month: int) -> List[Dict[str, Any]]:
+        """Beitragsnachweis: SV-Beiträge der Periode je Krankenkasse"""
+        rows = session.execute(
+            select(
+                func.coalesce(Payslip.health_insurance_name, "Ohne Krankenkasse").label("insurer"),
+                func.count(Payslip.id).label("employees"),
+                func.sum(Payslip.health_insurance_employee + Payslip.health_insurance_employer).label("kv"),
+                func.sum(Payslip.pension_insurance_employee + Payslip.pension_insurance_employer).label("rv"),
+                func.sum(Payslip.unemployment_insurance_employee + Payslip.unemployment_insurance_employer).label("av"),
+                func.sum(Payslip.nursing_insurance_employee + Payslip.nursing_insurance_surcharge
+                         + Payslip.nursing_insurance_employer).label("pv"),
+                func.sum(Payslip.insolvency_insurance).label("u3"),
+            ).join(
+                PayrollPeriod, PayrollPeriod.id == Payslip.payroll_period_id
+            ).where(
+                Payslip.tenant_id == tenant_id,
+                Payslip.is_deleted == False,
+                PayrollPeriod.year == year,
+                PayrollPeriod.month == month
+            ).group_by("insurer").order_by("insurer")
+        ).all()
+        return [dict(row._mapping) for row in rows]
+
+
+# Globale Instanz
+_payroll_service = None
+
+
+def get_payroll_service() -> PayrollService:
+    """Holt die globale Lohnlauf-Instanz"""
+    global _payroll_service
+    if _payroll_service is None:
+        _payroll_service = PayrollService()
+    return _payroll_service
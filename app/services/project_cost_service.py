@@ -0,0 +1,543 @@
+"""
+Projekt-Kostenübersicht - ereignisgesteuerte Ist-Werte je Projekt
+
+Zeiterfassung, projektbezogene Lagerbewegungen und Rechnungen schreiben ihren
+Beitrag beim Flush der Session als Delta (neuer minus alter Beitrag) in
+project_cost_summaries - ein Upsert je Flush, unabhängig von der Anzahl der
+geänderten Zeilen. Listen lesen die Übersicht per Join statt je Projekt zu
+aggregieren.
+
+rebuild() berechnet die Übersicht mengenbasiert neu. Das ist nötig für den
+ersten Aufbau bestehender Daten und nach Massenimporten über Core-Inserts,
+die keine Session-Events auslösen.
+"""
+import re
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    event, select, case, cast, func, or_, and_, not_, text, inspect, literal, Numeric, DateTime
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from shared.models import (
+    Project, ProjectCostSummary, TimeEntry, StockMovement, Invoice, Employee, Material
+)
+from shared.models.inventory import StockMovementType
+from shared.models.invoice import InvoiceType, InvoiceStatus
+
+
+# Summenfelder der Übersicht
+SUMMARY_FIELDS = (
+    "hours_total", "hours_approved", "hours_planning", "hours_production", "hours_assembly",
+    "overtime_hours", "labor_cost", "material_cost", "invoiced_net", "invoiced_paid",
+    "time_entry_count", "movement_count", "invoice_count",
+)
+
+# Überstunden werden wie im Lohnlauf mit 25 % Zuschlag bewertet
+OVERTIME_FACTOR = Decimal("1.25")
+
+# Zuordnung Tätigkeit -> Phase (erster Treffer gilt)
+PHASE_KEYWORDS = (
+    ("hours_planning", ("plan",)),
+    ("hours_production", ("produk", "abbund", "fertig")),
+    ("hours_assembly", ("montage",)),
+)
+
+# Materialverbrauch auf Projekte: Entnahme und Verschnitt zählen, Rückgaben mindern
+MOVEMENT_SIGNS = {
+    StockMovementType.AUSGANG: 1,
+    StockMovementType.VERSCHNITT: 1,
+    StockMovementType.RUECKGABE: -1,
+}
+
+# Rechnungen ohne Umsatzwirkung
+IGNORED_INVOICE_STATUSES = (InvoiceStatus.DRAFT, InvoiceStatus.CANCELLED)
+NEGATIVE_INVOICE_TYPES = (InvoiceType.CREDIT_NOTE, InvoiceType.CANCELLATION)
+
+# Quellspalten, deren Änderung den Beitrag einer Zeile verändern kann
+TRACKED_COLUMNS = {
+    TimeEntry: ("tenant_id", "project_id", "employee_id", "hours", "overtime_hours",
+                "activity_type", "status", "cost_rate"),
+    StockMovement: ("tenant_id", "reference_type", "reference_id", "material_id",
+                    "movement_type", "quantity", "unit_cost"),
+    Invoice: ("tenant_id", "project_id", "invoice_type", "status", "subtotal",
+              "paid_amount", "is_deleted"),
+}
+
+_NUMBER = re.compile(r'^\s*-?[0-9]+([.,][0-9]+)?\s*$')
+_CENT = Decimal("0.01")
+_PENDING_KEY = "_project_cost_pending"
+
+
+def parse_number(value) -> Decimal:
+    """Zahl aus Text-Spalte - gleiche Regeln wie sql_number()"""
+    if value is None:
+        return Decimal(0)
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    if not _NUMBER.match(value):
+        return Decimal(0)
+    return Decimal(re.sub(r'\s', '', value).replace(',', '.'))
+
+
+def sql_number(col):
+    """SQL-Gegenstück zu parse_number(): ungültige Werte zählen als 0"""
+    return case(
+        (col.op('~')(r'^\s*-?[0-9]+([.,][0-9]+)?\s*$'),
+         cast(func.replace(func.regexp_replace(col, r'\s', '', 'g'), ',', '.'), Numeric)),
+        else_=0
+    )
+
+
+def _round(value: Decimal) -> Decimal:
+    return value.quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+def _phase(activity_type: Optional[str]) -> Optional[str]:
+    activity = (activity_type or "").lower()
+    for field_name, keywords in PHASE_KEYWORDS:
+        if any(keyword in activity for keyword in keywords):
+            return field_name
+    return None
+
+
+def _enum(value, enum_cls):
+    """Enum-Wert auch dann auflösen, wenn er als Text gesetzt wurde"""
+    if value is None or isinstance(value, enum_cls):
+        return value
+    try:
+        return enum_cls(value)
+    except ValueError:
+        return enum_cls[value]
+
+
+def _employee_rate(hourly_rate, monthly_salary, weekly_hours) -> Decimal:
+    """Kostensatz eines Mitarbeiters: Stundenlohn oder Monatsgehalt / (Wochenstunden * 13/3)"""
+    rate = parse_number(hourly_rate)
+    if rate:
+        return _round(rate)
+    salary = parse_number(monthly_salary)
+    if not salary:
+        return Decimal(0)
+    hours = parse_number(weekly_hours) or Decimal(40)
+    return _round(salary / (hours * 13 / 3))
+
+
+# ============== BEITRÄGE JE QUELLZEILE ==============
+
+def _time_entry_contribution(state: dict, rates: dict) -> Optional[Tuple]:
+    if not state["project_id"] or state["status"] == "rejected":
+        return None
+    hours = _round(parse_number(state["hours"]))
+    overtime = _round(parse_number(state["overtime_hours"]))
+    rate = state["cost_rate"]
+    if rate is None:
+        rate = rates.get(state["employee_id"], Decimal(0))
+    total = hours + overtime
+    values = {
+        "hours_total": total,
+        "overtime_hours": overtime,
+        "labor_cost": _round((hours + overtime * OVERTIME_FACTOR) * Decimal(rate)),
+        "time_entry_count": 1,
+    }
+    if state["status"] == "approved":
+        values["hours_approved"] = total
+    phase = _phase(state["activity_type"])
+    if phase:
+        values[phase] = total
+    return state["tenant_id"], state["project_id"], values
+
+
+def _movement_contribution(state: dict, prices: dict) -> Optional[Tuple]:
+    sign = MOVEMENT_SIGNS.get(_enum(state["movement_type"], StockMovementType))
+    if state["reference_type"] != "project" or not state["reference_id"] or not sign:
+        return None
+    unit_cost = state["unit_cost"]
+    if unit_cost is None:
+        unit_cost = prices.get(state["material_id"], Decimal(0))
+    cost = _round(parse_number(state["quantity"]) * Decimal(unit_cost))
+    return state["tenant_id"], state["reference_id"], {
+        "material_cost": sign * cost,
+        "movement_count": 1,
+    }
+
+
+def _invoice_contribution(state: dict, _lookup: dict) -> Optional[Tuple]:
+    status = _enum(state["status"], InvoiceStatus)
+    invoice_type = _enum(state["invoice_type"], InvoiceType) or InvoiceType.INVOICE
+    if (not state["project_id"] or state["is_deleted"] or status is None
+            or status in IGNORED_INVOICE_STATUSES or invoice_type == InvoiceType.PROFORMA):
+        return None
+    sign = -1 if invoice_type in NEGATIVE_INVOICE_TYPES else 1
+    return state["tenant_id"], state["project_id"], {
+        "invoiced_net": sign * _round(parse_number(state["subtotal"])),
+        "invoiced_paid": sign * _round(parse_number(state["paid_amount"])),
+        "invoice_count": 1,
+    }
+
+
+CONTRIBUTIONS = {
+    TimeEntry: _time_entry_contribution,
+    StockMovement: _movement_contribution,
+    Invoice: _invoice_contribution,
+}
+
+
+class ProjectCostService:
+    """Pflegt project_cost_summaries per Delta und baut sie bei Bedarf neu auf"""
+
+    def __init__(self):
+        self._registered = set()
+
+    # ============== EVENT-ANBINDUNG ==============
+
+    def register(self, session_factory):
+        """Flush-Events einer sessionmaker-Instanz abonnieren (mehrfach aufrufbar)"""
+        if id(session_factory) in self._registered:
+            return
+        self._registered.add(id(session_factory))
+        event.listen(session_factory, "before_flush", self._before_flush)
+        event.listen(session_factory, "after_flush", self._after_flush)
+
+    def _before_flush(self, session, flush_context, instances):
+        session.info.pop(_PENDING_KEY, None)
+        pending = []  # (Modell, Objekt, alter Zustand oder None, gelöscht?)
+        to_load = defaultdict(list)
+
+        for obj in session.new:
+            if type(obj) in TRACKED_COLUMNS:
+                pending.append([type(obj), obj, None, False])
+        for obj in session.dirty:
+            model = type(obj)
+            if model in TRACKED_COLUMNS and self._tracked_change(obj, model):
+                pending.append([model, obj, None, False])
+                to_load[model].append(obj.id)
+        for obj in session.deleted:
+            model = type(obj)
+            if model in TRACKED_COLUMNS:
+                pending.append([model, obj, None, True])
+                to_load[model].append(obj.id)
+        if not pending:
+            return
+
+        # Alte Beiträge: je Modell eine Abfrage
+        conn = session.connection()
+        to_load_ids = {obj_id for ids in to_load.values() for obj_id in ids}
+        old_states = {}
+        for model, ids in to_load.items():
+            columns = [model.id] + [getattr(model, name) for name in TRACKED_COLUMNS[model]]
+            for row in conn.execute(select(*columns).where(model.id.in_(ids))):
+                old_states[row[0]] = dict(zip(TRACKED_COLUMNS[model], row[1:]))
+        for entry in pending:
+            if entry[1].id in to_load_ids:
+                entry[2] = old_states.get(entry[1].id)
+
+        self._fill_rates(session, pending)
+        session.info[_PENDING_KEY] = pending
+
+    @staticmethod
+    def _tracked_change(obj, model) -> bool:
+        attrs = inspect(obj).attrs
+        return any(attrs[name].history.has_changes() for name in TRACKED_COLUMNS[model])
+
+    def _fill_rates(self, session, pending):
+        """Kostensätze für neue Zeilen setzen und Ersatzwerte für Altdaten ohne Satz laden"""
+        employee_ids, material_ids = set(), set()
+        for model, obj, old, deleted in pending:
+            states = [old] if deleted else [old, None]
+            for state in states:
+                if model is TimeEntry:
+                    rate = state["cost_rate"] if state else obj.cost_rate
+                    employee = state["employee_id"] if state else obj.employee_id
+                    if rate is None and employee:
+                        employee_ids.add(employee)
+                elif model is StockMovement:
+                    price = state["unit_cost"] if state else obj.unit_cost
+                    material = state["material_id"] if state else obj.material_id
+                    if price is None and material:
+                        material_ids.add(material)
+
+        conn = session.connection()
+        rates, prices = {}, {}
+        if employee_ids:
+            rows = conn.execute(
+                select(Employee.id, Employee.hourly_rate, Employee.monthly_salary, Employee.weekly_hours)
+                .where(Employee.id.in_(employee_ids))
+            )
+            rates = {row[0]: _employee_rate(row[1], row[2], row[3]) for row in rows}
+        if material_ids:
+            rows = conn.execute(
+                select(Material.id, Material.purchase_price).where(Material.id.in_(material_ids))
+            )
+            prices = {
+                row[0]: parse_number(row[1]).quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+                for row in rows
+            }
+
+        for model, obj, old, deleted in pending:
+            if deleted:
+                continue
+            if model is TimeEntry and obj.cost_rate is None and obj.employee_id in rates:
+                obj.cost_rate = rates[obj.employee_id]
+            elif model is StockMovement and obj.unit_cost is None and obj.material_id in prices:
+                obj.unit_cost = prices[obj.material_id]
+        session.info["_project_cost_lookup"] = {TimeEntry: rates, StockMovement: prices, Invoice: {}}
+
+    def _after_flush(self, session, flush_context):
+        pending = session.info.pop(_PENDING_KEY, None)
+        lookup = session.info.pop("_project_cost_lookup", {})
+        if not pending:
+            return
+
+        deltas: Dict = {}
+        for model, obj, old, deleted in pending:
+            contribute = CONTRIBUTIONS[model]
+            if old is not None:
+                self._add(deltas, contribute(old, lookup.get(model, {})), -1)
+            if not deleted:
+                state = {name: getattr(obj, name) for name in TRACKED_COLUMNS[model]}
+                self._add(deltas, contribute(state, lookup.get(model, {})), 1)
+
+        rows = [
+            {"project_id": project_id, "tenant_id": tenant_id, **values}
+            for (tenant_id, project_id), values in deltas.items()
+            if any(values.values())
+        ]
+        if rows:
+            self._apply_deltas(session.connection(), rows)
+
+    @staticmethod
+    def _add(deltas: dict, contribution, sign: int):
+        if contribution is None:
+            return
+        tenant_id, project_id, values = contribution
+        target = deltas.setdefault((tenant_id, project_id), {name: 0 for name in SUMMARY_FIELDS})
+        for name, value in values.items():
+            target[name] += sign * value
+
+    @staticmethod
+    def _apply_deltas(conn, rows: List[dict]):
+        """Ein Upsert für alle betroffenen Projekte: Summe = Summe + Delta"""
+        now = datetime.utcnow()
+        for row in rows:
+            row["updated_at"] = now
+        table = ProjectCostSummary.__table__
+        stmt = pg_insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.project_id],
+            set_={
+                **{name: table.c[name] + stmt.excluded[name] for name in SUMMARY_FIELDS},
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+        conn.execute(stmt)
+
+    # ============== NEUAUFBAU ==============
+
+    def rebuild(self, session, tenant_id=None, project_ids: Iterable = None) -> int:
+        """
+        Übersicht mengenbasiert neu berechnen (alle, je Mandant oder je Projekt).
+
+        Ergänzt zuerst fehlende Kostensätze in Zeiten und Lagerbewegungen, damit
+        spätere Deltas mit denselben Sätzen rechnen. Die Tabellensperre hält
+        gleichzeitige Delta-Upserts an, bis der Neuaufbau committet ist.
+        Gibt die Anzahl der geschriebenen Projekte zurück.
+        """
+        project_ids = list(project_ids) if project_ids is not None else None
+        if project_ids == []:
+            return 0
+        session.execute(text("LOCK TABLE project_cost_summaries IN SHARE ROW EXCLUSIVE MODE"))
+        self._backfill_rates(session, tenant_id, project_ids)
+
+        te_scope = self._scope(TimeEntry.tenant_id, TimeEntry.project_id, tenant_id, project_ids)
+        sm_scope = self._scope(StockMovement.tenant_id, StockMovement.reference_id, tenant_id, project_ids)
+        inv_scope = self._scope(Invoice.tenant_id, Invoice.project_id, tenant_id, project_ids)
+
+        # Zeiterfassung
+        hours = func.round(sql_number(TimeEntry.hours), 2)
+        overtime = func.round(sql_number(TimeEntry.overtime_hours), 2)
+        total = hours + overtime
+        activity = func.lower(func.coalesce(TimeEntry.activity_type, ""))
+        phase_columns, earlier = [], []
+        for field_name, keywords in PHASE_KEYWORDS:
+            matches = or_(*[activity.like(f"%{keyword}%") for keyword in keywords])
+            condition = and_(matches, *[not_(c) for c in earlier])
+            phase_columns.append(func.sum(case((condition, total), else_=0)).label(field_name))
+            earlier.append(matches)
+        times = select(
+            TimeEntry.project_id.label("project_id"),
+            func.sum(total).label("hours_total"),
+            func.sum(case((TimeEntry.status == "approved", total), else_=0)).label("hours_approved"),
+            *phase_columns,
+            func.sum(overtime).label("overtime_hours"),
+            func.sum(func.round(
+                (hours + overtime * OVERTIME_FACTOR) * func.coalesce(TimeEntry.cost_rate, 0), 2
+            )).label("labor_cost"),
+            func.count().label("time_entry_count"),
+        ).where(
+            TimeEntry.project_id.isnot(None),
+            func.coalesce(TimeEntry.status, "") != "rejected",
+            *te_scope
+        ).group_by(TimeEntry.project_id).subquery()
+
+        # Projektbezogene Lagerbewegungen
+        sign = case(
+            *[(StockMovement.movement_type == movement_type, value)
+              for movement_type, value in MOVEMENT_SIGNS.items()],
+            else_=0
+        )
+        movements = select(
+            StockMovement.reference_id.label("project_id"),
+            func.sum(sign * func.round(
+                sql_number(StockMovement.quantity) * func.coalesce(StockMovement.unit_cost, 0), 2
+            )).label("material_cost"),
+            func.count().label("movement_count"),
+        ).where(
+            StockMovement.reference_type == "project",
+            StockMovement.reference_id.isnot(None),
+            StockMovement.movement_type.in_(list(MOVEMENT_SIGNS)),
+            *sm_scope
+        ).group_by(StockMovement.reference_id).subquery()
+
+        # Rechnungen
+        invoice_sign = case((Invoice.invoice_type.in_(NEGATIVE_INVOICE_TYPES), -1), else_=1)
+        invoices = select(
+            Invoice.project_id.label("project_id"),
+            func.sum(invoice_sign * func.round(sql_number(Invoice.subtotal), 2)).label("invoiced_net"),
+            func.sum(invoice_sign * func.round(sql_number(Invoice.paid_amount), 2)).label("invoiced_paid"),
+            func.count().label("invoice_count"),
+        ).where(
+            Invoice.project_id.isnot(None),
+            Invoice.is_deleted == False,
+            Invoice.status.notin_(IGNORED_INVOICE_STATUSES),
+            or_(Invoice.invoice_type.is_(None), Invoice.invoice_type != InvoiceType.PROFORMA),
+            *inv_scope
+        ).group_by(Invoice.project_id).subquery()
+
+        sources = {
+            "hours_total": times, "hours_approved": times, "hours_planning": times,
+            "hours_production": times, "hours_assembly": times, "overtime_hours": times,
+            "labor_cost": times, "time_entry_count": times,
+            "material_cost": movements, "movement_count": movements,
+            "invoiced_net": invoices, "invoiced_paid": invoices, "invoice_count": invoices,
+        }
+        now = datetime.utcnow()
+        query = select(
+            Project.id, Project.tenant_id,
+            *[func.coalesce(sources[name].c[name], 0) for name in SUMMARY_FIELDS],
+            literal(now, DateTime), literal(now, DateTime),
+        ).select_from(Project).outerjoin(
+            times, times.c.project_id == Project.id
+        ).outerjoin(
+            movements, movements.c.project_id == Project.id
+        ).outerjoin(
+            invoices, invoices.c.project_id == Project.id
+        ).where(*self._scope(Project.tenant_id, Project.id, tenant_id, project_ids))
+
+        table = ProjectCostSummary.__table__
+        columns = ["project_id", "tenant_id", *SUMMARY_FIELDS, "updated_at", "rebuilt_at"]
+        stmt = pg_insert(table).from_select(columns, query)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.project_id],
+            set_={name: stmt.excluded[name] for name in columns[1:]}
+        )
+        result = session.execute(stmt)
+        return result.rowcount
+
+    @staticmethod
+    def _scope(tenant_column, project_column, tenant_id, project_ids) -> list:
+        conditions = []
+        if tenant_id is not None:
+            conditions.append(tenant_column == tenant_id)
+        if project_ids is not None:
+            conditions.append(project_column.in_(project_ids))
+        return conditions
+
+    def _backfill_rates(self, session, tenant_id, project_ids):
+        """Fehlende Kostensätze mit den aktuellen Stammdaten festschreiben"""
+        hourly = sql_number(Employee.hourly_rate)
+        weekly = func.coalesce(func.nullif(sql_number(Employee.weekly_hours), 0), 40)
+        rate = func.round(case(
+            (hourly != 0, hourly),
+            else_=sql_number(Employee.monthly_salary) / (weekly * 13 / 3)
+        ), 2)
+        session.execute(
+            TimeEntry.__table__.update()
+            .where(
+                TimeEntry.cost_rate.is_(None),
+                TimeEntry.project_id.isnot(None),
+                TimeEntry.employee_id == Employee.id,
+                *self._scope(TimeEntry.tenant_id, TimeEntry.project_id, tenant_id, project_ids)
+            )
+            .values(cost_rate=rate)
+        )
+        session.execute(
+            StockMovement.__table__.update()
+            .where(
+                StockMovement.unit_cost.is_(None),
+                StockMovement.reference_type == "project",
+                StockMovement.material_id == Material.id,
+                *self._scope(StockMovement.tenant_id, StockMovement.reference_id, tenant_id, project_ids)
+            )
+            .values(unit_cost=func.round(sql_number(Material.purchase_price), 4))
+        )
+
+    # ============== ABFRAGEN ==============
+
+    def get_summaries(self, session, project_ids: Iterable) -> Dict:
+        """Übersichten für mehrere Projekte in einer Abfrage"""
+        project_ids = list(project_ids)
+        if not project_ids:
+            return {}
+        rows = session.execute(
+            select(ProjectCostSummary).where(ProjectCostSummary.project_id.in_(project_ids))
+        ).scalars()
+        return {row.project_id: row for row in rows}
+
+
+# Global instance
+_project_costs = None
+
+
+def get_project_costs() -> ProjectCostService:
+    """Get global project cost service instance"""
+    global _project_costs
+    if _project_costs is None:
+        _project_costs = ProjectCostService()
+    return _project_costs
+
+
+if __name__ == "__main__":
+    # Backfill: python -m app.services.project_cost_service --url postgresql+psycopg2://...
+    import argparse
+    import os
+    import time
+    import uuid
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from shared.database import Base
+
+    parser = argparse.ArgumentParser(description="Projekt-Kostenübersicht neu aufbauen")
+    parser.add_argument("--url", default=os.environ.get("HOLZBAU_DB_URL"),
+                        help="SQLAlchemy-URL der Mandanten-Datenbank (oder HOLZBAU_DB_URL)")
+    parser.add_argument("--tenant", type=uuid.UUID, help="Nur diesen Mandanten neu aufbauen")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("--url oder HOLZBAU_DB_URL erforderlich")
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine, tables=[ProjectCostSummary.__table__], checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE time_entries ADD COLUMN IF NOT EXISTS cost_rate NUMERIC(10,2)"))
+        conn.execute(text("ALTER TABLE stock_movements ADD COLUMN IF NOT EXISTS unit_cost NUMERIC(15,4)"))
+    with Session(engine) as session:
+        started = time.perf_counter()
+        count = get_project_costs().rebuild(session, tenant_id=args.tenant)
+        session.commit()
+        print(f"{count} Projekte neu berechnet in {time.perf_counter() - started:.2f} s")
+    engine.dispose()
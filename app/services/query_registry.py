@@ -0,0 +1,466 @@
+"""
+Query Registry - Named, cached statements for recurring list/count/lookup queries
+
+Statements are built with lambda_stmt(), so SQLAlchemy caches both the Python
+construction and the compiled SQL. The compiled form lives in the engine's
+size-bounded LRU cache (see DatabaseService._create_engine); the registry
+counts compile-cache hits and misses per query name.
+
+List views select only the columns they display (see LIST VIEW PROJECTIONS):
+the wide models (Material has ~200 columns incl. JSONB and long texts) come
+back as lightweight row tuples, and the full entity is loaded by the edit
+dialog via session.get().
+"""
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, List
+import time
+
+from sqlalchemy import event, lambda_stmt, select, func, or_, literal
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+from shared.models import (
+    Customer, CustomerType, Material, MaterialCategory,
+    Invoice, InvoiceStatus, Employee, Order, Project,
+    Supplier, Vehicle, Equipment
+)
+
+# Size of the per-engine LRU cache for compiled statements
+COMPILED_CACHE_SIZE = 1200
+
+# psycopg (3) prepares a statement server-side after this many executions
+PREPARE_THRESHOLD = 5
+
+
+@dataclass
+class QueryStats:
+    """Execution counters for a registered query"""
+    executions: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    total_ms: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "executions": self.executions,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "hit_rate": round(self.hit_rate * 100, 1),
+            "avg_ms": round(self.total_ms / self.executions, 2) if self.executions else 0.0
+        }
+
+
+class QueryRegistry:
+    """Registry of named statement builders with per-query cache statistics"""
+
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, '_initialized'):
+            return
+        self._initialized = True
+        self._builders: Dict[str, Callable[..., Any]] = {}
+        self._stats: Dict[str, QueryStats] = {}
+        self._stats_lock = Lock()
+        self._engines = set()
+
+    def query(self, name: str):
+        """Decorator registering a statement builder under a name"""
+        def decorator(builder: Callable[..., Any]):
+            self._builders[name] = builder
+            self._stats.setdefault(name, QueryStats())
+            return builder
+        return decorator
+
+    def statement(self, name: str, **params):
+        """Build the statement for a registered query"""
+        return self._builders[name](**params)
+
+    def execute(self, session, name: str, **params):
+        """Execute a registered query and return the result"""
+        stmt = self.statement(name, **params)
+        start = time.perf_counter()
+        result = session.execute(stmt, execution_options={"query_name": name})
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            stats = self._stats.setdefault(name, QueryStats())
+            stats.executions += 1
+            stats.total_ms += elapsed_ms
+        return result
+
+    def attach(self, engine):
+        """Start counting compile-cache hits for registered queries on an engine"""
+        if id(engine) in self._engines:
+            return
+        self._engines.add(id(engine))
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        name = context.execution_options.get("query_name") if context else None
+        if not name:
+            return
+        with self._stats_lock:
+            stats = self._stats.setdefault(name, QueryStats())
+            if context.cache_hit is CACHE_HIT:
+                stats.cache_hits += 1
+            elif context.cache_hit is CACHE_MISS:
+                stats.cache_misses += 1
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Counters per query, most executed first"""
+        with self._stats_lock:
+            rows = [{"name": name, **stats.to_dict()} for name, stats in self._stats.items()]
+        return sorted(rows, key=lambda r: r["executions"], reverse=True)
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats = {name: QueryStats() for name in self._builders}
+
+
+def get_query_registry() -> QueryRegistry:
+    """Get the global query registry"""
+    return QueryRegistry()
+
+
+registry = get_query_registry()
+
+
+# ============== LIST VIEW PROJECTIONS ==============
+# Columns shown by the list views. Rows are returned as tuples with attribute
+# access (row.name), so the widgets read them like entities.
+
+CUSTOMER_LIST_COLUMNS = (
+    Customer.id, Customer.customer_number, Customer.customer_type, Customer.status,
+    Customer.company_name, Customer.first_name, Customer.last_name,
+    Customer.email, Customer.phone, Customer.mobile, Customer.city,
+)
+
+MATERIAL_LIST_COLUMNS = (
+    Material.id, Material.article_number, Material.name, Material.category,
+    Material.wood_type, Material.quality_grade, Material.length_mm, Material.width_mm,
+    Material.height_mm, Material.unit, Material.selling_price,
+)
+
+MATERIAL_PICKER_COLUMNS = (
+    Material.id, Material.article_number, Material.name, Material.category,
+    Material.unit, Material.selling_price,
+)
+
+EMPLOYEE_LIST_COLUMNS = (
+    Employee.id, Employee.employee_number, Employee.first_name, Employee.last_name,
+    Employee.position, Employee.department, Employee.email, Employee.phone,
+    Employee.mobile, Employee.status,
+)
+
+SUPPLIER_LIST_COLUMNS = (
+    Supplier.id, Supplier.supplier_number, Supplier.company_name, Supplier.contact_person,
+    Supplier.email, Supplier.phone, Supplier.city, Supplier.payment_terms,
+)
+
+VEHICLE_LIST_COLUMNS = (
+    Vehicle.id, Vehicle.license_plate, Vehicle.vehicle_type, Vehicle.manufacturer,
+    Vehicle.model, Vehicle.status, Vehicle.tuv_due, Vehicle.au_due, Vehicle.uvv_due,
+    Vehicle.current_mileage_km, Vehicle.current_location, Vehicle.gps_enabled,
+)
+
+EQUIPMENT_LIST_COLUMNS = (
+    Equipment.id, Equipment.equipment_number, Equipment.name, Equipment.equipment_type,
+    Equipment.manufacturer, Equipment.model, Equipment.status, Equipment.operating_hours,
+    Equipment.last_maintenance_date, Equipment.next_maintenance_date, Equipment.current_location,
+)
+
+# The project list needs the Project entity (customer relationship, cost
+# summary join), so it loads a load_only() group instead of a row tuple
+PROJECT_LIST_COLUMNS = (
+    Project.project_number, Project.name, Project.project_type, Project.status,
+    Project.site_city, Project.planned_start, Project.contract_value, Project.quoted_value,
+    Project.budget_materials, Project.budget_labor, Project.budget_external,
+    Project.budget_other, Project.actual_cost_external, Project.customer_id,
+)
+
+CUSTOMER_NAME_COLUMNS = (Customer.company_name, Customer.first_name, Customer.last_name)
+
+
+# ============== CUSTOMERS ==============
+
+def _customer_filters(stmt, tenant_id, search, customer_type):
+    if tenant_id:
+        stmt += lambda s: s.where(Customer.tenant_id == tenant_id)
+    if search:
+        term = f"%{search}%"
+        stmt += lambda s: s.where(
+            or_(
+                Customer.customer_number.ilike(term),
+                Customer.company_name.ilike(term),
+                Customer.first_name.ilike(term),
+                Customer.last_name.ilike(term),
+                Customer.email.ilike(term),
+                Customer.city.ilike(term)
+            )
+        )
+    if customer_type:
+        customer_type = CustomerType(customer_type)
+        stmt += lambda s: s.where(Customer.customer_type == customer_type)
+    return stmt
+
+
+@registry.query("customers.list")
+def customers_list(tenant_id=None, search=None, customer_type=None, offset=0, limit=50):
+    stmt = lambda_stmt(lambda: select(*CUSTOMER_LIST_COLUMNS).where(Customer.is_deleted == False))
+    stmt = _customer_filters(stmt, tenant_id, search, customer_type)
+    stmt += lambda s: s.order_by(Customer.created_at.desc()).offset(offset).limit(limit)
+    return stmt
+
+
+@registry.query("customers.count")
+def customers_count(tenant_id=None, search=None, customer_type=None):
+    stmt = lambda_stmt(lambda: select(func.count(Customer.id)).where(Customer.is_deleted == False))
+    return _customer_filters(stmt, tenant_id, search, customer_type)
+
+
+# ============== MATERIALS ==============
+
+def _material_filters(stmt, tenant_id, search, category):
+    if tenant_id:
+        stmt += lambda s: s.where(Material.tenant_id == tenant_id)
+    if search:
+        term = f"%{search}%"
+        stmt += lambda s: s.where(
+            or_(
+                Material.article_number.ilike(term),
+                Material.name.ilike(term),
+                Material.wood_type.ilike(term)
+            )
+        )
+    if category:
+        category = MaterialCategory(category)
+        stmt += lambda s: s.where(Material.category == category)
+    return stmt
+
+
+@registry.query("materials.list")
+def materials_list(tenant_id=None, search=None, category=None):
+    stmt = lambda_stmt(lambda: select(*MATERIAL_LIST_COLUMNS).where(
+        Material.is_deleted == False,
+        Material.is_active == True
+    ))
+    stmt = _material_filters(stmt, tenant_id, search, category)
+    stmt += lambda s: s.order_by(Material.name)
+    return stmt
+
+
+@registry.query("materials.picker")
+def materials_picker(search=None, category=None, limit=100):
+    stmt = lambda_stmt(lambda: select(*MATERIAL_PICKER_COLUMNS).where(
+        Material.is_deleted == False,
+        Material.is_active == True
+    ))
+    stmt = _material_filters(stmt, None, search, category)
+    stmt += lambda s: s.order_by(Material.name).limit(limit)
+    return stmt
+
+
+# ============== SUPPLIERS ==============
+
+@registry.query("suppliers.list")
+def suppliers_list(search=None):
+    stmt = lambda_stmt(lambda: select(*SUPPLIER_LIST_COLUMNS).where(
+        Supplier.is_deleted == False,
+        Supplier.is_active == True
+    ))
+    if search:
+        term = f"%{search}%"
+        stmt += lambda s: s.where(
+            or_(
+                Supplier.supplier_number.ilike(term),
+                Supplier.company_name.ilike(term),
+                Supplier.contact_person.ilike(term),
+                Supplier.city.ilike(term)
+            )
+        )
+    stmt += lambda s: s.order_by(Supplier.company_name)
+    return stmt
+
+
+# ============== FLEET ==============
+
+@registry.query("vehicles.list")
+def vehicles_list(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(*VEHICLE_LIST_COLUMNS).where(Vehicle.is_deleted == False))
+    if tenant_id:
+        stmt += lambda s: s.where(Vehicle.tenant_id == tenant_id)
+    stmt += lambda s: s.order_by(Vehicle.license_plate)
+    return stmt
+
+
+@registry.query("vehicles.combo")
+def vehicles_combo():
+    return lambda_stmt(lambda: select(
+        Vehicle.id, Vehicle.license_plate, Vehicle.manufacturer, Vehicle.model
+    ).where(Vehicle.is_deleted == False).order_by(Vehicle.license_plate))
+
+
+@registry.query("equipment.list")
+def equipment_list(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(*EQUIPMENT_LIST_COLUMNS).where(Equipment.is_deleted == False))
+    if tenant_id:
+        stmt += lambda s: s.where(Equipment.tenant_id == tenant_id)
+    stmt += lambda s: s.order_by(Equipment.equipment_number)
+    return stmt
+
+
+@registry.query("equipment.combo")
+def equipment_combo():
+    return lambda_stmt(lambda: select(
+        Equipment.id, Equipment.equipment_number, Equipment.name
+    ).where(Equipment.is_deleted == False).order_by(Equipment.name))
+
+
+# ============== INVOICES ==============
+
+@registry.query("invoices.list")
+def invoices_list(tenant_id=None, status=None):
+    from sqlalchemy.orm import selectinload
+
+    stmt = lambda_stmt(lambda: select(Invoice).options(
+        selectinload(Invoice.customer)
+    ).where(Invoice.is_deleted == False))
+    if tenant_id:
+        stmt += lambda s: s.where(Invoice.tenant_id == tenant_id)
+    if status:
+        status = InvoiceStatus(status)
+        stmt += lambda s: s.where(Invoice.status == status)
+    stmt += lambda s: s.order_by(Invoice.created_at.desc())
+    return stmt
+
+
+# ============== EMPLOYEES ==============
+
+@registry.query("employees.list")
+def employees_list(search=None, department=None):
+    stmt = lambda_stmt(lambda: select(*EMPLOYEE_LIST_COLUMNS).where(Employee.is_deleted == False))
+    if search:
+        term = f"%{search}%"
+        stmt += lambda s: s.where(
+            or_(
+                Employee.employee_number.ilike(term),
+                Employee.first_name.ilike(term),
+                Employee.last_name.ilike(term),
+                Employee.email.ilike(term)
+            )
+        )
+    if department:
+        stmt += lambda s: s.where(Employee.department == department)
+    stmt += lambda s: s.order_by(Employee.last_name, Employee.first_name)
+    return stmt
+
+
+@registry.query("employees.combo")
+def employees_combo(tenant_id=None, limit=None):
+    stmt = lambda_stmt(lambda: select(
+        Employee.id, Employee.employee_number, Employee.first_name, Employee.last_name
+    ).where(Employee.is_deleted == False))
+    if tenant_id:
+        stmt += lambda s: s.where(Employee.tenant_id == tenant_id)
+    stmt += lambda s: s.order_by(Employee.last_name, Employee.first_name)
+    if limit:
+        stmt += lambda s: s.limit(limit)
+    return stmt
+
+
+# ============== LOOKUPS (id, number, display_name) ==============
+# Used by LookupService; each lookup has a matching change stamp
+# (row count incl. soft-deleted rows, latest updated_at).
+
+@registry.query("customers.lookup")
+def customers_lookup(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(
+        Customer.id, Customer.customer_number,
+        func.coalesce(
+            func.nullif(Customer.company_name, ''),
+            func.concat_ws(' ', Customer.first_name, Customer.last_name)
+        )
+    ).where(Customer.is_deleted == False))
+    if tenant_id:
+        stmt += lambda s: s.where(Customer.tenant_id == tenant_id)
+    stmt += lambda s: s.order_by(Customer.company_name, Customer.last_name)
+    return stmt
+
+
+@registry.query("customers.stamp")
+def customers_stamp(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(func.count(Customer.id), func.max(Customer.updated_at)))
+    if tenant_id:
+        stmt += lambda s: s.where(Customer.tenant_id == tenant_id)
+    return stmt
+
+
+@registry.query("orders.lookup")
+def orders_lookup(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(
+        Order.id, Order.order_number, func.coalesce(Order.subject, literal('Ohne Betreff'))
+    ).where(Order.is_deleted == False))
+    if tenant_id:
+        stmt += lambda s: s.where(Order.tenant_id == tenant_id)
+    stmt += lambda s: s.order_by(Order.created_at.desc())
+    return stmt
+
+
+@registry.query("orders.stamp")
+def orders_stamp(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(func.count(Order.id), func.max(Order.updated_at)))
+    if tenant_id:
+        stmt += lambda s: s.where(Order.tenant_id == tenant_id)
+    return stmt
+
+
+@registry.query("projects.lookup")
+def projects_lookup(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(
+        Project.id, Project.project_number, Project.name
+    ).where(Project.is_deleted == False))
+    if tenant_id:
+        stmt += lambda s: s.where(Project.tenant_id == tenant_id)
+    stmt += lambda s: s.order_by(Project.project_number.desc())
+    return stmt
+
+
+@registry.query("projects.stamp")
+def projects_stamp(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(func.count(Project.id), func.max(Project.updated_at)))
+    if tenant_id:
+        stmt += lambda s: s.where(Project.tenant_id == tenant_id)
+    return stmt
+
+
+@registry.query("employees.lookup")
+def employees_lookup(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(
+        Employee.id, Employee.employee_number,
+        func.concat_ws(' ', Employee.first_name, Employee.last_name)
+    ).where(Employee.is_deleted == False))
+    if tenant_id:
+        stmt += lambda s: s.where(Employee.tenant_id == tenant_id)
+    stmt += lambda s: s.order_by(Employee.last_name, Employee.first_name)
+    return stmt
+
+
+@registry.query("employees.stamp")
+def employees_stamp(tenant_id=None):
+    stmt = lambda_stmt(lambda: select(func.count(Employee.id), func.max(Employee.updated_at)))
+    if tenant_id:
+        stmt += lambda s: s.where(Employee.tenant_id == tenant_id)
+    return stmt
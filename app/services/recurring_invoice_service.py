@@ -0,0 +1,366 @@
+"""
+Abo-Rechnungen - Serienrechnungen aus RecurringInvoice-Vorlagen
+
+Ein Lauf erzeugt für alle fälligen Vorlagen (aktiv, nicht gelöscht,
+next_invoice_date <= Stichtag, Laufzeitende nicht überschritten) die
+Rechnungen der fälligen Leistungszeiträume:
+- Vorlagen samt Rechnungsadresse, Positionen und bereits abgerechnete
+  Zeiträume werden mit drei Abfragen geladen, unabhängig von der Anzahl
+- Beträge werden mit Decimal gerechnet (kaufmännisch auf Cent gerundet,
+  Umsatzsteuer je Steuersatz auf die Nettosumme)
+- je Mandant eine Transaktion: Rechnungsnummern je Jahr des Rechnungsdatums
+  als Block reservieren, Rechnungen und Positionen per Bulk-Insert anlegen,
+  next_invoice_date der Vorlagen in einem Update fortschreiben
+
+Jede Rechnung trägt Vorlage und Beginn des Leistungszeitraums
+(recurring_invoice_id, recurring_period_start, Unique-Index). Bereits
+abgerechnete Zeiträume werden übersprungen, ein erneuter Lauf legt also
+nichts doppelt an - auch nicht nach einem Abbruch zwischen Insert und
+Fortschreiben der Vorlage.
+"""
+import calendar
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert, or_, select, update
+
+from shared.models import (
+    Customer, Invoice, InvoiceItem, InvoiceStatus, InvoiceType, RecurringInvoice, RecurringInvoiceItem
+)
+from app.services.invoice_number_service import allocate_invoice_numbers
+from app.services.project_cost_service import parse_number
+
+
+FREQUENCY_MONTHS = {
+    "monthly": 1,
+    "quarterly": 3,
+    "halfyearly": 6,
+    "yearly": 12,
+}
+
+FREQUENCY_LABELS = {
+    "monthly": "Monatlich",
+    "quarterly": "Vierteljährlich",
+    "halfyearly": "Halbjährlich",
+    "yearly": "Jährlich",
+}
+
+# Höchstens so viele Zeiträume je Vorlage und Lauf nachholen
+MAX_CATCH_UP = 24
+
+_CENT = Decimal("0.01")
+
+
+def _round(value: Decimal) -> Decimal:
+    return value.quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+def _money(value: Decimal) -> str:
+    return str(_round(value))
+
+
+def _rate(value: Decimal) -> str:
+    """Steuersatz ohne überflüssige Nachkommastellen (19, 7, 10.7)"""
+    return format(value.normalize(), "f")
+
+
+def add_months(day: date, months: int, anchor_day: Optional[int] = None) -> date:
+    """Monate addieren; anchor_day hält z.B. den 31. über kurze Monate hinweg"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, min(anchor_day or day.day, last_day))
+
+
+def due_periods(start_date: date, next_date: Optional[date], end_date: Optional[date],
+                frequency: str, run_date: date, limit: int = MAX_CATCH_UP) -> Tuple[List[Tuple[date, date]], date]:
+    """Fällige Leistungszeiträume (Beginn, Ende) und das neue next_invoice_date"""
+    months = FREQUENCY_MONTHS[frequency]
+    current = next_date or start_date
+    # Stichtag der Vorlage beibehalten (31. -> 28.02. -> 31.03.), außer next_invoice_date wurde verschoben
+    month_end = calendar.monthrange(current.year, current.month)[1]
+    anchor = start_date.day if current.day == min(start_date.day, month_end) else current.day
+    periods = []
+    while current <= run_date and (end_date is None or current <= end_date) and len(periods) < limit:
+        following = add_months(current, months, anchor)
+        period_end = following - timedelta(days=1)
+        if end_date is not None and period_end > end_date:
+            period_end = end_date
+        periods.append((current, period_end))
+        current = following
+    return periods, current
+
+
+def calculate_items(items) -> Tuple[List[dict], Dict[Decimal, Decimal]]:
+    """Positionsbeträge und Nettosummen je Steuersatz"""
+    lines, bases = [], defaultdict(Decimal)
+    for item in items:
+        quantity = parse_number(item.quantity)
+        unit_price = parse_number(item.unit_price)
+        tax_rate = parse_number(item.tax_rate)
+        subtotal = _round(quantity * unit_price)
+        tax = _round(subtotal * tax_rate / 100)
+        bases[tax_rate] += subtotal
+        lines.append({
+            "position": item.position,
+            "title": item.title,
+            "description": item.description,
+            "quantity": item.quantity or "1",
+            "unit": item.unit or "STK",
+            "unit_price": item.unit_price or "0",
+            "tax_rate": _rate(tax_rate),
+            "subtotal": _money(subtotal),
+            "tax_amount": _money(tax),
+            "total": _money(subtotal + tax),
+        })
+    return lines, dict(bases)
+
+
+def calculate_totals(bases: Dict[Decimal, Decimal]) -> dict:
+    """Rechnungssummen; Steuer je Satz auf die Nettosumme, höchster Satz in Spalte 1"""
+    taxes = [(rate, base, _round(base * rate / 100)) for rate, base in sorted(bases.items(), reverse=True)]
+    subtotal = sum((base for _, base, _ in taxes), Decimal(0))
+    total_tax = sum((tax for _, _, tax in taxes), Decimal(0))
+    first = taxes[0] if taxes else (Decimal(19), Decimal(0), Decimal(0))
+    second = taxes[1] if len(taxes) > 1 else None
+    return {
+        "subtotal": _money(subtotal),
+        "tax_rate_1": _rate(first[0]),
+        "tax_base_1": _money(first[1]),
+        "tax_amount_1": _money(first[2]),
+        "tax_rate_2": _rate(second[0]) if second else None,
+        "tax_base_2": _money(second[1]) if second else None,
+        "tax_amount_2": _money(second[2]) if second else None,
+        "total_tax": _money(total_tax),
+        "total": _money(subtotal + total_tax),
+    }
+
+
+class RecurringInvoiceService:
+    """Erzeugt die fälligen Rechnungen aller Abo-Vorlagen"""
+
+    def _due_filter(self, run_date: date, tenant_id=None):
+        next_date = func.coalesce(RecurringInvoice.next_invoice_date, RecurringInvoice.start_date)
+        conditions = [
+            RecurringInvoice.is_active.is_(True),
+            RecurringInvoice.is_deleted.is_(False),
+            RecurringInvoice.frequency.in_(list(FREQUENCY_MONTHS)),
+            next_date <= run_date,
+            or_(RecurringInvoice.end_date.is_(None), next_date <= RecurringInvoice.end_date),
+        ]
+        if tenant_id:
+            conditions.append(RecurringInvoice.tenant_id == tenant_id)
+        return and_(*conditions)
+
+    def load_due(self, session, run_date: date, tenant_id=None):
+        """Fällige Vorlagen, ihre Positionen und bereits abgerechnete Zeiträume (drei Abfragen)"""
+        due = self._due_filter(run_date, tenant_id)
+        templates = session.execute(
+            select(
+                RecurringInvoice.id, RecurringInvoice.tenant_id, RecurringInvoice.customer_id,
+                RecurringInvoice.project_id, RecurringInvoice.name, RecurringInvoice.frequency,
+                RecurringInvoice.start_date, RecurringInvoice.end_date, RecurringInvoice.next_invoice_date,
+                RecurringInvoice.subject, RecurringInvoice.intro_text, RecurringInvoice.closing_text,
+                RecurringInvoice.payment_terms_days,
+                Customer.company_name, Customer.first_name, Customer.last_name, Customer.street,
+                Customer.street_number, Customer.postal_code, Customer.city, Customer.country,
+            )
+            .join(Customer, Customer.id == RecurringInvoice.customer_id)
+            .where(due, Customer.is_deleted.is_(False))
+            .order_by(RecurringInvoice.tenant_id, RecurringInvoice.next_invoice_date, RecurringInvoice.id)
+        ).all()
+        if not templates:
+            return [], {}, set()
+
+        due_ids = select(RecurringInvoice.id).where(due)
+        items = defaultdict(list)
+        for item in session.execute(
+            select(
+                RecurringInvoiceItem.recurring_invoice_id, RecurringInvoiceItem.position,
+                RecurringInvoiceItem.title, RecurringInvoiceItem.description, RecurringInvoiceItem.quantity,
+                RecurringInvoiceItem.unit, RecurringInvoiceItem.unit_price, RecurringInvoiceItem.tax_rate,
+            )
+            .where(RecurringInvoiceItem.recurring_invoice_id.in_(due_ids))
+            .order_by(RecurringInvoiceItem.recurring_invoice_id, RecurringInvoiceItem.position)
+        ):
+            items[item.recurring_invoice_id].append(item)
+
+        billed = set(session.execute(
+            select(Invoice.recurring_invoice_id, Invoice.recurring_period_start)
+            .join(RecurringInvoice, RecurringInvoice.id == Invoice.recurring_invoice_id)
+            .where(
+                Invoice.recurring_invoice_id.in_(due_ids),
+                Invoice.recurring_period_start >= func.coalesce(
+                    RecurringInvoice.next_invoice_date, RecurringInvoice.start_date
+                ),
+            )
+        ).all())
+        return templates, items, billed
+
+    def _invoice_row(self, template, period: Tuple[date, date], number: str, totals: dict,
+                     status: InvoiceStatus, user_id, now: datetime) -> dict:
+        period_start, period_end = period
+        terms = template.payment_terms_days if template.payment_terms_days is not None else 30
+        name = " ".join(part for part in (template.first_name, template.last_name) if part)
+        return {
+            "id": uuid.uuid4(),
+            "tenant_id": template.tenant_id,
+            "invoice_number": number,
+            "customer_id": template.customer_id,
+            "project_id": template.project_id,
+            "invoice_type": InvoiceType.INVOICE,
+            "status": status,
+            "invoice_date": period_start,
+            "due_date": period_start + timedelta(days=terms),
+            "reference": f"Leistungszeitraum {period_start:%d.%m.%Y} - {period_end:%d.%m.%Y}",
+            "subject": template.subject or template.name,
+            "billing_company": template.company_name,
+            "billing_name": name or None,
+            "billing_street": template.street,
+            "billing_street_number": template.street_number,
+            "billing_postal_code": template.postal_code,
+            "billing_city": template.city,
+            "billing_country": template.country or "Deutschland",
+            "intro_text": template.intro_text,
+            "closing_text": template.closing_text,
+            **totals,
+            "discount_percent": "0",
+            "discount_amount": "0",
+            "paid_amount": "0",
+            "remaining_amount": totals["total"],
+            "payment_terms_days": terms,
+            "dunning_level": 0,
+            "custom_fields": {},
+            "recurring_invoice_id": template.id,
+            "recurring_period_start": period_start,
+            "is_deleted": False,
+            "created_by": user_id,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    @staticmethod
+    def _allocate_numbers(session, years: List[int]) -> List[str]:
+        """Rechnungsnummern im Jahr des Rechnungsdatums, je Jahr ein Block (Reihenfolge wie years)"""
+        blocks = {year: iter(allocate_invoice_numbers(session, years.count(year), year))
+                  for year in sorted(set(years))}
+        return [next(blocks[year]) for year in years]
+
+    def _run_tenant(self, session, templates, items, billed, run_date: date,
+                    status: InvoiceStatus, user_id) -> dict:
+        """Rechnungen eines Mandanten anlegen - eine Transaktion, Commit durch den Aufrufer"""
+        now = datetime.utcnow()
+        pending, template_updates, computed, skipped = [], [], {}, 0
+        for template in templates:
+            template_items = items.get(template.id)
+            if not template_items:
+                skipped += 1
+                continue
+            periods, next_date = due_periods(
+                template.start_date, template.next_invoice_date, template.end_date, template.frequency, run_date
+            )
+            lines, bases = calculate_items(template_items)
+            totals = calculate_totals(bases)
+            computed[template.id] = (lines, totals)
+            for period in periods:
+                if (template.id, period[0]) not in billed:
+                    pending.append((template, period))
+            template_updates.append({
+                "id": template.id,
+                "next_invoice_date": next_date,
+                "is_active": template.end_date is None or next_date <= template.end_date,
+                "subtotal": totals["subtotal"],
+                "tax_amount": totals["total_tax"],
+                "total": totals["total"],
+                "updated_at": now,
+            })
+
+        invoice_rows, item_rows = [], []
+        numbers = self._allocate_numbers(session, [period[0].year for _, period in pending])
+        for (template, period), number in zip(pending, numbers):
+            lines, totals = computed[template.id]
+            invoice = self._invoice_row(template, period, number, totals, status, user_id, now)
+            invoice_rows.append(invoice)
+            item_rows.extend(
+                {**line, "id": uuid.uuid4(), "invoice_id": invoice["id"], "item_type": "service",
+                 "discount_percent": "0", "created_at": now, "updated_at": now}
+                for line in lines
+            )
+
+        if invoice_rows:
+            session.execute(insert(Invoice), invoice_rows)
+            session.execute(insert(InvoiceItem), item_rows)
+        if template_updates:
+            session.execute(update(RecurringInvoice), template_updates)
+        return {
+            "invoices": len(invoice_rows),
+            "items": len(item_rows),
+            "templates": len(template_updates),
+            "skipped": skipped,
+            "invoice_numbers": numbers,
+        }
+
+    def run(self, session, run_date: Optional[date] = None, tenant_id=None, user_id=None,
+            status: InvoiceStatus = InvoiceStatus.DRAFT) -> dict:
+        """Alle fälligen Abo-Rechnungen bis run_date erzeugen (je Mandant ein Commit)"""
+        run_date = run_date or date.today()
+        started = time.perf_counter()
+        templates, items, billed = self.load_due(session, run_date, tenant_id)
+
+        by_tenant = defaultdict(list)
+        for template in templates:
+            by_tenant[template.tenant_id].append(template)
+
+        summary = {"invoices": 0, "items": 0, "templates": 0, "skipped": 0,
+                   "tenants": 0, "errors": {}, "invoice_numbers": []}
+        for current_tenant, tenant_templates in by_tenant.items():
+            try:
+                result = self._run_tenant(session, tenant_templates, items, billed, run_date, status, user_id)
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                print(f"Abo-Rechnungen für Mandant {current_tenant} fehlgeschlagen: {e}")
+                summary["errors"][current_tenant] = str(e)
+                continue
+            summary["tenants"] += 1
+            for key in ("invoices", "items", "templates", "skipped"):
+                summary[key] += result[key]
+            summary["invoice_numbers"].extend(result["invoice_numbers"])
+        session.commit()
+        summary["seconds"] = time.perf_counter() - started
+        return summary
+
+    def preview(self, session, run_date: Optional[date] = None, tenant_id=None) -> dict:
+        """Anzahl und Summe der Rechnungen, die ein Lauf erzeugen würde (ohne Schreiben)"""
+        run_date = run_date or date.today()
+        templates, items, billed = self.load_due(session, run_date, tenant_id)
+        count, total = 0, Decimal(0)
+        for template in templates:
+            template_items = items.get(template.id)
+            if not template_items:
+                continue
+            periods, _ = due_periods(
+                template.start_date, template.next_invoice_date, template.end_date, template.frequency, run_date
+            )
+            open_periods = sum(1 for period in periods if (template.id, period[0]) not in billed)
+            if open_periods:
+                _, bases = calculate_items(template_items)
+                count += open_periods
+                total += Decimal(calculate_totals(bases)["total"]) * open_periods
+        return {"templates": len(templates), "invoices": count, "total": total}
+
+
+# Global instance
+_recurring_invoice_service = None
+
+
+def get_recurring_invoice_service() -> RecurringInvoiceService:
+    """Get global recurring invoice service instance"""
+    global _recurring_invoice_service
+    if _recurring_invoice_service is None:
+        _recurring_invoice_service = RecurringInvoiceService()
+    return _recurring_invoice_service
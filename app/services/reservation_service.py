@@ -0,0 +1,358 @@
+"""
+Reservierungen für Fahrzeuge und Geräte
+
+Jede Reservierung belegt einen Zeitraum period = [Beginn, Ende) als tsrange.
+Zwei GiST-Exclusion-Constraints (je Fahrzeug bzw. Gerät) lassen die Datenbank
+überlappende Buchungen atomar ablehnen - auch bei gleichzeitigen Sitzungen.
+Fehlt btree_gist und damit die Constraints, prüft der Service Überschneidungen
+selbst - unter einem Advisory-Lock je Ressource bis zum Ende der Transaktion.
+Die Verfügbarkeit vieler Ressourcen über einen Zeitraum liefert eine einzige
+Abfrage über den GiST-Index; freie Zeitfenster und belegte Tage werden
+daraus in Python berechnet.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, func, or_, literal, text
+from sqlalchemy.dialects.postgresql import Range
+from sqlalchemy.exc import IntegrityError
+
+from shared.models import EquipmentReservation, Vehicle, Equipment
+from shared.models.fleet import EquipmentType, RESERVATION_EXCLUSIONS, reservation_exclusion_ddl
+
+
+# Stornierte Reservierungen blockieren nichts (siehe Constraint-Bedingung)
+INACTIVE_STATUSES = ("cancelled",)
+
+CRANE_TYPES = (EquipmentType.AUTOKRAN, EquipmentType.MOBILKRAN)
+
+_TIME = re.compile(r'^([01]?[0-9]|2[0-3]):[0-5][0-9]$')
+_TIME_SQL = "'^([01]?[0-9]|2[0-3]):[0-5][0-9]$'"
+
+# Zeitraum aus den bisherigen Spalten
+PERIOD_SQL = (
+    "tsrange("
+    f"start_date + CASE WHEN start_time ~ {_TIME_SQL} THEN start_time::time ELSE time '00:00' END, "
+    "GREATEST("
+    f"CASE WHEN end_time ~ {_TIME_SQL} THEN end_date + end_time::time ELSE (end_date + 1) + time '00:00' END, "
+    f"start_date + CASE WHEN start_time ~ {_TIME_SQL} THEN start_time::time ELSE time '00:00' END), "
+    "'[)')"
+)
+
+# Einmalige Datenübernahme, direkt nach dem Anlegen der Spalte period
+PERIOD_BACKFILL = f"UPDATE equipment_reservations SET period = {PERIOD_SQL} WHERE period IS NULL"
+
+
+def reservation_migrations() -> List[Tuple[str, str, str]]:
+    """
+    Index-Migrationen für bestehende Datenbanken: (Tabelle, Name, DDL).
+
+    Legt die Exclusion-Constraints an. Ohne btree_gist (bzw. bei bestehenden
+    Überschneidungen) meldet die Migration eine Warnung und wird beim nächsten
+    Start erneut versucht; bis dahin prüft der Service selbst.
+    """
+    migrations = []
+    for column, name in RESERVATION_EXCLUSIONS:
+        migrations.append(("equipment_reservations", name, (
+            "DO $$ BEGIN "
+            f"IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = '{name}') THEN "
+            "CREATE EXTENSION IF NOT EXISTS btree_gist; "
+            f"{reservation_exclusion_ddl(column, name)}; "
+            "END IF; END $$"
+        )))
+    return migrations
+
+
+def reservation_period(start_date: date, start_time: Optional[str],
+                       end_date: date, end_time: Optional[str]) -> Tuple[datetime, datetime]:
+    """Zeitraum [Beginn, Ende) - ohne Uhrzeit gilt der ganze Tag"""
+    start = datetime.combine(start_date, _parse_time(start_time) or time(0, 0))
+    end_clock = _parse_time(end_time)
+    if end_clock is None:
+        end = datetime.combine(end_date + timedelta(days=1), time(0, 0))
+    else:
+        end = datetime.combine(end_date, end_clock)
+    return start, end
+
+
+def _parse_time(value: Optional[str]) -> Optional[time]:
+    if not value or not _TIME.match(value.strip()):
+        return None
+    hours, minutes = value.strip().split(":")
+    return time(int(hours), int(minutes))
+
+
+class ReservationConflict(ValueError):
+    """Zeitraum überschneidet sich mit bestehenden Reservierungen"""
+
+    def __init__(self, conflicts: List[EquipmentReservation]):
+        self.conflicts = conflicts
+        periods = ", ".join(
+            f"{r.period.lower:%d.%m.%Y %H:%M} - {r.period.upper:%d.%m.%Y %H:%M}"
+            for r in conflicts if r.period is not None
+        )
+        super().__init__(f"Ressource bereits reserviert: {periods or 'Überschneidung'}")
+
+
+@dataclass
+class AssetAvailability:
+    """Belegung einer Ressource im abgefragten Zeitraum"""
+    asset_type: str  # vehicle, equipment
+    asset_id: object
+    busy: List[Tuple[datetime, datetime]] = field(default_factory=list)
+    free: List[Tuple[datetime, datetime]] = field(default_factory=list)
+    busy_hours_by_day: Dict[date, float] = field(default_factory=dict)
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        return any(lo <= start and end <= hi for lo, hi in self.free)
+
+
+class ReservationService:
+    """Anlegen, Ändern und Stornieren von Reservierungen sowie Verfügbarkeit"""
+
+    def __init__(self):
+        # Datenbanken (URL), in denen die Exclusion-Constraints nachweislich existieren
+        self._enforced = set()
+
+    # ============== SCHREIBEN ==============
+
+    def reserve(self, session, tenant_id, start_date: date, end_date: date,
+                start_time: str = None, end_time: str = None,
+                vehicle_id=None, equipment_id=None, **fields) -> EquipmentReservation:
+        """
+        Reservierung anlegen. Überschneidungen lehnt der Exclusion-Constraint ab
+        (ohne Constraint die Prüfung unter Advisory-Lock); der Fehler wird als
+        ReservationConflict mit den kollidierenden Reservierungen gemeldet.
+        Die Transaktion des Aufrufers bleibt nutzbar.
+        """
+        if bool(vehicle_id) == bool(equipment_id):
+            raise ValueError("Genau ein Fahrzeug oder ein Gerät angeben")
+        reservation = EquipmentReservation(
+            tenant_id=tenant_id, vehicle_id=vehicle_id, equipment_id=equipment_id,
+            status=fields.pop("status", "pending"), **fields
+        )
+        self._set_period(reservation, start_date, start_time, end_date, end_time)
+        self._write_checked(session, reservation, lambda: session.add(reservation))
+        return reservation
+
+    def reschedule(self, session, reservation: EquipmentReservation, start_date: date, end_date: date,
+                   start_time: str = None, end_time: str = None) -> EquipmentReservation:
+        """Zeitraum einer Reservierung ändern"""
+        self._write_checked(session, reservation, lambda: self._set_period(
+            reservation, start_date, start_time, end_date, end_time
+        ))
+        return reservation
+
+    def set_status(self, session, reservation: EquipmentReservation, status: str) -> EquipmentReservation:
+        """Status setzen - die Reaktivierung einer stornierten Reservierung wird ebenfalls geprüft"""
+        self._write_checked(session, reservation, lambda: setattr(reservation, "status", status))
+        return reservation
+
+    def _set_period(self, reservation, start_date, start_time, end_date, end_time):
+        start, end = reservation_period(start_date, start_time, end_date, end_time)
+        if end <= start:
+            raise ValueError("Das Ende der Reservierung muss nach dem Beginn liegen")
+        reservation.start_date, reservation.start_time = start_date, start_time
+        reservation.end_date, reservation.end_time = end_date, end_time
+        reservation.period = Range(start, end, bounds="[)")
+
+    def _write_checked(self, session, reservation, change):
+        """Änderung in einem Savepoint schreiben und Exclusion-Verletzungen übersetzen"""
+        savepoint = session.begin_nested()
+        try:
+            with session.no_autoflush:
+                change()
+                attempted = (reservation.period, reservation.vehicle_id, reservation.equipment_id, reservation.id)
+                if not self._exclusions_active(session):
+                    self._check_overlap(session, reservation, *attempted)
+            session.flush()
+            savepoint.commit()
+        except IntegrityError as e:
+            savepoint.rollback()
+            if getattr(e.orig, "pgcode", None) != "23P01":  # exclusion_violation
+                raise
+            period, vehicle_id, equipment_id, reservation_id = attempted
+            raise ReservationConflict(self.find_conflicts(
+                session, period.lower, period.upper, vehicle_id=vehicle_id,
+                equipment_id=equipment_id, exclude_id=reservation_id
+            )) from None
+        except Exception:
+            savepoint.rollback()
+            raise
+
+    def _exclusions_active(self, session) -> bool:
+        """Sind die Exclusion-Constraints angelegt? Positive Antwort wird je Datenbank gemerkt"""
+        key = str(session.get_bind().url)
+        if key in self._enforced:
+            return True
+        names = [name for _, name in RESERVATION_EXCLUSIONS]
+        found = session.execute(
+            text("SELECT count(*) FROM pg_constraint WHERE conname = ANY(:names)"), {"names": names}
+        ).scalar()
+        if found == len(names):
+            self._enforced.add(key)
+            return True
+        return False
+
+    def _check_overlap(self, session, reservation, period, vehicle_id, equipment_id, reservation_id):
+        """Ersatz für die Constraints: Ressource bis Transaktionsende sperren, dann Überschneidungen suchen"""
+        if (reservation.status or "pending") in INACTIVE_STATUSES:
+            return
+        session.execute(select(func.pg_advisory_xact_lock(
+            func.hashtext(f"reservation:{vehicle_id or equipment_id}")
+        )))
+        conflicts = self.find_conflicts(
+            session, period.lower, period.upper, vehicle_id=vehicle_id,
+            equipment_id=equipment_id, exclude_id=reservation_id
+        )
+        if conflicts:
+            raise ReservationConflict(conflicts)
+
+    # ============== LESEN ==============
+
+    def find_conflicts(self, session, start: datetime, end: datetime, vehicle_id=None,
+                       equipment_id=None, exclude_id=None) -> List[EquipmentReservation]:
+        """Aktive Reservierungen derselben Ressource, die [start, end) überlappen"""
+        query = select(EquipmentReservation).where(
+            EquipmentReservation.period.op("&&")(Range(start, end, bounds="[)")),
+            func.coalesce(EquipmentReservation.status, "pending").notin_(INACTIVE_STATUSES),
+        ).order_by(EquipmentReservation.period)
+        if vehicle_id:
+            query = query.where(EquipmentReservation.vehicle_id == vehicle_id)
+        else:
+            query = query.where(EquipmentReservation.equipment_id == equipment_id)
+        if exclude_id:
+            query = query.where(EquipmentReservation.id != exclude_id)
+        return list(session.execute(query).scalars())
+
+    def availability(self, session, tenant_id, start_date: date, end_date: date,
+                     vehicle_ids: Iterable = None, equipment_ids: Iterable = None,
+                     day_start: time = time(0, 0), day_end: time = None) -> List[AssetAvailability]:
+        """
+        Belegung und freie Zeitfenster vieler Ressourcen von start_date bis
+        einschließlich end_date - eine Abfrage für alle Ressourcen.
+
+        Ohne Ressourcenlisten werden alle Fahrzeuge und Geräte des Mandanten
+        geliefert. Mit day_start/day_end werden freie Fenster auf die
+        Arbeitszeit je Tag beschränkt.
+        """
+        window_start = datetime.combine(start_date, time(0, 0))
+        window_end = datetime.combine(end_date + timedelta(days=1), time(0, 0))
+        window = Range(window_start, window_end, bounds="[)")
+
+        assets = self._asset_list(session, tenant_id, vehicle_ids, equipment_ids)
+        result = {key: AssetAvailability(*key) for key in assets}
+        if not result:
+            return []
+
+        # Nur der im Fenster liegende Teil jeder Buchung (Range-Schnittmenge)
+        clipped = EquipmentReservation.period.op("*")(literal(window, EquipmentReservation.period.type))
+        ids_vehicle = [asset_id for kind, asset_id in assets if kind == "vehicle"]
+        ids_equipment = [asset_id for kind, asset_id in assets if kind == "equipment"]
+        rows = session.execute(
+            select(
+                EquipmentReservation.vehicle_id, EquipmentReservation.equipment_id,
+                func.lower(clipped), func.upper(clipped)
+            ).where(
+                EquipmentReservation.period.op("&&")(literal(window, EquipmentReservation.period.type)),
+                func.coalesce(EquipmentReservation.status, "pending").notin_(INACTIVE_STATUSES),
+                or_(
+                    EquipmentReservation.vehicle_id.in_(ids_vehicle),
+                    EquipmentReservation.equipment_id.in_(ids_equipment),
+                ),
+            ).order_by(func.lower(clipped))
+        ).all()
+
+        for vehicle_id, equipment_id, lower, upper in rows:
+            key = ("vehicle", vehicle_id) if vehicle_id else ("equipment", equipment_id)
+            entry = result.get(key)
+            if entry is None:
+                continue
+            if entry.busy and lower <= entry.busy[-1][1]:
+                entry.busy[-1] = (entry.busy[-1][0], max(entry.busy[-1][1], upper))
+            else:
+                entry.busy.append((lower, upper))
+
+        for entry in result.values():
+            entry.busy_hours_by_day = _hours_by_day(entry.busy)
+            entry.free = _free_slots(entry.busy, start_date, end_date, day_start, day_end)
+        return list(result.values())
+
+    def busy_days(self, availability: List[AssetAvailability]) -> Dict[date, Tuple[int, int]]:
+        """Je Tag: (Ressourcen mit Buchung, davon ganztägig belegt) - für die Kalenderschattierung"""
+        days: Dict[date, List[int]] = {}
+        for entry in availability:
+            for day, hours in entry.busy_hours_by_day.items():
+                counts = days.setdefault(day, [0, 0])
+                counts[0] += 1
+                if hours >= 24:
+                    counts[1] += 1
+        return {day: tuple(counts) for day, counts in days.items()}
+
+    def _asset_list(self, session, tenant_id, vehicle_ids, equipment_ids) -> List[Tuple[str, object]]:
+        if vehicle_ids is None and equipment_ids is None:
+            vehicle_query = select(Vehicle.id).where(Vehicle.is_deleted == False)
+            equipment_query = select(Equipment.id).where(Equipment.is_deleted == False)
+            if tenant_id:
+                vehicle_query = vehicle_query.where(Vehicle.tenant_id == tenant_id)
+                equipment_query = equipment_query.where(Equipment.tenant_id == tenant_id)
+            vehicle_ids = session.execute(vehicle_query).scalars().all()
+            equipment_ids = session.execute(equipment_query).scalars().all()
+        return ([("vehicle", asset_id) for asset_id in vehicle_ids or []]
+                + [("equipment", asset_id) for asset_id in equipment_ids or []])
+
+
+def _hours_by_day(busy: List[Tuple[datetime, datetime]]) -> Dict[date, float]:
+    hours: Dict[date, float] = {}
+    for lower, upper in busy:
+        cursor = lower
+        while cursor < upper:
+            next_day = datetime.combine(cursor.date() + timedelta(days=1), time(0, 0))
+            segment_end = min(upper, next_day)
+            hours[cursor.date()] = hours.get(cursor.date(), 0.0) + (segment_end - cursor).total_seconds() / 3600
+            cursor = segment_end
+    return hours
+
+
+def _free_slots(busy, start_date: date, end_date: date, day_start: time,
+                day_end: Optional[time]) -> List[Tuple[datetime, datetime]]:
+    """Freie Fenster je Tag innerhalb [day_start, day_end) abzüglich der Buchungen"""
+    free = []
+    index = 0
+    day = start_date
+    while day <= end_date:
+        slot_start = datetime.combine(day, day_start)
+        slot_end = datetime.combine(day, day_end) if day_end else datetime.combine(day + timedelta(days=1), time(0, 0))
+        while index < len(busy) and busy[index][1] <= slot_start:
+            index += 1
+        cursor, i = slot_start, index
+        while i < len(busy) and busy[i][0] < slot_end:
+            if busy[i][0] > cursor:
+                free.append((cursor, busy[i][0]))
+            cursor = max(cursor, busy[i][1])
+            i += 1
+        if cursor < slot_end:
+            free.append((cursor, slot_end))
+        day += timedelta(days=1)
+    # Angrenzende Fenster über Mitternacht zusammenfassen
+    merged = []
+    for lower, upper in free:
+        if merged and merged[-1][1] == lower:
+            merged[-1] = (merged[-1][0], upper)
+        else:
+            merged.append((lower, upper))
+    return merged
+
+
+# Global instance
+_reservation_service = None
+
+
+def get_reservation_service() -> ReservationService:
+    """Get global reservation service instance"""
+    global _reservation_service
+    if _reservation_service is None:
+        _reservation_service = ReservationService()
+    return _reservation_service
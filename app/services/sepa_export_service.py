@@ -0,0 +1,662 @@
+"""
+SEPA-Export - pain.001 (Überweisungen) und pain.008 (Lastschriften) für SepaBatch
+
+Ablauf je Sammler (eine Transaktion):
+- Vorprüfung: eine Abfrage lädt je Zahlung nur Betrag, IBAN, BIC und
+  Mandatsdaten in NumPy-Arrays. IBAN-Prüfziffer (mod 97) und Länge, BIC-Format,
+  Betrag und Mandat (aktiv, gültig zum Fälligkeitstag, Unterschrift) werden für
+  alle Zahlungen gleichzeitig geprüft. Fehlerhafte Zahlungen werden mit
+  error_code/error_message auf FAILED gesetzt und aus dem Sammler gelöst.
+- Aufteilung: Sammler mit mehr als max_transactions Zahlungen werden in
+  Folgesammler (<batch_number>-2, -3, ...) aufgeteilt, die Zahlungen je Teil
+  mit einem Update umgehängt.
+- Schreiben: die Zahlungen werden über einen serverseitigen Cursor gelesen und
+  direkt in die XML-Datei geschrieben - der Speicherbedarf hängt nicht von der
+  Anzahl ab. Anzahl und Kontrollsumme je PmtInf kommen aus der Vorprüfung und
+  werden beim Schreiben mitgezählt und abgeglichen.
+
+Die Datei landet im Dateispeicher unter ihrem SHA-256 (sepa/ab/abcdef....xml),
+SepaBatch.sepa_file_url enthält diesen relativen Schlüssel. Erzeugt werden
+pain.001.001.09 und pain.008.001.08 nach DK-Spezifikation (Anlage 3).
+Mandate werden erst mit mark_submitted() fortgeschrieben (FRST -> RCUR), ein
+erneuter Export vor der Einreichung erzeugt deshalb dieselben Sequenztypen.
+"""
+import hashlib
+import os
+import re
+import time
+import unicodedata
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+import numpy as np
+from sqlalchemy import case, func, select, update
+
+from app.services.invoice_pdf_service import FILE_STORE_DIR
+from shared.models import BankAccount, Payment, PaymentStatus, SepaBatch, SepaMandate
+
+
+DIRECT_DEBIT = "direct_debit"
+CREDIT_TRANSFER = "credit_transfer"
+
+NAMESPACES = {
+    CREDIT_TRANSFER: "urn:iso:std:iso:20022:tech:xsd:pain.001.001.09",
+    DIRECT_DEBIT: "urn:iso:std:iso:20022:tech:xsd:pain.008.001.08",
+}
+
+# Zahlungen je Datei - größere Sammler werden aufgeteilt
+MAX_TRANSACTIONS = 10000
+
+# Zeilen je Abruf aus dem serverseitigen Cursor
+FETCH_SIZE = 2000
+
+# Höchstbetrag je Transaktion laut Schema (in Cent)
+MAX_AMOUNT_CENTS = 99999999999
+
+EXPORTABLE_STATUSES = ("created", "validated", "failed")
+
+# Zahlungen in diesen Status gehören nicht (mehr) in eine Datei
+SKIPPED_PAYMENT_STATUSES = (PaymentStatus.COMPLETED, PaymentStatus.CANCELLED, PaymentStatus.REFUNDED)
+
+SEQUENCE_TYPES = ("FRST", "RCUR", "OOFF", "FNAL")
+
+# IBAN-Längen der SEPA-Länder
+IBAN_LENGTHS = {
+    "AD": 24, "AT": 20, "BE": 16, "BG": 22, "CH": 21, "CY": 28, "CZ": 24, "DE": 22, "DK": 18,
+    "EE": 20, "ES": 24, "FI": 18, "FR": 27, "GB": 22, "GI": 23, "GR": 27, "HR": 21, "HU": 28,
+    "IE": 22, "IS": 26, "IT": 27, "LI": 21, "LT": 20, "LU": 20, "LV": 21, "MC": 27, "MT": 31,
+    "NL": 18, "NO": 15, "PL": 28, "PT": 25, "RO": 24, "SE": 24, "SI": 19, "SK": 24, "SM": 27,
+    "VA": 22,
+}
+IBAN_MAX = 34
+
+BIC_RE = re.compile(r"^[A-Z]{6}[A-Z2-9][A-NP-Z0-9]([A-Z0-9]{3})?$")
+
+# Fehlercodes in Payment.error_code
+ERRORS = {
+    "IBAN": "IBAN ungültig",
+    "BIC": "BIC ungültig",
+    "AMOUNT": "Betrag ungültig oder nicht in EUR",
+    "NAME": "Name fehlt",
+    "MANDATE": "kein gültiges Mandat",
+}
+
+# DK-Zeichensatz: SEPA-Basis plus Umlaute, ß und &*$%
+_ALLOWED_CHARS = set(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789/-?:().,'+ ÄÖÜäöüß&*$%"
+)
+
+
+class SepaExportError(ValueError):
+    """Der Sammler kann nicht exportiert werden"""
+
+
+# ============== PRÜFUNG ==============
+
+def normalize_iban(value: Optional[str]) -> str:
+    return re.sub(r"\s+", "", value or "").upper()
+
+
+def normalize_bic(value: Optional[str]) -> str:
+    return re.sub(r"\s+", "", value or "").upper()
+
+
+def valid_ibans(ibans: Iterable[str]) -> np.ndarray:
+    """Prüfziffer (mod 97), Zeichen und Länge für alle IBANs gleichzeitig"""
+    ibans = [normalize_iban(iban) for iban in ibans]
+    if not ibans:
+        return np.zeros(0, dtype=bool)
+    lengths = np.array([len(iban) for iban in ibans])
+    # Nicht-ASCII-Zeichen werden zu "?" und fallen damit durch die Zeichenprüfung
+    padded = np.array([iban[:IBAN_MAX].ljust(IBAN_MAX).encode("ascii", "replace") for iban in ibans],
+                      dtype=f"S{IBAN_MAX}")
+    chars = padded.view(np.uint8).reshape(len(ibans), IBAN_MAX)
+
+    is_digit = (chars >= ord("0")) & (chars <= ord("9"))
+    is_letter = (chars >= ord("A")) & (chars <= ord("Z"))
+    is_pad = chars == ord(" ")
+    positions = np.arange(IBAN_MAX)
+    inside = positions[None, :] < lengths[:, None]
+    valid = (inside & (is_digit | is_letter) | ~inside & is_pad).all(axis=1)
+    valid &= is_letter[:, 0] & is_letter[:, 1] & is_digit[:, 2] & is_digit[:, 3]
+
+    expected = np.array([IBAN_LENGTHS.get(iban[:2], 0) for iban in ibans])
+    valid &= lengths == expected
+
+    # Ländercode und Prüfziffer ans Ende: die ersten vier Zeichen rotieren je Zeile
+    order = (positions[None, :] + 4) % np.clip(lengths, 5, IBAN_MAX)[:, None]
+    order = np.where(inside, order, positions[None, :])
+    rotated = np.take_along_axis(chars, order, axis=1)
+    digit = np.take_along_axis(is_digit, order, axis=1)
+    letter = np.take_along_axis(is_letter, order, axis=1)
+    remainder = np.zeros(len(ibans), dtype=np.int64)
+    for column in range(IBAN_MAX):
+        value = rotated[:, column].astype(np.int64)
+        remainder = np.where(digit[:, column], (remainder * 10 + value - ord("0")) % 97, remainder)
+        remainder = np.where(letter[:, column], (remainder * 100 + value - ord("A") + 10) % 97, remainder)
+    return valid & (remainder == 1)
+
+
+def valid_bics(bics: Iterable[str], required: bool = False) -> np.ndarray:
+    """BIC-Format; leere BICs sind erlaubt, solange sie nicht verlangt werden (IBAN-only)"""
+    bics = np.array([normalize_bic(bic) for bic in bics], dtype=object)
+    if not len(bics):
+        return np.zeros(0, dtype=bool)
+    unique, inverse = np.unique(bics, return_inverse=True)
+    checked = np.array([bool(BIC_RE.match(bic)) or (not bic and not required) for bic in unique])
+    return checked[inverse]
+
+
+def sepa_text(value: Optional[str], length: int) -> str:
+    """Text auf den DK-Zeichensatz und die Feldlänge bringen"""
+    result = []
+    for char in value or "":
+        if char not in _ALLOWED_CHARS:
+            char = unicodedata.normalize("NFKD", char).encode("ascii", "ignore").decode() or " "
+            char = "".join(c if c in _ALLOWED_CHARS else " " for c in char)
+        result.append(char)
+    return re.sub(r"\s+", " ", "".join(result)).strip()[:length]
+
+
+def _sepa_id(value: str) -> str:
+    """Referenzen (EndToEndId, MsgId): nur Basiszeichen, keine Leerzeichen"""
+    return re.sub(r"[^A-Za-z0-9/\-?:().,'+]", "", value or "")[:35] or "NOTPROVIDED"
+
+
+def _cents(value) -> int:
+    return int((Decimal(value or 0) * 100).to_integral_value())
+
+
+def _amount(cents: int) -> str:
+    return f"{cents // 100}.{cents % 100:02d}"
+
+
+# ============== XML ==============
+
+class _HashingFile:
+    """Binärdatei, die beim Schreiben den SHA-256 mitführt"""
+
+    def __init__(self, path: Path):
+        self._file = open(path, "wb")
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: str):
+        raw = data.encode("utf-8")
+        self.digest.update(raw)
+        self.size += len(raw)
+        self._file.write(raw)
+
+    def close(self):
+        self._file.close()
+
+
+class XmlStreamWriter:
+    """Minimaler inkrementeller XML-Schreiber (öffnen, Textelemente, schließen)"""
+
+    def __init__(self, out, indent: str = "  "):
+        self.out = out
+        self.indent = indent
+        self.stack: List[str] = []
+
+    def declaration(self):
+        self.out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+
+    def start(self, tag: str, **attrs):
+        attributes = "".join(f" {name}={quoteattr(str(value))}" for name, value in attrs.items())
+        self.out.write(f"{self.indent * len(self.stack)}<{tag}{attributes}>\n")
+        self.stack.append(tag)
+
+    def element(self, tag: str, text, **attrs):
+        attributes = "".join(f" {name}={quoteattr(str(value))}" for name, value in attrs.items())
+        self.out.write(f"{self.indent * len(self.stack)}<{tag}{attributes}>{escape(str(text))}</{tag}>\n")
+
+    def end(self, tag: str = None):
+        closing = self.stack.pop()
+        if tag and tag != closing:
+            raise ValueError(f"</{tag}> erwartet </{closing}>")
+        self.out.write(f"{self.indent * len(self.stack)}</{closing}>\n")
+
+    def agent(self, tag: str, bic: str):
+        self.start(tag)
+        self.start("FinInstnId")
+        if bic:
+            self.element("BICFI", bic)
+        else:
+            self.start("Othr")
+            self.element("Id", "NOTPROVIDED")
+            self.end("Othr")
+        self.end("FinInstnId")
+        self.end(tag)
+
+    def account(self, tag: str, iban: str):
+        self.start(tag)
+        self.start("Id")
+        self.element("IBAN", iban)
+        self.end("Id")
+        self.end(tag)
+
+    def party(self, tag: str, name: str):
+        self.start(tag)
+        self.element("Nm", sepa_text(name, 70))
+        self.end(tag)
+
+
+# ============== SERVICE ==============
+
+class SepaExportService:
+    """Prüfen, Aufteilen und Schreiben von SEPA-Sammlern"""
+
+    def __init__(self, root: Path = None, max_transactions: int = MAX_TRANSACTIONS):
+        self.root = Path(root or FILE_STORE_DIR)
+        self.max_transactions = max_transactions
+
+    def _columns(self, batch_type: str):
+        """Spalten je Zahlung - Gegenkonto bei Lastschriften aus dem Mandat"""
+        if batch_type == DIRECT_DEBIT:
+            sequence = case(
+                (SepaMandate.mandate_type == "OOFF", "OOFF"),
+                else_=func.coalesce(SepaMandate.sequence_type, "RCUR"),
+            )
+            return [
+                func.coalesce(SepaMandate.debtor_name, Payment.partner_name).label("name"),
+                func.coalesce(SepaMandate.debtor_iban, Payment.partner_iban).label("iban"),
+                func.coalesce(SepaMandate.debtor_bic, Payment.partner_bic).label("bic"),
+                sequence.label("sequence"),
+                SepaMandate.mandate_reference,
+                SepaMandate.signature_date,
+                SepaMandate.status.label("mandate_status"),
+                SepaMandate.valid_from,
+                SepaMandate.valid_until,
+            ]
+        return [
+            Payment.partner_name.label("name"),
+            Payment.partner_iban.label("iban"),
+            Payment.partner_bic.label("bic"),
+        ]
+
+    def _payments(self, batch: SepaBatch):
+        query = (
+            select(Payment.id, Payment.payment_number, Payment.amount, Payment.currency, Payment.reference,
+                   *self._columns(batch.batch_type))
+            .where(
+                Payment.sepa_batch_id == batch.id,
+                Payment.is_deleted.is_(False),
+                Payment.status.notin_(SKIPPED_PAYMENT_STATUSES),
+            )
+        )
+        if batch.batch_type == DIRECT_DEBIT:
+            query = query.outerjoin(SepaMandate, SepaMandate.id == Payment.mandate_id)
+        return query
+
+    def validate(self, session, batch: SepaBatch) -> dict:
+        """Vorprüfung: Arrays aller Zahlungen, Fehlercodes je Zahlung"""
+        direct_debit = batch.batch_type == DIRECT_DEBIT
+        rows = session.execute(self._payments(batch)).all()
+        count = len(rows)
+        ids = np.array([row.id for row in rows], dtype=object)
+        cents = np.array([_cents(row.amount) for row in rows], dtype=np.int64)
+        sequences = np.array([row.sequence if direct_debit else "" for row in rows], dtype=object)
+
+        checks = {
+            "IBAN": valid_ibans(row.iban for row in rows),
+            "BIC": valid_bics(row.bic for row in rows),
+            "AMOUNT": (cents > 0) & (cents <= MAX_AMOUNT_CENTS)
+                      & np.array([(row.currency or "EUR") == "EUR" for row in rows], dtype=bool),
+            "NAME": np.array([bool(sepa_text(row.name, 70)) for row in rows], dtype=bool),
+        }
+        if direct_debit:
+            collection = batch.execution_date
+            checks["MANDATE"] = np.array([
+                bool(row.mandate_reference) and row.signature_date is not None
+                and row.mandate_status == "active" and row.sequence in SEQUENCE_TYPES
+                and (row.valid_from is None or row.valid_from <= collection)
+                and (row.valid_until is None or row.valid_until >= collection)
+                for row in rows
+            ], dtype=bool)
+
+        errors = np.full(count, "", dtype=object)
+        for code, passed in checks.items():
+            errors = np.where(~passed & (errors == ""), code, errors)
+        valid = errors == ""
+        return {
+            "ids": ids[valid],
+            "cents": cents[valid],
+            "sequences": sequences[valid],
+            "invalid": [(payment_id, code) for payment_id, code in zip(ids[~valid], errors[~valid])],
+        }
+
+    def _reject(self, session, batch: SepaBatch, invalid: list):
+        """Fehlerhafte Zahlungen markieren und aus dem Sammler lösen"""
+        for code in {code for _, code in invalid}:
+            session.execute(
+                update(Payment)
+                .where(Payment.id.in_([payment_id for payment_id, c in invalid if c == code]))
+                .values(status=PaymentStatus.FAILED, error_code=f"SEPA_{code}", error_message=ERRORS[code],
+                        sepa_batch_id=None, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+        batch.rejected_count = (batch.rejected_count or 0) + len(invalid)
+
+    def _split(self, session, batch: SepaBatch, checked: dict) -> List[tuple]:
+        """Sammler in Teile zu höchstens max_transactions aufteilen -> [(Sammler, Indizes)]"""
+        # Nach Sequenztyp sortiert, damit jeder PmtInf-Block möglichst in einem Teil liegt
+        order = np.argsort(checked["sequences"].astype(str), kind="stable")
+        parts = [order[start:start + self.max_transactions]
+                 for start in range(0, len(order), self.max_transactions)] or [order]
+        result = [(batch, parts[0])]
+        for number, indices in enumerate(parts[1:], start=2):
+            part = SepaBatch(
+                id=uuid.uuid4(), tenant_id=batch.tenant_id, batch_number=f"{batch.batch_number}-{number}",
+                batch_type=batch.batch_type, execution_date=batch.execution_date,
+                bank_account_id=batch.bank_account_id, total_amount=0, status="created",
+                created_by=batch.updated_by, notes=f"Teil {number} von {batch.batch_number}",
+            )
+            session.add(part)
+            session.flush()
+            session.execute(
+                update(Payment).where(Payment.id.in_(list(checked["ids"][indices])))
+                .values(sepa_batch_id=part.id, updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            result.append((part, indices))
+        return result
+
+    def _write(self, session, batch: SepaBatch, account: BankAccount, groups: Dict[str, tuple]) -> str:
+        """Datei schreiben (serverseitiger Cursor) und im Dateispeicher ablegen -> Schlüssel"""
+        direct_debit = batch.batch_type == DIRECT_DEBIT
+        total_count = sum(count for count, _ in groups.values())
+        total_cents = sum(cents for _, cents in groups.values())
+        message_id = _sepa_id(f"{batch.batch_number}-{datetime.utcnow():%Y%m%d%H%M%S}")
+        owner = account.account_holder or account.name
+        owner_bic = normalize_bic(account.bic)
+
+        staging_dir = self.root / "sepa"
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        staging = staging_dir / f".{batch.id}.{os.getpid()}.tmp"
+        out = _HashingFile(staging)
+        try:
+            xml = XmlStreamWriter(out)
+            xml.declaration()
+            xml.start("Document", xmlns=NAMESPACES[batch.batch_type])
+            xml.start("CstmrDrctDbtInitn" if direct_debit else "CstmrCdtTrfInitn")
+            xml.start("GrpHdr")
+            xml.element("MsgId", message_id)
+            xml.element("CreDtTm", datetime.now().replace(microsecond=0).isoformat())
+            xml.element("NbOfTxs", total_count)
+            xml.element("CtrlSum", _amount(total_cents))
+            xml.party("InitgPty", owner)
+            xml.end("GrpHdr")
+
+            query = self._payments(batch).order_by(
+                *(["sequence"] if direct_debit else []), Payment.payment_number
+            )
+            stream = session.execute(query.execution_options(yield_per=FETCH_SIZE))
+            current, written, written_cents = None, 0, 0
+            for row in stream:
+                sequence = row.sequence if direct_debit else ""
+                if sequence != current:
+                    if current is not None:
+                        self._end_payment_info(xml, groups[current], written, written_cents)
+                    current, written, written_cents = sequence, 0, 0
+                    self._start_payment_info(xml, batch, account, owner, owner_bic, message_id,
+                                             sequence, groups[sequence])
+                cents = _cents(row.amount)
+                self._transaction(xml, direct_debit, row, cents)
+                written += 1
+                written_cents += cents
+            if current is not None:
+                self._end_payment_info(xml, groups[current], written, written_cents)
+
+            xml.end()
+            xml.end("Document")
+        except Exception:
+            out.close()
+            staging.unlink(missing_ok=True)
+            raise
+        out.close()
+
+        digest = out.digest.hexdigest()
+        relative = f"sepa/{digest[:2]}/{digest}.xml"
+        target = self.root / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(staging, target)
+        batch.message_id = message_id
+        return relative
+
+    def _start_payment_info(self, xml, batch, account, owner, owner_bic, message_id, sequence, group):
+        direct_debit = batch.batch_type == DIRECT_DEBIT
+        count, cents = group
+        xml.start("PmtInf")
+        xml.element("PmtInfId", _sepa_id(f"{message_id}-{sequence or 'TRF'}"))
+        xml.element("PmtMtd", "DD" if direct_debit else "TRF")
+        xml.element("NbOfTxs", count)
+        xml.element("CtrlSum", _amount(cents))
+        xml.start("PmtTpInf")
+        xml.start("SvcLvl")
+        xml.element("Cd", "SEPA")
+        xml.end("SvcLvl")
+        if direct_debit:
+            xml.start("LclInstrm")
+            xml.element("Cd", "CORE")
+            xml.end("LclInstrm")
+            xml.element("SeqTp", sequence)
+            xml.end("PmtTpInf")
+            xml.element("ReqdColltnDt", batch.execution_date.isoformat())
+            xml.party("Cdtr", owner)
+            xml.account("CdtrAcct", normalize_iban(account.iban))
+            xml.agent("CdtrAgt", owner_bic)
+            xml.element("ChrgBr", "SLEV")
+            xml.start("CdtrSchmeId")
+            xml.start("Id")
+            xml.start("PrvtId")
+            xml.start("Othr")
+            xml.element("Id", _sepa_id(account.creditor_id))
+            xml.start("SchmeNm")
+            xml.element("Prtry", "SEPA")
+            xml.end("SchmeNm")
+            xml.end("Othr")
+            xml.end("PrvtId")
+            xml.end("Id")
+            xml.end("CdtrSchmeId")
+        else:
+            xml.end("PmtTpInf")
+            xml.start("ReqdExctnDt")
+            xml.element("Dt", batch.execution_date.isoformat())
+            xml.end("ReqdExctnDt")
+            xml.party("Dbtr", owner)
+            xml.account("DbtrAcct", normalize_iban(account.iban))
+            xml.agent("DbtrAgt", owner_bic)
+            xml.element("ChrgBr", "SLEV")
+
+    def _end_payment_info(self, xml, group, written: int, written_cents: int):
+        if (written, written_cents) != tuple(group):
+            raise SepaExportError(
+                f"Zahlungen wurden während des Exports geändert ({written} statt {group[0]} Transaktionen)"
+            )
+        xml.end("PmtInf")
+
+    def _transaction(self, xml, direct_debit: bool, row, cents: int):
+        xml.start("DrctDbtTxInf" if direct_debit else "CdtTrfTxInf")
+        xml.start("PmtId")
+        xml.element("EndToEndId", _sepa_id(row.payment_number))
+        xml.end("PmtId")
+        if direct_debit:
+            xml.element("InstdAmt", _amount(cents), Ccy="EUR")
+            xml.start("DrctDbtTx")
+            xml.start("MndtRltdInf")
+            xml.element("MndtId", _sepa_id(row.mandate_reference))
+            xml.element("DtOfSgntr", row.signature_date.isoformat())
+            xml.end("MndtRltdInf")
+            xml.end("DrctDbtTx")
+            xml.agent("DbtrAgt", normalize_bic(row.bic))
+            xml.party("Dbtr", row.name)
+            xml.account("DbtrAcct", normalize_iban(row.iban))
+        else:
+            xml.start("Amt")
+            xml.element("InstdAmt", _amount(cents), Ccy="EUR")
+            xml.end("Amt")
+            if row.bic:
+                xml.agent("CdtrAgt", normalize_bic(row.bic))
+            xml.party("Cdtr", row.name)
+            xml.account("CdtrAcct", normalize_iban(row.iban))
+        reference = sepa_text(row.reference or row.payment_number, 140)
+        if reference:
+            xml.start("RmtInf")
+            xml.element("Ustrd", reference)
+            xml.end("RmtInf")
+        xml.end()
+
+    def export(self, session, batch_id, user_id=None) -> dict:
+        """Sammler prüfen, bei Bedarf aufteilen, Dateien schreiben und committen"""
+        started = time.perf_counter()
+        try:
+            batch = session.execute(
+                select(SepaBatch).where(SepaBatch.id == batch_id).with_for_update()
+            ).scalar()
+            if batch is None:
+                raise SepaExportError("SEPA-Sammler nicht gefunden")
+            if batch.batch_type not in NAMESPACES:
+                raise SepaExportError(f"Unbekannter Sammlertyp: {batch.batch_type}")
+            if batch.status not in EXPORTABLE_STATUSES:
+                raise SepaExportError(f"Sammler {batch.batch_number} ist bereits eingereicht")
+            if batch.execution_date < date.today():
+                raise SepaExportError(f"Ausführungsdatum {batch.execution_date:%d.%m.%Y} liegt in der Vergangenheit")
+            account = session.get(BankAccount, batch.bank_account_id)
+            if account is None or not valid_ibans([account.iban])[0]:
+                raise SepaExportError("Auftraggeberkonto fehlt oder hat keine gültige IBAN")
+            if batch.batch_type == DIRECT_DEBIT and not account.creditor_id:
+                raise SepaExportError(f"Für {account.name} ist keine Gläubiger-ID hinterlegt")
+            batch.updated_by = user_id
+
+            checked = self.validate(session, batch)
+            if checked["invalid"]:
+                self._reject(session, batch, checked["invalid"])
+
+            results = []
+            for part, indices in self._split(session, batch, checked):
+                sequences, cents = checked["sequences"][indices], checked["cents"][indices]
+                groups = {}
+                for sequence in np.unique(sequences.astype(str)):
+                    mask = sequences == sequence
+                    groups[sequence] = (int(mask.sum()), int(cents[mask].sum()))
+                part.transaction_count = len(indices)
+                part.total_amount = Decimal(int(cents.sum())) / 100
+                if len(indices):
+                    part.sepa_file_url = self._write(session, part, account, groups)
+                    part.status = "validated"
+                else:
+                    part.sepa_file_url = None
+                    part.status = "failed"
+                    part.error_message = "Keine gültigen Zahlungen"
+                results.append({
+                    "batch_id": part.id,
+                    "batch_number": part.batch_number,
+                    "transactions": part.transaction_count,
+                    "amount": part.total_amount,
+                    "file": part.sepa_file_url,
+                })
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+        return {
+            "batches": results,
+            "transactions": sum(result["transactions"] for result in results),
+            "amount": sum((result["amount"] for result in results), Decimal(0)),
+            "rejected": len(checked["invalid"]),
+            "seconds": time.perf_counter() - started,
+        }
+
+    def export_open(self, session, tenant_id, user_id=None) -> dict:
+        """Alle noch nicht eingereichten Sammler eines Mandanten exportieren"""
+        batch_ids = session.execute(
+            select(SepaBatch.id).where(
+                SepaBatch.tenant_id == tenant_id,
+                SepaBatch.status == "created",
+                SepaBatch.execution_date >= date.today(),
+            ).order_by(SepaBatch.execution_date, SepaBatch.batch_number)
+        ).scalars().all()
+        session.rollback()
+        summary = {"batches": [], "transactions": 0, "amount": Decimal(0), "rejected": 0, "errors": []}
+        for batch_id in batch_ids:
+            try:
+                result = self.export(session, batch_id, user_id=user_id)
+            except SepaExportError as e:
+                summary["errors"].append(str(e))
+                continue
+            summary["batches"].extend(result["batches"])
+            summary["transactions"] += result["transactions"]
+            summary["amount"] += result["amount"]
+            summary["rejected"] += result["rejected"]
+        return summary
+
+    def mark_submitted(self, session, batch_id):
+        """Sammler als eingereicht markieren und die Mandate fortschreiben (FRST -> RCUR)"""
+        now = datetime.utcnow()
+        try:
+            batch = session.execute(
+                select(SepaBatch).where(SepaBatch.id == batch_id).with_for_update()
+            ).scalar()
+            if batch is None or batch.status != "validated":
+                raise SepaExportError("Nur exportierte Sammler können eingereicht werden")
+            batch.status = "submitted"
+            batch.submitted_at = now
+            payments = select(Payment.id).where(
+                Payment.sepa_batch_id == batch.id, Payment.status.notin_(SKIPPED_PAYMENT_STATUSES),
+                Payment.is_deleted.is_(False),
+            )
+            session.execute(
+                update(Payment).where(Payment.id.in_(payments))
+                .values(status=PaymentStatus.PROCESSING, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if batch.batch_type == DIRECT_DEBIT:
+                used = (
+                    select(Payment.mandate_id, func.count(Payment.id).label("uses"))
+                    .where(Payment.sepa_batch_id == batch.id, Payment.mandate_id.isnot(None),
+                           Payment.status == PaymentStatus.PROCESSING)
+                    .group_by(Payment.mandate_id)
+                    .subquery()
+                )
+                session.execute(
+                    update(SepaMandate)
+                    .where(SepaMandate.id == used.c.mandate_id)
+                    .values(
+                        usage_count=func.coalesce(SepaMandate.usage_count, 0) + used.c.uses,
+                        last_used_date=batch.execution_date,
+                        sequence_type=case((SepaMandate.sequence_type == "FRST", "RCUR"),
+                                           else_=SepaMandate.sequence_type),
+                        updated_at=now,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+
+def resolve_file(sepa_file_url: str, root: Path = None) -> Optional[Path]:
+    """Absoluter Pfad zu SepaBatch.sepa_file_url (oder None, wenn die Datei fehlt)"""
+    if not sepa_file_url:
+        return None
+    path = Path(root or FILE_STORE_DIR) / sepa_file_url
+    return path if path.exists() else None
+
+
+# Global instance
+_sepa_export_service = None
+
+
+def get_sepa_export_service() -> SepaExportService:
+    """Get global SEPA export service instance"""
+    global _sepa_export_service
+    if _sepa_export_service is None:
+        _sepa_export_service = SepaExportService()
+    return _sepa_export_service
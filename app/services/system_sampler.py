@@ -0,0 +1,415 @@
+"""
+System-Sampler - sammelt System- und App-Metriken in einem Hintergrund-Thread
+
+Jede Metrik landet in einem Ringpuffer fester Größe (NumPy-Arrays für
+Zeitstempel und Werte). Dashboard und Health-Checks lesen Fenster aus dem
+Speicher und blockieren nie auf psutil. Teure Abfragen (Prozessliste,
+offene Dateien, Verbindungen, Datenbank-Latenz) laufen in einem langsameren
+Takt; verdichtete Werte gehen in noch größerem Abstand an `system_metrics`.
+"""
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import psutil
+
+
+# Standard-Takt: schnelle Metriken alle 2 s, teure alle 30 s,
+# Verdichtung nach system_metrics jede Minute, 1 h Verlauf im Speicher
+DEFAULT_INTERVAL = 2.0
+DEFAULT_SLOW_INTERVAL = 30.0
+DEFAULT_PERSIST_INTERVAL = 60.0
+DEFAULT_CAPACITY = 1800
+
+# Metrik-Name -> Einheit; wird minütlich nach system_metrics verdichtet
+PERSISTED_METRICS = {
+    'cpu.percent': 'percent',
+    'memory.percent': 'percent',
+    'swap.percent': 'percent',
+    'disk.percent': 'percent',
+    'net.sent_kbps': 'kbps',
+    'net.recv_kbps': 'kbps',
+    'app.memory_mb': 'mb',
+    'app.cpu_percent': 'percent',
+    'app.threads': 'count',
+    'db.latency_ms': 'ms',
+}
+
+
+class RingBuffer:
+    """Zeitreihe fester Größe auf zwei NumPy-Arrays"""
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._values = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, value: float):
+        self._times[self._next] = timestamp
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self) -> Optional[float]:
+        if not self._count:
+            return None
+        return float(self._values[self._next - 1])
+
+    def window(self, seconds: float = None, now: float = None,
+               until: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Gibt (Zeitstempel, Werte) chronologisch zurück, optional auf die letzten n Sekunden begrenzt.
+        Mit until ein abgeschlossenes Intervall (until - seconds, until] - aufeinanderfolgende
+        Intervalle zählen den Messpunkt an der gemeinsamen Grenze nur einmal.
+        """
+        if self._count < self.capacity:
+            times = self._times[:self._count].copy()
+            values = self._values[:self._count].copy()
+        else:
+            order = np.r_[self._next:self.capacity, 0:self._next]
+            times = self._times[order]
+            values = self._values[order]
+        if until is not None and len(times):
+            end = np.searchsorted(times, until, side='right')
+            start = np.searchsorted(times, until - seconds, side='right') if seconds is not None else 0
+            times, values = times[start:end], values[start:end]
+        elif seconds is not None and len(times):
+            start = np.searchsorted(times, (now or time.time()) - seconds, side='left')
+            times, values = times[start:], values[start:]
+        return times, values
+
+
+class SystemSampler:
+    """Einzelner Hintergrund-Thread, der Metriken in Ringpuffer schreibt"""
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        slow_interval: float = DEFAULT_SLOW_INTERVAL,
+        persist_interval: float = DEFAULT_PERSIST_INTERVAL,
+        capacity: int = DEFAULT_CAPACITY,
+        db_latency_probe: Callable[[], float] = None,
+        on_persist: Callable[[Dict[str, Dict[str, float]], float, float], None] = None
+    ):
+        self.interval = interval
+        self.slow_interval = slow_interval
+        self.persist_interval = persist_interval
+        self.capacity = capacity
+        self.db_latency_probe = db_latency_probe
+        self.on_persist = on_persist
+
+        self._buffers: Dict[str, RingBuffer] = {}
+        self._snapshot: Dict[str, Any] = {}
+        self._static: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._process = psutil.Process()
+        self._last_net = None
+        self._last_slow = 0.0
+        self._last_persist = time.time()
+
+    # ==================== Steuerung ====================
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Startet den Sampler-Thread (idempotent)"""
+        if self.is_running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stoppt den Sampler-Thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        self._collect_static()
+        # psutil liefert beim ersten nicht-blockierenden Aufruf 0.0 - Zähler vorbelegen
+        psutil.cpu_percent(interval=None)
+        psutil.cpu_percent(interval=None, percpu=True)
+        self._process.cpu_percent(interval=None)
+        self._collect_slow(time.time())
+
+        while not self._stop_event.wait(self.interval):
+            now = time.time()
+            try:
+                self._collect_fast(now)
+                if now - self._last_slow >= self.slow_interval:
+                    self._collect_slow(now)
+                if now - self._last_persist >= self.persist_interval:
+                    self._persist(self._last_persist, now)
+            except Exception as e:
+                print(f"System-Sampler Fehler: {e}")
+
+    # ==================== Sammeln ====================
+
+    def _record(self, now: float, values: Dict[str, float]):
+        with self._lock:
+            for name, value in values.items():
+                if value is None:
+                    continue
+                buffer = self._buffers.get(name)
+                if buffer is None:
+                    buffer = self._buffers[name] = RingBuffer(self.capacity)
+                buffer.append(now, float(value))
+
+    def _collect_static(self):
+        """Werte, die sich während der Laufzeit nicht ändern"""
+        static = {'system': {}, 'hardware': {}}
+        try:
+            static['system'] = {
+                'os': platform.system(),
+                'os_version': platform.release(),
+                'os_build': platform.version(),
+                'architecture': platform.machine(),
+                'processor': platform.processor(),
+                'hostname': platform.node(),
+                'python_version': sys.version.split()[0],
+                'boot_time': datetime.fromtimestamp(psutil.boot_time()).isoformat() if hasattr(psutil, 'boot_time') else None
+            }
+        except Exception as e:
+            static['system']['error'] = str(e)
+
+        try:
+            cpu_freq = psutil.cpu_freq()
+            static['hardware'] = {
+                'cpu_count_physical': psutil.cpu_count(logical=False),
+                'cpu_count_logical': psutil.cpu_count(logical=True),
+                'cpu_freq_max': round(cpu_freq.max, 2) if cpu_freq and cpu_freq.max else None
+            }
+        except Exception as e:
+            static['hardware']['error'] = str(e)
+
+        with self._lock:
+            self._static = static
+
+    def _collect_fast(self, now: float):
+        """Günstige Metriken im schnellen Takt"""
+        snapshot = {}
+        values = {}
+
+        cpu_percent = psutil.cpu_percent(interval=None)
+        snapshot['cpu'] = {
+            'percent': cpu_percent,
+            'per_core': psutil.cpu_percent(interval=None, percpu=True),
+            'load_avg': list(psutil.getloadavg()) if hasattr(psutil, 'getloadavg') else [0, 0, 0]
+        }
+        cpu_freq = psutil.cpu_freq()
+        snapshot['cpu_freq_current'] = round(cpu_freq.current, 2) if cpu_freq else None
+        values['cpu.percent'] = cpu_percent
+
+        vm = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        snapshot['memory'] = {
+            'percent': vm.percent,
+            'used_gb': round(vm.used / (1024**3), 2),
+            'available_gb': round(vm.available / (1024**3), 2),
+            'total_gb': round(vm.total / (1024**3), 2),
+            'swap_percent': swap.percent,
+            'swap_used_gb': round(swap.used / (1024**3), 2),
+            'swap_total_gb': round(swap.total / (1024**3), 2)
+        }
+        values['memory.percent'] = vm.percent
+        values['swap.percent'] = swap.percent
+
+        disk = psutil.disk_usage('/')
+        disk_io = psutil.disk_io_counters()
+        snapshot['disk'] = {
+            'percent': disk.percent,
+            'used_gb': round(disk.used / (1024**3), 2),
+            'free_gb': round(disk.free / (1024**3), 2),
+            'total_gb': round(disk.total / (1024**3), 2),
+            'read_mb': round(disk_io.read_bytes / (1024**2), 2) if disk_io else 0,
+            'write_mb': round(disk_io.write_bytes / (1024**2), 2) if disk_io else 0
+        }
+        values['disk.percent'] = disk.percent
+
+        net_io = psutil.net_io_counters()
+        snapshot['network'] = {
+            'bytes_sent': net_io.bytes_sent,
+            'bytes_recv': net_io.bytes_recv,
+            'packets_sent': net_io.packets_sent,
+            'packets_recv': net_io.packets_recv,
+            'errors_in': net_io.errin,
+            'errors_out': net_io.errout
+        }
+        if self._last_net:
+            last_time, last_sent, last_recv = self._last_net
+            elapsed = max(now - last_time, 1e-6)
+            values['net.sent_kbps'] = (net_io.bytes_sent - last_sent) / 1024 / elapsed
+            values['net.recv_kbps'] = (net_io.bytes_recv - last_recv) / 1024 / elapsed
+        self._last_net = (now, net_io.bytes_sent, net_io.bytes_recv)
+
+        with self._process.oneshot():
+            app_memory_mb = self._process.memory_info().rss / (1024**2)
+            app_cpu = self._process.cpu_percent(interval=None)
+            app_threads = self._process.num_threads()
+            app_memory_percent = self._process.memory_percent()
+        snapshot['app'] = {
+            'memory_mb': round(app_memory_mb, 2),
+            'memory_percent': round(app_memory_percent, 2),
+            'cpu_percent': round(app_cpu, 2),
+            'threads': app_threads
+        }
+        values['app.memory_mb'] = app_memory_mb
+        values['app.cpu_percent'] = app_cpu
+        values['app.threads'] = app_threads
+
+        self._record(now, values)
+        with self._lock:
+            self._snapshot.update(snapshot)
+            self._snapshot['timestamp'] = now
+
+    def _collect_slow(self, now: float):
+        """Teure Abfragen im langsamen Takt"""
+        self._last_slow = now
+        slow = {}
+
+        try:
+            # net_connections() ab psutil 6.0, connections() ist dort veraltet
+            connections = getattr(self._process, 'net_connections', None) or self._process.connections
+            slow['app_handles'] = {
+                'open_files': len(self._process.open_files()),
+                'connections': len(connections())
+            }
+        except Exception as e:
+            slow['app_handles'] = {'error': str(e)}
+
+        # Ein einziger Durchlauf über alle Prozesse
+        try:
+            processes = []
+            total_count = 0
+            for proc in psutil.process_iter(['pid', 'name', 'memory_percent', 'cpu_percent']):
+                total_count += 1
+                try:
+                    pinfo = proc.info
+                    if pinfo['memory_percent'] and pinfo['memory_percent'] > 0.1:
+                        processes.append({
+                            'pid': pinfo['pid'],
+                            'name': pinfo['name'],
+                            'memory_percent': round(pinfo['memory_percent'], 2),
+                            'cpu_percent': round(pinfo['cpu_percent'] or 0, 2)
+                        })
+                except Exception:
+                    pass
+            processes.sort(key=lambda x: x['memory_percent'], reverse=True)
+            slow['processes'] = {'top_by_memory': processes[:5], 'total_count': total_count}
+        except Exception as e:
+            slow['processes'] = {'error': str(e)}
+
+        try:
+            interfaces = []
+            for name, addrs in psutil.net_if_addrs().items():
+                for addr in addrs:
+                    if addr.family.name == 'AF_INET':
+                        interfaces.append({
+                            'name': name,
+                            'ip': addr.address,
+                            'netmask': addr.netmask
+                        })
+            slow['interfaces'] = interfaces[:5]
+        except Exception:
+            slow['interfaces'] = []
+
+        partitions = []
+        try:
+            for partition in psutil.disk_partitions():
+                try:
+                    usage = psutil.disk_usage(partition.mountpoint)
+                    partitions.append({
+                        'device': partition.device,
+                        'mountpoint': partition.mountpoint,
+                        'fstype': partition.fstype,
+                        'total_gb': round(usage.total / (1024**3), 2),
+                        'used_gb': round(usage.used / (1024**3), 2),
+                        'free_gb': round(usage.free / (1024**3), 2),
+                        'percent': usage.percent
+                    })
+                except Exception:
+                    pass
+        except Exception:
+            pass
+        slow['partitions'] = partitions
+
+        if self.db_latency_probe:
+            try:
+                slow['database'] = {'latency_ms': self.db_latency_probe()}
+                self._record(now, {'db.latency_ms': slow['database']['latency_ms']})
+            except Exception as e:
+                slow['database'] = {'error': str(e)}
+
+        with self._lock:
+            self._snapshot.update(slow)
+
+    def _persist(self, period_start: float, period_end: float):
+        """Verdichtet das abgelaufene Intervall und übergibt es an on_persist"""
+        self._last_persist = period_end
+        if not self.on_persist:
+            return
+        aggregates = {}
+        for name in PERSISTED_METRICS:
+            stats = self.stats(name, period_end - period_start, until=period_end)
+            if stats:
+                aggregates[name] = stats
+        if aggregates:
+            self.on_persist(aggregates, period_start, period_end)
+
+    # ==================== Lesen ====================
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Kopie der zuletzt gesammelten Werte"""
+        with self._lock:
+            snapshot = dict(self._snapshot)
+            snapshot['static'] = self._static
+        return snapshot
+
+    def latest(self, name: str) -> Optional[float]:
+        with self._lock:
+            buffer = self._buffers.get(name)
+            return buffer.latest() if buffer else None
+
+    def window(self, name: str, seconds: float = None, now: float = None,
+               until: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Zeitreihe einer Metrik aus dem Speicher"""
+        with self._lock:
+            buffer = self._buffers.get(name)
+            if buffer is None:
+                return np.empty(0), np.empty(0)
+            return buffer.window(seconds, now, until)
+
+    def stats(self, name: str, seconds: float = None, now: float = None,
+              until: float = None) -> Optional[Dict[str, float]]:
+        """min/max/avg/sum/count eines Fensters"""
+        _, values = self.window(name, seconds, now, until)
+        if not len(values):
+            return None
+        return {
+            'min': float(values.min()),
+            'max': float(values.max()),
+            'avg': float(values.mean()),
+            'sum': float(values.sum()),
+            'count': int(len(values)),
+            'last': float(values[-1])
+        }
+
+    def metric_names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._buffers)
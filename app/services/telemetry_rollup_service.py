@@ -0,0 +1,519 @@
+"""
+Telemetrie-Rollups - Partitionspflege, Verdichtung und Aufbewahrung
+
+Die Rohdaten-Tabellen (telemetry_events, system_metrics, performance_traces,
+system_health) sind nach Zeit range-partitioniert. Ein Job verdichtet sie
+minütlich und stündlich in `telemetry_rollups` (count/min/max/avg/sum und ein
+log-skaliertes Histogramm für Perzentile). Durchschnitte werden über
+value_count gewichtet - Zeilen ohne Messwert zählen in count, nicht im Nenner. Abgelaufene Rohdaten werden durch
+DROP der Partition entfernt - O(1), ohne DELETE über Millionen Zeilen.
+Dashboard-Abfragen lesen ausschließlich die Rollups.
+"""
+import math
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from shared.database import Base
+
+
+@dataclass(frozen=True)
+class PartitionSpec:
+    """Partitionierung einer Rohdaten-Tabelle"""
+    column: str
+    interval: str          # day, month
+    retention_days: int
+    ahead: int             # im Voraus angelegte Partitionen
+
+
+PARTITIONED_TABLES: Dict[str, PartitionSpec] = {
+    'telemetry_events': PartitionSpec('event_timestamp', 'day', 90, 3),
+    'system_metrics': PartitionSpec('timestamp', 'day', 30, 3),
+    'performance_traces': PartitionSpec('start_time', 'day', 30, 3),
+    'system_health': PartitionSpec('timestamp', 'month', 365, 1),
+}
+
+# Quelle -> wie eine Rohdaten-Zeile in ein Rollup einfließt
+ROLLUP_SOURCES: Dict[str, Dict[str, Any]] = {
+    'events': {
+        'table': 'telemetry_events', 'time': 'event_timestamp', 'series': 'category::text',
+        'value': 'NULL::float', 'tenant': 'tenant_id',
+        'errors': "severity::text IN ('ERROR', 'CRITICAL')", 'sketch': False,
+    },
+    'traces': {
+        'table': 'performance_traces', 'time': 'start_time', 'series': 'operation_name',
+        'value': 'duration_ms', 'tenant': 'tenant_id', 'errors': 'is_error', 'sketch': True,
+    },
+    'metrics': {
+        'table': 'system_metrics', 'time': 'timestamp', 'series': 'metric_name',
+        'value': 'value', 'tenant': 'NULL::uuid', 'errors': 'is_anomaly', 'sketch': False,
+    },
+    'health': {
+        'table': 'system_health', 'time': 'timestamp', 'series': 'check_name',
+        'value': 'response_time_ms', 'tenant': 'NULL::uuid', 'errors': 'NOT is_healthy', 'sketch': True,
+    },
+}
+
+# Histogramm-Bins: ceil(ln(x) / ln(GAMMA)) -> ca. 1 % relativer Fehler je Perzentil
+SKETCH_GAMMA = 1.02
+SKETCH_MIN_VALUE = 0.01
+
+MINUTE_ROLLUP_RETENTION_DAYS = 7
+HOUR_ROLLUP_RETENTION_DAYS = 400
+
+# Nachzügler (Batch-Flush der Telemetrie-Worker) abwarten, bevor eine Minute verdichtet wird
+ROLLUP_LAG = timedelta(seconds=30)
+RECOMPUTE_MINUTES = 2
+BACKFILL_CHUNK = timedelta(days=1)
+
+ROLLUP_LOCK_KEY = 0x7E1E_0001
+
+
+# ==================== Partitionen ====================
+
+def _period_start(value: datetime, interval: str) -> datetime:
+    if interval == 'month':
+        return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_period(value: datetime, interval: str) -> datetime:
+    if interval == 'month':
+        return (value.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return value + timedelta(days=1)
+
+
+def _horizon(now: datetime, spec: PartitionSpec) -> datetime:
+    """Ende der letzten im Voraus anzulegenden Partition"""
+    end = _period_start(now, spec.interval)
+    for _ in range(spec.ahead + 1):
+        end = _next_period(end, spec.interval)
+    return end
+
+
+def _partition_name(table: str, start: datetime, interval: str) -> str:
+    suffix = start.strftime('%Y%m') if interval == 'month' else start.strftime('%Y%m%d')
+    return f"{table}_p{suffix}"
+
+
+def _parse_partition_start(table: str, name: str, interval: str) -> Optional[datetime]:
+    prefix = f"{table}_p"
+    if not name.startswith(prefix):
+        return None
+    try:
+        return datetime.strptime(name[len(prefix):], '%Y%m' if interval == 'month' else '%Y%m%d')
+    except ValueError:
+        return None
+
+
+def _relkind(conn, table: str) -> Optional[str]:
+    return conn.execute(text(
+        "SELECT c.relkind FROM pg_class c WHERE c.oid = to_regclass(:table)"
+    ), {"table": table}).scalar()
+
+
+def _existing_partitions(conn, table: str) -> List[str]:
+    return list(conn.execute(text("""
+        SELECT child.relname
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = :table
+    """), {"table": table}).scalars())
+
+
+def _default_periods(conn, table: str, spec: PartitionSpec, start: datetime, end: datetime) -> List[datetime]:
+    """Perioden in [start, end), für die bereits Zeilen in der DEFAULT-Partition liegen"""
+    return list(conn.execute(text(
+        f"SELECT DISTINCT date_trunc('{spec.interval}', \"{spec.column}\") FROM \"{table}_default\" "
+        f'WHERE "{spec.column}" >= :start AND "{spec.column}" < :end'
+    ), {"start": start, "end": end}).scalars())
+
+
+def create_partitions(conn, table: str, start: datetime, end: datetime):
+    """
+    Legt Partitionen für [start, end) sowie die DEFAULT-Partition an.
+    Zeilen, die vor ihrer Partition geschrieben wurden, liegen in DEFAULT -
+    PostgreSQL lehnt die neue Partition dann ab. Solche Zeilen werden bei
+    abgehängter DEFAULT-Partition in die neue Partition umgezogen.
+    """
+    spec = PARTITIONED_TABLES[table]
+    default = f"{table}_default"
+    conn.execute(text(f'CREATE TABLE IF NOT EXISTS "{default}" PARTITION OF "{table}" DEFAULT'))
+    existing = set(_existing_partitions(conn, table))
+    missing = []
+    period = _period_start(start, spec.interval)
+    while period < end:
+        upper = _next_period(period, spec.interval)
+        name = _partition_name(table, period, spec.interval)
+        if name not in existing:
+            missing.append((name, period, upper))
+        period = upper
+    if not missing:
+        return
+
+    stranded = set(_default_periods(conn, table, spec, missing[0][1], missing[-1][2]))
+    if stranded:
+        conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"'))
+    for name, period, upper in missing:
+        conn.execute(text(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{period.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        if period in stranded:
+            bounds = f'"{spec.column}" >= :start AND "{spec.column}" < :end'
+            params = {"start": period, "end": upper}
+            conn.execute(text(f'INSERT INTO "{name}" SELECT * FROM "{default}" WHERE {bounds}'), params)
+            conn.execute(text(f'DELETE FROM "{default}" WHERE {bounds}'), params)
+    if stranded:
+        conn.execute(text(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT'))
+
+
+def ensure_partitions(conn, now: datetime = None):
+    """
+    Legt die aktuellen und kommenden Partitionen aller Rohdaten-Tabellen an -
+    ab der ältesten noch aufzubewahrenden Zeile in DEFAULT, damit auch dort
+    gestrandete Tage eine eigene Partition erhalten.
+    """
+    now = now or datetime.utcnow()
+    for table, spec in PARTITIONED_TABLES.items():
+        if _relkind(conn, table) != 'p':
+            continue
+        start = now
+        if _relkind(conn, f"{table}_default") == 'r':
+            oldest = conn.execute(text(
+                f'SELECT MIN("{spec.column}") FROM "{table}_default" WHERE "{spec.column}" >= :cutoff'
+            ), {"cutoff": now - timedelta(days=spec.retention_days)}).scalar()
+            start = min(oldest or now, now)
+        create_partitions(conn, table, start, _horizon(now, spec))
+
+
+def drop_expired_partitions(conn, now: datetime = None) -> List[str]:
+    """Entfernt Partitionen jenseits der Aufbewahrungsfrist (DROP statt DELETE)"""
+    now = now or datetime.utcnow()
+    dropped = []
+    for table, spec in PARTITIONED_TABLES.items():
+        cutoff = now - timedelta(days=spec.retention_days)
+        for name in _existing_partitions(conn, table):
+            if name == f"{table}_default":
+                # Nachzügler ohne eigene Partition - hier bleibt nur DELETE
+                conn.execute(text(
+                    f'DELETE FROM "{name}" WHERE "{spec.column}" < :cutoff'
+                ), {"cutoff": cutoff})
+                continue
+            start = _parse_partition_start(table, name, spec.interval)
+            if start is not None and _next_period(start, spec.interval) <= cutoff:
+                conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+                dropped.append(name)
+    return dropped
+
+
+def convert_legacy_table(conn, table: str, now: datetime = None) -> bool:
+    """
+    Wandelt eine vor der Partitionierung angelegte Tabelle um.
+    Rohdaten innerhalb der Aufbewahrungsfrist werden einmalig kopiert.
+    """
+    if _relkind(conn, table) != 'r':
+        return False
+
+    now = now or datetime.utcnow()
+    spec = PARTITIONED_TABLES[table]
+    legacy = f"{table}_legacy"
+
+    conn.execute(text(f'ALTER TABLE "{table}" RENAME TO "{legacy}"'))
+    for index_name in list(conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table"
+    ), {"table": legacy}).scalars()):
+        conn.execute(text(f'ALTER INDEX "{index_name}" RENAME TO "{(index_name + "_legacy")[:63]}"'))
+
+    Base.metadata.tables[table].create(conn, checkfirst=True)
+
+    cutoff = now - timedelta(days=spec.retention_days)
+    oldest = conn.execute(text(
+        f'SELECT MIN("{spec.column}") FROM "{legacy}" WHERE "{spec.column}" >= :cutoff'
+    ), {"cutoff": cutoff}).scalar()
+    create_partitions(conn, table, oldest or now, _horizon(now, spec))
+
+    legacy_columns = {row[0] for row in conn.execute(text(
+        "SELECT column_name FROM information_schema.columns WHERE table_name = :table"
+    ), {"table": legacy})}
+    columns = ", ".join(
+        f'"{column.name}"' for column in Base.metadata.tables[table].columns
+        if column.name in legacy_columns
+    )
+    conn.execute(text(
+        f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{legacy}" '
+        f'WHERE "{spec.column}" >= :cutoff'
+    ), {"cutoff": cutoff})
+    conn.execute(text(f'DROP TABLE "{legacy}"'))
+    return True
+
+
+def prepare_partitioned_tables(engine, tables: List[str] = None):
+    """Legt DEFAULT-, aktuelle und kommende Partitionen an (Tabellenanlage und Anmeldung)"""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for table in tables or PARTITIONED_TABLES:
+            if _relkind(conn, table) == 'p':
+                create_partitions(conn, table, now, _horizon(now, PARTITIONED_TABLES[table]))
+
+
+# ==================== Sketches ====================
+
+def sketch_percentiles(sketch: Dict[Any, int], percentiles=(50, 95, 99)) -> Dict[str, float]:
+    """Schätzt Perzentile aus einem zusammengeführten Log-Histogramm"""
+    bins = sorted((int(k), int(v)) for k, v in sketch.items() if int(v) > 0)
+    total = sum(count for _, count in bins)
+    result = {}
+    if not total:
+        return {f"p{p}": 0.0 for p in percentiles}
+    for p in percentiles:
+        rank = max(1, math.ceil(total * p / 100))
+        seen = 0
+        for index, count in bins:
+            seen += count
+            if seen >= rank:
+                # Mittelpunkt des Bins (gamma^(i-1), gamma^i]
+                result[f"p{p}"] = 2 * SKETCH_GAMMA ** index / (SKETCH_GAMMA + 1)
+                break
+    return result
+
+
+# ==================== Rollup-Service ====================
+
+class TelemetryRollupService:
+    """Verdichtet Rohdaten in telemetry_rollups und pflegt die Partitionen"""
+
+    def __init__(self):
+        # Wasserstände je Datenbank (Benutzer können die Datenbank wechseln)
+        self._minute_marks: Dict[str, datetime] = {}
+        self._hour_marks: Dict[str, datetime] = {}
+        self._maintained_at: Dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+    # ---------- Job ----------
+
+    def run(self, session, now: datetime = None, maintenance_interval: timedelta = timedelta(hours=1)):
+        """Ein Durchlauf: Partitionen pflegen (stündlich), Minuten und Stunden verdichten"""
+        now = now or datetime.utcnow()
+        conn = session.connection()
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": ROLLUP_LOCK_KEY}).scalar():
+            return  # eine andere Instanz verdichtet gerade
+
+        db_key = str(conn.engine.url)
+        with self._lock:
+            if now - self._maintained_at.get(db_key, datetime.min) >= maintenance_interval:
+                self.maintain(conn, now)
+                self._maintained_at[db_key] = now
+            self._roll_up_minutes(conn, db_key, now)
+            self._roll_up_hours(conn, db_key, now)
+        session.commit()
+
+    def maintain(self, conn, now: datetime = None):
+        """Alt-Tabellen umwandeln, kommende Partitionen anlegen, abgelaufene entfernen"""
+        now = now or datetime.utcnow()
+        for table in PARTITIONED_TABLES:
+            try:
+                with conn.begin_nested():
+                    if convert_legacy_table(conn, table, now):
+                        print(f"Telemetrie: {table} in partitionierte Tabelle umgewandelt")
+            except Exception as e:
+                print(f"Telemetrie: Umwandlung von {table} fehlgeschlagen: {e}")
+        try:
+            with conn.begin_nested():
+                ensure_partitions(conn, now)
+        except Exception as e:
+            print(f"Telemetrie: Partitionen konnten nicht angelegt werden: {e}")
+        dropped = drop_expired_partitions(conn, now)
+        if dropped:
+            print(f"Telemetrie: {len(dropped)} abgelaufene Partitionen entfernt")
+        conn.execute(text("""
+            DELETE FROM telemetry_rollups
+            WHERE (bucket_size = '1m' AND bucket_start < :minute_cutoff)
+               OR (bucket_size = '1h' AND bucket_start < :hour_cutoff)
+        """), {
+            "minute_cutoff": now - timedelta(days=MINUTE_ROLLUP_RETENTION_DAYS),
+            "hour_cutoff": now - timedelta(days=HOUR_ROLLUP_RETENTION_DAYS),
+        })
+
+    def _roll_up_minutes(self, conn, db_key: str, now: datetime):
+        end = (now - ROLLUP_LAG).replace(second=0, microsecond=0)
+        mark = self._minute_marks.get(db_key) or self._load_mark(conn, '1m', timedelta(minutes=1))
+        start = (mark or end - timedelta(days=MINUTE_ROLLUP_RETENTION_DAYS)) - timedelta(minutes=RECOMPUTE_MINUTES)
+        while start < end:
+            chunk_end = min(start + BACKFILL_CHUNK, end)
+            self.roll_up_minutes(conn, start, chunk_end)
+            start = chunk_end
+        self._minute_marks[db_key] = end
+
+    def _roll_up_hours(self, conn, db_key: str, now: datetime):
+        end = self._minute_marks[db_key].replace(minute=0)
+        mark = self._hour_marks.get(db_key) or self._load_mark(conn, '1h', timedelta(hours=1))
+        start = (mark or end - timedelta(days=MINUTE_ROLLUP_RETENTION_DAYS)) - timedelta(hours=1)
+        if start < end:
+            self.roll_up_hours(conn, start, end)
+        self._hour_marks[db_key] = end
+
+    @staticmethod
+    def _load_mark(conn, bucket_size: str, width: timedelta) -> Optional[datetime]:
+        last = conn.execute(text(
+            "SELECT MAX(bucket_start) FROM telemetry_rollups WHERE bucket_size = :size"
+        ), {"size": bucket_size}).scalar()
+        return last + width if last else None
+
+    def roll_up_minutes(self, conn, start: datetime, end: datetime):
+        """Verdichtet Rohdaten aus [start, end) in Minuten-Rollups (idempotent)"""
+        conn.execute(text(
+            "DELETE FROM telemetry_rollups WHERE bucket_size = '1m' AND bucket_start >= :start AND bucket_start < :end"
+        ), {"start": start, "end": end})
+        for source, spec in ROLLUP_SOURCES.items():
+            if _relkind(conn, spec['table']) not in ('r', 'p'):
+                continue
+            bin_expr = (
+                f"CASE WHEN {spec['value']} IS NULL THEN NULL "
+                f"ELSE CEIL(LN(GREATEST({spec['value']}, :min_value)) / :ln_gamma)::int END"
+                if spec['sketch'] else "NULL::int"
+            )
+            conn.execute(text(f"""
+                INSERT INTO telemetry_rollups (
+                    id, tenant_id, bucket_start, bucket_size, source, series,
+                    count, value_count, sum_value, min_value, max_value, avg_value, error_count, sketch
+                )
+                SELECT gen_random_uuid(), tenant_id, bucket, '1m', :source, series,
+                       SUM(n), SUM(nv), SUM(s), MIN(mn), MAX(mx), SUM(s) / NULLIF(SUM(nv), 0), SUM(errors),
+                       jsonb_object_agg(bin, n) FILTER (WHERE bin IS NOT NULL)
+                FROM (
+                    SELECT {spec['tenant']} AS tenant_id,
+                           date_trunc('minute', {spec['time']}) AS bucket,
+                           {spec['series']} AS series,
+                           {bin_expr} AS bin,
+                           COUNT(*) AS n,
+                           COUNT({spec['value']}) AS nv,
+                           SUM({spec['value']}) AS s,
+                           MIN({spec['value']}) AS mn,
+                           MAX({spec['value']}) AS mx,
+                           COUNT(*) FILTER (WHERE {spec['errors']}) AS errors
+                    FROM {spec['table']}
+                    WHERE {spec['time']} >= :start AND {spec['time']} < :end
+                    GROUP BY 1, 2, 3, 4
+                ) binned
+                GROUP BY tenant_id, bucket, series
+            """), {
+                "source": source, "start": start, "end": end,
+                "min_value": SKETCH_MIN_VALUE, "ln_gamma": math.log(SKETCH_GAMMA),
+            })
+
+    def roll_up_hours(self, conn, start: datetime, end: datetime):
+        """Fasst Minuten-Rollups aus [start, end) zu Stunden-Rollups zusammen (idempotent)"""
+        conn.execute(text(
+            "DELETE FROM telemetry_rollups WHERE bucket_size = '1h' AND bucket_start >= :start AND bucket_start < :end"
+        ), {"start": start, "end": end})
+        conn.execute(text("""
+            WITH minutes AS (
+                SELECT * FROM telemetry_rollups
+                WHERE bucket_size = '1m' AND bucket_start >= :start AND bucket_start < :end
+            ),
+            totals AS (
+                SELECT tenant_id, date_trunc('hour', bucket_start) AS bucket, source, series,
+                       SUM(count) AS n, SUM(value_count) AS nv, SUM(sum_value) AS s, MIN(min_value) AS mn,
+                       MAX(max_value) AS mx, SUM(error_count) AS errors,
+                       SUM(sum_value) / NULLIF(SUM(value_count), 0) AS avg
+                FROM minutes
+                GROUP BY 1, 2, 3, 4
+            ),
+            sketches AS (
+                SELECT tenant_id, bucket, source, series, jsonb_object_agg(bin, n) AS sketch
+                FROM (
+                    SELECT m.tenant_id, date_trunc('hour', m.bucket_start) AS bucket, m.source, m.series,
+                           kv.key AS bin, SUM(kv.value::bigint) AS n
+                    FROM minutes m, jsonb_each_text(m.sketch) kv
+                    GROUP BY 1, 2, 3, 4, 5
+                ) bins
+                GROUP BY 1, 2, 3, 4
+            )
+            INSERT INTO telemetry_rollups (
+                id, tenant_id, bucket_start, bucket_size, source, series,
+                count, value_count, sum_value, min_value, max_value, avg_value, error_count, sketch
+            )
+            SELECT gen_random_uuid(), t.tenant_id, t.bucket, '1h', t.source, t.series,
+                   t.n, t.nv, t.s, t.mn, t.mx, t.avg, t.errors, sk.sketch
+            FROM totals t
+            LEFT JOIN sketches sk
+              ON sk.tenant_id IS NOT DISTINCT FROM t.tenant_id
+             AND sk.bucket = t.bucket AND sk.source = t.source AND sk.series = t.series
+        """), {"start": start, "end": end})
+
+    # ---------- Abfragen ----------
+
+    # Stunden-Rollups bis zum letzten verdichteten Stundenende, danach Minuten-Rollups
+    _WINDOW_SQL = """
+        WITH cutoff AS (
+            SELECT COALESCE(MAX(bucket_start) + INTERVAL '1 hour', :since) AS t
+            FROM telemetry_rollups WHERE bucket_size = '1h' AND source = :source
+        ),
+        rollups AS (
+            SELECT r.* FROM telemetry_rollups r, cutoff
+            WHERE r.source = :source
+              AND ((r.bucket_size = '1h' AND r.bucket_start >= date_trunc('hour', :since) AND r.bucket_start < cutoff.t)
+                OR (r.bucket_size = '1m' AND r.bucket_start >= GREATEST(cutoff.t, :since)))
+              {filters}
+        )
+    """
+
+    def _window(self, source: str, since: datetime, series: str = None, tenant_id=None) -> Tuple[str, Dict[str, Any]]:
+        filters = ""
+        params = {"source": source, "since": since}
+        if series:
+            filters += " AND r.series = :series"
+            params["series"] = series
+        if tenant_id:
+            filters += " AND r.tenant_id = :tenant_id"
+            params["tenant_id"] = str(tenant_id)
+        return self._WINDOW_SQL.format(filters=filters), params
+
+    def series_totals(self, session, source: str, since: datetime, tenant_id=None) -> Dict[str, int]:
+        """Anzahl je Serie (z.B. Events je Kategorie) seit `since`"""
+        window, params = self._window(source, since, tenant_id=tenant_id)
+        rows = session.execute(text(
+            window + "SELECT series, SUM(count) FROM rollups GROUP BY series"
+        ), params).all()
+        return {series: int(count) for series, count in rows}
+
+    def value_stats(self, session, source: str, since: datetime, series: str = None, tenant_id=None) -> Dict[str, Any]:
+        """count/min/max/avg und Perzentile einer Quelle seit `since`"""
+        window, params = self._window(source, since, series, tenant_id)
+        totals = session.execute(text(window + """
+            SELECT SUM(count), MIN(min_value), MAX(max_value),
+                   SUM(sum_value) / NULLIF(SUM(value_count), 0),
+                   SUM(error_count)
+            FROM rollups
+        """), params).one()
+        bins = session.execute(text(window + """
+            SELECT kv.key, SUM(kv.value::bigint)
+            FROM rollups, jsonb_each_text(rollups.sketch) kv
+            GROUP BY kv.key
+        """), params).all()
+
+        stats = {
+            'count': int(totals[0] or 0),
+            'min': float(totals[1] or 0),
+            'max': float(totals[2] or 0),
+            'avg': float(totals[3] or 0),
+            'error_count': int(totals[4] or 0),
+        }
+        stats.update(sketch_percentiles({key: count for key, count in bins}))
+        return stats
+
+
+_rollup_service: Optional[TelemetryRollupService] = None
+
+
+def get_telemetry_rollups() -> TelemetryRollupService:
+    """Holt die globale Rollup-Instanz"""
+    global _rollup_service
+    if _rollup_service is None:
+        _rollup_service = TelemetryRollupService()
+    return _rollup_service
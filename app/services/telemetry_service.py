@@ -5,7 +5,6 @@ import uuid
 import hashlib
 import traceback
 import platform
-import psutil
 import sys
 import os
 from datetime import datetime, timedelta
@@ -17,12 +16,16 @@ import time
 import json
 
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, desc
+from sqlalchemy import Float, cast, func, and_, or_, desc, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
 
+from app.services.system_sampler import SystemSampler, PERSISTED_METRICS
+from app.services.telemetry_rollup_service import get_telemetry_rollups
 from shared.models.telemetry import (
     TelemetryEvent, SystemMetric, PerformanceTrace, ErrorLog,
-    UserSession, UserActivity, AuditLog, FeatureUsage, SystemHealth, Alert,
-    EventSeverity, EventCategory, MetricType
+    UserSession, UserActivity, FeatureUsage, SystemHealth, Alert,
+    EventSeverity, EventCategory, MetricType, NO_TENANT
 )
 
 
@@ -51,18 +54,30 @@ class TelemetryService:
         self._worker_thread = None
         self._metric_thread = None
         
+        # System-Sampler (Ringpuffer statt blockierender psutil-Abfragen)
+        self.sampler = SystemSampler(
+            db_latency_probe=self._probe_database,
+            on_persist=self._persist_samples
+        )
+        
         # Current context
         self._current_user_id = None
         self._current_tenant_id = None
         self._current_session_id = None
         
-        # Consent service integration
+        # Consent service integration: Bitmaske des aktuellen Benutzers
         self._consent_service = None
-        self._consent_cache: Dict[str, bool] = {}
+        self._consent_mask = -1  # ohne Consent-Service alles erlaubt
+        self._consent_bits: Dict[str, int] = {}
         
         # Caches
         self._metric_cache: Dict[str, Any] = {}
-        self._feature_cache: Dict[str, int] = {}
+        
+        # Feature-Zähler je (Mandant, Feature, Tag); der Metric-Worker schreibt sie periodisch
+        self._feature_cache: Dict[tuple, Dict[str, Any]] = {}
+        self._feature_lock = threading.Lock()
+        self.feature_flush_interval = 30  # Sekunden
+        self.emit_feature_events = False  # zusätzlich ein TelemetryEvent pro Aufruf
         
         # App info
         self._app_version = "1.0.0"
@@ -72,43 +87,37 @@ class TelemetryService:
     
     def set_consent_service(self, consent_service):
         """Set the consent service for checking user permissions"""
+        from app.services.consent_service import ConsentType
+        self._consent_bits = {
+            "analytics": ConsentType.ANALYTICS,
+            "telemetry": ConsentType.TELEMETRY,
+            "performance": ConsentType.PERFORMANCE_TRACKING,
+            "error": ConsentType.ERROR_TRACKING,
+            "usage": ConsentType.USAGE_STATISTICS
+        }
         self._consent_service = consent_service
+        consent_service.add_listener(self._on_consent_changed)
+        self._refresh_consent_mask()
     
-    def _check_consent(self, consent_type: str) -> bool:
-        """Check if user has granted consent for a tracking type"""
+    def _refresh_consent_mask(self):
+        """Maske des aktuellen Benutzers aus dem Consent-Service übernehmen"""
         if not self._consent_service or not self._current_user_id:
-            return True  # Default to true if no consent service
-        
-        # Check cache first
-        cache_key = f"{self._current_user_id}:{consent_type}"
-        if cache_key in self._consent_cache:
-            return self._consent_cache[cache_key]
-        
-        # Check consent service
-        try:
-            from app.services.consent_service import ConsentType
-            consent_map = {
-                "analytics": ConsentType.ANALYTICS,
-                "telemetry": ConsentType.TELEMETRY,
-                "performance": ConsentType.PERFORMANCE_TRACKING,
-                "error": ConsentType.ERROR_TRACKING,
-                "usage": ConsentType.USAGE_STATISTICS
-            }
-            if consent_type in consent_map:
-                has_consent = self._consent_service.has_consent(
-                    self._current_user_id, 
-                    consent_map[consent_type]
-                )
-                self._consent_cache[cache_key] = has_consent
-                return has_consent
-        except Exception:
-            pass
-        
-        return True
+            self._consent_mask = -1
+        else:
+            self._consent_mask = int(self._consent_service.get_mask(self._current_user_id))
+    
+    def _on_consent_changed(self, user_id, mask: int):
+        """Listener des Consent-Service: Einwilligungen wurden geladen oder geändert"""
+        if user_id == self._current_user_id:
+            self._consent_mask = int(mask)
+    
+    def _check_consent(self, consent_type: str) -> bool:
+        """Check if user has granted consent for a tracking type (bit test)"""
+        return bool(self._consent_mask & self._consent_bits.get(consent_type, -1))
     
     def clear_consent_cache(self):
-        """Clear the consent cache (call when user changes consent settings)"""
-        self._consent_cache.clear()
+        """Maske neu aus dem Consent-Service übernehmen"""
+        self._refresh_consent_mask()
     
     def start(self):
         """Startet die Background-Worker"""
@@ -125,13 +134,17 @@ class TelemetryService:
         self._metric_thread = threading.Thread(target=self._metric_worker, daemon=True)
         self._metric_thread.start()
         
-        # System-Health-Check starten
-        self._health_thread = threading.Thread(target=self._health_worker, daemon=True)
-        self._health_thread.start()
+        # System-Sampler starten (ersetzt den früheren Health-Worker)
+        self.sampler.start()
+        
+        # Rollup-Worker (Verdichtung, Partitionspflege, Aufbewahrung)
+        self._rollup_thread = threading.Thread(target=self._rollup_worker, daemon=True)
+        self._rollup_thread.start()
     
     def stop(self):
         """Stoppt die Background-Worker"""
         self._is_running = False
+        self.sampler.stop()
         self._flush_queues()
     
     def set_context(self, user_id: str = None, tenant_id: str = None, session_id: str = None):
@@ -148,12 +161,14 @@ class TelemetryService:
                 self._current_tenant_id = None
         if session_id:
             self._current_session_id = session_id
+        self._refresh_consent_mask()
     
     def clear_context(self):
         """Löscht den aktuellen Kontext"""
         self._current_user_id = None
         self._current_tenant_id = None
         self._current_session_id = None
+        self._consent_mask = -1
     
     # ==================== Events ====================
     
@@ -435,56 +450,57 @@ class TelemetryService:
         description: str = None,
         is_sensitive: bool = False
     ):
-        """Erstellt einen Audit-Log-Eintrag"""
-        changed_fields = []
-        if old_values and new_values:
-            changed_fields = [k for k in new_values.keys() if k in old_values and old_values[k] != new_values[k]]
+        """Erstellt einen Audit-Log-Eintrag (gepuffert über den AuditService)"""
+        from app.services.audit_service import get_audit_service, AuditEventType
         
-        # Checksum für Integrität
-        checksum_data = f"{action}:{resource_type}:{resource_id}:{datetime.utcnow().isoformat()}"
-        checksum = hashlib.sha256(checksum_data.encode()).hexdigest()
-        
-        if self.db_service:
-            try:
-                with self.db_service.get_session() as session:
-                    audit = AuditLog(
-                        user_id=self._current_user_id,
-                        tenant_id=self._current_tenant_id,
-                        action=action,
-                        action_description=description,
-                        resource_type=resource_type,
-                        resource_id=str(resource_id) if resource_id else None,
-                        resource_name=resource_name,
-                        old_values=old_values,
-                        new_values=new_values,
-                        changed_fields=changed_fields,
-                        session_id=self._current_session_id,
-                        is_sensitive=is_sensitive,
-                        checksum=checksum
-                    )
-                    session.add(audit)
-                    session.commit()
-            except Exception:
-                pass
+        event_type = next((t for t in AuditEventType if t.action == action), AuditEventType.UPDATE)
+        get_audit_service(self.db_service).log(
+            event_type,
+            action=action,
+            user_id=self._current_user_id,
+            tenant_id=self._current_tenant_id,
+            resource_type=resource_type,
+            resource_id=resource_id,
+            resource_name=resource_name,
+            description=description,
+            old_values=old_values,
+            new_values=new_values,
+            session_id=self._current_session_id,
+            is_sensitive=is_sensitive
+        )
     
     # ==================== Feature Usage ====================
     
-    def track_feature_usage(self, feature_name: str, category: str = None, duration_ms: float = None, was_successful: bool = True):
-        """Trackt die Nutzung eines Features"""
-        today = datetime.utcnow().date()
-        cache_key = f"{feature_name}:{today}"
+    def track_feature_usage(
+        self,
+        feature_name: str,
+        category: str = None,
+        duration_ms: float = None,
+        was_successful: bool = True,
+        emit_event: bool = None
+    ):
+        """Trackt die Nutzung eines Features (Zähler im Speicher, periodisch persistiert)"""
+        cache_key = (self._current_tenant_id, feature_name, datetime.utcnow().date())
         
         # Lokalen Cache updaten
-        if cache_key not in self._feature_cache:
-            self._feature_cache[cache_key] = {'count': 0, 'duration': 0, 'success': 0, 'error': 0}
+        with self._feature_lock:
+            counters = self._feature_cache.get(cache_key)
+            if counters is None:
+                counters = self._feature_cache[cache_key] = {
+                    'category': category, 'count': 0, 'duration': 0, 'success': 0, 'error': 0
+                }
+            counters['count'] += 1
+            if duration_ms:
+                counters['duration'] += duration_ms
+            if was_successful:
+                counters['success'] += 1
+            else:
+                counters['error'] += 1
         
-        self._feature_cache[cache_key]['count'] += 1
-        if duration_ms:
-            self._feature_cache[cache_key]['duration'] += duration_ms
-        if was_successful:
-            self._feature_cache[cache_key]['success'] += 1
-        else:
-            self._feature_cache[cache_key]['error'] += 1
+        if emit_event is None:
+            emit_event = self.emit_feature_events
+        if not emit_event:
+            return
         
         # Event tracken
         self.track_event(
@@ -501,260 +517,141 @@ class TelemetryService:
     # ==================== System Health ====================
     
     def get_device_info(self) -> Dict[str, Any]:
-        """Sammelt detaillierte Geräteinformationen"""
-        device_info = {
-            'timestamp': datetime.utcnow().isoformat(),
-            'system': {},
-            'hardware': {},
-            'network': {},
-            'storage': {},
-            'processes': {}
-        }
+        """Sammelt detaillierte Geräteinformationen aus dem Sampler-Speicher"""
+        snapshot = self._get_sampler_snapshot()
+        static = snapshot.get('static', {})
+        memory = snapshot.get('memory', {})
+        network = snapshot.get('network', {})
         
-        # System-Info
-        try:
-            device_info['system'] = {
-                'os': platform.system(),
-                'os_version': platform.release(),
-                'os_build': platform.version(),
-                'architecture': platform.machine(),
-                'processor': platform.processor(),
-                'hostname': platform.node(),
-                'python_version': sys.version.split()[0],
-                'boot_time': datetime.fromtimestamp(psutil.boot_time()).isoformat() if hasattr(psutil, 'boot_time') else None
-            }
-        except Exception as e:
-            device_info['system']['error'] = str(e)
+        hardware = dict(static.get('hardware', {}))
+        if memory:
+            hardware.update({
+                'cpu_freq_current': snapshot.get('cpu_freq_current'),
+                'ram_total_gb': memory.get('total_gb'),
+                'ram_available_gb': memory.get('available_gb'),
+                'swap_total_gb': memory.get('swap_total_gb'),
+                'swap_used_gb': memory.get('swap_used_gb')
+            })
         
-        # Hardware-Info
-        try:
-            cpu_freq = psutil.cpu_freq()
-            device_info['hardware'] = {
-                'cpu_count_physical': psutil.cpu_count(logical=False),
-                'cpu_count_logical': psutil.cpu_count(logical=True),
-                'cpu_freq_current': round(cpu_freq.current, 2) if cpu_freq else None,
-                'cpu_freq_max': round(cpu_freq.max, 2) if cpu_freq and cpu_freq.max else None,
-                'ram_total_gb': round(psutil.virtual_memory().total / (1024**3), 2),
-                'ram_available_gb': round(psutil.virtual_memory().available / (1024**3), 2),
-                'swap_total_gb': round(psutil.swap_memory().total / (1024**3), 2),
-                'swap_used_gb': round(psutil.swap_memory().used / (1024**3), 2)
+        network_info = {}
+        if network:
+            network_info = {
+                'bytes_sent_gb': round(network['bytes_sent'] / (1024**3), 3),
+                'bytes_recv_gb': round(network['bytes_recv'] / (1024**3), 3),
+                'packets_sent': network['packets_sent'],
+                'packets_recv': network['packets_recv'],
+                'errors_in': network['errors_in'],
+                'errors_out': network['errors_out'],
+                'interfaces': snapshot.get('interfaces', [])
             }
-        except Exception as e:
-            device_info['hardware']['error'] = str(e)
-        
-        # Netzwerk-Info
-        try:
-            net_io = psutil.net_io_counters()
-            device_info['network'] = {
-                'bytes_sent_gb': round(net_io.bytes_sent / (1024**3), 3),
-                'bytes_recv_gb': round(net_io.bytes_recv / (1024**3), 3),
-                'packets_sent': net_io.packets_sent,
-                'packets_recv': net_io.packets_recv,
-                'errors_in': net_io.errin,
-                'errors_out': net_io.errout
-            }
-            
-            # Netzwerk-Interfaces
-            interfaces = []
-            for name, addrs in psutil.net_if_addrs().items():
-                for addr in addrs:
-                    if addr.family.name == 'AF_INET':
-                        interfaces.append({
-                            'name': name,
-                            'ip': addr.address,
-                            'netmask': addr.netmask
-                        })
-            device_info['network']['interfaces'] = interfaces[:5]  # Nur erste 5
-        except Exception as e:
-            device_info['network']['error'] = str(e)
-        
-        # Speicher-Info
-        try:
-            partitions = []
-            for partition in psutil.disk_partitions():
-                try:
-                    usage = psutil.disk_usage(partition.mountpoint)
-                    partitions.append({
-                        'device': partition.device,
-                        'mountpoint': partition.mountpoint,
-                        'fstype': partition.fstype,
-                        'total_gb': round(usage.total / (1024**3), 2),
-                        'used_gb': round(usage.used / (1024**3), 2),
-                        'free_gb': round(usage.free / (1024**3), 2),
-                        'percent': usage.percent
-                    })
-                except:
-                    pass
-            device_info['storage']['partitions'] = partitions
-        except Exception as e:
-            device_info['storage']['error'] = str(e)
         
-        # Prozess-Info
-        try:
-            # Top 5 Prozesse nach RAM-Nutzung
-            processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'memory_percent', 'cpu_percent']):
-                try:
-                    pinfo = proc.info
-                    if pinfo['memory_percent'] and pinfo['memory_percent'] > 0.1:
-                        processes.append({
-                            'pid': pinfo['pid'],
-                            'name': pinfo['name'],
-                            'memory_percent': round(pinfo['memory_percent'], 2),
-                            'cpu_percent': round(pinfo['cpu_percent'] or 0, 2)
-                        })
-                except:
-                    pass
-            
-            processes.sort(key=lambda x: x['memory_percent'], reverse=True)
-            device_info['processes']['top_by_memory'] = processes[:5]
-            device_info['processes']['total_count'] = len(list(psutil.process_iter()))
-        except Exception as e:
-            device_info['processes']['error'] = str(e)
-        
-        return device_info
-    
-    def get_realtime_metrics(self) -> Dict[str, Any]:
-        """Holt Echtzeit-Metriken für das Dashboard"""
-        metrics = {
+        return {
             'timestamp': datetime.utcnow().isoformat(),
-            'cpu': {},
-            'memory': {},
-            'disk': {},
-            'network': {},
-            'app': {}
+            'system': static.get('system', {}),
+            'hardware': hardware,
+            'network': network_info,
+            'storage': {'partitions': snapshot.get('partitions', [])},
+            'processes': snapshot.get('processes', {})
         }
+    
+    def get_realtime_metrics(self) -> Dict[str, Any]:
+        """Holt Echtzeit-Metriken für das Dashboard aus dem Sampler-Speicher"""
+        snapshot = self._get_sampler_snapshot()
+        network = snapshot.get('network', {})
         
-        # CPU-Metriken
-        try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
-            cpu_per_core = psutil.cpu_percent(interval=0.1, percpu=True)
-            metrics['cpu'] = {
-                'percent': cpu_percent,
-                'per_core': cpu_per_core,
-                'load_avg': list(psutil.getloadavg()) if hasattr(psutil, 'getloadavg') else [0, 0, 0]
-            }
-        except Exception as e:
-            metrics['cpu']['error'] = str(e)
-        
-        # Memory-Metriken
-        try:
-            vm = psutil.virtual_memory()
-            swap = psutil.swap_memory()
-            metrics['memory'] = {
-                'percent': vm.percent,
-                'used_gb': round(vm.used / (1024**3), 2),
-                'available_gb': round(vm.available / (1024**3), 2),
-                'total_gb': round(vm.total / (1024**3), 2),
-                'swap_percent': swap.percent,
-                'swap_used_gb': round(swap.used / (1024**3), 2)
-            }
-        except Exception as e:
-            metrics['memory']['error'] = str(e)
-        
-        # Disk-Metriken
-        try:
-            disk = psutil.disk_usage('/')
-            disk_io = psutil.disk_io_counters()
-            metrics['disk'] = {
-                'percent': disk.percent,
-                'used_gb': round(disk.used / (1024**3), 2),
-                'free_gb': round(disk.free / (1024**3), 2),
-                'read_mb': round(disk_io.read_bytes / (1024**2), 2) if disk_io else 0,
-                'write_mb': round(disk_io.write_bytes / (1024**2), 2) if disk_io else 0
-            }
-        except Exception as e:
-            metrics['disk']['error'] = str(e)
-        
-        # Network-Metriken
-        try:
-            net_io = psutil.net_io_counters()
-            metrics['network'] = {
-                'bytes_sent_mb': round(net_io.bytes_sent / (1024**2), 2),
-                'bytes_recv_mb': round(net_io.bytes_recv / (1024**2), 2),
-                'packets_sent': net_io.packets_sent,
-                'packets_recv': net_io.packets_recv
-            }
-        except Exception as e:
-            metrics['network']['error'] = str(e)
-        
-        # App-spezifische Metriken
-        try:
-            current_process = psutil.Process()
-            metrics['app'] = {
-                'memory_mb': round(current_process.memory_info().rss / (1024**2), 2),
-                'memory_percent': round(current_process.memory_percent(), 2),
-                'cpu_percent': round(current_process.cpu_percent(), 2),
-                'threads': current_process.num_threads(),
-                'open_files': len(current_process.open_files()),
-                'connections': len(current_process.connections())
-            }
-        except Exception as e:
-            metrics['app']['error'] = str(e)
+        app_metrics = dict(snapshot.get('app', {}))
+        app_metrics.update(snapshot.get('app_handles', {}))
         
-        return metrics
+        return {
+            'timestamp': datetime.utcnow().isoformat(),
+            'cpu': snapshot.get('cpu', {}),
+            'memory': snapshot.get('memory', {}),
+            'disk': snapshot.get('disk', {}),
+            'network': {
+                'bytes_sent_mb': round(network['bytes_sent'] / (1024**2), 2),
+                'bytes_recv_mb': round(network['bytes_recv'] / (1024**2), 2),
+                'packets_sent': network['packets_sent'],
+                'packets_recv': network['packets_recv'],
+                'sent_kbps': self.sampler.latest('net.sent_kbps'),
+                'recv_kbps': self.sampler.latest('net.recv_kbps')
+            } if network else {},
+            'app': app_metrics
+        }
     
-    def check_system_health(self) -> Dict[str, Any]:
-        """Führt einen System-Health-Check durch"""
+    def get_metric_series(self, name: str, seconds: float = 900) -> List[Dict[str, Any]]:
+        """Zeitreihe einer Sampler-Metrik für Charts (z.B. 'cpu.percent')"""
+        times, values = self.sampler.window(name, seconds)
+        return [
+            {'timestamp': float(t), 'value': float(v)}
+            for t, v in zip(times, values)
+        ]
+    
+    def check_system_health(self, window_seconds: float = 60) -> Dict[str, Any]:
+        """Führt einen System-Health-Check über das letzte Sampler-Fenster durch"""
         health = {
             'timestamp': datetime.utcnow().isoformat(),
             'status': 'healthy',
             'checks': {}
         }
+        snapshot = self._get_sampler_snapshot()
         
-        # CPU
-        try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+        def grade(value: float, degraded: float, unhealthy: float) -> str:
+            return 'healthy' if value < degraded else 'degraded' if value < unhealthy else 'unhealthy'
+        
+        # CPU (Mittel über das Fenster, damit kurze Spitzen nicht alarmieren)
+        cpu = self.sampler.stats('cpu.percent', window_seconds)
+        if cpu:
             health['checks']['cpu'] = {
-                'status': 'healthy' if cpu_percent < 80 else 'degraded' if cpu_percent < 95 else 'unhealthy',
-                'value': cpu_percent,
+                'status': grade(cpu['avg'], 80, 95),
+                'value': round(cpu['avg'], 1),
+                'max': round(cpu['max'], 1),
                 'unit': 'percent'
             }
-        except Exception:
+        else:
             health['checks']['cpu'] = {'status': 'unknown'}
         
         # Memory
-        try:
-            memory = psutil.virtual_memory()
+        memory = snapshot.get('memory')
+        if memory:
             health['checks']['memory'] = {
-                'status': 'healthy' if memory.percent < 80 else 'degraded' if memory.percent < 95 else 'unhealthy',
-                'value': memory.percent,
+                'status': grade(memory['percent'], 80, 95),
+                'value': memory['percent'],
                 'unit': 'percent',
-                'total_gb': round(memory.total / (1024**3), 2),
-                'available_gb': round(memory.available / (1024**3), 2)
+                'total_gb': memory['total_gb'],
+                'available_gb': memory['available_gb']
             }
-        except Exception:
+        else:
             health['checks']['memory'] = {'status': 'unknown'}
         
         # Disk
-        try:
-            disk = psutil.disk_usage('/')
+        disk = snapshot.get('disk')
+        if disk:
             health['checks']['disk'] = {
-                'status': 'healthy' if disk.percent < 80 else 'degraded' if disk.percent < 95 else 'unhealthy',
-                'value': disk.percent,
+                'status': grade(disk['percent'], 80, 95),
+                'value': disk['percent'],
                 'unit': 'percent',
-                'total_gb': round(disk.total / (1024**3), 2),
-                'free_gb': round(disk.free / (1024**3), 2)
+                'total_gb': disk['total_gb'],
+                'free_gb': disk['free_gb']
             }
-        except Exception:
+        else:
             health['checks']['disk'] = {'status': 'unknown'}
         
-        # Database
+        # Database (Latenz aus dem langsamen Sampler-Takt)
         if self.db_service:
-            try:
-                start = time.time()
-                with self.db_service.get_session() as session:
-                    session.execute("SELECT 1")
-                latency = (time.time() - start) * 1000
+            database = snapshot.get('database', {})
+            latency = database.get('latency_ms')
+            if latency is not None:
                 health['checks']['database'] = {
-                    'status': 'healthy' if latency < 100 else 'degraded' if latency < 500 else 'unhealthy',
+                    'status': grade(latency, 100, 500),
                     'latency_ms': round(latency, 2)
                 }
-            except Exception as e:
+            elif 'error' in database:
                 health['checks']['database'] = {
                     'status': 'unhealthy',
-                    'error': str(e)
+                    'error': database['error']
                 }
+            else:
+                health['checks']['database'] = {'status': 'unknown'}
         
         # Gesamtstatus berechnen
         statuses = [c.get('status', 'unknown') for c in health['checks'].values()]
@@ -765,6 +662,21 @@ class TelemetryService:
         
         return health
     
+    def _get_sampler_snapshot(self) -> Dict[str, Any]:
+        """Startet den Sampler bei Bedarf und liefert den letzten Stand"""
+        if not self.sampler.is_running:
+            self.sampler.start()
+        return self.sampler.snapshot()
+    
+    def _probe_database(self) -> Optional[float]:
+        """Misst die Datenbank-Latenz in ms (vom Sampler-Thread aufgerufen)"""
+        if not self.db_service:
+            return None
+        start = time.perf_counter()
+        with self.db_service.get_session() as session:
+            session.execute(text("SELECT 1"))
+        return (time.perf_counter() - start) * 1000
+    
     def record_system_health(self, health_data: Dict[str, Any]):
         """Speichert System-Health-Daten"""
         if not self.db_service:
@@ -848,13 +760,10 @@ class TelemetryService:
         
         try:
             with self.db_service.get_session() as session:
-                # Event-Counts
-                event_counts = session.query(
-                    TelemetryEvent.category,
-                    func.count(TelemetryEvent.id)
-                ).filter(
-                    TelemetryEvent.event_timestamp >= since
-                ).group_by(TelemetryEvent.category).all()
+                # Event-Counts (aus den Rollups statt über Rohdaten)
+                event_counts = get_telemetry_rollups().series_totals(
+                    session, 'events', since, tenant_id=tenant_id
+                )
                 
                 # Error-Counts
                 error_count = session.query(func.count(ErrorLog.id)).filter(
@@ -880,7 +789,11 @@ class TelemetryService:
                 ).limit(10).all()
                 
                 return {
-                    'event_counts': {str(cat): count for cat, count in event_counts},
+                    # Serien sind die Enum-Namen aus der Datenbank (USER) -> Schlüssel ist der Wert (user)
+                    'event_counts': {
+                        EventCategory[cat].value if cat in EventCategory.__members__ else cat: count
+                        for cat, count in event_counts.items()
+                    },
                     'error_count': error_count or 0,
                     'active_sessions': active_sessions or 0,
                     'top_features': [{'name': name, 'count': count} for name, count in top_features]
@@ -928,25 +841,17 @@ class TelemetryService:
         
         try:
             with self.db_service.get_session() as session:
-                query = session.query(
-                    func.avg(PerformanceTrace.duration_ms).label('avg_duration'),
-                    func.min(PerformanceTrace.duration_ms).label('min_duration'),
-                    func.max(PerformanceTrace.duration_ms).label('max_duration'),
-                    func.count(PerformanceTrace.id).label('count')
-                ).filter(
-                    PerformanceTrace.start_time >= since
-                )
-                
-                if operation:
-                    query = query.filter(PerformanceTrace.operation_name == operation)
-                
-                result = query.first()
+                stats = get_telemetry_rollups().value_stats(session, 'traces', since, series=operation)
                 
                 return {
-                    'avg_duration_ms': round(result.avg_duration or 0, 2),
-                    'min_duration_ms': round(result.min_duration or 0, 2),
-                    'max_duration_ms': round(result.max_duration or 0, 2),
-                    'request_count': result.count or 0
+                    'avg_duration_ms': round(stats['avg'], 2),
+                    'min_duration_ms': round(stats['min'], 2),
+                    'max_duration_ms': round(stats['max'], 2),
+                    'p50_duration_ms': round(stats['p50'], 2),
+                    'p95_duration_ms': round(stats['p95'], 2),
+                    'p99_duration_ms': round(stats['p99'], 2),
+                    'error_count': stats['error_count'],
+                    'request_count': stats['count']
                 }
         except Exception:
             return {}
@@ -988,6 +893,7 @@ class TelemetryService:
         batch_size = 100
         flush_interval = 10
         last_flush = time.time()
+        last_feature_flush = time.time()
         
         while self._is_running:
             try:
@@ -1001,6 +907,10 @@ class TelemetryService:
                     self._save_metrics(batch)
                     batch = []
                     last_flush = time.time()
+                
+                if time.time() - last_feature_flush >= self.feature_flush_interval:
+                    self.flush_feature_usage()
+                    last_feature_flush = time.time()
                     
             except Exception:
                 pass
@@ -1008,26 +918,143 @@ class TelemetryService:
         if batch:
             self._save_metrics(batch)
     
-    def _health_worker(self):
-        """Background-Worker für Health-Checks"""
+    def _rollup_worker(self):
+        """Background-Worker für Rollups und Partitionspflege (jede Minute)"""
+        rollups = get_telemetry_rollups()
         while self._is_running:
             try:
-                health = self.check_system_health()
-                self.record_system_health(health)
-                
-                # Metriken aufzeichnen
-                for check_name, check_data in health.get('checks', {}).items():
-                    if 'value' in check_data:
-                        self.record_gauge(
-                            f"system.{check_name}",
-                            check_data['value'],
-                            unit=check_data.get('unit', '')
-                        )
-                
-                # Alle 60 Sekunden
-                time.sleep(60)
-            except Exception:
-                time.sleep(60)
+                session = self.db_service.get_session() if self.db_service else None
+                if session is not None:
+                    with session:
+                        rollups.run(session)
+            except Exception as e:
+                print(f"Telemetrie-Rollup fehlgeschlagen: {e}")
+            
+            for _ in range(60):
+                if not self._is_running:
+                    break
+                time.sleep(1)
+    
+    def _persist_samples(self, aggregates: Dict[str, Dict[str, float]], period_start: float, period_end: float):
+        """Verdichtete Sampler-Werte nach system_metrics schreiben (vom Sampler-Thread aufgerufen)"""
+        start = datetime.utcfromtimestamp(period_start)
+        end = datetime.utcfromtimestamp(period_end)
+        for name, stats in aggregates.items():
+            metric = {
+                'metric_name': f"system.{name}",
+                'value': stats['avg'],
+                'metric_type': MetricType.GAUGE,
+                'metric_unit': PERSISTED_METRICS.get(name),
+                'min_value': stats['min'],
+                'max_value': stats['max'],
+                'avg_value': stats['avg'],
+                'sum_value': stats['sum'],
+                'count': stats['count'],
+                'period_start': start,
+                'period_end': end,
+                'aggregation_interval': '1m',
+                'labels': {},
+                'service': 'holzbau_erp',
+                'host': platform.node(),
+                'timestamp': end
+            }
+            try:
+                self._metric_queue.put_nowait(metric)
+            except queue.Full:
+                break
+        
+        self.record_system_health(self.check_system_health(window_seconds=period_end - period_start))
+    
+    def flush_feature_usage(self):
+        """Schreibt die gesammelten Feature-Zähler mit einem einzigen Upsert
+
+        Lehnt die Datenbank den Sammel-Upsert ab (IntegrityError/DataError), wird
+        zeilenweise in Savepoints nachgeschrieben und nur die abgelehnten Zeilen
+        werden verworfen. Bei anderen Fehlern (z. B. keine Verbindung) bleiben die
+        Zähler im Speicher und gehen in den nächsten Flush ein.
+        """
+        with self._feature_lock:
+            pending, self._feature_cache = self._feature_cache, {}
+        if not pending:
+            return
+        if not self.db_service:
+            return
+        
+        rows = {
+            (tenant_id, feature_name, day): {
+                'tenant_id': tenant_id,
+                'feature_name': feature_name,
+                'feature_category': counters['category'],
+                'date': day,
+                'usage_count': counters['count'],
+                'total_duration_ms': int(round(counters['duration'])),
+                'avg_duration_ms': counters['duration'] / counters['count'],
+                'success_count': counters['success'],
+                'error_count': counters['error'],
+                'success_rate': counters['success'] / counters['count'] * 100
+            }
+            for (tenant_id, feature_name, day), counters in pending.items()
+        }
+        
+        try:
+            session = self.db_service.get_session()
+            if session is None:
+                raise RuntimeError("Keine Benutzerdatenbank verbunden")
+            with session:
+                try:
+                    session.execute(self._feature_upsert(list(rows.values())))
+                    session.commit()
+                except (IntegrityError, DataError) as e:
+                    session.rollback()
+                    print(f"Feature-Nutzung: Sammel-Upsert abgelehnt, schreibe zeilenweise: {e.orig}")
+                    self._upsert_feature_rows(session, rows)
+        except Exception as e:
+            print(f"Feature-Nutzung nicht gespeichert, Zähler bleiben für den nächsten Flush: {e}")
+            # Zähler zurückführen, damit beim nächsten Flush nichts verloren geht
+            with self._feature_lock:
+                for key, counters in pending.items():
+                    current = self._feature_cache.get(key)
+                    if current is None:
+                        self._feature_cache[key] = counters
+                    else:
+                        for field in ('count', 'duration', 'success', 'error'):
+                            current[field] += counters[field]
+    
+    def _upsert_feature_rows(self, session, rows: Dict[tuple, Dict[str, Any]]):
+        """Zeilenweiser Upsert in Savepoints; abgelehnte Zeilen werden protokolliert und verworfen"""
+        for (tenant_id, feature_name, day), row in rows.items():
+            try:
+                with session.begin_nested():
+                    session.execute(self._feature_upsert([row]))
+            except (IntegrityError, DataError) as e:
+                print(f"Feature-Nutzung verworfen ({tenant_id}, {feature_name!r}, {day}, "
+                      f"{row['usage_count']} Aufrufe): {e.orig}")
+        session.commit()
+    
+    def _feature_upsert(self, rows: List[Dict[str, Any]]):
+        """INSERT ... ON CONFLICT, das die Zähler eines Tages aufaddiert"""
+        table = FeatureUsage.__table__
+        stmt = pg_insert(table).values(rows)
+        usage_count = table.c.usage_count + stmt.excluded.usage_count
+        total_duration = table.c.total_duration_ms + stmt.excluded.total_duration_ms
+        success_count = table.c.success_count + stmt.excluded.success_count
+        return stmt.on_conflict_do_update(
+            index_elements=[
+                func.coalesce(table.c.tenant_id, text(f"'{NO_TENANT}'::uuid")),
+                table.c.feature_name,
+                table.c.date
+            ],
+            set_={
+                'usage_count': usage_count,
+                'total_duration_ms': total_duration,
+                'avg_duration_ms': cast(total_duration, Float) / func.nullif(usage_count, 0),
+                'success_count': success_count,
+                'error_count': table.c.error_count + stmt.excluded.error_count,
+                'success_rate': success_count * 100.0 / func.nullif(usage_count, 0),
+                'feature_category': func.coalesce(table.c.feature_category, stmt.excluded.feature_category),
+                'updated_at': func.now()
+            }
+        )
     
     def _save_events(self, events: List[Dict[str, Any]]):
         """Speichert Events in die Datenbank"""
@@ -1069,6 +1096,14 @@ class TelemetryService:
                         value=metric_data['value'],
                         metric_type=metric_data['metric_type'],
                         metric_unit=metric_data.get('metric_unit'),
+                        min_value=metric_data.get('min_value'),
+                        max_value=metric_data.get('max_value'),
+                        avg_value=metric_data.get('avg_value'),
+                        sum_value=metric_data.get('sum_value'),
+                        count=metric_data.get('count', 1),
+                        period_start=metric_data.get('period_start'),
+                        period_end=metric_data.get('period_end'),
+                        aggregation_interval=metric_data.get('aggregation_interval'),
                         labels=metric_data.get('labels', {}),
                         service=metric_data.get('service'),
                         host=metric_data.get('host'),
@@ -1100,6 +1135,7 @@ class TelemetryService:
             self._save_events(events)
         if metrics:
             self._save_metrics(metrics)
+        self.flush_feature_usage()
 
 
 class TraceContext:
@@ -1200,5 +1236,7 @@ def init_telemetry(db_service) -> TelemetryService:
     """Initialisiert das Telemetrie-System"""
     global _telemetry_instance
     _telemetry_instance = TelemetryService(db_service)
+    from app.services.consent_service import get_consent_service
+    _telemetry_instance.set_consent_service(get_consent_service())
     _telemetry_instance.start()
     return _telemetry_instance
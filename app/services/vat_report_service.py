@@ -0,0 +1,308 @@
+"""
+Umsatzsteuer-Voranmeldung - Kennzahlen aus gebuchten JournalItems, Snapshot in TaxReport
+
+compute() ermittelt alle Kennzahlen eines Monats oder Quartals mit einer
+gruppierten Abfrage über die Positionen gebuchter Journale mit Steuerart. Je
+Position wird per LATERAL-Join der zum Buchungsdatum gültige TaxRate des
+Mandanten gesucht: über dessen Umsatz- bzw. Vorsteuerkonto wird die Position
+als Umsatz oder Eingangsleistung eingeordnet (ohne Steuerkonto nach Haben/
+Soll), der Satz liefert die Steuer für innergemeinschaftliche Erwerbe und
+§ 13b-Leistungen, wenn keine Steuer gebucht ist.
+
+Bemessungsgrundlagen werden wie im Formular auf volle Euro abgerundet,
+Steuerbeträge in Cent geführt. save() legt das Ergebnis als TaxReport
+(report_type "vat_advance") ab; get_report() liefert den gespeicherten
+Snapshot ohne Neuberechnung, solange sich die gebuchten Journale des
+Zeitraums nicht geändert haben. Übermittelte Voranmeldungen werden nicht
+überschrieben.
+"""
+import calendar
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, or_, select, true
+
+from shared.models import BookingStatus, Journal, JournalItem, TaxRate, TaxReport, TaxType
+from app.services.payroll_service import MONTH_NAMES
+
+
+REPORT_TYPE = "vat_advance"
+LOCKED_STATUSES = ("submitted", "accepted")
+
+# Fälligkeit ohne Dauerfristverlängerung: 10. des Folgemonats
+DUE_DAY = 10
+
+_CENT = Decimal("0.01")
+
+# Kennzahl -> Bezeichnung (Reihenfolge wie im Formular)
+KENNZAHLEN = {
+    "81": "Steuerpflichtige Umsätze 19 %",
+    "86": "Steuerpflichtige Umsätze 7 %",
+    "87": "Umsätze zum Steuersatz 0 %",
+    "41": "Innergemeinschaftliche Lieferungen an Abnehmer mit USt-IdNr.",
+    "48": "Steuerfreie Umsätze ohne Vorsteuerabzug",
+    "60": "Umsätze, für die der Leistungsempfänger die Steuer schuldet (§ 13b)",
+    "89": "Innergemeinschaftliche Erwerbe 19 %",
+    "84": "Leistungen nach § 13b UStG (Leistungsempfänger)",
+    "85": "Steuer auf Leistungen nach § 13b UStG",
+    "66": "Vorsteuerbeträge aus Rechnungen",
+    "61": "Vorsteuer aus innergemeinschaftlichem Erwerb",
+    "67": "Vorsteuer aus Leistungen nach § 13b UStG",
+    "83": "Verbleibende Umsatzsteuer-Vorauszahlung",
+}
+
+# (Steuerart, Richtung) -> Kennzahl der Bemessungsgrundlage
+BASE_FIELDS = {
+    (TaxType.VAT_19, "output"): "81",
+    (TaxType.VAT_7, "output"): "86",
+    (TaxType.VAT_0, "output"): "87",
+    (TaxType.VAT_FREE, "output"): "48",
+    (TaxType.INTRA_EU, "output"): "41",
+    (TaxType.REVERSE_CHARGE, "output"): "60",
+    (TaxType.INTRA_EU, "input"): "89",
+    (TaxType.REVERSE_CHARGE, "input"): "84",
+}
+# Bemessungsgrundlage -> Kennzahl der geschuldeten Steuer bzw. der zugehörigen Vorsteuer
+OUTPUT_TAX_FIELDS = {"81": "81", "86": "86", "89": "89", "84": "85"}
+INPUT_TAX_FIELDS = {"89": "61", "84": "67"}
+
+
+def period_bounds(year: int, month: Optional[int] = None, quarter: Optional[int] = None) -> Tuple[date, date]:
+    """Erster und letzter Tag eines Monats bzw. Quartals"""
+    if quarter:
+        first, last = (quarter - 1) * 3 + 1, quarter * 3
+    elif month:
+        first = last = month
+    else:
+        raise ValueError("Monat oder Quartal erforderlich")
+    return date(year, first, 1), date(year, last, calendar.monthrange(year, last)[1])
+
+
+def period_label(year: int, month: Optional[int] = None, quarter: Optional[int] = None) -> str:
+    return f"{quarter}. Quartal {year}" if quarter else f"{MONTH_NAMES[month - 1]} {year}"
+
+
+def _cents(value) -> Decimal:
+    return Decimal(value or 0).quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+def _euros(value) -> Decimal:
+    return Decimal(value or 0).quantize(Decimal(1), rounding=ROUND_DOWN)
+
+
+@dataclass
+class VatReturn:
+    """Kennzahlen einer Voranmeldung: Bemessungsgrundlagen (volle Euro) und Steuerbeträge"""
+    year: int
+    month: Optional[int]
+    quarter: Optional[int]
+    bases: Dict[str, Decimal] = field(default_factory=dict)
+    taxes: Dict[str, Decimal] = field(default_factory=dict)
+    journals: int = 0
+    last_change: Optional[datetime] = None
+
+    @property
+    def output_tax(self) -> Decimal:
+        return sum((self.taxes.get(kz, Decimal(0)) for kz in OUTPUT_TAX_FIELDS.values()), Decimal(0))
+
+    @property
+    def input_tax(self) -> Decimal:
+        return sum((self.taxes.get(kz, Decimal(0)) for kz in ("66", *INPUT_TAX_FIELDS.values())), Decimal(0))
+
+    @property
+    def payable(self) -> Decimal:
+        return self.output_tax - self.input_tax
+
+    def lines(self) -> List[dict]:
+        """Belegte Kennzahlen in Formularreihenfolge: {kz, label, base, tax}"""
+        result = []
+        for kz, label in KENNZAHLEN.items():
+            base, tax = self.bases.get(kz), self.taxes.get(kz)
+            if kz == "83":
+                tax = self.payable
+            if base is None and tax is None:
+                continue
+            result.append({"kz": kz, "label": label, "base": base, "tax": tax})
+        return result
+
+    def details(self) -> dict:
+        """JSON-Form für TaxReport.details"""
+        return {
+            "bases": {kz: str(value) for kz, value in self.bases.items()},
+            "taxes": {kz: str(value) for kz, value in self.taxes.items()},
+            "journals": self.journals,
+            "last_change": self.last_change.isoformat() if self.last_change else None,
+            "computed_at": datetime.utcnow().isoformat(),
+        }
+
+    @classmethod
+    def from_report(cls, report: TaxReport) -> "VatReturn":
+        details = report.details or {}
+        last_change = details.get("last_change")
+        return cls(
+            year=report.period_year, month=report.period_month, quarter=report.period_quarter,
+            bases={kz: Decimal(value) for kz, value in (details.get("bases") or {}).items()},
+            taxes={kz: Decimal(value) for kz, value in (details.get("taxes") or {}).items()},
+            journals=details.get("journals", 0),
+            last_change=datetime.fromisoformat(last_change) if last_change else None,
+        )
+
+
+class VatReportService:
+    """Umsatzsteuer-Voranmeldung aus der Finanzbuchhaltung"""
+
+    def _grouped(self, tenant_id, start: date, end: date):
+        """Summen je Steuerart und Richtung (Umsatz/Eingangsleistung) - eine Abfrage"""
+        tax_rate = (
+            select(TaxRate.rate, TaxRate.sales_tax_account_id, TaxRate.purchase_tax_account_id)
+            .where(
+                TaxRate.tenant_id == JournalItem.tenant_id,
+                TaxRate.tax_type == JournalItem.tax_type,
+                TaxRate.is_deleted.is_(False),
+                TaxRate.is_active.isnot(False),
+                or_(TaxRate.valid_from.is_(None), TaxRate.valid_from <= Journal.posting_date),
+                or_(TaxRate.valid_until.is_(None), TaxRate.valid_until >= Journal.posting_date),
+            )
+            .order_by(TaxRate.is_default.desc().nulls_last(), TaxRate.valid_from.desc().nulls_last())
+            .limit(1)
+            .lateral("tax_rate")
+        )
+        net = func.coalesce(JournalItem.credit, 0) - func.coalesce(JournalItem.debit, 0)
+        direction = case(
+            (JournalItem.tax_account_id == tax_rate.c.purchase_tax_account_id, "input"),
+            (JournalItem.tax_account_id == tax_rate.c.sales_tax_account_id, "output"),
+            (net >= 0, "output"),
+            else_="input",
+        )
+        # Umsätze im Haben, Eingangsleistungen im Soll positiv; Gutschriften mindern
+        base = case((direction == "output", net), else_=-net)
+        return (
+            select(
+                JournalItem.tax_type,
+                direction.label("direction"),
+                func.sum(base).label("base"),
+                func.sum(func.sign(base) * func.abs(func.coalesce(JournalItem.tax_amount, 0))).label("tax"),
+                func.sum(base * func.coalesce(tax_rate.c.rate, 0) / 100).label("computed_tax"),
+            )
+            .select_from(JournalItem)
+            .join(Journal, Journal.id == JournalItem.journal_id)
+            .outerjoin(tax_rate, true())
+            .where(
+                Journal.tenant_id == tenant_id,
+                Journal.status == BookingStatus.POSTED,
+                Journal.is_deleted.is_(False),
+                Journal.posting_date.between(start, end),
+                JournalItem.tax_type.isnot(None),
+                or_(JournalItem.tax_account_id.is_(None), JournalItem.account_id != JournalItem.tax_account_id),
+            )
+            .group_by(JournalItem.tax_type, direction)
+        )
+
+    def _source_state(self, session, tenant_id, start: date, end: date) -> Tuple[int, Optional[datetime]]:
+        """Anzahl und letzte Änderung der gebuchten Journale des Zeitraums (Index ix_journals_tenant_posting_date)"""
+        row = session.execute(
+            select(func.count(Journal.id), func.max(Journal.updated_at)).where(
+                Journal.tenant_id == tenant_id,
+                Journal.status == BookingStatus.POSTED,
+                Journal.is_deleted.is_(False),
+                Journal.posting_date.between(start, end),
+            )
+        ).one()
+        return row[0] or 0, row[1]
+
+    def compute(self, session, tenant_id, year: int, month: Optional[int] = None,
+                quarter: Optional[int] = None) -> VatReturn:
+        """Kennzahlen des Zeitraums neu berechnen (ohne Schreiben)"""
+        start, end = period_bounds(year, month, quarter)
+        result = VatReturn(year, month, quarter)
+        bases, taxes = {}, {}
+        for row in session.execute(self._grouped(tenant_id, start, end)):
+            kz = BASE_FIELDS.get((row.tax_type, row.direction))
+            if row.direction == "input" and row.tax_type in (TaxType.VAT_19, TaxType.VAT_7):
+                taxes["66"] = taxes.get("66", Decimal(0)) + Decimal(row.tax or 0)
+            if kz is None:
+                continue
+            bases[kz] = bases.get(kz, Decimal(0)) + Decimal(row.base or 0)
+            if kz in OUTPUT_TAX_FIELDS:
+                # Ohne gebuchte Steuer (z.B. Erwerbe, § 13b) aus dem Satz des TaxRate
+                tax = Decimal(row.tax or 0) or Decimal(row.computed_tax or 0)
+                for target in (OUTPUT_TAX_FIELDS[kz], INPUT_TAX_FIELDS.get(kz)):
+                    if target:
+                        taxes[target] = taxes.get(target, Decimal(0)) + tax
+        result.bases = {kz: _euros(value) for kz, value in bases.items()}
+        result.taxes = {kz: _cents(value) for kz, value in taxes.items()}
+        result.journals, result.last_change = self._source_state(session, tenant_id, start, end)
+        return result
+
+    def _find(self, session, tenant_id, year: int, month: Optional[int], quarter: Optional[int]):
+        return session.execute(
+            select(TaxReport).where(
+                TaxReport.tenant_id == tenant_id,
+                TaxReport.report_type == REPORT_TYPE,
+                TaxReport.period_year == year,
+                TaxReport.period_month.is_(None) if month is None else TaxReport.period_month == month,
+                TaxReport.period_quarter.is_(None) if quarter is None else TaxReport.period_quarter == quarter,
+            ).order_by(TaxReport.created_at.desc()).limit(1)
+        ).scalar()
+
+    def save(self, session, tenant_id, vat_return: VatReturn, user_id=None) -> TaxReport:
+        """Snapshot als TaxReport anlegen bzw. ersetzen und committen"""
+        report = self._find(session, tenant_id, vat_return.year, vat_return.month, vat_return.quarter)
+        if report is not None and report.status in LOCKED_STATUSES:
+            raise ValueError(
+                f"Voranmeldung {period_label(vat_return.year, vat_return.month, vat_return.quarter)} "
+                f"wurde bereits übermittelt"
+            )
+        if report is None:
+            report = TaxReport(
+                tenant_id=tenant_id, report_type=REPORT_TYPE, period_year=vat_return.year,
+                period_month=vat_return.month, period_quarter=vat_return.quarter, created_by=user_id,
+            )
+            session.add(report)
+        _, end = period_bounds(vat_return.year, vat_return.month, vat_return.quarter)
+        bases = vat_return.bases
+        report.taxable_sales = sum((bases.get(kz, Decimal(0)) for kz in ("81", "86", "87")), Decimal(0))
+        report.tax_free_sales = bases.get("48", Decimal(0))
+        report.intra_eu_sales = bases.get("41", Decimal(0))
+        report.output_tax = vat_return.output_tax
+        report.input_tax = vat_return.input_tax
+        report.tax_payable = vat_return.payable
+        report.details = vat_return.details()
+        report.status = "calculated"
+        report.due_date = date(end.year + end.month // 12, end.month % 12 + 1, DUE_DAY)
+        report.updated_by = user_id
+        try:
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        return report
+
+    def get_report(self, session, tenant_id, year: int, month: Optional[int] = None,
+                   quarter: Optional[int] = None, refresh: bool = False,
+                   user_id=None) -> Tuple[VatReturn, TaxReport]:
+        """Gespeicherte Voranmeldung; neu berechnet nur wenn refresh, fehlend oder Buchungen geändert"""
+        report = self._find(session, tenant_id, year, month, quarter)
+        if report is not None and not refresh:
+            stored = VatReturn.from_report(report)
+            if report.status in LOCKED_STATUSES:
+                return stored, report
+            start, end = period_bounds(year, month, quarter)
+            if self._source_state(session, tenant_id, start, end) == (stored.journals, stored.last_change):
+                return stored, report
+        vat_return = self.compute(session, tenant_id, year, month, quarter)
+        return vat_return, self.save(session, tenant_id, vat_return, user_id)
+
+
+# Global instance
+_vat_report_service = None
+
+
+def get_vat_report_service() -> VatReportService:
+    """Get global VAT report service instance"""
+    global _vat_report_service
+    if _vat_report_service is None:
+        _vat_report_service = VatReportService()
+    return _vat_report_service
@@ -10,11 +10,11 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt, QDate
 from PyQt6.QtGui import QFont
 import uuid
-from datetime import datetime, date, timedelta
 from decimal import Decimal
 
 from shared.models import Invoice, InvoiceItem, InvoiceStatus, InvoiceType, Customer, Project, Order
-from sqlalchemy import select, func
+from app.ui.widgets.lookup_combo import LookupComboBox
+from app.services.invoice_number_service import allocate_invoice_numbers
 
 
 class InvoiceDialog(QDialog):
@@ -51,10 +51,11 @@ class InvoiceDialog(QDialog):
         header_group = QGroupBox("Rechnungsinformationen")
         header_form = QFormLayout(header_group)
         
-        self.customer_combo = QComboBox()
+        tenant_id = self.user.tenant_id if self.user else None
+        self.customer_combo = LookupComboBox(self.db, "customers", tenant_id, placeholder="-- Kunde wählen --")
         header_form.addRow("Kunde*:", self.customer_combo)
         
-        self.order_combo = QComboBox()
+        self.order_combo = LookupComboBox(self.db, "orders", tenant_id, placeholder="-- Kein Auftrag --")
         self.order_combo.currentIndexChanged.connect(self.on_order_selected)
         header_form.addRow("Auftrag:", self.order_combo)
         
@@ -314,34 +315,11 @@ class InvoiceDialog(QDialog):
         self.due_date.setDate(inv_date.addDays(days))
     
     def load_data(self):
-        """Load customers and orders"""
-        session = self.db.get_session()
-        try:
-            # Load customers
-            customers = session.execute(
-                select(Customer).where(Customer.is_deleted == False).order_by(Customer.company_name, Customer.last_name)
-            ).scalars().all()
-            
-            self.customer_combo.addItem("-- Kunde wählen --", None)
-            for cust in customers:
-                name = cust.company_name or f"{cust.first_name or ''} {cust.last_name or ''}".strip()
-                self.customer_combo.addItem(f"{cust.customer_number} - {name}", str(cust.id))
-                if self.initial_customer_id and str(cust.id) == self.initial_customer_id:
-                    self.customer_combo.setCurrentIndex(self.customer_combo.count() - 1)
-            
-            # Load orders
-            orders = session.execute(
-                select(Order).where(Order.is_deleted == False).order_by(Order.created_at.desc())
-            ).scalars().all()
-            
-            self.order_combo.addItem("-- Kein Auftrag --", None)
-            for order in orders:
-                self.order_combo.addItem(f"{order.order_number} - {order.subject or 'Ohne Betreff'}", str(order.id))
-                if self.initial_order_id and str(order.id) == self.initial_order_id:
-                    self.order_combo.setCurrentIndex(self.order_combo.count() - 1)
-                    
-        finally:
-            session.close()
+        """Preselect customer and order (entries come from the shared lookup models)"""
+        if self.initial_customer_id:
+            self.customer_combo.set_current_id(self.initial_customer_id)
+        if self.initial_order_id:
+            self.order_combo.set_current_id(self.initial_order_id)
     
     def on_order_selected(self):
         """Handle order selection"""
@@ -580,8 +558,7 @@ class InvoiceDialog(QDialog):
                     session.delete(item)
             else:
                 invoice = Invoice()
-                count = session.execute(select(func.count(Invoice.id))).scalar() or 0
-                invoice.invoice_number = f"R{datetime.now().year}{count + 1:04d}"
+                invoice.invoice_number = allocate_invoice_numbers(session, 1)[0]
                 
                 # Set tenant_id from current user
                 if self.user:
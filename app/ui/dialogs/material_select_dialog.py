@@ -6,9 +6,8 @@ from PyQt6.QtWidgets import (
     QTableWidget, QTableWidgetItem, QHeaderView, QComboBox
 )
 from PyQt6.QtCore import Qt
-from sqlalchemy import select, or_
-
-from shared.models import Material, MaterialCategory
+from shared.models import MaterialCategory
+from app.services.query_registry import registry
 
 
 class MaterialSelectDialog(QDialog):
@@ -91,28 +90,12 @@ class MaterialSelectDialog(QDialog):
         """Load materials from database"""
         session = self.db.get_session()
         try:
-            query = select(Material).where(
-                Material.is_deleted == False,
-                Material.is_active == True
-            )
-            
-            search = self.search_input.text().strip()
-            if search:
-                search_term = f"%{search}%"
-                query = query.where(
-                    or_(
-                        Material.article_number.ilike(search_term),
-                        Material.name.ilike(search_term),
-                        Material.wood_type.ilike(search_term)
-                    )
-                )
-            
-            category = self.category_filter.currentData()
-            if category:
-                query = query.where(Material.category == MaterialCategory(category))
-            
-            query = query.order_by(Material.name).limit(100)
-            materials = session.execute(query).scalars().all()
+            materials = registry.execute(
+                session, "materials.picker",
+                search=self.search_input.text().strip() or None,
+                category=self.category_filter.currentData(),
+                limit=100
+            ).all()
             
             self.table.setRowCount(len(materials))
             self.materials_data = {}
@@ -148,27 +131,8 @@ class MaterialSelectDialog(QDialog):
         """Accept selected material"""
         row = self.table.currentRow()
         if row >= 0 and row in self.materials_data:
-            # Get fresh copy from database
-            session = self.db.get_session()
-            try:
-                mat = self.materials_data[row]
-                self.selected_material = session.get(Material, mat.id)
-                # Detach and copy essential data
-                if self.selected_material:
-                    # Create simple object with needed data
-                    class MaterialData:
-                        pass
-                    
-                    data = MaterialData()
-                    data.id = self.selected_material.id
-                    data.name = self.selected_material.name
-                    data.article_number = self.selected_material.article_number
-                    data.unit = self.selected_material.unit
-                    data.selling_price = self.selected_material.selling_price
-                    
-                    self.selected_material = data
-                    self.accept()
-            finally:
-                session.close()
+            # The picker row already carries id, name, article_number, unit and selling_price
+            self.selected_material = self.materials_data[row]
+            self.accept()
         else:
             self.reject()
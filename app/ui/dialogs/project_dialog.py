@@ -11,8 +11,9 @@ from PyQt6.QtCore import Qt, QDate, QTime
 import uuid
 from datetime import datetime
 
-from shared.models import Project, ProjectType, ProjectStatus, Customer
+from shared.models import Project, ProjectType, ProjectStatus
 from sqlalchemy import select
+from app.ui.widgets.lookup_combo import LookupComboBox
 
 
 class ProjectDialog(QDialog):
@@ -25,7 +26,6 @@ class ProjectDialog(QDialog):
         self.user = user
         self.project = None
         self.setup_ui()
-        self.load_customers()
         if project_id:
             self.load_project()
     
@@ -80,7 +80,10 @@ class ProjectDialog(QDialog):
         self.project_number.setEnabled(False)
         info_form.addRow("Projektnummer:", self.project_number)
         
-        self.customer_combo = QComboBox()
+        self.customer_combo = LookupComboBox(
+            self.db, "customers", self.user.tenant_id if self.user else None,
+            placeholder="-- Kein Kunde --"
+        )
         info_form.addRow("Kunde:", self.customer_combo)
         
         self.project_type = QComboBox()
@@ -807,20 +810,6 @@ class ProjectDialog(QDialog):
         
         layout.addLayout(btn_layout)
     
-    def load_customers(self):
-        session = self.db.get_session()
-        try:
-            customers = session.execute(
-                select(Customer).where(Customer.is_deleted == False).order_by(Customer.company_name, Customer.last_name)
-            ).scalars().all()
-            
-            self.customer_combo.addItem("-- Kein Kunde --", None)
-            for cust in customers:
-                name = cust.company_name or f"{cust.first_name or ''} {cust.last_name or ''}".strip()
-                self.customer_combo.addItem(f"{cust.customer_number} - {name}", str(cust.id))
-        finally:
-            session.close()
-    
     def _set_combo_by_text(self, combo, text):
         """Setzt ComboBox auf einen Wert basierend auf Text"""
         if text:
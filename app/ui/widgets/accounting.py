@@ -8,12 +8,38 @@ from PyQt6.QtWidgets import (
     QGroupBox, QSpinBox, QDoubleSpinBox, QCheckBox, QSplitter,
     QTreeWidget, QTreeWidgetItem, QFrame, QStackedWidget
 )
-from PyQt6.QtCore import Qt, QDate, pyqtSignal
+from PyQt6.QtCore import Qt, QDate, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QColor, QIcon
-from datetime import datetime, date
 from decimal import Decimal
 
 
+def _format_euro(value) -> str:
+    return f"{value or 0:,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+class DepreciationRunWorker(QThread):
+    """Hintergrund-Thread für den AfA-Lauf"""
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id, user_id, period_end):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+        self.period_end = period_end
+    
+    def run(self):
+        try:
+            from app.services.depreciation_service import get_depreciation_service
+            with self.db_service.session_scope() as session:
+                summary = get_depreciation_service().run(
+                    session, tenant_id=self.tenant_id, period_end=self.period_end, user_id=self.user_id
+                )
+            self.completed.emit(True, summary)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
 class AccountingWidget(QWidget):
     """Hauptwidget für die Buchhaltung"""
     
@@ -21,6 +47,7 @@ class AccountingWidget(QWidget):
         super().__init__()
         self.db_service = db_service
         self.user = user
+        self._depreciation_worker = None
         self.setup_ui()
     
     def setup_ui(self):
@@ -420,8 +447,10 @@ class AccountingWidget(QWidget):
         period_layout = QHBoxLayout()
         period_layout.addWidget(QLabel("Zeitraum:"))
         
+        previous_month = QDate.currentDate().addMonths(-1)
         self.tax_year = QComboBox()
-        self.tax_year.addItems(["2025", "2024", "2023"])
+        self.tax_year.addItems([str(year) for year in range(QDate.currentDate().year(), QDate.currentDate().year() - 4, -1)])
+        self.tax_year.setCurrentText(str(previous_month.year()))
         self.tax_year.setStyleSheet(self._input_style())
         period_layout.addWidget(self.tax_year)
         
@@ -430,13 +459,19 @@ class AccountingWidget(QWidget):
             "Januar", "Februar", "März", "April", "Mai", "Juni",
             "Juli", "August", "September", "Oktober", "November", "Dezember"
         ])
+        self.tax_month.setCurrentIndex(previous_month.month() - 1)
         self.tax_month.setStyleSheet(self._input_style())
         period_layout.addWidget(self.tax_month)
         
         calculate_btn = QPushButton("Berechnen")
         calculate_btn.setStyleSheet(self._button_style())
+        calculate_btn.clicked.connect(self.calculate_vat)
         period_layout.addWidget(calculate_btn)
         
+        self.vat_status_label = QLabel("")
+        self.vat_status_label.setStyleSheet("color: #64748b;")
+        period_layout.addWidget(self.vat_status_label)
+        
         period_layout.addStretch()
         vat_layout.addLayout(period_layout)
         
@@ -444,20 +479,22 @@ class AccountingWidget(QWidget):
         amounts_layout = QHBoxLayout()
         
         vat_items = [
-            ("Steuerpflichtige Umsätze 19%", "€ 85.000,00"),
-            ("USt 19%", "€ 16.150,00"),
-            ("Vorsteuer", "€ 8.230,00"),
-            ("Zahllast", "€ 7.920,00"),
+            ("base_19", "Steuerpflichtige Umsätze 19%"),
+            ("output_tax", "Umsatzsteuer"),
+            ("input_tax", "Vorsteuer"),
+            ("payable", "Zahllast"),
         ]
         
-        for label, amount in vat_items:
+        self.vat_amount_labels = {}
+        for key, label in vat_items:
             item_widget = QWidget()
             item_layout = QVBoxLayout(item_widget)
             item_layout.addWidget(QLabel(label))
-            amount_label = QLabel(amount)
+            amount_label = QLabel(_format_euro(0))
             amount_label.setFont(QFont("Segoe UI", 14, QFont.Weight.Bold))
             item_layout.addWidget(amount_label)
             amounts_layout.addWidget(item_widget)
+            self.vat_amount_labels[key] = amount_label
         
         vat_layout.addLayout(amounts_layout)
         
@@ -493,6 +530,8 @@ class AccountingWidget(QWidget):
         
         layout.addWidget(overview_group)
         
+        self._load_tax_reports()
+        
         return widget
     
     def _create_assets_tab(self):
@@ -507,23 +546,34 @@ class AccountingWidget(QWidget):
         add_btn.setStyleSheet(self._button_style())
         toolbar.addWidget(add_btn)
         
-        depreciation_btn = QPushButton("📉 AfA berechnen")
-        depreciation_btn.setStyleSheet(self._button_style().replace("#3b82f6", "#f59e0b"))
-        toolbar.addWidget(depreciation_btn)
+        toolbar.addWidget(QLabel("Periode:"))
+        self.depreciation_period = QDateEdit()
+        self.depreciation_period.setDisplayFormat("MM.yyyy")
+        self.depreciation_period.setDate(QDate.currentDate().addMonths(-1))
+        self.depreciation_period.setCalendarPopup(True)
+        toolbar.addWidget(self.depreciation_period)
+        
+        self.depreciation_btn = QPushButton("📉 AfA berechnen")
+        self.depreciation_btn.setStyleSheet(self._button_style().replace("#3b82f6", "#f59e0b"))
+        self.depreciation_btn.clicked.connect(self.run_depreciation)
+        toolbar.addWidget(self.depreciation_btn)
         
         toolbar.addStretch()
         layout.addLayout(toolbar)
         
         # Anlagen-Tabelle
         self.assets_table = QTableWidget()
-        self.assets_table.setColumnCount(8)
+        self.assets_table.setColumnCount(9)
         self.assets_table.setHorizontalHeaderLabels([
-            "Anlagen-Nr.", "Bezeichnung", "Typ", "Anschaffung",
-            "AK", "Buchwert", "AfA/Jahr", "Status"
+            "Anlagen-Nr.", "Bezeichnung", "Typ", "Inbetriebnahme",
+            "AK", "Kum. AfA", "Buchwert", "Letzte AfA", "Status"
         ])
         self.assets_table.setStyleSheet(self._table_style())
         layout.addWidget(self.assets_table)
         
+        # Leere Tabelle - wird durch _load_assets befüllt
+        self._load_assets()
+        
         return widget
     
     def _create_reports_tab(self):
@@ -779,8 +829,9 @@ class AccountingWidget(QWidget):
         QMessageBox.information(self, "Info", "Bank-Import wird implementiert...")
     
     def create_vat_report(self):
-        """Erstellt USt-Voranmeldung"""
-        QMessageBox.information(self, "Info", "USt-Voranmeldung wird erstellt...")
+        """Erstellt USt-Voranmeldung für den gewählten Zeitraum"""
+        self.tabs.setCurrentIndex(5)
+        self._load_vat()
     
     def create_bwa(self):
         """Erstellt BWA"""
@@ -814,15 +865,186 @@ class AccountingWidget(QWidget):
         """Zeigt offene Posten"""
         QMessageBox.information(self, "Info", "Offene Posten werden angezeigt...")
     
+    def _load_assets(self):
+        """Lädt das Anlagevermögen mit dem Datum der letzten AfA"""
+        session = None
+        try:
+            from sqlalchemy import func, select
+            from shared.models import DepreciationEntry, FixedAsset
+            session = self.db_service.get_session()
+            last_entry = (
+                select(DepreciationEntry.fixed_asset_id,
+                       func.max(DepreciationEntry.depreciation_date).label("last_date"))
+                .where(DepreciationEntry.tenant_id == self.user.tenant_id, DepreciationEntry.status != "reversed")
+                .group_by(DepreciationEntry.fixed_asset_id)
+                .subquery()
+            )
+            rows = session.execute(
+                select(
+                    FixedAsset.asset_number, FixedAsset.name, FixedAsset.asset_type,
+                    func.coalesce(FixedAsset.in_service_date, FixedAsset.acquisition_date).label("service_date"),
+                    FixedAsset.acquisition_cost, FixedAsset.accumulated_depreciation,
+                    FixedAsset.current_book_value, FixedAsset.status, last_entry.c.last_date,
+                )
+                .outerjoin(last_entry, last_entry.c.fixed_asset_id == FixedAsset.id)
+                .where(FixedAsset.tenant_id == self.user.tenant_id, FixedAsset.is_deleted == False)
+                .order_by(FixedAsset.asset_number)
+            ).all()
+            self.assets_table.setRowCount(len(rows))
+            for i, row in enumerate(rows):
+                values = [
+                    row.asset_number, row.name, row.asset_type,
+                    row.service_date.strftime("%d.%m.%Y") if row.service_date else "",
+                    _format_euro(row.acquisition_cost), _format_euro(row.accumulated_depreciation),
+                    _format_euro(row.current_book_value),
+                    row.last_date.strftime("%m.%Y") if row.last_date else "-", row.status or "",
+                ]
+                for col, value in enumerate(values):
+                    self.assets_table.setItem(i, col, QTableWidgetItem(value))
+        except Exception as e:
+            self.assets_table.setRowCount(0)
+            print(f"Fehler beim Laden der Anlagen: {e}")
+        finally:
+            if session:
+                session.close()
+    
+    def run_depreciation(self):
+        """AfA-Lauf für die gewählte Periode im Hintergrund starten"""
+        if self._depreciation_worker and self._depreciation_worker.isRunning():
+            return
+        from app.services.depreciation_service import get_depreciation_service, period_end_of
+        period_end = period_end_of(self.depreciation_period.date().toPyDate())
+        
+        session = None
+        try:
+            session = self.db_service.get_session()
+            pending = get_depreciation_service().preview(session, self.user.tenant_id, period_end)
+        except Exception as e:
+            QMessageBox.critical(self, "Fehler", f"AfA-Vorschau fehlgeschlagen:\n{e}")
+            return
+        finally:
+            if session:
+                session.close()
+        
+        amount = sum((item["amount"] for item in pending), Decimal(0))
+        reply = QMessageBox.question(
+            self, "AfA-Lauf",
+            f"AfA bis {period_end.strftime('%m.%Y')} buchen?\n\n"
+            f"Noch nicht abgeschrieben: {len(pending)} Anlagen, {_format_euro(amount)}\n"
+            f"Ein bereits gebuchter Lauf dieser Periode wird ersetzt.",
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        
+        self.depreciation_btn.setEnabled(False)
+        self.depreciation_btn.setText("⏳ AfA-Lauf läuft...")
+        self._depreciation_worker = DepreciationRunWorker(
+            self.db_service, self.user.tenant_id, getattr(self.user, 'id', None), period_end
+        )
+        self._depreciation_worker.completed.connect(self._on_depreciation_completed)
+        self._depreciation_worker.start()
+    
+    def _on_depreciation_completed(self, success, result):
+        self.depreciation_btn.setEnabled(True)
+        self.depreciation_btn.setText("📉 AfA berechnen")
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"AfA-Lauf fehlgeschlagen:\n{result}")
+            return
+        message = (
+            f"{result['assets']} Anlagen mit {_format_euro(result['amount'])} abgeschrieben, "
+            f"{result['journals']} Buchungen erzeugt."
+        )
+        if result['replaced']:
+            message += "\nDer vorige Lauf dieser Periode wurde ersetzt."
+        if result['skipped']:
+            message += "\n\nOhne Aufwands- bzw. AfA-Konto nicht gebucht:\n" + ", ".join(result['skipped'])
+        if result.get('without_history'):
+            message += (
+                "\n\nDegressiv ohne AfA-Historie nicht gebucht (bitte erste AfA manuell erfassen):\n"
+                + ", ".join(result['without_history'])
+            )
+        QMessageBox.information(self, "AfA-Lauf", message)
+        self._load_assets()
+    
+    def _vat_period(self):
+        return int(self.tax_year.currentText()), self.tax_month.currentIndex() + 1
+    
+    def calculate_vat(self):
+        """Berechnet die UStVA des gewählten Zeitraums neu"""
+        self._load_vat(refresh=True)
+    
+    def _load_vat(self, refresh=False):
+        """Lädt die UStVA (gespeicherter Stand oder Neuberechnung) und zeigt die Beträge"""
+        from app.services.vat_report_service import get_vat_report_service
+        year, month = self._vat_period()
+        session = None
+        try:
+            session = self.db_service.get_session()
+            vat_return, report = get_vat_report_service().get_report(
+                session, self.user.tenant_id, year, month,
+                refresh=refresh, user_id=getattr(self.user, 'id', None)
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "Fehler", f"UStVA-Berechnung fehlgeschlagen:\n{e}")
+            return None
+        finally:
+            if session:
+                session.close()
+        
+        self.vat_amount_labels["base_19"].setText(_format_euro(vat_return.bases.get("81")))
+        self.vat_amount_labels["output_tax"].setText(_format_euro(vat_return.output_tax))
+        self.vat_amount_labels["input_tax"].setText(_format_euro(vat_return.input_tax))
+        self.vat_amount_labels["payable"].setText(_format_euro(vat_return.payable))
+        self.vat_status_label.setText(f"{vat_return.journals} Buchungen · Status: {report.status}")
+        self._load_tax_reports()
+        return vat_return
+    
+    def _load_tax_reports(self):
+        """Lädt die gespeicherten Voranmeldungen in die Steuerübersicht"""
+        session = None
+        try:
+            from sqlalchemy import select
+            from shared.models import TaxReport
+            from app.services.vat_report_service import REPORT_TYPE, period_label
+            session = self.db_service.get_session()
+            reports = session.execute(
+                select(TaxReport)
+                .where(TaxReport.tenant_id == self.user.tenant_id, TaxReport.report_type == REPORT_TYPE)
+                .order_by(TaxReport.period_year.desc(), TaxReport.period_month.desc().nullslast(),
+                          TaxReport.period_quarter.desc().nullslast())
+                .limit(24)
+            ).scalars().all()
+            self.tax_overview_table.setRowCount(len(reports))
+            for i, report in enumerate(reports):
+                values = [
+                    period_label(report.period_year, report.period_month, report.period_quarter),
+                    _format_euro(report.output_tax), _format_euro(report.input_tax),
+                    _format_euro(report.tax_payable), report.status or "",
+                ]
+                for col, value in enumerate(values):
+                    self.tax_overview_table.setItem(i, col, QTableWidgetItem(value))
+        except Exception as e:
+            self.tax_overview_table.setRowCount(0)
+            print(f"Fehler beim Laden der Steuerübersicht: {e}")
+        finally:
+            if session:
+                session.close()
+    
     def _export_vat_pdf(self):
         """Exportiert UStVA als PDF"""
         from PyQt6.QtWidgets import QFileDialog
         from shared.services.export_service import ExportService
+        from app.services.vat_report_service import period_label
+        
+        vat_return = self._load_vat()
+        if vat_return is None:
+            return
+        year, month = self._vat_period()
         
         filename, _ = QFileDialog.getSaveFileName(
             self,
             "UStVA speichern",
-            f"UStVA_{datetime.now().strftime('%Y%m')}.pdf",
+            f"UStVA_{year}{month:02d}.pdf",
             "PDF Dateien (*.pdf)"
         )
         
@@ -833,22 +1055,25 @@ class AccountingWidget(QWidget):
             columns = [
                 {"key": "kz", "label": "KZ", "width": 15},
                 {"key": "bezeichnung", "label": "Bezeichnung", "width": 80},
-                {"key": "betrag", "label": "Betrag", "width": 30},
+                {"key": "bemessung", "label": "Bemessungsgrundlage", "width": 30},
+                {"key": "betrag", "label": "Steuer", "width": 30},
             ]
             
-            # Beispiel-Daten (in Realität aus DB)
             data = [
-                {"kz": "81", "bezeichnung": "Steuerpflichtige Umsätze 19%", "betrag": "€ 45.000,00"},
-                {"kz": "86", "bezeichnung": "Steuerpflichtige Umsätze 7%", "betrag": "€ 5.500,00"},
-                {"kz": "66", "bezeichnung": "Vorsteuer", "betrag": "€ 3.250,00"},
-                {"kz": "83", "bezeichnung": "Zahllast", "betrag": "€ 5.835,00"},
+                {
+                    "kz": line["kz"],
+                    "bezeichnung": line["label"],
+                    "bemessung": _format_euro(line["base"]) if line["base"] is not None else "",
+                    "betrag": _format_euro(line["tax"]) if line["tax"] is not None else "",
+                }
+                for line in vat_return.lines()
             ]
             
             ExportService.export_to_pdf(
                 data=data,
                 columns=columns,
                 title="Umsatzsteuer-Voranmeldung",
-                subtitle=f"Zeitraum: {datetime.now().strftime('%B %Y')}",
+                subtitle=f"Zeitraum: {period_label(year, month)}",
                 filename=filename
             )
             
@@ -19,7 +19,8 @@ import uuid
 
 from sqlalchemy import select
 from app.ui.styles import COLORS, get_button_style, CARD_STYLE
-from shared.models import ConstructionDiary, Project, WeatherCondition
+from shared.models import ConstructionDiary, WeatherCondition
+from app.services.query_registry import registry
 
 
 class ConstructionDiaryWidget(QWidget):
@@ -1201,13 +1202,9 @@ class ConstructionDiaryWidget(QWidget):
             self.project_combo.clear()
             self.project_combo.addItem("-- Projekt wählen --", None)
             
-            query = select(Project).where(Project.is_deleted == False).order_by(Project.project_number.desc())
-            if self.user and hasattr(self.user, 'tenant_id') and self.user.tenant_id:
-                query = query.where(Project.tenant_id == self.user.tenant_id)
-            
-            projects = session.execute(query).scalars().all()
-            for p in projects:
-                self.project_combo.addItem(f"{p.project_number} - {p.name}", str(p.id))
+            tenant_id = self.user.tenant_id if self.user and getattr(self.user, 'tenant_id', None) else None
+            for project_id, number, name in registry.execute(session, "projects.lookup", tenant_id=tenant_id):
+                self.project_combo.addItem(f"{number} - {name}", str(project_id))
         finally:
             session.close()
     
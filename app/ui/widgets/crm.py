@@ -18,7 +18,15 @@ import uuid
 
 from sqlalchemy import select, func
 from app.ui.styles import COLORS, get_button_style, CARD_STYLE
-from shared.models import Lead, Activity, Campaign, Task, Customer, Project
+from shared.models import Lead, Activity, Campaign, Task, Project
+from app.services.crm_pipeline_service import get_pipeline_service, PERIODS as PIPELINE_PERIODS
+from app.ui.widgets.lookup_combo import LookupComboBox
+from app.services.query_registry import registry
+
+
+def _format_euro(value) -> str:
+    """Betrag im deutschen Format ohne Nachkommastellen"""
+    return f"€ {value:,.0f}".replace(",", ".")
 
 
 class CRMWidget(QWidget):
@@ -537,21 +545,10 @@ class CRMWidget(QWidget):
         due_date.setCalendarPopup(True)
         form_layout.addRow("Fällig am:", due_date)
         
-        assignee_combo = QComboBox()
-        assignee_combo.addItem("--- Zuweisen ---", None)
-        assignee_combo.addItem("Ich", self.user.id if self.user else None)
-        # Mitarbeiter aus DB laden
-        try:
-            from app.models.employee import Employee
-            employees = self.db_service.get_session().query(Employee).filter(
-                Employee.is_deleted == False
-            ).limit(20).all()
-            for emp in employees:
-                name = f"{emp.first_name or ''} {emp.last_name or ''}".strip()
-                if name:
-                    assignee_combo.addItem(name, emp.id)
-        except Exception:
-            pass
+        assignee_combo = LookupComboBox(
+            self.db_service, "employees", self.user.tenant_id if self.user else None,
+            placeholder="--- Zuweisen ---", id_type=None
+        )
         form_layout.addRow("Zugewiesen:", assignee_combo)
         
         # Relation
@@ -599,9 +596,11 @@ class CRMWidget(QWidget):
         header_layout.addWidget(QLabel("📊 Sales Pipeline"))
         header_layout.addStretch()
         
-        period_combo = QComboBox()
-        period_combo.addItems(["Dieses Quartal", "Diesen Monat", "Diese Woche", "Dieses Jahr"])
-        header_layout.addWidget(period_combo)
+        self.pipeline_period = QComboBox()
+        for key in ("quarter", "month", "week", "year"):
+            self.pipeline_period.addItem(PIPELINE_PERIODS[key], key)
+        self.pipeline_period.currentIndexChanged.connect(self._load_pipeline)
+        header_layout.addWidget(self.pipeline_period)
         
         layout.addLayout(header_layout)
         
@@ -611,14 +610,16 @@ class CRMWidget(QWidget):
         stages_layout.setSpacing(16)
         
         stages = [
-            ("Erstgespräch", "€ 120.000", 5, COLORS['gray_400']),
-            ("Bedarfsanalyse", "€ 85.000", 3, COLORS['info']),
-            ("Angebot", "€ 150.000", 4, COLORS['warning']),
-            ("Verhandlung", "€ 95.000", 2, COLORS['primary']),
-            ("Abschluss", "€ 45.000", 1, COLORS['success'])
+            ("new", "Neu", COLORS['gray_200']),
+            ("contacted", "Erstgespräch", COLORS['gray_400']),
+            ("qualified", "Bedarfsanalyse", COLORS['info']),
+            ("proposal", "Angebot", COLORS['warning']),
+            ("negotiation", "Verhandlung", COLORS['primary']),
+            ("won", "Abschluss", COLORS['success'])
         ]
         
-        for stage_name, value, count, color in stages:
+        self.pipeline_stages = {}
+        for status, stage_name, color in stages:
             stage_card = QFrame()
             stage_card.setStyleSheet(f"""
                 QFrame {{
@@ -638,7 +639,7 @@ class CRMWidget(QWidget):
             stage_label.setFont(QFont("Segoe UI", 12, QFont.Weight.Bold))
             stage_header.addWidget(stage_label)
             
-            count_badge = QLabel(str(count))
+            count_badge = QLabel("0")
             count_badge.setFixedSize(24, 24)
             count_badge.setAlignment(Qt.AlignmentFlag.AlignCenter)
             count_badge.setStyleSheet(f"""
@@ -651,15 +652,15 @@ class CRMWidget(QWidget):
             stage_layout.addLayout(stage_header)
             
             # Value
-            value_label = QLabel(value)
+            value_label = QLabel(_format_euro(0))
             value_label.setFont(QFont("Segoe UI", 16, QFont.Weight.Bold))
             value_label.setStyleSheet(f"color: {color};")
             stage_layout.addWidget(value_label)
             
-            # Progress bar
+            # Anteil der Leads, die diese Stufe erreicht haben
             progress = QProgressBar()
             progress.setMaximum(100)
-            progress.setValue(count * 20)
+            progress.setValue(0)
             progress.setTextVisible(False)
             progress.setFixedHeight(6)
             progress.setStyleSheet(f"""
@@ -675,7 +676,7 @@ class CRMWidget(QWidget):
             """)
             stage_layout.addWidget(progress)
             
-            # Placeholder for deals
+            # Größte Deals der Stufe
             deals_list = QListWidget()
             deals_list.setMaximumHeight(300)
             deals_list.setStyleSheet(f"""
@@ -693,16 +694,14 @@ class CRMWidget(QWidget):
                     background: {COLORS['gray_100']};
                 }}
             """)
-            
-            # Sample items
-            for i in range(min(count, 3)):
-                item = QListWidgetItem(f"Deal {i+1} - € {(i+1)*15000:,}")
-                deals_list.addItem(item)
-            
             stage_layout.addWidget(deals_list)
             stage_layout.addStretch()
             
             stages_layout.addWidget(stage_card)
+            self.pipeline_stages[status] = {
+                "card": stage_card, "count": count_badge, "value": value_label,
+                "progress": progress, "deals": deals_list
+            }
         
         layout.addWidget(stages_frame)
         
@@ -711,17 +710,19 @@ class CRMWidget(QWidget):
         summary_frame.setStyleSheet(f"background: {COLORS['gray_50']}; border-radius: 8px; padding: 16px;")
         summary_layout = QHBoxLayout(summary_frame)
         
-        for label, value in [
-            ("Gesamt-Pipeline", "€ 495.000"),
-            ("Gewichteter Wert", "€ 198.000"),
-            ("Ø Abschlussrate", "35%"),
-            ("Ø Verkaufszyklus", "45 Tage")
+        self.pipeline_summary = {}
+        for key, label in [
+            ("pipeline", "Gesamt-Pipeline"),
+            ("weighted", "Gewichteter Wert"),
+            ("win_rate", "Ø Abschlussrate"),
+            ("cycle", "Ø Verkaufszyklus")
         ]:
             item = QVBoxLayout()
-            item_value = QLabel(value)
+            item_value = QLabel("–")
             item_value.setFont(QFont("Segoe UI", 18, QFont.Weight.Bold))
             item_value.setAlignment(Qt.AlignmentFlag.AlignCenter)
             item.addWidget(item_value)
+            self.pipeline_summary[key] = item_value
             
             item_label = QLabel(label)
             item_label.setStyleSheet(f"color: {COLORS['text_secondary']};")
@@ -833,6 +834,48 @@ class CRMWidget(QWidget):
         self._load_leads()
         self._load_campaigns()
         self._load_tasks()
+        self._load_pipeline()
+    
+    def _load_pipeline(self):
+        """Pipeline-Kennzahlen des gewählten Zeitraums (zwischengespeichert je Mandant)"""
+        session = self.db_service.get_session()
+        if not session:
+            return
+        try:
+            tenant_id = self.user.tenant_id if self.user and getattr(self.user, 'tenant_id', None) else None
+            period = self.pipeline_period.currentData() or "quarter"
+            stats = get_pipeline_service().get_stats(session, tenant_id, period)
+        except Exception as e:
+            print(f"Fehler beim Laden der Pipeline: {e}")
+            return
+        finally:
+            session.close()
+        
+        for status, widgets in self.pipeline_stages.items():
+            stage = stats.stages[status]
+            widgets["count"].setText(str(stage.count))
+            widgets["value"].setText(_format_euro(stage.value))
+            share = stage.reached / stats.lead_count * 100 if stats.lead_count else 0
+            widgets["progress"].setValue(round(share))
+            if stage.conversion_rate is not None:
+                widgets["card"].setToolTip(
+                    f"{stage.reached} Leads haben diese Stufe erreicht, "
+                    f"{stage.conversion_rate * 100:.0f}% davon die nächste"
+                )
+            else:
+                widgets["card"].setToolTip(f"{stage.reached} Leads haben diese Stufe erreicht")
+            widgets["deals"].clear()
+            for name, value in stage.top_deals:
+                widgets["deals"].addItem(QListWidgetItem(f"{name} - {_format_euro(value)}"))
+        
+        self.pipeline_summary["pipeline"].setText(_format_euro(stats.pipeline_value))
+        self.pipeline_summary["weighted"].setText(_format_euro(stats.weighted_value))
+        self.pipeline_summary["win_rate"].setText(
+            f"{stats.win_rate * 100:.0f}%" if stats.win_rate is not None else "–"
+        )
+        self.pipeline_summary["cycle"].setText(
+            f"{stats.avg_cycle_days:.0f} Tage" if stats.avg_cycle_days is not None else "–"
+        )
     
     def _load_leads(self):
         """Lädt alle Leads"""
@@ -1149,12 +1192,9 @@ class OpportunityDialog(QDialog):
     def _load_customers(self):
         session = self.db.get_session()
         try:
-            query = select(Customer).where(Customer.is_deleted == False).order_by(Customer.company_name)
-            customers = session.execute(query).scalars().all()
             self.customer_combo.addItem("-- Kunde wählen --", None)
-            for c in customers:
-                name = c.company_name or f"{c.first_name} {c.last_name}"
-                self.customer_combo.addItem(f"{c.customer_number} - {name}", str(c.id))
+            for customer_id, number, name in registry.execute(session, "customers.lookup"):
+                self.customer_combo.addItem(f"{number} - {name}", str(customer_id))
         finally:
             session.close()
     
@@ -8,9 +8,9 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont, QAction, QColor
-from sqlalchemy import select, or_, func
 
 from shared.models import Customer, CustomerType, CustomerStatus
+from app.services.query_registry import registry
 from app.ui.styles import COLORS, get_button_style, get_table_style
 
 
@@ -328,36 +328,14 @@ class CustomersWidget(QWidget):
             # Disable updates during data load for better performance
             self.table.setUpdatesEnabled(False)
             
-            # Build base query with only needed columns
-            base_query = select(Customer).where(Customer.is_deleted == False)
-            
-            # Apply tenant filter
-            if self.user and self.user.tenant_id:
-                base_query = base_query.where(Customer.tenant_id == self.user.tenant_id)
-            
-            # Apply search filter
-            search = self.search_input.text().strip()
-            if search:
-                search_term = f"%{search}%"
-                base_query = base_query.where(
-                    or_(
-                        Customer.customer_number.ilike(search_term),
-                        Customer.company_name.ilike(search_term),
-                        Customer.first_name.ilike(search_term),
-                        Customer.last_name.ilike(search_term),
-                        Customer.email.ilike(search_term),
-                        Customer.city.ilike(search_term)
-                    )
-                )
-            
-            # Apply type filter
-            type_filter = self.type_filter.currentData()
-            if type_filter:
-                base_query = base_query.where(Customer.customer_type == CustomerType(type_filter))
+            filters = {
+                "tenant_id": self.user.tenant_id if self.user else None,
+                "search": self.search_input.text().strip() or None,
+                "customer_type": self.type_filter.currentData(),
+            }
             
             # Get total count
-            count_query = select(func.count()).select_from(base_query.subquery())
-            self.total_count = session.execute(count_query).scalar() or 0
+            self.total_count = registry.execute(session, "customers.count", **filters).scalar() or 0
             self.total_pages = max(1, (self.total_count + self.PAGE_SIZE - 1) // self.PAGE_SIZE)
             
             # Ensure current page is valid
@@ -365,10 +343,12 @@ class CustomersWidget(QWidget):
                 self.current_page = max(0, self.total_pages - 1)
             
             # Apply pagination and ordering
-            query = base_query.order_by(Customer.created_at.desc())
-            query = query.offset(self.current_page * self.PAGE_SIZE).limit(self.PAGE_SIZE)
-            
-            customers = session.execute(query).scalars().all()
+            customers = registry.execute(
+                session, "customers.list",
+                offset=self.current_page * self.PAGE_SIZE,
+                limit=self.PAGE_SIZE,
+                **filters
+            ).all()
             
             # Update table efficiently
             self.table.setRowCount(len(customers))
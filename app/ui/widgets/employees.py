@@ -8,9 +8,9 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction, QColor
-from sqlalchemy import select, or_
 
-from shared.models import Employee, EmployeeStatus, EmploymentType
+from shared.models import EmployeeStatus, EmploymentType
+from app.services.query_registry import registry
 from app.ui.dialogs.employee_dialog import EmployeeDialog
 from app.ui.styles import COLORS
 
@@ -223,26 +223,12 @@ class EmployeesWidget(QWidget):
             # Disable updates during data load for better performance
             self.table.setUpdatesEnabled(False)
             
-            query = select(Employee).where(Employee.is_deleted == False)
-            
-            search = self.search_input.text().strip()
-            if search:
-                search_term = f"%{search}%"
-                query = query.where(
-                    or_(
-                        Employee.employee_number.ilike(search_term),
-                        Employee.first_name.ilike(search_term),
-                        Employee.last_name.ilike(search_term),
-                        Employee.email.ilike(search_term)
-                    )
-                )
-            
-            dept = self.dept_filter.currentData()
-            if dept:
-                query = query.where(Employee.department == dept)
-            
-            query = query.order_by(Employee.last_name, Employee.first_name)
-            employees = session.execute(query).scalars().all()
+            # Only the displayed columns - EmployeeDialog loads the full entity
+            employees = registry.execute(
+                session, "employees.list",
+                search=self.search_input.text().strip() or None,
+                department=self.dept_filter.currentData()
+            ).all()
             
             self.table.setRowCount(len(employees))
             
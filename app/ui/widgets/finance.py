@@ -8,12 +8,121 @@ from PyQt6.QtWidgets import (
     QGroupBox, QSpinBox, QDoubleSpinBox, QCheckBox, QSplitter,
     QTreeWidget, QTreeWidgetItem, QFrame, QProgressBar, QScrollArea
 )
-from PyQt6.QtCore import Qt, QDate, pyqtSignal
+from PyQt6.QtCore import Qt, QDate, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QColor
 from datetime import datetime, date
 from decimal import Decimal
 
 
+DUNNING_LEVEL_LABELS = {
+    "reminder": "Erinnerung",
+    "first": "1. Mahnung",
+    "second": "2. Mahnung",
+    "third": "3. Mahnung",
+    "final": "Letzte Mahnung",
+    "collection": "Inkasso",
+    "legal": "Gericht",
+}
+
+
+def _format_euro(value) -> str:
+    return f"{value or 0:,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+class DunningRunWorker(QThread):
+    """Hintergrund-Thread für den Mahnlauf"""
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id, user_id, **settings):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+        self.settings = settings
+    
+    def run(self):
+        try:
+            from app.services.dunning_service import get_dunning_service
+            with self.db_service.session_scope() as session:
+                summary = get_dunning_service().run(
+                    session, tenant_id=self.tenant_id, user_id=self.user_id, **self.settings
+                )
+            self.completed.emit(True, summary)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
+class SepaExportWorker(QThread):
+    """Hintergrund-Thread für den SEPA-Export"""
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id, user_id):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+    
+    def run(self):
+        try:
+            from app.services.sepa_export_service import get_sepa_export_service
+            with self.db_service.session_scope() as session:
+                summary = get_sepa_export_service().export_open(
+                    session, tenant_id=self.tenant_id, user_id=self.user_id
+                )
+            self.completed.emit(True, summary)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
+class CashFlowLoadWorker(QThread):
+    """Hintergrund-Thread zum Laden der Eingaben der Liquiditätsprognose"""
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+    
+    def run(self):
+        try:
+            from app.services.cash_flow_service import get_cash_flow_service
+            with self.db_service.session_scope() as session:
+                inputs = get_cash_flow_service().load_inputs(session, self.tenant_id)
+            self.completed.emit(True, inputs)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
+class LoanScheduleWorker(QThread):
+    """Hintergrund-Thread zum Erzeugen der Tilgungspläne"""
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+    
+    def run(self):
+        try:
+            from app.services.loan_schedule_service import get_loan_schedule_service
+            with self.db_service.session_scope() as session:
+                summary = get_loan_schedule_service().generate(session, self.tenant_id)
+            self.completed.emit(True, summary)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
+# Zeitraum-Auswahl der Liquiditätsprognose: (Bezeichnung, Intervall, Perioden)
+CASHFLOW_PERIODS = [
+    ("Nächste 52 Wochen", "weekly", 52),
+    ("Nächste 13 Wochen", "weekly", 13),
+    ("Nächste 4 Wochen", "weekly", 4),
+    ("Nächste 30 Tage", "daily", 30),
+    ("Nächste 12 Monate", "monthly", 12),
+    ("Nächstes Quartal", "monthly", 3),
+]
+
+
 class FinanceWidget(QWidget):
     """Hauptwidget für die Finanzverwaltung"""
     
@@ -21,6 +130,11 @@ class FinanceWidget(QWidget):
         super().__init__()
         self.db_service = db_service
         self.user = user
+        self._sepa_worker = None
+        self._cashflow_worker = None
+        self._cashflow_inputs = None
+        self._cashflow_result = None
+        self._loan_schedule_worker = None
         self.setup_ui()
     
     def setup_ui(self):
@@ -518,9 +632,11 @@ class FinanceWidget(QWidget):
         new_btn.clicked.connect(self.new_payment)
         toolbar.addWidget(new_btn)
         
-        sepa_btn = QPushButton("📤 SEPA-Export")
-        sepa_btn.setStyleSheet(self._button_style().replace("#3b82f6", "#10b981"))
-        toolbar.addWidget(sepa_btn)
+        self.sepa_btn = QPushButton("📤 SEPA-Export")
+        self.sepa_btn.setStyleSheet(self._button_style().replace("#3b82f6", "#10b981"))
+        self.sepa_btn.setToolTip("XML-Dateien für alle offenen SEPA-Sammler erzeugen")
+        self.sepa_btn.clicked.connect(self.export_sepa)
+        toolbar.addWidget(self.sepa_btn)
         
         layout.addLayout(toolbar)
         
@@ -781,15 +897,29 @@ class FinanceWidget(QWidget):
         header_layout = QHBoxLayout()
         
         header_layout.addWidget(QLabel("Zeitraum:"))
-        period_combo = QComboBox()
-        period_combo.addItems(["Nächste 4 Wochen", "Nächste 3 Monate", "Nächstes Quartal"])
-        period_combo.setStyleSheet(self._input_style())
-        header_layout.addWidget(period_combo)
+        self.cashflow_period = QComboBox()
+        for label, interval, periods in CASHFLOW_PERIODS:
+            self.cashflow_period.addItem(label, (interval, periods))
+        self.cashflow_period.setStyleSheet(self._input_style())
+        self.cashflow_period.currentIndexChanged.connect(self._update_cashflow)
+        header_layout.addWidget(self.cashflow_period)
+        
+        self.cashflow_delay = QCheckBox("Zahlungsverhalten der Kunden berücksichtigen")
+        self.cashflow_delay.setChecked(True)
+        self.cashflow_delay.toggled.connect(self._update_cashflow)
+        header_layout.addWidget(self.cashflow_delay)
         
         header_layout.addStretch()
         
+        refresh_btn = QPushButton("🔄 Aktualisieren")
+        refresh_btn.setStyleSheet(self._button_style().replace("#3b82f6", "#64748b"))
+        refresh_btn.clicked.connect(self._load_cashflow)
+        header_layout.addWidget(refresh_btn)
+        
         new_forecast_btn = QPushButton("+ Neue Planung")
         new_forecast_btn.setStyleSheet(self._button_style())
+        new_forecast_btn.setToolTip("Aktuelle Prognose als Liquiditätsplanung speichern")
+        new_forecast_btn.clicked.connect(self.save_cashflow_forecast)
         header_layout.addWidget(new_forecast_btn)
         
         layout.addLayout(header_layout)
@@ -799,34 +929,22 @@ class FinanceWidget(QWidget):
         cashflow_group.setStyleSheet(self._group_style())
         cashflow_layout = QVBoxLayout(cashflow_group)
         
+        self.cashflow_summary = QLabel("Prognose wird geladen...")
+        self.cashflow_summary.setStyleSheet("color: #64748b; padding: 4px;")
+        cashflow_layout.addWidget(self.cashflow_summary)
+        
         self.cashflow_table = QTableWidget()
         self.cashflow_table.setColumnCount(6)
         self.cashflow_table.setHorizontalHeaderLabels([
-            "Woche", "Anfangsbestand", "Einnahmen", "Ausgaben", "Netto", "Endbestand"
+            "Periode", "Anfangsbestand", "Einnahmen", "Ausgaben", "Netto", "Endbestand"
         ])
         self.cashflow_table.setStyleSheet(self._table_style())
         
-        cashflow = [
-            ("KW 51", "€ 165.430", "€ 25.000", "€ 52.000", "-€ 27.000", "€ 138.430"),
-            ("KW 52", "€ 138.430", "€ 35.000", "€ 15.000", "+€ 20.000", "€ 158.430"),
-            ("KW 01", "€ 158.430", "€ 45.000", "€ 48.000", "-€ 3.000", "€ 155.430"),
-            ("KW 02", "€ 155.430", "€ 30.000", "€ 25.000", "+€ 5.000", "€ 160.430"),
-        ]
-        
-        self.cashflow_table.setRowCount(len(cashflow))
-        for row, data in enumerate(cashflow):
-            for col, value in enumerate(data):
-                item = QTableWidgetItem(value)
-                if col == 4:
-                    if value.startswith("-"):
-                        item.setForeground(QColor("#ef4444"))
-                    else:
-                        item.setForeground(QColor("#10b981"))
-                self.cashflow_table.setItem(row, col, item)
-        
         cashflow_layout.addWidget(self.cashflow_table)
         layout.addWidget(cashflow_group)
         
+        self._load_cashflow()
+        
         return widget
     
     def _create_loans_tab(self):
@@ -841,32 +959,46 @@ class FinanceWidget(QWidget):
         new_loan_btn.setStyleSheet(self._button_style())
         toolbar.addWidget(new_loan_btn)
         
+        self.loan_schedule_btn = QPushButton("🧮 Tilgungspläne erzeugen")
+        self.loan_schedule_btn.setStyleSheet(self._button_style())
+        self.loan_schedule_btn.clicked.connect(self.generate_loan_schedules)
+        toolbar.addWidget(self.loan_schedule_btn)
+        
         toolbar.addStretch()
+        
+        self.debt_service_label = QLabel("")
+        self.debt_service_label.setStyleSheet("color: #64748b;")
+        toolbar.addWidget(self.debt_service_label)
         layout.addLayout(toolbar)
         
+        splitter = QSplitter(Qt.Orientation.Vertical)
+        
         # Kredite
         self.loans_table = QTableWidget()
-        self.loans_table.setColumnCount(9)
+        self.loans_table.setColumnCount(10)
         self.loans_table.setHorizontalHeaderLabels([
             "Kredit-Nr.", "Bezeichnung", "Kreditgeber", "Kreditsumme",
-            "Restschuld", "Zinssatz", "Rate/Monat", "Nächste Rate", "Status"
+            "Restschuld", "Zinssatz", "Rate", "Nächste Rate", "Kapitaldienst 12 M.", "Status"
         ])
         self.loans_table.setStyleSheet(self._table_style())
+        self.loans_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.loans_table.itemSelectionChanged.connect(self._load_loan_schedule)
+        splitter.addWidget(self.loans_table)
+        
+        # Tilgungsplan des gewählten Kredits
+        self.loan_schedule_table = QTableWidget()
+        self.loan_schedule_table.setColumnCount(7)
+        self.loan_schedule_table.setHorizontalHeaderLabels([
+            "Nr.", "Fällig", "Rate", "Zinsen", "Tilgung", "Restschuld", "Status"
+        ])
+        self.loan_schedule_table.setStyleSheet(self._table_style())
+        splitter.addWidget(self.loan_schedule_table)
         
-        loans = [
-            ("K-2020-001", "Betriebsmittelkredit", "Sparkasse", "€ 100.000", "€ 65.000", "3,5%", "€ 1.850", "01.01.2026", "Aktiv"),
-            ("K-2022-001", "Maschinenfinanzierung", "VR Bank", "€ 50.000", "€ 35.000", "4,2%", "€ 980", "01.01.2026", "Aktiv"),
-        ]
+        layout.addWidget(splitter)
         
-        self.loans_table.setRowCount(len(loans))
-        for row, data in enumerate(loans):
-            for col, value in enumerate(data):
-                item = QTableWidgetItem(value)
-                if col == 8:
-                    item.setForeground(QColor("#10b981"))
-                self.loans_table.setItem(row, col, item)
-        
-        layout.addWidget(self.loans_table)
+        # Leere Tabelle - wird durch _load_loans befüllt
+        self._loan_ids = []
+        self._load_loans()
         
         return widget
     
@@ -975,11 +1107,153 @@ class FinanceWidget(QWidget):
     
     def _load_dunnings(self):
         """Lädt Mahnungen aus der Datenbank"""
+        session = None
         try:
-            # Leere Tabelle für echte Daten
-            self.dunning_table.setRowCount(0)
+            from sqlalchemy import select
+            from shared.models import Customer, DunningNotice
+            session = self.db_service.get_session()
+            rows = session.execute(
+                select(
+                    DunningNotice.notice_number, DunningNotice.dunning_level, DunningNotice.outstanding_amount,
+                    DunningNotice.dunning_fee, DunningNotice.interest_amount, DunningNotice.total_amount,
+                    DunningNotice.status, Customer.company_name, Customer.first_name, Customer.last_name,
+                )
+                .join(Customer, Customer.id == DunningNotice.customer_id)
+                .where(
+                    DunningNotice.tenant_id == self.user.tenant_id,
+                    DunningNotice.is_deleted == False,
+                    DunningNotice.status.in_(["created", "sent", "escalated"]),
+                )
+                .order_by(DunningNotice.notice_date.desc(), DunningNotice.notice_number.desc())
+                .limit(500)
+            ).all()
+            self.dunning_table.setRowCount(len(rows))
+            for i, row in enumerate(rows):
+                customer = row.company_name or f"{row.first_name or ''} {row.last_name or ''}".strip()
+                values = [
+                    row.notice_number, customer,
+                    DUNNING_LEVEL_LABELS.get(row.dunning_level.value, row.dunning_level.value),
+                    _format_euro(row.outstanding_amount), _format_euro(row.dunning_fee),
+                    _format_euro(row.interest_amount), _format_euro(row.total_amount), row.status,
+                ]
+                for col, value in enumerate(values):
+                    self.dunning_table.setItem(i, col, QTableWidgetItem(value))
         except Exception as e:
+            self.dunning_table.setRowCount(0)
             print(f"Fehler beim Laden der Mahnungen: {e}")
+        finally:
+            if session:
+                session.close()
+    
+    def _load_loans(self):
+        """Lädt die Kredite mit Kapitaldienst der nächsten 12 Monate"""
+        session = None
+        try:
+            from sqlalchemy import select
+            from shared.models import Loan
+            from app.services.loan_schedule_service import get_loan_schedule_service
+            from app.services.recurring_invoice_service import add_months
+            session = self.db_service.get_session()
+            loans = session.execute(
+                select(
+                    Loan.id, Loan.loan_number, Loan.name, Loan.lender_name, Loan.principal_amount,
+                    Loan.current_balance, Loan.interest_rate, Loan.monthly_payment, Loan.next_payment_date,
+                    Loan.status,
+                )
+                .where(Loan.tenant_id == self.user.tenant_id, Loan.is_deleted == False)
+                .order_by(Loan.loan_number)
+            ).all()
+            today = date.today()
+            service = get_loan_schedule_service()
+            by_loan = service.debt_service(session, self.user.tenant_id, today, add_months(today, 12), by_loan=True)
+            total = service.debt_service(session, self.user.tenant_id, today, add_months(today, 12))
+            
+            self._loan_ids = [loan.id for loan in loans]
+            self.loans_table.setRowCount(len(loans))
+            for i, loan in enumerate(loans):
+                upcoming = by_loan.get(loan.id)
+                values = [
+                    loan.loan_number, loan.name, loan.lender_name, _format_euro(loan.principal_amount),
+                    _format_euro(loan.current_balance), f"{loan.interest_rate or 0:.2f} %".replace(".", ","),
+                    _format_euro(loan.monthly_payment),
+                    loan.next_payment_date.strftime("%d.%m.%Y") if loan.next_payment_date else "-",
+                    _format_euro(upcoming.payment) if upcoming else "-", loan.status or "",
+                ]
+                for col, value in enumerate(values):
+                    item = QTableWidgetItem(value)
+                    if col == 9 and loan.status == "active":
+                        item.setForeground(QColor("#10b981"))
+                    self.loans_table.setItem(i, col, item)
+            self.debt_service_label.setText(
+                f"Kapitaldienst 12 Monate: {_format_euro(total.payment)} "
+                f"(Zinsen {_format_euro(total.interest)}, Tilgung {_format_euro(total.principal)})"
+            )
+        except Exception as e:
+            self.loans_table.setRowCount(0)
+            print(f"Fehler beim Laden der Kredite: {e}")
+        finally:
+            if session:
+                session.close()
+    
+    def _load_loan_schedule(self):
+        """Zeigt den Tilgungsplan des gewählten Kredits"""
+        row = self.loans_table.currentRow()
+        if row < 0 or row >= len(self._loan_ids):
+            self.loan_schedule_table.setRowCount(0)
+            return
+        session = None
+        try:
+            from sqlalchemy import select
+            from shared.models import LoanPayment
+            session = self.db_service.get_session()
+            payments = session.execute(
+                select(
+                    LoanPayment.payment_number, LoanPayment.due_date, LoanPayment.payment_amount,
+                    LoanPayment.interest_amount, LoanPayment.principal_amount, LoanPayment.balance_after,
+                    LoanPayment.status,
+                )
+                .where(LoanPayment.loan_id == self._loan_ids[row])
+                .order_by(LoanPayment.payment_number)
+            ).all()
+            self.loan_schedule_table.setRowCount(len(payments))
+            for i, payment in enumerate(payments):
+                values = [
+                    str(payment.payment_number), payment.due_date.strftime("%d.%m.%Y"),
+                    _format_euro(payment.payment_amount), _format_euro(payment.interest_amount),
+                    _format_euro(payment.principal_amount), _format_euro(payment.balance_after),
+                    payment.status or "",
+                ]
+                for col, value in enumerate(values):
+                    self.loan_schedule_table.setItem(i, col, QTableWidgetItem(value))
+        except Exception as e:
+            self.loan_schedule_table.setRowCount(0)
+            print(f"Fehler beim Laden des Tilgungsplans: {e}")
+        finally:
+            if session:
+                session.close()
+    
+    def generate_loan_schedules(self):
+        """Tilgungspläne für Kredite und Mitarbeiterdarlehen ohne Plan im Hintergrund erzeugen"""
+        if self._loan_schedule_worker and self._loan_schedule_worker.isRunning():
+            return
+        self.loan_schedule_btn.setEnabled(False)
+        self.loan_schedule_btn.setText("⏳ Tilgungspläne werden erzeugt...")
+        self._loan_schedule_worker = LoanScheduleWorker(self.db_service, self.user.tenant_id)
+        self._loan_schedule_worker.completed.connect(self._on_loan_schedules_generated)
+        self._loan_schedule_worker.start()
+    
+    def _on_loan_schedules_generated(self, success, result):
+        self.loan_schedule_btn.setEnabled(True)
+        self.loan_schedule_btn.setText("🧮 Tilgungspläne erzeugen")
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"Tilgungspläne konnten nicht erzeugt werden:\n{result}")
+            return
+        QMessageBox.information(
+            self, "Tilgungspläne",
+            f"{result['installments']} Raten für {result['loans']} Kredite und "
+            f"{result['employee_loans']} Mitarbeiterdarlehen angelegt."
+        )
+        self._load_loans()
     
     def new_payment(self):
         """Neue Zahlung erfassen"""
@@ -993,7 +1267,107 @@ class FinanceWidget(QWidget):
     def start_dunning_run(self):
         """Mahnlauf starten"""
         dialog = DunningRunDialog(self.db_service, self.user, self)
-        dialog.exec()
+        if dialog.exec():
+            self._load_dunnings()
+    
+    def export_sepa(self):
+        """SEPA-Dateien aller offenen Sammler im Hintergrund erzeugen"""
+        if self._sepa_worker and self._sepa_worker.isRunning():
+            return
+        self.sepa_btn.setEnabled(False)
+        self.sepa_btn.setText("⏳ SEPA-Export läuft...")
+        self._sepa_worker = SepaExportWorker(self.db_service, self.user.tenant_id, getattr(self.user, 'id', None))
+        self._sepa_worker.completed.connect(self._on_sepa_exported)
+        self._sepa_worker.start()
+    
+    def _on_sepa_exported(self, success, result):
+        self.sepa_btn.setEnabled(True)
+        self.sepa_btn.setText("📤 SEPA-Export")
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"SEPA-Export fehlgeschlagen:\n{result}")
+            return
+        if not result['batches'] and not result['errors']:
+            QMessageBox.information(self, "SEPA-Export", "Es sind keine offenen SEPA-Sammler vorhanden.")
+            return
+        message = (
+            f"{len(result['batches'])} Dateien mit {result['transactions']} Zahlungen "
+            f"über {_format_euro(result['amount'])} erzeugt."
+        )
+        if result['rejected']:
+            message += f"\n{result['rejected']} fehlerhafte Zahlungen wurden aus den Sammlern entfernt."
+        if result['errors']:
+            message += "\n\nNicht exportiert:\n" + "\n".join(result['errors'])
+        QMessageBox.information(self, "SEPA-Export", message)
+    
+    def _load_cashflow(self):
+        """Eingaben der Prognose im Hintergrund laden"""
+        if self._cashflow_worker and self._cashflow_worker.isRunning():
+            return
+        self.cashflow_summary.setText("Prognose wird geladen...")
+        self._cashflow_worker = CashFlowLoadWorker(self.db_service, self.user.tenant_id)
+        self._cashflow_worker.completed.connect(self._on_cashflow_loaded)
+        self._cashflow_worker.start()
+    
+    def _on_cashflow_loaded(self, success, result):
+        if not success:
+            self.cashflow_summary.setText(f"Prognose konnte nicht geladen werden: {result}")
+            return
+        self._cashflow_inputs = result
+        self._update_cashflow()
+    
+    def _update_cashflow(self):
+        """Prognose aus den geladenen Eingaben neu berechnen (ohne Datenbankzugriff)"""
+        if self._cashflow_inputs is None:
+            return
+        from app.services.cash_flow_service import get_cash_flow_service
+        interval, periods = self.cashflow_period.currentData()
+        result = get_cash_flow_service().compute(
+            self._cashflow_inputs, interval, periods, delay_weight=1.0 if self.cashflow_delay.isChecked() else 0.0
+        )
+        self._cashflow_result = result
+        
+        self.cashflow_table.setRowCount(len(result.labels))
+        for row, label in enumerate(result.labels):
+            net = result.net[row] / 100
+            values = [
+                label, _format_euro(result.opening[row] / 100), _format_euro(result.income[row] / 100),
+                _format_euro(result.expenses[row] / 100), ("+" if net >= 0 else "") + _format_euro(net),
+                _format_euro(result.closing[row] / 100),
+            ]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if col == 4:
+                    item.setForeground(QColor("#ef4444" if net < 0 else "#10b981"))
+                if col == 5 and result.closing[row] < 0:
+                    item.setForeground(QColor("#ef4444"))
+                self.cashflow_table.setItem(row, col, item)
+        
+        low_date, low = result.minimum()
+        summary = f"Anfangsbestand {_format_euro(result.opening_balance / 100)}"
+        if low_date:
+            summary += f" · niedrigster Endbestand {_format_euro(low / 100)} ({low_date:%d.%m.%Y})"
+        self.cashflow_summary.setText(summary)
+    
+    def save_cashflow_forecast(self):
+        """Aktuelle Prognose als Liquiditätsplanung speichern"""
+        if self._cashflow_result is None:
+            QMessageBox.information(self, "Liquiditätsplanung", "Die Prognose wird noch geladen.")
+            return
+        from app.services.cash_flow_service import get_cash_flow_service
+        session = self.db_service.get_session()
+        if not session:
+            return
+        try:
+            forecast = get_cash_flow_service().save(
+                session, self.user.tenant_id, self._cashflow_result,
+                name=f"{self.cashflow_period.currentText()} ab {self._cashflow_result.period_starts[0]:%d.%m.%Y}",
+                user_id=getattr(self.user, 'id', None),
+            )
+            QMessageBox.information(self, "Liquiditätsplanung", f"Planung \"{forecast.name}\" gespeichert.")
+        except Exception as e:
+            QMessageBox.warning(self, "Fehler", f"Planung konnte nicht gespeichert werden: {e}")
+        finally:
+            session.close()
     
     def show_open_items(self):
         """Offene Posten anzeigen"""
@@ -1125,6 +1499,7 @@ class DunningRunDialog(QDialog):
         self.user = user
         self.setWindowTitle("Mahnlauf starten")
         self.setMinimumSize(600, 500)
+        self._worker = None
         self.setup_ui()
     
     def setup_ui(self):
@@ -1182,9 +1557,10 @@ class DunningRunDialog(QDialog):
         buttons_layout.addWidget(cancel_btn)
         
         preview_btn = QPushButton("👁️ Vorschau aktualisieren")
+        preview_btn.clicked.connect(self.load_preview)
         buttons_layout.addWidget(preview_btn)
         
-        run_btn = QPushButton("▶️ Mahnlauf starten")
+        self.run_btn = run_btn = QPushButton("▶️ Mahnlauf starten")
         run_btn.setStyleSheet("""
             QPushButton {
                 background: #f59e0b;
@@ -1203,9 +1579,68 @@ class DunningRunDialog(QDialog):
         
         layout.addLayout(buttons_layout)
     
+    def _settings(self) -> dict:
+        return {
+            "reference_date": self.reference_date.date().toPyDate(),
+            "grace_days": self.grace_days.value(),
+            "min_amount": Decimal(str(round(self.min_amount.value(), 2))),
+        }
+    
+    def load_preview(self):
+        """Lädt die Posten, die der Lauf mahnen würde"""
+        from app.services.dunning_service import get_dunning_service
+        session = self.db_service.get_session()
+        if not session:
+            return
+        try:
+            rows = get_dunning_service().preview(session, tenant_id=self.user.tenant_id, **self._settings())
+        except Exception as e:
+            QMessageBox.warning(self, "Fehler", f"Offene Posten konnten nicht geladen werden: {e}")
+            return
+        finally:
+            session.close()
+        
+        self.preview_table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            customer = row.company_name or f"{row.first_name or ''} {row.last_name or ''}".strip()
+            values = [
+                "☑", customer, row.invoice_number, _format_euro(row.outstanding),
+                f"{row.days_overdue} Tage", f"{row.notice_level}. Mahnung",
+            ]
+            for col, value in enumerate(values):
+                self.preview_table.setItem(i, col, QTableWidgetItem(value))
+        customers = len({row.customer_id for row in rows})
+        total = sum((row.outstanding for row in rows), Decimal(0))
+        self.info_label.setText(
+            f"📋 {len(rows)} Rechnungen bei {customers} Kunden, offen insgesamt {_format_euro(total)}"
+        )
+    
     def start_run(self):
-        """Startet den Mahnlauf"""
-        QMessageBox.information(self, "Mahnlauf", "Mahnlauf wurde erfolgreich durchgeführt!\n\n3 Mahnungen wurden erstellt.")
+        """Startet den Mahnlauf im Hintergrund"""
+        if self._worker and self._worker.isRunning():
+            return
+        self.run_btn.setEnabled(False)
+        self.run_btn.setText("⏳ Mahnlauf läuft...")
+        self._worker = DunningRunWorker(
+            self.db_service, self.user.tenant_id, getattr(self.user, 'id', None), **self._settings()
+        )
+        self._worker.completed.connect(self._on_run_completed)
+        self._worker.start()
+    
+    def _on_run_completed(self, success, result):
+        self.run_btn.setEnabled(True)
+        self.run_btn.setText("▶️ Mahnlauf starten")
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"Mahnlauf fehlgeschlagen:\n{result}")
+            return
+        message = (
+            f"Mahnlauf {result['run_number']} durchgeführt.\n\n"
+            f"{result['notices']} Mahnungen über {result['invoices']} Rechnungen, "
+            f"offen {_format_euro(result['amount'])}, Gebühren {_format_euro(result['fees'])}."
+        )
+        if result['replaced']:
+            message += "\nDer vorige Lauf zum selben Stichtag wurde ersetzt."
+        QMessageBox.information(self, "Mahnlauf", message)
         self.accept()
 
 
@@ -11,19 +11,31 @@ from PyQt6.QtWidgets import (
     QHeaderView, QSplitter, QTreeWidget, QTreeWidgetItem, QCalendarWidget
 )
 from PyQt6.QtCore import Qt, QDate, QTime, QTimer
-from PyQt6.QtGui import QFont, QColor
-from datetime import datetime, date
+from PyQt6.QtGui import QFont, QColor, QTextCharFormat
+from datetime import datetime, date, timedelta
 from decimal import Decimal
 import uuid
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, or_
+from sqlalchemy.orm import selectinload
+from sqlalchemy.dialects.postgresql import Range
 from app.ui.styles import COLORS, get_button_style, CARD_STYLE
+from app.services.reservation_service import get_reservation_service, ReservationConflict, CRANE_TYPES
+from app.services.query_registry import registry
 from shared.models import (
-    Vehicle, Equipment, VehicleType, VehicleStatus, EquipmentType,
+    Vehicle, Equipment, VehicleType, VehicleStatus, EquipmentType, Employee,
     FuelLog, MileageLog, VehicleMaintenance, EquipmentMaintenance, EquipmentReservation
 )
 
 
+RESERVATION_STATUS_NAMES = {
+    "pending": "Ausstehend",
+    "confirmed": "Bestätigt",
+    "cancelled": "Storniert",
+    "completed": "Abgeschlossen",
+}
+
+
 class FleetWidget(QWidget):
     """Fahrzeug- und Geräteverwaltung"""
     
@@ -484,6 +496,7 @@ class FleetWidget(QWidget):
         left_layout.addWidget(QLabel("📅 Kalender"))
         
         calendar = QCalendarWidget()
+        self.reservations_calendar = calendar
         calendar.setStyleSheet(f"""
             QCalendarWidget {{
                 background: white;
@@ -499,8 +512,19 @@ class FleetWidget(QWidget):
                 border-radius: 4px;
             }}
         """)
+        calendar.currentPageChanged.connect(lambda year, month: self._shade_reservation_calendar())
         left_layout.addWidget(calendar)
         
+        # Legende zur Belegung
+        legend = QHBoxLayout()
+        for text, color in [("Teilweise belegt", "#fef3c7"), ("Überwiegend belegt", "#fed7aa"),
+                            ("Ausgebucht", "#fecaca")]:
+            swatch = QLabel(f"■ {text}")
+            swatch.setStyleSheet(f"color: {color}; font-size: 11px;")
+            legend.addWidget(swatch)
+        legend.addStretch()
+        left_layout.addLayout(legend)
+        
         # New reservation button
         new_res_btn = QPushButton("➕ Neue Reservierung")
         new_res_btn.setStyleSheet(get_button_style('primary'))
@@ -518,13 +542,15 @@ class FleetWidget(QWidget):
         
         # Filter
         filter_layout = QHBoxLayout()
-        filter_combo = QComboBox()
-        filter_combo.addItems(["Alle", "Heute", "Diese Woche", "Diesen Monat"])
-        filter_layout.addWidget(filter_combo)
-        
-        resource_combo = QComboBox()
-        resource_combo.addItems(["Alle Ressourcen", "Fahrzeuge", "Krane", "Geräte"])
-        filter_layout.addWidget(resource_combo)
+        self.reservation_filter = QComboBox()
+        self.reservation_filter.addItems(["Alle", "Heute", "Diese Woche", "Diesen Monat"])
+        self.reservation_filter.currentIndexChanged.connect(self._load_reservations)
+        filter_layout.addWidget(self.reservation_filter)
+        
+        self.reservation_resource_filter = QComboBox()
+        self.reservation_resource_filter.addItems(["Alle Ressourcen", "Fahrzeuge", "Krane", "Geräte"])
+        self.reservation_resource_filter.currentIndexChanged.connect(self._refresh_reservations)
+        filter_layout.addWidget(self.reservation_resource_filter)
         filter_layout.addStretch()
         right_layout.addLayout(filter_layout)
         
@@ -830,16 +856,177 @@ class FleetWidget(QWidget):
         """Refresh all data"""
         self._load_vehicles()
         self._load_equipment()
+        self._refresh_reservations()
+    
+    def _refresh_reservations(self):
+        self._load_reservations()
+        self._shade_reservation_calendar()
+    
+    def _tenant_id(self):
+        if self.user and hasattr(self.user, 'tenant_id'):
+            return self.user.tenant_id
+        return None
+    
+    def _reservation_resource_ids(self, session):
+        """Fahrzeug- und Geräte-IDs gemäß Ressourcenfilter (None = keine dieser Art)"""
+        resource = self.reservation_resource_filter.currentIndex()
+        vehicle_ids, equipment_ids = [], []
+        tenant_id = self._tenant_id()
+        if resource in (0, 1):
+            query = select(Vehicle.id).where(Vehicle.is_deleted == False)
+            if tenant_id:
+                query = query.where(Vehicle.tenant_id == tenant_id)
+            vehicle_ids = session.execute(query).scalars().all()
+        if resource in (0, 2, 3):
+            query = select(Equipment.id).where(Equipment.is_deleted == False)
+            if tenant_id:
+                query = query.where(Equipment.tenant_id == tenant_id)
+            if resource == 2:
+                query = query.where(Equipment.equipment_type.in_(CRANE_TYPES))
+            elif resource == 3:
+                query = query.where(or_(Equipment.equipment_type.is_(None),
+                                        Equipment.equipment_type.notin_(CRANE_TYPES)))
+            equipment_ids = session.execute(query).scalars().all()
+        return vehicle_ids, equipment_ids
+    
+    def _shade_reservation_calendar(self):
+        """Belegte Tage des sichtbaren Monats für alle gefilterten Ressourcen einfärben"""
+        calendar = self.reservations_calendar
+        calendar.setDateTextFormat(QDate(), QTextCharFormat())
+        
+        first = date(calendar.yearShown(), calendar.monthShown(), 1)
+        # Sichtbares Raster inkl. Randtage der Nachbarmonate
+        start = first - timedelta(days=7)
+        end = first + timedelta(days=44)
+        
+        session = self.db_service.get_session()
+        if not session:
+            return
+        try:
+            vehicle_ids, equipment_ids = self._reservation_resource_ids(session)
+            total = len(vehicle_ids) + len(equipment_ids)
+            if not total:
+                return
+            service = get_reservation_service()
+            availability = service.availability(
+                session, self._tenant_id(), start, end,
+                vehicle_ids=vehicle_ids, equipment_ids=equipment_ids
+            )
+            for day, (booked, full) in service.busy_days(availability).items():
+                if full >= total:
+                    color = "#fecaca"
+                elif booked * 2 >= total:
+                    color = "#fed7aa"
+                else:
+                    color = "#fef3c7"
+                fmt = QTextCharFormat()
+                fmt.setBackground(QColor(color))
+                fmt.setToolTip(f"{booked} von {total} Ressourcen reserviert")
+                calendar.setDateTextFormat(QDate(day.year, day.month, day.day), fmt)
+        except Exception as e:
+            print(f"Reservierungskalender: {e}")
+        finally:
+            session.close()
+    
+    def _load_reservations(self):
+        """Reservierungsliste gemäß Zeitraum- und Ressourcenfilter"""
+        session = self.db_service.get_session()
+        if not session:
+            return
+        try:
+            query = select(EquipmentReservation).options(
+                selectinload(EquipmentReservation.vehicle),
+                selectinload(EquipmentReservation.equipment),
+                selectinload(EquipmentReservation.project),
+                selectinload(EquipmentReservation.reserved_by),
+                selectinload(EquipmentReservation.reserved_for),
+            )
+            tenant_id = self._tenant_id()
+            if tenant_id:
+                query = query.where(EquipmentReservation.tenant_id == tenant_id)
+            
+            today = date.today()
+            window = {
+                1: (today, today + timedelta(days=1)),
+                2: (today - timedelta(days=today.weekday()), today + timedelta(days=7 - today.weekday())),
+                3: (today.replace(day=1), (today.replace(day=28) + timedelta(days=4)).replace(day=1)),
+            }.get(self.reservation_filter.currentIndex())
+            if window:
+                period = Range(datetime.combine(window[0], datetime.min.time()),
+                               datetime.combine(window[1], datetime.min.time()), bounds="[)")
+                query = query.where(EquipmentReservation.period.op("&&")(period))
+            
+            resource = self.reservation_resource_filter.currentIndex()
+            if resource == 1:
+                query = query.where(EquipmentReservation.vehicle_id.isnot(None))
+            elif resource in (2, 3):
+                is_crane = Equipment.equipment_type.in_(CRANE_TYPES)
+                query = query.join(Equipment, EquipmentReservation.equipment_id == Equipment.id).where(
+                    is_crane if resource == 2 else or_(Equipment.equipment_type.is_(None), ~is_crane)
+                )
+            
+            query = query.order_by(EquipmentReservation.start_date.desc()).limit(500)
+            reservations = session.execute(query).scalars().all()
+            
+            def person(employee):
+                return f"{employee.first_name} {employee.last_name}" if employee else ""
+            
+            self.reservations_table.setRowCount(len(reservations))
+            for row, r in enumerate(reservations):
+                if r.vehicle:
+                    resource_name = f"🚗 {r.vehicle.license_plate}"
+                elif r.equipment:
+                    resource_name = f"🔧 {r.equipment.equipment_number} - {r.equipment.name}"
+                else:
+                    resource_name = ""
+                item = QTableWidgetItem(resource_name)
+                item.setData(Qt.ItemDataRole.UserRole, str(r.id))
+                self.reservations_table.setItem(row, 0, item)
+                self.reservations_table.setItem(row, 1, QTableWidgetItem(r.project.name if r.project else (r.purpose or "")))
+                self.reservations_table.setItem(row, 2, QTableWidgetItem(
+                    f"{r.start_date.strftime('%d.%m.%Y')} {r.start_time or ''}".strip()))
+                self.reservations_table.setItem(row, 3, QTableWidgetItem(
+                    f"{r.end_date.strftime('%d.%m.%Y')} {r.end_time or ''}".strip()))
+                self.reservations_table.setItem(row, 4, QTableWidgetItem(person(r.reserved_for or r.reserved_by)))
+                self.reservations_table.setItem(row, 5, QTableWidgetItem(
+                    RESERVATION_STATUS_NAMES.get(r.status, r.status or "")))
+                self.reservations_table.setItem(row, 6, QTableWidgetItem(r.notes or ""))
+                self.reservations_table.setItem(row, 7, QTableWidgetItem(person(r.reserved_by)))
+                
+                if r.status in ("pending", "confirmed"):
+                    cancel_btn = QPushButton("Stornieren")
+                    cancel_btn.setStyleSheet(get_button_style('secondary'))
+                    cancel_btn.clicked.connect(lambda checked, rid=r.id: self._cancel_reservation(rid))
+                    self.reservations_table.setCellWidget(row, 8, cancel_btn)
+                else:
+                    self.reservations_table.removeCellWidget(row, 8)
+        except Exception as e:
+            QMessageBox.warning(self, "Fehler", f"Fehler beim Laden der Reservierungen: {e}")
+        finally:
+            session.close()
+    
+    def _cancel_reservation(self, reservation_id):
+        reply = QMessageBox.question(self, "Stornieren", "Reservierung wirklich stornieren?")
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        session = self.db_service.get_session()
+        try:
+            reservation = session.get(EquipmentReservation, reservation_id)
+            if reservation:
+                get_reservation_service().set_status(session, reservation, "cancelled")
+                session.commit()
+            self._refresh_reservations()
+        except Exception as e:
+            session.rollback()
+            QMessageBox.warning(self, "Fehler", f"Fehler beim Stornieren: {e}")
+        finally:
+            session.close()
     
     def _load_vehicles(self):
         """Lädt alle Fahrzeuge"""
         session = self.db_service.get_session()
         try:
-            query = select(Vehicle).where(Vehicle.is_deleted == False).order_by(Vehicle.license_plate)
-            if self.user and hasattr(self.user, 'tenant_id') and self.user.tenant_id:
-                query = query.where(Vehicle.tenant_id == self.user.tenant_id)
-            
-            vehicles = session.execute(query).scalars().all()
+            vehicles = registry.execute(session, "vehicles.list", tenant_id=self._tenant_id()).all()
             self.vehicles_table.setRowCount(len(vehicles))
             
             status_names = {
@@ -879,11 +1066,7 @@ class FleetWidget(QWidget):
         """Lädt alle Geräte"""
         session = self.db_service.get_session()
         try:
-            query = select(Equipment).where(Equipment.is_deleted == False).order_by(Equipment.equipment_number)
-            if self.user and hasattr(self.user, 'tenant_id') and self.user.tenant_id:
-                query = query.where(Equipment.tenant_id == self.user.tenant_id)
-            
-            equipment_list = session.execute(query).scalars().all()
+            equipment_list = registry.execute(session, "equipment.list", tenant_id=self._tenant_id()).all()
             self.equipment_table.setRowCount(len(equipment_list))
             
             status_names = {
@@ -1337,8 +1520,7 @@ class FuelLogDialog(QDialog):
     def _load_vehicles(self):
         session = self.db.get_session()
         try:
-            query = select(Vehicle).where(Vehicle.is_deleted == False).order_by(Vehicle.license_plate)
-            vehicles = session.execute(query).scalars().all()
+            vehicles = registry.execute(session, "vehicles.combo").all()
             self.vehicle_combo.addItem("-- Fahrzeug wählen --", None)
             for v in vehicles:
                 self.vehicle_combo.addItem(f"{v.license_plate} - {v.manufacturer or ''} {v.model or ''}", str(v.id))
@@ -1495,8 +1677,7 @@ class TripLogDialog(QDialog):
     def _load_vehicles(self):
         session = self.db.get_session()
         try:
-            query = select(Vehicle).where(Vehicle.is_deleted == False).order_by(Vehicle.license_plate)
-            vehicles = session.execute(query).scalars().all()
+            vehicles = registry.execute(session, "vehicles.combo").all()
             self.trip_vehicle_combo.addItem("-- Fahrzeug wählen --", None)
             for v in vehicles:
                 self.trip_vehicle_combo.addItem(f"{v.license_plate} - {v.manufacturer or ''} {v.model or ''}", str(v.id))
@@ -1656,16 +1837,12 @@ class MaintenanceDialog(QDialog):
     def _load_resources(self):
         session = self.db.get_session()
         try:
-            vehicles = session.execute(
-                select(Vehicle).where(Vehicle.is_deleted == False).order_by(Vehicle.license_plate)
-            ).scalars().all()
+            vehicles = registry.execute(session, "vehicles.combo").all()
             self.maint_vehicle_combo.addItem("-- Fahrzeug wählen --", None)
             for v in vehicles:
                 self.maint_vehicle_combo.addItem(f"{v.license_plate} - {v.manufacturer or ''} {v.model or ''}", str(v.id))
             
-            equipment_list = session.execute(
-                select(Equipment).where(Equipment.is_deleted == False).order_by(Equipment.name)
-            ).scalars().all()
+            equipment_list = registry.execute(session, "equipment.combo").all()
             self.maint_equipment_combo.addItem("-- Gerät wählen --", None)
             for e in equipment_list:
                 self.maint_equipment_combo.addItem(f"{e.equipment_number} - {e.name}", str(e.id))
@@ -1824,16 +2001,12 @@ class ReservationDialog(QDialog):
     def _load_resources(self):
         session = self.db.get_session()
         try:
-            vehicles = session.execute(
-                select(Vehicle).where(Vehicle.is_deleted == False).order_by(Vehicle.license_plate)
-            ).scalars().all()
+            vehicles = registry.execute(session, "vehicles.combo").all()
             self.res_vehicle_combo.addItem("-- Fahrzeug wählen --", None)
             for v in vehicles:
                 self.res_vehicle_combo.addItem(f"{v.license_plate} - {v.manufacturer or ''} {v.model or ''}", str(v.id))
             
-            equipment_list = session.execute(
-                select(Equipment).where(Equipment.is_deleted == False).order_by(Equipment.name)
-            ).scalars().all()
+            equipment_list = registry.execute(session, "equipment.combo").all()
             self.res_equipment_combo.addItem("-- Gerät wählen --", None)
             for e in equipment_list:
                 self.res_equipment_combo.addItem(f"{e.equipment_number} - {e.name}", str(e.id))
@@ -1865,30 +2038,40 @@ class ReservationDialog(QDialog):
         
         session = self.db.get_session()
         try:
-            reservation = EquipmentReservation()
-            
-            if is_vehicle:
-                reservation.vehicle_id = uuid.UUID(resource_id)
-            else:
-                reservation.equipment_id = uuid.UUID(resource_id)
-            
-            reservation.start_date = self.res_start_date.date().toPyDate()
-            reservation.start_time = self.res_start_time.time().toString("HH:mm")
-            reservation.end_date = self.res_end_date.date().toPyDate()
-            reservation.end_time = self.res_end_time.time().toString("HH:mm")
-            reservation.purpose = self.res_purpose.text().strip()
-            reservation.status = self.res_status.currentData()
-            reservation.notes = self.res_notes.toPlainText().strip() or None
-            
-            # reserved_by_id verweist auf employees - nicht setzen
-            
-            if self.user and hasattr(self.user, 'tenant_id'):
-                reservation.tenant_id = self.user.tenant_id
+            # reserved_by_id verweist auf employees - Mitarbeiter des angemeldeten Benutzers
+            employee_id = None
+            if self.user and getattr(self.user, 'id', None):
+                employee_id = session.execute(
+                    select(Employee.id).where(Employee.user_id == self.user.id)
+                ).scalar()
+            if not employee_id:
+                QMessageBox.warning(self, "Fehler",
+                                    "Ihrem Benutzer ist kein Mitarbeiter zugeordnet - Reservierung nicht möglich.")
+                return
             
-            session.add(reservation)
+            get_reservation_service().reserve(
+                session,
+                tenant_id=self.user.tenant_id if self.user and hasattr(self.user, 'tenant_id') else None,
+                vehicle_id=uuid.UUID(resource_id) if is_vehicle else None,
+                equipment_id=None if is_vehicle else uuid.UUID(resource_id),
+                start_date=self.res_start_date.date().toPyDate(),
+                start_time=self.res_start_time.time().toString("HH:mm"),
+                end_date=self.res_end_date.date().toPyDate(),
+                end_time=self.res_end_time.time().toString("HH:mm"),
+                purpose=self.res_purpose.text().strip(),
+                status=self.res_status.currentData(),
+                notes=self.res_notes.toPlainText().strip() or None,
+                reserved_by_id=employee_id,
+            )
             session.commit()
             self.accept()
             
+        except ReservationConflict as e:
+            session.rollback()
+            QMessageBox.warning(self, "Doppelbuchung", str(e))
+        except ValueError as e:
+            session.rollback()
+            QMessageBox.warning(self, "Fehler", str(e))
         except Exception as e:
             session.rollback()
             QMessageBox.warning(self, "Fehler", f"Fehler beim Speichern: {e}")
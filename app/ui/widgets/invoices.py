@@ -6,15 +6,57 @@ from PyQt6.QtWidgets import (
     QPushButton, QLineEdit, QComboBox, QLabel, QHeaderView, QMessageBox, 
     QMenu, QFrame, QGraphicsDropShadowEffect
 )
-from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QAction, QColor
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-
+from PyQt6.QtCore import Qt, QTimer, QThread, QUrl, pyqtSignal
+from PyQt6.QtGui import QAction, QColor, QDesktopServices
 from shared.models import Invoice, InvoiceStatus, InvoiceType
+from app.services.query_registry import registry
 from app.ui.styles import COLORS
 
 
+class InvoicePdfWorker(QThread):
+    """Hintergrund-Thread für den PDF-Stapel (verteilt selbst auf Worker-Prozesse)"""
+    progress = pyqtSignal(int, int)
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+    
+    def run(self):
+        try:
+            from app.services.invoice_pdf_service import get_invoice_pdf_service
+            with self.db_service.session_scope() as session:
+                summary = get_invoice_pdf_service(self.db_service).store_batch(
+                    session, self.tenant_id, progress=self.progress.emit
+                )
+            self.completed.emit(True, summary)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
+class RecurringInvoiceWorker(QThread):
+    """Hintergrund-Thread für den Lauf der Abo-Rechnungen"""
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id, user_id):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+    
+    def run(self):
+        try:
+            from app.services.recurring_invoice_service import get_recurring_invoice_service
+            with self.db_service.session_scope() as session:
+                summary = get_recurring_invoice_service().run(
+                    session, tenant_id=self.tenant_id, user_id=self.user_id
+                )
+            self.completed.emit(True, summary)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
 class InvoicesWidget(QWidget):
     """Modern invoice management page"""
     
@@ -23,6 +65,8 @@ class InvoicesWidget(QWidget):
         self.db = db_service
         self.user = user
         self._search_timer = None
+        self._pdf_worker = None
+        self._recurring_worker = None
         self.setStyleSheet(f"background: {COLORS['bg_primary']};")
         self.setup_ui()
     
@@ -113,6 +157,48 @@ class InvoicesWidget(QWidget):
         
         toolbar.addStretch()
         
+        # Recurring invoices button
+        self.recurring_btn = QPushButton("🔁 Abo-Rechnungen")
+        self.recurring_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.recurring_btn.setToolTip("Fällige Rechnungen aus allen Abo-Vorlagen als Entwurf erzeugen")
+        self.recurring_btn.setStyleSheet(f"""
+            QPushButton {{
+                padding: 10px 20px;
+                background: white;
+                color: {COLORS['text_primary']};
+                border: 1px solid {COLORS['gray_200']};
+                border-radius: 8px;
+                font-weight: 600;
+                font-size: 13px;
+            }}
+            QPushButton:hover {{
+                border-color: {COLORS['gray_300']};
+            }}
+        """)
+        self.recurring_btn.clicked.connect(self.generate_recurring)
+        toolbar.addWidget(self.recurring_btn)
+        
+        # PDF batch button
+        self.pdf_batch_btn = QPushButton("📄 PDFs erzeugen")
+        self.pdf_batch_btn.setCursor(Qt.CursorShape.PointingHandCursor)
+        self.pdf_batch_btn.setToolTip("PDFs für alle versandfähigen Rechnungen ohne PDF erzeugen")
+        self.pdf_batch_btn.setStyleSheet(f"""
+            QPushButton {{
+                padding: 10px 20px;
+                background: white;
+                color: {COLORS['text_primary']};
+                border: 1px solid {COLORS['gray_200']};
+                border-radius: 8px;
+                font-weight: 600;
+                font-size: 13px;
+            }}
+            QPushButton:hover {{
+                border-color: {COLORS['gray_300']};
+            }}
+        """)
+        self.pdf_batch_btn.clicked.connect(self.generate_pdfs)
+        toolbar.addWidget(self.pdf_batch_btn)
+        
         # Add button
         add_btn = QPushButton("+ Neue Rechnung")
         add_btn.setCursor(Qt.CursorShape.PointingHandCursor)
@@ -234,16 +320,11 @@ class InvoicesWidget(QWidget):
             # Disable updates during data load for better performance
             self.table.setUpdatesEnabled(False)
             
-            query = select(Invoice).options(
-                selectinload(Invoice.customer)
-            ).where(Invoice.is_deleted == False)
-            
-            status = self.status_filter.currentData()
-            if status:
-                query = query.where(Invoice.status == InvoiceStatus(status))
-            
-            query = query.order_by(Invoice.created_at.desc())
-            invoices = session.execute(query).scalars().all()
+            invoices = registry.execute(
+                session, "invoices.list",
+                tenant_id=self.user.tenant_id if self.user else None,
+                status=self.status_filter.currentData()
+            ).scalars().all()
             
             self.table.setRowCount(len(invoices))
             
@@ -335,6 +416,10 @@ class InvoicesWidget(QWidget):
         edit_action.triggered.connect(self.edit_invoice)
         menu.addAction(edit_action)
         
+        pdf_action = QAction("📄 PDF anzeigen", self)
+        pdf_action.triggered.connect(lambda: self.open_pdf(invoice_id))
+        menu.addAction(pdf_action)
+        
         menu.addSeparator()
         
         payment_action = QAction("💰 Zahlung erfassen", self)
@@ -375,3 +460,98 @@ class InvoicesWidget(QWidget):
             QMessageBox.warning(self, "Fehler", f"Fehler: {e}")
         finally:
             session.close()
+    
+    def open_pdf(self, invoice_id):
+        """PDF der Rechnung erzeugen, ablegen und im Standardprogramm öffnen"""
+        import uuid
+        from app.services.invoice_pdf_service import get_invoice_pdf_service
+        
+        session = self.db.get_session()
+        if not session:
+            return
+        try:
+            tenant_id = self.user.tenant_id if self.user and getattr(self.user, 'tenant_id', None) else None
+            path = get_invoice_pdf_service(self.db).store_invoice(session, uuid.UUID(invoice_id), tenant_id)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            QMessageBox.warning(self, "Fehler", f"PDF konnte nicht erstellt werden: {e}")
+            return
+        finally:
+            session.close()
+        QDesktopServices.openUrl(QUrl.fromLocalFile(str(path)))
+    
+    def generate_pdfs(self):
+        """PDFs aller versandfähigen Rechnungen ohne PDF im Hintergrund erzeugen"""
+        if self._pdf_worker and self._pdf_worker.isRunning():
+            return
+        tenant_id = self.user.tenant_id if self.user and getattr(self.user, 'tenant_id', None) else None
+        self.pdf_batch_btn.setEnabled(False)
+        self.pdf_batch_btn.setText("⏳ PDFs werden erzeugt...")
+        self._pdf_worker = InvoicePdfWorker(self.db, tenant_id)
+        self._pdf_worker.progress.connect(self._on_pdf_progress)
+        self._pdf_worker.completed.connect(self._on_pdfs_generated)
+        self._pdf_worker.start()
+    
+    def generate_recurring(self):
+        """Fällige Abo-Rechnungen nach Rückfrage im Hintergrund erzeugen"""
+        if self._recurring_worker and self._recurring_worker.isRunning():
+            return
+        from app.services.recurring_invoice_service import get_recurring_invoice_service
+        tenant_id = self.user.tenant_id if self.user and getattr(self.user, 'tenant_id', None) else None
+        session = self.db.get_session()
+        if not session:
+            return
+        try:
+            preview = get_recurring_invoice_service().preview(session, tenant_id=tenant_id)
+        except Exception as e:
+            QMessageBox.warning(self, "Fehler", f"Abo-Vorlagen konnten nicht geladen werden: {e}")
+            return
+        finally:
+            session.close()
+        if not preview['invoices']:
+            QMessageBox.information(self, "Abo-Rechnungen", "Es sind keine Abo-Rechnungen fällig.")
+            return
+        total_str = f"{preview['total']:,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
+        reply = QMessageBox.question(
+            self, "Abo-Rechnungen erzeugen",
+            f"{preview['invoices']} Rechnungen aus {preview['templates']} Vorlagen "
+            f"über insgesamt {total_str} als Entwurf erzeugen?",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        self.recurring_btn.setEnabled(False)
+        self.recurring_btn.setText("⏳ Rechnungen werden erzeugt...")
+        self._recurring_worker = RecurringInvoiceWorker(self.db, tenant_id, self.user.id if self.user else None)
+        self._recurring_worker.completed.connect(self._on_recurring_generated)
+        self._recurring_worker.start()
+    
+    def _on_recurring_generated(self, success, result):
+        self.recurring_btn.setEnabled(True)
+        self.recurring_btn.setText("🔁 Abo-Rechnungen")
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"Abo-Rechnungen fehlgeschlagen:\n{result}")
+            return
+        message = f"{result['invoices']} Rechnungen aus {result['templates']} Vorlagen erzeugt."
+        if result['skipped']:
+            message += f"\n{result['skipped']} Vorlagen ohne Positionen übersprungen."
+        if result['errors']:
+            message += f"\nFehler bei {len(result['errors'])} Mandanten - siehe Protokoll."
+        QMessageBox.information(self, "Abo-Rechnungen", message)
+        self.refresh()
+    
+    def _on_pdf_progress(self, done, total):
+        self.pdf_batch_btn.setText(f"⏳ {done} / {total} PDFs")
+    
+    def _on_pdfs_generated(self, success, result):
+        self.pdf_batch_btn.setEnabled(True)
+        self.pdf_batch_btn.setText("📄 PDFs erzeugen")
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"PDF-Erzeugung fehlgeschlagen:\n{result}")
+            return
+        QMessageBox.information(
+            self, "PDFs erzeugt",
+            f"{result['count']} Rechnungs-PDFs erzeugt ({result['seconds']:.1f} s)."
+        )
+        self.refresh()
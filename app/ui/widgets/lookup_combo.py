@@ -0,0 +1,100 @@
+"""
+Lookup Combo - durchsuchbare Auswahlfelder für Stammdaten
+
+Die Einträge kommen aus dem LookupService. Das Qt-Modell wird je Lookup-Art,
+Mandant und Platzhalter einmal aufgebaut und von allen Comboboxen geteilt,
+solange sich die Version der Daten nicht ändert - ein Dialog muss beim
+Öffnen weder abfragen noch Einträge einfügen.
+
+Wegen des geteilten Modells dürfen Aufrufer keine Einträge per addItem()
+hinzufügen; der leere Eintrag wird über `placeholder` gesetzt.
+"""
+from PyQt6.QtWidgets import QComboBox, QCompleter
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QStandardItemModel, QStandardItem
+
+from app.services.lookup_service import get_lookup_service
+
+
+# (Art, Mandant, Platzhalter, ID-Typ) -> (Version, Modell)
+_models = {}
+
+
+def lookup_model(db_service, kind: str, tenant_id=None, placeholder: str = None,
+                 id_type=str) -> QStandardItemModel:
+    """Geteiltes Modell für eine Lookup-Art (Daten: id_type(id), ohne id_type die UUID)"""
+    session = db_service.get_session()
+    if not session:
+        return QStandardItemModel()
+    try:
+        data = get_lookup_service().get(session, kind, tenant_id)
+    finally:
+        session.close()
+
+    key = (kind, tenant_id, placeholder, id_type)
+    cached = _models.get(key)
+    if cached and cached[0] == data.version:
+        return cached[1]
+
+    model = QStandardItemModel()
+    if placeholder is not None:
+        item = QStandardItem(placeholder)
+        item.setData(None, Qt.ItemDataRole.UserRole)
+        model.appendRow(item)
+    for entry in data.entries:
+        item = QStandardItem(entry.label)
+        item.setData(id_type(entry.id) if id_type else entry.id, Qt.ItemDataRole.UserRole)
+        model.appendRow(item)
+    _models[key] = (data.version, model)
+    return model
+
+
+class LookupComboBox(QComboBox):
+    """Combobox mit Suche (enthält, ohne Groß-/Kleinschreibung) über ein geteiltes Lookup-Modell"""
+
+    def __init__(self, db_service, kind: str, tenant_id=None, placeholder: str = None,
+                 id_type=str, parent=None):
+        super().__init__(parent)
+        self.db_service = db_service
+        self.kind = kind
+        self.tenant_id = tenant_id
+        self.placeholder = placeholder
+        self.id_type = id_type
+
+        self.setEditable(True)
+        self.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
+        self.setMaxVisibleItems(20)
+
+        completer = QCompleter(self)
+        completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        completer.setFilterMode(Qt.MatchFlag.MatchContains)
+        completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
+        self.setCompleter(completer)
+        self.lineEdit().editingFinished.connect(self._restore_text)
+
+        self.reload()
+
+    def reload(self):
+        """Modell neu beziehen (nur neu aufgebaut, wenn sich die Daten geändert haben)"""
+        model = lookup_model(self.db_service, self.kind, self.tenant_id, self.placeholder, self.id_type)
+        if model is self.model():
+            return
+        current = self.currentData()
+        self.setModel(model)
+        self.completer().setModel(model)
+        self.set_current_id(current)
+
+    def set_current_id(self, entry_id) -> bool:
+        """Eintrag per ID auswählen"""
+        if entry_id is not None and self.id_type:
+            entry_id = self.id_type(entry_id)
+        idx = self.findData(entry_id)
+        if idx >= 0:
+            self.setCurrentIndex(idx)
+            return True
+        return False
+
+    def _restore_text(self):
+        """Freitext ohne Treffer auf den gewählten Eintrag zurücksetzen"""
+        if self.findText(self.currentText()) < 0:
+            self.setEditText(self.itemText(self.currentIndex()))
@@ -8,9 +8,9 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction, QColor, QFont
-from sqlalchemy import select, or_
 
 from shared.models import Material, MaterialCategory
+from app.services.query_registry import registry
 from app.ui.dialogs.material_dialog import MaterialDialog
 from app.ui.styles import COLORS
 
@@ -229,32 +229,14 @@ class MaterialsWidget(QWidget):
             # Disable updates during data load for better performance
             self.table.setUpdatesEnabled(False)
             
-            query = select(Material).where(
-                Material.is_deleted == False,
-                Material.is_active == True
-            )
-            
-            # Filter by tenant
-            if self.user and hasattr(self.user, 'tenant_id') and self.user.tenant_id:
-                query = query.where(Material.tenant_id == self.user.tenant_id)
-            
-            search = self.search_input.text().strip()
-            if search:
-                search_term = f"%{search}%"
-                query = query.where(
-                    or_(
-                        Material.article_number.ilike(search_term),
-                        Material.name.ilike(search_term),
-                        Material.wood_type.ilike(search_term)
-                    )
-                )
-            
-            category = self.category_filter.currentData()
-            if category:
-                query = query.where(Material.category == MaterialCategory(category))
-            
-            query = query.order_by(Material.name)
-            materials = session.execute(query).scalars().all()
+            # Only the displayed columns - MaterialDialog loads the full entity
+            tenant_id = self.user.tenant_id if self.user and getattr(self.user, 'tenant_id', None) else None
+            materials = registry.execute(
+                session, "materials.list",
+                tenant_id=tenant_id,
+                search=self.search_input.text().strip() or None,
+                category=self.category_filter.currentData()
+            ).all()
             
             self.table.setRowCount(len(materials))
             
@@ -0,0 +1,326 @@
+"""
+ML Insights Widget - Kostenprognosen, Mängelrisiko und Kundenwert
+
+Die Seite zeigt den zwischengespeicherten Vorhersage-Stand des MLService.
+Ist das Modell veraltet oder fehlt es, wird im Hintergrundprozess trainiert;
+nach Abschluss werden die Vorhersagen neu berechnet und die Tabellen neu
+gefüllt.
+"""
+from PyQt6.QtWidgets import (
+    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QPushButton, QLabel, QFrame, QTabWidget, QHeaderView, QMessageBox
+)
+from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtGui import QFont, QColor
+
+from app.ui.styles import COLORS, get_button_style, CARD_STYLE
+from app.services.ml_service import get_ml_service
+from app.services.lookup_service import get_lookup_service
+
+
+# Ab dieser Wahrscheinlichkeit gilt ein Projekt als hohes Mängelrisiko
+HIGH_RISK = 0.7
+MEDIUM_RISK = 0.4
+
+# Kostenabweichung gegenüber Budget, ab der gewarnt wird
+COST_WARNING = 0.1
+
+CUSTOMER_LIMIT = 50
+
+STATUS_NAMES = {
+    "anfrage": "Anfrage",
+    "angebot": "Angebot",
+    "verhandlung": "Verhandlung",
+    "beauftragt": "Beauftragt",
+    "planung": "Planung",
+    "produktion": "Produktion",
+    "montage": "Montage",
+    "abnahme": "Abnahme",
+}
+
+
+def _format_euro(value) -> str:
+    """Betrag im deutschen Format ohne Nachkommastellen"""
+    if value is None:
+        return "–"
+    return f"€ {value:,.0f}".replace(",", ".")
+
+
+def _format_percent(value) -> str:
+    if value is None:
+        return "–"
+    return f"{value * 100:.0f} %"
+
+
+class MLInsightsWidget(QWidget):
+    """ML Insights - Prognosen aus dem zuletzt trainierten Modell"""
+
+    def __init__(self, db_service, user):
+        super().__init__()
+        self.db_service = db_service
+        self.user = user
+        tenant_id = user.tenant_id if user and getattr(user, 'tenant_id', None) else None
+        self.ml_service = get_ml_service(db_service, tenant_id)
+
+        self.training_timer = QTimer(self)
+        self.training_timer.setInterval(2000)
+        self.training_timer.timeout.connect(self._check_training)
+
+        self.setup_ui()
+        self.refresh()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(24, 24, 24, 24)
+        layout.setSpacing(16)
+
+        layout.addWidget(self._create_header())
+
+        # Kennzahlen
+        stats_layout = QHBoxLayout()
+        stats_layout.setSpacing(16)
+        self.stat_labels = {}
+        for key, title, color in [
+            ("projects", "Offene Projekte", COLORS['primary']),
+            ("cost", "Prognose Kosten", COLORS['secondary']),
+            ("over_budget", "Über Budget", COLORS['warning']),
+            ("high_risk", "Hohes Mängelrisiko", COLORS['danger']),
+        ]:
+            stats_layout.addWidget(self._create_stat_card(key, title, color))
+        layout.addLayout(stats_layout)
+
+        self.tabs = QTabWidget()
+        self.tabs.addTab(self._create_cost_tab(), "💶 Kostenprognose")
+        self.tabs.addTab(self._create_risk_tab(), "⚠️ Mängelrisiko")
+        self.tabs.addTab(self._create_customer_tab(), "👥 Kundenwert")
+        layout.addWidget(self.tabs)
+
+    def _create_header(self) -> QFrame:
+        header = QFrame()
+        header.setObjectName("card")
+        header.setStyleSheet(CARD_STYLE)
+        header_layout = QHBoxLayout(header)
+        header_layout.setContentsMargins(20, 16, 20, 16)
+
+        title_layout = QVBoxLayout()
+        title = QLabel("🤖 ML Insights")
+        title.setFont(QFont("Segoe UI", 18, QFont.Weight.Bold))
+        title_layout.addWidget(title)
+        self.model_label = QLabel()
+        self.model_label.setStyleSheet(f"color: {COLORS['text_secondary']};")
+        title_layout.addWidget(self.model_label)
+        header_layout.addLayout(title_layout)
+
+        header_layout.addStretch()
+
+        refresh_btn = QPushButton("🔄 Aktualisieren")
+        refresh_btn.setStyleSheet(get_button_style("secondary"))
+        refresh_btn.clicked.connect(lambda: self.refresh(force=True))
+        header_layout.addWidget(refresh_btn)
+
+        self.train_btn = QPushButton("🧠 Modell neu trainieren")
+        self.train_btn.setStyleSheet(get_button_style("primary"))
+        self.train_btn.clicked.connect(self.start_training)
+        header_layout.addWidget(self.train_btn)
+
+        return header
+
+    def _create_stat_card(self, key: str, title: str, color: str) -> QFrame:
+        card = QFrame()
+        card.setObjectName("card")
+        card.setStyleSheet(CARD_STYLE)
+        card_layout = QVBoxLayout(card)
+        card_layout.setContentsMargins(16, 12, 16, 12)
+
+        title_label = QLabel(title)
+        title_label.setStyleSheet(f"color: {COLORS['text_secondary']};")
+        card_layout.addWidget(title_label)
+
+        value_label = QLabel("–")
+        value_label.setFont(QFont("Segoe UI", 20, QFont.Weight.Bold))
+        value_label.setStyleSheet(f"color: {color};")
+        card_layout.addWidget(value_label)
+        self.stat_labels[key] = value_label
+        return card
+
+    def _create_table(self, headers: list) -> QTableWidget:
+        table = QTableWidget()
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        table.setAlternatingRowColors(True)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    def _create_cost_tab(self) -> QWidget:
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        self.cost_table = self._create_table([
+            "Projekt", "Bezeichnung", "Status", "Budget", "Prognose", "Spanne (90 %)", "Abweichung"
+        ])
+        layout.addWidget(self.cost_table)
+        return tab
+
+    def _create_risk_tab(self) -> QWidget:
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        self.risk_table = self._create_table([
+            "Projekt", "Bezeichnung", "Status", "Mängelwahrscheinlichkeit", "Haupteinflüsse"
+        ])
+        layout.addWidget(self.risk_table)
+        return tab
+
+    def _create_customer_tab(self) -> QWidget:
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        self.customer_table = self._create_table([
+            "Kunde", "Umsatz (netto)", "Zahlungsmoral", "Abwanderungsrisiko", "Rechnungen", "Letzte Rechnung"
+        ])
+        layout.addWidget(self.customer_table)
+        return tab
+
+    # ============== DATEN ==============
+
+    def refresh(self, force: bool = False):
+        """Vorhersagen anzeigen; bei fehlendem oder altem Modell Training anstoßen"""
+        session = self.db_service.get_session()
+        if not session:
+            return
+        try:
+            predictions = self.ml_service.get_predictions(session, refresh=force)
+            customers = self.ml_service.customer_values(session, limit=CUSTOMER_LIMIT)
+            names = {
+                entry.id: entry.label
+                for entry in get_lookup_service().get(session, "customers", self.ml_service.tenant_id).entries
+            }
+        except Exception as e:
+            session.rollback()
+            QMessageBox.warning(self, "Fehler", f"ML-Auswertung fehlgeschlagen: {e}")
+            return
+        finally:
+            session.close()
+
+        self._fill_stats(predictions)
+        self._fill_cost_table(predictions.projects)
+        self._fill_risk_table(predictions.projects)
+        self._fill_customer_table(customers, names)
+        self._update_model_label()
+
+        if self.ml_service.needs_training() and not self.ml_service.is_training:
+            self.start_training()
+
+    def start_training(self):
+        if self.ml_service.retrain() is None:
+            return
+        self.train_btn.setEnabled(False)
+        self._update_model_label()
+        self.training_timer.start()
+
+    def _check_training(self):
+        if self.ml_service.is_training:
+            return
+        self.training_timer.stop()
+        self.train_btn.setEnabled(True)
+        if self.ml_service.last_error:
+            self._update_model_label()
+            QMessageBox.warning(self, "Fehler", f"Training fehlgeschlagen: {self.ml_service.last_error}")
+            return
+        self.refresh(force=True)
+
+    def _update_model_label(self):
+        model = self.ml_service.model
+        if self.ml_service.is_training:
+            text = "Modell wird im Hintergrund trainiert …"
+        elif model is None:
+            text = "Kein Modell trainiert - zu wenig abgeschlossene Projekte oder Training ausstehend"
+        else:
+            trained_at = model.trained_at.strftime("%d.%m.%Y %H:%M") if model.trained_at else "–"
+            text = f"Modell v{model.version} vom {trained_at} · {model.meta.get('samples', 0)} abgeschlossene Projekte"
+            if model.has_cost:
+                text += f" · R² {model.meta.get('cost_r2', 0):.2f}"
+        self.model_label.setText(text)
+
+    def _fill_stats(self, predictions):
+        projects = predictions.projects
+        costs = [p.cost for p in projects if p.cost is not None]
+        self.stat_labels["projects"].setText(str(len(projects)))
+        self.stat_labels["cost"].setText(_format_euro(sum(costs)) if costs else "–")
+        self.stat_labels["over_budget"].setText(str(sum(
+            1 for p in projects if p.cost_deviation is not None and p.cost_deviation > COST_WARNING
+        )))
+        self.stat_labels["high_risk"].setText(str(sum(
+            1 for p in projects if p.defect_probability is not None and p.defect_probability >= HIGH_RISK
+        )))
+
+    @staticmethod
+    def _status_text(status) -> str:
+        value = getattr(status, "value", status) or ""
+        return STATUS_NAMES.get(value, str(value).title())
+
+    @staticmethod
+    def _number_item(text: str) -> QTableWidgetItem:
+        item = QTableWidgetItem(text)
+        item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return item
+
+    def _fill_cost_table(self, projects):
+        self.cost_table.setRowCount(len(projects))
+        for row, p in enumerate(projects):
+            self.cost_table.setItem(row, 0, QTableWidgetItem(p.project_number or ""))
+            self.cost_table.setItem(row, 1, QTableWidgetItem(p.name or ""))
+            self.cost_table.setItem(row, 2, QTableWidgetItem(self._status_text(p.status)))
+            self.cost_table.setItem(row, 3, self._number_item(_format_euro(p.budget) if p.budget else "–"))
+            self.cost_table.setItem(row, 4, self._number_item(_format_euro(p.cost)))
+            spread = f"{_format_euro(p.range_min)} – {_format_euro(p.range_max)}" if p.cost is not None else "–"
+            self.cost_table.setItem(row, 5, self._number_item(spread))
+
+            deviation = p.cost_deviation
+            item = self._number_item(f"{deviation * 100:+.0f} %" if deviation is not None else "–")
+            if deviation is not None and deviation > COST_WARNING:
+                item.setForeground(QColor(COLORS['danger']))
+            elif deviation is not None and deviation < -COST_WARNING:
+                item.setForeground(QColor(COLORS['success']))
+            self.cost_table.setItem(row, 6, item)
+
+    def _fill_risk_table(self, projects):
+        ranked = sorted(
+            projects,
+            key=lambda p: p.defect_probability if p.defect_probability is not None else -1.0,
+            reverse=True
+        )
+        self.risk_table.setRowCount(len(ranked))
+        for row, p in enumerate(ranked):
+            self.risk_table.setItem(row, 0, QTableWidgetItem(p.project_number or ""))
+            self.risk_table.setItem(row, 1, QTableWidgetItem(p.name or ""))
+            self.risk_table.setItem(row, 2, QTableWidgetItem(self._status_text(p.status)))
+
+            probability = p.defect_probability
+            item = self._number_item(_format_percent(probability))
+            if probability is not None and probability >= HIGH_RISK:
+                item.setForeground(QColor(COLORS['danger']))
+            elif probability is not None and probability >= MEDIUM_RISK:
+                item.setForeground(QColor(COLORS['warning']))
+            self.risk_table.setItem(row, 3, item)
+            self.risk_table.setItem(row, 4, QTableWidgetItem(", ".join(label for label, _ in p.factors) or "–"))
+
+    def _fill_customer_table(self, customers, names):
+        self.customer_table.setRowCount(len(customers))
+        for row, c in enumerate(customers):
+            self.customer_table.setItem(row, 0, QTableWidgetItem(names.get(c["customer_id"], str(c["customer_id"]))))
+            self.customer_table.setItem(row, 1, self._number_item(_format_euro(c["ltv"])))
+
+            score_item = self._number_item(f"{c['payment_score']:.0f} / 100")
+            if c["payment_score"] < 50:
+                score_item.setForeground(QColor(COLORS['danger']))
+            self.customer_table.setItem(row, 2, score_item)
+
+            churn_item = self._number_item(_format_percent(c["churn_risk"]))
+            if c["churn_risk"] >= HIGH_RISK:
+                churn_item.setForeground(QColor(COLORS['warning']))
+            self.customer_table.setItem(row, 3, churn_item)
+
+            self.customer_table.setItem(row, 4, self._number_item(str(c["invoice_count"])))
+            last = c["last_invoice"].strftime("%d.%m.%Y") if c["last_invoice"] else "–"
+            self.customer_table.setItem(row, 5, QTableWidgetItem(last))
@@ -8,11 +8,49 @@ from PyQt6.QtWidgets import (
     QGroupBox, QSpinBox, QDoubleSpinBox, QCheckBox, QSplitter,
     QTreeWidget, QTreeWidgetItem, QFrame, QProgressBar, QScrollArea
 )
-from PyQt6.QtCore import Qt, QDate, pyqtSignal
+from PyQt6.QtCore import Qt, QDate, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QColor
 from datetime import datetime, date
 from decimal import Decimal
 
+from app.ui.widgets.lookup_combo import LookupComboBox
+
+
+MONTH_NAMES = ["Januar", "Februar", "März", "April", "Mai", "Juni",
+               "Juli", "August", "September", "Oktober", "November", "Dezember"]
+
+
+def fill_period_combo(combo, months=6):
+    """Füllt eine Combobox mit den letzten Abrechnungsmonaten (Daten: (Jahr, Monat))"""
+    today = date.today()
+    for i in range(months):
+        year, month = divmod(today.year * 12 + today.month - 1 - i, 12)
+        combo.addItem(f"{MONTH_NAMES[month]} {year}", (year, month + 1))
+
+
+class PayrollRunWorker(QThread):
+    """Hintergrund-Thread für den Lohnlauf einer Periode"""
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id, year, month, user_id=None):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+        self.year = year
+        self.month = month
+        self.user_id = user_id
+    
+    def run(self):
+        try:
+            from app.services.payroll_service import get_payroll_service
+            with self.db_service.session_scope() as session:
+                summary = get_payroll_service().run_period(
+                    session, self.tenant_id, self.year, self.month, user_id=self.user_id
+                )
+            self.completed.emit(True, summary)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
 
 class PayrollWidget(QWidget):
     """Hauptwidget für die Lohnverwaltung"""
@@ -21,6 +59,7 @@ class PayrollWidget(QWidget):
         super().__init__()
         self.db_service = db_service
         self.user = user
+        self._run_worker = None
         self.setup_ui()
     
     def setup_ui(self):
@@ -96,10 +135,7 @@ class PayrollWidget(QWidget):
         layout.addWidget(period_label)
         
         self.current_period = QComboBox()
-        self.current_period.addItems([
-            "Dezember 2025", "November 2025", "Oktober 2025",
-            "September 2025", "August 2025"
-        ])
+        fill_period_combo(self.current_period)
         self.current_period.setStyleSheet(self._input_style())
         layout.addWidget(self.current_period)
         
@@ -118,10 +154,15 @@ class PayrollWidget(QWidget):
             }
         """
         
-        run_payroll_btn = QPushButton("▶️ Lohnlauf starten")
-        run_payroll_btn.setStyleSheet(btn_style.replace("#3b82f6", "#10b981").replace("#2563eb", "#059669"))
-        run_payroll_btn.clicked.connect(self.start_payroll_run)
-        layout.addWidget(run_payroll_btn)
+        self.run_payroll_btn = QPushButton("▶️ Lohnlauf starten")
+        self.run_payroll_btn.setStyleSheet(btn_style.replace("#3b82f6", "#10b981").replace("#2563eb", "#059669"))
+        self.run_payroll_btn.clicked.connect(self.start_payroll_run)
+        layout.addWidget(self.run_payroll_btn)
+        
+        approve_btn = QPushButton("✅ Freigeben")
+        approve_btn.setStyleSheet(btn_style)
+        approve_btn.clicked.connect(self.approve_payroll)
+        layout.addWidget(approve_btn)
         
         return header
     
@@ -282,12 +323,10 @@ class PayrollWidget(QWidget):
         
         # Filter
         toolbar.addWidget(QLabel("Periode:"))
-        period_filter = QComboBox()
-        period_filter.addItems([
-            "Dezember 2025", "November 2025", "Oktober 2025"
-        ])
-        period_filter.setStyleSheet(self._input_style())
-        toolbar.addWidget(period_filter)
+        self.payslip_period_filter = QComboBox()
+        fill_period_combo(self.payslip_period_filter)
+        self.payslip_period_filter.setStyleSheet(self._input_style())
+        toolbar.addWidget(self.payslip_period_filter)
         
         toolbar.addWidget(QLabel("Status:"))
         status_filter = QComboBox()
@@ -309,6 +348,7 @@ class PayrollWidget(QWidget):
         
         batch_btn = QPushButton("📦 Sammelabrechnung")
         batch_btn.setStyleSheet(self._button_style().replace("#3b82f6", "#10b981"))
+        batch_btn.clicked.connect(self.start_payroll_run)
         toolbar.addWidget(batch_btn)
         
         layout.addLayout(toolbar)
@@ -322,31 +362,33 @@ class PayrollWidget(QWidget):
         ])
         self.payslips_table.horizontalHeader().setStretchLastSection(True)
         self.payslips_table.setStyleSheet(self._table_style())
-        
-        # Daten aus Datenbank laden
-        self._load_payslips_data()
-        
         layout.addWidget(self.payslips_table)
         
         # Summenzeile
         sums_layout = QHBoxLayout()
         sums_layout.addStretch()
         
+        self.payslip_sum_labels = {}
         sums = [
-            ("Brutto gesamt:", "€ 11.500,00"),
-            ("SV AN gesamt:", "€ 2.173,50"),
-            ("Steuer gesamt:", "€ 1.720,00"),
-            ("Netto gesamt:", "€ 7.606,50"),
-            ("AG-Kosten gesamt:", "€ 13.767,50"),
+            ("gross", "Brutto gesamt:"),
+            ("sv", "SV AN gesamt:"),
+            ("tax", "Steuer gesamt:"),
+            ("net", "Netto gesamt:"),
+            ("costs", "AG-Kosten gesamt:"),
         ]
         
-        for label, value in sums:
-            sum_label = QLabel(f"{label} {value}")
+        for key, label in sums:
+            sum_label = QLabel(f"{label} € 0.00")
             sum_label.setStyleSheet("font-weight: bold; margin-left: 20px;")
             sums_layout.addWidget(sum_label)
+            self.payslip_sum_labels[key] = (label, sum_label)
         
         layout.addLayout(sums_layout)
         
+        # Daten aus Datenbank laden
+        self._load_payslips_data()
+        self.payslip_period_filter.currentIndexChanged.connect(self._load_payslips_data)
+        
         return widget
     
     def _create_employees_tab(self):
@@ -885,13 +927,66 @@ class PayrollWidget(QWidget):
     # === AKTIONEN ===
     
     def _load_payslips_data(self):
-        """Lädt Lohnabrechnungen aus der Datenbank"""
+        """Lädt Lohnabrechnungen der gewählten Periode aus der Datenbank"""
+        self.payslips_table.setRowCount(0)
+        period = self.payslip_period_filter.currentData()
+        session = self.db_service.get_session()
+        if session is None or period is None:
+            return
         try:
-            # Leere Tabelle für neue Daten
-            self.payslips_table.setRowCount(0)
-            # Echte Daten würden hier aus der DB geladen
+            from sqlalchemy import select
+            from shared.models import Payslip, PayrollPeriod, Employee
+            
+            year, month = period
+            rows = session.execute(
+                select(
+                    Payslip.payslip_number, Employee.first_name, Employee.last_name,
+                    Employee.employee_number, Payslip.gross_salary,
+                    Payslip.total_social_security_employee, Payslip.total_taxes,
+                    Payslip.net_salary, Payslip.total_costs, Payslip.status
+                ).join(
+                    PayrollPeriod, PayrollPeriod.id == Payslip.payroll_period_id
+                ).join(
+                    Employee, Employee.id == Payslip.employee_id
+                ).where(
+                    Payslip.tenant_id == self.user.tenant_id,
+                    Payslip.is_deleted == False,
+                    PayrollPeriod.year == year,
+                    PayrollPeriod.month == month
+                ).order_by(Employee.last_name, Employee.first_name)
+            ).all()
+            
+            status_names = {
+                "DRAFT": "Entwurf", "CALCULATED": "Berechnet", "APPROVED": "Freigegeben",
+                "PAID": "Ausgezahlt", "CORRECTED": "Korrigiert"
+            }
+            totals = {"gross": 0, "sv": 0, "tax": 0, "net": 0, "costs": 0}
+            self.payslips_table.setRowCount(len(rows))
+            for row, data in enumerate(rows):
+                name = f"{data.first_name or ''} {data.last_name or ''}".strip()
+                self.payslips_table.setItem(row, 0, QTableWidgetItem(data.payslip_number))
+                self.payslips_table.setItem(row, 1, QTableWidgetItem(name))
+                self.payslips_table.setItem(row, 2, QTableWidgetItem(data.employee_number or ""))
+                amounts = [data.gross_salary, data.total_social_security_employee,
+                           data.total_taxes, data.net_salary, data.total_costs]
+                for col, value in enumerate(amounts, start=3):
+                    item = QTableWidgetItem(f"€ {value or 0:,.2f}")
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                    self.payslips_table.setItem(row, col, item)
+                for key, value in zip(totals, amounts):
+                    totals[key] += value or 0
+                status = data.status.name if data.status else "DRAFT"
+                status_item = QTableWidgetItem(status_names.get(status, status))
+                if status in ("APPROVED", "PAID"):
+                    status_item.setForeground(QColor("#10b981"))
+                self.payslips_table.setItem(row, 8, status_item)
+            
+            for key, (label, widget) in self.payslip_sum_labels.items():
+                widget.setText(f"{label} € {totals[key]:,.2f}")
         except Exception as e:
             print(f"Fehler beim Laden der Lohnabrechnungen: {e}")
+        finally:
+            session.close()
     
     def _load_employees_table_data(self):
         """Lädt Mitarbeiter aus der Datenbank"""
@@ -937,13 +1032,91 @@ class PayrollWidget(QWidget):
             print(f"Fehler beim Laden der Mitarbeiter: {e}")
     
     def start_payroll_run(self):
-        """Startet den Lohnlauf"""
-        QMessageBox.information(self, "Lohnlauf", "Lohnlauf wird gestartet...")
+        """Startet den Lohnlauf für die gewählte Periode im Hintergrund"""
+        if self._run_worker is not None and self._run_worker.isRunning():
+            return
+        year, month = self.current_period.currentData()
+        reply = QMessageBox.question(
+            self, "Lohnlauf",
+            f"Lohnlauf für {self.current_period.currentText()} starten?\n\n"
+            "Noch nicht freigegebene Abrechnungen dieser Periode werden neu berechnet."
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        
+        self.run_payroll_btn.setEnabled(False)
+        self.run_payroll_btn.setText("⏳ Lohnlauf läuft...")
+        self._run_worker = PayrollRunWorker(
+            self.db_service, self.user.tenant_id, year, month,
+            user_id=getattr(self.user, "id", None)
+        )
+        self._run_worker.completed.connect(self._on_payroll_run_finished)
+        self._run_worker.start()
+    
+    def _on_payroll_run_finished(self, success, result):
+        self.run_payroll_btn.setEnabled(True)
+        self.run_payroll_btn.setText("▶️ Lohnlauf starten")
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"Lohnlauf fehlgeschlagen:\n{result}")
+            return
+        
+        index = self.payslip_period_filter.findText(result["period_name"])
+        if index >= 0 and index != self.payslip_period_filter.currentIndex():
+            self.payslip_period_filter.setCurrentIndex(index)
+        else:
+            self._load_payslips_data()
+        QMessageBox.information(
+            self, "Lohnlauf abgeschlossen",
+            f"{result['period_name']}: {result['payslips']} Abrechnungen berechnet "
+            f"({result['timings']['total_ms'] / 1000:.1f} s)\n\n"
+            f"Brutto: € {result['gross_total']:,.2f}\n"
+            f"Lohnsteuer inkl. Soli/KiSt: € {result['tax_total']:,.2f}\n"
+            f"SV Arbeitnehmer: € {result['sv_employee_total']:,.2f}\n"
+            f"Netto: € {result['net_total']:,.2f}\n"
+            f"Personalkosten gesamt: € {result['costs_total']:,.2f}"
+            + self._parameters_note(result)
+        )
+    
+    @staticmethod
+    def _parameters_note(result) -> str:
+        if result['parameters_year'] == result['year']:
+            return ""
+        return (f"\n\nHinweis: Für {result['year']} sind keine Rechengrößen hinterlegt, "
+                f"berechnet wurde mit den Werten von {result['parameters_year']}.")
+    
+    def approve_payroll(self):
+        """Berechnete Abrechnungen der gewählten Periode freigeben und Darlehensraten buchen"""
+        year, month = self.current_period.currentData()
+        reply = QMessageBox.question(
+            self, "Freigabe",
+            f"Abrechnungen für {self.current_period.currentText()} freigeben?\n\n"
+            "Einbehaltene Darlehensraten werden auf die Tilgungspläne gebucht. "
+            "Freigegebene Abrechnungen werden bei einem erneuten Lohnlauf nicht mehr ersetzt."
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            from app.services.payroll_service import get_payroll_service
+            with self.db_service.session_scope() as session:
+                result = get_payroll_service().approve_period(
+                    session, self.user.tenant_id, year, month,
+                    user_id=getattr(self.user, "id", None)
+                )
+        except Exception as e:
+            QMessageBox.critical(self, "Fehler", f"Freigabe fehlgeschlagen:\n{e}")
+            return
+        self._load_payslips_data()
+        QMessageBox.information(
+            self, "Freigabe",
+            f"{result['period_name']}: {result['payslips']} Abrechnungen freigegeben\n"
+            f"Darlehensraten gebucht: {result['loan_installments']} (€ {result['loan_amount']:,.2f})"
+        )
     
     def new_payslip(self):
         """Neue Lohnabrechnung erstellen"""
         dialog = PayslipDialog(self.db_service, self.user, self)
-        dialog.exec()
+        if dialog.exec():
+            self._load_payslips_data()
     
     def new_employee(self):
         """Neuen Mitarbeiter anlegen"""
@@ -959,12 +1132,58 @@ class PayrollWidget(QWidget):
         dialog.exec()
     
     def create_sv_report(self):
-        """SV-Meldung erstellen"""
-        QMessageBox.information(self, "Info", "SV-Meldung wird erstellt...")
+        """Beitragsnachweis der gewählten Periode je Krankenkasse erstellen"""
+        year, month = self.current_period.currentData()
+        session = self.db_service.get_session()
+        if session is None:
+            return
+        try:
+            from app.services.payroll_service import get_payroll_service
+            rows = get_payroll_service().contribution_summary(session, self.user.tenant_id, year, month)
+        except Exception as e:
+            QMessageBox.critical(self, "Fehler", f"SV-Meldung konnte nicht erstellt werden:\n{e}")
+            return
+        finally:
+            session.close()
+        
+        if not rows:
+            QMessageBox.information(self, "SV-Meldung", "Für diese Periode liegen keine Abrechnungen vor.")
+            return
+        lines = []
+        for row in rows:
+            total = sum(row[key] or 0 for key in ("kv", "rv", "av", "pv", "u3"))
+            lines.append(
+                f"{row['insurer']} ({row['employees']} MA): KV € {row['kv'] or 0:,.2f}, "
+                f"RV € {row['rv'] or 0:,.2f}, AV € {row['av'] or 0:,.2f}, "
+                f"PV € {row['pv'] or 0:,.2f}, U3 € {row['u3'] or 0:,.2f} = € {total:,.2f}"
+            )
+        QMessageBox.information(
+            self, f"Beitragsnachweis {self.current_period.currentText()}", "\n".join(lines)
+        )
     
     def create_tax_report(self):
-        """Lohnsteuer-Anmeldung erstellen"""
-        QMessageBox.information(self, "Info", "Lohnsteuer-Anmeldung wird erstellt...")
+        """Lohnsteuer-Anmeldung der gewählten Periode erstellen"""
+        year, month = self.current_period.currentData()
+        try:
+            from app.services.payroll_service import get_payroll_service
+            with self.db_service.session_scope() as session:
+                report = get_payroll_service().create_tax_report(
+                    session, self.user.tenant_id, year, month,
+                    user_id=getattr(self.user, "id", None)
+                )
+                message = (
+                    f"Lohnsteuer-Anmeldung {self.current_period.currentText()} berechnet\n\n"
+                    f"Arbeitnehmer: {report.employee_count}\n"
+                    f"Summe Bruttolöhne: € {report.total_gross:,.2f}\n"
+                    f"Lohnsteuer: € {report.income_tax:,.2f}\n"
+                    f"Solidaritätszuschlag: € {report.solidarity_tax:,.2f}\n"
+                    f"Kirchensteuer: € {report.church_tax:,.2f}\n"
+                    f"Gesamt: € {report.total_tax:,.2f}\n"
+                    f"Fällig am: {report.due_date.strftime('%d.%m.%Y')}"
+                )
+            QMessageBox.information(self, "Lohnsteuer-Anmeldung", message)
+        except Exception as e:
+            QMessageBox.critical(self, "Fehler", f"Lohnsteuer-Anmeldung konnte nicht erstellt werden:\n{e}")
     
     def print_payroll_journal(self):
         """Lohnjournal drucken"""
@@ -1005,8 +1224,9 @@ class PayslipDialog(QDialog):
         employee_group = QGroupBox("👤 Mitarbeiter")
         employee_form = QFormLayout(employee_group)
         
-        self.employee_combo = QComboBox()
-        self._load_employees_combo()
+        self.employee_combo = LookupComboBox(
+            self.db_service, "employees", self.user.tenant_id if self.user else None, id_type=None
+        )
         employee_form.addRow("Mitarbeiter:", self.employee_combo)
         
         self.period_combo = QComboBox()
@@ -1087,40 +1307,67 @@ class PayslipDialog(QDialog):
         
         layout.addLayout(buttons_layout)
     
-    def _load_employees_combo(self):
-        """Lädt Mitarbeiter in Combobox"""
-        try:
-            from app.models.employee import Employee
-            employees = self.db_service.get_session().query(Employee).filter(
-                Employee.is_deleted == False
-            ).all()
-            for emp in employees:
-                name = f"{emp.first_name or ''} {emp.last_name or ''} ({emp.employee_number or ''})".strip()
-                self.employee_combo.addItem(name, emp.id)
-        except Exception as e:
-            print(f"Fehler beim Laden der Mitarbeiter: {e}")
-    
     def _load_periods_combo(self):
         """Lädt Abrechnungsperioden"""
-        from datetime import datetime
-        now = datetime.now()
-        months = ["Januar", "Februar", "März", "April", "Mai", "Juni", 
-                  "Juli", "August", "September", "Oktober", "November", "Dezember"]
-        for i in range(6):
-            month_idx = (now.month - 1 - i) % 12
-            year = now.year if (now.month - i) > 0 else now.year - 1
-            self.period_combo.addItem(f"{months[month_idx]} {year}")
+        fill_period_combo(self.period_combo)
     
     def calculate(self):
-        """Berechnet die Lohnabrechnung"""
-        # Beispielberechnung
-        self.gross_label.setText("€ 4.500,00")
-        self.tax_label.setText("€ 720,00")
-        self.sv_label.setText("€ 850,50")
-        self.net_label.setText("€ 2.929,50")
+        """Berechnet die Lohnabrechnung mit der Lohnlauf-Engine (ohne zu speichern)"""
+        employee_id = self.employee_combo.currentData()
+        if employee_id is None:
+            QMessageBox.warning(self, "Fehler", "Bitte einen Mitarbeiter auswählen")
+            return
+        year, month = self.period_combo.currentData()
+        session = self.db_service.get_session()
+        try:
+            from app.services.payroll_service import get_payroll_service
+            result = get_payroll_service().preview(
+                session, self.user.tenant_id, employee_id, year, month,
+                work_hours=self.work_hours.value(), overtime_hours=self.overtime_hours.value()
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "Fehler", f"Berechnung fehlgeschlagen:\n{e}")
+            return
+        finally:
+            session.close()
+        
+        if result is None:
+            QMessageBox.warning(
+                self, "Hinweis",
+                "Für diesen Mitarbeiter liegt bereits eine freigegebene Abrechnung vor "
+                "oder er ist in der Periode nicht beschäftigt."
+            )
+            return
+        self.gross_label.setText(f"€ {result['gross_salary']:,.2f}")
+        self.tax_label.setText(f"€ {result['total_taxes']:,.2f}")
+        self.sv_label.setText(f"€ {result['total_social_security_employee']:,.2f}")
+        self.net_label.setText(f"€ {result['net_salary']:,.2f}")
     
     def save(self):
-        """Speichert die Lohnabrechnung"""
+        """Berechnet und speichert die Lohnabrechnung"""
+        employee_id = self.employee_combo.currentData()
+        if employee_id is None:
+            QMessageBox.warning(self, "Fehler", "Bitte einen Mitarbeiter auswählen")
+            return
+        year, month = self.period_combo.currentData()
+        try:
+            from app.services.payroll_service import get_payroll_service
+            with self.db_service.session_scope() as session:
+                summary = get_payroll_service().run_period(
+                    session, self.user.tenant_id, year, month,
+                    user_id=getattr(self.user, "id", None), employee_ids=[employee_id],
+                    overrides={employee_id: {
+                        "work_hours": self.work_hours.value(),
+                        "overtime_hours": self.overtime_hours.value()
+                    }}
+                )
+        except Exception as e:
+            QMessageBox.critical(self, "Fehler", f"Lohnabrechnung konnte nicht gespeichert werden:\n{e}")
+            return
+        
+        if not summary["payslips"]:
+            QMessageBox.warning(self, "Hinweis", "Es wurde keine Lohnabrechnung erstellt.")
+            return
         QMessageBox.information(self, "Erfolg", "Lohnabrechnung wurde gespeichert!")
         self.accept()
 
@@ -1141,9 +1388,10 @@ class BonusDialog(QDialog):
         
         form = QFormLayout()
         
-        self.employee_combo = QComboBox()
-        self.employee_combo.addItem("Alle Mitarbeiter", None)
-        self._load_employees_combo()
+        self.employee_combo = LookupComboBox(
+            self.db_service, "employees", self.user.tenant_id if self.user else None,
+            placeholder="Alle Mitarbeiter", id_type=None
+        )
         form.addRow("Mitarbeiter:", self.employee_combo)
         
         self.bonus_type = QComboBox()
@@ -1206,16 +1454,3 @@ class BonusDialog(QDialog):
         """Speichert die Sonderzahlung"""
         QMessageBox.information(self, "Erfolg", "Sonderzahlung wurde erfasst!")
         self.accept()
-    
-    def _load_employees_combo(self):
-        """Lädt Mitarbeiter in Combobox"""
-        try:
-            from app.models.employee import Employee
-            employees = self.db_service.get_session().query(Employee).filter(
-                Employee.is_deleted == False
-            ).all()
-            for emp in employees:
-                name = f"{emp.first_name or ''} {emp.last_name or ''} ({emp.employee_number or ''})".strip()
-                self.employee_combo.addItem(name, emp.id)
-        except Exception as e:
-            print(f"Fehler beim Laden der Mitarbeiter: {e}")
@@ -4,17 +4,47 @@ Projects Management Widget - Modern Salesforce-inspired Design
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
     QPushButton, QLineEdit, QComboBox, QLabel, QHeaderView, QMessageBox, 
-    QMenu, QFrame, QGraphicsDropShadowEffect
+    QMenu, QFrame, QGraphicsDropShadowEffect, QFileDialog
 )
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QAction, QColor, QFont
 from sqlalchemy import select, or_, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, load_only
 
-from shared.models import Project, ProjectType, ProjectStatus, Customer
+from shared.models import Project, ProjectType, ProjectStatus, Customer, ProjectCostSummary
+from app.services.project_cost_service import parse_number
+from app.services.query_registry import PROJECT_LIST_COLUMNS, CUSTOMER_NAME_COLUMNS
 from app.ui.styles import COLORS
 
 
+def _format_currency(value) -> str:
+    return f"{float(value):,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+class CuttingPlanWorker(QThread):
+    """Hintergrund-Thread für die Zuschnittoptimierung einer Abbundliste"""
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, tenant_id, piece_list_path, output_path, exact):
+        super().__init__()
+        self.db_service = db_service
+        self.tenant_id = tenant_id
+        self.piece_list_path = piece_list_path
+        self.output_path = output_path
+        self.exact = exact
+    
+    def run(self):
+        try:
+            from app.services.cutting_service import jobs_for_piece_list, optimize_many, write_cutting_list
+            with self.db_service.session_scope() as session:
+                jobs = jobs_for_piece_list(session, self.tenant_id, self.piece_list_path)
+            plans = optimize_many(jobs, exact=self.exact)
+            write_cutting_list(plans, self.output_path)
+            self.completed.emit(True, plans)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
 class ProjectsWidget(QWidget):
     """Modern project management page with pagination"""
     
@@ -28,6 +58,7 @@ class ProjectsWidget(QWidget):
         self.total_pages = 0
         self.total_count = 0
         self._search_timer = None
+        self._cutting_worker = None
         self.setStyleSheet(f"background: {COLORS['bg_primary']};")
         self.setup_ui()
     
@@ -191,9 +222,10 @@ class ProjectsWidget(QWidget):
         
         # Table
         self.table = QTableWidget()
-        self.table.setColumnCount(8)
+        self.table.setColumnCount(11)
         self.table.setHorizontalHeaderLabels([
-            "Projektnr.", "Name", "Kunde", "Typ", "Status", "Bauort", "Geplant", "Auftragswert"
+            "Projektnr.", "Name", "Kunde", "Typ", "Status", "Bauort", "Geplant", "Auftragswert",
+            "Budget", "Ist-Kosten", "Ausschöpfung"
         ])
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.ResizeToContents)
@@ -338,8 +370,12 @@ class ProjectsWidget(QWidget):
             # Disable updates during data load for better performance
             self.table.setUpdatesEnabled(False)
             
-            base_query = select(Project).options(
-                selectinload(Project.customer)
+            # Ist-Werte aus der Kostenübersicht im selben Query (kein Aggregat je Zeile)
+            base_query = select(Project, ProjectCostSummary).outerjoin(
+                ProjectCostSummary, ProjectCostSummary.project_id == Project.id
+            ).options(
+                load_only(*PROJECT_LIST_COLUMNS),
+                selectinload(Project.customer).load_only(*CUSTOMER_NAME_COLUMNS)
             ).where(Project.is_deleted == False)
             
             # Apply tenant filter
@@ -377,12 +413,12 @@ class ProjectsWidget(QWidget):
             
             query = base_query.order_by(Project.created_at.desc())
             query = query.offset(self.current_page * self.PAGE_SIZE).limit(self.PAGE_SIZE)
-            projects = session.execute(query).scalars().all()
+            projects = session.execute(query).all()
             
             self.table.setRowCount(len(projects))
             
-            for row, project in enumerate(projects):
-                self._set_row_data(row, project)
+            for row, (project, costs) in enumerate(projects):
+                self._set_row_data(row, project, costs)
             
             self._update_pagination()
             
@@ -393,7 +429,7 @@ class ProjectsWidget(QWidget):
             self.table.setUpdatesEnabled(True)
             session.close()
     
-    def _set_row_data(self, row: int, project):
+    def _set_row_data(self, row: int, project, costs=None):
         item = QTableWidgetItem(project.project_number)
         item.setData(Qt.ItemDataRole.UserRole, str(project.id))
         self.table.setItem(row, 0, item)
@@ -432,10 +468,38 @@ class ProjectsWidget(QWidget):
             planned = project.planned_start.strftime("%d.%m.%Y")
         self.table.setItem(row, 6, QTableWidgetItem(planned))
         
-        value = project.contract_value or project.quoted_value or ""
-        if value:
-            value = f"{float(value):,.2f} €".replace(",", "X").replace(".", ",").replace("X", ".")
-        self.table.setItem(row, 7, QTableWidgetItem(value))
+        value = parse_number(project.contract_value or project.quoted_value)
+        self.table.setItem(row, 7, QTableWidgetItem(_format_currency(value) if value else ""))
+        
+        # Budget vs. Ist
+        budget = sum(parse_number(v) for v in (
+            project.budget_materials, project.budget_labor,
+            project.budget_external, project.budget_other
+        ))
+        actual = costs.total_cost + parse_number(project.actual_cost_external) if costs else 0
+        self.table.setItem(row, 8, QTableWidgetItem(_format_currency(budget) if budget else ""))
+        
+        actual_item = QTableWidgetItem(_format_currency(actual) if costs else "")
+        if costs:
+            actual_item.setToolTip(
+                f"Arbeit: {_format_currency(costs.labor_cost)} ({float(costs.hours_total):.1f} h)\n"
+                f"Material: {_format_currency(costs.material_cost)}\n"
+                f"Abgerechnet: {_format_currency(costs.invoiced_net)}"
+            )
+        self.table.setItem(row, 9, actual_item)
+        
+        usage_item = QTableWidgetItem("")
+        if budget:
+            usage = float(actual) / float(budget) * 100
+            usage_item.setText(f"{usage:.0f} %")
+            if usage > 100:
+                usage_item.setForeground(QColor(COLORS['danger']))
+            elif usage > 85:
+                usage_item.setForeground(QColor(COLORS['warning']))
+            else:
+                usage_item.setForeground(QColor(COLORS['success']))
+        usage_item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        self.table.setItem(row, 10, usage_item)
     
     def _update_pagination(self):
         self.status_label.setText(f"{self.total_count} Projekte")
@@ -472,6 +536,10 @@ class ProjectsWidget(QWidget):
         edit_action.triggered.connect(self.edit_project)
         menu.addAction(edit_action)
         
+        cutting_action = QAction("Zuschnitt optimieren...", self)
+        cutting_action.triggered.connect(lambda: self.optimize_cutting(row))
+        menu.addAction(cutting_action)
+        
         menu.addSeparator()
         
         delete_action = QAction("Löschen", self)
@@ -480,6 +548,43 @@ class ProjectsWidget(QWidget):
         
         menu.exec(self.table.viewport().mapToGlobal(position))
     
+    def optimize_cutting(self, row: int):
+        """Optimize the cutting list for a project's piece list (CSV export from the joinery software)"""
+        name = self.table.item(row, 1).text()
+        path, _ = QFileDialog.getOpenFileName(
+            self, f"Abbundliste für {name}", "", "Abbundlisten (*.csv *.txt);;Alle Dateien (*)"
+        )
+        if not path:
+            return
+        output, _ = QFileDialog.getSaveFileName(
+            self, "Schnittliste speichern", path.rsplit(".", 1)[0] + "_schnittliste.csv", "CSV (*.csv)"
+        )
+        if not output:
+            return
+        exact = QMessageBox.question(
+            self, "Zuschnitt optimieren",
+            "Exakt optimieren? (langsamer, dafür meist weniger Verschnitt)",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        ) == QMessageBox.StandardButton.Yes
+        
+        tenant_id = self.user.tenant_id if self.user and getattr(self.user, 'tenant_id', None) else None
+        self._cutting_worker = CuttingPlanWorker(self.db, tenant_id, path, output, exact)
+        self._cutting_worker.completed.connect(self._on_cutting_optimized)
+        self._cutting_worker.start()
+    
+    def _on_cutting_optimized(self, success, result):
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"Zuschnittoptimierung fehlgeschlagen:\n{result}")
+            return
+        lines = [
+            f"{plan.section}: {plan.bar_count} Stäbe, Verschnitt {plan.waste_percent:.1f} %"
+            for plan in result
+        ]
+        unplaced = sum(piece.quantity for plan in result for piece in plan.unplaced)
+        if unplaced:
+            lines.append(f"\n{unplaced} Stücke sind länger als alle verfügbaren Stäbe.")
+        QMessageBox.information(self, "Schnittliste erstellt", "\n".join(lines))
+    
     def delete_project(self, row: int):
         project_id = self.table.item(row, 0).data(Qt.ItemDataRole.UserRole)
         name = self.table.item(row, 1).text()
@@ -17,9 +17,10 @@ import uuid
 
 from sqlalchemy import select, func
 from app.ui.styles import COLORS, get_button_style, CARD_STYLE
+from app.ui.widgets.lookup_combo import LookupComboBox
 from shared.models import (
     Defect, DefectSeverity, DefectStatus, QualityCheck, QualityCheckType,
-    Warranty, Certificate, Project, Customer
+    Warranty, Certificate, Project
 )
 
 
@@ -1630,7 +1631,6 @@ class DefectDialog(QDialog):
         self.file_service = None
         self._init_file_service()
         self.setup_ui()
-        self._load_projects()
     
     def _init_file_service(self):
         """Initialisiert den FileService"""
@@ -1658,7 +1658,10 @@ class DefectDialog(QDialog):
         form = QFormLayout()
         form.setSpacing(12)
         
-        self.project_combo = QComboBox()
+        self.project_combo = LookupComboBox(
+            self.db, "projects", self.user.tenant_id if self.user else None,
+            placeholder="-- Projekt wählen --"
+        )
         form.addRow("Projekt:", self.project_combo)
         
         self.title = QLineEdit()
@@ -1789,17 +1792,6 @@ class DefectDialog(QDialog):
         
         layout.addLayout(btn_layout)
     
-    def _load_projects(self):
-        session = self.db.get_session()
-        try:
-            query = select(Project).where(Project.is_deleted == False).order_by(Project.project_number.desc())
-            projects = session.execute(query).scalars().all()
-            self.project_combo.addItem("-- Projekt wählen --", None)
-            for p in projects:
-                self.project_combo.addItem(f"{p.project_number} - {p.name}", str(p.id))
-        finally:
-            session.close()
-    
     def save(self):
         if not self.title.text().strip():
             QMessageBox.warning(self, "Fehler", "Bitte Titel eingeben.")
@@ -1866,7 +1858,6 @@ class InspectionDialog(QDialog):
         self.inspection_id = inspection_id
         self.user = user
         self.setup_ui()
-        self._load_projects()
     
     def setup_ui(self):
         self.setWindowTitle("Qualitätsprüfung erfassen")
@@ -1877,7 +1868,10 @@ class InspectionDialog(QDialog):
         form = QFormLayout()
         form.setSpacing(12)
         
-        self.project_combo = QComboBox()
+        self.project_combo = LookupComboBox(
+            self.db, "projects", self.user.tenant_id if self.user else None,
+            placeholder="-- Projekt wählen --"
+        )
         form.addRow("Projekt:", self.project_combo)
         
         self.check_type = QComboBox()
@@ -1941,17 +1935,6 @@ class InspectionDialog(QDialog):
         
         layout.addLayout(btn_layout)
     
-    def _load_projects(self):
-        session = self.db.get_session()
-        try:
-            query = select(Project).where(Project.is_deleted == False).order_by(Project.project_number.desc())
-            projects = session.execute(query).scalars().all()
-            self.project_combo.addItem("-- Projekt wählen --", None)
-            for p in projects:
-                self.project_combo.addItem(f"{p.project_number} - {p.name}", str(p.id))
-        finally:
-            session.close()
-    
     def save(self):
         if not self.subject.text().strip():
             QMessageBox.warning(self, "Fehler", "Bitte Prüfgegenstand eingeben.")
@@ -2007,7 +1990,6 @@ class WarrantyDialog(QDialog):
         self.warranty_id = warranty_id
         self.user = user
         self.setup_ui()
-        self._load_data()
     
     def setup_ui(self):
         self.setWindowTitle("Gewährleistung erfassen")
@@ -2018,10 +2000,16 @@ class WarrantyDialog(QDialog):
         form = QFormLayout()
         form.setSpacing(12)
         
-        self.project_combo = QComboBox()
+        self.project_combo = LookupComboBox(
+            self.db, "projects", self.user.tenant_id if self.user else None,
+            placeholder="-- Projekt wählen --"
+        )
         form.addRow("Projekt*:", self.project_combo)
         
-        self.customer_combo = QComboBox()
+        self.customer_combo = LookupComboBox(
+            self.db, "customers", self.user.tenant_id if self.user else None,
+            placeholder="-- Kunde wählen --"
+        )
         form.addRow("Kunde*:", self.customer_combo)
         
         self.acceptance_date = QDateEdit()
@@ -2095,28 +2083,6 @@ class WarrantyDialog(QDialog):
         
         layout.addLayout(btn_layout)
     
-    def _load_data(self):
-        session = self.db.get_session()
-        try:
-            # Projekte
-            projects = session.execute(
-                select(Project).where(Project.is_deleted == False).order_by(Project.project_number.desc())
-            ).scalars().all()
-            self.project_combo.addItem("-- Projekt wählen --", None)
-            for p in projects:
-                self.project_combo.addItem(f"{p.project_number} - {p.name}", str(p.id))
-            
-            # Kunden
-            customers = session.execute(
-                select(Customer).where(Customer.is_deleted == False).order_by(Customer.company_name)
-            ).scalars().all()
-            self.customer_combo.addItem("-- Kunde wählen --", None)
-            for c in customers:
-                name = c.company_name or f"{c.first_name} {c.last_name}"
-                self.customer_combo.addItem(f"{c.customer_number} - {name}", str(c.id))
-        finally:
-            session.close()
-    
     def _calc_end_date(self):
         start = self.warranty_start.date()
         months = self.warranty_months.value()
@@ -2175,7 +2141,6 @@ class CertificateDialog(QDialog):
         self.certificate_id = certificate_id
         self.user = user
         self.setup_ui()
-        self._load_projects()
     
     def setup_ui(self):
         self.setWindowTitle("Zertifikat erfassen")
@@ -2202,7 +2167,10 @@ class CertificateDialog(QDialog):
         self.name.setPlaceholderText("Bezeichnung des Zertifikats")
         form.addRow("Bezeichnung*:", self.name)
         
-        self.project_combo = QComboBox()
+        self.project_combo = LookupComboBox(
+            self.db, "projects", self.user.tenant_id if self.user else None,
+            placeholder="-- Kein Projekt --"
+        )
         form.addRow("Projekt:", self.project_combo)
         
         self.issuer = QLineEdit()
@@ -2251,17 +2219,6 @@ class CertificateDialog(QDialog):
         
         layout.addLayout(btn_layout)
     
-    def _load_projects(self):
-        session = self.db.get_session()
-        try:
-            query = select(Project).where(Project.is_deleted == False).order_by(Project.project_number.desc())
-            projects = session.execute(query).scalars().all()
-            self.project_combo.addItem("-- Kein Projekt --", None)
-            for p in projects:
-                self.project_combo.addItem(f"{p.project_number} - {p.name}", str(p.id))
-        finally:
-            session.close()
-    
     def save(self):
         if not self.certificate_number.text().strip():
             QMessageBox.warning(self, "Fehler", "Bitte Zertifikat-Nr. eingeben.")
@@ -5,7 +5,7 @@ from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
     QGroupBox, QFormLayout, QMessageBox, QTabWidget, QTableWidget,
     QTableWidgetItem, QHeaderView, QDialog, QComboBox, QFrame,
-    QFileDialog, QScrollArea
+    QFileDialog, QScrollArea, QCheckBox
 )
 from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QFont
@@ -14,6 +14,7 @@ from datetime import datetime
 
 from shared.models import User, Tenant
 from shared.utils.security import hash_password, verify_password
+from app.services.consent_service import get_consent_service, CONSENT_LABELS
 
 
 class SettingsWidget(QWidget):
@@ -159,6 +160,46 @@ class SettingsWidget(QWidget):
         
         tabs.addTab(user_tab, "👤 Benutzer")
         
+        # Privacy / consent settings
+        privacy_tab = QWidget()
+        privacy_layout = QVBoxLayout(privacy_tab)
+        
+        consent_group = QGroupBox("Einwilligungen zur Datenerfassung")
+        consent_layout = QVBoxLayout(consent_group)
+        
+        consent_info = QLabel(
+            "Legen Sie fest, welche Daten HolzbauERP zur Verbesserung des Systems erfassen darf. "
+            "Änderungen gelten sofort."
+        )
+        consent_info.setWordWrap(True)
+        consent_info.setStyleSheet("color: #666;")
+        consent_layout.addWidget(consent_info)
+        
+        self.consent_checks = {}
+        for consent_type, label in CONSENT_LABELS.items():
+            check = QCheckBox(label)
+            consent_layout.addWidget(check)
+            self.consent_checks[consent_type] = check
+        
+        privacy_layout.addWidget(consent_group)
+        privacy_layout.addStretch()
+        
+        save_consent_btn = QPushButton("Speichern")
+        save_consent_btn.setStyleSheet("""
+            QPushButton {
+                padding: 10px 30px;
+                background-color: #2563eb;
+                color: white;
+                border: none;
+                border-radius: 6px;
+                font-weight: bold;
+            }
+        """)
+        save_consent_btn.clicked.connect(self.save_consents)
+        privacy_layout.addWidget(save_consent_btn, alignment=Qt.AlignmentFlag.AlignRight)
+        
+        tabs.addTab(privacy_tab, "🔒 Datenschutz")
+        
         # About Tab
         about_tab = QWidget()
         about_layout = QVBoxLayout(about_tab)
@@ -515,6 +556,11 @@ class SettingsWidget(QWidget):
         self.user_first.setText(self.user.first_name or "")
         self.user_last.setText(self.user.last_name or "")
         
+        # Consent flags (in-memory mask, loaded at login)
+        for consent_type, granted in get_consent_service().get_consents(self.user.id).items():
+            if consent_type in self.consent_checks:
+                self.consent_checks[consent_type].setChecked(granted)
+        
         # Company/Tenant data
         if self.user.tenant_id:
             session = self.db.get_session()
@@ -570,6 +616,10 @@ class SettingsWidget(QWidget):
             
             session.commit()
             
+            # Rechnungs-PDFs mit den neuen Firmendaten rendern
+            from app.services.invoice_pdf_service import get_invoice_pdf_service
+            get_invoice_pdf_service().forget_company(self.user.tenant_id)
+            
             # Update user data
             self.user.company_name = tenant.company_name
             self.user.tenant_name = tenant.name
@@ -637,6 +687,25 @@ class SettingsWidget(QWidget):
             QMessageBox.warning(self, "Fehler", f"Fehler beim Speichern: {e}")
         finally:
             session.close()
+    
+    def save_consents(self):
+        """Save tracking consents; telemetry picks up the new mask via the change callback"""
+        session = self.db.get_auth_session()
+        if session is None:
+            QMessageBox.warning(self, "Fehler", "Keine Verbindung zur Benutzerdatenbank.")
+            return
+        try:
+            changes = {
+                consent_type: check.isChecked()
+                for consent_type, check in self.consent_checks.items()
+            }
+            get_consent_service().set_consents(session, self.user.id, changes)
+            QMessageBox.information(self, "Erfolg", "Einwilligungen wurden gespeichert.")
+        except Exception as e:
+            session.rollback()
+            QMessageBox.warning(self, "Fehler", f"Fehler beim Speichern: {e}")
+        finally:
+            session.close()
 
 
 class AddBankAccountDialog(QDialog):
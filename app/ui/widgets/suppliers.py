@@ -4,17 +4,44 @@ Suppliers Management Widget - Modern Salesforce-inspired Design
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
     QPushButton, QLineEdit, QLabel, QHeaderView, QMessageBox, QMenu,
-    QFrame, QGraphicsDropShadowEffect
+    QFrame, QGraphicsDropShadowEffect, QFileDialog, QInputDialog
 )
-from PyQt6.QtCore import Qt, QTimer
+from PyQt6.QtCore import Qt, QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QAction, QColor
-from sqlalchemy import select, or_
 
 from shared.models import Supplier
+from app.services.query_registry import registry
 from app.ui.dialogs.supplier_dialog import SupplierDialog
 from app.ui.styles import COLORS
 
 
+class CatalogImportWorker(QThread):
+    """Hintergrund-Thread für den Katalogimport (DATANORM/BMEcat)"""
+    progress = pyqtSignal(int)
+    completed = pyqtSignal(bool, object)
+    
+    def __init__(self, db_service, supplier_id, path, discount_percent, user_id):
+        super().__init__()
+        self.db_service = db_service
+        self.supplier_id = supplier_id
+        self.path = path
+        self.discount_percent = discount_percent
+        self.user_id = user_id
+    
+    def run(self):
+        try:
+            from app.services.catalog_import_service import get_catalog_import_service
+            with self.db_service.session_scope() as session:
+                summary = get_catalog_import_service().import_file(
+                    session, self.supplier_id, self.path,
+                    discount_percent=self.discount_percent, user_id=self.user_id,
+                    progress=self.progress.emit
+                )
+            self.completed.emit(True, summary)
+        except Exception as e:
+            self.completed.emit(False, str(e))
+
+
 class SuppliersWidget(QWidget):
     """Modern supplier management page"""
     
@@ -23,6 +50,7 @@ class SuppliersWidget(QWidget):
         self.db = db_service
         self.user = user
         self._search_timer = None
+        self._import_worker = None
         self.setStyleSheet(f"background: {COLORS['bg_primary']};")
         self.setup_ui()
     
@@ -204,25 +232,11 @@ class SuppliersWidget(QWidget):
             # Disable updates during data load for better performance
             self.table.setUpdatesEnabled(False)
             
-            query = select(Supplier).where(
-                Supplier.is_deleted == False,
-                Supplier.is_active == True
-            )
-            
-            search = self.search_input.text().strip()
-            if search:
-                search_term = f"%{search}%"
-                query = query.where(
-                    or_(
-                        Supplier.supplier_number.ilike(search_term),
-                        Supplier.company_name.ilike(search_term),
-                        Supplier.contact_person.ilike(search_term),
-                        Supplier.city.ilike(search_term)
-                    )
-                )
-            
-            query = query.order_by(Supplier.company_name)
-            suppliers = session.execute(query).scalars().all()
+            # Only the displayed columns - SupplierDialog loads the full entity
+            suppliers = registry.execute(
+                session, "suppliers.list",
+                search=self.search_input.text().strip() or None
+            ).all()
             
             self.table.setRowCount(len(suppliers))
             
@@ -271,6 +285,11 @@ class SuppliersWidget(QWidget):
         edit_action.triggered.connect(self.edit_supplier)
         menu.addAction(edit_action)
         
+        import_action = QAction("Katalog importieren…", self)
+        import_action.setEnabled(not (self._import_worker and self._import_worker.isRunning()))
+        import_action.triggered.connect(lambda: self.import_catalog(row))
+        menu.addAction(import_action)
+        
         menu.addSeparator()
         
         delete_action = QAction("Löschen", self)
@@ -279,6 +298,48 @@ class SuppliersWidget(QWidget):
         
         menu.exec(self.table.viewport().mapToGlobal(position))
     
+    def import_catalog(self, row: int):
+        """Import a DATANORM or BMEcat price list for the supplier in the background"""
+        supplier_id = self.table.item(row, 0).data(Qt.ItemDataRole.UserRole)
+        name = self.table.item(row, 1).text()
+        
+        path, _ = QFileDialog.getOpenFileName(
+            self, f"Katalog von {name} importieren", "",
+            "Kataloge (*.001 *.dat *.txt *.xml *.bmecat);;Alle Dateien (*)"
+        )
+        if not path:
+            return
+        # Only used for articles that come with a list price but no net price
+        discount, ok = QInputDialog.getDouble(
+            self, "Katalog importieren", "Rabatt auf Listenpreise (%):", 0.0, 0.0, 100.0, 2
+        )
+        if not ok:
+            return
+        
+        self.status_label.setText(f"Katalog {name} wird importiert...")
+        self._import_worker = CatalogImportWorker(
+            self.db, supplier_id, path, discount, self.user.id if self.user else None
+        )
+        self._import_worker.progress.connect(
+            lambda count: self.status_label.setText(f"Katalog {name}: {count:,} Artikel gelesen".replace(",", "."))
+        )
+        self._import_worker.completed.connect(self._on_catalog_imported)
+        self._import_worker.start()
+    
+    def _on_catalog_imported(self, success, result):
+        self.refresh()
+        if not success:
+            QMessageBox.critical(self, "Fehler", f"Katalogimport fehlgeschlagen:\n{result}")
+            return
+        message = (
+            f"{result['read']} Artikel gelesen ({result['seconds']:.0f} s):\n"
+            f"{result['created']} neu, {result['updated']} geändert, "
+            f"{result['unchanged']} unverändert, {result['expired']} ausgelistet."
+        )
+        if result['unknown']:
+            message += f"\n{result['unknown']} Preissätze ohne bekannten Artikel übersprungen."
+        QMessageBox.information(self, "Katalog importiert", message)
+    
     def delete_supplier(self, row: int):
         supplier_id = self.table.item(row, 0).data(Qt.ItemDataRole.UserRole)
         name = self.table.item(row, 1).text()
@@ -347,6 +347,28 @@ class PerformanceChart(QFrame):
             axis.setLabelsColor(QColor("#424242"))
             axis.setGridLineColor(QColor("#eeeeee"))
     
+    def set_multi_line_data(self, series_data: Dict[str, List[float]], colors: List[str] = None):
+        """Set several line series sharing the x-axis"""
+        if not HAS_CHARTS:
+            return
+        
+        self.chart.removeAllSeries()
+        colors = colors or ["#1565C0", "#2E7D32", "#F57C00", "#7B1FA2"]
+        
+        for index, (name, values) in enumerate(series_data.items()):
+            series = QLineSeries()
+            series.setName(name)
+            series.setColor(QColor(colors[index % len(colors)]))
+            for i, value in enumerate(values):
+                series.append(i, value)
+            self.chart.addSeries(series)
+        
+        self.chart.createDefaultAxes()
+        
+        for axis in self.chart.axes():
+            axis.setLabelsColor(QColor("#424242"))
+            axis.setGridLineColor(QColor("#eeeeee"))
+    
     def set_bar_data(self, categories: List[str], values: List[float], name: str = "Data"):
         """Set bar data"""
         if not HAS_CHARTS:
@@ -557,7 +579,7 @@ class TelemetryDashboard(QWidget):
         self.avg_response_card = MetricCard("Ø Antwortzeit", "0 ms", "", "⏱️", "#1565C0")
         metrics_layout.addWidget(self.avg_response_card)
         
-        self.max_response_card = MetricCard("Max. Antwortzeit", "0 ms", "", "📈", "#C62828")
+        self.max_response_card = MetricCard("Max. Antwortzeit", "0 ms", "p95: - · p99: -", "📈", "#C62828")
         metrics_layout.addWidget(self.max_response_card)
         
         self.request_count_card = MetricCard("Requests", "0", "Gesamt", "📊", "#2E7D32")
@@ -614,6 +636,20 @@ class TelemetryDashboard(QWidget):
         
         layout.addWidget(slow_group)
         
+        # Compile cache statistics per registered query
+        cache_group = QGroupBox("🗄️ Query-Cache (kompilierte Statements)")
+        cache_group.setStyleSheet(slow_group.styleSheet())
+        cache_layout = QVBoxLayout(cache_group)
+        
+        self.query_cache_table = QTableWidget()
+        self.query_cache_table.setColumnCount(5)
+        self.query_cache_table.setHorizontalHeaderLabels(["Query", "Ausführungen", "Cache-Treffer", "Trefferquote", "Ø ms"])
+        self.query_cache_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self.query_cache_table.setStyleSheet(self.slow_table.styleSheet())
+        cache_layout.addWidget(self.query_cache_table)
+        
+        layout.addWidget(cache_group)
+        
         return widget
     
     def _create_errors_tab(self) -> QWidget:
@@ -707,6 +743,11 @@ class TelemetryDashboard(QWidget):
         
         layout.addLayout(resources_layout)
         
+        # Resource history (read from the sampler ring buffers)
+        self.resource_chart = PerformanceChart("📈 Ressourcen-Verlauf (15 Minuten)")
+        self.resource_chart.setMinimumHeight(260)
+        layout.addWidget(self.resource_chart)
+        
         # Device Info Group
         device_group = QGroupBox("🖥️ Geräteinformationen")
         device_group.setStyleSheet("""
@@ -961,6 +1002,11 @@ class TelemetryDashboard(QWidget):
         self.refresh_timer = QTimer(self)
         self.refresh_timer.timeout.connect(self.load_data)
         self.refresh_timer.start(60000)  # Alle 60 Sekunden
+        
+        # Live-Werte kommen aus dem Sampler-Speicher und blockieren nicht
+        self.live_timer = QTimer(self)
+        self.live_timer.timeout.connect(self.load_live_metrics)
+        self.live_timer.start(5000)
     
     def get_selected_days(self) -> int:
         """Gibt die ausgewählten Tage zurück"""
@@ -975,6 +1021,7 @@ class TelemetryDashboard(QWidget):
             self.load_performance_data()
             self.load_errors()
             self.load_health_data()
+            self.load_live_metrics()
             self.load_activity_data()
         except Exception as e:
             print(f"Fehler beim Laden der Telemetrie-Daten: {e}")
@@ -1014,13 +1061,36 @@ class TelemetryDashboard(QWidget):
             stats = telemetry.get_performance_stats(days=days)
             
             self.avg_response_card.update_value(f"{stats.get('avg_duration_ms', 0):.0f} ms")
-            self.max_response_card.update_value(f"{stats.get('max_duration_ms', 0):.0f} ms")
+            self.max_response_card.update_value(
+                f"{stats.get('max_duration_ms', 0):.0f} ms",
+                f"p95: {stats.get('p95_duration_ms', 0):.0f} ms · p99: {stats.get('p99_duration_ms', 0):.0f} ms"
+            )
             self.request_count_card.update_value(str(stats.get('request_count', 0)))
             self.performance_card.update_value(f"{stats.get('avg_duration_ms', 0):.0f} ms")
             
+            self.load_query_cache_stats()
+            
         except Exception as e:
             print(f"Fehler beim Laden der Performance-Daten: {e}")
     
+    def load_query_cache_stats(self):
+        """Lädt Compile-Cache-Trefferquoten der registrierten Queries"""
+        from app.services.query_registry import get_query_registry
+        
+        query_stats = get_query_registry().get_stats()
+        self.query_cache_table.setRowCount(len(query_stats))
+        for row, q in enumerate(query_stats):
+            self.query_cache_table.setItem(row, 0, QTableWidgetItem(q['name']))
+            self.query_cache_table.setItem(row, 1, QTableWidgetItem(str(q['executions'])))
+            self.query_cache_table.setItem(row, 2, QTableWidgetItem(f"{q['cache_hits']} / {q['cache_hits'] + q['cache_misses']}"))
+            self.query_cache_table.setItem(row, 3, QTableWidgetItem(f"{q['hit_rate']:.1f}%"))
+            self.query_cache_table.setItem(row, 4, QTableWidgetItem(f"{q['avg_ms']:.1f}"))
+        
+        executions = sum(q['executions'] for q in query_stats)
+        if executions:
+            avg_db_ms = sum(q['avg_ms'] * q['executions'] for q in query_stats) / executions
+            self.db_time_card.update_value(f"{avg_db_ms:.0f} ms")
+    
     def load_errors(self):
         """Lädt Fehler-Daten"""
         try:
@@ -1129,6 +1199,31 @@ class TelemetryDashboard(QWidget):
         except Exception as e:
             print(f"Fehler beim Laden der Health-Daten: {e}")
     
+    def load_live_metrics(self):
+        """Aktualisiert Ressourcen-Karten und -Verlauf aus den Ringpuffern"""
+        if not self.isVisible():
+            return
+        try:
+            from app.services.telemetry_service import get_telemetry
+            telemetry = get_telemetry()
+            
+            cpu = telemetry.get_metric_series('cpu.percent', seconds=900)
+            memory = telemetry.get_metric_series('memory.percent', seconds=900)
+            app_cpu = telemetry.get_metric_series('app.cpu_percent', seconds=900)
+            
+            if cpu:
+                self.cpu_card.update_value(f"{cpu[-1]['value']:.1f}%")
+            if memory:
+                self.memory_card.update_value(f"{memory[-1]['value']:.1f}%")
+            
+            self.resource_chart.set_multi_line_data({
+                "CPU %": [p['value'] for p in cpu],
+                "RAM %": [p['value'] for p in memory],
+                "App CPU %": [p['value'] for p in app_cpu],
+            })
+        except Exception as e:
+            print(f"Fehler beim Laden der Live-Metriken: {e}")
+    
     def load_activity_data(self):
         """Lädt Aktivitätsdaten"""
         # Placeholder - würde echte Daten aus der DB laden
@@ -6,19 +6,38 @@ from PyQt6.QtWidgets import (
     QPushButton, QFrame, QMessageBox, QCheckBox, QGraphicsDropShadowEffect,
     QWidget, QSpacerItem, QSizePolicy
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QColor
 
 from app.ui.material_theme import MATERIAL_COLORS, CORNER_RADIUS
 from app.ui.material_components import MaterialButton, MaterialTextField, MaterialCard
 
 
+class LoginWorker(QThread):
+    """Background thread running the login pipeline"""
+    progress = pyqtSignal(str)
+    completed = pyqtSignal(bool, str)
+    
+    def __init__(self, auth_service, email, password):
+        super().__init__()
+        self.auth_service = auth_service
+        self.email = email
+        self.password = password
+    
+    def run(self):
+        success, message = self.auth_service.login(
+            self.email, self.password, progress=self.progress.emit
+        )
+        self.completed.emit(success, message)
+
+
 class LoginWindow(QDialog):
     """Professional Material Design login dialog"""
     
     def __init__(self, auth_service):
         super().__init__()
         self.auth_service = auth_service
+        self._login_worker = None
         self.setup_ui()
         
         # Create initial admin if needed
@@ -197,7 +216,13 @@ class LoginWindow(QDialog):
         self.login_btn.clicked.connect(self.handle_login)
         form_layout.addWidget(self.login_btn)
         
-        form_layout.addSpacing(16)
+        # Login progress
+        self.progress_label = QLabel("")
+        self.progress_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.progress_label.setStyleSheet("color: #757575; font-size: 12px; margin-top: 6px;")
+        form_layout.addWidget(self.progress_label)
+        
+        form_layout.addSpacing(10)
         
         # ===== DIVIDER =====
         divider_widget = QWidget()
@@ -289,6 +314,9 @@ class LoginWindow(QDialog):
         """
     
     def handle_login(self):
+        if self._login_worker and self._login_worker.isRunning():
+            return
+        
         email = self.email_input.text().strip()
         password = self.password_input.text()
         
@@ -298,16 +326,33 @@ class LoginWindow(QDialog):
         
         self.login_btn.setText("Anmelden...")
         self.login_btn.setEnabled(False)
-        
-        success, message = self.auth_service.login(email, password)
-        
+        self.email_input.setEnabled(False)
+        self.password_input.setEnabled(False)
+        
+        # Run login in background so the window stays responsive
+        self._login_worker = LoginWorker(self.auth_service, email, password)
+        self._login_worker.progress.connect(self.progress_label.setText)
+        self._login_worker.completed.connect(self._on_login_finished)
+        self._login_worker.start()
+    
+    def _on_login_finished(self, success: bool, message: str):
         self.login_btn.setText("Anmelden")
         self.login_btn.setEnabled(True)
+        self.email_input.setEnabled(True)
+        self.password_input.setEnabled(True)
+        self.progress_label.setText("")
         
         if success:
             self.accept()
         else:
             QMessageBox.warning(self, "Anmeldung fehlgeschlagen", message)
+            self.password_input.setFocus()
+    
+    def reject(self):
+        # Keep the dialog alive until a running login has finished
+        if self._login_worker and self._login_worker.isRunning():
+            return
+        super().reject()
     
     def show_register(self):
         from app.ui.dialogs.register_dialog import RegisterDialog
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Katalogimport (DATANORM)
+
+Erzeugt eine DATANORM-4-Datei mit N Artikeln (Standard 200.000, A- und
+B-Sätze) für einen neuen Test-Lieferanten und misst:
+- Erstimport (legt Materialien und Lieferantenartikel an)
+- erneuten Import derselben Datei (darf nichts schreiben)
+- Import mit geänderten Preisen bei --changed Prozent der Artikel
+- Preisänderung als P-Sätze (nur Preise)
+Die Daten werden mit festem Seed erzeugt und danach wieder entfernt.
+
+Aufruf (nur gegen eine leere Test-Datenbank!):
+    python benchmarks/catalog_import.py --url postgresql+psycopg2://user:pw@localhost/erp_bench
+    python benchmarks/catalog_import.py --url ... --articles 500000 --changed 10
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.database import Base
+from shared.models import Material, Supplier, SupplierArticle
+from app.services.catalog_import_service import CatalogImportService
+
+
+PRODUCTS = [
+    ("KVH C24 Fichte {0}/{1}", "NSi gehobelt gefast", "M", 1, 1450),
+    ("BSH GL24h Fichte {0}/{1}", "Sichtqualität", "M", 1, 2890),
+    ("Dachlatte {0}/{1} sortiert", "imprägniert", "M", 2, 95),
+    ("OSB/3 Platte {0} mm", "N+F 2500x675", "M2", 1, 780),
+    ("Holzfaserdämmplatte {0} mm", "WLG 040", "M2", 1, 1620),
+    ("Tellerkopfschraube 8x{1}", "verzinkt, TX40", "ST", 2, 3450),
+    ("Balkenschuh {0}x{1}", "feuerverzinkt", "ST", 0, 412),
+]
+
+
+def write_datanorm(path: str, count: int, rng: random.Random, price_factor=None, changed: float = 0.0):
+    """Schreibt count Artikel; bei price_factor ändern sich die Preise eines Anteils changed"""
+    with open(path, "w", encoding="cp850", newline="") as handle:
+        handle.write("V 050;Benchmark Holzhandel GmbH;Preisliste;EUR;\r\n")
+        for i in range(count):
+            article_rng = random.Random(i)
+            title, extra, unit, price_unit, cents = article_rng.choice(PRODUCTS)
+            cents = cents + article_rng.randint(0, 500)
+            if price_factor and rng.random() < changed:
+                cents = int(cents * price_factor)
+            name = title.format(article_rng.choice([60, 80, 100, 120]), article_rng.choice([120, 160, 200, 240]))
+            number = f"HB{i:08d}"
+            handle.write(f"A;N;{number};00;{name};{extra};1;{price_unit};{unit};{cents};R{i % 20:02d};WG{i % 50:03d};;\r\n")
+            handle.write(f"B;N;{number};{name[:15].upper()};;;;;{4000000000000 + i};;WG{i % 50:03d};;10;H-{i};;\r\n")
+
+
+def write_price_records(path: str, count: int, changed: float, rng: random.Random):
+    """P-Sätze (je drei Preise pro Zeile) für einen Anteil changed der Artikel"""
+    numbers = [i for i in range(count) if rng.random() < changed]
+    with open(path, "w", encoding="cp850", newline="") as handle:
+        handle.write("V 050;Benchmark Holzhandel GmbH;Preisänderung;EUR;\r\n")
+        for start in range(0, len(numbers), 3):
+            fields = ["P", "A"]
+            for i in numbers[start:start + 3]:
+                fields += [f"HB{i:08d}", "2", str(rng.randint(100, 5000)), "", "", "", ""]
+            handle.write(";".join(fields) + "\r\n")
+    return len(numbers)
+
+
+def report(label: str, stats: dict):
+    rate = stats["read"] / stats["seconds"] if stats["seconds"] else 0
+    print(f"{label:<26} {stats['read']:8d} gelesen  {stats['created']:8d} neu  {stats['updated']:8d} geändert  "
+          f"{stats['unchanged']:8d} unverändert  {stats['seconds']:7.1f} s  ({rate:,.0f} Artikel/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für den Katalogimport")
+    parser.add_argument("--url", default=os.environ.get("HOLZBAU_BENCH_URL"),
+                        help="SQLAlchemy-URL einer Test-Datenbank (oder HOLZBAU_BENCH_URL)")
+    parser.add_argument("--articles", type=int, default=200000)
+    parser.add_argument("--changed", type=float, default=5.0, help="Anteil geänderter Preise in Prozent")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Testdaten nicht entfernen")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("--url oder HOLZBAU_BENCH_URL erforderlich")
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine, checkfirst=True)
+    rng = random.Random(args.seed)
+    service = CatalogImportService()
+    workdir = tempfile.mkdtemp(prefix="catalog_bench_")
+    full, changed, prices = (os.path.join(workdir, name) for name in ("full.001", "changed.001", "prices.001"))
+    write_datanorm(full, args.articles, rng)
+    write_datanorm(changed, args.articles, rng, price_factor=1.04, changed=args.changed / 100)
+    price_records = write_price_records(prices, args.articles, args.changed / 100, rng)
+    print(f"DATANORM-Datei mit {args.articles} Artikeln ({os.path.getsize(full) / 1024 / 1024:.1f} MB) erzeugt\n")
+
+    tenant_id, supplier_id = uuid.uuid4(), uuid.uuid4()
+    with Session(engine) as session:
+        now = datetime.utcnow()
+        session.execute(insert(Supplier), [{
+            "id": supplier_id, "tenant_id": tenant_id, "supplier_number": "L-BENCH",
+            "company_name": "Benchmark Holzhandel GmbH", "is_deleted": False, "created_at": now, "updated_at": now,
+        }])
+        session.commit()
+        try:
+            options = {"batch_size": args.batch_size, "discount_percent": 30}
+            report("Erstimport", service.import_file(session, supplier_id, full, **options))
+            report("Gleiche Datei erneut", service.import_file(session, supplier_id, full, **options))
+            report(f"{args.changed:g} % Preise geändert", service.import_file(session, supplier_id, changed, **options))
+            report(f"P-Sätze ({price_records})", service.import_file(session, supplier_id, prices, **options))
+
+            articles = session.execute(
+                select(func.count(SupplierArticle.id)).where(SupplierArticle.supplier_id == supplier_id)
+            ).scalar()
+            print(f"\nLieferantenartikel: {articles} (erwartet {args.articles})")
+        finally:
+            if not args.keep:
+                session.rollback()
+                session.execute(delete(SupplierArticle).where(SupplierArticle.supplier_id == supplier_id))
+                session.execute(delete(Material).where(Material.tenant_id == tenant_id))
+                session.execute(delete(Supplier).where(Supplier.id == supplier_id))
+                session.commit()
+            for path in (full, changed, prices):
+                os.remove(path)
+            os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Zuschnittoptimierung
+
+Szenarien (mit festem Seed erzeugt, keine Datenbank nötig):
+- Dachstuhl: N Stücke (Standard 2.000) in acht Querschnitten - Sparren,
+  Pfetten, Kehlbalken, Stiele, Latten, Konterlatten ... auf KVH/BSH-
+  Handelslängen, zum Teil mit Reststücken im Lager
+- Einzelquerschnitt mit vielen verschiedenen Längen (Schwerpunkt Heuristik)
+- Lehrbuchinstanz mit bekannter Untergrenze (Summe der Stücklängen)
+
+Gemessen werden je Verfahren (Heuristik, exakt) Laufzeit, Stäbe, Verschnitt
+und bei exakt der Abstand zur LP-Schranke; der Dachstuhl exakt zusätzlich
+seriell gegen parallel (--workers, ein Prozess je Querschnitt).
+
+Aufruf:
+    python benchmarks/cutting_stock.py
+    python benchmarks/cutting_stock.py --pieces 5000 --workers 4
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.cutting_service import CutPiece, CuttingJob, StockLength, optimize, optimize_many
+
+
+KVH_LENGTHS = [4000, 5000, 6000, 7000, 8000, 9000, 10000, 11000, 12000, 13000]
+BSH_LENGTHS = [6000, 8000, 10000, 12000, 13500, 15000]
+LATTEN_LENGTHS = [4000, 4500, 5000]
+
+# Querschnitt, Anteil an den Stücken, Längenbereich (mm), Handelslängen, Reststücke im Lager
+ROOF = [
+    ("80x200 C24 Sparren", 0.12, (3800, 7400), KVH_LENGTHS, [(3000, 6), (5200, 4)]),
+    ("160x240 GL24h Pfetten", 0.02, (4000, 12500), BSH_LENGTHS, []),
+    ("60x160 C24 Kehlbalken", 0.06, (2200, 5200), KVH_LENGTHS, [(2500, 10)]),
+    ("120x120 C24 Stiele", 0.05, (600, 2800), KVH_LENGTHS, [(1800, 12), (2400, 5)]),
+    ("100x100 C24 Kopfbänder", 0.04, (500, 1100), KVH_LENGTHS, []),
+    ("40x60 S10 Konterlatten", 0.21, (900, 4900), LATTEN_LENGTHS, []),
+    ("30x50 S10 Dachlatten", 0.40, (800, 4900), LATTEN_LENGTHS, [(3000, 40)]),
+    ("60x120 C24 Wechsel", 0.10, (700, 3200), KVH_LENGTHS, [(1200, 20)]),
+]
+
+
+def roof_jobs(pieces: int, rng: random.Random, kerf: int):
+    """Dachstuhl: Stücke je Querschnitt, Längen auf 5 mm gerundet, Positionen mit Stückzahl"""
+    jobs = []
+    for section, share, (low, high), lengths, offcuts in ROOF:
+        count = max(1, int(round(pieces * share)))
+        positions = []
+        while count > 0:
+            quantity = min(count, rng.choice([1, 2, 2, 4, 6, 8, 12]))
+            length = int(rng.uniform(low, high) / 5) * 5
+            positions.append(CutPiece(length, quantity, f"Pos {len(positions) + 1}"))
+            count -= quantity
+        stock = [StockLength(length) for length in lengths]
+        stock += [StockLength(length, quantity, in_stock=True) for length, quantity in offcuts]
+        jobs.append(CuttingJob(section, positions, stock, kerf))
+    return jobs
+
+
+def mixed_job(rng: random.Random, kerf: int):
+    pieces = [CutPiece(rng.randrange(400, 6000, 10), rng.randint(1, 6), f"P{i}") for i in range(300)]
+    return CuttingJob("Mischliste 100x200", pieces, [StockLength(length) for length in KVH_LENGTHS], kerf)
+
+
+def textbook_job():
+    """Klassische Instanz (Gilmore/Gomory-Stil): Stab 5600, ohne Schnittfuge"""
+    demand = [(1380, 22), (1520, 25), (1560, 12), (1710, 14), (1820, 18), (1880, 18), (1930, 20),
+              (2000, 10), (2050, 12), (2100, 14), (2140, 16), (2150, 18), (2200, 20)]
+    return CuttingJob("Lehrbuch 5600", [CutPiece(length, count) for length, count in demand], [StockLength(5600)], 0)
+
+
+def report(label: str, plans, seconds: float):
+    bars = sum(plan.bar_count for plan in plans)
+    stock = sum(plan.stock_mm for plan in plans)
+    waste = sum(plan.waste_mm for plan in plans)
+    offcut = sum(plan.offcut_mm for plan in plans)
+    unplaced = sum(piece.quantity for plan in plans for piece in plan.unplaced)
+    bound = [plan for plan in plans if plan.lower_bound_mm]
+    gap = ""
+    if bound and len(bound) == len(plans):
+        lp = sum(plan.lower_bound_mm for plan in plans)
+        gap = f"  Abstand LP {(sum(plan.cost for plan in plans) / lp - 1) * 100:5.2f} %"
+    print(f"{label:<34} {seconds:7.2f} s  {bars:5d} Stäbe  {stock / 1000:9.1f} m  "
+          f"Verschnitt {waste / max(stock, 1) * 100:5.2f} %  Reststücke {offcut / 1000:7.1f} m{gap}"
+          + (f"  ({unplaced} zu lang)" if unplaced else ""))
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für die Zuschnittoptimierung")
+    parser.add_argument("--pieces", type=int, default=2000)
+    parser.add_argument("--kerf", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None, help="Prozesse für parallele Querschnitte")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--details", action="store_true", help="Ergebnis je Querschnitt ausgeben")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    jobs = roof_jobs(args.pieces, rng, args.kerf)
+    total = sum(piece.quantity for job in jobs for piece in job.pieces)
+    print(f"Dachstuhl: {total} Stücke, {sum(len(job.pieces) for job in jobs)} Positionen, {len(jobs)} Querschnitte\n")
+
+    plans, seconds = timed(optimize_many, jobs, workers=1)
+    report("Dachstuhl Heuristik", plans, seconds)
+    exact, seconds = timed(optimize_many, jobs, exact=True, workers=1)
+    report("Dachstuhl exakt seriell", exact, seconds)
+    if args.workers is None or args.workers > 1:
+        plans, seconds = timed(optimize_many, jobs, exact=True, workers=args.workers)
+        report(f"Dachstuhl exakt parallel ({args.workers or 'auto'})", plans, seconds)
+    if args.details:
+        for plan in exact:
+            print(f"  {plan.section:<26} {plan.bar_count:4d} Stäbe  Verschnitt {plan.waste_percent:5.2f} %  "
+                  f"{plan.seconds:6.2f} s  Einkauf {plan.purchase_list()}")
+
+    print()
+    job = mixed_job(rng, args.kerf)
+    for exact_mode in (False, True):
+        plan, seconds = timed(optimize, job, exact=exact_mode)
+        report(f"{job.section} {'exakt' if exact_mode else 'Heuristik'}", [plan], seconds)
+
+    job = textbook_job()
+    lower = -(-sum(p.length_mm * p.quantity for p in job.pieces) // 5600)
+    for exact_mode in (False, True):
+        plan, seconds = timed(optimize, job, exact=exact_mode)
+        report(f"{job.section} {'exakt' if exact_mode else 'Heuristik'}", [plan], seconds)
+    print(f"  Untergrenze (Materialmenge): {lower} Stäbe")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Mahnlauf
+
+Legt in einer Test-Datenbank N Kunden (Standard 5.000) mit je 1-8 offenen
+Rechnungen an - ein Teil davon teilbezahlt, bezahlt oder bereits gemahnt, ein
+Teil der Kunden und Rechnungen mit Mahnsperre - und führt den Mahnlauf zum
+Stichtag aus. Anschließend wird der Lauf für denselben Stichtag wiederholt:
+er muss den vorigen ersetzen und dasselbe Ergebnis liefern. Die Daten werden
+mit festem Seed erzeugt und danach entfernt.
+
+Aufruf (nur gegen eine leere Test-Datenbank!):
+    python benchmarks/dunning_run.py --url postgresql+psycopg2://user:pw@localhost/erp_bench
+    python benchmarks/dunning_run.py --url ... --customers 20000 --grace-days 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.database import Base
+from shared.models import (
+    Customer, DunningBlock, DunningNotice, DunningNoticeItem, DunningRun, Invoice, InvoiceStatus
+)
+from app.services.dunning_service import DunningService
+
+
+def seed(session, tenant_id, customers: int, run_date: date, rng: random.Random):
+    """Erzeugt reproduzierbare Kunden, Rechnungen und Mahnsperren"""
+    now = datetime.utcnow()
+    customer_rows, invoice_rows, block_rows = [], [], []
+    for i in range(customers):
+        common = {"tenant_id": tenant_id, "created_at": now, "updated_at": now}
+        customer_id = uuid.uuid4()
+        customer_rows.append({
+            **common, "id": customer_id, "is_deleted": False, "customer_number": f"K{i:06d}",
+            "company_name": f"Kunde {i} GmbH", "email": f"buchhaltung{i}@example.com" if i % 3 else None,
+        })
+        if rng.random() < 0.02:
+            block_rows.append({**common, "id": uuid.uuid4(), "customer_id": customer_id, "invoice_id": None,
+                               "block_from": run_date - timedelta(days=30), "reason": "Reklamation",
+                               "is_active": True})
+        for _ in range(rng.randint(1, 8)):
+            invoice_id = uuid.uuid4()
+            total = rng.randint(50, 20000)
+            remaining = rng.choice([total, total, total, total // 2, 0])
+            level = rng.choice([0, 0, 0, 1, 2])
+            invoice_rows.append({
+                **common, "id": invoice_id, "is_deleted": False, "customer_id": customer_id,
+                "invoice_number": f"B{uuid.uuid4().hex[:12]}",
+                "status": InvoiceStatus.PAID if remaining == 0 else InvoiceStatus.SENT,
+                "invoice_date": run_date - timedelta(days=rng.randint(10, 150)),
+                "due_date": run_date - timedelta(days=rng.randint(-20, 120)),
+                "total": f"{total}.00", "remaining_amount": f"{remaining}.00",
+                "dunning_level": level,
+                "last_dunning_date": run_date - timedelta(days=rng.randint(1, 60)) if level else None,
+            })
+            if rng.random() < 0.01:
+                block_rows.append({**common, "id": uuid.uuid4(), "customer_id": None, "invoice_id": invoice_id,
+                                   "block_from": run_date - timedelta(days=5), "reason": "Zahlungszusage",
+                                   "is_active": True})
+    session.execute(insert(Customer), customer_rows)
+    session.execute(insert(Invoice), invoice_rows)
+    if block_rows:
+        session.execute(insert(DunningBlock), block_rows)
+    session.commit()
+    return len(invoice_rows), len(block_rows)
+
+
+def cleanup(session, tenant_id):
+    """Entfernt alle Daten des Benchmark-Mandanten"""
+    notice_ids = select(DunningNotice.id).where(DunningNotice.tenant_id == tenant_id)
+    session.execute(delete(DunningNoticeItem).where(DunningNoticeItem.notice_id.in_(notice_ids)))
+    session.execute(delete(DunningNotice).where(DunningNotice.tenant_id == tenant_id))
+    session.execute(delete(DunningRun).where(DunningRun.tenant_id == tenant_id))
+    session.execute(delete(DunningBlock).where(DunningBlock.tenant_id == tenant_id))
+    session.execute(delete(Invoice).where(Invoice.tenant_id == tenant_id))
+    session.execute(delete(Customer).where(Customer.tenant_id == tenant_id))
+    session.commit()
+
+
+def report(label: str, summary: dict):
+    rate = summary["invoices"] / summary["seconds"] if summary["seconds"] else 0
+    print(f"{label:<16} {summary['notices']:7d} Mahnungen, {summary['invoices']:7d} Rechnungen, "
+          f"{summary['amount']:14,.2f} €  {summary['seconds']:7.2f} s  ({rate:.0f} Posten/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für den Mahnlauf")
+    parser.add_argument("--url", default=os.environ.get("HOLZBAU_BENCH_URL"),
+                        help="SQLAlchemy-URL einer Test-Datenbank (oder HOLZBAU_BENCH_URL)")
+    parser.add_argument("--customers", type=int, default=5000)
+    parser.add_argument("--run-date", default="2025-11-30", help="Stichtag (JJJJ-MM-TT)")
+    parser.add_argument("--grace-days", type=int, default=3)
+    parser.add_argument("--min-amount", default="5")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Testdaten nicht entfernen")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("--url oder HOLZBAU_BENCH_URL erforderlich")
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine, checkfirst=True)
+    tenant_id = uuid.uuid4()
+    run_date = date.fromisoformat(args.run_date)
+    settings = {"reference_date": run_date, "grace_days": args.grace_days, "min_amount": args.min_amount,
+                "interest_percent": "9.12"}
+    service = DunningService()
+
+    with Session(engine) as session:
+        started = time.perf_counter()
+        invoices, blocks = seed(session, tenant_id, args.customers, run_date, random.Random(args.seed))
+        print(f"{args.customers} Kunden mit {invoices} Rechnungen und {blocks} Mahnsperren angelegt "
+              f"({(time.perf_counter() - started):.2f} s)")
+
+        try:
+            started = time.perf_counter()
+            preview = service.preview(session, tenant_id, **settings)
+            session.commit()
+            print(f"Vorschau: {len(preview)} Posten ({(time.perf_counter() - started):.2f} s)")
+
+            first = service.run(session, tenant_id, **settings)
+            report("Erster Lauf", first)
+            second = service.run(session, tenant_id, **settings)
+            report("Wiederholung", second)
+
+            notices = session.execute(
+                select(func.count(DunningNotice.id)).where(DunningNotice.tenant_id == tenant_id)
+            ).scalar()
+            print(f"Mahnungen insgesamt: {notices} (erwartet {second['notices']}), "
+                  f"gleiches Ergebnis: {first['invoices'] == second['invoices'] == len(preview)}")
+        finally:
+            if not args.keep:
+                cleanup(session, tenant_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Rechnungs-PDFs (Einzelvorschau und Stapel)
+
+Erzeugt N synthetische Rechnungen (Standard 1.000, 1-40 Positionen, fester
+Seed) und misst:
+- die erste Rechnung (kalt: Schriften, Logo, Vorlage werden aufgebaut)
+- die Vorschau-Latenz mit warmem Vorlagen-Cache (Median/p95)
+- den Stapel im aktuellen Prozess
+- den Stapel über den Prozess-Pool (--workers)
+
+Die PDFs werden in einen temporären Dateispeicher geschrieben (oder nach
+--store) und danach entfernt. Es wird keine Datenbank benötigt.
+
+Aufruf:
+    python benchmarks/invoice_pdf.py
+    python benchmarks/invoice_pdf.py --invoices 5000 --workers 8 --logo pfad/logo.png
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.invoice_pdf_service import (
+    CompanyInfo, InvoiceDocument, InvoiceLine, render_pdf, render_batch
+)
+from shared.models.invoice import InvoiceType
+
+
+ARTICLES = [
+    ("Konstruktionsvollholz C24 60/120", "m", Decimal("14.80")),
+    ("Brettschichtholz GL24h 100/240", "m", Decimal("48.50")),
+    ("OSB/3 Platte 18 mm", "m²", Decimal("12.90")),
+    ("Holzfaserdämmung 200 mm", "m²", Decimal("31.40")),
+    ("Abbund CNC", "Std", Decimal("95.00")),
+    ("Montage Zimmerer", "Std", Decimal("62.00")),
+    ("Kran inkl. Bediener", "Std", Decimal("145.00")),
+    ("Winddichtung Dachbahn", "m²", Decimal("4.60")),
+    ("Schrauben und Verbindungsmittel", "pausch", Decimal("380.00")),
+]
+
+
+def make_company(logo: str = None) -> CompanyInfo:
+    return CompanyInfo(
+        company_name="Holzbau Mustermann", legal_form="GmbH", street="Sägewerkstraße 12",
+        postal_code="79100", city="Freiburg", phone="0761 123456", email="info@holzbau-mustermann.de",
+        website="www.holzbau-mustermann.de", tax_id="DE123456789", trade_register="HRB 123456",
+        trade_register_court="Amtsgericht Freiburg", ceo_name="Max Mustermann",
+        bank_name="Sparkasse Freiburg", iban="DE89 3704 0044 0532 0130 00", bic="FRSPDE66XXX",
+        footer_text="Es gelten unsere Allgemeinen Geschäftsbedingungen.", logo_path=logo or "",
+    )
+
+
+def make_documents(count: int, rng: random.Random):
+    documents = []
+    for i in range(count):
+        lines, subtotal = [], Decimal(0)
+        for position in range(1, rng.randint(1, 40) + 1):
+            title, unit, price = rng.choice(ARTICLES)
+            quantity = Decimal(rng.randint(1, 400)) / (Decimal(10) if unit in ("m", "m²") else 1)
+            amount = (quantity * price).quantize(Decimal("0.01"))
+            subtotal += amount
+            lines.append(InvoiceLine(
+                position=position, item_type="product", title=title,
+                description="Lieferung frei Baustelle, inkl. Zuschnitt" if rng.random() < 0.3 else "",
+                quantity=quantity, unit=unit, unit_price=price, discount_percent=Decimal(0),
+                tax_rate=Decimal(19), subtotal=amount,
+            ))
+        tax = (subtotal * Decimal("0.19")).quantize(Decimal("0.01"))
+        invoice_date = date(2025, 11, 1) + timedelta(days=rng.randint(0, 29))
+        documents.append(InvoiceDocument(
+            id=uuid.uuid4(), invoice_number=f"RE-2025-{i + 1:05d}", invoice_type=InvoiceType.INVOICE.value,
+            invoice_date=invoice_date, due_date=invoice_date + timedelta(days=30),
+            customer_number=f"K{rng.randint(1, 800):06d}", subject="Holzbauarbeiten Einfamilienhaus",
+            billing_lines=[f"Bauherr {i}", f"Musterweg {rng.randint(1, 99)}", "79098 Freiburg"],
+            intro_text="Vielen Dank für Ihren Auftrag. Wir berechnen Ihnen folgende Leistungen:",
+            subtotal=subtotal, taxes=[(Decimal(19), subtotal, tax)], total=subtotal + tax,
+            payment_terms_days=30, lines=lines,
+        ))
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für Rechnungs-PDFs")
+    parser.add_argument("--invoices", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--logo", help="Logo (PNG/JPG) für die Vorlage")
+    parser.add_argument("--store", help="Dateispeicher (Standard: temporäres Verzeichnis)")
+    parser.add_argument("--skip-sequential", action="store_true", help="Stapel im aktuellen Prozess überspringen")
+    args = parser.parse_args()
+
+    company = make_company(args.logo)
+    documents = make_documents(args.invoices, random.Random(args.seed))
+    pages_hint = sum(len(d.lines) for d in documents) / len(documents)
+    print(f"{len(documents)} Rechnungen, Ø {pages_hint:.1f} Positionen")
+
+    root = Path(args.store) if args.store else Path(tempfile.mkdtemp(prefix="invoice_pdf_bench_"))
+    try:
+        started = time.perf_counter()
+        first = render_pdf(documents[0], company)
+        print(f"Erste Rechnung (kalt):      {(time.perf_counter() - started) * 1000:8.1f} ms  ({len(first) / 1024:.1f} KB)")
+
+        samples = []
+        for document in documents[:100]:
+            started = time.perf_counter()
+            render_pdf(document, company)
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        print(f"Vorschau (warm):            {statistics.median(samples):8.1f} ms Median, "
+              f"{samples[int(len(samples) * 0.95) - 1]:.1f} ms p95")
+
+        if not args.skip_sequential:
+            started = time.perf_counter()
+            results = render_batch([documents], company, root / "sequential", workers=1)
+            elapsed = time.perf_counter() - started
+            print(f"Stapel, 1 Prozess:          {elapsed:8.2f} s  ({len(results) / elapsed:.0f} Rechnungen/s)")
+
+        started = time.perf_counter()
+        results = render_batch([documents], company, root / "parallel", workers=args.workers)
+        elapsed = time.perf_counter() - started
+        print(f"Stapel, {args.workers:2d} Worker-Prozesse: {elapsed:8.2f} s  ({len(results) / elapsed:.0f} Rechnungen/s)")
+
+        # Gleiche Eingaben ergeben gleiche Bytes -> gleicher Schlüssel
+        again = render_batch([documents[:10]], company, root / "parallel", workers=1)
+        stable = all(results[key] == path for key, path in again.items())
+        print(f"Inhaltsadressierung stabil: {'ja' if stable else 'NEIN'}")
+    finally:
+        if not args.store:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
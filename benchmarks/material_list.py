@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Materialliste - volle Entitäten vs. Spaltenprojektion
+
+Legt in einer Test-Datenbank N Materialien (Standard 50.000) an, bei denen
+alle Spalten gefüllt sind (Texte, JSONB, Maße, Holzdaten), und lädt die Liste
+der Materialverwaltung auf drei Arten:
+- select(Material): volle ORM-Entitäten (bisheriges Verhalten)
+- load_only(): Entitäten, aber nur mit den angezeigten Spalten
+- "materials.list": Zeilen-Tupel mit den angezeigten Spalten (neues Verhalten)
+
+Gemessen werden die Laufzeit (Median über --repeat Läufe, jeweils frische
+Session) und in einem eigenen Lauf der Speicher-Spitzenwert (tracemalloc),
+dazu das Öffnen eines einzelnen Materials per session.get() wie im Dialog.
+Die Daten werden mit festem Seed erzeugt und danach wieder entfernt.
+
+Aufruf (nur gegen eine leere Test-Datenbank!):
+    python benchmarks/material_list.py --url postgresql+psycopg2://user:pw@localhost/erp_bench
+    python benchmarks/material_list.py --url ... --materials 100000 --repeat 3
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, datetime
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, String, Text, create_engine, delete, insert, select
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
+from sqlalchemy.orm import Session, load_only
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.database import Base
+from shared.models import Material, MaterialCategory
+from app.services.query_registry import registry, MATERIAL_LIST_COLUMNS
+
+LOREM = (
+    "Konstruktionsvollholz aus Fichte, technisch getrocknet auf 15 % +/- 3 %, allseitig gehobelt "
+    "und gefast, keilgezinkt, sichtbar einsetzbar. Festigkeitsklasse nach EN 338, CE-gekennzeichnet, "
+    "Lieferung in Paketen mit Folienabdeckung. "
+)
+
+
+def _value(column, i: int, rng: random.Random):
+    """Plausibler Füllwert je Spaltentyp"""
+    kind = column.type
+    if isinstance(kind, JSONB):
+        return {"m": 1, "m2": round(rng.uniform(0.05, 0.5), 4), "m3": round(rng.uniform(0.005, 0.05), 5),
+                "stufen": [{"ab": n * 10, "preis": round(rng.uniform(5, 50), 2)} for n in range(5)]}
+    if isinstance(kind, ARRAY):
+        return [f"https://cdn.example.com/material/{i}/{n}.jpg" for n in range(3)]
+    if isinstance(kind, UUID):
+        return None
+    if isinstance(kind, Boolean):
+        return rng.random() < 0.5
+    if isinstance(kind, Integer):
+        return rng.randint(1, 5000)
+    if isinstance(kind, DateTime):
+        return datetime(2025, 1, 1)
+    if isinstance(kind, Date):
+        return date(2025, rng.randint(1, 12), 1)
+    if isinstance(kind, Text):
+        return LOREM * rng.randint(1, 4)
+    if isinstance(kind, String):
+        length = kind.length or 50
+        return f"{column.name[:length - 8]}-{rng.randint(0, 9999)}"[:length]
+    return None
+
+
+def seed(session, tenant_id, count: int, rng: random.Random, batch: int = 5000):
+    """Erzeugt count vollständig gefüllte Materialien"""
+    now = datetime.utcnow()
+    categories = list(MaterialCategory)
+    columns = [c for c in Material.__table__.columns
+               if c.name not in ("id", "tenant_id", "is_deleted", "deleted_at", "is_active", "category",
+                                 "created_at", "updated_at", "article_number", "name", "selling_price")
+               and not c.foreign_keys]
+    for start in range(0, count, batch):
+        rows = []
+        for i in range(start, min(start + batch, count)):
+            row = {c.key: _value(c, i, rng) for c in columns}
+            row.update({
+                "id": uuid.uuid4(), "tenant_id": tenant_id, "is_deleted": False, "is_active": True,
+                "category": rng.choice(categories), "article_number": f"M{i:07d}",
+                "name": f"KVH C24 {rng.choice([60, 80, 100, 120])}/{rng.choice([120, 160, 200, 240])} #{i}",
+                "selling_price": f"{rng.uniform(2, 400):.2f}", "created_at": now, "updated_at": now,
+            })
+            rows.append(row)
+        session.execute(insert(Material), rows)
+    session.commit()
+
+
+def measure(engine, label: str, load, repeat: int):
+    """Median der Laufzeit und Speicher-Spitze bis zur fertigen Liste"""
+    timings = []
+    for _ in range(repeat):
+        with Session(engine) as session:
+            started = time.perf_counter()
+            rows = load(session)
+            timings.append((time.perf_counter() - started) * 1000)
+            count = len(rows)
+            del rows
+    # Speicher in einem eigenen Lauf - tracemalloc verfälscht die Laufzeit
+    with Session(engine) as session:
+        tracemalloc.start()
+        rows = load(session)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del rows
+    print(f"{label:<30} {count:7d} Zeilen  {statistics.median(timings):9.1f} ms  {peak / 1024 / 1024:8.1f} MB")
+    return statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für die Materialliste")
+    parser.add_argument("--url", default=os.environ.get("HOLZBAU_BENCH_URL"),
+                        help="SQLAlchemy-URL einer Test-Datenbank (oder HOLZBAU_BENCH_URL)")
+    parser.add_argument("--materials", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Testdaten nicht entfernen")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("--url oder HOLZBAU_BENCH_URL erforderlich")
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine, checkfirst=True)
+    tenant_id = uuid.uuid4()
+
+    with Session(engine) as session:
+        started = time.perf_counter()
+        seed(session, tenant_id, args.materials, random.Random(args.seed))
+        print(f"{args.materials} Materialien mit {len(Material.__table__.columns)} Spalten angelegt "
+              f"({(time.perf_counter() - started):.1f} s)\n")
+        sample_id = session.execute(
+            select(Material.id).where(Material.tenant_id == tenant_id).limit(1)
+        ).scalar()
+
+    base = select(Material).where(
+        Material.tenant_id == tenant_id, Material.is_deleted == False, Material.is_active == True
+    ).order_by(Material.name)
+    try:
+        print(f"{'Variante':<30} {'':>13}  {'Median':>9}     {'Speicher':>8}")
+        full_ms, full_peak = measure(
+            engine, "select(Material)", lambda s: s.execute(base).scalars().all(), args.repeat
+        )
+        measure(
+            engine, "load_only(Anzeigespalten)",
+            lambda s: s.execute(base.options(load_only(*MATERIAL_LIST_COLUMNS))).scalars().all(), args.repeat
+        )
+        rows_ms, rows_peak = measure(
+            engine, "Projektion materials.list",
+            lambda s: registry.execute(s, "materials.list", tenant_id=tenant_id).all(), args.repeat
+        )
+        print(f"\nProjektion gegenüber voller Entität: {full_ms / max(rows_ms, 0.001):.1f}x schneller, "
+              f"{full_peak / max(rows_peak, 1):.1f}x weniger Speicher")
+
+        timings = []
+        for _ in range(args.repeat):
+            with Session(engine) as session:
+                started = time.perf_counter()
+                session.get(Material, sample_id)
+                timings.append((time.perf_counter() - started) * 1000)
+        print(f"Dialog öffnen (session.get):   {statistics.median(timings):.2f} ms")
+    finally:
+        if not args.keep:
+            with Session(engine) as session:
+                session.execute(delete(Material).where(Material.tenant_id == tenant_id))
+                session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Vektorisierter Lohnlauf
+
+Legt in einer Test-Datenbank einen Mandanten mit N Mitarbeitern (Standard 300)
+samt Gehältern, Bestandteilen, Zeiterfassung, Sonderzahlungen, Vorschüssen,
+Darlehen und Pfändungen an, führt den Lohnlauf zweimal aus (der zweite Lauf
+ersetzt die Abrechnungen des ersten) und gibt die Laufzeiten aus. Die Daten
+werden mit festem Seed erzeugt und nach dem Lauf wieder entfernt.
+
+Aufruf (nur gegen eine leere Test-Datenbank!):
+    python benchmarks/payroll_run.py --url postgresql+psycopg2://user:pw@localhost/erp_bench
+    python benchmarks/payroll_run.py --url ... --employees 1000 --compare-loop
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from sqlalchemy import create_engine, insert, delete
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.database import Base
+from shared.models import (
+    Employee, TimeEntry, PayrollPeriod, SalaryComponent, EmployeeSalary,
+    EmployeeSalaryComponent, Payslip, PayslipItem, BonusPayment, EmployeeAdvance,
+    EmployeeLoan, Garnishment
+)
+from shared.models.employee import EmploymentType, EmployeeStatus
+from app.services.payroll_service import PayrollService
+
+
+def seed(session, tenant_id, employees: int, year: int, month: int, rng):
+    """Erzeugt reproduzierbare Stammdaten für einen Mandanten"""
+    now = datetime.utcnow()
+    common = {"tenant_id": tenant_id, "created_at": now, "updated_at": now}
+
+    employee_rows, salary_rows = [], []
+    for i in range(employees):
+        minijob = rng.random() < 0.05
+        hourly = not minijob and rng.random() < 0.4
+        employee_rows.append({
+            **common, "id": uuid.uuid4(), "is_deleted": False,
+            "employee_number": f"B{i:05d}", "first_name": f"Vorname{i}", "last_name": f"Nachname{i}",
+            "status": EmployeeStatus.ACTIVE,
+            "employment_type": EmploymentType.MINIJOB if minijob else EmploymentType.VOLLZEIT,
+            "date_of_birth": date(1960, 1, 1) + timedelta(days=int(rng.integers(0, 15000))),
+            "number_of_children": int(rng.choice([0, 0, 1, 2, 3])),
+            "tax_class": str(rng.choice([1, 1, 1, 2, 3, 4, 5, 6])),
+            "church_tax": bool(rng.random() < 0.5),
+            "health_insurance": str(rng.choice(["AOK", "TK", "BARMER", "IKK"])),
+            "health_insurance_type": "privat" if rng.random() < 0.05 else "gesetzlich",
+            "iban": "DE89370400440532013000",
+        })
+        salary_rows.append({
+            **common, "id": uuid.uuid4(), "is_deleted": False, "is_active": True,
+            "employee_id": employee_rows[-1]["id"], "valid_from": date(year - 1, 1, 1),
+            "salary_type": "hourly" if hourly else "monthly",
+            "base_salary": Decimal(0) if hourly else Decimal(520 if minijob else int(rng.integers(2200, 7500))),
+            "hourly_rate": Decimal(f"{rng.uniform(16, 32):.2f}") if hourly else None,
+            "weekly_hours": Decimal(40),
+            "fixed_allowances": {"Werkzeuggeld": 25} if rng.random() < 0.3 else {},
+        })
+    session.execute(insert(Employee), employee_rows)
+    session.execute(insert(EmployeeSalary), salary_rows)
+
+    components = [
+        {**common, "id": uuid.uuid4(), "is_deleted": False, "is_active": True, "name": name, "code": code,
+         "component_type": ctype, "sub_type": sub_type, "is_taxable": taxable, "is_sv_liable": sv}
+        for name, code, ctype, sub_type, taxable, sv in [
+            ("Erschwerniszulage", "ERSCHW", "earning", None, True, True),
+            ("Fahrtkostenzuschuss", "FAHRT", "earning", None, False, False),
+            ("bAV Entgeltumwandlung", "BAV", "deduction", "company_pension", False, False),
+            ("VWL Arbeitgeber", "VWL", "employer_contribution", None, False, False),
+        ]
+    ]
+    session.execute(insert(SalaryComponent), components)
+    assignments = []
+    for salary in salary_rows:
+        for component in components:
+            if rng.random() < 0.35:
+                assignments.append({
+                    **common, "id": uuid.uuid4(), "is_active": True, "salary_id": salary["id"],
+                    "component_id": component["id"], "amount": Decimal(int(rng.integers(20, 200)))
+                })
+    if assignments:
+        session.execute(insert(EmployeeSalaryComponent), assignments)
+
+    start = date(year, month, 1)
+    days = [d for d in (start + timedelta(days=k) for k in range(28)) if d.weekday() < 5]
+    time_rows = [
+        {**common, "id": uuid.uuid4(), "employee_id": e["id"], "work_date": d,
+         "hours": "8", "overtime_hours": str(rng.choice(["0", "0", "0", "1", "1,5"])), "status": "approved"}
+        for e, s in zip(employee_rows, salary_rows) if s["salary_type"] == "hourly" for d in days
+    ]
+    if time_rows:
+        session.execute(insert(TimeEntry), time_rows)
+
+    extras = {BonusPayment: [], EmployeeAdvance: [], EmployeeLoan: [], Garnishment: []}
+    for i, e in enumerate(employee_rows):
+        base = {**common, "id": uuid.uuid4(), "is_deleted": False, "employee_id": e["id"]}
+        draw = rng.random()
+        if draw < 0.15:
+            extras[BonusPayment].append({
+                **base, "bonus_type": "bonus", "name": "Leistungsbonus", "status": "approved",
+                "gross_amount": Decimal(int(rng.integers(200, 3000))),
+                "taxation_method": str(rng.choice(["normal", "fifth_rule"])),
+                "planned_payment_date": date(year, month, 15),
+            })
+        elif draw < 0.22:
+            extras[EmployeeAdvance].append({
+                **base, "advance_number": f"V{i:05d}", "advance_date": date(year, 1, 1),
+                "amount": Decimal(1000), "repayment_amount": Decimal(200),
+                "amount_remaining": Decimal(600), "status": "active", "repayment_method": "deduction",
+            })
+        elif draw < 0.27:
+            extras[EmployeeLoan].append({
+                **base, "loan_number": f"D{i:05d}", "loan_date": date(year - 1, 6, 1),
+                "principal_amount": Decimal(5000), "term_months": 24, "monthly_payment": Decimal(215),
+                "first_payment_date": date(year - 1, 7, 1), "amount_remaining": Decimal(3000), "status": "active",
+            })
+        elif draw < 0.30:
+            extras[Garnishment].append({
+                **base, "case_number": f"M{i:05d}/25", "creditor": "Gläubiger GmbH", "garnishment_type": "wage",
+                "use_garnishment_table": True, "dependents_count": int(rng.integers(0, 3)),
+                "effective_date": date(year, 1, 1), "amount_remaining": Decimal(8000),
+                "priority": 1, "status": "active",
+            })
+    for model, rows in extras.items():
+        if rows:
+            session.execute(insert(model), rows)
+    session.commit()
+
+
+def cleanup(session, tenant_id):
+    """Entfernt alle Daten des Benchmark-Mandanten"""
+    for model in (PayslipItem, Payslip, PayrollPeriod, EmployeeSalaryComponent, SalaryComponent,
+                  EmployeeSalary, BonusPayment, EmployeeAdvance, EmployeeLoan, Garnishment,
+                  TimeEntry, Employee):
+        session.execute(delete(model).where(model.tenant_id == tenant_id))
+    session.commit()
+
+
+def compare_loop(service, session, tenant_id, year, month):
+    """Vergleich: dieselbe Berechnung je Mitarbeiter einzeln aufgerufen"""
+    period = service.get_or_create_period(session, tenant_id, year, month)
+    employee_ids = [row[0] for row in session.query(Employee.id).filter(Employee.tenant_id == tenant_id)]
+    inputs = service.load_inputs(session, period)
+
+    started = time.perf_counter()
+    service.calculate(inputs)
+    vectorized_ms = (time.perf_counter() - started) * 1000
+
+    per_employee = [service.load_inputs(session, period, [employee_id]) for employee_id in employee_ids]
+    started = time.perf_counter()
+    for single in per_employee:
+        service.calculate(single)
+    loop_ms = (time.perf_counter() - started) * 1000
+    print(f"  Berechnung vektorisiert: {vectorized_ms:8.1f} ms")
+    print(f"  Berechnung je Mitarbeiter: {loop_ms:8.1f} ms  (Faktor {loop_ms / max(vectorized_ms, 0.001):.0f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für den vektorisierten Lohnlauf")
+    parser.add_argument("--url", default=os.environ.get("HOLZBAU_BENCH_URL"),
+                        help="SQLAlchemy-URL einer Test-Datenbank (oder HOLZBAU_BENCH_URL)")
+    parser.add_argument("--employees", type=int, default=300)
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=11)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--compare-loop", action="store_true",
+                        help="Zusätzlich die Berechnung je Mitarbeiter messen")
+    parser.add_argument("--keep", action="store_true", help="Testdaten nicht entfernen")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("--url oder HOLZBAU_BENCH_URL erforderlich")
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine, checkfirst=True)
+    tenant_id = uuid.uuid4()
+    rng = np.random.default_rng(args.seed)
+    service = PayrollService()
+
+    with Session(engine) as session:
+        started = time.perf_counter()
+        seed(session, tenant_id, args.employees, args.year, args.month, rng)
+        print(f"Testdaten für {args.employees} Mitarbeiter angelegt ({(time.perf_counter() - started):.2f} s)")
+
+        try:
+            for label in ("Erster Lauf", "Wiederholung"):
+                started = time.perf_counter()
+                summary = service.run_period(session, tenant_id, args.year, args.month)
+                session.commit()
+                elapsed = time.perf_counter() - started
+                t = summary["timings"]
+                print(f"{label}: {summary['payslips']} Abrechnungen, {summary['items']} Positionen, "
+                      f"{summary['replaced']} ersetzt in {elapsed:.2f} s "
+                      f"(laden {t['load_ms']:.0f} ms, aufbereiten {t['prepare_ms']:.0f} ms, "
+                      f"rechnen {t['calculate_ms']:.0f} ms, schreiben {t['write_ms']:.0f} ms)")
+            print(f"  Brutto {summary['gross_total']:,.2f} €  Netto {summary['net_total']:,.2f} €  "
+                  f"Steuern {summary['tax_total']:,.2f} €  AG-Kosten {summary['employer_total']:,.2f} €")
+            if args.compare_loop:
+                compare_loop(service, session, tenant_id, args.year, args.month)
+        finally:
+            if not args.keep:
+                session.rollback()
+                cleanup(session, tenant_id)
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
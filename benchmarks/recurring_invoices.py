@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Abo-Rechnungen
+
+Legt in einer Test-Datenbank N Abo-Vorlagen (Standard 5.000, verteilt auf
+mehrere Mandanten, 1-6 Positionen, monatlich/vierteljährlich/jährlich) samt
+Kunden an, führt den Rechnungslauf zum Stichtag aus und wiederholt ihn - der
+zweite Lauf darf nichts anlegen. Anschließend werden die Vorlagen auf ihren
+Startzeitpunkt zurückgesetzt: auch dieser Lauf darf keine Rechnung doppelt
+erzeugen. Die Daten werden mit festem Seed erzeugt und danach entfernt.
+
+Aufruf (nur gegen eine leere Test-Datenbank!):
+    python benchmarks/recurring_invoices.py --url postgresql+psycopg2://user:pw@localhost/erp_bench
+    python benchmarks/recurring_invoices.py --url ... --templates 20000 --tenants 10
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime
+
+from sqlalchemy import create_engine, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.database import Base
+from shared.models import Customer, Invoice, InvoiceItem, RecurringInvoice, RecurringInvoiceItem
+from app.services.recurring_invoice_service import RecurringInvoiceService
+
+
+SERVICES = [
+    ("Wartung Holzfassade", "pausch", "89,00", "19"),
+    ("Inspektion Dachtragwerk", "pausch", "145,00", "19"),
+    ("Miete Gerüst", "Wo", "210,00", "19"),
+    ("Miete Bauwagen", "Mon", "320,00", "19"),
+    ("Pflege Holzterrasse", "m²", "4,60", "19"),
+    ("Brennholz Abo", "rm", "92,00", "7"),
+]
+
+
+def seed(session, tenant_ids, templates: int, rng: random.Random):
+    """Erzeugt reproduzierbare Kunden, Vorlagen und Positionen"""
+    now = datetime.utcnow()
+    customers, recurring, items = [], [], []
+    for i in range(templates):
+        common = {"tenant_id": tenant_ids[i % len(tenant_ids)], "created_at": now, "updated_at": now}
+        customer_id, recurring_id = uuid.uuid4(), uuid.uuid4()
+        customers.append({
+            **common, "id": customer_id, "is_deleted": False, "customer_number": f"K{i:06d}",
+            "company_name": f"Kunde {i} GmbH", "street": "Sägewerkstraße", "street_number": str(rng.randint(1, 99)),
+            "postal_code": "79100", "city": "Freiburg",
+        })
+        recurring.append({
+            **common, "id": recurring_id, "is_deleted": False, "is_active": True, "customer_id": customer_id,
+            "name": f"Wartungsvertrag {i}", "frequency": rng.choice(["monthly", "monthly", "quarterly", "yearly"]),
+            "start_date": date(2025, rng.randint(1, 6), rng.choice([1, 1, 1, 15, 28])),
+            "payment_terms_days": rng.choice([14, 30]),
+        })
+        for position in range(1, rng.randint(1, 6) + 1):
+            title, unit, price, tax_rate = rng.choice(SERVICES)
+            items.append({
+                "id": uuid.uuid4(), "recurring_invoice_id": recurring_id, "position": position,
+                "title": title, "quantity": str(rng.randint(1, 20)), "unit": unit,
+                "unit_price": price, "tax_rate": tax_rate, "created_at": now, "updated_at": now,
+            })
+    session.execute(insert(Customer), customers)
+    session.execute(insert(RecurringInvoice), recurring)
+    session.execute(insert(RecurringInvoiceItem), items)
+    session.commit()
+    return len(items)
+
+
+def cleanup(session, tenant_ids):
+    """Entfernt alle Daten der Benchmark-Mandanten"""
+    invoice_ids = select(Invoice.id).where(Invoice.tenant_id.in_(tenant_ids))
+    recurring_ids = select(RecurringInvoice.id).where(RecurringInvoice.tenant_id.in_(tenant_ids))
+    session.execute(delete(InvoiceItem).where(InvoiceItem.invoice_id.in_(invoice_ids)))
+    session.execute(delete(Invoice).where(Invoice.tenant_id.in_(tenant_ids)))
+    session.execute(delete(RecurringInvoiceItem).where(RecurringInvoiceItem.recurring_invoice_id.in_(recurring_ids)))
+    session.execute(delete(RecurringInvoice).where(RecurringInvoice.tenant_id.in_(tenant_ids)))
+    session.execute(delete(Customer).where(Customer.tenant_id.in_(tenant_ids)))
+    session.commit()
+
+
+def report(label: str, summary: dict):
+    rate = summary["invoices"] / summary["seconds"] if summary["seconds"] else 0
+    print(f"{label:<24} {summary['invoices']:7d} Rechnungen, {summary['items']:7d} Positionen, "
+          f"{summary['templates']:6d} Vorlagen  {summary['seconds']:7.2f} s  ({rate:.0f} Rechnungen/s)")
+    if summary["errors"]:
+        print(f"  Fehler: {summary['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark für Abo-Rechnungen")
+    parser.add_argument("--url", default=os.environ.get("HOLZBAU_BENCH_URL"),
+                        help="SQLAlchemy-URL einer Test-Datenbank (oder HOLZBAU_BENCH_URL)")
+    parser.add_argument("--templates", type=int, default=5000)
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--run-date", default="2025-11-30", help="Stichtag (JJJJ-MM-TT)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="Testdaten nicht entfernen")
+    args = parser.parse_args()
+    if not args.url:
+        parser.error("--url oder HOLZBAU_BENCH_URL erforderlich")
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine, checkfirst=True)
+    tenant_ids = [uuid.uuid4() for _ in range(args.tenants)]
+    run_date = date.fromisoformat(args.run_date)
+    service = RecurringInvoiceService()
+
+    with Session(engine) as session:
+        started = time.perf_counter()
+        item_count = seed(session, tenant_ids, args.templates, random.Random(args.seed))
+        print(f"{args.templates} Vorlagen mit {item_count} Positionen für {args.tenants} Mandanten angelegt "
+              f"({(time.perf_counter() - started):.2f} s)")
+
+        try:
+            preview = service.preview(session, run_date)
+            session.commit()
+            print(f"Vorschau: {preview['invoices']} Rechnungen aus {preview['templates']} Vorlagen")
+
+            first = service.run(session, run_date)
+            report("Erster Lauf", first)
+            report("Wiederholung", service.run(session, run_date))
+
+            session.execute(
+                update(RecurringInvoice).where(RecurringInvoice.tenant_id.in_(tenant_ids))
+                .values(next_invoice_date=None)
+            )
+            session.commit()
+            report("Vorlagen zurückgesetzt", service.run(session, run_date))
+
+            invoices = session.execute(
+                select(func.count(Invoice.id)).where(Invoice.tenant_id.in_(tenant_ids))
+            ).scalar()
+            numbers = first["invoice_numbers"]
+            print(f"Rechnungen insgesamt: {invoices} (erwartet {preview['invoices']}), "
+                  f"Nummern {numbers[0] if numbers else '-'} bis {numbers[-1] if numbers else '-'}")
+        finally:
+            if not args.keep:
+                cleanup(session, tenant_ids)
+
+
+if __name__ == "__main__":
+    main()
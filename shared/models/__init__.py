@@ -6,7 +6,7 @@ from shared.database import Base
 
 # Auth Models
 from shared.models.auth import (
-    User, Role, Permission, RefreshToken, Tenant,
+    User, Role, Permission, RefreshToken, Tenant, UserConsent,
     user_roles, role_permissions
 )
 
@@ -19,7 +19,7 @@ from shared.models.customer import (
 # Project Models
 from shared.models.project import (
     Project, ProjectPhase, ProjectTask, ProjectDocument, ProjectTeamMember,
-    ProjectType, ProjectStatus, ConstructionType
+    ProjectCostSummary, ProjectType, ProjectStatus, ConstructionType
 )
 
 # Inventory Models
@@ -77,7 +77,7 @@ from shared.models.quality import (
 from shared.models.telemetry import (
     TelemetryEvent, SystemMetric, PerformanceTrace, ErrorLog,
     UserSession, UserActivity, AuditLog, FeatureUsage, SystemHealth, Alert,
-    ReportSchedule, EventSeverity, EventCategory, MetricType
+    TelemetryRollup, ReportSchedule, EventSeverity, EventCategory, MetricType
 )
 
 # Accounting Models
@@ -93,7 +93,7 @@ from shared.models.accounting import (
 from shared.models.payroll import (
     PayrollPeriod, SalaryComponent, EmployeeSalary, EmployeeSalaryComponent,
     Payslip, PayslipItem, BonusPayment, EmployeeAdvance, AdvanceRepayment,
-    EmployeeLoan, Garnishment, SocialSecurityReport, TaxPayrollReport,
+    EmployeeLoan, EmployeeLoanInstallment, Garnishment, SocialSecurityReport, TaxPayrollReport,
     CompanyPensionPlan, PensionEnrollment,
     PayrollStatus, PaymentMethod as PayrollPaymentMethod, DeductionType, AllowanceType
 )
@@ -113,7 +113,7 @@ __all__ = [
     "Base",
     
     # Auth
-    "User", "Role", "Permission", "RefreshToken", "Tenant",
+    "User", "Role", "Permission", "RefreshToken", "Tenant", "UserConsent",
     "user_roles", "role_permissions",
     
     # Customer
@@ -122,7 +122,7 @@ __all__ = [
     
     # Project
     "Project", "ProjectPhase", "ProjectTask", "ProjectDocument", "ProjectTeamMember",
-    "ProjectType", "ProjectStatus", "ConstructionType",
+    "ProjectCostSummary", "ProjectType", "ProjectStatus", "ConstructionType",
     
     # Inventory
     "Material", "Supplier", "SupplierArticle",
@@ -162,7 +162,7 @@ __all__ = [
     # Telemetry
     "TelemetryEvent", "SystemMetric", "PerformanceTrace", "ErrorLog",
     "UserSession", "UserActivity", "AuditLog", "FeatureUsage", "SystemHealth", "Alert",
-    "ReportSchedule", "EventSeverity", "EventCategory", "MetricType",
+    "TelemetryRollup", "ReportSchedule", "EventSeverity", "EventCategory", "MetricType",
     
     # Accounting
     "ChartOfAccounts", "Account", "CostCenter", "CostObject",
@@ -174,7 +174,7 @@ __all__ = [
     # Payroll
     "PayrollPeriod", "SalaryComponent", "EmployeeSalary", "EmployeeSalaryComponent",
     "Payslip", "PayslipItem", "BonusPayment", "EmployeeAdvance", "AdvanceRepayment",
-    "EmployeeLoan", "Garnishment", "SocialSecurityReport", "TaxPayrollReport",
+    "EmployeeLoan", "EmployeeLoanInstallment", "Garnishment", "SocialSecurityReport", "TaxPayrollReport",
     "CompanyPensionPlan", "PensionEnrollment",
     "PayrollStatus", "PayrollPaymentMethod", "DeductionType", "AllowanceType",
     
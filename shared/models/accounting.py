@@ -2,7 +2,7 @@
 Accounting Models - Umfassende Buchhaltung für Holzbau-ERP
 Enthält: Kontenrahmen, Buchungen, Kostenstellen, Steuer
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time, Numeric, UniqueConstraint
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time, Numeric, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
@@ -360,6 +360,11 @@ class Journal(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixin):
     tags = Column(ARRAY(String), default=list)
     custom_fields = Column(JSONB, default=dict)
     
+    __table_args__ = (
+        Index('ix_journals_tenant_source', 'tenant_id', 'source_type', 'source_id'),
+        Index('ix_journals_tenant_posting_date', 'tenant_id', 'posting_date'),
+    )
+    
     # Relationships
     fiscal_period = relationship("FiscalPeriod", back_populates="journals")
     items = relationship("JournalItem", back_populates="journal", cascade="all, delete-orphan")
@@ -407,6 +412,13 @@ class JournalItem(Base, TimestampMixin, TenantMixin):
     
     custom_fields = Column(JSONB, default=dict)
     
+    __table_args__ = (
+        # Steuerpositionen je Journal für die Umsatzsteuer-Voranmeldung (Index-Only-Scan)
+        Index('ix_journal_items_journal_tax', 'journal_id', 'tax_type',
+              postgresql_include=['debit', 'credit', 'tax_amount', 'tax_account_id', 'account_id'],
+              postgresql_where=text("tax_type IS NOT NULL")),
+    )
+    
     # Relationships
     journal = relationship("Journal", back_populates="items")
     account = relationship("Account", back_populates="journal_items", foreign_keys=[account_id])
@@ -765,6 +777,10 @@ class DepreciationEntry(Base, TimestampMixin, TenantMixin):
     
     notes = Column(Text, nullable=True)
     
+    __table_args__ = (
+        Index('ix_depreciation_entries_asset_date', 'fixed_asset_id', 'depreciation_date'),
+    )
+    
     # Relationships
     fixed_asset = relationship("FixedAsset", back_populates="depreciation_entries")
     journal = relationship("Journal")
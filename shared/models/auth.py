@@ -1,7 +1,7 @@
 """
 User and Authentication Models
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Table
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Table, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -113,6 +113,23 @@ class RefreshToken(Base, TimestampMixin):
     user = relationship("User", back_populates="refresh_tokens")
 
 
+class UserConsent(Base, TimestampMixin):
+    """Einwilligung eines Benutzers zu einer Tracking-Art (DSGVO)"""
+    __tablename__ = "user_consents"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    consent_type = Column(String(50), nullable=False)  # analytics, telemetry, ...
+    granted = Column(Boolean, nullable=False, default=False)
+    granted_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+    policy_version = Column(String(20), nullable=True)  # Stand der Datenschutzerklärung
+    
+    __table_args__ = (
+        UniqueConstraint('user_id', 'consent_type', name='uq_user_consents_user_type'),
+    )
+
+
 class Tenant(Base, TimestampMixin, SoftDeleteMixin):
     """Tenant model for multi-company support - Enterprise Holzbau"""
     __tablename__ = "tenants"
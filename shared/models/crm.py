@@ -2,7 +2,7 @@
 CRM Models - Aktivitäten, Kommunikation, Leads
 Enterprise-Level für Holzbau
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
@@ -225,6 +225,11 @@ class Lead(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixin):
     tags = Column(ARRAY(String), default=list)
     custom_fields = Column(JSONB, default=dict)
     
+    # Pipeline-Auswertung: Mandant + Zeitraum, gruppiert nach Status
+    __table_args__ = (
+        Index('ix_leads_tenant_created_status', 'tenant_id', 'created_at', 'status'),
+    )
+
     # === RELATIONSHIPS ===
     assigned_to = relationship("Employee", foreign_keys=[assigned_to_id])
     converted_customer = relationship("Customer", foreign_keys=[converted_customer_id])
@@ -1,7 +1,7 @@
 """
 Employee Models - Mitarbeiterverwaltung
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time, Numeric, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
@@ -296,6 +296,9 @@ class TimeEntry(Base, TimestampMixin, TenantMixin):
     is_billable = Column(Boolean, default=True)
     hourly_rate = Column(String(20), nullable=True)
     
+    # Kostensatz zum Buchungszeitpunkt (Projekt-Controlling)
+    cost_rate = Column(Numeric(10, 2), nullable=True)
+    
     # Status
     status = Column(String(50), default="pending")  # pending, approved, rejected
     approved_by = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=True)
@@ -303,6 +306,10 @@ class TimeEntry(Base, TimestampMixin, TenantMixin):
     
     notes = Column(Text, nullable=True)
     
+    __table_args__ = (
+        Index('ix_time_entries_project', 'project_id'),
+    )
+    
     # Relationships
     employee = relationship("Employee", back_populates="time_entries")
     project = relationship("Project", back_populates="time_entries")
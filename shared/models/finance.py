@@ -2,7 +2,7 @@
 Finance Models - Umfassende Finanzverwaltung für Holzbau-ERP
 Enthält: Zahlungen, Bankkonten, Mahnwesen, Liquiditätsplanung
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time, Numeric, UniqueConstraint
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time, Numeric, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
@@ -264,6 +264,7 @@ class Payment(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixin):
     
     __table_args__ = (
         UniqueConstraint('tenant_id', 'payment_number', name='uq_payment_number'),
+        Index('ix_payments_sepa_batch', 'sepa_batch_id'),
     )
     
     # Relationships
@@ -391,6 +392,9 @@ class SepaBatch(Base, TimestampMixin, TenantMixin, AuditMixin):
 class DunningRun(Base, TimestampMixin, TenantMixin, AuditMixin):
     """Mahnlauf"""
     __tablename__ = "dunning_runs"
+    __table_args__ = (
+        Index('ix_dunning_runs_tenant_reference', 'tenant_id', 'reference_date'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -473,6 +477,7 @@ class DunningNotice(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMix
     
     __table_args__ = (
         UniqueConstraint('tenant_id', 'notice_number', name='uq_dunning_notice_number'),
+        Index('ix_dunning_notices_run', 'dunning_run_id'),
     )
     
     # Relationships
@@ -484,6 +489,10 @@ class DunningNotice(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMix
 class DunningNoticeItem(Base, TimestampMixin, TenantMixin):
     """Mahnposition (einzelne Rechnung in der Mahnung)"""
     __tablename__ = "dunning_notice_items"
+    __table_args__ = (
+        Index('ix_dunning_notice_items_notice', 'notice_id'),
+        Index('ix_dunning_notice_items_invoice', 'invoice_id'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     notice_id = Column(UUID(as_uuid=True), ForeignKey('dunning_notices.id'), nullable=False)
@@ -512,6 +521,10 @@ class DunningNoticeItem(Base, TimestampMixin, TenantMixin):
 class DunningBlock(Base, TimestampMixin, TenantMixin, AuditMixin):
     """Mahnsperre"""
     __tablename__ = "dunning_blocks"
+    __table_args__ = (
+        Index('ix_dunning_blocks_customer', 'customer_id'),
+        Index('ix_dunning_blocks_invoice', 'invoice_id'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
@@ -569,6 +582,9 @@ class CashFlowForecast(Base, TimestampMixin, TenantMixin, AuditMixin):
 class CashFlowForecastItem(Base, TimestampMixin, TenantMixin):
     """Einzelposition der Liquiditätsplanung"""
     __tablename__ = "cash_flow_forecast_items"
+    __table_args__ = (
+        Index('ix_cash_flow_forecast_items_forecast', 'forecast_id', 'period_date'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     forecast_id = Column(UUID(as_uuid=True), ForeignKey('cash_flow_forecasts.id'), nullable=False)
@@ -744,7 +760,7 @@ class Loan(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixin):
     )
     
     # Relationships
-    payments = relationship("LoanPayment", back_populates="loan")
+    payments = relationship("LoanPayment", back_populates="loan", order_by="LoanPayment.payment_number")
 
 
 class LoanPayment(Base, TimestampMixin, TenantMixin):
@@ -779,6 +795,15 @@ class LoanPayment(Base, TimestampMixin, TenantMixin):
     
     notes = Column(Text, nullable=True)
     
+    __table_args__ = (
+        Index('ix_loan_payments_loan_number', 'loan_id', 'payment_number'),
+        # Offene Raten eines Zeitraums als Index-Only-Scan summieren
+        Index('ix_loan_payments_open_due', 'tenant_id', 'due_date',
+              postgresql_include=['loan_id', 'payment_amount', 'principal_amount', 'interest_amount',
+                                  'fee_amount', 'paid_amount'],
+              postgresql_where=text("status IN ('scheduled', 'overdue')")),
+    )
+    
     # Relationships
     loan = relationship("Loan", back_populates="payments")
 
@@ -2,8 +2,8 @@
 Fleet & Equipment Models - Fahrzeuge und Geräte/Maschinen
 Enterprise-Level für Holzbau
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Numeric
-from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Numeric, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY, TSRANGE
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
 import uuid
@@ -508,6 +508,10 @@ class EquipmentReservation(Base, TimestampMixin, TenantMixin):
     reserved_by_id = Column(UUID(as_uuid=True), ForeignKey('employees.id'), nullable=False)
     reserved_for_id = Column(UUID(as_uuid=True), ForeignKey('employees.id'), nullable=True)
     
+    # Belegter Zeitraum [Beginn, Ende) - gepflegt vom ReservationService,
+    # Doppelbuchungen verhindern die Exclusion-Constraints unten
+    period = Column(TSRANGE, nullable=True)
+    
     # Status
     status = Column(String(50), default="pending")  # pending, confirmed, cancelled, completed
     
@@ -519,3 +523,35 @@ class EquipmentReservation(Base, TimestampMixin, TenantMixin):
     project = relationship("Project")
     reserved_by = relationship("Employee", foreign_keys=[reserved_by_id])
     reserved_for = relationship("Employee", foreign_keys=[reserved_for_id])
+
+
+# Exclusion-Constraints je Fahrzeug bzw. Gerät: überlappende aktive Zeiträume
+# sind ausgeschlossen, stornierte Reservierungen zählen nicht
+RESERVATION_EXCLUSIONS = (
+    ("vehicle_id", "ex_reservations_vehicle_period"),
+    ("equipment_id", "ex_reservations_equipment_period"),
+)
+
+
+def reservation_exclusion_ddl(column: str, name: str) -> str:
+    return (
+        f"ALTER TABLE equipment_reservations ADD CONSTRAINT {name} "
+        f"EXCLUDE USING gist ({column} WITH =, period WITH &&) "
+        "WHERE (COALESCE(status, 'pending') <> 'cancelled')"
+    )
+
+
+# UUID-Gleichheit im GiST-Index benötigt btree_gist. Fehlt die Erweiterung oder
+# das Recht sie anzulegen, entsteht die Tabelle ohne Constraints; die Migration
+# im DatabaseService versucht es beim nächsten Start erneut.
+event.listen(
+    EquipmentReservation.__table__, "after_create",
+    DDL(
+        "DO $$ BEGIN "
+        "BEGIN CREATE EXTENSION IF NOT EXISTS btree_gist; "
+        "EXCEPTION WHEN OTHERS THEN RAISE WARNING 'btree_gist nicht verfügbar: %%', SQLERRM; END; "
+        "IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'btree_gist') THEN "
+        + " ".join(reservation_exclusion_ddl(column, name) + ";" for column, name in RESERVATION_EXCLUSIONS)
+        + " END IF; END $$"
+    ).execute_if(dialect="postgresql")
+)
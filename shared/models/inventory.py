@@ -1,7 +1,7 @@
 """
 Inventory Models - Materialverwaltung für Holzbau
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Numeric
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Numeric, Index, func
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -281,6 +281,9 @@ class Supplier(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixin):
 class SupplierArticle(Base, TimestampMixin):
     """Lieferanten-Artikel-Zuordnung (Einkaufspreise pro Lieferant)"""
     __tablename__ = "supplier_articles"
+    __table_args__ = (
+        Index('uq_supplier_articles_supplier_number', 'supplier_id', 'supplier_article_number', unique=True),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     supplier_id = Column(UUID(as_uuid=True), ForeignKey('suppliers.id'), nullable=False)
@@ -299,6 +302,9 @@ class SupplierArticle(Base, TimestampMixin):
     valid_from = Column(Date, nullable=True)
     valid_until = Column(Date, nullable=True)
     
+    # Katalogimport: Hash der Beschreibung (16 Zeichen) + Hash der Preise (16 Zeichen)
+    catalog_hash = Column(String(32), nullable=True)
+    
     # Relationships
     supplier = relationship("Supplier", back_populates="supplier_articles")
     material = relationship("Material", back_populates="supplier_articles")
@@ -371,6 +377,15 @@ class StockLevel(Base, TimestampMixin):
     last_counted_at = Column(DateTime, nullable=True)
     last_counted_by = Column(UUID(as_uuid=True), nullable=True)
     
+    __table_args__ = (
+        # Eine Zeile je Material, Lagerplatz und Charge - Ziel für ON CONFLICT der Lagerbuchung
+        Index(
+            'uq_stock_levels_material_location_batch',
+            material_id, location_id, func.coalesce(batch_number, ''),
+            unique=True
+        ),
+    )
+    
     # Relationships
     material = relationship("Material", back_populates="stock_levels")
     location = relationship("WarehouseLocation", back_populates="stock_levels")
@@ -388,6 +403,7 @@ class StockMovement(Base, TimestampMixin, TenantMixin):
     
     quantity = Column(String(20), nullable=False)
     unit = Column(String(20), nullable=False)
+    unit_cost = Column(Numeric(15, 4), nullable=True)  # Einstandspreis zum Buchungszeitpunkt
     
     from_location_id = Column(UUID(as_uuid=True), ForeignKey('warehouse_locations.id'), nullable=True)
     to_location_id = Column(UUID(as_uuid=True), ForeignKey('warehouse_locations.id'), nullable=True)
@@ -403,6 +419,10 @@ class StockMovement(Base, TimestampMixin, TenantMixin):
     performed_by = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=True)
     performed_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        Index('ix_stock_movements_reference', 'reference_type', 'reference_id'),
+    )
+    
     # Relationships
     material = relationship("Material")
     from_location = relationship("WarehouseLocation", foreign_keys=[from_location_id])
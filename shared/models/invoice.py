@@ -1,7 +1,7 @@
 """
 Invoice Models - Rechnungsverwaltung
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
@@ -49,13 +49,17 @@ class PaymentMethod(enum.Enum):
 class Invoice(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixin):
     """Rechnung"""
     __tablename__ = "invoices"
+    __table_args__ = (
+        Index('uq_invoices_recurring_period', 'recurring_invoice_id', 'recurring_period_start', unique=True),
+        Index('ix_invoices_tenant_due_date', 'tenant_id', 'due_date'),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     invoice_number = Column(String(50), nullable=False, unique=True, index=True)
     
     # Relations
     customer_id = Column(UUID(as_uuid=True), ForeignKey('customers.id'), nullable=False)
-    project_id = Column(UUID(as_uuid=True), ForeignKey('projects.id'), nullable=True)
+    project_id = Column(UUID(as_uuid=True), ForeignKey('projects.id'), nullable=True, index=True)
     order_id = Column(UUID(as_uuid=True), ForeignKey('orders.id'), nullable=True)
     
     # Type & Status
@@ -71,6 +75,10 @@ class Invoice(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixin):
     # Reference to partial/final invoicing
     parent_invoice_id = Column(UUID(as_uuid=True), ForeignKey('invoices.id'), nullable=True)
     
+    # Aus Abo-Vorlage erzeugt: Vorlage + Beginn des Leistungszeitraums (je Periode nur eine Rechnung)
+    recurring_invoice_id = Column(UUID(as_uuid=True), ForeignKey('recurring_invoices.id'), nullable=True)
+    recurring_period_start = Column(Date, nullable=True)
+    
     # Reference
     reference = Column(String(255), nullable=True)
     subject = Column(String(255), nullable=True)
@@ -2,7 +2,7 @@
 Payroll Models - Umfassende Lohnverwaltung für Holzbau-ERP
 Enthält: Lohnabrechnungen, Abzüge, Zulagen, Sozialversicherung
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time, Numeric, UniqueConstraint
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Time, Numeric, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
@@ -397,6 +397,7 @@ class Payslip(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixin):
     
     __table_args__ = (
         UniqueConstraint('tenant_id', 'payslip_number', name='uq_payslip_number'),
+        Index('ix_payslips_period_employee', 'payroll_period_id', 'employee_id'),
     )
     
     # Relationships
@@ -443,6 +444,10 @@ class PayslipItem(Base, TimestampMixin, TenantMixin):
     
     notes = Column(Text, nullable=True)
     
+    __table_args__ = (
+        Index('ix_payslip_items_payslip', 'payslip_id'),
+    )
+    
     # Relationships
     payslip = relationship("Payslip", back_populates="items")
     component = relationship("SalaryComponent")
@@ -593,6 +598,45 @@ class EmployeeLoan(Base, TimestampMixin, SoftDeleteMixin, TenantMixin, AuditMixi
     
     # Relationships
     employee = relationship("Employee")
+    installments = relationship("EmployeeLoanInstallment", back_populates="loan",
+                                order_by="EmployeeLoanInstallment.installment_number")
+
+
+class EmployeeLoanInstallment(Base, TimestampMixin, TenantMixin):
+    """Tilgungsplan eines Mitarbeiterdarlehens - eine Zeile je Rate"""
+    __tablename__ = "employee_loan_installments"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    employee_loan_id = Column(UUID(as_uuid=True), ForeignKey('employee_loans.id'), nullable=False)
+    employee_id = Column(UUID(as_uuid=True), ForeignKey('employees.id'), nullable=False)  # für Lohnabzug je Mitarbeiter
+    
+    installment_number = Column(Integer, nullable=False)
+    due_date = Column(Date, nullable=False)
+    
+    # Beträge
+    payment_amount = Column(Numeric(15, 2), nullable=False)  # Rate
+    principal_amount = Column(Numeric(15, 2), nullable=False)  # Tilgung
+    interest_amount = Column(Numeric(15, 2), nullable=False)  # Zinsen
+    balance_after = Column(Numeric(15, 2), nullable=False)  # Restschuld nach der Rate
+    
+    # Zahlung (Lohnabzug)
+    paid_amount = Column(Numeric(15, 2), default=0)
+    payment_date = Column(Date, nullable=True)
+    payslip_id = Column(UUID(as_uuid=True), ForeignKey('payslips.id'), nullable=True)
+    
+    status = Column(String(20), default="scheduled")  # scheduled, paid, overdue, waived
+    
+    __table_args__ = (
+        UniqueConstraint('employee_loan_id', 'installment_number', name='uq_employee_loan_installment'),
+        # Offene Raten eines Zeitraums als Index-Only-Scan summieren
+        Index('ix_employee_loan_installments_open_due', 'tenant_id', 'due_date',
+              postgresql_include=['employee_id', 'payment_amount', 'principal_amount', 'interest_amount',
+                                  'paid_amount'],
+              postgresql_where=text("status IN ('scheduled', 'overdue')")),
+    )
+    
+    # Relationships
+    loan = relationship("EmployeeLoan", back_populates="installments")
 
 
 # =============================================================================
@@ -1,7 +1,7 @@
 """
 Project Models - Projektverwaltung für Holzbau
 """
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Text, Enum, Date, Integer, Numeric
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from datetime import datetime, date
@@ -424,3 +424,37 @@ class ProjectTeamMember(Base, TimestampMixin):
     # Relationships
     project = relationship("Project", back_populates="team_members")
     employee = relationship("Employee")
+
+
+class ProjectCostSummary(Base, TenantMixin):
+    """Laufende Ist-Werte je Projekt - per Delta aus Zeiten, Lagerbewegungen und Rechnungen"""
+    __tablename__ = "project_cost_summaries"
+    
+    # Keine FK: Lagerbewegungen referenzieren Projekte ohne Constraint
+    project_id = Column(UUID(as_uuid=True), primary_key=True)
+    
+    # Stunden
+    hours_total = Column(Numeric(12, 2), default=0, nullable=False)
+    hours_approved = Column(Numeric(12, 2), default=0, nullable=False)
+    hours_planning = Column(Numeric(12, 2), default=0, nullable=False)
+    hours_production = Column(Numeric(12, 2), default=0, nullable=False)
+    hours_assembly = Column(Numeric(12, 2), default=0, nullable=False)
+    overtime_hours = Column(Numeric(12, 2), default=0, nullable=False)
+    
+    # Kosten und Erlöse
+    labor_cost = Column(Numeric(15, 2), default=0, nullable=False)
+    material_cost = Column(Numeric(15, 2), default=0, nullable=False)
+    invoiced_net = Column(Numeric(15, 2), default=0, nullable=False)
+    invoiced_paid = Column(Numeric(15, 2), default=0, nullable=False)
+    
+    # Anzahl Quellzeilen
+    time_entry_count = Column(Integer, default=0, nullable=False)
+    movement_count = Column(Integer, default=0, nullable=False)
+    invoice_count = Column(Integer, default=0, nullable=False)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    rebuilt_at = Column(DateTime, nullable=True)  # Letzter Voll-Neuaufbau
+    
+    @property
+    def total_cost(self):
+        return (self.labor_cost or 0) + (self.material_cost or 0)
@@ -1,7 +1,7 @@
 """
 Telemetrie-Datenmodelle für umfassendes System-Monitoring
 """
-from sqlalchemy import Column, String, Text, Integer, Float, Boolean, DateTime, Date, ForeignKey, Enum, JSON, Index
+from sqlalchemy import Column, String, Text, Integer, BigInteger, Float, Boolean, DateTime, Date, ForeignKey, Enum, JSON, Index, func, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY, INET
 from sqlalchemy.orm import relationship
 from datetime import datetime, timedelta
@@ -11,6 +11,10 @@ import enum
 from shared.models.base import Base, TimestampMixin, TenantMixin
 
 
+# Platzhalter für Zeilen ohne Mandant in eindeutigen Indizes
+NO_TENANT = "00000000-0000-0000-0000-000000000000"
+
+
 class EventSeverity(enum.Enum):
     """Event-Schweregrad"""
     DEBUG = "debug"
@@ -62,7 +66,7 @@ class TelemetryEvent(Base, TimestampMixin):
     event_context = Column(JSONB, default={})
     
     # Zeitstempel
-    event_timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    event_timestamp = Column(DateTime, default=datetime.utcnow, primary_key=True, index=True)
     processed_at = Column(DateTime, nullable=True)
     
     # Quelle
@@ -83,7 +87,7 @@ class TelemetryEvent(Base, TimestampMixin):
     
     # Korrelation
     correlation_id = Column(String(100), nullable=True, index=True)
-    parent_event_id = Column(UUID(as_uuid=True), ForeignKey('telemetry_events.id'), nullable=True)
+    parent_event_id = Column(UUID(as_uuid=True), nullable=True)  # kein FK: Tabelle ist partitioniert
     trace_id = Column(String(100), nullable=True, index=True)
     span_id = Column(String(100), nullable=True)
     
@@ -92,6 +96,7 @@ class TelemetryEvent(Base, TimestampMixin):
         Index('ix_telemetry_events_timestamp_category', 'event_timestamp', 'category'),
         Index('ix_telemetry_events_tenant_timestamp', 'tenant_id', 'event_timestamp'),
         Index('ix_telemetry_events_user_timestamp', 'user_id', 'event_timestamp'),
+        {'postgresql_partition_by': 'RANGE (event_timestamp)'},
     )
 
 
@@ -115,7 +120,7 @@ class SystemMetric(Base, TimestampMixin):
     count = Column(Integer, default=1)
     
     # Zeitfenster
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, primary_key=True, index=True)
     period_start = Column(DateTime, nullable=True)
     period_end = Column(DateTime, nullable=True)
     aggregation_interval = Column(String(20), nullable=True)  # 1m, 5m, 1h, 1d
@@ -134,6 +139,7 @@ class SystemMetric(Base, TimestampMixin):
     __table_args__ = (
         Index('ix_system_metrics_name_timestamp', 'metric_name', 'timestamp'),
         Index('ix_system_metrics_service_timestamp', 'service', 'timestamp'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
     )
 
 
@@ -154,7 +160,7 @@ class PerformanceTrace(Base, TimestampMixin):
     operation_type = Column(String(50), nullable=True)  # db, http, function, ui
     
     # Timing
-    start_time = Column(DateTime, nullable=False, index=True)
+    start_time = Column(DateTime, nullable=False, primary_key=True, index=True)
     end_time = Column(DateTime, nullable=True)
     duration_ms = Column(Float, nullable=True, index=True)
     
@@ -182,6 +188,7 @@ class PerformanceTrace(Base, TimestampMixin):
     __table_args__ = (
         Index('ix_performance_traces_trace_start', 'trace_id', 'start_time'),
         Index('ix_performance_traces_duration', 'duration_ms'),
+        {'postgresql_partition_by': 'RANGE (start_time)'},
     )
 
 
@@ -381,11 +388,13 @@ class AuditLog(Base, TimestampMixin):
     
     # Integrity
     checksum = Column(String(64), nullable=True)  # SHA-256 für Manipulationsschutz
+    sequence = Column(BigInteger, nullable=True)  # Position in der Hash-Kette (AuditService)
     
     __table_args__ = (
         Index('ix_audit_logs_tenant_timestamp', 'tenant_id', 'timestamp'),
         Index('ix_audit_logs_user_timestamp', 'user_id', 'timestamp'),
         Index('ix_audit_logs_resource', 'resource_type', 'resource_id'),
+        Index('uq_audit_logs_sequence', 'sequence', unique=True),
     )
 
 
@@ -419,6 +428,12 @@ class FeatureUsage(Base, TimestampMixin):
     __table_args__ = (
         Index('ix_feature_usage_feature_date', 'feature_name', 'date'),
         Index('ix_feature_usage_tenant_date', 'tenant_id', 'date'),
+        # Ziel für INSERT ... ON CONFLICT des Feature-Flushes (NULL-Mandant eingeschlossen)
+        Index(
+            'uq_feature_usage_tenant_feature_date',
+            func.coalesce(tenant_id, text(f"'{NO_TENANT}'::uuid")), feature_name, date,
+            unique=True
+        ),
     )
 
 
@@ -433,7 +448,7 @@ class SystemHealth(Base, TimestampMixin):
     check_type = Column(String(50), nullable=True)  # database, api, service, disk, memory
     
     # Status
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, primary_key=True, index=True)
     status = Column(String(20), nullable=False)  # healthy, degraded, unhealthy
     is_healthy = Column(Boolean, default=True, index=True)
     
@@ -458,6 +473,7 @@ class SystemHealth(Base, TimestampMixin):
     
     __table_args__ = (
         Index('ix_system_health_check_timestamp', 'check_name', 'timestamp'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
     )
 
 
@@ -510,6 +526,38 @@ class Alert(Base, TimestampMixin):
     )
 
 
+class TelemetryRollup(Base):
+    """Verdichtete Telemetrie je Minute/Stunde (Quelle für Dashboard-Abfragen)"""
+    __tablename__ = 'telemetry_rollups'
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    tenant_id = Column(UUID(as_uuid=True), nullable=True, index=True)
+    
+    # Zeitfenster
+    bucket_start = Column(DateTime, nullable=False)
+    bucket_size = Column(String(5), nullable=False)  # 1m, 1h
+    
+    # Herkunft: events (category), traces (operation_name), metrics (metric_name), health (check_name)
+    source = Column(String(20), nullable=False)
+    series = Column(String(255), nullable=False)
+    
+    # Aggregate
+    count = Column(Integer, nullable=False, default=0)
+    value_count = Column(Integer, nullable=True)  # Zeilen mit Messwert (Nenner von avg_value)
+    sum_value = Column(Float, nullable=True)
+    min_value = Column(Float, nullable=True)
+    max_value = Column(Float, nullable=True)
+    avg_value = Column(Float, nullable=True)
+    error_count = Column(Integer, default=0)
+    
+    # Log-Histogramm {bin: anzahl} für Perzentile (mergebar durch Addition)
+    sketch = Column(JSONB, nullable=True)
+    
+    __table_args__ = (
+        Index('ix_telemetry_rollups_lookup', 'source', 'bucket_size', 'bucket_start', 'series'),
+    )
+
+
 class ReportSchedule(Base, TimestampMixin, TenantMixin):
     """Geplante Reports"""
     __tablename__ = 'report_schedules'
@@ -0,0 +1,11 @@
+"""
+Gemeinsame Test-Hilfen
+
+Die Tests prüfen die Rechenkerne der Services ohne Datenbank. Sie laufen im
+Projektverzeichnis mit:
+    python -m pytest -q tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
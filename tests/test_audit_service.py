@@ -0,0 +1,95 @@
+"""Tests für den Audit-Service: Längenbegrenzung, Spill-Datei und Quarantäne"""
+import json
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.services.audit_service import AuditEventType, AuditService, STRING_LIMITS, fit_entry
+
+
+def _entry(service, **kwargs):
+    service.log(AuditEventType.CREATE, **kwargs)
+    return service._queue[-1]
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    svc = AuditService(spill_path=str(tmp_path / "spill.jsonl"))
+    monkeypatch.setattr(svc, "_ensure_started", lambda: None)
+    return svc
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_fit_entry_truncates_to_column_length():
+    entry = fit_entry({"resource_type": "x" * 500, "session_id": "s" * 300, "ip_address": "not an ip"})
+    assert len(entry["resource_type"]) == STRING_LIMITS["resource_type"] == 100
+    assert len(entry["session_id"]) == STRING_LIMITS["session_id"]
+    assert entry["ip_address"] is None
+
+
+def test_log_fits_entry(service):
+    entry = _entry(service, resource_type="r" * 200, resource_id="i" * 200, ip_address=" 10.0.0.1 ")
+    assert len(entry["resource_type"]) == 100
+    assert len(entry["resource_id"]) == 100
+    assert entry["ip_address"] == "10.0.0.1"
+
+
+def test_rejected_entry_is_quarantined_and_rest_written(service, monkeypatch):
+    for i in range(7):
+        _entry(service, resource_name=f"e{i}")
+    bad_id = service._queue[3]["id"]
+    written = []
+
+    def fake_write(entries, skip_existing=False):
+        if any(e["id"] == bad_id for e in entries):
+            raise IntegrityError("INSERT", {}, Exception("fk violation"))
+        written.extend(e["resource_name"] for e in entries)
+        return len(entries)
+
+    monkeypatch.setattr(service, "_write", fake_write)
+    assert service.flush() == 6
+    assert written == ["e0", "e1", "e2", "e4", "e5", "e6"]
+    quarantined = _read(service.quarantine_path)
+    assert [q["entry"]["id"] for q in quarantined] == [bad_id]
+    assert quarantined[0]["error"].startswith("IntegrityError")
+
+    # Die Quarantäne blockiert keine späteren Schreibvorgänge
+    _entry(service, resource_name="later")
+    assert service.flush() == 1
+    assert written[-1] == "later"
+
+
+def test_unavailable_database_spills_and_replays_in_order(service, monkeypatch):
+    for i in range(3):
+        _entry(service, resource_name=f"e{i}")
+
+    def offline(entries, skip_existing=False):
+        raise OperationalError("SELECT 1", {}, Exception("connection refused"))
+
+    monkeypatch.setattr(service, "_write", offline)
+    assert service.flush() == 0
+    assert [e["resource_name"] for e in _read(service.spill_path)] == ["e0", "e1", "e2"]
+
+    written = []
+
+    def online(entries, skip_existing=False):
+        written.extend(e["resource_name"] for e in entries)
+        return len(entries)
+
+    monkeypatch.setattr(service, "_write", online)
+    service._retry_at = 0.0
+    _entry(service, resource_name="e3")
+    assert service.flush() == 4
+    assert written == ["e0", "e1", "e2", "e3"]
+
+
+def test_corrupt_spill_line_is_quarantined(service, monkeypatch):
+    with open(service.spill_path, "w", encoding="utf-8") as f:
+        f.write("{kaputt\n")
+    monkeypatch.setattr(service, "_write", lambda entries, skip_existing=False: len(entries))
+    assert service.flush() == 0
+    assert _read(service.quarantine_path)[0]["entry"] == {"raw": "{kaputt"}
@@ -0,0 +1,77 @@
+"""Tests für die Anmeldung: spekulative Verbindung zur Benutzerdatenbank"""
+import threading
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+import app.services.auth_service as auth_module
+from app.services.auth_service import AuthService
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(auth_module, "get_audit_service", MagicMock)
+    monkeypatch.setattr(auth_module, "get_consent_service", MagicMock)
+    db = MagicMock()
+    db.current_user_db_name = None
+    user = SimpleNamespace(
+        id=uuid.uuid4(), email="a@b.de", username="anna", first_name=None, last_name=None,
+        failed_login_attempts="0", locked_until=None, is_active=True, is_deleted=False,
+        is_superuser=False, is_verified=True, tenant_id=None, tenant=None, roles=[],
+        database_name="user_anna", hashed_password="hash", last_login=None,
+    )
+    db.get_auth_session.return_value.execute.return_value.scalar_one_or_none.return_value = user
+    service = AuthService(db)
+    yield service
+    service.close()
+
+
+def test_wrong_password_disposes_pending_engine_without_migration(service, monkeypatch):
+    engine = MagicMock()
+    connected = threading.Event()
+
+    def open_user_engine(name):
+        connected.set()
+        return engine
+
+    service.db.open_user_engine.side_effect = open_user_engine
+    monkeypatch.setattr(auth_module, "verify_password", lambda *args: connected.wait(5) and False)
+
+    success, _ = service.login("a@b.de", "falsch")
+    service._connect_executor.shutdown(wait=True)
+
+    assert not success
+    engine.dispose.assert_called_once()
+    service.db.migrate_user_database.assert_not_called()
+    service.db.open_user_database.assert_not_called()
+    service.db.activate_user_database.assert_not_called()
+
+
+def test_success_migrates_before_activation(service, monkeypatch):
+    engine = MagicMock()
+    calls = []
+    service.db.open_user_engine.return_value = engine
+    service.db.migrate_user_database.side_effect = lambda e: calls.append(("migrate", e))
+    service.db.activate_user_database.side_effect = lambda name, e: calls.append(("activate", e))
+    monkeypatch.setattr(auth_module, "verify_password", lambda *args: True)
+
+    success, _ = service.login("a@b.de", "richtig")
+
+    assert success
+    assert calls == [("migrate", engine), ("activate", engine)]
+    engine.dispose.assert_not_called()
+
+
+def test_logout_shuts_down_connect_worker(service, monkeypatch):
+    monkeypatch.setattr(auth_module, "verify_password", lambda *args: True)
+    service.login("a@b.de", "richtig")
+    executor = service._connect_executor
+    assert executor is not None
+
+    service.logout()
+
+    assert service._connect_executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
@@ -0,0 +1,39 @@
+"""Tests für den Cache-Service: Ablaufzeit, Invalidierung und Verdrängung"""
+import app.services.cache_service as cache_module
+from app.services.cache_service import CacheService
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: clock[0])
+    cache = CacheService()
+    cache.set("customers", [1, 2], ttl=10)
+    cache.set_stats("dashboard_stats_global", {"customer_count": 2})
+    assert cache.get("customers") == [1, 2]
+    clock[0] += 11
+    assert cache.get("customers") is None
+    # Dashboard-Kennzahlen gelten 60 s
+    assert cache.get_stats("dashboard_stats_global") == {"customer_count": 2}
+    clock[0] += 50
+    assert cache.get_stats("dashboard_stats_global") is None
+    assert cache.info() == {"entries": 0, "hits": 2, "misses": 2}
+
+
+def test_invalidate_by_pattern():
+    cache = CacheService()
+    cache.set("customer_list_1", 1)
+    cache.set("customer_count", 2)
+    cache.set("project_list", 3)
+    assert cache.invalidate("customer") == 2
+    assert cache.get("project_list") == 3
+    cache.invalidate()
+    assert cache.get("project_list") is None
+
+
+def test_oldest_entries_evicted():
+    cache = CacheService(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
@@ -0,0 +1,69 @@
+"""Tests für die Liquiditätsplanung: Periodengrenzen, Verteilung und Kreditprojektion"""
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from app.services.cash_flow_service import CashFlowService, Flows, ForecastInputs, period_boundaries
+
+
+def _inputs(start, receivables=None, delays=None, **expenses):
+    receivables = receivables or Flows()
+    return ForecastInputs(
+        tenant_id=None, start=start, end=date(2027, 12, 31), opening_balance=Decimal("1000.00"),
+        receivables=receivables,
+        receivable_delays=np.zeros(len(receivables.cents)) if delays is None else np.asarray(delays, dtype=float),
+        expenses=expenses,
+    )
+
+
+def test_period_boundaries():
+    assert period_boundaries(date(2026, 10, 19), "monthly", 2) == [
+        date(2026, 10, 19), date(2026, 11, 1), date(2026, 12, 1)]
+    assert period_boundaries(date(2026, 10, 21), "weekly", 2) == [
+        date(2026, 10, 21), date(2026, 10, 26), date(2026, 11, 2)]
+
+
+def test_compute_buckets_overdue_into_first_period_and_drops_beyond_horizon():
+    start = date(2026, 10, 19)
+    receivables = Flows.of([date(2026, 9, 1), date(2026, 11, 5), date(2027, 6, 1)], [10_000, 20_000, 99_999])
+    payables = Flows.of([date(2026, 10, 25), date(2026, 12, 10)], [5_000, 7_000])
+    result = CashFlowService().compute(_inputs(start, receivables, planned_payables=payables), "monthly", 3)
+    assert result.columns["planned_receivables"].tolist() == [10_000, 20_000, 0]
+    assert result.columns["planned_payables"].tolist() == [5_000, 0, 7_000]
+    assert result.closing.tolist() == [105_000, 125_000, 118_000]
+    assert result.minimum() == (date(2026, 10, 19), 105_000)
+
+
+def test_payment_delay_shifts_receivables():
+    start = date(2026, 10, 19)
+    receivables = Flows.of([date(2026, 10, 25)], [10_000])
+    result = CashFlowService().compute(_inputs(start, receivables, delays=[14]), "monthly", 2)
+    assert result.columns["planned_receivables"].tolist() == [0, 10_000]
+    result = CashFlowService().compute(_inputs(start, receivables, delays=[14]), "monthly", 2, delay_weight=0)
+    assert result.columns["planned_receivables"].tolist() == [10_000, 0]
+
+
+def test_projected_loan_starts_at_forecast_start_with_current_balance():
+    loan = SimpleNamespace(
+        id=1, payment_frequency="monthly", term_months=120, first_payment_date=date(2020, 1, 31),
+        start_date=date(2020, 1, 1), end_date=date(2029, 12, 31), repayment_type="annuity",
+        monthly_payment=None, principal_amount=Decimal("60000"), current_balance=Decimal("20000"),
+        next_payment_date=None, interest_rate=Decimal("4.5"),
+    )
+    session = MagicMock()
+    stored, projected = MagicMock(), MagicMock()
+    stored.all.return_value = []
+    projected.scalars.return_value.all.return_value = [loan]
+    session.execute.side_effect = [stored, projected]
+
+    start = date(2026, 10, 19)
+    flows = CashFlowService()._loans(session, None, start, date(2027, 10, 19))
+    assert flows.days.min() >= np.datetime64(start)
+    assert len(flows.cents) == 12
+    result = CashFlowService().compute(_inputs(start, planned_loans=flows), "monthly", 12)
+    loans = result.columns["planned_loans"]
+    # Eine Rate je Monat statt aller vergangenen Raten im ersten Monat
+    assert loans[0] == loans[1] < 100_000
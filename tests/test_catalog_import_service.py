@@ -0,0 +1,111 @@
+"""Tests für den Katalogimport: DATANORM/BMEcat lesen und Batch-Abgleich"""
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.catalog_import_service import (
+    CatalogArticle, CatalogImportService, description_hash, guess_category, iter_catalog, normalize_unit,
+    price_hash,
+)
+from shared.models import MaterialCategory
+
+BMECAT = """<?xml version="1.0" encoding="UTF-8"?>
+<BMECAT version="2005"><T_NEW_CATALOG>
+<PRODUCT><SUPPLIER_PID>KVH-100</SUPPLIER_PID>
+<PRODUCT_DETAILS><DESCRIPTION_SHORT>KVH 60x120</DESCRIPTION_SHORT><EAN>4001234567890</EAN></PRODUCT_DETAILS>
+<PRODUCT_ORDER_DETAILS><ORDER_UNIT>MTR</ORDER_UNIT><PRICE_QUANTITY>10</PRICE_QUANTITY></PRODUCT_ORDER_DETAILS>
+<PRODUCT_PRICE_DETAILS>
+<PRODUCT_PRICE price_type="net_customer"><PRICE_AMOUNT>45.50</PRICE_AMOUNT></PRODUCT_PRICE>
+<PRODUCT_PRICE price_type="gros_list"><PRICE_AMOUNT>60.00</PRICE_AMOUNT></PRODUCT_PRICE>
+</PRODUCT_PRICE_DETAILS></PRODUCT>
+<PRODUCT mode="delete"><SUPPLIER_PID>ALT-1</SUPPLIER_PID></PRODUCT>
+</T_NEW_CATALOG></BMECAT>
+"""
+
+
+def test_datanorm_records_and_price_units(tmp_path):
+    path = tmp_path / "katalog.001"
+    path.write_text(
+        "A;N;4711;00;OSB Platte;18 mm;1;2;ST;1250000;;PL\r\n"
+        "B;N;4711;OSB;;;;;4009876543210;;;;5\r\n"
+        "P;A;4712;2;1999;;;;\r\n",
+        encoding="cp850",
+    )
+    # Fremde Preissätze kommen vor dem noch offenen A-Satz
+    price, osb = list(iter_catalog(path))
+    assert (osb.number, osb.name, osb.description) == ("4711", "OSB Platte", "OSB Platte 18 mm")
+    # Preiseinheit 2 = je 100 Stück, Preis in Cent
+    assert osb.list_price == Decimal("125")
+    assert (osb.unit, osb.ean, osb.min_order_quantity) == ("STK", "4009876543210", Decimal(5))
+    assert (price.number, price.action, price.net_price) == ("4712", "price", Decimal("19.99"))
+
+
+def test_bmecat_prices_per_unit_and_delete(tmp_path):
+    path = tmp_path / "katalog.xml"
+    path.write_text(BMECAT, encoding="utf-8")
+    kvh, old = list(iter_catalog(path))
+    assert (kvh.number, kvh.unit, kvh.action) == ("KVH-100", "m", "upsert")
+    assert kvh.net_price == Decimal("4.55")
+    assert kvh.list_price == Decimal("6")
+    assert (old.number, old.action) == ("ALT-1", "delete")
+
+
+def test_units_and_categories():
+    assert normalize_unit("c62") == "STK"
+    assert normalize_unit(None) == "STK"
+    assert normalize_unit("Sack") == "Sack"
+    assert guess_category("BSH GL24h 100x200") == MaterialCategory.BRETTSCHICHTHOLZ
+    assert guess_category("Irgendwas") == MaterialCategory.SONSTIGES
+
+
+# ============== BATCH ==============
+
+SUPPLIER = SimpleNamespace(id=uuid.uuid4(), supplier_number="L-1")
+
+
+def _known(article, primary_supplier_id=SUPPLIER.id, description_changed=True):
+    prefix = "0" * 16 if description_changed else description_hash(article)
+    return SimpleNamespace(
+        supplier_article_number=article.number, id=uuid.uuid4(), material_id=uuid.uuid4(),
+        catalog_hash=prefix + price_hash("1", None), valid_until=None, primary_supplier_id=primary_supplier_id,
+    )
+
+
+def _apply(article, known):
+    session = MagicMock()
+    session.execute.side_effect = [None, [known]] + [None] * 10
+    stats = {"created": 0, "updated": 0, "unchanged": 0, "expired": 0, "unknown": 0}
+    CatalogImportService()._apply_batch(session, SUPPLIER, {article.number: article}, Decimal(0), None, stats)
+    return session
+
+
+def _material_text_updates(session):
+    updates = []
+    for call in session.execute.call_args_list[2:]:
+        stmt, *params = call.args
+        sql = str(stmt.compile(dialect=postgresql.dialect()))
+        if sql.startswith("UPDATE materials SET name="):
+            updates.append((sql, params[0]))
+    return updates
+
+
+def _article():
+    return CatalogArticle(number="4711", name="OSB Platte 22 mm", description="OSB/3 N+F", net_price=Decimal("2"))
+
+
+def test_changed_description_updates_material_texts_behind_guard():
+    article = _article()
+    known = _known(article)
+    ((sql, rows),) = _material_text_updates(_apply(article, known))
+    assert "name IS DISTINCT FROM" in sql and "description IS DISTINCT FROM" in sql
+    assert rows[0]["material_id"] == known.material_id
+    assert (rows[0]["new_name"], rows[0]["new_description"]) == ("OSB Platte 22 mm", "OSB/3 N+F")
+
+
+def test_price_change_or_foreign_material_keeps_texts():
+    article = _article()
+    assert _material_text_updates(_apply(article, _known(article, description_changed=False))) == []
+    assert _material_text_updates(_apply(article, _known(article, primary_supplier_id=uuid.uuid4()))) == []
@@ -0,0 +1,51 @@
+"""Tests für die Einwilligungen: Bitmaske, Standardwerte und Listener"""
+from unittest.mock import MagicMock
+
+import app.services.audit_service as audit_module
+from app.services.consent_service import DEFAULT_MASK, ConsentService, ConsentType, mask_from_rows
+
+
+def test_mask_from_rows_applies_decisions_to_default():
+    mask = mask_from_rows([("analytics", True), ("telemetry", False), ("unbekannt", True)])
+    assert mask & ConsentType.ANALYTICS
+    assert not mask & ConsentType.TELEMETRY
+    assert mask & ConsentType.ERROR_TRACKING
+    assert mask_from_rows([]) == DEFAULT_MASK
+
+
+def test_load_user_and_bit_checks():
+    session = MagicMock()
+    session.execute.return_value.all.return_value = [("usage_statistics", True)]
+    service = ConsentService()
+    seen = []
+    service.add_listener(lambda user_id, mask: seen.append((user_id, mask)))
+
+    mask = service.load_user(session, "u1")
+
+    assert service.has_consent("u1", ConsentType.USAGE_STATISTICS)
+    assert not service.has_consent("u1", ConsentType.ANALYTICS)
+    assert seen == [("u1", mask)]
+    service.forget_user("u1")
+    assert service.get_mask("u1") == DEFAULT_MASK
+
+
+def test_set_consents_upserts_notifies_and_audits(monkeypatch):
+    audit = MagicMock()
+    monkeypatch.setattr(audit_module, "get_audit_service", lambda: audit)
+    service = ConsentService()
+    failing = MagicMock(side_effect=RuntimeError("kaputt"))
+    service.add_listener(failing)
+    session = MagicMock()
+
+    mask = service.set_consents(session, "u1", {ConsentType.TELEMETRY: False})
+
+    assert not mask & ConsentType.TELEMETRY
+    assert service.get_consents("u1")[ConsentType.TELEMETRY] is False
+    session.commit.assert_called_once()
+    # Ein fehlerhafter Listener bricht die Änderung nicht ab
+    failing.assert_called_once_with("u1", mask)
+    audit.log.assert_called_once()
+
+    audit.log.reset_mock()
+    service.set_consents(session, "u1", {ConsentType.TELEMETRY: False})
+    audit.log.assert_not_called()
@@ -0,0 +1,54 @@
+"""Tests für die Pipeline-Auswertung: Zeiträume, Abfrage und Stufenkennzahlen"""
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.crm_pipeline_service import PipelineService, period_range
+
+
+def _row(status, count, value, weighted=0, deals=(), cycle_days=None, converted=0):
+    return SimpleNamespace(status=status, count=count, value=value, weighted=weighted,
+                           deals=list(deals), cycle_days=cycle_days, converted=converted)
+
+
+def _load(rows):
+    session = MagicMock()
+    session.execute.return_value = rows
+    start, end = period_range("quarter", date(2026, 10, 19))
+    return PipelineService()._load(session, 1, "quarter", start, end), session
+
+
+def test_period_range_is_half_open():
+    assert period_range("quarter", date(2026, 11, 30)) == (datetime(2026, 10, 1), datetime(2027, 1, 1))
+    assert period_range("week", date(2026, 10, 21)) == (datetime(2026, 10, 19), datetime(2026, 10, 26))
+
+
+def test_query_groups_null_status_and_parses_won_value_once():
+    _, session = _load([])
+    sql = str(session.execute.call_args[0][0].compile(dialect=postgresql.dialect()))
+    assert "GROUP BY coalesce(leads.status" in sql
+    # Auftragswert und Budget werden vor dem Parsen zusammengeführt
+    assert "coalesce(nullif(trim(leads.conversion_value)" in sql
+    assert "leads.score" not in sql
+    assert "count(*) FILTER (WHERE leads.converted_at IS NOT NULL) AS converted" in sql
+
+
+def test_stage_aggregation_and_rates():
+    stats, _ = _load([
+        _row("new", 4, Decimal("4000"), Decimal("400"), deals=[["A", 2000]]),
+        _row("proposal", 2, Decimal("10000"), Decimal("6000")),
+        _row("won", 1, Decimal("5000"), Decimal("5000"), cycle_days=30.0, converted=1),
+        _row("lost", 3, Decimal("900")),
+    ])
+    assert stats.stages["new"].top_deals == [("A", Decimal("2000"))]
+    assert stats.stages["new"].reached == 7
+    assert stats.stages["new"].conversion_rate == 3 / 7
+    assert stats.pipeline_value == Decimal("14000")
+    assert stats.weighted_value == Decimal("6400")
+    assert stats.won_value == Decimal("5000")
+    assert stats.win_rate == 0.25
+    assert stats.avg_cycle_days == 30.0
+
@@ -0,0 +1,74 @@
+"""Tests für die Zuschnittoptimierung: Schnittfuge, Lagerbestand und exakter Modus"""
+import random
+from collections import Counter
+
+from app.services.cutting_service import (
+    CutPiece, CuttingJob, StockLength, optimize, optimize_many, read_piece_list, section_name,
+)
+
+
+def _placed(plan):
+    return Counter(length for bar in plan.bars for _ in range(bar.count) for length, _ in bar.cuts)
+
+
+def test_kerf_is_subtracted_per_cut():
+    job = CuttingJob("60x120", [CutPiece(2998, 2)], [StockLength(6000)], kerf_mm=4)
+    plan = optimize(job)
+    assert plan.bar_count == 1
+    assert plan.bars[0].rest_mm == 0
+
+    job.pieces = [CutPiece(2999, 2)]
+    assert optimize(job).bar_count == 2
+
+
+def test_stock_bars_first_and_too_long_pieces_unplaced():
+    stock = [StockLength(4000, quantity=1, in_stock=True), StockLength(5000), StockLength(13000)]
+    plan = optimize(CuttingJob("80x160", [CutPiece(3500, 2), CutPiece(14000, 1, "Pfette")], stock))
+    assert plan.bars[0].stock.in_stock
+    # Der Lagerstab ist verbraucht, das zweite Stück braucht die kürzeste Handelslänge
+    assert plan.purchase_list() == {5000: 1}
+    assert [(p.length_mm, p.quantity, p.label) for p in plan.unplaced] == [(14000, 1, "Pfette")]
+
+
+def test_shortest_fitting_purchase_length():
+    plan = optimize(CuttingJob("60x120", [CutPiece(3900, 1)], [StockLength(length) for length in (4000, 6000)]))
+    assert plan.purchase_list() == {4000: 1}
+
+
+def test_exact_places_everything_within_bound():
+    rng = random.Random(7)
+    pieces = [CutPiece(rng.randrange(800, 4200, 50), rng.randint(1, 6), f"P{i}") for i in range(12)]
+    job = CuttingJob("60x200", pieces, [StockLength(length) for length in (4000, 5000, 6000, 8000)])
+
+    heuristic, exact = optimize(job), optimize(job, exact=True)
+
+    demand = Counter()
+    for piece in pieces:
+        demand[piece.length_mm] += piece.quantity
+    assert _placed(heuristic) == _placed(exact) == demand
+    assert exact.cost <= heuristic.cost
+    assert exact.lower_bound_mm is None or exact.lower_bound_mm <= exact.cost + 1e-6
+    for bar in exact.bars:
+        assert bar.rest_mm >= 0
+
+
+def test_optimize_many_keeps_order():
+    jobs = [CuttingJob(name, [CutPiece(1000, 3)], [StockLength(4000)]) for name in ("a", "b")]
+    assert [plan.section for plan in optimize_many(jobs, workers=1)] == ["a", "b"]
+
+
+def test_read_piece_list_groups_sections(tmp_path):
+    path = tmp_path / "abbund.csv"
+    path.write_text(
+        "Pos;Anzahl;Breite;Höhe;Länge;Bezeichnung;Qualität\n"
+        "1;4;120;60;3450,5;Sparren;C24\n"
+        "2;;60;120;2000;Wechsel;C24\n"
+        ";;;;;;\n",
+        encoding="utf-8",
+    )
+    pieces = read_piece_list(path)
+    assert list(pieces) == [(60, 120, "C24")]
+    assert [(p.length_mm, p.quantity, p.label) for p in pieces[(60, 120, "C24")]] == [
+        (3451, 4, "1 Sparren"), (2000, 1, "2 Wechsel"),
+    ]
+    assert section_name(120, 60, "C24") == "60x120 C24"
@@ -0,0 +1,82 @@
+"""Tests für den AfA-Lauf: lineare und degressive Beträge, Nachholung und Altbestand"""
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from app.services.depreciation_service import DepreciationService, fiscal_year_start
+
+
+def _asset(method="linear", cost="100000.00", book=None, accumulated="0", years=10, rate=None,
+           service=date(2026, 1, 1), last=None, year_taken=None, residual="0"):
+    return SimpleNamespace(
+        depreciation_method=method, useful_life_years=years, useful_life_months=0,
+        acquisition_cost=Decimal(cost), residual_value=Decimal(residual),
+        current_book_value=Decimal(book or cost), accumulated_depreciation=Decimal(accumulated),
+        service_date=service, last_date=last, depreciation_rate=rate, year_taken=year_taken,
+    )
+
+
+def _compute(rows, period_end, start_month=1):
+    return DepreciationService().compute(rows, period_end, start_month)
+
+
+def test_fiscal_year_start():
+    assert fiscal_year_start(2026 * 12 + 5) == 2026 * 12
+    assert fiscal_year_start(2026 * 12 + 1, start_month=7) == 2025 * 12 + 6
+
+
+def test_linear_with_catch_up():
+    amount, months, book, _ = _compute([_asset()], date(2026, 3, 31))
+    assert amount.tolist() == [250_000]
+    assert months.tolist() == [3]
+    assert book.tolist() == [10_000_000]
+
+
+def test_declining_full_year_uses_annual_rate_on_opening_book():
+    amount, months, _, _ = _compute([_asset("declining", rate=Decimal("20"))], date(2026, 12, 31))
+    assert amount.tolist() == [2_000_000]
+    assert months.tolist() == [12]
+
+
+def test_declining_monthly_runs_add_up_to_annual_amount():
+    total, last, taken, book = 0, None, Decimal(0), Decimal("100000.00")
+    for month in range(1, 13):
+        period_end = date(2026, month, 28)
+        amount, _, _, _ = _compute([_asset("declining", rate=Decimal("20"), book=book, last=last,
+                                           year_taken=taken or None)], period_end)
+        cents = int(amount[0])
+        total += cents
+        taken += Decimal(cents) / 100
+        book -= Decimal(cents) / 100
+        last = period_end
+    assert total == 2_000_000
+
+
+def test_declining_second_year_and_switch_to_linear():
+    # Zweites Jahr: 20 % von 80.000
+    amount, _, _, _ = _compute([_asset("declining", rate=Decimal("20"), book="80000.00",
+                                       last=date(2026, 12, 31), year_taken="20000.00")], date(2027, 12, 31))
+    assert amount.tolist() == [1_600_000]
+    # 3 Jahre Restnutzung bei 30.000 Buchwert: linear 10.000 > degressiv 6.000
+    amount, _, _, _ = _compute([_asset("declining", rate=Decimal("20"), book="30000.00", years=10,
+                                       service=date(2019, 1, 1), last=date(2025, 12, 31))], date(2026, 12, 31))
+    assert amount.tolist() == [1_000_000]
+
+
+def test_declining_follows_fiscal_year_start():
+    # Geschäftsjahr ab Juli: Buchwert zum 1.7. 100.000, nach drei Monaten 5.000 gebucht
+    amount, _, _, _ = _compute([_asset("declining", rate=Decimal("20"), book="95000.00", service=date(2025, 1, 1),
+                                       last=date(2026, 9, 30), year_taken="5000.00")],
+                               date(2026, 10, 31), start_month=7)
+    assert amount.tolist() == [166_667]
+
+
+def test_legacy_assets_without_entries():
+    linear = _asset(book="80000.00", accumulated="20000.00", service=date(2024, 1, 1))
+    declining = _asset("declining", rate=Decimal("20"), book="80000.00", accumulated="20000.00",
+                       service=date(2024, 1, 1))
+    amount, months, _, unknown = _compute([linear, declining], date(2026, 1, 31))
+    # linear: 24 Monate aus der kumulierten AfA, Januar 2026 ist Monat 25
+    assert amount.tolist() == [83_333, 0]
+    assert months.tolist() == [1, 0]
+    assert unknown.tolist() == [False, True]
@@ -0,0 +1,46 @@
+"""Tests für den Mahnlauf: Mahnstufen und Auswahl der mahnbaren Posten"""
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.dunning_service import DEFAULT_STAGES, DunningService, DunningStage, stage_for
+from shared.models import DunningLevel
+
+
+def test_stage_for_falls_back_to_highest_stage_below_level():
+    gaps = (DunningStage(1, DunningLevel.FIRST, Decimal("0"), 10),
+            DunningStage(3, DunningLevel.THIRD, Decimal("10"), 7))
+    assert stage_for(gaps, 1).level == 1
+    assert stage_for(gaps, 2).level == 1
+    assert stage_for(gaps, 3).level == 3
+    assert stage_for(gaps, 5).level == 3
+    assert stage_for(gaps[1:], 1).level == 3
+    assert stage_for(DEFAULT_STAGES, 2).fee == Decimal("5.00")
+
+
+def _sql(**kwargs):
+    args = dict(tenant_id=uuid.uuid4(), reference_date=date(2026, 10, 19), grace_days=5,
+                min_amount=Decimal("20"), interest_percent=Decimal("0"), stages=DEFAULT_STAGES,
+                min_interval_days=14)
+    args.update(kwargs)
+    stmt = DunningService()._candidates(**args)
+    return str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def test_candidates_filters():
+    sql = _sql()
+    # Fälligkeit abzüglich Karenz, höchste Stufe, Mindestabstand zur letzten Mahnung
+    assert "invoices.due_date < '2026-10-14'" in sql
+    assert "coalesce(invoices.dunning_level, 0) < 3" in sql
+    assert "invoices.last_dunning_date <= '2026-10-05'" in sql
+    # Sperren und Mindestbetrag je Kunde
+    assert "NOT (EXISTS (SELECT * \nFROM dunning_blocks" in sql
+    assert "customer_total >= 20" in sql
+    assert "max(anon_2.level) OVER (PARTITION BY anon_2.customer_id) AS notice_level" in sql
+
+
+def test_candidates_respect_configured_stages():
+    two = DEFAULT_STAGES[:2]
+    assert "coalesce(invoices.dunning_level, 0) < 2" in _sql(stages=two)
@@ -0,0 +1,79 @@
+"""Tests für die Lagerbuchungen: Bestandsänderungen, Sperren und Fehlbestand"""
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.services.inventory_service import InsufficientStock, InventoryService, Movement
+from shared.models.inventory import StockMovementType
+
+MATERIAL, SHELF, YARD = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+
+def test_movement_deltas():
+    transfer = Movement(MATERIAL, StockMovementType.UMLAGERUNG, "2,5", from_location_id=SHELF,
+                        to_location_id=str(YARD), batch_number="C1")
+    assert transfer.deltas() == [((MATERIAL, SHELF, "C1"), Decimal("-2.5")), ((MATERIAL, YARD, "C1"), Decimal("2.5"))]
+    correction = Movement(MATERIAL, StockMovementType.KORREKTUR, Decimal(-3), to_location_id=SHELF)
+    assert correction.deltas() == [((MATERIAL, SHELF, ""), Decimal(-3))]
+
+    with pytest.raises(ValueError):
+        Movement(MATERIAL, StockMovementType.AUSGANG, 1, to_location_id=SHELF).deltas()
+    with pytest.raises(ValueError):
+        Movement(MATERIAL, StockMovementType.EINGANG, 0, to_location_id=SHELF).deltas()
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = InventoryService()
+    levels = {(MATERIAL, SHELF, ""): ("L1", Decimal(5), Decimal(1)), (MATERIAL, YARD, ""): ("L2", Decimal(0), Decimal(0))}
+    monkeypatch.setattr(service, "_lock_levels", lambda session, keys: {key: levels[key] for key in keys})
+    monkeypatch.setattr(service, "_refresh_material_totals", MagicMock())
+    monkeypatch.setattr(service, "_add_movements", lambda session, tenant_id, movements, user_id: movements)
+    return service
+
+
+def test_book_many_sums_deltas_per_level(service):
+    session = MagicMock()
+    service.book_many(session, 1, [
+        Movement(MATERIAL, StockMovementType.AUSGANG, 2, from_location_id=SHELF),
+        Movement(MATERIAL, StockMovementType.UMLAGERUNG, 3, from_location_id=SHELF, to_location_id=YARD),
+    ])
+    (_, rows), _ = session.execute.call_args
+    assert {row["id"]: (row["quantity"], row["available_quantity"]) for row in rows} == {
+        "L1": ("0", "-1"), "L2": ("3", "3"),
+    }
+    service._refresh_material_totals.assert_called_once_with(session, {MATERIAL})
+
+
+def test_shortage_writes_nothing(service):
+    session = MagicMock()
+    with pytest.raises(InsufficientStock) as error:
+        service.book(session, 1, Movement(MATERIAL, StockMovementType.AUSGANG, 6, from_location_id=SHELF))
+    assert error.value.shortages == [((MATERIAL, SHELF, ""), Decimal(5), Decimal(-6))]
+    session.execute.assert_not_called()
+    # Negativbestand nur auf ausdrücklichen Wunsch
+    service.book(session, 1, Movement(MATERIAL, StockMovementType.AUSGANG, 6, from_location_id=SHELF),
+                 allow_negative=True)
+    assert session.execute.call_args.args[1][0]["quantity"] == "-1"
+
+
+def test_lock_levels_in_fixed_order():
+    session = MagicMock()
+    session.execute.return_value.all.return_value = []
+    InventoryService()._lock_levels(session, [(MATERIAL, YARD, ""), (MATERIAL, SHELF, "C1")])
+    insert_sql, select_sql = (str(call.args[0].compile(dialect=postgresql.dialect()))
+                              for call in session.execute.call_args_list)
+    assert "ON CONFLICT (material_id, location_id, coalesce(batch_number, '')) DO NOTHING" in insert_sql
+    assert select_sql.endswith("coalesce(stock_levels.batch_number, '') COLLATE \"C\" FOR NO KEY UPDATE")
+
+
+def test_movement_numbers_continue_per_year():
+    session = MagicMock()
+    session.execute.return_value.scalar.return_value = 41
+    numbers = InventoryService()._allocate_numbers(session, 2)
+    year = datetime.utcnow().year
+    assert numbers == [f"LB{year}000042", f"LB{year}000043"]
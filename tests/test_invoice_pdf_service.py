@@ -0,0 +1,108 @@
+"""Tests für das Rechnungs-PDF: Formatierung, Seitenumbruch, Summenblock, Dateispeicher und Stapel"""
+import textwrap
+import uuid
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+import app.services.invoice_pdf_service as pdf
+from app.services.invoice_pdf_service import (
+    CompanyInfo, InvoiceDocument, InvoiceLine, format_money, format_number, render_batch, resolve_path, store_pdf,
+)
+
+
+def _document(lines=3):
+    return InvoiceDocument(
+        id=uuid.uuid4(), invoice_number="RE-2026-0042", invoice_type="invoice",
+        invoice_date=date(2026, 10, 19), due_date=date(2026, 11, 2), billing_lines=["Holzbau Meier"],
+        subtotal=Decimal("300"), taxes=[(Decimal(19), Decimal(300), Decimal(57))], total=Decimal(357),
+        lines=[InvoiceLine(i, "product", f"Balken {i}", "KVH C24", Decimal(1), "Stk", Decimal(100),
+                           Decimal(0), Decimal(19), Decimal(100)) for i in range(1, lines + 1)],
+    )
+
+
+def test_formatting():
+    assert format_money(Decimal("1234.5")) == "1.234,50 €"
+    assert format_money(Decimal("-0.005")) == "-0,01 €"
+    assert format_number(Decimal("2.000")) == "2"
+    assert format_number(Decimal("1.5")) == "1,5"
+    assert _document().title == "Rechnung"
+
+
+def test_fingerprint_changes_with_company_data():
+    company = CompanyInfo(company_name="Zimmerei Holz")
+    assert company.fingerprint == CompanyInfo(company_name="Zimmerei Holz").fingerprint
+    assert company.fingerprint != CompanyInfo(company_name="Zimmerei Holz", iban="DE89").fingerprint
+
+
+def test_paginate_keeps_totals_with_a_line():
+    template = SimpleNamespace(page_height=842, body_bottom=80)
+    blocks = [(100, i) for i in range(6)]
+    # Erste Seite: 700 - 6 * 100 = 100, Summenblock (150) passt nicht mehr
+    pages = pdf._paginate(template, blocks, first_top=700, totals_height=150)
+    assert [[block[1] for block in page] for page in pages] == [[0, 1, 2, 3, 4], [5]]
+    assert pdf._paginate(template, blocks[:2], first_top=700, totals_height=150) == [blocks[:2]]
+
+
+def _fake_template():
+    """Vorlage ohne ReportLab: Umbruch nach Zeichen, Canvas-Aufrufe werden mitgeschrieben"""
+    return SimpleNamespace(
+        LEADING=13, FONT_SIZE=9.5, MARGIN_LEFT=50, content_width=60, col_unit=380, col_total=545,
+        font="Helvetica", font_bold="Helvetica-Bold", body_bottom=80, page_height=842,
+        company=CompanyInfo(iban="DE89370400440532013000", bank_name="Sparkasse"),
+        split=lambda text, width: textwrap.wrap(text, int(width)),
+    )
+
+
+def test_totals_block_sized_from_wrapped_notes():
+    template = _fake_template()
+    document = _document(1)
+    document.early_payment_discount_days = 10
+    document.early_payment_discount_percent = Decimal(2)
+    document.closing_text = "Vielen Dank für Ihren Auftrag. " * 12
+    rows, notes = pdf._totals_rows(document), pdf._totals_notes(template, document)
+    # Skonto, Fälligkeit, Schlusstext und Bankverbindung - je Absatz umbrochen
+    assert len(notes) == 4 and len(notes[2]) > 3
+    height = pdf._totals_height(template, rows, notes)
+
+    canvas = MagicMock()
+    pdf._draw_totals(canvas, template, document, template.body_bottom + height, rows, notes)
+    drawn = [call.args[2] for call in canvas.drawString.call_args_list]
+    assert drawn[-1].startswith("Bankverbindung: Sparkasse, IBAN DE89")
+    assert len(drawn) == len(rows) + sum(len(lines) for lines in notes)
+    assert min(call.args[1] for call in canvas.drawString.call_args_list) >= template.body_bottom
+
+
+def test_store_pdf_is_content_addressed(tmp_path):
+    key = store_pdf(b"%PDF-1.4 test", tmp_path)
+    assert key.startswith("invoices/") and key.endswith(".pdf")
+    assert store_pdf(b"%PDF-1.4 test", tmp_path) == key
+    assert resolve_path(key, tmp_path).read_bytes() == b"%PDF-1.4 test"
+    assert resolve_path("invoices/00/fehlt.pdf", tmp_path) is None
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_render_batch_in_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf, "render_pdf", lambda document, company: document.invoice_number.encode())
+    monkeypatch.setattr(pdf, "CHUNK_SIZE", 2)
+    documents = [_document(1) for _ in range(5)]
+    for number, document in enumerate(documents):
+        document.invoice_number = f"RE-{number}"
+    chunks = []
+
+    result = render_batch([documents[:3], documents[3:]], CompanyInfo(), root=tmp_path, workers=1,
+                          on_chunk=chunks.append)
+
+    assert [len(chunk) for chunk in chunks] == [2, 1, 2]
+    assert resolve_path(result[documents[4].id], tmp_path).read_bytes() == b"RE-4"
+
+
+def test_render_pdf_is_deterministic():
+    pytest.importorskip("reportlab")
+    document, company = _document(40), CompanyInfo(company_name="Zimmerei Holz", iban="DE89370400440532013000")
+    data = pdf.render_pdf(document, company)
+    assert data.startswith(b"%PDF")
+    assert pdf.render_pdf(document, company) == data
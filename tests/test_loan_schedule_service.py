@@ -0,0 +1,104 @@
+"""Tests für Tilgungspläne: Annuität, Ratentilgung, laufende Darlehen"""
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services.loan_schedule_service import LoanScheduleService, build_schedules, next_due
+
+
+def _loan(**kwargs):
+    values = dict(
+        id=1, payment_frequency="monthly", term_months=120, first_payment_date=date(2020, 1, 31),
+        start_date=date(2020, 1, 1), end_date=date(2029, 12, 31), repayment_type="annuity",
+        monthly_payment=None, principal_amount=Decimal("60000"), current_balance=Decimal("20000"),
+        next_payment_date=None, interest_rate=Decimal("4.5"),
+    )
+    values.update(kwargs)
+    return SimpleNamespace(**values)
+
+
+def test_annuity_repays_balance_with_constant_payment():
+    s = build_schedules([1_000_000], [6.0], [12], [1], np.array(["2026-01-31"], dtype="datetime64[D]"),
+                        np.array(["annuity"]))
+    loans, ks = s.cells()
+    assert len(ks) == 12
+    payments = s.payment[loans, ks]
+    # Annuität 10.000 € / 12 Monate / 6 % p.a. = 860,66 €
+    assert (payments[:-1] == 86066).all()
+    assert s.principal[loans, ks].sum() == 1_000_000
+    assert s.balance[0, 11] == 0
+    assert s.interest[0, 0] == 5000
+    # Tag 31 wird in kurzen Monaten begrenzt
+    assert s.due[0, 1] == np.datetime64("2026-02-28")
+    assert s.due[0, 2] == np.datetime64("2026-03-31")
+
+
+def test_linear_and_bullet_schedules():
+    s = build_schedules([120_000, 120_000], [0.0, 12.0], [4, 4], [3, 3],
+                        np.array(["2026-03-31", "2026-03-31"], dtype="datetime64[D]"),
+                        np.array(["linear", "bullet"]))
+    assert s.principal[0].tolist() == [30_000] * 4
+    assert s.interest[0].tolist() == [0] * 4
+    assert s.principal[1].tolist() == [0, 0, 0, 120_000]
+    assert s.interest[1].tolist() == [3600] * 4
+    assert s.due[0].astype(str).tolist() == ["2026-03-31", "2026-06-30", "2026-09-30", "2026-12-31"]
+
+
+def test_next_due():
+    assert next_due(date(2026, 11, 15), 1, date(2026, 10, 19)) == (0, date(2026, 11, 15))
+    assert next_due(date(2020, 1, 31), 1, date(2026, 10, 19)) == (81, date(2026, 10, 31))
+    assert next_due(date(2026, 1, 15), 3, date(2026, 10, 19)) == (4, date(2027, 1, 15))
+    assert next_due(date(2026, 1, 15), 1, date(2026, 10, 15)) == (9, date(2026, 10, 15))
+
+
+def test_running_loan_starts_today_with_current_balance():
+    service = LoanScheduleService()
+    today = date(2026, 10, 19)
+    params = service.loan_parameters([_loan()], {}, today=today)
+    assert params["first_due"] == [date(2026, 10, 31)]
+    assert params["balance"] == [Decimal("20000")]
+    assert params["number"] == [82]
+    assert params["periods"] == [39]
+
+    schedule = service.build(params)
+    loans, ks = schedule.cells()
+    due = schedule.due[loans, ks].astype(date)
+    assert min(due) >= today
+    assert len(ks) == 39
+    assert schedule.principal[loans, ks].sum() == 2_000_000
+    # Monatsrate auf 20.000 € Restschuld, nicht auf die ursprünglichen 60.000 €
+    assert schedule.payment[0, 0] < 60_000
+
+
+def test_new_loan_starts_at_first_payment_date():
+    service = LoanScheduleService()
+    loan = _loan(first_payment_date=date(2027, 1, 31), start_date=date(2026, 12, 1),
+                 end_date=date(2036, 12, 31), current_balance=Decimal("60000"))
+    params = service.loan_parameters([loan], {}, today=date(2026, 10, 19))
+    assert params["first_due"] == [date(2027, 1, 31)]
+    assert params["balance"] == [Decimal("60000")]
+    assert params["periods"] == [120]
+    assert params["number"] == [1]
+
+
+def test_resume_after_old_settled_installment_skips_past_dates():
+    service = LoanScheduleService()
+    resume = {1: (10, date(2020, 10, 31), Decimal("55000"))}
+    params = service.loan_parameters([_loan()], resume, today=date(2026, 10, 19))
+    assert params["first_due"] == [date(2026, 10, 31)]
+    assert params["balance"] == [Decimal("20000")]
+    assert params["number"] == [82]
+
+
+def test_employee_loan_resumes_in_current_payroll_month():
+    service = LoanScheduleService()
+    loan = SimpleNamespace(id=7, first_payment_date=date(2026, 1, 5), term_months=24,
+                           principal_amount=Decimal("2400"), monthly_payment=Decimal("100"),
+                           amount_remaining=Decimal("1500"), interest_rate=0)
+    params = service.employee_loan_parameters([loan], {}, today=date(2026, 10, 19))
+    assert params["first_due"] == [date(2026, 10, 5)]
+    assert params["balance"] == [Decimal("1500")]
+    assert params["number"] == [10]
+    assert params["periods"] == [15]
@@ -0,0 +1,68 @@
+"""Tests für die Lookup-Daten: Stempelprüfung, Versionen und Invalidierung"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+import app.services.lookup_service as lookup_module
+from app.services.lookup_service import LookupEntry, LookupService
+from shared.models import Customer
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    state = {"stamp": (2, None), "rows": [(1, "K-1", "Holzbau Meier"), (2, "K-2", None)], "calls": []}
+
+    def execute(session, name, **params):
+        state["calls"].append(name)
+        if name.endswith(".stamp"):
+            result = MagicMock()
+            result.one.return_value = state["stamp"]
+            return result
+        return state["rows"]
+
+    monkeypatch.setattr(lookup_module.registry, "execute", execute)
+    return state
+
+
+def test_entries_and_labels(queries):
+    data = LookupService().get(None, "customers", tenant_id=7)
+    assert data.version == 1
+    assert [entry.label for entry in data.entries] == ["K-1 - Holzbau Meier", "K-2"]
+    assert LookupEntry(3, "", "Nur Name").label == "Nur Name"
+
+
+def test_reload_only_on_changed_stamp(queries, monkeypatch):
+    service = LookupService()
+    first = service.get(None, "customers")
+    # Innerhalb des Intervalls keine Abfrage
+    assert service.get(None, "customers") is first
+    assert queries["calls"] == ["customers.stamp", "customers.lookup"]
+
+    clock = [lookup_module.time.monotonic() + lookup_module.STAMP_INTERVAL + 1]
+    monkeypatch.setattr(lookup_module.time, "monotonic", lambda: clock[0])
+    assert service.get(None, "customers") is first
+    assert queries["calls"][-1] == "customers.stamp"
+
+    queries["stamp"] = (3, None)
+    clock[0] += lookup_module.STAMP_INTERVAL + 1
+    assert service.get(None, "customers").version == 2
+
+
+def test_commit_invalidates_changed_kinds(queries):
+    service = LookupService()
+    service.get(None, "customers")
+    service.get(None, "projects")
+    session = SimpleNamespace(info={}, new=[Customer()], dirty=[], deleted=[])
+    service._after_flush(session, None)
+    service._after_commit(session)
+
+    queries["calls"].clear()
+    assert service.get(None, "customers").version == 2
+    assert service.get(None, "projects").version == 1
+    assert queries["calls"] == ["customers.stamp", "customers.lookup"]
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        LookupService().get(None, "rechnungen")
@@ -0,0 +1,70 @@
+"""Tests für die ML-Prognosen: Training, Versionierung und Trainingsprozess"""
+from concurrent.futures import Future
+from unittest.mock import MagicMock
+
+import numpy as np
+import sqlalchemy
+
+import app.services.ml_service as ml
+from app.services.ml_service import (
+    FEATURE_NAMES, MIN_TRAINING_SAMPLES, MLService, load_model, save_model, train_models,
+)
+
+
+def _data(samples, seed=1):
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=(samples, len(FEATURE_NAMES)))
+    cost = np.exp(10 + 0.5 * x[:, 0])
+    defect = (x[:, 1] > 0).astype(float)
+    return x, cost, defect
+
+
+def test_train_models_fits_both_heads():
+    arrays, meta = train_models(*_data(60))
+    assert meta["samples"] == 60
+    assert meta["cost_r2"] > 0.95
+    assert {"mean", "scale", "cost_coef", "defect_coef"} <= set(arrays)
+
+
+def test_save_and_load_keeps_latest_versions(tmp_path):
+    arrays, meta = train_models(*_data(20))
+    versions = [save_model(tmp_path, arrays, meta) for _ in range(ml.KEEP_VERSIONS + 1)]
+    assert versions == list(range(1, ml.KEEP_VERSIONS + 2))
+    assert len(list(tmp_path.glob("v*"))) == ml.KEEP_VERSIONS
+    model = load_model(tmp_path)
+    assert model.version == versions[-1]
+    assert model.has_cost and model.has_defect
+
+
+def _patch_training(monkeypatch, samples):
+    engines = []
+
+    def create_engine(url, **kwargs):
+        engines.append(kwargs)
+        return MagicMock()
+
+    monkeypatch.setattr(sqlalchemy, "create_engine", create_engine)
+    monkeypatch.setattr("sqlalchemy.orm.Session", MagicMock())
+    monkeypatch.setattr(ml, "load_training_data", lambda session, tenant_id: _data(samples))
+    return engines
+
+
+def test_train_process_passes_connect_args(tmp_path, monkeypatch):
+    engines = _patch_training(monkeypatch, 20)
+    args = {"sslmode": "require", "sslrootcert": "/certs/ca.crt"}
+    assert ml._train_process("postgresql://db/x", None, str(tmp_path), args) == 1
+    assert engines[0]["connect_args"] == args
+
+
+def test_too_few_samples_save_nothing(tmp_path, monkeypatch):
+    _patch_training(monkeypatch, MIN_TRAINING_SAMPLES - 1)
+    assert ml._train_process("postgresql://db/x", None, str(tmp_path), {}) is None
+    assert not any(tmp_path.rglob("meta.json"))
+
+    service = MLService(MagicMock(), model_root=tmp_path)
+    assert service.needs_training()
+    future = Future()
+    future.set_result(None)
+    service._on_trained(future)
+    assert service.last_error is None
+    assert not service.needs_training()
@@ -0,0 +1,98 @@
+"""Tests für die Lohnabrechnung: Tarif, Rechengrößen je Jahr, Abrechnungsnummern und Darlehensraten"""
+import uuid
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.services import payroll_service
+from app.services.payroll_service import (
+    PayrollParameters, PayrollService, income_tax_tariff, parameters_for, solidarity_surcharge,
+)
+
+
+def test_income_tax_tariff_2025():
+    p = parameters_for(2025)
+    tax = income_tax_tariff(np.array([12096.0, 20000.0, 60000.0, 300000.0]), p)
+    assert tax.tolist() == [0.0, 1639.0, 14415.0, 115753.0]
+    # Milderungszone: 11,9 % des Betrags über der Freigrenze
+    soli = solidarity_surcharge(np.array([19950.0, 25000.0, 40000.0]), np.array([1, 1, 1]), p)
+    assert soli.tolist() == pytest.approx([0.0, 600.95, 2200.0])
+
+
+def test_parameters_keyed_by_period_year(monkeypatch):
+    p2026 = PayrollParameters(year=2026, basic_allowance=12348.0)
+    monkeypatch.setitem(payroll_service.PAYROLL_PARAMETERS, 2026, p2026)
+    assert parameters_for(2026) is p2026
+    assert parameters_for(2027) is p2026
+    assert parameters_for(2025).year == 2025
+    assert parameters_for(2020).year == 2025
+    assert PayrollService().parameters_for(2026) is p2026
+    fixed = PayrollParameters()
+    assert PayrollService(fixed).parameters_for(2026) is fixed
+
+
+def test_payslip_numbers_unique_per_tenant():
+    ids = [uuid.uuid4() for _ in range(4)]
+    inputs = SimpleNamespace(employee_ids=ids, employee_numbers=["0007", None, "0009", "0009"])
+    period = SimpleNamespace(tenant_id=uuid.uuid4(), year=2026, month=10)
+    session = MagicMock()
+    # Abrechnung von 0007 ist gelöscht (soft delete), die Nummer ist noch belegt
+    session.execute.return_value.scalars.return_value = ["LA-202610-0007"]
+
+    numbers = PayrollService()._payslip_numbers(session, period, inputs)
+
+    assert numbers == ["LA-202610-0007-2", f"LA-202610-{ids[1]}", "LA-202610-0009", "LA-202610-0009-2"]
+    assert all(len(number) <= 50 for number in numbers)
+
+
+def _session(installments, unscheduled):
+    session = MagicMock()
+    first, second = MagicMock(), MagicMock()
+    first.all.return_value = installments
+    second.scalars.return_value.all.return_value = unscheduled
+    session.execute.side_effect = [first, second]
+    return session
+
+
+def test_loan_repayment_booked_on_installments_then_unscheduled(monkeypatch):
+    employee, loan_a, loan_b = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    payslip = SimpleNamespace(id=uuid.uuid4(), employee_id=employee, loan_repayment=Decimal("180.00"),
+                              calculation_details={"loan_ids": [str(loan_a), str(loan_b)]})
+    period = SimpleNamespace(tenant_id=uuid.uuid4(), start_date=date(2026, 9, 1), end_date=date(2026, 9, 30),
+                             payment_date=date(2026, 9, 30))
+    installment = SimpleNamespace(id=uuid.uuid4(), employee_id=employee, open_amount=Decimal("120.00"))
+    unscheduled = SimpleNamespace(employee_id=employee, monthly_payment=Decimal("100.00"),
+                                  amount_remaining=Decimal("500.00"), amount_repaid=Decimal("0"), status="active")
+    calls = []
+    schedule = SimpleNamespace(record_payment=lambda session, installment_id, amount, **kw: calls.append(
+        (installment_id, amount, kw["payslip_id"], kw["employee_loan"])))
+    monkeypatch.setattr(payroll_service, "get_loan_schedule_service", lambda: schedule)
+
+    result = PayrollService()._book_loan_repayments(_session([installment], [unscheduled]), period, [payslip])
+
+    assert calls == [(installment.id, Decimal("120.00"), payslip.id, True)]
+    # Rest des Abzugs (60 €) geht an das Darlehen ohne Tilgungsplan
+    assert unscheduled.amount_remaining == Decimal("440.00")
+    assert unscheduled.amount_repaid == Decimal("60.00")
+    assert result == {"loan_installments": 2, "loan_amount": Decimal("180.00")}
+
+
+def test_reduced_deduction_pays_installment_partially(monkeypatch):
+    employee = uuid.uuid4()
+    payslip = SimpleNamespace(id=uuid.uuid4(), employee_id=employee, loan_repayment=Decimal("50.00"),
+                              calculation_details={"loan_ids": [str(uuid.uuid4())]})
+    period = SimpleNamespace(tenant_id=None, start_date=date(2026, 9, 1), end_date=date(2026, 9, 30),
+                             payment_date=None)
+    rows = [SimpleNamespace(id=1, employee_id=employee, open_amount=Decimal("120.00")),
+            SimpleNamespace(id=2, employee_id=employee, open_amount=Decimal("120.00"))]
+    calls = []
+    schedule = SimpleNamespace(record_payment=lambda session, installment_id, amount, **kw: calls.append(
+        (installment_id, amount, kw["payment_date"])))
+    monkeypatch.setattr(payroll_service, "get_loan_schedule_service", lambda: schedule)
+
+    PayrollService()._book_loan_repayments(_session(rows, []), period, [payslip])
+    assert calls == [(1, Decimal("50.00"), date(2026, 9, 30))]
@@ -0,0 +1,89 @@
+"""Tests für die Projekt-Kostenübersicht: Beiträge je Quellzeile und Flush-Deltas"""
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.project_cost_service import (
+    TRACKED_COLUMNS, ProjectCostService, _employee_rate, _invoice_contribution, _movement_contribution,
+    _time_entry_contribution, parse_number,
+)
+from shared.models import Invoice, TimeEntry
+from shared.models.inventory import StockMovementType
+from shared.models.invoice import InvoiceStatus, InvoiceType
+
+PROJECT = uuid.uuid4()
+
+
+def _time_entry(**values):
+    state = dict(tenant_id=1, project_id=PROJECT, employee_id="e1", hours="8", overtime_hours="2",
+                 activity_type="Montage", status="approved", cost_rate=Decimal("40"))
+    state.update(values)
+    return state
+
+
+def test_parse_number():
+    assert parse_number(" 1,5 ") == Decimal("1.5")
+    assert parse_number("-3") == Decimal(-3)
+    assert parse_number("abc") == 0
+    assert parse_number(None) == 0
+
+
+def test_employee_rate_from_salary():
+    assert _employee_rate("25,50", None, None) == Decimal("25.50")
+    # 3.250 € bei 40 Wochenstunden: 3250 / (40 * 13 / 3)
+    assert _employee_rate(None, "3250", None) == Decimal("18.75")
+
+
+def test_time_entry_contribution():
+    _, project_id, values = _time_entry_contribution(_time_entry(), {})
+    assert project_id == PROJECT
+    # 8 h + 2 Überstunden mit 25 % Zuschlag
+    assert values["labor_cost"] == Decimal("420.00")
+    assert values["hours_total"] == values["hours_approved"] == values["hours_assembly"] == Decimal(10)
+    assert _time_entry_contribution(_time_entry(status="rejected"), {}) is None
+    _, _, values = _time_entry_contribution(_time_entry(cost_rate=None), {"e1": Decimal(30)})
+    assert values["labor_cost"] == Decimal("315.00")
+
+
+def test_movement_and_invoice_signs():
+    movement = dict(tenant_id=1, reference_type="project", reference_id=PROJECT, material_id="m1",
+                    movement_type=StockMovementType.RUECKGABE, quantity="2", unit_cost=None)
+    _, _, values = _movement_contribution(movement, {"m1": Decimal("12.5")})
+    assert values["material_cost"] == Decimal("-25.00")
+
+    invoice = dict(tenant_id=1, project_id=PROJECT, invoice_type=InvoiceType.CREDIT_NOTE,
+                   status=InvoiceStatus.PAID, subtotal="100", paid_amount="100", is_deleted=False)
+    _, _, values = _invoice_contribution(invoice, {})
+    assert values["invoiced_net"] == Decimal(-100)
+    assert _invoice_contribution({**invoice, "status": InvoiceStatus.DRAFT}, {}) is None
+
+
+def test_flush_writes_net_delta_per_project():
+    service = ProjectCostService()
+    old = _time_entry()
+    changed = SimpleNamespace(**_time_entry(hours="10"))
+    new_invoice = SimpleNamespace(tenant_id=1, project_id=PROJECT, invoice_type=InvoiceType.INVOICE,
+                                  status=InvoiceStatus.SENT, subtotal="500", paid_amount="0", is_deleted=False)
+    session = SimpleNamespace(info={
+        "_project_cost_pending": [[TimeEntry, changed, old, False], [Invoice, new_invoice, None, False]],
+        "_project_cost_lookup": {},
+    }, connection=MagicMock())
+
+    service._after_flush(session, None)
+
+    stmt = session.connection.return_value.execute.call_args.args[0]
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (project_id) DO UPDATE SET hours_total = (project_cost_summaries.hours_total + excluded.hours_total)" in sql
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert params["hours_total_m0"] == Decimal(2)
+    assert params["labor_cost_m0"] == Decimal("80.00")
+    assert params["invoiced_net_m0"] == Decimal(500)
+    assert params["invoice_count_m0"] == 1 and params["time_entry_count_m0"] == 0
+
+
+def test_tracked_columns_cover_contributions():
+    # Jede von den Beiträgen gelesene Spalte wird auch verfolgt
+    assert set(_time_entry()) == set(TRACKED_COLUMNS[TimeEntry])
@@ -0,0 +1,64 @@
+"""Tests für die Query-Registry: Cache-Zähler und schmale Listenabfragen"""
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, insert, lambda_stmt, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from app.services.query_registry import MATERIAL_LIST_COLUMNS, QueryStats, registry
+
+items = Table("items", MetaData(), Column("id", Integer, primary_key=True), Column("name", String))
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    items.create(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(items), [{"name": "Balken"}, {"name": "Latte"}])
+
+    @registry.query("test.items")
+    def items_by_name(label=None):
+        stmt = lambda_stmt(lambda: select(items.c.id, items.c.name))
+        if label:
+            stmt += lambda s: s.where(items.c.name == label)
+        return stmt
+
+    registry.attach(engine)
+    registry.reset_stats()
+    yield engine
+    registry._builders.pop("test.items", None)
+    registry._stats.pop("test.items", None)
+    engine.dispose()
+
+
+def test_compile_cache_hits_counted_per_query(engine):
+    with Session(engine) as session:
+        assert registry.execute(session, "test.items", label="Balken").all() == [(1, "Balken")]
+        assert registry.execute(session, "test.items", label="Latte").all() == [(2, "Latte")]
+        registry.execute(session, "test.items").all()
+
+    (stats,) = [row for row in registry.get_stats() if row["name"] == "test.items"]
+    assert stats["executions"] == 3
+    # Gleiche Lambda-Struktur mit anderem Wert ist ein Treffer, ohne Filter eine neue Form
+    assert (stats["cache_hits"], stats["cache_misses"]) == (1, 2)
+
+
+def test_attach_is_idempotent(engine):
+    registry.attach(engine)
+    with Session(engine) as session:
+        registry.execute(session, "test.items").all()
+    (stats,) = [row for row in registry.get_stats() if row["name"] == "test.items"]
+    assert stats["cache_hits"] + stats["cache_misses"] == 1
+
+
+def test_stats_without_lookups():
+    assert QueryStats().to_dict() == {"executions": 0, "cache_hits": 0, "cache_misses": 0,
+                                      "hit_rate": 0.0, "avg_ms": 0.0}
+
+
+def test_material_list_selects_only_displayed_columns():
+    stmt = registry.statement("materials.list", tenant_id=1, search="kvh")
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    selected = sql.split("\nFROM ", 1)[0]
+    assert selected.count("materials.") == len(MATERIAL_LIST_COLUMNS)
+    assert "materials.description" not in selected
@@ -0,0 +1,97 @@
+"""Tests für Abo-Rechnungen: Leistungszeiträume, Beträge und Vergabe der Rechnungsnummern"""
+import re
+import threading
+import time
+from datetime import date
+from types import SimpleNamespace
+
+from app.services import recurring_invoice_service
+from app.services.invoice_number_service import allocate_invoice_numbers
+from app.services.recurring_invoice_service import (
+    RecurringInvoiceService, calculate_items, calculate_totals, due_periods,
+)
+
+
+def test_due_periods_keep_month_end_anchor():
+    periods, following = due_periods(date(2026, 1, 31), date(2026, 2, 28), None, "monthly", date(2026, 4, 15))
+    assert periods == [(date(2026, 2, 28), date(2026, 3, 30)), (date(2026, 3, 31), date(2026, 4, 29))]
+    assert following == date(2026, 4, 30)
+
+
+def test_due_periods_stop_at_end_date():
+    periods, following = due_periods(date(2026, 1, 1), None, date(2026, 5, 15), "quarterly", date(2026, 12, 31))
+    assert periods == [(date(2026, 1, 1), date(2026, 3, 31)), (date(2026, 4, 1), date(2026, 5, 15))]
+    assert following == date(2026, 7, 1)
+
+
+def test_totals_per_tax_rate():
+    item = lambda qty, price, rate: SimpleNamespace(
+        position=1, title="x", description=None, quantity=qty, unit=None, unit_price=price, tax_rate=rate)
+    lines, bases = calculate_items([item("3", "19,99", "19"), item("1", "10.00", "7")])
+    assert lines[0]["subtotal"] == "59.97" and lines[0]["tax_amount"] == "11.39"
+    totals = calculate_totals(bases)
+    assert (totals["tax_rate_1"], totals["tax_amount_1"], totals["tax_amount_2"]) == ("19", "11.39", "0.70")
+    assert totals["total"] == "82.06"
+
+
+def test_numbers_follow_invoice_date_year(monkeypatch):
+    calls = []
+
+    def allocate(session, count, year):
+        calls.append((count, year))
+        return [f"R{year}{n:04d}" for n in range(1, count + 1)]
+
+    monkeypatch.setattr(recurring_invoice_service, "allocate_invoice_numbers", allocate)
+    numbers = RecurringInvoiceService._allocate_numbers(None, [2025, 2026, 2025])
+    assert numbers == ["R20250001", "R20260001", "R20250002"]
+    assert calls == [(2, 2025), (1, 2026)]
+
+
+class _Database:
+    """Rechnungstabelle mit Advisory-Lock, der bis zum Commit gehalten wird"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.numbers = ["R20260007", "R2026X", "R20250099"]
+
+
+class _Session:
+    def __init__(self, db):
+        self.db = db
+        self.locked = False
+
+    def execute(self, stmt):
+        if "pg_advisory_xact_lock" in str(stmt):
+            self.db.lock.acquire()
+            self.locked = True
+            return SimpleNamespace(scalar=lambda: None)
+        prefix = "R2026"
+        sequences = [int(n[len(prefix):]) for n in self.db.numbers if re.fullmatch(rf"{prefix}[0-9]+", n)]
+        time.sleep(0.01)  # parallele Läufe überlappen lassen
+        return SimpleNamespace(scalar=lambda: max(sequences, default=None))
+
+    def commit(self, numbers):
+        self.db.numbers.extend(numbers)
+        if self.locked:
+            self.db.lock.release()
+
+
+def test_allocation_is_serialized_across_transactions():
+    db = _Database()
+    results = []
+
+    def worker():
+        session = _Session(db)
+        numbers = allocate_invoice_numbers(session, 3, 2026)
+        session.commit(numbers)
+        results.append(numbers)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    allocated = sorted(number for numbers in results for number in numbers)
+    assert allocated == [f"R2026{n:04d}" for n in range(8, 20)]
+    assert all(numbers == sorted(numbers) for numbers in results)
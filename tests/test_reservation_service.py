@@ -0,0 +1,91 @@
+"""Tests für Reservierungen: Zeiträume, freie Fenster und Überschneidungsprüfung ohne btree_gist"""
+from datetime import date, datetime, time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects.postgresql import Range
+
+from app.services.reservation_service import (
+    ReservationConflict, ReservationService, _free_slots, _hours_by_day, reservation_migrations,
+    reservation_period,
+)
+
+
+def test_reservation_period_whole_days_and_clock_times():
+    assert reservation_period(date(2026, 3, 2), None, date(2026, 3, 3), None) == (
+        datetime(2026, 3, 2), datetime(2026, 3, 4))
+    assert reservation_period(date(2026, 3, 2), "7:30", date(2026, 3, 2), "16:00") == (
+        datetime(2026, 3, 2, 7, 30), datetime(2026, 3, 2, 16, 0))
+    # Ungültige Uhrzeit zählt als ganzer Tag
+    assert reservation_period(date(2026, 3, 2), "25:00", date(2026, 3, 2), "x")[1] == datetime(2026, 3, 3)
+
+
+def test_free_slots_and_hours_by_day():
+    busy = [(datetime(2026, 3, 2, 8), datetime(2026, 3, 2, 12)),
+            (datetime(2026, 3, 2, 22), datetime(2026, 3, 3, 2))]
+    free = _free_slots(busy, date(2026, 3, 2), date(2026, 3, 3), time(7, 0), time(17, 0))
+    assert free == [
+        (datetime(2026, 3, 2, 7), datetime(2026, 3, 2, 8)),
+        (datetime(2026, 3, 2, 12), datetime(2026, 3, 2, 17)),
+        (datetime(2026, 3, 3, 7), datetime(2026, 3, 3, 17)),
+    ]
+    assert _hours_by_day(busy) == {date(2026, 3, 2): 6.0, date(2026, 3, 3): 2.0}
+
+
+def test_backfill_is_not_registered_as_index_migration():
+    assert all(name.startswith("ex_reservations_") for _, name, _ in reservation_migrations())
+
+
+def _session():
+    session = MagicMock()
+    session.get_bind.return_value.url = "postgresql://test/db"
+    return session
+
+
+def _reservation(status="pending"):
+    return SimpleNamespace(period=None, vehicle_id="v1", equipment_id=None, id=None, status=status,
+                           start_date=None, start_time=None, end_date=None, end_time=None)
+
+
+def test_overlap_rejected_when_exclusion_constraints_missing(monkeypatch):
+    service = ReservationService()
+    session = _session()
+    session.execute.return_value.scalar.return_value = 0  # keine Constraints vorhanden
+    existing = SimpleNamespace(period=Range(datetime(2026, 3, 2, 8), datetime(2026, 3, 2, 12)))
+    monkeypatch.setattr(service, "find_conflicts", lambda *a, **k: [existing])
+
+    reservation = _reservation()
+    with pytest.raises(ReservationConflict):
+        service._write_checked(session, reservation, lambda: service._set_period(
+            reservation, date(2026, 3, 2), "10:00", date(2026, 3, 2), "14:00"))
+    session.flush.assert_not_called()
+    session.begin_nested.return_value.rollback.assert_called_once()
+    # Advisory-Lock vor der Prüfung
+    assert "pg_advisory_xact_lock" in str(session.execute.call_args_list[1].args[0])
+
+
+def test_constraint_check_skipped_once_constraints_exist(monkeypatch):
+    service = ReservationService()
+    session = _session()
+    session.execute.return_value.scalar.return_value = 2
+    monkeypatch.setattr(service, "find_conflicts", lambda *a, **k: pytest.fail("keine App-Prüfung erwartet"))
+
+    for _ in range(2):
+        reservation = _reservation()
+        service._write_checked(session, reservation, lambda: service._set_period(
+            reservation, date(2026, 3, 2), None, date(2026, 3, 2), None))
+    # Das Ergebnis der Constraint-Abfrage wird gemerkt
+    assert session.execute.call_count == 1
+    assert session.flush.call_count == 2
+
+
+def test_cancelled_reservation_needs_no_overlap_check(monkeypatch):
+    service = ReservationService()
+    session = _session()
+    session.execute.return_value.scalar.return_value = 0
+    monkeypatch.setattr(service, "find_conflicts", lambda *a, **k: pytest.fail("storniert blockiert nichts"))
+    reservation = _reservation(status="cancelled")
+    service._write_checked(session, reservation, lambda: service._set_period(
+        reservation, date(2026, 3, 2), None, date(2026, 3, 2), None))
+    session.flush.assert_called_once()
@@ -0,0 +1,100 @@
+"""Tests für den SEPA-Export: Vorprüfung, Aufteilung und Datei"""
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from app.services.sepa_export_service import (
+    CREDIT_TRANSFER, DIRECT_DEBIT, NAMESPACES, SepaExportError, SepaExportService,
+    sepa_text, valid_bics, valid_ibans,
+)
+
+IBAN = "DE89 3704 0044 0532 0130 00"
+
+
+def _payment(number, amount="10.00", iban=IBAN, bic="COBADEFFXXX", name="Holzbau Meier", **mandate):
+    row = dict(id=uuid.uuid4(), payment_number=number, amount=Decimal(amount), currency="EUR",
+               reference=f"Rechnung {number}", name=name, iban=iban, bic=bic, sequence="RCUR",
+               mandate_reference="M-1", signature_date=date(2025, 1, 1), mandate_status="active",
+               valid_from=None, valid_until=None)
+    row.update(mandate)
+    return SimpleNamespace(**row)
+
+
+def _batch(batch_type=CREDIT_TRANSFER):
+    return SimpleNamespace(id=uuid.uuid4(), tenant_id=1, batch_number="SEPA-7", batch_type=batch_type,
+                           execution_date=date(2026, 11, 2), bank_account_id=None, updated_by=None)
+
+
+def test_iban_and_bic_checks():
+    ibans = [IBAN, "DE89370400440532013001", "DE8937040044053201300", "NL91ABNA0417164300", "DEÄ9370400440532013000"]
+    assert valid_ibans(ibans).tolist() == [True, False, False, True, False]
+    assert valid_bics(["COBADEFFXXX", "COBADEFF", "", "COBA1EFF"]).tolist() == [True, True, True, False]
+    assert not valid_bics([""], required=True)[0]
+
+
+def test_sepa_text_transliterates():
+    assert sepa_text("Müller & Söhne – Zimmerei™ ", 70) == "Müller & Söhne ZimmereiTM"
+    assert sepa_text("Ćwikła", 4) == "Cwik"
+
+
+def test_validate_flags_first_failed_check():
+    session = MagicMock()
+    rows = [
+        _payment("P1"),
+        _payment("P2", iban="DE00370400440532013000"),
+        _payment("P3", amount="0"),
+        _payment("P4", mandate_status="revoked"),
+        _payment("P5", valid_until=date(2026, 10, 31)),
+    ]
+    session.execute.return_value.all.return_value = rows
+    checked = SepaExportService().validate(session, _batch(DIRECT_DEBIT))
+    assert checked["ids"].tolist() == [rows[0].id]
+    assert checked["cents"].tolist() == [1000]
+    assert [code for _, code in checked["invalid"]] == ["IBAN", "AMOUNT", "MANDATE", "MANDATE"]
+
+
+def test_split_into_follow_up_batches():
+    session = MagicMock()
+    checked = {"ids": np.array(list("abcde"), dtype=object),
+               "sequences": np.array(["RCUR", "FRST", "RCUR", "FRST", "RCUR"], dtype=object)}
+    parts = SepaExportService(max_transactions=2)._split(session, _batch(DIRECT_DEBIT), checked)
+
+    assert [part.batch_number for part, _ in parts] == ["SEPA-7", "SEPA-7-2", "SEPA-7-3"]
+    # Nach Sequenztyp sortiert: beide FRST im ersten Teil
+    assert [checked["sequences"][indices].tolist() for _, indices in parts] == [
+        ["FRST", "FRST"], ["RCUR", "RCUR"], ["RCUR"],
+    ]
+    assert session.add.call_count == 2
+
+
+def _write(tmp_path, rows, groups):
+    session = MagicMock()
+    session.execute.return_value = rows
+    account = SimpleNamespace(account_holder="Zimmerei Holz GmbH", name="Hauptkonto", bic="COBADEFFXXX",
+                              iban=IBAN, creditor_id="DE98ZZZ09999999999")
+    service = SepaExportService(root=tmp_path)
+    return service, service._write(session, _batch(), account, groups)
+
+
+def test_write_credit_transfer_file(tmp_path):
+    rows = [_payment("P1", "10.50"), _payment("P2", "2.00", bic=None)]
+    _, key = _write(tmp_path, rows, {"": (2, 1250)})
+
+    assert key.startswith("sepa/") and (tmp_path / key).exists()
+    ns = {"p": NAMESPACES[CREDIT_TRANSFER]}
+    root = ET.parse(tmp_path / key).getroot()
+    assert root.findtext("p:CstmrCdtTrfInitn/p:GrpHdr/p:CtrlSum", namespaces=ns) == "12.50"
+    assert len(root.findall(".//p:CdtTrfTxInf", ns)) == 2
+    assert len(root.findall(".//p:CdtTrfTxInf/p:CdtrAgt", ns)) == 1
+
+
+def test_write_detects_changed_payments(tmp_path):
+    with pytest.raises(SepaExportError):
+        _write(tmp_path, [_payment("P1", "10.50")], {"": (1, 1000)})
+    assert not list((tmp_path / "sepa").glob("*.tmp"))
@@ -0,0 +1,80 @@
+"""Tests für den System-Sampler: Ringpuffer, Fenster und Verdichtung"""
+import pytest
+
+from app.services.system_sampler import RingBuffer, SystemSampler
+
+
+def test_ring_buffer_wraps_in_order():
+    buffer = RingBuffer(capacity=3)
+    assert buffer.latest() is None
+    for t in range(5):
+        buffer.append(float(t), t * 10.0)
+    times, values = buffer.window()
+    assert times.tolist() == [2.0, 3.0, 4.0]
+    assert values.tolist() == [20.0, 30.0, 40.0]
+    assert len(buffer) == 3
+    assert buffer.latest() == 40.0
+
+
+def test_window_limited_to_last_seconds():
+    buffer = RingBuffer(capacity=10)
+    for t in range(6):
+        buffer.append(100.0 + t, float(t))
+    times, _ = buffer.window(seconds=2, now=105.0)
+    assert times.tolist() == [103.0, 104.0, 105.0]
+    # Abgeschlossenes Intervall (101, 103]
+    times, _ = buffer.window(seconds=2, until=103.0)
+    assert times.tolist() == [102.0, 103.0]
+    assert buffer.window(until=101.0)[0].tolist() == [100.0, 101.0]
+
+
+def test_stats_and_persist_aggregate_interval():
+    persisted = []
+    sampler = SystemSampler(capacity=10, on_persist=lambda data, start, end: persisted.append((data, start, end)))
+    for t, value in enumerate([10, 20, 30, 40, 50]):
+        sampler._record(1000.0 + t * 20, {"cpu.percent": value, "db.latency_ms": None, "custom": 1})
+
+    assert sampler.stats("cpu.percent", 40, now=1060.0) == pytest.approx(
+        {"min": 20, "max": 50, "avg": 35, "sum": 140, "count": 4, "last": 50})
+    assert sampler.stats("cpu.percent", 40, until=1060.0)["count"] == 2
+    assert sampler.stats("db.latency_ms") is None
+    assert sampler.metric_names() == ["cpu.percent", "custom"]
+
+    sampler._persist(1020.0, 1060.0)
+    ((data, start, end),) = persisted
+    # Nur die persistierten Metriken, fremde Namen bleiben im Speicher
+    assert set(data) == {"cpu.percent"}
+    # (1020, 1060]: der Messpunkt an der Grenze gehört zum vorigen Intervall, 1080 zum nächsten
+    assert (start, end, data["cpu.percent"]["count"], data["cpu.percent"]["last"]) == (1020.0, 1060.0, 2, 40)
+    assert sampler._last_persist == 1060.0
+
+
+def test_slow_collection_records_db_latency():
+    sampler = SystemSampler(db_latency_probe=lambda: 12.5)
+    sampler._collect_slow(2000.0)
+    assert sampler.latest("db.latency_ms") == 12.5
+    assert sampler.snapshot()["database"] == {"latency_ms": 12.5}
+
+
+def test_connections_fall_back_for_older_psutil():
+    sampler = SystemSampler()
+
+    class OldProcess:
+        def open_files(self):
+            return []
+
+        def connections(self):
+            return [object(), object()]
+
+    sampler._process = OldProcess()
+    sampler._collect_slow(2000.0)
+    assert sampler.snapshot()["app_handles"] == {"open_files": 0, "connections": 2}
+
+
+def test_start_stop():
+    sampler = SystemSampler(interval=0.01, slow_interval=60)
+    sampler.start()
+    sampler.start()
+    assert sampler.is_running
+    sampler.stop()
+    assert not sampler.is_running
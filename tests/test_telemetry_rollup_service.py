@@ -0,0 +1,101 @@
+"""Tests für die Telemetrie-Rollups: Partitionen, Perzentile und gewichteter Durchschnitt"""
+import math
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from app.services.telemetry_rollup_service import (
+    PARTITIONED_TABLES, SKETCH_GAMMA, TelemetryRollupService, _horizon, _parse_partition_start,
+    _partition_name, create_partitions, drop_expired_partitions, sketch_percentiles,
+)
+
+
+def _conn(partitions=(), stranded=()):
+    """Verbindung, die Katalog- und DEFAULT-Abfragen beantwortet und alle Statements mitschreibt"""
+    conn = MagicMock()
+    statements = []
+
+    def execute(statement, params=None):
+        sql = str(statement)
+        statements.append(sql)
+        result = MagicMock()
+        if "pg_inherits" in sql:
+            result.scalars.return_value = list(partitions)
+        elif "SELECT DISTINCT date_trunc" in sql:
+            result.scalars.return_value = list(stranded)
+        return result
+
+    conn.execute.side_effect = execute
+    return conn, statements
+
+
+def test_partition_names_round_trip():
+    start = datetime(2026, 10, 19)
+    name = _partition_name("system_metrics", start, "day")
+    assert name == "system_metrics_p20261019"
+    assert _parse_partition_start("system_metrics", name, "day") == start
+    assert _parse_partition_start("system_metrics", "system_metrics_default", "day") is None
+    assert _horizon(datetime(2026, 10, 19, 13), PARTITIONED_TABLES["system_health"]) == datetime(2026, 12, 1)
+
+
+def test_default_rows_moved_before_partition_is_created():
+    conn, statements = _conn(partitions=["system_metrics_default", "system_metrics_p20261019"],
+                             stranded=[datetime(2026, 10, 20)])
+    create_partitions(conn, "system_metrics", datetime(2026, 10, 19, 13), datetime(2026, 10, 22))
+    ddl = [sql for sql in statements if not sql.lstrip().startswith("SELECT")]
+    assert ddl[0].startswith('CREATE TABLE IF NOT EXISTS "system_metrics_default"')
+    assert ddl[1] == 'ALTER TABLE "system_metrics" DETACH PARTITION "system_metrics_default"'
+    assert '"system_metrics_p20261020" PARTITION OF' in ddl[2]
+    assert ddl[3].startswith('INSERT INTO "system_metrics_p20261020" SELECT * FROM "system_metrics_default"')
+    assert ddl[4].startswith('DELETE FROM "system_metrics_default"')
+    assert '"system_metrics_p20261021" PARTITION OF' in ddl[5]
+    assert ddl[6] == 'ALTER TABLE "system_metrics" ATTACH PARTITION "system_metrics_default" DEFAULT'
+    assert len(ddl) == 7
+
+
+def test_no_detach_without_stranded_rows():
+    conn, statements = _conn(partitions=["system_metrics_default"])
+    create_partitions(conn, "system_metrics", datetime(2026, 10, 19), datetime(2026, 10, 21))
+    assert sum("PARTITION OF \"system_metrics\" FOR VALUES" in sql for sql in statements) == 2
+    assert not any("DETACH" in sql or "ATTACH" in sql for sql in statements)
+
+
+def test_retention_prunes_default_partition():
+    conn, statements = _conn(partitions=["system_metrics_default", "system_metrics_p20260901",
+                                         "system_metrics_p20261019"])
+    dropped = drop_expired_partitions(conn, now=datetime(2026, 10, 19, 13))
+    assert "system_metrics_p20260901" in dropped and "system_metrics_p20261019" not in dropped
+    assert 'DELETE FROM "system_metrics_default" WHERE "timestamp" < :cutoff' in statements
+
+
+def test_sketch_percentiles_within_bin_error():
+    values = [10.0] * 50 + [100.0] * 45 + [1000.0] * 5
+    sketch = {}
+    for value in values:
+        index = math.ceil(math.log(value) / math.log(SKETCH_GAMMA))
+        sketch[str(index)] = sketch.get(str(index), 0) + 1
+    result = sketch_percentiles(sketch)
+    for key, expected in (("p50", 10.0), ("p95", 100.0), ("p99", 1000.0)):
+        assert abs(result[key] - expected) / expected < 0.02
+
+
+def test_averages_are_weighted_by_value_count():
+    conn = MagicMock()
+    conn.execute.return_value.scalar.return_value = "r"
+    service = TelemetryRollupService()
+    service.roll_up_minutes(conn, datetime(2026, 10, 19, 12), datetime(2026, 10, 19, 13))
+    service.roll_up_hours(conn, datetime(2026, 10, 19, 12), datetime(2026, 10, 19, 13))
+    statements = [str(call.args[0]) for call in conn.execute.call_args_list]
+    minute_inserts = [sql for sql in statements if "'1m', :source" in sql]
+    (hour_insert,) = [sql for sql in statements if "'1h', t.source" in sql]
+    assert minute_inserts and all("SUM(nv), SUM(s)" in sql for sql in minute_inserts)
+    assert "SUM(sum_value) / NULLIF(SUM(value_count), 0) AS avg" in hour_insert
+    assert "t.n, t.nv, t.s" in hour_insert
+
+
+def test_value_stats_average():
+    session = MagicMock()
+    session.execute.return_value.one.return_value = (10, 1.0, 9.0, 4.5, 2)
+    session.execute.return_value.all.return_value = []
+    stats = TelemetryRollupService().value_stats(session, "traces", datetime(2026, 10, 19))
+    assert "NULLIF(SUM(value_count), 0)" in str(session.execute.call_args_list[0].args[0])
+    assert stats["count"] == 10 and stats["avg"] == 4.5 and stats["error_count"] == 2
@@ -0,0 +1,98 @@
+"""Tests für den Telemetrie-Service: Flush und Upsert der Feature-Zähler"""
+from contextlib import nullcontext
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
+
+from app.services.telemetry_service import TelemetryService
+
+
+def _service(session):
+    service = object.__new__(TelemetryService)
+    TelemetryService.__init__(service, MagicMock())
+    service.db_service.get_session.return_value = session
+    return service
+
+
+def _session(execute):
+    session = MagicMock()
+    session.__enter__.return_value = session
+    session.begin_nested.side_effect = lambda: nullcontext()
+    session.execute.side_effect = execute
+    return session
+
+
+def _track(service, *features):
+    for feature in features:
+        service.track_feature_usage(feature, category="ui", duration_ms=10)
+
+
+def _names(stmt):
+    return [value for key, value in stmt.compile().params.items() if key.startswith("feature_name")]
+
+
+def test_rejected_rows_are_dropped_and_the_rest_is_written():
+    written = []
+
+    def execute(stmt):
+        names = _names(stmt)
+        if "kaputt" in names:
+            raise DataError("INSERT", {}, Exception("value too long"))
+        written.extend(names)
+
+    session = _session(execute)
+    service = _service(session)
+    _track(service, "angebote", "kaputt", "angebote")
+    service.flush_feature_usage()
+
+    assert written == ["angebote"]
+    assert session.rollback.called
+    assert session.commit.called
+    assert service._feature_cache == {}
+
+
+@pytest.mark.parametrize("error", [OperationalError("INSERT", {}, Exception("down")), RuntimeError("boom")])
+def test_unavailable_database_keeps_counters(error):
+    session = _session(MagicMock(side_effect=error))
+    service = _service(session)
+    _track(service, "angebote", "angebote")
+    service.flush_feature_usage()
+    _track(service, "angebote")
+
+    (counters,) = service._feature_cache.values()
+    assert counters["count"] == 3
+    assert counters["success"] == 3
+
+
+def test_integrity_error_on_every_row_empties_the_buffer():
+    session = _session(MagicMock(side_effect=IntegrityError("INSERT", {}, Exception("fk"))))
+    service = _service(session)
+    _track(service, "a", "b")
+    service.flush_feature_usage()
+    assert service._feature_cache == {}
+    assert session.begin_nested.call_count == 2
+
+
+def test_dashboard_event_counts_keyed_by_category_value(monkeypatch):
+    import app.services.telemetry_service as telemetry
+
+    rollups = MagicMock()
+    rollups.series_totals.return_value = {"USER": 5, "ERROR": 2, "unbekannt": 1}
+    monkeypatch.setattr(telemetry, "get_telemetry_rollups", lambda: rollups)
+    session = _session(None)
+    session.query.return_value.filter.return_value.scalar.return_value = 0
+    service = _service(session)
+
+    metrics = service.get_dashboard_metrics()
+
+    assert metrics["event_counts"] == {"user": 5, "error": 2, "unbekannt": 1}
+
+
+def test_feature_upsert_average_is_not_integer_division():
+    service = _service(MagicMock())
+    stmt = service._feature_upsert([{"tenant_id": None, "feature_name": "export", "date": None, "usage_count": 3,
+                                     "total_duration_ms": 10, "success_count": 3, "error_count": 0}])
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "avg_duration_ms = (CAST(feature_usage.total_duration_ms + excluded.total_duration_ms AS FLOAT) /" in sql
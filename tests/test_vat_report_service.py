@@ -0,0 +1,69 @@
+"""Tests für die Umsatzsteuer-Voranmeldung: Zeiträume, Kennzahlen und Snapshot"""
+from datetime import date, datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.vat_report_service import VatReportService, VatReturn, period_bounds
+from shared.models import TaxType
+
+
+def _row(tax_type, direction, base, tax=0, computed_tax=0):
+    return SimpleNamespace(tax_type=tax_type, direction=direction, base=Decimal(base),
+                           tax=Decimal(tax), computed_tax=Decimal(computed_tax))
+
+
+def _compute(rows, **period):
+    session = MagicMock()
+    state = MagicMock()
+    state.one.return_value = (4, datetime(2026, 5, 2))
+    session.execute.side_effect = [rows, state]
+    return VatReportService().compute(session, 1, 2026, **period)
+
+
+def test_period_bounds():
+    assert period_bounds(2026, month=2) == (date(2026, 2, 1), date(2026, 2, 28))
+    assert period_bounds(2026, quarter=4) == (date(2026, 10, 1), date(2026, 12, 31))
+    with pytest.raises(ValueError):
+        period_bounds(2026)
+
+
+def test_kennzahlen_from_grouped_rows():
+    result = _compute([
+        _row(TaxType.VAT_19, "output", "1000.99", "190.19"),
+        _row(TaxType.VAT_7, "output", "200.50", "14.04"),
+        _row(TaxType.VAT_19, "input", "500.00", "95.00"),
+        _row(TaxType.VAT_7, "input", "100.00", "7.00"),
+        # Erwerb ohne gebuchte Steuer: Steuer aus dem Satz, zugleich Vorsteuer
+        _row(TaxType.INTRA_EU, "input", "300.00", computed_tax="57.00"),
+    ], month=5)
+
+    # Bemessungsgrundlagen auf volle Euro abgerundet
+    assert result.bases == {"81": Decimal(1000), "86": Decimal(200), "89": Decimal(300)}
+    assert result.taxes["81"] == Decimal("190.19")
+    assert result.taxes["66"] == Decimal("102.00")
+    assert result.taxes["89"] == result.taxes["61"] == Decimal("57.00")
+    assert result.payable == Decimal("190.19") + Decimal("14.04") - Decimal("102.00")
+    assert result.journals == 4
+    assert result.lines()[-1] == {"kz": "83", "label": "Verbleibende Umsatzsteuer-Vorauszahlung",
+                                  "base": None, "tax": result.payable}
+
+
+def test_snapshot_round_trip():
+    original = VatReturn(2026, None, 2, bases={"81": Decimal(1000)}, taxes={"81": Decimal("190.00")},
+                         journals=3, last_change=datetime(2026, 6, 30, 12))
+    report = SimpleNamespace(period_year=2026, period_month=None, period_quarter=2, details=original.details())
+    restored = VatReturn.from_report(report)
+    assert (restored.bases, restored.taxes) == (original.bases, original.taxes)
+    assert (restored.journals, restored.last_change) == (3, original.last_change)
+
+
+def test_submitted_report_is_not_overwritten(monkeypatch):
+    service = VatReportService()
+    monkeypatch.setattr(service, "_find", lambda *args: SimpleNamespace(status="submitted"))
+    session = MagicMock()
+    with pytest.raises(ValueError):
+        service.save(session, 1, VatReturn(2026, 5, None))
+    session.commit.assert_not_called()